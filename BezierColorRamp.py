@@ -136,74 +136,15 @@ def polylinear_gradient(colors, n):
         return {}
 
 ## ===================================================================================
-def fact(n, fact_cache):
-    ''' Memoized factorial function '''
-    try:
-        return fact_cache[n]
-
-    except(KeyError):
-        if n == 1 or n == 0:
-            result = 1
-
-        else:
-            result = n*fact(n-1)
-
-        fact_cache[n] = result
-
-        return result
-
-    except:
-        errorMsg()
-
-## ===================================================================================
-def bernstein(t,n,i, fact_cache):
-    ''' Bernstein coefficient '''
-    try:
-        binom = fact(n, fact_cache)/float(fact(i, fact_cache)*fact(n - i, fact_cache))
-
-        return binom*((1-t)**(n-i))*(t**i)
-
-    except:
-        errorMsg()
-
-## ===================================================================================
-#def bezier_gradient(colors, n_out, fact_cache):
-def bezier_gradient(RGB_list, n_out, fact_cache):
+def bezier_gradient(RGB_list, n_out, fact_cache=None):
     ''' Returns a "bezier gradient" dictionary
       using a given list of colors as control
       points. Dictionary also contains control
-      colors/points. '''
+      colors/points. fact_cache is no longer used; the
+      binomial coefficients are kept by gSSURGO_Palette. '''
 
     try:
-        # RGB vectors for each color, use as control points
-        #RGB_list = [hex_to_RGB(color) for color in colors]
-        n = len(RGB_list) - 1
-        #PrintMsg(" \nRGB_list: " + str(RGB_list), 1)
-
-        def bezier_interp(t, fact_cache):
-            ''' Define an interpolation function
-            for this specific curve'''
-            # List of all summands
-
-            summands = [ map(lambda x: int(bernstein(t,n,i, fact_cache)*x), c)
-                for i, c in enumerate(RGB_list)]
-
-            # Output color
-            out = [0,0,0]
-            # Add components of each summand together
-            for vector in summands:
-                for c in range(3):
-                    out[c] += vector[c]
-
-            return out
-
-        gradient = [ bezier_interp(float(t)/(n_out-1), fact_cache)
-            for t in range(n_out)]
-
-        # Return all points requested for gradient
-        return { "gradient": color_dict(gradient), "control": color_dict(RGB_list)}
-
-
+        return gSSURGO_Palette.BezierGradient(RGB_list, n_out)
 
     except:
         errorMsg()
@@ -212,71 +153,11 @@ def bezier_gradient(RGB_list, n_out, fact_cache):
 ## ===================================================================================
 def Process(colorNum, colorList):
     # main function
-
-    fact_cache = {}
+    # Bezier ramp between each pair of colors in colorList, thinned to about colorNum legend colors.
+    # Ramps are cached by gSSURGO_Palette for each (colorNum, colorList).
 
     try:
-        rgbList = list()
-        dRGB = dict()
-        dRGB["Red"] = [255, 0, 0]
-        dRGB["Yellow"] = [255, 255, 0]
-        dRGB["Green"] = [0, 255, 0]
-        dRGB["Cyan"] = [0, 255, 255]
-        dRGB["Blue"] = [0, 0, 255]
-        dRGB["Magenta"] = [255, 0, 255]
-        masterColors = list()
-
-        processList = list()
-        for color in colorList:
-            processList.append(dRGB[color])
-
-        #PrintMsg(" \nCreated processList: " + str(processList), 1)
-
-        lastRGB = [-1, -1, -1]
-
-        for i in range(len(processList)):
-            try:
-
-                rgb1 = processList[i]
-                rgb2 = processList[i + 1]
-                #PrintMsg(" \nRGB1-2: " + str(rgb1) + ", " + str(rgb2), 1)
-                #hexList = [RGB_to_hex(rgb1), RGB_to_hex(rgb2)]
-                RGB_list = [processList[i], processList[i + 1]]
-                #dBesier = bezier_gradient(hexList, colorNum, fact_cache)
-                dBesier = bezier_gradient(RGB_list, colorNum, fact_cache)
-
-                red = dBesier["gradient"]["r"]
-                green = dBesier["gradient"]["g"]
-                blue = dBesier["gradient"]["b"]
-
-                for i in range(len(red)):
-                    thisRGB = [red[i], green[i], blue[i]]
-
-                    if not thisRGB == lastRGB:
-                        masterColors.append([red[i], green[i], blue[i]])
-
-                    lastRGB = thisRGB
-
-            except:
-                pass
-
-        skipNum = int(round((len(masterColors) - colorNum) / float(colorNum - 1.0), 0))
-        legendColors = list()
-
-        i = 0
-        #j = 0
-        #masterColors = list()
-
-        while i < len(masterColors):
-
-            legendColors.append(masterColors[i])
-            i += (skipNum + 1)
-            #j += 1
-
-        #PrintMsg(" \n" + str(legendColors), 1)
-
-        return legendColors
-
+        return gSSURGO_Palette.Ramp(colorNum, colorList)
 
     except:
         errorMsg()
@@ -286,6 +167,7 @@ def Process(colorNum, colorList):
 # MAIN
 import arcpy, sys, os, locale, traceback
 from numpy import random as rnd
+import gSSURGO_Palette
 
 try:
 
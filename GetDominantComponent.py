@@ -10,6 +10,9 @@
 # have the same comppct_r. This simplistic method does not take into account
 # what kind of data is behind either (nulls or higher-lower values).
 #
+# 2017-11-02 The dominant component comes from the component index (gSSURGO_ComponentIndex)
+# instead of sorting the component table. Ties still go to the higher cokey.
+#
 ## ===================================================================================
 class MyError(Exception):
     pass
@@ -69,6 +72,7 @@ def Number_Format(num, places=0, bCommas=True):
 ## ====================================== Main Body ==================================
 # Import modules
 import sys, string, os, locale, arcpy, traceback
+import gSSURGO_ComponentIndex
 from arcpy import env
 inputDB = arcpy.GetParameterAsText(0)    # Input database. Assuming SSURGO or gSSURGO soils database
 outputTbl = arcpy.GetParameterAsText(1)  # Output table containing dominant component for each map unit
@@ -81,21 +85,18 @@ try:
     if not arcpy.Exists(coTbl):
         raise MyError, "COMPONENT table not found for " + inputDB
 
-    # Open component table sorted by cokey and comppct_r
-    iCnt = int(arcpy.GetCount_management(coTbl).getOutput(0))
-
-    dComp = dict()
+    # Components for each map unit in comppct_r order. The index is built the first time.
+    dIndex = gSSURGO_ComponentIndex.LoadIndex(inputDB)
 
-    sqlClause = (None, "ORDER BY MUKEY DESC, COMPPCT_R DESC, COKEY DESC")
-    arcpy.SetProgressor("step", "Reading component table...",  0, iCnt, 1)
+    if dIndex is None:
+        raise MyError, "Unable to get the component index for " + inputDB
 
-    with arcpy.da.SearchCursor(coTbl, ["mukey", "cokey", "comppct_r"], sql_clause=sqlClause) as incur:
-        for inrec in incur:
-            if not inrec[0] in dComp:
-                # this is the dominant component
-                dComp[inrec[0]] = inrec[1], inrec[2]
+    dComp = dict()
 
-            arcpy.SetProgressorPosition()
+    for mukey, coList in dIndex.iteritems():
+        # this is the dominant component
+        cokey, comppct, majcompflag = coList[0]
+        dComp[mukey] = cokey, comppct
 
     if len(dComp) > 0:
         arcpy.ResetProgressor()
@@ -645,6 +645,10 @@ def MaketheQueryTable(theDB, sdvAtt):
         else:
             theSQL = "COMPONENT.COMPPCT_R > 0 AND LEGEND.LKEY = MAPUNIT.LKEY AND MAPUNIT.MUKEY = COMPONENT.MUKEY AND COMPONENT.COKEY = COINTERP.COKEY     AND COINTERP.MRULENAME = '" + dSDV["nasisrulename"]  + "'"
 
+        # Only join the cointerp records between the first and last OBJECTID of this interpretation
+        ruleKeys = gSSURGO_InterpIndex.RuleKeys(os.path.join(theDB, "distinterpmd"), dSDV["nasisrulename"])
+        theSQL = gSSURGO_InterpIndex.RangeQuery(theDB, "MRULEKEY", ruleKeys, theSQL, "COINTERP.")
+
         # PrintMsg(" \ntheSQL: " + theSQL, 0)
         # Things to be aware of with MakeQueryTable:
         # USE_KEY_FIELDS does not create OBJECTID field. Lack of OBJECTID precludes sorting on Mukey.
@@ -770,6 +774,7 @@ def MakeReport(tableView):
 # Import modules
 import arcpy, sys, string, os, re, locale, traceback, time
 from arcpy import env
+import gSSURGO_InterpIndex
 
 try:
     # Create geoprocessor object
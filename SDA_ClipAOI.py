@@ -0,0 +1,527 @@
+# SDA_ClipAOI.py
+#
+# Steve Peaslee, National Soil Survey Center
+#
+# Purpose:  Client-side clip of the soil polygons returned by a Soil Data Access spatial request.
+#
+# The original ClipToAOI function ran Clip_analysis against every soil polygon and the
+# RunSpatialQuery functions called polygon.intersect for every polygon returned by SDA. For a
+# large AOI almost all of those polygons lie completely inside the AOI and the intersect
+# returns an unchanged copy.
+#
+# The AOI is indexed once as a regular grid. Each grid cell is classified as inside, outside
+# or crossing the AOI boundary, subdividing only the cells that cross the boundary. The extent
+# of each soil polygon is then checked against the grid using summed-area tables:
+#
+#     extent covers only 'inside' cells    keep the polygon as-is
+#     extent covers only 'outside' cells   drop the polygon
+#     anything else                        intersect with the AOI
+#
+# Only the boundary polygons are intersected. Large sets of boundary polygons are split into
+# chunks and intersected by a pool of worker processes.
+#
+# FinalDissolve only needs to merge pieces of the same map unit that touch each other. Those
+# candidates are found by comparing polygon extents within each MUKEY group.
+#
+# Used by SDA_SpatialQuery_Custom, SDA_ACPF, SDA_SpatialQuery_AWS and SDA_SpatialQuery_CDSI.
+#
+
+## ===================================================================================
+class MyError(Exception):
+    pass
+
+## ===================================================================================
+def PrintMsg(msg, severity=0):
+    # prints message to screen if run as a python script
+    # Adds tool message to the geoprocessor
+    #
+    #Split the message on \n first, so that if it's multiple lines, a GPMessage will be added for each line
+    try:
+        for string in msg.split('\n'):
+            #Add a geoprocessing message (in case this is run as a tool)
+            if severity == 0:
+                arcpy.AddMessage(string)
+
+            elif severity == 1:
+                arcpy.AddWarning(string)
+
+            elif severity == 2:
+                arcpy.AddMessage("    ")
+                arcpy.AddError(string)
+
+    except:
+        pass
+
+## ===================================================================================
+def errorMsg():
+    try:
+        tb = sys.exc_info()[2]
+        tbinfo = traceback.format_tb(tb)[0]
+        theMsg = tbinfo + "\n" + str(sys.exc_type)+ ": " + str(sys.exc_value)
+        PrintMsg(theMsg, 2)
+
+    except:
+        PrintMsg("Unhandled error in unHandledException method", 2)
+
+## ===================================================================================
+def Number_Format(num, places=0, bCommas=True):
+    try:
+    # Format a number according to locality and given places
+        locale.setlocale(locale.LC_ALL, "")
+        if bCommas:
+            theNumber = locale.format("%.*f", (places, num), True)
+
+        else:
+            theNumber = locale.format("%.*f", (places, num), False)
+        return theNumber
+
+    except:
+        errorMsg()
+        return "???"
+
+## ===================================================================================
+def GetExtents(geometryList):
+    # Return an N x 4 array (xmin, ymin, xmax, ymax) for a list of geometries.
+    # Null geometries get an empty extent that falls outside of any grid.
+    extents = np.empty((len(geometryList), 4), dtype=np.float64)
+    extents[:] = [np.inf, np.inf, -np.inf, -np.inf]
+
+    for i in range(len(geometryList)):
+        geom = geometryList[i]
+
+        if not geom is None:
+            ext = geom.extent
+            extents[i] = (ext.XMin, ext.YMin, ext.XMax, ext.YMax)
+
+    return extents
+
+## ===================================================================================
+def ClassifyCell(aoiGeometry, cs, x0, y0, x1, y1):
+    # Relational test for one grid cell against the AOI
+    # Returns 1 for inside, 0 for outside and 2 for a cell that crosses the AOI boundary
+    cell = arcpy.Polygon(arcpy.Array([arcpy.Point(x0, y0), arcpy.Point(x0, y1), arcpy.Point(x1, y1), arcpy.Point(x1, y0), arcpy.Point(x0, y0)]), cs)
+
+    if aoiGeometry.disjoint(cell):
+        return 0
+
+    if aoiGeometry.contains(cell):
+        return 1
+
+    return 2
+
+## ===================================================================================
+def CreateGridIndex(aoiGeometry, maxLevel=7):
+    # Build a grid index for the AOI polygon.
+    #
+    # Starts with a 4 x 4 grid over the AOI extent and subdivides only the cells that cross the
+    # AOI boundary, so the number of relational tests grows with the boundary length and not
+    # with the cell count. The final grid is (2 ** maxLevel) cells on a side.
+    #
+    # Returns a dictionary with the grid origin, cell size and summed-area tables for the
+    # 'inside' and 'outside' cells.
+    #
+    try:
+        ext = aoiGeometry.extent
+        cs = aoiGeometry.spatialReference
+        gridSize = 2 ** maxLevel
+        xmin, ymin = ext.XMin, ext.YMin
+        cellW = max(ext.XMax - ext.XMin, 1e-9) / gridSize
+        cellH = max(ext.YMax - ext.YMin, 1e-9) / gridSize
+
+        # Final grid, filled in as each level is classified. 2 = boundary
+        grid = np.empty((gridSize, gridSize), dtype=np.int8)
+        grid[:] = 2
+        testCnt = 0
+
+        # (row, col) of each cell to test, in final-grid cells
+        size = gridSize // 4
+        cells = [(r * size, c * size) for r in range(4) for c in range(4)]
+
+        while len(cells) > 0:
+            nextCells = list()
+
+            for row, col in cells:
+                y0 = ymin + row * cellH
+                x0 = xmin + col * cellW
+                cellClass = ClassifyCell(aoiGeometry, cs, x0, y0, x0 + size * cellW, y0 + size * cellH)
+                testCnt += 1
+
+                if cellClass == 2 and size > 1:
+                    half = size // 2
+                    nextCells.extend([(row, col), (row, col + half), (row + half, col), (row + half, col + half)])
+
+                else:
+                    grid[row:row + size, col:col + size] = cellClass
+
+            cells = nextCells
+            size = size // 2
+
+        dIndex = dict()
+        dIndex["xmin"] = xmin
+        dIndex["ymin"] = ymin
+        dIndex["cellW"] = cellW
+        dIndex["cellH"] = cellH
+        dIndex["gridSize"] = gridSize
+        dIndex["inside"] = SummedArea(grid == 1)
+        dIndex["outside"] = SummedArea(grid == 0)
+        dIndex["tests"] = testCnt
+
+        return dIndex
+
+    except MyError, e:
+        # Example: raise MyError, "This is an error message"
+        PrintMsg(str(e), 2)
+        return None
+
+    except:
+        errorMsg()
+        return None
+
+## ===================================================================================
+def SummedArea(mask):
+    # Summed-area table with a leading row and column of zeros
+    rows, cols = mask.shape
+    sat = np.zeros((rows + 1, cols + 1), dtype=np.int32)
+    sat[1:, 1:] = np.cumsum(np.cumsum(mask.astype(np.int32), axis=0), axis=1)
+    return sat
+
+## ===================================================================================
+def ClassifyExtents(dIndex, extents):
+    # Classify polygon extents against the AOI grid index.
+    # Returns an int8 array: 0 = outside the AOI, 1 = inside the AOI, 2 = crosses the AOI boundary
+    gridSize = dIndex["gridSize"]
+    gridXMax = dIndex["xmin"] + gridSize * dIndex["cellW"]
+    gridYMax = dIndex["ymin"] + gridSize * dIndex["cellH"]
+
+    result = np.empty(len(extents), dtype=np.int8)
+    result[:] = 2
+
+    if len(extents) == 0:
+        return result
+
+    # Extents that miss the grid entirely (includes null geometries)
+    bMissed = (extents[:, 0] > gridXMax) | (extents[:, 2] < dIndex["xmin"]) | (extents[:, 1] > gridYMax) | (extents[:, 3] < dIndex["ymin"])
+
+    # Extents that extend past the grid cannot be completely inside the AOI
+    bPastGrid = (extents[:, 0] < dIndex["xmin"]) | (extents[:, 2] > gridXMax) | (extents[:, 1] < dIndex["ymin"]) | (extents[:, 3] > gridYMax)
+
+    valid = ~bMissed
+    ext = extents[valid]
+    c0 = np.clip(np.floor((ext[:, 0] - dIndex["xmin"]) / dIndex["cellW"]), 0, gridSize - 1).astype(np.int64)
+    c1 = np.clip(np.floor((ext[:, 2] - dIndex["xmin"]) / dIndex["cellW"]), 0, gridSize - 1).astype(np.int64)
+    r0 = np.clip(np.floor((ext[:, 1] - dIndex["ymin"]) / dIndex["cellH"]), 0, gridSize - 1).astype(np.int64)
+    r1 = np.clip(np.floor((ext[:, 3] - dIndex["ymin"]) / dIndex["cellH"]), 0, gridSize - 1).astype(np.int64)
+    cellCnt = (c1 - c0 + 1) * (r1 - r0 + 1)
+
+    sat = dIndex["inside"]
+    insideCnt = sat[r1 + 1, c1 + 1] - sat[r0, c1 + 1] - sat[r1 + 1, c0] + sat[r0, c0]
+    sat = dIndex["outside"]
+    outsideCnt = sat[r1 + 1, c1 + 1] - sat[r0, c1 + 1] - sat[r1 + 1, c0] + sat[r0, c0]
+
+    validClass = np.empty(len(ext), dtype=np.int8)
+    validClass[:] = 2
+    validClass[(insideCnt == cellCnt) & ~bPastGrid[valid]] = 1
+    validClass[outsideCnt == cellCnt] = 0
+
+    result[valid] = validClass
+    result[bMissed] = 0
+
+    return result
+
+## ===================================================================================
+def ClipChunk(args):
+    # Worker function for the process pool. Geometries are passed as Esri JSON strings.
+    # An empty intersect is returned as None.
+    clipJSON, polygonList = args
+    clipPolygon = arcpy.AsShape(json.loads(clipJSON), True)
+    clippedList = list()
+
+    for polygonJSON in polygonList:
+        outputPolygon = arcpy.AsShape(json.loads(polygonJSON), True).intersect(clipPolygon, 4)
+
+        if outputPolygon is None or outputPolygon.pointCount == 0:
+            clippedList.append(None)
+
+        else:
+            clippedList.append(outputPolygon.JSON)
+
+    return clippedList
+
+## ===================================================================================
+def ClipBoundaryPolygons(polygonList, clipPolygon, chunkSize=2000, minParallel=10000):
+    # Intersect the boundary polygons with the AOI.
+    #
+    # Small sets are intersected in this process. Larger sets are split into chunks for a pool of
+    # worker processes. The chunks are returned in their original order so the output is the same
+    # either way.
+    #
+    # On Windows each worker imports the calling script, so the tool's main code must be under
+    # if __name__ == "__main__".
+    #
+    workerCnt = 1
+
+    if len(polygonList) >= minParallel:
+        try:
+            workerCnt = min(multiprocessing.cpu_count() - 1, len(polygonList) // chunkSize)
+
+        except NotImplementedError:
+            workerCnt = 1
+
+    if workerCnt < 2:
+        return [polygon.intersect(clipPolygon, 4) for polygon in polygonList]
+
+    # ArcMap runs python in-process, so the workers must be started with the python executable
+    pythonExe = os.path.join(sys.exec_prefix, "pythonw.exe")
+
+    if os.path.isfile(pythonExe):
+        multiprocessing.set_executable(pythonExe)
+
+    clipJSON = clipPolygon.JSON
+    chunks = list()
+
+    for i in range(0, len(polygonList), chunkSize):
+        chunks.append((clipJSON, [polygon.JSON for polygon in polygonList[i:i + chunkSize]]))
+
+    PrintMsg("\tClipping " + Number_Format(len(polygonList), 0, True) + " boundary polygons using " + str(workerCnt) + " processes", 0)
+    pool = multiprocessing.Pool(workerCnt)
+
+    try:
+        results = pool.map(ClipChunk, chunks)
+
+    finally:
+        pool.close()
+        pool.join()
+
+    clippedList = list()
+
+    for chunk in results:
+        for polygonJSON in chunk:
+            if polygonJSON is None:
+                clippedList.append(None)
+
+            else:
+                clippedList.append(arcpy.AsShape(json.loads(polygonJSON), True))
+
+    return clippedList
+
+## ===================================================================================
+def ClipGeometries(polygonList, clipPolygon):
+    # Clip a list of polygons to the AOI polygon.
+    #
+    # Returns a list the same length as polygonList. Polygons that fall completely outside
+    # the AOI, or that are empty after the intersect, are returned as None.
+    #
+    try:
+        clippedList = [None] * len(polygonList)
+
+        if len(polygonList) == 0:
+            return clippedList
+
+        dIndex = CreateGridIndex(clipPolygon)
+
+        if dIndex is None:
+            raise MyError, "Failed to create grid index for AOI"
+
+        polyClass = ClassifyExtents(dIndex, GetExtents(polygonList))
+        boundaryIndx = np.nonzero(polyClass == 2)[0]
+
+        for i in np.nonzero(polyClass == 1)[0]:
+            clippedList[i] = polygonList[i]
+
+        if len(boundaryIndx) > 0:
+            boundaryList = ClipBoundaryPolygons([polygonList[i] for i in boundaryIndx], clipPolygon)
+
+            for i in range(len(boundaryIndx)):
+                # Empty intersects are dropped. They can come back as None or as an empty polygon.
+                if not boundaryList[i] is None and boundaryList[i].pointCount > 0:
+                    clippedList[boundaryIndx[i]] = boundaryList[i]
+
+        return clippedList
+
+    except MyError, e:
+        # Example: raise MyError, "This is an error message"
+        PrintMsg(str(e), 2)
+        return []
+
+    except:
+        errorMsg()
+        return []
+
+## ===================================================================================
+def ClipFeatureclass(theAOI, outputShp):
+    # Clip the soil polygon featureclass in place using the AOI layer.
+    #
+    # Polygons inside the AOI are not touched, polygons outside the AOI are deleted and only
+    # the polygons that cross the AOI boundary are rewritten. Replaces Clip_analysis, which
+    # copied every polygon to a new featureclass.
+    #
+    # Returns the number of polygons left in outputShp, or -1 on failure.
+    #
+    try:
+        outputCS = arcpy.Describe(outputShp).spatialReference
+        aoiGeometry = None
+
+        with arcpy.da.SearchCursor(theAOI, ["SHAPE@"], "", outputCS) as cur:
+            for rec in cur:
+                if aoiGeometry is None:
+                    aoiGeometry = rec[0]
+
+                else:
+                    aoiGeometry = aoiGeometry.union(rec[0])
+
+        if aoiGeometry is None:
+            raise MyError, "No AOI polygons found in " + str(theAOI)
+
+        oidList = list()
+        polygonList = list()
+
+        with arcpy.da.SearchCursor(outputShp, ["OID@", "SHAPE@"]) as cur:
+            for rec in cur:
+                oidList.append(rec[0])
+                polygonList.append(rec[1])
+
+        clippedList = ClipGeometries(polygonList, aoiGeometry)
+
+        if len(clippedList) != len(polygonList):
+            raise MyError, "Failed to clip soil polygons to AOI"
+
+        # Only the polygons that were dropped or changed by the clip need to be updated
+        dUpdate = dict()
+
+        for i in range(len(oidList)):
+            if not clippedList[i] is polygonList[i]:
+                dUpdate[oidList[i]] = clippedList[i]
+
+        del polygonList
+        polyCnt = len(oidList) - len([oid for oid in dUpdate if dUpdate[oid] is None])
+
+        if len(dUpdate) > 0:
+            with arcpy.da.UpdateCursor(outputShp, ["OID@", "SHAPE@"]) as cur:
+                for rec in cur:
+                    if rec[0] in dUpdate:
+                        if dUpdate[rec[0]] is None:
+                            cur.deleteRow()
+
+                        else:
+                            rec[1] = dUpdate[rec[0]]
+                            cur.updateRow(rec)
+
+        PrintMsg(" \n\tClip updated " + Number_Format(len(dUpdate), 0, True) + " of " + Number_Format(len(oidList), 0, True) + " soil polygons", 0)
+
+        return polyCnt
+
+    except MyError, e:
+        # Example: raise MyError, "This is an error message"
+        PrintMsg(str(e), 2)
+        return -1
+
+    except:
+        errorMsg()
+        return -1
+
+## ===================================================================================
+def GetDissolveCandidates(mukeyList, extents, maxGroup=2000):
+    # Return an index array for the polygons that may need to be merged by a dissolve on MUKEY.
+    #
+    # A piece can only merge with another piece of the same map unit that it touches, so a
+    # polygon is a candidate when its extent touches the extent of another polygon with the
+    # same MUKEY. Very large groups are passed through without the pairwise test.
+    #
+    mukeys = np.array(mukeyList)
+    order = np.argsort(mukeys, kind="mergesort")
+    sortedKeys = mukeys[order]
+    bCandidate = np.zeros(len(mukeys), dtype=bool)
+
+    if len(mukeys) == 0:
+        return np.nonzero(bCandidate)[0]
+
+    groupStart = np.nonzero(np.concatenate(([True], sortedKeys[1:] != sortedKeys[:-1])))[0]
+    groupEnd = np.concatenate((groupStart[1:], [len(mukeys)]))
+
+    for start, end in zip(groupStart, groupEnd):
+        if end - start < 2:
+            continue
+
+        indx = order[start:end]
+
+        if end - start > maxGroup:
+            bCandidate[indx] = True
+            continue
+
+        ext = extents[indx]
+        touches = (ext[:, 0][:, None] <= ext[:, 2][None, :]) & (ext[:, 2][:, None] >= ext[:, 0][None, :]) & \
+                  (ext[:, 1][:, None] <= ext[:, 3][None, :]) & (ext[:, 3][:, None] >= ext[:, 1][None, :])
+        np.fill_diagonal(touches, False)
+        bCandidate[indx] = touches.any(axis=1)
+
+    return np.nonzero(bCandidate)[0]
+
+## ===================================================================================
+def DissolveFeatureclass(outputShp):
+    # Dissolve the soil polygons on MUKEY (SINGLE_PART) to remove clipping boundaries.
+    #
+    # Only the polygons that can merge with another polygon are dissolved. The rest of the
+    # featureclass is left in place.
+    #
+    # Returns the number of polygons in outputShp, or -1 on failure.
+    #
+    try:
+        oidList = list()
+        mukeyList = list()
+        polygonList = list()
+
+        with arcpy.da.SearchCursor(outputShp, ["OID@", "MUKEY", "SHAPE@"]) as cur:
+            for rec in cur:
+                oidList.append(rec[0])
+                mukeyList.append(rec[1])
+                polygonList.append(rec[2])
+
+        candidates = GetDissolveCandidates(mukeyList, GetExtents(polygonList))
+        del polygonList
+
+        PrintMsg(" \n\tDissolving " + Number_Format(len(candidates), 0, True) + " of " + Number_Format(len(oidList), 0, True) + " soil polygons", 0)
+
+        if len(candidates) == 0:
+            return len(oidList)
+
+        env.workspace = os.path.dirname(outputShp)
+        oidField = arcpy.Describe(outputShp).OIDFieldName
+        sql = oidField + " IN (" + ",".join([str(oidList[i]) for i in candidates]) + ")"
+        candidateLayer = "DissolveCandidates"
+        dissolvedFC = os.path.join(env.scratchGDB, "DissolvedSoils")
+
+        if arcpy.Exists(dissolvedFC):
+            arcpy.Delete_management(dissolvedFC)
+
+        if arcpy.Exists(candidateLayer):
+            arcpy.Delete_management(candidateLayer)
+
+        arcpy.MakeFeatureLayer_management(outputShp, candidateLayer, sql)
+        arcpy.Dissolve_management(candidateLayer, dissolvedFC, ["MUKEY"], "", "SINGLE_PART")
+        dissolvedCnt = int(arcpy.GetCount_management(dissolvedFC).getOutput(0))
+        arcpy.DeleteRows_management(candidateLayer)
+        arcpy.Delete_management(candidateLayer)
+        arcpy.Append_management(dissolvedFC, outputShp, "NO_TEST")
+        arcpy.Delete_management(dissolvedFC)
+
+        return len(oidList) - len(candidates) + dissolvedCnt
+
+    except MyError, e:
+        # Example: raise MyError, "This is an error message"
+        PrintMsg(str(e), 2)
+        return -1
+
+    except:
+        errorMsg()
+        return -1
+
+## ===================================================================================
+## ===================================================================================
+## MAIN
+## ===================================================================================
+
+# Import system modules
+import arcpy, sys, os, locale, json, traceback, multiprocessing
+import numpy as np
+
+from arcpy import env
@@ -2650,11 +2650,8 @@ def GetRatingDomain(gdb):
         if dSDV["tiebreakdomainname"] is not None:
             wc = "domainname = '" + dSDV["tiebreakdomainname"] + "'"
 
-            sc = (None, "ORDER BY choicesequence ASC")
-
-            with arcpy.da.SearchCursor(mdcols, ["choice", "choicesequence"], where_clause=wc, sql_clause=sc) as cur:
-                for rec in cur:
-                    domainValues.append(rec[0])
+            # The domain choices are only read from mdstatdomdet once for each process
+            domainValues = gSSURGO_DomainCodes.ReadDomain(mdcols, wc)
 
         elif bVerbose:
             PrintMsg(" \n" + sdvAtt + ": no domain choices found", 1)
@@ -4945,48 +4942,34 @@ def AggregateCo_DCD_Domain(gdb, sdvAtt, sdvFld, initialTbl):
         if outputTbl == "":
             return outputTbl, outputValues
 
-        lastCokey = "xxxx"
-        dComp = dict()
-        dCompPct = dict()
-        dMapunit = dict()
-        missingDomain = list()
-        dCase = dict()
-
-        # Read initial table for non-numeric data types. Capture domain values and all component ratings.
+        # Read initial table for non-numeric data types. Capture all component ratings.
         #
         if bVerbose:
             PrintMsg(" \nReading initial data...", 1)
 
+        mukeys = list()
+        cokeys = list()
+        compPcts = list()
+        ratings = list()
+
+        with arcpy.da.SearchCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
+
+            for rec in cur:
+                # "MUKEY", "COKEY", "COMPPCT_R", RATING
+                mukeys.append(rec[0])
+                cokeys.append(rec[1])
+                compPcts.append(rec[2])
+                ratings.append(rec[3])
+
         if not dSDV["attributetype"].lower() == "interpretation" and dSDV["attributelogicaldatatype"].lower() in ["string", "vtext"]:  # Changed here 2016-04-28
-            # No domain values for non-interp string ratings
+            # No domain values for non-interp string ratings. Use the sorted ratings as the domain
+            # so that ties go to the higher or lower value.
             #
             if bVerbose:
                 PrintMsg(" \ndValues for " + dSDV["attributelogicaldatatype"] + " values: " + str(dValues), 1)
                 PrintMsg("domainValues for " + dSDV["attributelogicaldatatype"] + " values: " + str(domainValues), 1)
 
-            with arcpy.da.SearchCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
-
-                for rec in cur:
-                    # "MUKEY", "COKEY", "COMPPCT_R", RATING
-                    try:
-                        #PrintMsg("\t" + str(rec), 1)
-                        # capture component ratings as index numbers instead.
-                        #dComp[rec[1]].append(dValues[str(rec[3]).upper()][0])
-                        dComp[rec[1]].append(rec[3])
-                        dCompPct[rec[1]] = rec[2]
-
-                    except:
-                        #dComp[rec[1]] = [dValues[str(rec[3]).upper()][0]]  #error
-                        dComp[rec[1]] = [rec[3]]
-                        dCompPct[rec[1]] = rec[2]
-                        dCase[str(rec[3]).upper()] = rec[3]  # save original value using uppercase key
-
-                        # save list of components for each mapunit
-                        try:
-                            dMapunit[rec[0]].append(rec[1])
-
-                        except:
-                            dMapunit[rec[0]] = [rec[1]]
+            dDomain = gSSURGO_DomainCodes.DomainCodes(sorted(set(ratings)))
 
         elif dSDV["attributelogicaldatatype"].lower() in ["string", "float", "integer", "choice"]:
             if len(domainValues) > 1 and not "NONE" in domainValues:
@@ -4996,238 +4979,63 @@ def AggregateCo_DCD_Domain(gdb, sdvAtt, sdvFld, initialTbl):
             if bVerbose:
                 PrintMsg(" \ndValues for " + dSDV["attributelogicaldatatype"].lower() + " values: " + str(dValues), 1)
 
-            with arcpy.da.SearchCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
-
-                for rec in cur:
-                    # "MUKEY", "COKEY", "COMPPCT_R", RATING
-                    try:
-                        #PrintMsg("\t" + str(rec), 1)
-                        # capture component ratings as index numbers instead
-                        # Append uppercase rating value to component dictionary
-                        dComp[rec[1]].append(dValues[str(rec[3]).upper()][0])
-                        dCompPct[rec[1]] = rec[2]
-
-                    except:
-                        # this is a new component record. create a new dictionary item.
-                        #
-                        #PrintMsg(" \ndomainValues is empty, but legendValues has " + str(legendValues), 1)
-                        dCase[str(rec[3]).upper()] = rec[3]
-
-                        if str(rec[3]).upper() in dValues:
-                            #PrintMsg("\tdValue good for: " + str(rec), 1)
-                            dComp[rec[1]] = [dValues[str(rec[3]).upper()][0]]
-                            dCompPct[rec[1]] = rec[2]
-
-                            # compare actual rating value to domainValues to make sure case is correct
-                            if not rec[3] in domainValues: # this is a case problem
-                                # replace the original dValue item
-                                dValues[str(rec[3]).upper()][1] = rec[3]
-                                # replace the value in domainValues list
-                                for i in range(len(domainValues)):
-                                    if str(domainValues[i]).upper() == str(rec[3]).upper():
-                                        domainValues[i] = rec[3]
-
-
-                        else:
-                            # dValues is keyed on uppercase string rating or is Null
-                            #
-                            PrintMsg("\tdValue not found for: " + str(rec), 1)
-                            if not str(rec[3]) in missingDomain:
-                                # Try to add missing value to dDomainValues dict and domainValues list
-                                dValues[str(rec[3]).upper()] = [len(dValues), rec[3]]
-                                domainValues.append(rec[3])
-                                domainValuesUp.append(str(rec[3]).upper())
-                                missingDomain.append(str(rec[3]))
-                                dCompPct[rec[1]] = rec[2]
-                                #PrintMsg("\tAdding value '" + str(rec[3]) + "' to domainValues", 1)
-
-                        # save list of components for each mapunit
-                        try:
-                            dMapunit[rec[0]].append(rec[1])
-
-                        except:
-                            dMapunit[rec[0]] = [rec[1]]
+            dDomain = gSSURGO_DomainCodes.DomainCodes(domainValues)
 
         else:
             raise MyError, "Problem with handling domain values of type '" + dSDV["attributelogicaldatatype"]
 
-        # Aggregate monthly index values to a single value for each component??? Would it not be better to
-        # create a new function for COMONTH-DCD? Then I could simplify this function.
+        # Each distinct rating is coded once. Ratings that differ from the domain only in case replace the
+        # domain value. Ratings that are not in the domain are added to the end of it.
         #
-        # Sort depending upon tiebreak setting
-        # Update dictionary with a single index value for each component
-        #if not dSDV["attributelogicaldatatype"].lower() in ["string", "vText"]:
+        codes, addedValues, fixedValues = gSSURGO_DomainCodes.EncodeRatings(dDomain, ratings)
 
-        if bVerbose:
-            PrintMsg(" \nAggregating to a single value per component which would generally only apply to COMONTH properties?", 1)
+        if dDomain["values"] is domainValues:
+            for rating in fixedValues:
+                key = gSSURGO_DomainCodes.DomainKey(rating)
+                dValues[key] = [dDomain["codes"][key], rating]
 
+            for rating in addedValues:
+                PrintMsg("\tdValue not found for: " + str(rating), 1)
+                key = gSSURGO_DomainCodes.DomainKey(rating)
+                dValues[key] = [dDomain["codes"][key], rating]
+                domainValuesUp.append(key)
 
+        # A component with more than one rating (COMONTH) gets a single index value: the highest for
+        # the lower tiebreak and the lowest for the higher tiebreak.
         # Mukey '1151113' has two 50% components with different nirrcapclass values: 2 and 3.
-        if not dSDV["attributelogicaldatatype"].lower() in ["vText"]:
-
-            if tieBreaker == dSDV["tiebreaklowlabel"]:
-                # Lower
-
-                if bVerbose:
-                    PrintMsg(" \nAggregating to a single " +  tieBreaker + " value per component", 1)
-
-
-                for cokey, indexes in dComp.items():
-
-                    #if cokey in ['11828955', '11828954', '11828956', '11828957'] and bVerbose:
-                    #    PrintMsg(" \nAll index values for cokey " + cokey + ": " + str(indexes), 1)
-
-                    if len(indexes) > 1:
-                        val = sorted(indexes, reverse=True)[0]
-
-                    else:
-                        val = indexes[0]
-
-                    #if cokey in ['11828955', '11828954', '11828956', '11828957'] and bVerbose:
-                    #    PrintMsg(" \nFinal index value for cokey " + cokey + ": " + str(dCompPct[cokey]) + "% , " + str(val), 1)
-
-                    #PrintMsg("\tval: " + str(indexes), 1)
-                    dComp[cokey] = val
-
-            else:
-                # Higher
-                if bVerbose:
-                    PrintMsg(" \nAggregating to a single " +  tieBreaker + " value per component", 1)
-
-                for cokey, indexes in dComp.items():
-                    #val = sorted(indexes)[0]  # can't handle null value
-                    #if cokey in ['11828955', '11828954', '11828956', '11828957'] and bVerbose:
-                    #    PrintMsg(" \nAll index values for cokey " + cokey + ": " + str(indexes), 1)
-
-
-                    if len(indexes) > 1: # inefficient vay of handling Nulls. Need to improve this.
-                        val = sorted(indexes, reverse=False)[0]
-
-                    else:
-                        val = indexes[0]
-
-                    #if cokey in ['11828955', '11828954', '11828956', '11828957'] and bVerbose:
-                    #    PrintMsg(" \nFinal index value for cokey " + cokey + ": " + str(dCompPct[cokey]) + "% , " + str(val), 1)
-
-                    dComp[cokey] = val
+        #
+        bHigh = (tieBreaker == dSDV["tiebreakhighlabel"])
 
+        if bHigh:
+            compMethod = "min"
 
         else:
-            # VTEXT data which would also include interps
-            #
-            PrintMsg(" \nProblem here", 1)
-            for cokey, indexes in dComp.items():
-                #PrintMsg("\tIndexes = " + str(indexes), 1)
-                dComp[cokey] = indexes
-                #val = sorted(indexes)[0]
-                #dComp[cokey] = val
-
-
-
-        # Save list of component rating data to each mapunit, sort and write out
-        # a single map unit rating
-        #
-        dRatings = dict()
-
-        #if not dSDV["attributelogicaldatatype"].lower() in ["string", "vtext"]:
-        #if not dSDV["attributelogicaldatatype"].lower() in ["vtext"]:
+            compMethod = "max"
 
         if bVerbose:
+            PrintMsg(" \nAggregating to a single " +  tieBreaker + " value per component", 1)
             PrintMsg(" \nWriting map unit rating data to final output table", 1)
             PrintMsg(" \nUsing tiebreaker '" + tieBreaker + "' (where choices are " + dSDV["tiebreaklowlabel"] + " or " + dSDV["tiebreakhighlabel"] + ")", 1)
 
-        if tieBreaker == dSDV["tiebreakhighlabel"]:
-            with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
-
-                for mukey, cokeys in dMapunit.items():
-                    dRating = dict()  # save sum of comppct for each rating within a mapunit
-                    muVals = list()   # may not need this for DCD
-
-                    for cokey in cokeys:
-                        try:
-                            #PrintMsg("\tA ratingIndx: " + str(dComp[cokey]), 1)
-                            compPct = dCompPct[cokey]
-                            ratingIndx = dComp[cokey]
-
-                            if ratingIndx in dRating:
-                                sumPct = dRating[ratingIndx] + compPct
-                                dRating[ratingIndx] = sumPct  # this part could be compacted
-
-                            else:
-                                dRating[ratingIndx] = compPct
-
-                        except:
-                            pass
-
-                    for rating, compPct in dRating.items():
-                        muVals.append([compPct, rating])
-
-
-                    #This is the final aggregation from component to map unit rating
-                    #newVals = sorted(muVals, key = lambda x: (-x[0], x[1]))[0]
-                    #newVals = sorted(sorted(muVals, key = lambda x : x[0], reverse=True), key = lambda x : x[1], reverse=True)[0]
-                    muVal = SortData(muVals)
-
-                    #if mukey == '2496170' and bVerbose:
-                        #testVals = sorted(sorted(muVals, key = lambda x : x[0], reverse=True), key = lambda x : x[1], reverse=True)
-                        #PrintMsg("\tSorted order for component data: " + str(testVals), 1)
-                    #    PrintMsg(" \n" + tieBreaker + ". Checking index values for mukey " + mukey + ": " + str(muVal[0]) + ", " + str(domainValues[muVal[1]]), 1)
-
+        # Sum comppct for each coded rating within a map unit and pick the highest sum. Equal sums are
+        # decided by the position in the domain, depending upon the tiebreak setting.
+        muRatings = gSSURGO_DomainCodes.MapunitRatings(mukeys, cokeys, compPcts, codes, dDomain["rank"][bHigh], compMethod)
+        del mukeys, cokeys, compPcts, ratings, codes
 
-                    newrec = [mukey, muVal[0], domainValues[muVal[1]]]
-                    ocur.insertRow(newrec)
-
-                    if not newrec[2] in outputValues:
-                        outputValues.append(newrec[2])
-
-        else:
-            # tieBreaker Lower
-            with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
-
-                for mukey, cokeys in dMapunit.items():
-                    dRating = dict()  # save sum of comppct for each rating within a mapunit
-                    muVals = list()   # may not need this for DCD
-
-                    for cokey in cokeys:
-                        try:
-                            #PrintMsg("\tA ratingIndx: " + str(dComp[cokey]), 1)
-                            compPct = dCompPct[cokey]
-                            ratingIndx = dComp[cokey]
-
-                            if ratingIndx in dRating:
-                                sumPct = dRating[ratingIndx] + compPct
-                                dRating[ratingIndx] = sumPct  # this part could be compacted
-
-                            else:
-                                dRating[ratingIndx] = compPct
-
-                        except:
-                            pass
-
-                    for rating, compPct in dRating.items():
-                        muVals.append([compPct, rating])
-
-
-                    #newVals = sorted(muVals, key = lambda x : (-x[0], -x[1]))[0] # Works for maplegendkey=2
-                    #Min if x is None else x
-                    #
-                    #newVals = sorted(muVals, key = lambda x: (-x[0], -x[1]))[0]
-                    #newVals = sorted(sorted(muVals, key = lambda x : x[0], reverse=True), key = lambda x : x[1], reverse=False)[0]
-
-                    muVal = SortData(muVals)
+        with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
 
-                    #if mukey == '2496170' and bVerbose:
-                        #testVals = sorted(sorted(muVals, key = lambda x : x[0], reverse=True), key = lambda x : x[1], reverse=False)
-                        #PrintMsg("\tSorted order for component data: " + str(testVals), 1)
-                    #    PrintMsg(" \n" + tieBreaker + ". Checking index values for mukey " + mukey + ": " + str(muVal[0]) + ", " + str(domainValues[muVal[1]]), 1)
+            for mukey, compPct, ratingIndx in muRatings:
+                if ratingIndx is None:
+                    rating = None
 
-                    #PrintMsg(" \n" + tieBreaker + ". Checking index values for mukey " + mukey + ": " + str(muVal[0]) + ", " + str(domainValues[muVal[1]]), 1)
-                    newrec = [mukey, muVal[0], domainValues[muVal[1]]]
-                    ocur.insertRow(newrec)
+                else:
+                    rating = dDomain["values"][ratingIndx]
 
-                    if not newrec[2] in outputValues:
-                        outputValues.append(newrec[2])
+                newrec = [mukey, compPct, rating]
+                ocur.insertRow(newrec)
 
+                if not newrec[2] in outputValues:
+                    outputValues.append(newrec[2])
 
         outputValues.sort()
         return outputTbl, outputValues
@@ -6447,6 +6255,7 @@ def UpdateMetadata(outputWS, target, parameterString):
 # Import system modules
 import arcpy, sys, string, os, traceback, locale, time, operator, json
 import xml.etree.cElementTree as ET
+import gSSURGO_DomainCodes
 
 # Create the environment
 from arcpy import env
@@ -218,27 +218,17 @@ def LayerDensity(theLayer):
 def ClipToAOI(theAOI, outputShp):
     # Clip intersected soils layer using original AOI polygons
     #
+    # The soil polygons are clipped in place. Polygons inside the AOI are left alone and
+    # only the polygons that cross the AOI boundary are intersected.
+    #
     try:
-        #
-        #
-        outputWS = os.path.dirname(outputShp)
-        outputName = os.path.basename(outputShp)
-        clippedFC = os.path.join(outputWS, "ClippedSoils")
-        #
-        if arcpy.Exists(clippedFC):
-            arcpy.Delete_management(clippedFC)
-
         PrintMsg(" \nClipping initial dataset to final AOI", 0)
-        arcpy.Clip_analysis(outputShp, theAOI, clippedFC)
+        polyCnt = SDA_ClipAOI.ClipFeatureclass(theAOI, outputShp)
 
-        if arcpy.Exists(clippedFC):
-            arcpy.Delete_management(outputShp)
-            arcpy.Rename_management(clippedFC, outputShp)
-            return outputShp
-
-        else:
+        if polyCnt < 0:
             raise MyError, "Failed to clip output featureclass"
 
+        return outputShp
 
     except MyError, e:
         # Example: raise MyError, "This is an error message"
@@ -253,27 +243,16 @@ def ClipToAOI(theAOI, outputShp):
 def FinalDissolve(outputShp):
     # Dissolve the final output shapefile on MUKEY
     #
+    # Only the polygons that touch another polygon with the same MUKEY are dissolved.
+    #
     try:
-        #
-        #
-        outputWS = os.path.dirname(outputShp)
-        outputName = os.path.basename(outputShp)
-        dissolvedFC = os.path.join(outputWS, "DissolvedSoils")
-        #
-        if arcpy.Exists(dissolvedFC):
-            arcpy.Delete_management(dissolvedFC)
-
         PrintMsg(" \nDissolving final soil layer", 0)
-        arcpy.Dissolve_management(outputShp, dissolvedFC, ["MUKEY"], "", "SINGLE_PART")
+        polyCnt = SDA_ClipAOI.DissolveFeatureclass(outputShp)
 
-        if arcpy.Exists(dissolvedFC):
-            arcpy.Delete_management(outputShp)
-            arcpy.Rename_management(dissolvedFC, outputShp)
-            return outputShp
-
-        else:
+        if polyCnt < 0:
             raise MyError, "Failed to dissolve output featureclass"
 
+        return outputShp
 
     except MyError, e:
         # Example: raise MyError, "This is an error message"
@@ -1654,52 +1633,36 @@ def RunSpatialQuery(theURL, spatialQuery, outputShp, clipPolygon, showStatus):
             end = len(dataList)
             arcpy.SetProgressor("step", "Importing spatial data", 0, end, step)
 
-        if bProjected:
-            # Project geometry to match input AOI layer
-            #
-            with arcpy.da.InsertCursor(outputShp, outputFields) as cur:
-
-                for rec in dataList:
-                    #PrintMsg("\trec: " + str(rec), 1)
-                    mukey, wktPoly = rec
-                    # immediately create GCS WGS 1984 polygon from WKT
-                    newPolygon = arcpy.FromWKT(wktPoly, inputCS)
+        # Decode all of the WKT polygons as coordinate arrays. If the output coordinate system
+        # is different, the polygons are returned already projected.
+        mukeyList = [rec[0] for rec in dataList]
+        polygonList = SDA_WKTDecode.DecodePolygons([rec[1] for rec in dataList], inputCS, outputCS, tm)
 
-                    # and then project the polygon
-                    outputPolygon = newPolygon.projectAs(outputCS, tm)
+        if len(polygonList) != len(dataList):
+            raise MyError, "Failed to decode " + Number_Format(len(dataList), 0, True) + " soil polygons from WKT"
 
-                    # Clip the generalized SDA polygon by the original AOI polygon.
-                    clippedPolygon = newPolygon.intersect(clipPolygon, 4)
-
-                    # Write geometry and mukey to output featureclass
-                    rec = [clippedPolygon, mukey]
-                    cur.insertRow(rec)
-                    polyCnt += 1
-
-                    if showStatus:
-                        arcpy.SetProgressorPosition()
-
-        else:
-            # No projection necessary. Input and output coordinate systems are the same.
-            #
-            with arcpy.da.InsertCursor(outputShp, outputFields) as cur:
+        if inputCS.name != outputCS.name:
+            # Project the original AOI polygon once so that it matches the decoded soil polygons
+            clipPolygon = clipPolygon.projectAs(outputCS, tm)
 
-                for rec in dataList:
-                    #PrintMsg("\trec: " + str(rec), 1)
-                    mukey, wktPoly = rec
+        # Clip the generalized SDA polygons by the original AOI polygon. Only the polygons
+        # that cross the AOI boundary are intersected.
+        clippedList = SDA_ClipAOI.ClipGeometries(polygonList, clipPolygon)
 
-                    # immediately create polygon from WKT
-                    newPolygon = arcpy.FromWKT(wktPoly, inputCS)
+        if len(clippedList) != len(polygonList):
+            raise MyError, "Failed to clip soil polygons to AOI"
 
-                    # Clip newPolygon by the original AOI polygon
-                    outputPolygon = newPolygon.intersect(clipPolygon, 4)
+        with arcpy.da.InsertCursor(outputShp, outputFields) as cur:
 
-                    rec = [outputPolygon, mukey]
+            for i in range(len(clippedList)):
+                if not clippedList[i] is None:
+                    # Write geometry and mukey to output featureclass
+                    rec = [clippedList[i], mukeyList[i]]
                     cur.insertRow(rec)
                     polyCnt += 1
 
-                    if showStatus:
-                        arcpy.SetProgressorPosition()
+                if showStatus:
+                    arcpy.SetProgressorPosition()
 
         time.sleep(1)
         arcpy.ResetProgressor()
@@ -2322,226 +2285,239 @@ def Number_Format(num, places=0, bCommas=True):
 import sys, string, os, locale, arcpy, traceback, urllib2, httplib, json
 import xml.etree.cElementTree as ET
 from arcpy import env
+import SDA_WKTDecode
+import SDA_ClipAOI
 
-try:
-    # Create geoprocessor object
-    #gp = arcgisscripting.create(9.3)
-
-    # Get input parameters
-    #
-    theAOI = arcpy.GetParameterAsText(0)     # polygon layer (honors selected set) used to define AOI
-    outputShp = arcpy.GetParameterAsText(1)  # output soil polygon featureclass (GDB)
-    ratingField = arcpy.GetParameterAsText(2)    # Attribute Field to be mapped
-    transparency = arcpy.GetParameter(3)     # transparency level for the output soils layer
-    maxAcres = arcpy.GetParameter(4)         # maximum allowed area for the output EXTENT.
-    sdaURL = arcpy.GetParameterAsText(5)   # Soil Data Access URL
-
+if __name__ == "__main__":
+    try:
+        # Create geoprocessor object
+        #gp = arcgisscripting.create(9.3)
 
-    # Commonly used EPSG numbers
-    epsgWM = 3857 # Web Mercatur
-    epsgWGS = 4326 # GCS WGS 1984
-    epsgNAD83 = 4269 # GCS NAD 1983
-    epsgAlbers = 102039 # USA_Contiguous_Albers_Equal_Area_Conic_USGS_version
-    #tm = "WGS_1984_(ITRF00)_To_NAD_1983"  # datum transformation supported by this script
+        # Get input parameters
+        #
+        theAOI = arcpy.GetParameterAsText(0)     # polygon layer (honors selected set) used to define AOI
+        outputShp = arcpy.GetParameterAsText(1)  # output soil polygon featureclass (GDB)
+        ratingField = arcpy.GetParameterAsText(2)    # Attribute Field to be mapped
+        transparency = arcpy.GetParameter(3)     # transparency level for the output soils layer
+        maxAcres = arcpy.GetParameter(4)         # maximum allowed area for the output EXTENT.
+        sdaURL = arcpy.GetParameterAsText(5)   # Soil Data Access URL
 
-    # Compare AOI coordinate system with that returned by Soil Data Access. The queries are
-    # currently all set to return WGS 1984, geographic.
 
-    # Get geographiccoordinate system information for input and output layers
-    validDatums = ["D_WGS_1984", "D_North_American_1983"]
-    aoiCS = arcpy.Describe(theAOI).spatialReference
+        # Commonly used EPSG numbers
+        epsgWM = 3857 # Web Mercatur
+        epsgWGS = 4326 # GCS WGS 1984
+        epsgNAD83 = 4269 # GCS NAD 1983
+        epsgAlbers = 102039 # USA_Contiguous_Albers_Equal_Area_Conic_USGS_version
+        #tm = "WGS_1984_(ITRF00)_To_NAD_1983"  # datum transformation supported by this script
 
-    if not aoiCS.GCS.datumName in validDatums:
-        raise MyError, "AOI coordinate system not supported: " + aoiCS.name + ", " + aoiCS.GCS.datumName
+        # Compare AOI coordinate system with that returned by Soil Data Access. The queries are
+        # currently all set to return WGS 1984, geographic.
 
-    if aoiCS.GCS.datumName == "D_WGS_1984":
-        tm = ""  # no datum transformation required
+        # Get geographiccoordinate system information for input and output layers
+        validDatums = ["D_WGS_1984", "D_North_American_1983"]
+        aoiCS = arcpy.Describe(theAOI).spatialReference
 
-    elif aoiCS.GCS.datumName == "D_North_American_1983":
-        tm = "WGS_1984_(ITRF00)_To_NAD_1983"
+        if not aoiCS.GCS.datumName in validDatums:
+            raise MyError, "AOI coordinate system not supported: " + aoiCS.name + ", " + aoiCS.GCS.datumName
 
-    else:
-        raise MyError, "AOI CS datum name: " + aoiCS.GCS.datumName
+        if aoiCS.GCS.datumName == "D_WGS_1984":
+            tm = ""  # no datum transformation required
 
-    sdaCS = arcpy.SpatialReference(epsgWGS)
+        elif aoiCS.GCS.datumName == "D_North_American_1983":
+            tm = "WGS_1984_(ITRF00)_To_NAD_1983"
 
-    # Determine whether
-    if aoiCS.PCSName != "":
-        # AOI layer has a projected coordinate system, so geometry will always have to be projected
-        bProjected = True
+        else:
+            raise MyError, "AOI CS datum name: " + aoiCS.GCS.datumName
 
-    elif aoiCS.GCS.name != sdaCS.GCS.name:
-        # AOI must be NAD 1983
-        bProjected = True
+        sdaCS = arcpy.SpatialReference(epsgWGS)
 
-    else:
-        bProjected = False
+        # Determine whether
+        if aoiCS.PCSName != "":
+            # AOI layer has a projected coordinate system, so geometry will always have to be projected
+            bProjected = True
 
-    env.overWriteOutput = True
-    env.addOutputsToMap = False
-    mxd = arcpy.mapping.MapDocument("CURRENT")
-    df = mxd.activeDataFrame
+        elif aoiCS.GCS.name != sdaCS.GCS.name:
+            # AOI must be NAD 1983
+            bProjected = True
 
-    # Create arcpy.mapping layer object for original AOI
-    # and save selected set
-    aoiLayer = arcpy.mapping.ListLayers(mxd, theAOI, df)[0]
-    aoiSelection = aoiLayer.getSelectionSet()
+        else:
+            bProjected = False
 
-    # Get OID field for input layer
-    #desc = arcpy.Describe(theAOI)
-    #oidField = desc.OIDFieldName
+        env.overWriteOutput = True
+        env.addOutputsToMap = False
+        mxd = arcpy.mapping.MapDocument("CURRENT")
+        df = mxd.activeDataFrame
 
-    PrintMsg( " \nAnalyzing input AOI...", 0)
-    aoiArea, aoiAcres, aoiCnt, aoiVert, density = LayerDensity(aoiLayer)
+        # Create arcpy.mapping layer object for original AOI
+        # and save selected set
+        aoiLayer = arcpy.mapping.ListLayers(mxd, theAOI, df)[0]
+        aoiSelection = aoiLayer.getSelectionSet()
 
-    if aoiAcres > maxAcres:
-        raise MyError, "Selected area exceeds set limit for number of acres in the AOI"
+        # Get OID field for input layer
+        #desc = arcpy.Describe(theAOI)
+        #oidField = desc.OIDFieldName
 
-    maxPolys = 1500
+        PrintMsg( " \nAnalyzing input AOI...", 0)
+        aoiArea, aoiAcres, aoiCnt, aoiVert, density = LayerDensity(aoiLayer)
 
-    if aoiCnt > maxPolys:
-        raise MyError, "Selected number of polygons exceeds limit of " + Number_Format(maxPolys, 0, True) + " polygons"
+        if aoiAcres > maxAcres:
+            raise MyError, "Selected area exceeds set limit for number of acres in the AOI"
 
-    if os.path.dirname(outputShp) == "":
-        # convert this to a featureclass in the scratch geodatabase
-        outputShp = os.path.join(env.scratchGDB, outputShp)
+        maxPolys = 1500
 
-    else:
-        ws = os.path.dirname(outputShp)
-        desc = arcpy.Describe(ws)
+        if aoiCnt > maxPolys:
+            raise MyError, "Selected number of polygons exceeds limit of " + Number_Format(maxPolys, 0, True) + " polygons"
 
-        if desc.workspaceType.upper() != "LOCALDATABASE":
-            # Switch the output location to a file geodatabase so that null values aren't a problem
-            outputShp = os.path.join(env.scratchGDB, os.path.basename(outputShp))
+        if os.path.dirname(outputShp) == "":
+            # convert this to a featureclass in the scratch geodatabase
+            outputShp = os.path.join(env.scratchGDB, outputShp)
 
         else:
-            # This should be correct. A geodatabase featureclass.
-            pass
+            ws = os.path.dirname(outputShp)
+            desc = arcpy.Describe(ws)
 
-    # Create empty output featureclass
-    outputShp = CreateOutputFC(outputShp, theAOI)
+            if desc.workspaceType.upper() != "LOCALDATABASE":
+                # Switch the output location to a file geodatabase so that null values aren't a problem
+                outputShp = os.path.join(env.scratchGDB, os.path.basename(outputShp))
 
-    # Start timer
-    begin = time.time()
+            else:
+                # This should be correct. A geodatabase featureclass.
+                pass
 
-    inCnt = int(arcpy.GetCount_management(theAOI).getOutput(0))
-    oidList = list()
+        # Create empty output featureclass
+        outputShp = CreateOutputFC(outputShp, theAOI)
 
-    hullCnt = 0  # Initialize value that indicates that a single convex hull AOI was NOT sent to SDA
+        # Start timer
+        begin = time.time()
 
-    # Begin performance logic
-    #
-    if aoiCnt == 1:
-        # Single polygon, use original AOI to generate spatial request
-        PrintMsg(" \nUsing original AOI polygons", 1)
-        #PrintMsg(" \nOriginal AOI estimated to be " + Number_Format(aoiAcres, 0, True) + " acres in " + Number_Format(inCnt, 0, True) + " polygons", 0)
-        idList = oidList
-        newAOI = theAOI
+        inCnt = int(arcpy.GetCount_management(theAOI).getOutput(0))
         oidList = list()
 
-        with arcpy.da.SearchCursor(newAOI, ["OID@"]) as cur:
-            for rec in cur:
-                oidList.append(rec[0])
-                #PrintMsg("\t" + os.path.basename(newAOI) + ": " + Number_Format(rec[0], 0, False), 1)
+        hullCnt = 0  # Initialize value that indicates that a single convex hull AOI was NOT sent to SDA
 
-    else:
-        # Muliple polygons present in AOI layer
+        # Begin performance logic
         #
-        # Start by dissolving AOI and getting a new polygon count
-        # Go ahead and create dissolved layer for use in clipping
-        dissAOI, inCnt = SimplifyAOI_Diss(theAOI, inCnt)
-        PrintMsg(" \nCreated dissolved layer with " + Number_Format(inCnt, 0, True) + " polygons", 1)
+        if aoiCnt == 1:
+            # Single polygon, use original AOI to generate spatial request
+            PrintMsg(" \nUsing original AOI polygons", 1)
+            #PrintMsg(" \nOriginal AOI estimated to be " + Number_Format(aoiAcres, 0, True) + " acres in " + Number_Format(inCnt, 0, True) + " polygons", 0)
+            idList = oidList
+            newAOI = theAOI
+            oidList = list()
+
+            with arcpy.da.SearchCursor(newAOI, ["OID@"]) as cur:
+                for rec in cur:
+                    oidList.append(rec[0])
+                    #PrintMsg("\t" + os.path.basename(newAOI) + ": " + Number_Format(rec[0], 0, False), 1)
 
-        if aoiAcres > maxAcres or density > 1000:   # trying to get bent pipeline to process as multiple AOIs
-            # A single convex hull AOI would be too big, try using individual dissolved polygons
+        else:
+            # Muliple polygons present in AOI layer
+            #
+            # Start by dissolving AOI and getting a new polygon count
+            # Go ahead and create dissolved layer for use in clipping
+            dissAOI, inCnt = SimplifyAOI_Diss(theAOI, inCnt)
+            PrintMsg(" \nCreated dissolved layer with " + Number_Format(inCnt, 0, True) + " polygons", 1)
 
-            if inCnt == 1 or density > 1000:
-                if density > 1000:
-                    # Dissolved AOI would be too big or too widespread. Use the original AOI
-                    PrintMsg(" \nSingle dissolved AOI would be too large, switching back to original AOI", 1)
-                    newAOI = aoiLayer
-                    iCnt = 0
+            if aoiAcres > maxAcres or density > 1000:   # trying to get bent pipeline to process as multiple AOIs
+                # A single convex hull AOI would be too big, try using individual dissolved polygons
 
-                    with arcpy.da.SearchCursor(newAOI, ["OID@"]) as cur:
-                        for rec in cur:
-                            oidList.append(rec[0])
-                            iCnt += 1
-                            #PrintMsg("\t" + newAOI.name + ": " + Number_Format(rec[0], 0, False), 1)
+                if inCnt == 1 or density > 1000:
+                    if density > 1000:
+                        # Dissolved AOI would be too big or too widespread. Use the original AOI
+                        PrintMsg(" \nSingle dissolved AOI would be too large, switching back to original AOI", 1)
+                        newAOI = aoiLayer
+                        iCnt = 0
 
-                else:
-                    # Dissolved AOI might work
-                    PrintMsg(" \nUsing dissolved AOI", 1)
-                    newAOI = dissAOI
+                        with arcpy.da.SearchCursor(newAOI, ["OID@"]) as cur:
+                            for rec in cur:
+                                oidList.append(rec[0])
+                                iCnt += 1
+                                #PrintMsg("\t" + newAOI.name + ": " + Number_Format(rec[0], 0, False), 1)
 
-                    with arcpy.da.SearchCursor(newAOI, ["OID@"]) as cur:
-                        for rec in cur:
-                            oidList.append(rec[0])
-                            #PrintMsg("\t" + newAOI.name + ": " + Number_Format(rec[0], 0, False), 1)
+                    else:
+                        # Dissolved AOI might work
+                        PrintMsg(" \nUsing dissolved AOI", 1)
+                        newAOI = dissAOI
 
+                        with arcpy.da.SearchCursor(newAOI, ["OID@"]) as cur:
+                            for rec in cur:
+                                oidList.append(rec[0])
+                                #PrintMsg("\t" + newAOI.name + ": " + Number_Format(rec[0], 0, False), 1)
 
 
-            elif inCnt > 1:
-                if ((aoiAcres / inCnt) < maxAcres):
-                    # Use the multiple, dissolved polygons to generate spatial request
-                    newAOI = dissAOI
 
-                    with arcpy.da.SearchCursor(newAOI, ["OID@"]) as cur:
-                        for rec in cur:
-                            oidList.append(rec[0])
-                            #PrintMsg("\tdissAOI: " + Number_Format(rec[0], 0, False), 1)
+                elif inCnt > 1:
+                    if ((aoiAcres / inCnt) < maxAcres):
+                        # Use the multiple, dissolved polygons to generate spatial request
+                        newAOI = dissAOI
 
-                else:
-                    # Individual AOI polygons may still exceed the limit
-                    # Use the original AOI polygons
-                    newAOI = aoiLayer
+                        with arcpy.da.SearchCursor(newAOI, ["OID@"]) as cur:
+                            for rec in cur:
+                                oidList.append(rec[0])
+                                #PrintMsg("\tdissAOI: " + Number_Format(rec[0], 0, False), 1)
 
-                    with arcpy.da.SearchCursor(newAOI, ["OID@"]) as cur:
-                        for rec in cur:
-                            oidList.append(rec[0])
-                            #PrintMsg("\t" + newAOI.name + ": " + Number_Format(rec[0], 0, False), 1)
+                    else:
+                        # Individual AOI polygons may still exceed the limit
+                        # Use the original AOI polygons
+                        newAOI = aoiLayer
 
+                        with arcpy.da.SearchCursor(newAOI, ["OID@"]) as cur:
+                            for rec in cur:
+                                oidList.append(rec[0])
+                                #PrintMsg("\t" + newAOI.name + ": " + Number_Format(rec[0], 0, False), 1)
 
 
-        else:
-            # Multiple polygons and aoi acres is less than maximum.
-            # Try sending a single convex hull spatial request
 
-            if inCnt > 1:
+            else:
+                # Multiple polygons and aoi acres is less than maximum.
+                # Try sending a single convex hull spatial request
 
+                if inCnt > 1:
 
-                #if aoiAcres < maxAcres:
-                if density < 15:
-                    # Trying to come up with a factor that accounts for lower density and higher polygon count that
-                    # would favor the single convex hull AOI.
 
-                    # If the polygons are close together and not too huge, try a single convex hull
-                    # If the convex hull is too large, the original dissolved featurelayer will be used instead
+                    #if aoiAcres < maxAcres:
+                    if density < 15:
+                        # Trying to come up with a factor that accounts for lower density and higher polygon count that
+                        # would favor the single convex hull AOI.
 
-                    hullAOI, hullCnt = SimplifyAOI_Hull(dissAOI, inCnt)  # hullCnt should always be 1 or 0
-                    if hullCnt == 1:
-                        # Use single hullAOI polygon for spatial query
-                        inCnt = 1
-                        newAOI = hullAOI
-                        PrintMsg(" \nShould be using convex hull polygon", 1)
+                        # If the polygons are close together and not too huge, try a single convex hull
+                        # If the convex hull is too large, the original dissolved featurelayer will be used instead
 
-                        with arcpy.da.SearchCursor(newAOI, ["OID@"]) as cur:
-                            for rec in cur:
-                                oidList.append(rec[0])
-                                #PrintMsg("\t" + newAOI.name + ": " + Number_Format(rec[0], 0, False), 1)
+                        hullAOI, hullCnt = SimplifyAOI_Hull(dissAOI, inCnt)  # hullCnt should always be 1 or 0
+                        if hullCnt == 1:
+                            # Use single hullAOI polygon for spatial query
+                            inCnt = 1
+                            newAOI = hullAOI
+                            PrintMsg(" \nShould be using convex hull polygon", 1)
+
+                            with arcpy.da.SearchCursor(newAOI, ["OID@"]) as cur:
+                                for rec in cur:
+                                    oidList.append(rec[0])
+                                    #PrintMsg("\t" + newAOI.name + ": " + Number_Format(rec[0], 0, False), 1)
+
+                        else:
+                            # Using dissolved AOI instead of convex hull
+                            newAOI = dissAOI
+                            # I see that my Progress counter is not working correctly for this method
+
+                            with arcpy.da.SearchCursor(newAOI, ["OID@"]) as cur:
+                                for rec in cur:
+                                    oidList.append(rec[0])
+                                    #PrintMsg("\tdissAOI: " + Number_Format(rec[0], 0, False), 1)
 
                     else:
-                        # Using dissolved AOI instead of convex hull
+                        # polygons are widely spread, send dissolved featureclass one polygon at a time
+                        PrintMsg(" \nUsing dissolved AOI layer with multiple, widely distributed polygons", 1)
                         newAOI = dissAOI
-                        # I see that my Progress counter is not working correctly for this method
 
                         with arcpy.da.SearchCursor(newAOI, ["OID@"]) as cur:
                             for rec in cur:
                                 oidList.append(rec[0])
-                                #PrintMsg("\tdissAOI: " + Number_Format(rec[0], 0, False), 1)
+                                #PrintMsg("\t" + newAOI.name + ": " + Number_Format(rec[0], 0, False), 1)
 
                 else:
-                    # polygons are widely spread, send dissolved featureclass one polygon at a time
-                    PrintMsg(" \nUsing dissolved AOI layer with multiple, widely distributed polygons", 1)
+                    # Send dissolved featureclass with a single polygon
+                    PrintMsg(" \nUsing dissolved layer having a single polygon", 1)
                     newAOI = dissAOI
 
                     with arcpy.da.SearchCursor(newAOI, ["OID@"]) as cur:
@@ -2549,205 +2525,195 @@ try:
                             oidList.append(rec[0])
                             #PrintMsg("\t" + newAOI.name + ": " + Number_Format(rec[0], 0, False), 1)
 
-            else:
-                # Send dissolved featureclass with a single polygon
-                PrintMsg(" \nUsing dissolved layer having a single polygon", 1)
-                newAOI = dissAOI
+        totalAOIAcres, simpleAcres, simpleVert = GetLayerAcres(newAOI)
 
-                with arcpy.da.SearchCursor(newAOI, ["OID@"]) as cur:
-                    for rec in cur:
-                        oidList.append(rec[0])
-                        #PrintMsg("\t" + newAOI.name + ": " + Number_Format(rec[0], 0, False), 1)
+        PrintMsg(" \nRetrieving spatial data for " + Number_Format(len(oidList), 0, True) + " AOI polygon(s) with a total estimated area of " + Number_Format(totalAOIAcres, 0, True) + " acres", 0)
 
-    totalAOIAcres, simpleAcres, simpleVert = GetLayerAcres(newAOI)
+        idFieldName = arcpy.Describe(newAOI).oidFieldName
 
-    PrintMsg(" \nRetrieving spatial data for " + Number_Format(len(oidList), 0, True) + " AOI polygon(s) with a total estimated area of " + Number_Format(totalAOIAcres, 0, True) + " acres", 0)
+        if len(oidList) == 1 and totalAOIAcres > 5000:
+            # Use single progressor with per polygon count
+            #
+            for id in oidList:
+                # Process the single polygon in the AOI and display import progress
+                wc = idFieldName + " = " + str(id)
+                arcpy.SelectLayerByAttribute_management(newAOI, "NEW_SELECTION", wc)
 
-    idFieldName = arcpy.Describe(newAOI).oidFieldName
+                # Get information about the AOI
+                polyAcres, xCnt, xVert = GetLayerAcres(newAOI) # for a single AOI polygon
+                #PrintMsg(" \n\tSending request for AOI polygon number " + Number_Format(id, 0, False) + " (~" + Number_Format(polyAcres, 0, True) + " acres)", 0)
 
-    if len(oidList) == 1 and totalAOIAcres > 5000:
-        # Use single progressor with per polygon count
-        #
-        for id in oidList:
-            # Process the single polygon in the AOI and display import progress
-            wc = idFieldName + " = " + str(id)
-            arcpy.SelectLayerByAttribute_management(newAOI, "NEW_SELECTION", wc)
+                if polyAcres == 0:
+                    raise MyError, "Selected extent is too small"
 
-            # Get information about the AOI
-            polyAcres, xCnt, xVert = GetLayerAcres(newAOI) # for a single AOI polygon
-            #PrintMsg(" \n\tSending request for AOI polygon number " + Number_Format(id, 0, False) + " (~" + Number_Format(polyAcres, 0, True) + " acres)", 0)
+                if polyAcres <= maxAcres:
+                    # If selected AOI and overall extent is less than maxAcres, send request to SDA
 
-            if polyAcres == 0:
-                raise MyError, "Selected extent is too small"
+                    # Create spatial query string using simplified polygon coordinates
+                    spatialQuery, clipPolygon = FormSpatialQuery(newAOI)
 
-            if polyAcres <= maxAcres:
-                # If selected AOI and overall extent is less than maxAcres, send request to SDA
+                    if spatialQuery != "":
+                        # Send spatial query and use results to populate outputShp featureclass
+                        outCnt = RunSpatialQuery(sdaURL, spatialQuery, outputShp, clipPolygon, True)
 
-                # Create spatial query string using simplified polygon coordinates
-                spatialQuery, clipPolygon = FormSpatialQuery(newAOI)
+                        if outCnt == 0:
+                            raise MyError, ""
 
-                if spatialQuery != "":
-                    # Send spatial query and use results to populate outputShp featureclass
-                    outCnt = RunSpatialQuery(sdaURL, spatialQuery, outputShp, clipPolygon, True)
+                else:
+                    if polyAcres >= maxAcres:
+                        raise MyError, "Overall extent of AOI polygon exceeds " + Number_Format(maxAcres, 0, True) + " acre limit \n "
 
-                    if outCnt == 0:
-                        raise MyError, ""
+                    else:
+                        raise MyError, "Selected AOI polygon exceeds " + Number_Format(maxAcres, 0, True) + " acre limit \n "
 
-            else:
-                if polyAcres >= maxAcres:
-                    raise MyError, "Overall extent of AOI polygon exceeds " + Number_Format(maxAcres, 0, True) + " acre limit \n "
 
-                else:
-                    raise MyError, "Selected AOI polygon exceeds " + Number_Format(maxAcres, 0, True) + " acre limit \n "
+        else:
+            # Processing small areas or multiple AOIs
+            #
+            arcpy.SetProgressor("step", "Importing spatial data for multiple AOIs", 0, len(oidList), 1)
 
+            for id in oidList:
+                # Begin polygon loop can be used to handle multiple polygon AOIs. Progress will be per AOI.
+                wc = idFieldName + " = " + str(id)
+                arcpy.SelectLayerByAttribute_management(newAOI, "NEW_SELECTION", wc)
 
-    else:
-        # Processing small areas or multiple AOIs
-        #
-        arcpy.SetProgressor("step", "Importing spatial data for multiple AOIs", 0, len(oidList), 1)
+                # Get information about the AOI
+                polyAcres, xCnt, xVert = GetLayerAcres(newAOI) # for a single AOI polygon
+                #PrintMsg(" \n\tSending request for AOI polygon number " + Number_Format(id, 0, False) + " (~" + Number_Format(polyAcres, 0, True) + " acres)", 0)
 
-        for id in oidList:
-            # Begin polygon loop can be used to handle multiple polygon AOIs. Progress will be per AOI.
-            wc = idFieldName + " = " + str(id)
-            arcpy.SelectLayerByAttribute_management(newAOI, "NEW_SELECTION", wc)
+                if polyAcres == 0:
+                    raise MyError, "Selected extent is too small"
 
-            # Get information about the AOI
-            polyAcres, xCnt, xVert = GetLayerAcres(newAOI) # for a single AOI polygon
-            #PrintMsg(" \n\tSending request for AOI polygon number " + Number_Format(id, 0, False) + " (~" + Number_Format(polyAcres, 0, True) + " acres)", 0)
+                if polyAcres <= maxAcres:
+                    # If selected AOI and overall extent is less than maxAcres, send request to SDA
 
-            if polyAcres == 0:
-                raise MyError, "Selected extent is too small"
+                    # Create spatial query string using simplified polygon coordinates
+                    #
+                    #
+                    spatialQuery, clipPolygon = FormSpatialQuery(newAOI)
+                    #
+                    #
+                    #
 
-            if polyAcres <= maxAcres:
-                # If selected AOI and overall extent is less than maxAcres, send request to SDA
+                    if spatialQuery != "":
+                        # Send spatial query and use results to populate outputShp featureclass
+                        outCnt = RunSpatialQuery(sdaURL, spatialQuery, outputShp, clipPolygon, False)
 
-                # Create spatial query string using simplified polygon coordinates
-                #
-                #
-                spatialQuery, clipPolygon = FormSpatialQuery(newAOI)
-                #
-                #
-                #
+                        if outCnt == 0:
+                            raise MyError, ""
 
-                if spatialQuery != "":
-                    # Send spatial query and use results to populate outputShp featureclass
-                    outCnt = RunSpatialQuery(sdaURL, spatialQuery, outputShp, clipPolygon, False)
+                        else:
+                            arcpy.SetProgressorPosition()
 
-                    if outCnt == 0:
-                        raise MyError, ""
+                else:
+                    if polyAcres >= maxAcres:
+                        raise MyError, "Overall extent of AOI polygon exceeds " + Number_Format(maxAcres, 0, True) + " acre limit \n "
 
                     else:
-                        arcpy.SetProgressorPosition()
+                        raise MyError, "Selected AOI polygon exceeds " + Number_Format(maxAcres, 0, True) + " acre limit \n "
 
-            else:
-                if polyAcres >= maxAcres:
-                    raise MyError, "Overall extent of AOI polygon exceeds " + Number_Format(maxAcres, 0, True) + " acre limit \n "
 
-                else:
-                    raise MyError, "Selected AOI polygon exceeds " + Number_Format(maxAcres, 0, True) + " acre limit \n "
 
+        if hullCnt == 1:
+            # Need to clip the output featureclass
+            outputShp = ClipToAOI(dissAOI, outputShp)
+        #
+        # End of spatial requests
+        #
 
+        # Restore the original selected in the AOI layer
+        if not aoiSelection is None:
+            aoiLayer.setSelectionSet("NEW", aoiSelection)
 
-    if hullCnt == 1:
-        # Need to clip the output featureclass
-        outputShp = ClipToAOI(dissAOI, outputShp)
-    #
-    # End of spatial requests
-    #
-
-    # Restore the original selected in the AOI layer
-    if not aoiSelection is None:
-        aoiLayer.setSelectionSet("NEW", aoiSelection)
+        # Finished processing individual AOI polygons.
+        # Dissolve any AOI boundaries and get a new polygon count.
+        if aoiCnt > 1 and hullCnt <> 1:
+            # If more than one AOI polygon, assume that the output soils need to be dissolved to remove
+            # any clipping boundaries.
+            #
+            outputShp = FinalDissolve(outputShp)
+            outCnt = int(arcpy.GetCount_management(outputShp).getOutput(0))
+            PrintMsg(" \nOutput soils layer has " + Number_Format(outCnt, 0, True) + " polygons", 0)
 
-    # Finished processing individual AOI polygons.
-    # Dissolve any AOI boundaries and get a new polygon count.
-    if aoiCnt > 1 and hullCnt <> 1:
-        # If more than one AOI polygon, assume that the output soils need to be dissolved to remove
-        # any clipping boundaries.
-        #
-        outputShp = FinalDissolve(outputShp)
         outCnt = int(arcpy.GetCount_management(outputShp).getOutput(0))
-        PrintMsg(" \nOutput soils layer has " + Number_Format(outCnt, 0, True) + " polygons", 0)
 
-    outCnt = int(arcpy.GetCount_management(outputShp).getOutput(0))
+        if outCnt == 0:
+            raise MyError, "No output found in " + outputShp
 
-    if outCnt == 0:
-        raise MyError, "No output found in " + outputShp
+        if outCnt > 0:
+            # Got spatial data...
+            # Get list of mukeys for use in tabular request
+            mukeyList = GetMukeys(outputShp)
 
-    if outCnt > 0:
-        # Got spatial data...
-        # Get list of mukeys for use in tabular request
-        mukeyList = GetMukeys(outputShp)
+            # Add necessary attribute fields to featureclass
+            #if not AddNewFields(outputShp):
+            #    raise MyError, "Problems adding new fields to " + output.Shp
 
-        # Add necessary attribute fields to featureclass
-        #if not AddNewFields(outputShp):
-        #    raise MyError, "Problems adding new fields to " + output.Shp
+            # Get attribute data (AWS) from SDA Tabular service
+            prec = 2
+            units = "cm"
 
-        # Get attribute data (AWS) from SDA Tabular service
-        prec = 2
-        units = "cm"
 
+            #if AddAttributeFields(outputShp) == "":
+            #    raise MyError, ""
 
-        #if AddAttributeFields(outputShp) == "":
-        #    raise MyError, ""
 
+            ratingValues = AttributeRequest(sdaURL, mukeyList, outputShp, ratingField)
 
-        ratingValues = AttributeRequest(sdaURL, mukeyList, outputShp, ratingField)
 
-
-        if len(ratingValues) == 0:
-            raise MyError, ""
+            if len(ratingValues) == 0:
+                raise MyError, ""
 
 
-        # Create spatial index for output featureclass
-        arcpy.AddSpatialIndex_management (outputShp)
+            # Create spatial index for output featureclass
+            arcpy.AddSpatialIndex_management (outputShp)
 
-        # Add new map layer to ArcMap TOC
-        aoiLayer.visible = False
-        outputAcres = AddLayerToMap(outputShp, ratingField)
+            # Add new map layer to ArcMap TOC
+            aoiLayer.visible = False
+            outputAcres = AddLayerToMap(outputShp, ratingField)
 
-        if outputAcres > 0:
-            # Compare AOI and output mapunit acres. If output acres is less,
-            # assume that part of the AOI does not have SSURGO data. Warn user.
-            #PrintMsg(" \nOutput acres: " + Number_Format(outputAcres, 0, True), 1)
-            diffAcres = aoiAcres - outputAcres
+            if outputAcres > 0:
+                # Compare AOI and output mapunit acres. If output acres is less,
+                # assume that part of the AOI does not have SSURGO data. Warn user.
+                #PrintMsg(" \nOutput acres: " + Number_Format(outputAcres, 0, True), 1)
+                diffAcres = aoiAcres - outputAcres
 
-            if diffAcres > 1.0:
-                PrintMsg(" \nWarning. Output soils layer has " + Number_Format(diffAcres, 1, True) + " fewer acres than the AOI", 1 )
+                if diffAcres > 1.0:
+                    PrintMsg(" \nWarning. Output soils layer has " + Number_Format(diffAcres, 1, True) + " fewer acres than the AOI", 1 )
 
-            elif diffAcres < -1.0:
-                PrintMsg(" \nWarning! Output soils layer has " + Number_Format(abs(diffAcres), 1, True) + " more acres than the AOI", 1 )
-                PrintMsg(" \nOverlapping soil polygons, need to move clip inside loop using newAOI layer", 1)
+                elif diffAcres < -1.0:
+                    PrintMsg(" \nWarning! Output soils layer has " + Number_Format(abs(diffAcres), 1, True) + " more acres than the AOI", 1 )
+                    PrintMsg(" \nOverlapping soil polygons, need to move clip inside loop using newAOI layer", 1)
 
-    else:
-        raise MyError, "Failed to create output"
+        else:
+            raise MyError, "Failed to create output"
 
-    # Return the AOI layer selection set back to original and turn the layer off
-    #
-    #aoiLayer.visible = False
-    arcpy.RefreshTOC()
-    arcpy.RefreshActiveView()
+        # Return the AOI layer selection set back to original and turn the layer off
+        #
+        #aoiLayer.visible = False
+        arcpy.RefreshTOC()
+        arcpy.RefreshActiveView()
 
-    if not aoiSelection is None:
-        aoiLayer.setSelectionSet("NEW", aoiSelection)
+        if not aoiSelection is None:
+            aoiLayer.setSelectionSet("NEW", aoiSelection)
 
-    else:
-        arcpy.SelectLayerByAttribute_management(aoiLayer, "CLEAR_SELECTION")
+        else:
+            arcpy.SelectLayerByAttribute_management(aoiLayer, "CLEAR_SELECTION")
 
-    if len(mukeyList) > 0:
-        #PrintMsg(" \nOutput GML file: " + theGMLFile, 0)
+        if len(mukeyList) > 0:
+            #PrintMsg(" \nOutput GML file: " + theGMLFile, 0)
 
-        eMsg = elapsedTime(begin)
+            eMsg = elapsedTime(begin)
 
-        PrintMsg(" \nElapsed time for SDA request: " + eMsg + " \n ", 0)
+            PrintMsg(" \nElapsed time for SDA request: " + eMsg + " \n ", 0)
 
-    else:
-        PrintMsg("Failed to get spatial data from SDA", 2)
+        else:
+            PrintMsg("Failed to get spatial data from SDA", 2)
 
 
-except MyError, e:
-    # Example: raise MyError, "This is an error message"
-    PrintMsg(str(e), 2)
+    except MyError, e:
+        # Example: raise MyError, "This is an error message"
+        PrintMsg(str(e), 2)
 
-except:
-    errorMsg()
+    except:
+        errorMsg()
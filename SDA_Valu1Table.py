@@ -773,127 +773,16 @@ def CalcRZDepth(db, theCompTable, maxD, dPct, dCR):
         # Save these new restriction values to dComp dictionary
         #
         # Only process major-earthy components...
-        #whereClause = "component.compkind <> 'Miscellaneous area' and component.compkind is not Null and component.majcompflag = 'Yes'"
-        whereClause = "compkind <> 'Miscellaneous area' and compkind is not Null and majcompflag = 'Yes'"
-
-        sqlClause = (None, "ORDER BY mukey, comppct_r DESC, cokey, hzdept_r ASC")
-        curFlds = ["mukey", "cokey", "compname", "compkind", "localphase", "comppct_r", "taxorder", "taxsubgrp", "hzname", "desgnmaster", "hzdept_r", "hzdepb_r", "sandtotal_r", "silttotal_r", "claytotal_r", "om_r", "dbthirdbar_r", "ph1to1h2o_r", "ec_r", "awc_r", "texture", "lieutex"]
-        resList = ['Lithic bedrock','Paralithic bedrock','Densic bedrock', 'Fragipan', 'Duripan', 'Sulfuric']
-
-        lastCokey = "xxxx"
-        lastMukey = 'xxxx'
-
-        # Display status of processing input table containing horizon data and component restrictions
-
-        with arcpy.da.SearchCursor(hzTable, curFlds, where_clause=whereClause, sql_clause=sqlClause) as cur:
-            # Reading horizon-level data
-            for rec in cur:
-
-                # ********************************************************
-                #
-                # Read QueryTable_HZ record
-                mukey, cokey, compName, compKind, localPhase, compPct, taxorder, taxsubgrp, hzname, desgnmaster, hzDept, hzDepb, sand, silt, clay, om, bd, pH, ec, awc, texture, lieutex = rec
-
-                # Initialize component restriction depth to maxD
-                dComp2[cokey] = [mukey, compName, localPhase, compPct, maxD, ""]
-
-                if lastCokey != cokey:
-                    # Accumulate a list of components for future use
-                    lastCokey = cokey
-                    coList.append(cokey)
-
-                if hzDept < maxD:
-                    # ********************************************************
-                    # For horizons above the floor level (maxD), look for other restrictive
-                    # layers based on horizon properties such as pH, EC and bulk density.
-                    # Start with the top horizons and work down.
-
-                    # initialize list of restrictions
-                    resKind = ""
-                    restriction = list()
-
-                    bOrganic = CheckTexture(mukey, cokey, desgnmaster, om, texture, lieutex, taxorder, taxsubgrp)
-
-                    if not bOrganic:
-                        # calculate alternate dense layer per Dobos
-                        bDense = CheckBulkDensity(sand, silt, clay, bd, mukey, cokey)
-
-                        if bDense:
-                            # use horizon top depth for the dense layer
-                            restriction.append("Dense")
-                            resDept = hzDept
-
-                        # Not sure whether these horizon property checks should be skipped for Organic
-                        # Bob said to only skip Dense Layer check, but VALU table RZAWS looks like all
-                        # horizon properties were skipped.
-                        #
-                        # If we decide to skip EC and pH horizon checks for histosols/histic, use this query
-                        # Example Pongo muck in North Carolina that have low pH but no other restriction
-                        #
-                        if str(taxorder) != 'Histosols' and str(taxsubgrp).lower().find('histic') == -1:
-                            # Only non histosols/histic soils will be checked for pH or EC restrictive horizons
-                            if pH <= 3.5 and pH is not None:
-                                restriction.append("pH")
-                                resDept = hzDept
-                                #if mukey == tmukey:
-                                #    PrintMsg("\tpH restriction at " + str(resDept) + "cm", 1)
-
-                        if ec >= 16.0 and ec is not None:
-                            # Originally I understood that EC > 12 is a restriction, but Bob says he is
-                            # now using 16.
-                            restriction.append("EC")
-                            resDept = hzDept
-                            #if mukey == tmukey:
-                            #    PrintMsg("\tEC restriction at " + str(resDept) + "cm", 1)
-
-                        #if bd >= 1.8:
-                        #    restriction.append("BD")
-                        #    resDept = hzDept
-
-                        #if awc is None:
-                        #    restriction.append("AWC")
-                        #    resDept = hzDept
-
-                    # ********************************************************
-                    #
-                    # Finally, check for one of the standard component restrictions
-                    #
-                    if cokey in dCR:
-                        resDepth2, resKind = dCR[cokey]
-
-                        if hzDept <= resDepth2 < hzDepb:
-                            # This restriction may not be at the top of the horizon, thus we
-                            # need to override this if one of the other restrictions exists for this
-                            # horizon
-
-                            if len(restriction) == 0:
-                                # If this is the only restriction, set the restriction depth
-                                # to the value from the corestriction table.
-                                resDept = resDepth2
-
-                            # Adding this restriction name to the list even if there are others
-                            # May want to take this out later
-                            restriction.append(resKind)
-
-                    # ********************************************************
-                    #
-                    if len(restriction) > 0:
-                        # Found at least one restriction for this horizon
-
-                        if not cokey in dComp:
-                            # if there are no higher restrictions for this component, save this one
-                            # to the dComp dictionary as the upper-most restriction
-                            #
-                            dComp[cokey] = [mukey, compName, localPhase, compPct, resDept, restriction]
-
-        # Load restrictions from dComp into dComp2 so that there is complete information for all components
+        #
+        # The horizon checks (CheckTexture, CheckBulkDensity, pH, EC and the component restrictions) are
+        # done on arrays for every horizon at once (gSSURGO_ValuArrays.RootZoneDepth). The top-most
+        # restriction of each component is the same one the sorted horizon cursor found first.
+        dHz = gSSURGO_ValuArrays.ReadHorizons(hzTable)
 
-        for cokey in dComp2:
-            try:
-                dComp2[cokey] = dComp[cokey]
+        if dHz is None:
+            raise MyError, "Unable to read horizon data from " + hzTable
 
-            except:
-                pass
+        dComp2 = gSSURGO_ValuArrays.RootZoneDepth(dHz, dCR, maxD)
 
         # Return the dictionary containing restriction depths and the dictionary containing defaults
         return dComp2
@@ -966,9 +855,6 @@ def CalcRZAWS(inputDB, outputDB, td, bd, theCompTable, valuTable, dRestrictions,
         PrintMsg(" \nCalculating Root Zone AWS for " + str(td) + " to " + str(bd) + "cm...", 0)
         arcpy.SetProgressorLabel("Calculating Root Zone AWS")
 
-        # QueryTable_HZ fields
-        qFieldNames = ["mukey", "cokey", "comppct_r",  "compname", "localphase", "majcompflag", "compkind", "taxorder", "taxsubgrp", "desgnmaster", "om_r", "awc_r", "hzdept_r", "hzdepb_r", "texture", "lieutex"]
-
         #arcpy.SetProgressorLabel("Creating output tables using dominant component...")
         #arcpy.SetProgressor("step", "Calculating root zone available water supply..." , 0, numRows, 1)
 
@@ -987,143 +873,22 @@ def CalcRZAWS(inputDB, outputDB, td, bd, theCompTable, valuTable, dRestrictions,
             coFieldNames = ["mukey", "cokey", "compname", "localphase", "comppct_r", "pctearthmc", "rootznemc", "rootznaws", "restriction"]
             coCursor = arcpy.da.UpdateCursor(theCompTable, coFieldNames)
 
-            # Process query table using cursor, write out horizon data for each major component
-            sqlClause = [None, "order by mukey, comppct_r DESC, cokey, hzdept_r ASC"]
-            iCnt = int(arcpy.GetCount_management(queryTbl).getOutput(0))
-
             # For root zone calculations, we only want earthy, major components
-            #PrintMsg(" \nFiltering components in Query_HZ for CalcRZAWS1 function", 1)
             #
-            # Major-Earthy Components
-            #hzSQL = "component.compkind <> 'Miscellaneous area' and component.compkind is not NULL and component.majcompflag = 'Yes'"
-            # All Components
-
-            inCur = arcpy.da.SearchCursor(queryTbl, qFieldNames, sql_clause=sqlClause)
-
-            # Create dictionaries to handle the mapunit and component summaries
-            dMu = dict()
-            dComp = dict()
-
-            # I may have to pull the sum of component percentages out of this function?
-            # It seems to work OK for the earthy-major components, but will not work for
-            # the standard AWS calculations. Those 'Miscellaneous area' components with no horizon data
+            # Horizon thickness and AWS above the restriction are summed for each component by
+            # gSSURGO_ValuArrays.RootZoneAWS. Organic horizons are not used.
+            #
+            # Those 'Miscellaneous area' components with no horizon data
             # are excluded from the Query table because it does not support Outer Joins.
             #
-            mCnt = 0
-            #PrintMsg("\tmukey, cokey, comppct, top, bottom, resdepth, thickness, aws", 0)
-
-            # TEST: keep list of cokeys as a way to track the top organic horizons
-            skipList = list()
-
-            for rec in inCur:
-                # read each horizon-level input record from QueryTable_HZ ...
-                #
-                mukey, cokey, compPct, compName, localPhase, mjrFlag, cKind, taxorder, taxsubgrp, desgnmaster, om, awc, top, bot, texture, lieutex = rec
-
-                if mjrFlag == "Yes" and cKind != "Miscellaneous area" and cKind is not None:
-                    # For major-earthy components
-                    # Get restriction information from dictionary
-
-                    # For non-Miscellaneous areas with no horizon data, set hzdepth values to zero so that
-                    # PWSL and Droughty will get populated with zeros instead of NULL.
-                    if top is None and bot is None:
-
-                        if not cokey in dComp:
-                            dComp[cokey] = mukey, compName, localPhase, compPct, 0, 0, ""
-
-                    try:
-                        # mukey, compName, localPhase, compPct, resDept, restriction
-                        # rDepth is the component restriction depth or calculated horizon restriction from CalcRZDepth1 function
-
-                        # mukey, compName, localPhase, compPct, resDept, restriction] = dRestrictions
-                        d1, d2, d3, d4, rDepth, restriction = dRestrictions[cokey]
-                        cBot = min(rDepth, bot, maxD)  # 01-05-2015 Added maxD because I found 46 CONUS mapunits with a ROOTZNEMC > 150
-
-                        #if mukey == tmukey and rDepth != 150:
-                        #    PrintMsg("\tRestriction, " + str(mukey) + ", " + str(cokey) + ", " + str(rDepth) + " at " + str(restriction) + "cm", 1)
-
-                    except:
-                        #errorMsg()
-                        cBot = min(maxD, bot)
-                        restriction = []
-                        rDepth = maxD
-
-                        if mukey == tmukey:
-                            PrintMsg("RestrictionError, " + str(mukey) + ", " + str(cokey) + ", " + str(rDepth) + ", " + str(restriction), 1)
-
-                    bOrganic = CheckTexture(mukey, cokey, desgnmaster, om, texture, lieutex, taxorder, taxsubgrp)
-
-                    # fix awc_r to 2 decimal places
-                    if awc is None:
-                        awc = 0.0
-
-                    else:
-                        awc = round(awc, 2)
-
-                    # Reasons for skipping RZ calculations on a horizon:
-                    #   1. Desgnmaster = O, L and Taxorder != Histosol and is at the surface
-                    #   2. Do I need to convert null awc values to zero?
-                    #   3. Below component restriction or horizon restriction level
-
-                    if bOrganic:
-                        # Organic surface horizon - Not using this horizon in the calculations
-                        useHz = False
-
-                        #if mukey == tmukey:
-                        #    PrintMsg("Organic, " + str(mukey) + ", " + str(cokey) + ", " + str(compPct) + ", " + str(desgnmaster) + ", " + taxorder  + ", " + str(top) + ", " + str(bot) + ", " + str(cBot)  + ", " + str(awc) + ", " + str(useHz), 1)
-
-                    else:
-                        # Mineral, Histosol, buried Organic, Bedrock or there is a horizon restriction (EC, pH - Using this horizon in the calculations
-                        useHz = True
-                        skipList.append(cokey)
-
-                        # Looking for problems
-                        #if mukey == tmukey:
-                        #    PrintMsg("Mineral, " + str(mukey) + ", " + str(cokey)  + ", " + str(compPct) + ", " + str(desgnmaster) + ", " + str(taxorder) + ", " + str(top) + ", " + str(bot) + ", " + str(cBot) + ", " + str(awc)  + ", " + str(useHz), 1)
-
-                        # Attempt to fix component with a surface-level restriction that might be in an urban soil
-                        if not cokey in dComp and cBot == 0:
-                            dComp[cokey] = mukey, compName, localPhase, compPct, 0, 0, restriction
-
-                            # Looking for problems
-                            #if mukey == tmukey:
-                            #    PrintMsg("MUKEY2: " + str(mukey) + ", " + str(top) + ", " + str(bot) + ", " + str(cBot) + ", " + str(useHz), 1)
-
-                    if top < cBot and useHz == True:
-                        # If the top depth is less than the bottom depth, proceed with the calculation
-                        # Calculate sum of horizon thickness and sum of component ratings for all horizons above bottom
-                        hzT = cBot - top
-                        aws = float(hzT) * float(awc) * 10.0 # volume in millimeters
-
-                        # Looking for problems
-                        #if mukey == tmukey:
-                        #    PrintMsg("MUKEY3: " + str(mukey) + ", " + str(top) + ", " + str(bot) + ", " + str(cBot) + ", " + str(useHz), 1)
-
-
-                        if cokey in dComp:
-                            # accumulate total thickness and total rating value by adding to existing component values
-                            mukey, compName, localPhase, compPct, dHzT, dAWS, restriction = dComp[cokey]
-                            dAWS = dAWS + aws
-                            dHzT += hzT
-                            dComp[cokey] = mukey, compName, localPhase, compPct, dHzT, dAWS, restriction
-
-                        else:
-                            # Create initial entry for this component using the first horizon
-                            dComp[cokey] = mukey, compName, localPhase, compPct, hzT, aws, restriction
-
-                    else:
-                        # Do not include this horizon in the rootzone calculations
-                        pass
-
-                else:
-                    # Not a major-earthy component, so write out everything BUT rzaws-related data (last values)
-                    dComp[cokey] = mukey, compName, localPhase, compPct, None, None, None, None
-
-                #arcpy.SetProgressorPosition()
+            dMu = dict()
+            dHz = gSSURGO_ValuArrays.ReadHorizons(queryTbl)
 
-            # End of processing major-earthy horizon-level data
+            if dHz is None:
+                raise MyError, "Unable to read horizon data from " + queryTbl
 
-            #arcpy.ResetProgressor()
+            # dComp[cokey] = [hzT, aws, restriction]
+            dComp = gSSURGO_ValuArrays.RootZoneAWS(dHz, dRestrictions, maxD, False)
 
             # get the total number of major-earthy components from the dictionary count
             iComp = len(dComp)
@@ -1142,7 +907,7 @@ def CalcRZAWS(inputDB, outputDB, td, bd, theCompTable, valuTable, dRestrictions,
                         pctearthmc = float(dPct[mukey][1])   # sum of comppct_r for all major components Test 2014-10-07
 
                         # get rootzone data from dComp
-                        mukey1, compName1, localPhase1, compPct1, hzT, awc, restriction = dComp[cokey]
+                        hzT, awc, restriction = dComp[cokey]
 
                     except:
                         pctearthmc = 0
@@ -1262,9 +1027,6 @@ def CalcAWS(db, theCompTable, valuTable, dPct, depthList):
         # Using the same component horizon table that has been
         numRows = int(arcpy.GetCount_management(hzTable).getOutput(0))
 
-        # mukey, cokey, compPct,val, top, bot
-        qFieldNames = ["mukey", "cokey", "comppct_r", "awc_r", "hzdept_r", "hzdepb_r"]
-
         # Track map units that are missing data
         missingList = list()
         minusList = list()
@@ -1273,7 +1035,17 @@ def CalcAWS(db, theCompTable, valuTable, dPct, depthList):
         arcpy.SetProgressorLabel("Calculating standard available water supply")
         #arcpy.SetProgressor("step", "Reading QueryTable_HZ ...",  1, len(depthList), 1)
 
-        for rng in depthList:
+        # Sum horizon data for each component and depth range (gSSURGO_ValuArrays.AWSRanges)
+        # Horizons with a null hzdept_r or awc_r are skipped.
+        dHz = gSSURGO_ValuArrays.ReadHorizons(hzTable)
+
+        if dHz is None:
+            raise MyError, "Unable to read horizon data from " + hzTable
+
+        hzThick, hzAWS, bPresent = gSSURGO_ValuArrays.AWSRanges(dHz, depthList)
+
+        for i in range(len(depthList)):
+            rng = depthList[i]
             # Calculating and updating just one AWS column at a time
             #
             td = rng[0]
@@ -1291,7 +1063,6 @@ def CalcAWS(db, theCompTable, valuTable, dPct, depthList):
             dMu = dict()
             dComp = dict()
             dSum = dict()     # store sum of comppct_r and total thickness for the component
-            dHz = dict()      # Trying a new dictionary that will s
 
             #arcpy.SetProgressorLabel("Calculating available water supply for " + str(td) + " - " + str(bd) + "cm")
             #arcpy.SetProgressor("step", "Aggregating data for the dominant component..." , 0, numRows, 1)
@@ -1307,38 +1078,10 @@ def CalcAWS(db, theCompTable, valuTable, dPct, depthList):
                 # MUKEY, AWS
                 coCursor = arcpy.da.UpdateCursor(theCompTable, coFieldNames)
 
-                # Process query table using a searchcursor, write out horizon data for each component
-                # At this time, almost all components are being used! There is no filter.
-                sqlClause = (None, "order by mukey, comppct_r DESC, cokey, hzdept_r ASC")
-                #hzSQL = "compkind is not null and hzdept_r is not null"  # prevent divide-by-zero errors
-                hzSQL = "hzdept_r is not null"  # prevent divide-by-zero errors by skipping components with no horizons
-
-                iCnt = int(arcpy.GetCount_management(hzTable).getOutput(0))
-                inCur = arcpy.da.SearchCursor(hzTable, qFieldNames, where_clause=hzSQL, sql_clause=sqlClause)
-
-                for rec in inCur:
-                    # read each horizon-level input record from the query table ...
-
-                    mukey, cokey, compPct, awc, top, bot = rec
-
-                    if awc is not None:
-
-                        # Calculate sum of horizon thickness and sum of component ratings for all horizons above bottom
-                        hzT = min(bot, bd) - max(top, td)   # usable thickness from this horizon
-
-                        if hzT > 0:
-                            aws = float(hzT) * float(awc) * 10
-
-                            if not cokey in dComp:
-                                # Create initial entry for this component using the first horizon CHK
-                                dComp[str(cokey)] = (mukey, compPct, hzT, aws)
-
-                            else:
-                                # accumulate total thickness and total rating value by adding to existing component values  CHK
-                                mukey, compName, dHzT, dAWS = dComp[str(cokey)]
-                                dAWS = dAWS + aws
-                                dHzT = dHzT + hzT
-                                dComp[str(cokey)] = (mukey, compPct, dHzT, dAWS)
+                # Component sums for this range from the horizon arrays, in the same
+                # (mukey, compPct, hzT, aws) form used by the original horizon cursor.
+                for c in np.flatnonzero(bPresent[:, i]).tolist():
+                    dComp[str(dHz["coKeys"][c])] = (dHz["muKeys"][c], dHz["comppct"][c].item(), hzThick[c, i].item(), hzAWS[c, i].item())
 
                 # get the total number of major components from the dictionary count
                 iComp = len(dComp)
@@ -1447,10 +1190,6 @@ def CalcSOC(db, theCompTable, valuTable, dPct, dFrags, depthList, dRestrictions,
         # Using the same component horizon table that has been
         numRows = int(arcpy.GetCount_management(hzTable).getOutput(0))
 
-        # mukey, cokey, compPct,val, top, bot
-        #qFieldNames = ["mukey", "cokey", "comppct_r", "hzdept_r", "hzdepb_r", "om_r", "dbthirdbar_r"]
-        qFieldNames = ["mukey","cokey","comppct_r","compname","localphase","chkey","om_r","dbthirdbar_r", "hzdept_r","hzdepb_r", "fragvol"]
-
         # Track map units that are missing data
         missingList = list()
         minusList = list()
@@ -1458,7 +1197,19 @@ def CalcSOC(db, theCompTable, valuTable, dPct, dFrags, depthList, dRestrictions,
         PrintMsg(" \nCalculating soil organic carbon...", 0)
         arcpy.SetProgressorLabel("Calculating soil organic carbon...")
 
-        for rng in depthList:
+        # Horizon thickness and SOC for every component and depth range (gSSURGO_ValuArrays.SOCRanges).
+        # Horizons with a null hzdept_r, om_r or dbthirdbar_r are skipped. SOC is not calculated
+        # below the component restriction, and is reduced by the fragvol of each horizon.
+        dHz = gSSURGO_ValuArrays.ReadHorizons(hzTable)
+
+        if dHz is None:
+            raise MyError, "Unable to read horizon data from " + hzTable
+
+        fragvol = gSSURGO_ValuArrays.FragmentVolume(dHz, None)
+        hzThick, hzSOC, bPresent = gSSURGO_ValuArrays.SOCRanges(dHz, depthList, dRestrictions, maxD, fragvol, False)
+
+        for i in range(len(depthList)):
+            rng = depthList[i]
             # Calculating and updating just one SOC column at a time
             #
             td = rng[0]
@@ -1474,7 +1225,6 @@ def CalcSOC(db, theCompTable, valuTable, dPct, dFrags, depthList, dRestrictions,
             dComp = dict()
             #dSumPct = dict()  # store the sum of comppct_r for each mapunit to use in the calculations
             dSum = dict()     # store sum of comppct_r and total thickness for the component
-            dHz = dict()      # Trying a new dictionary that will s
             mCnt = 0
 
             #arcpy.SetProgressorLabel("Calculating SOC for " + str(td) + "->" + str(bd) + "cm...")
@@ -1494,82 +1244,10 @@ def CalcSOC(db, theCompTable, valuTable, dPct, dFrags, depthList, dRestrictions,
                 #coFieldNames = ["COKEY", "SOC" + str(td) + "_" + str(bd)]
                 coCursor = arcpy.da.UpdateCursor(theCompTable, coFieldNames)
 
-                # Process query table using a searchcursor, write out horizon data for each component
-                # At this time, almost all components are being used! There is no filter.
-                hzSQL = "hzdept_r is not null"  # prevent divide-by-zero errors by skipping components with no horizons
-                sqlClause = (None, "order by mukey, comppct_r DESC, cokey, hzdept_r ASC")
-
-                iCnt = int(arcpy.GetCount_management(hzTable).getOutput(0))
-                inCur = arcpy.da.SearchCursor(hzTable, qFieldNames, where_clause=hzSQL, sql_clause=sqlClause)
-
-                for rec in inCur:
-                    # read each horizon-level input record from the query table ...
-
-                    mukey, cokey, compPct, compName, localPhase, chkey, om, db3, top, bot, fragvol = rec
-
-                    if fragvol is None:
-                        fragvol = 0.0
-                        #PrintMsg("hzTable: " + str(rec), 1)
-
-                    if om is not None and db3 is not None:
-                        # Calculate sum of horizon thickness and sum of component ratings for
-                        # that portion of the horizon that is with in the td-bd range
-                        top = max(top, td)
-                        bot = min(bot, bd)
-                        om = round(om, 3)
-
-                        try:
-                            rz, resKind = dRestrictions[cokey]
-
-                        except:
-                            rz = maxD
-                            resKind = ""
-
-                        # Now check for horizon restrictions within this range. Do not calculate SOC past
-                        # root zone restrictive layers.
-                        #
-                        if top < rz < bot:
-                            # restriction found in this horizon, use it to set a new depth
-                            #PrintMsg("\t\t" + resKind + " restriction for " + mukey + ":" + cokey + " at " + str(rz) + "cm", 1)
-                            cBot = rz
-
-                        else:
-                            cBot = min(rz, bot)
-
-                        # Calculate initial usable horizon thickness
-                        hzT = cBot - top
-
-                        if hzT > 0 and top < cBot:
-                    
-                            #if mukey == "158070" and td == 0 and bd == 100.0:
-                            #    test = [mukey, cokey, compPct, compName, localPhase, chkey, om, db3, top, bot, fragvol]
-                            #    PrintMsg(str(test), 1)
-
-                            # Calculate SOC using horizon thickness, OM, BD, FragVol, CompPct.
-                            # changed the OM to carbon conversion from * 0.58 to / 1.724 after running FY2017 value table
-                            if fragvol is None:
-                                fragvol = 0.0
-                                
-                            soc =  ( (hzT * ( ( om / 1.724 ) * db3 )) / 100.0 ) * ((100.0 - fragvol) / 100.0) * ( compPct * 100 )
-
-                            #if mukey == "158056" and td == 0 and bd == 100.0:
-                                # Everything here matches the other script
-                            #    test = [mukey, cokey, compPct, compName, localPhase, chkey, om, db3, top, bot, fragvol, round(soc, 2)]
-                            #    PrintMsg(str(test), 1)
-
-                            if not cokey in dComp:
-                                # Create initial entry for this component using the first horizon CHK
-                                dComp[cokey] = (mukey, compPct, hzT, soc)
-
-                            else:
-                                # accumulate total thickness and total rating value by adding to existing component values  CHK
-                                mukey, compName, dHzT, dSOC = dComp[cokey]
-                                dSOC = dSOC + soc
-                                dHzT = dHzT + hzT
-                                dComp[cokey] = (mukey, compPct, dHzT, dSOC)
-
-
-                    #arcpy.SetProgressorPosition()
+                # Component sums for this range from the horizon arrays, in the same
+                # (mukey, compPct, hzT, soc) form used by the original horizon cursor.
+                for c in np.flatnonzero(bPresent[:, i]).tolist():
+                    dComp[dHz["coKeys"][c]] = (dHz["muKeys"][c], dHz["comppct"][c].item(), hzThick[c, i].item(), hzSOC[c, i].item())
 
                 # get the total number of major components from the dictionary count
                 iComp = len(dComp)
@@ -2811,6 +2489,9 @@ def CreateValuTable(valuTable, hzTable, txTable, crTable, interpTable, mukeyList
     # Run all processes from here
 
     try:
+        # Horizon arrays from an earlier HzData table
+        gSSURGO_ValuArrays.Release(hzTable)
+
         arcpy.OverwriteOutput = True
         #dValue = dict() # return dictionary by mukey
 
@@ -2885,6 +2566,9 @@ def CreateValuTable(valuTable, hzTable, txTable, crTable, interpTable, mukeyList
         if CalcSOC(db, theCompTable, valuTable, dPct, dFrags, depthList, dSOCRestrictions, maxD) == False:
             raise MyError, ""
 
+        # Free the horizon arrays shared by the root zone, AWS and SOC calculations
+        gSSURGO_ValuArrays.Release()
+
         # Calculate NCCPI
         if mainRuleName == "NCCPI - National Commodity Crop Productivity Index (Ver 3.0)":
             if CalcNCCPI3(db, valuTable, interpTable, dPct) == False:
@@ -3181,6 +2865,8 @@ def CreateSoilsData(surveyList, db, sdaURL):
 ## ====================================== Main Body ==================================
 # Import modules
 import sys, string, os, locale, arcpy, traceback, urllib2, httplib, json
+import numpy as np
+import gSSURGO_ValuArrays
 import xml.etree.cElementTree as ET
 from datetime import datetime
 from arcpy import env
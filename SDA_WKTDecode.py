@@ -0,0 +1,391 @@
+# SDA_WKTDecode.py
+#
+# Steve Peaslee, National Soil Survey Center
+#
+# Purpose:  Bulk decoding of the WKT polygons returned by a Soil Data Access spatial request.
+#
+# The original RunSpatialQuery functions created each soil polygon by passing the WKT string
+# to arcpy.FromWKT and then calling projectAs, one polygon at a time. For an AOI that returns
+# 100,000+ polygons, the string parsing and per-polygon projection take most of the run time.
+#
+# This module parses all of the coordinate runs into a single NumPy array, fixes ring orientation
+# for the Esri 'clockwise exterior' rule, projects every coordinate using a few large multipoint
+# geometries and then builds the output polygons from slices of that array.
+#
+# Used by SDA_SpatialQuery_Custom, SDA_ACPF, SDA_SpatialQuery_AWS and SDA_SpatialQuery_CDSI.
+#
+# Run this script by itself (outside of ArcMap) to benchmark the decode throughput:
+#     python SDA_WKTDecode.py [polygon count] [vertices per ring]
+#
+# SQL Server geography returns 2D polygons with counter-clockwise exterior rings:
+#     POLYGON ((-93.1 41.2, -93.0 41.2, -93.0 41.3, -93.1 41.2), (...interior ring...))
+#     MULTIPOLYGON (((...)), ((...)))
+#
+
+## ===================================================================================
+class MyError(Exception):
+    pass
+
+## ===================================================================================
+def PrintMsg(msg, severity=0):
+    # prints message to screen if run as a python script
+    # Adds tool message to the geoprocessor
+    #
+    #Split the message on \n first, so that if it's multiple lines, a GPMessage will be added for each line
+    try:
+        for string in msg.split('\n'):
+            #Add a geoprocessing message (in case this is run as a tool)
+            if severity == 0:
+                arcpy.AddMessage(string)
+
+            elif severity == 1:
+                arcpy.AddWarning(string)
+
+            elif severity == 2:
+                arcpy.AddMessage("    ")
+                arcpy.AddError(string)
+
+    except:
+        pass
+
+## ===================================================================================
+def errorMsg():
+    try:
+        tb = sys.exc_info()[2]
+        tbinfo = traceback.format_tb(tb)[0]
+        theMsg = tbinfo + "\n" + str(sys.exc_type)+ ": " + str(sys.exc_value)
+        PrintMsg(theMsg, 2)
+
+    except:
+        PrintMsg("Unhandled error in unHandledException method", 2)
+        pass
+
+## ===================================================================================
+def ParseWKT(wktList):
+    # Parse a list of POLYGON or MULTIPOLYGON WKT strings into flat coordinate arrays.
+    #
+    # Returns:
+    #   coords - float64 array (vertex count, 2) with x, y for every ring in every polygon
+    #   ringCounts - number of vertices in each ring
+    #   ringExterior - True if the ring is the first (exterior) ring of a polygon part
+    #   featureRings - number of rings for each WKT string. 0 for a string that could not be
+    #                  parsed (POLYGON EMPTY, truncated text or a bad coordinate count).
+    #
+    # The coordinate text for all rings is joined and converted using a single call to
+    # numpy.fromstring so that no Python float objects are created per vertex. If the total
+    # coordinate count is wrong, each string is converted by itself to find the bad ones.
+    #
+    ringTexts = list()
+    ringCounts = list()
+    ringExterior = list()
+    featureRings = list()
+
+    for wkt in wktList:
+        iRings = 0
+
+        if wkt is None:
+            featureRings.append(0)
+            continue
+
+        for ring in ringPattern.finditer(wkt):
+            ringText = ring.group(1)
+            ringTexts.append(ringText)
+            ringCounts.append(ringText.count(",") + 1)
+
+            # A ring that directly follows an opening parenthesis is the first ring of a polygon
+            # part. Any ring that follows a comma is an interior ring (hole) for that part.
+            j = ring.start() - 1
+
+            while wkt[j] == " ":
+                j -= 1
+
+            ringExterior.append(wkt[j] == "(")
+            iRings += 1
+
+        featureRings.append(iRings)
+
+    ringCounts = np.array(ringCounts, dtype=np.int64)
+    vertCnt = int(ringCounts.sum())
+    xy = np.fromstring(",".join(ringTexts).replace(",", " "), dtype=np.float64, sep=" ")
+
+    if vertCnt > 0 and xy.size % vertCnt == 0 and xy.size // vertCnt >= 2:
+        # SDA only returns 2D coordinates, but drop any Z or M values that might show up
+        dims = xy.size // vertCnt
+        coords = xy.reshape(vertCnt, dims)[:, 0:2]
+
+    else:
+        coords, ringCounts, ringExterior, featureRings = ParseFeatures(ringTexts, ringCounts, ringExterior, featureRings)
+
+    return coords, ringCounts, np.array(ringExterior, dtype=bool), np.array(featureRings, dtype=np.int64)
+
+## ===================================================================================
+def ParseFeatures(ringTexts, ringCounts, ringExterior, featureRings):
+    # Convert the coordinates one WKT string at a time. Used by ParseWKT when the joined
+    # coordinate text has the wrong number of values. The rings of a string whose values do
+    # not match its vertex count are dropped and its featureRings is set to 0.
+    #
+    coordList = list()
+    keepRings = np.zeros(len(ringCounts), dtype=bool)
+    featureRings = list(featureRings)
+    r = 0
+
+    for i in range(len(featureRings)):
+        iRings = featureRings[i]
+        vertCnt = int(ringCounts[r:r + iRings].sum())
+        xy = np.fromstring(",".join(ringTexts[r:r + iRings]).replace(",", " "), dtype=np.float64, sep=" ")
+
+        if vertCnt > 0 and xy.size % vertCnt == 0 and xy.size // vertCnt >= 2:
+            coordList.append(xy.reshape(vertCnt, xy.size // vertCnt)[:, 0:2])
+            keepRings[r:r + iRings] = True
+
+        else:
+            featureRings[i] = 0
+
+        r += iRings
+
+    if len(coordList) == 0:
+        coords = np.zeros((0, 2), dtype=np.float64)
+
+    else:
+        coords = np.concatenate(coordList)
+
+    return coords, ringCounts[keepRings], np.array(ringExterior, dtype=bool)[keepRings], featureRings
+
+## ===================================================================================
+def OrientRings(coords, ringCounts, ringExterior):
+    # Esri polygons require clockwise exterior rings and counter-clockwise interior rings.
+    # SQL Server geography uses the opposite rule, so reverse the vertex order of any ring
+    # with the wrong orientation. The signed area of every ring is calculated at once using
+    # the shoelace formula and np.add.reduceat.
+    #
+    vertCnt = coords.shape[0]
+
+    if vertCnt == 0:
+        return coords
+
+    ringEnds = np.cumsum(ringCounts)
+    ringStarts = ringEnds - ringCounts
+
+    x = coords[:, 0]
+    y = coords[:, 1]
+
+    # cross product for each vertex and the following vertex. The last vertex in each ring
+    # must not be paired with the first vertex of the next ring.
+    cross = np.zeros(vertCnt, dtype=np.float64)
+    cross[:-1] = x[:-1] * y[1:] - x[1:] * y[:-1]
+    cross[ringEnds - 1] = 0.0
+
+    signedArea = np.add.reduceat(cross, ringStarts)
+
+    # Positive area is counter-clockwise
+    bFlip = (ringExterior & (signedArea > 0)) | (~ringExterior & (signedArea < 0))
+
+    if not bFlip.any():
+        return coords
+
+    ringId = np.repeat(np.arange(len(ringCounts)), ringCounts)
+    order = np.arange(vertCnt)
+    vertFlip = bFlip[ringId]
+    flipIds = ringId[vertFlip]
+    order[vertFlip] = ringStarts[flipIds] + (ringEnds[flipIds] - 1) - order[vertFlip]
+
+    return coords[order]
+
+## ===================================================================================
+def SpatialReferenceJSON(sr):
+    # Return the spatialReference portion of an Esri JSON geometry
+    #
+    if sr.factoryCode is not None and sr.factoryCode > 0:
+        return {"wkid": sr.factoryCode}
+
+    else:
+        return {"wkt": sr.exportToString().split(";")[0]}
+
+## ===================================================================================
+def ProjectCoordinates(coords, inputCS, outputCS, tm, chunkSize=250000):
+    # Project an entire coordinate array by loading it into multipoint geometries.
+    # One projectAs call per chunk replaces one call per soil polygon.
+    #
+    # Returns the projected coordinate array or None if the multipoint did not preserve
+    # the vertex count (in which case the caller should project polygon by polygon).
+    #
+    vertCnt = coords.shape[0]
+    outCoords = np.empty((vertCnt, 2), dtype=np.float64)
+    inputSR = SpatialReferenceJSON(inputCS)
+
+    for i in range(0, vertCnt, chunkSize):
+        chunk = coords[i:i + chunkSize]
+        mp = arcpy.AsShape({"points": chunk.tolist(), "spatialReference": inputSR}, True)
+
+        if tm == "" or tm is None:
+            prjPoints = mp.projectAs(outputCS)
+
+        else:
+            prjPoints = mp.projectAs(outputCS, tm)
+
+        points = json.loads(prjPoints.JSON)["points"]
+
+        if len(points) != chunk.shape[0]:
+            return None
+
+        outCoords[i:i + chunk.shape[0]] = np.array(points, dtype=np.float64)[:, 0:2]
+
+    return outCoords
+
+## ===================================================================================
+def BuildPolygons(coords, ringCounts, featureRings, outputCS):
+    # Create one arcpy polygon per WKT string using slices of the coordinate array.
+    # The coordinate array is converted to Python lists only once. A string without
+    # rings gets None.
+    #
+    ringEnds = np.cumsum(ringCounts)
+    ringStarts = (ringEnds - ringCounts).tolist()
+    ringEnds = ringEnds.tolist()
+    featureEnds = np.cumsum(featureRings)
+    featureStarts = (featureEnds - featureRings).tolist()
+    featureEnds = featureEnds.tolist()
+
+    xyList = coords.tolist()
+    outputSR = SpatialReferenceJSON(outputCS)
+    polygonList = list()
+
+    for i in range(len(featureStarts)):
+        if featureStarts[i] == featureEnds[i]:
+            polygonList.append(None)
+            continue
+
+        rings = [xyList[ringStarts[r]:ringEnds[r]] for r in range(featureStarts[i], featureEnds[i])]
+        polygonList.append(arcpy.AsShape({"rings": rings, "spatialReference": outputSR}, True))
+
+    return polygonList
+
+## ===================================================================================
+def DecodePolygons(wktList, inputCS, outputCS, tm):
+    # Convert a list of WKT polygons from SDA (GCS WGS 1984) into a list of arcpy polygons
+    # in the output coordinate system. The order of the output list matches wktList.
+    # A WKT string that cannot be decoded is None in the output list.
+    #
+    try:
+        if len(wktList) == 0:
+            return []
+
+        coords, ringCounts, ringExterior, featureRings = ParseWKT(wktList)
+        badCnt = int((featureRings == 0).sum())
+
+        if badCnt > 0:
+            PrintMsg("\tSkipping " + str(badCnt) + " soil polygon(s) with empty or invalid WKT", 1)
+
+        coords = OrientRings(coords, ringCounts, ringExterior)
+
+        if inputCS.name != outputCS.name:
+            prjCoords = ProjectCoordinates(coords, inputCS, outputCS, tm)
+
+            if prjCoords is None:
+                # Fall back to projecting each polygon individually
+                PrintMsg("\tBulk projection failed, projecting each polygon", 1)
+                polygonList = BuildPolygons(coords, ringCounts, featureRings, inputCS)
+
+                if tm == "" or tm is None:
+                    return [None if polygon is None else polygon.projectAs(outputCS) for polygon in polygonList]
+
+                else:
+                    return [None if polygon is None else polygon.projectAs(outputCS, tm) for polygon in polygonList]
+
+            return BuildPolygons(prjCoords, ringCounts, featureRings, outputCS)
+
+        return BuildPolygons(coords, ringCounts, featureRings, outputCS)
+
+    except MyError, e:
+        # Example: raise MyError, "This is an error message"
+        PrintMsg(str(e), 2)
+        return []
+
+    except:
+        errorMsg()
+        return []
+
+## ===================================================================================
+def CreateTestWKT(polyCnt, vertCnt):
+    # Create synthetic SDA-style WKT polygons (counter-clockwise exterior ring with one hole)
+    # for benchmarking.
+    #
+    wktList = list()
+    angles = np.linspace(0.0, 2.0 * np.pi, vertCnt)
+
+    for i in range(polyCnt):
+        x0 = -100.0 + (i % 1000) * 0.01
+        y0 = 35.0 + (i // 1000) * 0.01
+        outer = ", ".join(["%.15f %.15f" % (x0 + 0.004 * np.cos(a), y0 + 0.004 * np.sin(a)) for a in angles])
+        inner = ", ".join(["%.15f %.15f" % (x0 + 0.001 * np.cos(-a), y0 + 0.001 * np.sin(-a)) for a in angles])
+        wktList.append("POLYGON ((" + outer + "), (" + inner + "))")
+
+    return wktList
+
+## ===================================================================================
+def Benchmark(polyCnt, vertCnt):
+    # Report WKT decode throughput for the array parser and, when arcpy is available,
+    # for the original arcpy.FromWKT method.
+    #
+    wktList = CreateTestWKT(polyCnt, vertCnt)
+    totalVerts = polyCnt * vertCnt * 2
+
+    start = time.time()
+    coords, ringCounts, ringExterior, featureRings = ParseWKT(wktList)
+    coords = OrientRings(coords, ringCounts, ringExterior)
+    eParse = max(time.time() - start, 0.000001)
+
+    print("Parsed " + str(polyCnt) + " polygons (" + str(totalVerts) + " vertices) in " + ("%.3f" % eParse) + " seconds")
+    print("\tArray decode: " + ("%.0f" % (polyCnt / eParse)) + " polygons/second; " + ("%.0f" % (totalVerts / eParse)) + " vertices/second")
+
+    if arcpy is None:
+        print("\tarcpy is not available, skipping comparison with arcpy.FromWKT")
+        return
+
+    inputCS = arcpy.SpatialReference(4326)
+    outputCS = arcpy.SpatialReference(102039)   # USA Contiguous Albers Equal Area Conic USGS
+    tm = "WGS_1984_(ITRF00)_To_NAD_1983"
+
+    start = time.time()
+    oldList = [arcpy.FromWKT(wkt, inputCS).projectAs(outputCS, tm) for wkt in wktList]
+    eOld = max(time.time() - start, 0.000001)
+
+    start = time.time()
+    newList = DecodePolygons(wktList, inputCS, outputCS, tm)
+    eNew = max(time.time() - start, 0.000001)
+
+    print("\tarcpy.FromWKT + projectAs: " + ("%.0f" % (polyCnt / eOld)) + " polygons/second")
+    print("\tDecodePolygons: " + ("%.0f" % (polyCnt / eNew)) + " polygons/second (" + ("%.1f" % (eOld / eNew)) + "x)")
+
+    areaDiff = max([abs(oldList[i].area - newList[i].area) / oldList[i].area for i in range(polyCnt)])
+    print("\tMaximum relative area difference: " + ("%.2e" % areaDiff))
+
+## ===================================================================================
+## MAIN
+## ===================================================================================
+
+# Import system modules
+import sys, os, re, json, time, traceback
+import numpy as np
+
+try:
+    import arcpy
+
+except ImportError:
+    # arcpy is only needed to build the output geometries. The parser benchmark runs without it.
+    arcpy = None
+
+# Innermost parenthesized coordinate run for a single ring
+ringPattern = re.compile(r"\(([^()]+)\)")
+
+if __name__ == "__main__":
+    # Standalone benchmark
+    polyCnt = 10000
+    vertCnt = 50
+
+    if len(sys.argv) > 1:
+        polyCnt = int(sys.argv[1])
+
+    if len(sys.argv) > 2:
+        vertCnt = int(sys.argv[2])
+
+    Benchmark(polyCnt, vertCnt)
@@ -2541,9 +2541,18 @@ def gSSURGO(inputFolder, surveyList, outputWS, AOI, tileInfo, useTextFiles, bCli
             # This is a patch to replace the 4 missing records
             #bFixed = IdentifyNewInterps(outputWS)
 
+            # Put the cointerp records for each interpretation together and index their OBJECTID
+            # ranges (gSSURGO_InterpIndex). This must be done before the relationships are created.
+            import gSSURGO_InterpIndex
+            gSSURGO_InterpIndex.ClusterTable(outputWS)
+
             # Create table relationships and indexes
             bRL = CreateTableRelationships(outputWS)
 
+            # Dominant component index used by the soil map tools
+            import gSSURGO_ComponentIndex
+            gSSURGO_ComponentIndex.BuildIndex(outputWS)
+
             # Query the output SACATALOG table to get list of surveys that were exported to the gSSURGO
             #
             saTbl = os.path.join(outputWS, "sacatalog")
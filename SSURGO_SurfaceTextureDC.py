@@ -6,6 +6,9 @@
 # the first component with the highest representative component percent. Adds
 # surface texture for the dominant component
 #
+# 2017-11-02 The dominant component comes from the component index (gSSURGO_ComponentIndex)
+# instead of sorting the component table. Ties still go to the higher cokey.
+#
 ## ===================================================================================
 class MyError(Exception):
     pass
@@ -65,6 +68,7 @@ def Number_Format(num, places=0, bCommas=True):
 ## ====================================== Main Body ==================================
 # Import modules
 import sys, string, os, locale, arcpy, traceback
+import gSSURGO_ComponentIndex
 from arcpy import env
 inputDB = arcpy.GetParameterAsText(0)    # Input database. Assuming SSURGO or gSSURGO soils database
 outputTbl = arcpy.GetParameterAsText(1)  # Output table containing surface texture for the dominant component
@@ -107,19 +111,29 @@ try:
     if not arcpy.Exists(coTbl):
         raise MyError, "COMPONENT table not found for " + inputDB
 
-    # Open component table sorted by cokey and comppct_r
-    iCnt = int(arcpy.GetCount_management(coTbl).getOutput(0))
+    # Components for each map unit in comppct_r order. The index is built the first time.
+    dIndex = gSSURGO_ComponentIndex.LoadIndex(inputDB)
 
-    dComp = dict()
+    if dIndex is None:
+        raise MyError, "Unable to get the component index for " + inputDB
+
+    dDominant = dict()
 
-    sqlClause = "ORDER BY MUKEY DESC, COMPPCT_R DESC, COKEY DESC"
+    for mukey, coList in dIndex.iteritems():
+        # this is the dominant component
+        cokey, comppct, majcompflag = coList[0]
+        dDominant[cokey] = mukey, comppct
+
+    # Component names for the dominant components
+    iCnt = int(arcpy.GetCount_management(coTbl).getOutput(0))
+    dComp = dict()
     arcpy.SetProgressor("step", "Reading component table...",  0, iCnt, 1)
 
-    with arcpy.da.SearchCursor(coTbl, ["mukey", "cokey", "compname", "comppct_r"], "", "", "", (None, sqlClause)) as incur:
+    with arcpy.da.SearchCursor(coTbl, ["cokey", "compname"]) as incur:
         for inrec in incur:
-            if not inrec[0] in dComp:
-                # this is the dominant component
-                dComp[inrec[0]] = inrec[1], inrec[2], inrec[3]
+            if inrec[0] in dDominant:
+                mukey, comppct = dDominant[inrec[0]]
+                dComp[mukey] = inrec[0], inrec[1], comppct
 
             arcpy.SetProgressorPosition()
 
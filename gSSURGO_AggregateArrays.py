@@ -0,0 +1,1041 @@
+# gSSURGO_AggregateArrays.py
+#
+# Steve Peaslee, National Soil Survey Center
+#
+# Purpose:  Array-based horizon aggregation for gSSURGO_CreateSoilMap
+#
+# The AggregateHz functions in gSSURGO_CreateSoilMap originally read the initial query table
+# one row at a time and accumulated horizon values into dictionaries keyed on cokey and mukey.
+# For a CONUS database that is millions of rows handled in python loops.
+#
+# This module loads MUKEY, COKEY, COMPPCT_R, HZDEPT_R, HZDEPB_R and the rating column into
+# NumPy arrays, sorts them into map unit - component - horizon order and reduces them with
+# sorted segment operations:
+#
+#   1. Usable horizon thickness is clipped to the depth range with np.minimum/np.maximum
+#   2. Horizon rows are reduced to components
+#   3. Component rows are reduced to map units
+#
+# Integer sums (thickness, comppct) use np.add.reduceat. Floating point sums are accumulated
+# one position at a time across all segments so that each segment is summed in the same
+# left-to-right order as the original python loops. np.add.reduceat can use pairwise
+# summation on longer segments, which changes the last bit of some results and can flip
+# a rounded value.
+#
+# Map unit results are returned unrounded. Rounding and writing the output table are left
+# to the calling function.
+#
+# Run this script by itself (outside of ArcMap) to compare against the original python loops
+# and to measure the speedup. The loops keep their components in cursor order. A plain
+# dictionary would sum the components of a map unit in hash order, which can change the last
+# bit of the result. The kernels always use cursor order.
+#
+#     python gSSURGO_AggregateArrays.py [mapunit count]
+#
+# The HzRanges kernels rate a list of depth ranges in one pass. The horizon arrays are read and
+# sorted once and the thickness of every horizon in every range is one 2-D array, so the segment
+# reductions run once for all of the ranges. Each column matches the single range kernel exactly.
+#
+# 2017-10-24
+
+## ===================================================================================
+class MyError(Exception):
+    pass
+
+## ===================================================================================
+def PrintMsg(msg, severity=0):
+    # prints message to screen if run as a python script
+    # Adds tool message to the geoprocessor
+    #
+    #Split the message on \n first, so that if it's multiple lines, a GPMessage will be added for each line
+    try:
+        for string in msg.split('\n'):
+            #Add a geoprocessing message (in case this is run as a tool)
+            if severity == 0:
+                arcpy.AddMessage(string)
+
+            elif severity == 1:
+                arcpy.AddWarning(string)
+
+            elif severity == 2:
+                arcpy.AddMessage("    ")
+                arcpy.AddError(string)
+
+    except:
+        pass
+
+## ===================================================================================
+def errorMsg():
+    try:
+        tb = sys.exc_info()[2]
+        tbinfo = traceback.format_tb(tb)[0]
+        theMsg = tbinfo + "\n" + str(sys.exc_type)+ ": " + str(sys.exc_value)
+        PrintMsg(theMsg, 2)
+
+    except:
+        PrintMsg("Unhandled error in unHandledException method", 2)
+
+## ===================================================================================
+def HorizonArrays(mukeys, cokeys, comppct, hzdept, hzdepb, vals, areasyms):
+    # Create the sorted array set used by the aggregation kernels.
+    #
+    # Nulls in the numeric columns must already be None or NaN. Rows are sorted by
+    # MUKEY, COMPPCT_R DESC, COKEY, HZDEPT_R so that each component is one contiguous segment
+    # and each map unit is one contiguous run of components.
+    #
+    dArrays = dict()
+    mukeys = np.asarray(mukeys)
+    cokeys = np.asarray(cokeys)
+
+    if len(mukeys) == 0:
+        muCodes = np.zeros(0, dtype=np.int64)
+        coCodes = np.zeros(0, dtype=np.int64)
+
+    else:
+        muCodes = np.unique(mukeys, return_inverse=True)[1]
+        coCodes = np.unique(cokeys, return_inverse=True)[1]
+
+    comppct = np.asarray(comppct, dtype=np.float64)
+    hzdept = np.asarray(hzdept, dtype=np.float64)
+    # Null HZDEPT_R sorts first, the same as ORDER BY HZDEPT_R ASC
+    order = np.lexsort((np.where(np.isnan(hzdept), -np.inf, hzdept), coCodes, -comppct, muCodes))
+
+    dArrays["mukey"] = mukeys[order]
+    dArrays["areasymbol"] = np.asarray(areasyms)[order]
+    dArrays["mu"] = muCodes[order]
+    dArrays["co"] = coCodes[order]
+    dArrays["comppct"] = comppct[order]
+    dArrays["hzdept"] = hzdept[order]
+    dArrays["hzdepb"] = np.asarray(hzdepb, dtype=np.float64)[order]
+    dArrays["value"] = np.asarray(vals, dtype=np.float64)[order]
+
+    return dArrays
+
+## ===================================================================================
+def ReadHorizonArrays(initialTbl, inFlds, whereClause):
+    # Read the initial query table into the sorted array set.
+    #
+    # inFlds is the same list the AggregateHz functions use for their SearchCursor:
+    #     ["MUKEY", "COKEY", "COMPPCT_R", "HZDEPT_R", "HZDEPB_R", attribute column, "AREASYMBOL"]
+    #
+    # TableToNumPyArray cannot return nulls for numeric fields, so integer fields are read
+    # with a sentinel value and converted to NaN here.
+    #
+    # When the join is streamed (gSSURGO_JoinStream) the arrays are built from the joined rows
+    # and nothing is read from the table.
+    #
+    try:
+        if gSSURGO_JoinStream.IsStreamed(initialTbl):
+            cur = gSSURGO_JoinStream.ReadRows(initialTbl, inFlds, whereClause)
+
+            if not cur is None:
+                cols = [list() for fld in inFlds]
+
+                for row in cur:
+                    for i in range(len(cols)):
+                        cols[i].append(row[i])
+
+                mukeys, cokeys, comppct, hzdept, hzdepb, vals, areasyms = cols
+
+                # None becomes NaN in a float array
+                return HorizonArrays(mukeys, cokeys, np.array(comppct, dtype=np.float64), np.array(hzdept, dtype=np.float64), \
+                np.array(hzdepb, dtype=np.float64), np.array(vals, dtype=np.float64), areasyms)
+
+            gSSURGO_JoinStream.Materialize(initialTbl)
+
+        nullInt = -2147483647
+        dNull = dict()
+        numFlds = [fld.upper() for fld in inFlds[2:6]]
+
+        for fld in arcpy.ListFields(initialTbl):
+            if fld.name.upper() in numFlds:
+                if fld.type in ["Double", "Single"]:
+                    dNull[fld.name] = np.nan
+
+                else:
+                    dNull[fld.name] = nullInt
+
+        tblArray = arcpy.da.TableToNumPyArray(initialTbl, inFlds, whereClause, False, dNull)
+        numArrays = list()
+
+        for fld in inFlds[2:6]:
+            col = tblArray[fld].astype(np.float64)
+
+            if tblArray[fld].dtype.kind in "iu":
+                col[tblArray[fld] == nullInt] = np.nan
+
+            numArrays.append(col)
+
+        comppct, hzdept, hzdepb, vals = numArrays
+
+        return HorizonArrays(tblArray[inFlds[0]], tblArray[inFlds[1]], comppct, hzdept, hzdepb, vals, tblArray[inFlds[6]])
+
+    except MyError, e:
+        # Example: raise MyError, "This is an error message"
+        PrintMsg(str(e), 2)
+        return dict()
+
+    except:
+        errorMsg()
+        return dict()
+
+## ===================================================================================
+def SegmentStarts(keys):
+    # Index of the first row of each run of equal values in a sorted key array
+    if len(keys) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    return np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+
+## ===================================================================================
+def SegmentCounts(starts, n):
+    # Number of rows in each segment
+    return np.diff(np.concatenate((starts, [n]))).astype(np.int64)
+
+## ===================================================================================
+def SegmentSum(values, starts, counts):
+    # Sum each segment in row order, the same as a python loop would.
+    #
+    # Works across all segments at once for each position. Longest segments are kept at the
+    # front of 'active' so each pass only touches the segments that are still open.
+    #
+    if len(starts) == 0:
+        return np.zeros(0, dtype=np.float64)
+
+    total = values[starts].astype(np.float64)
+    active = np.argsort(-counts, kind="mergesort")
+    activeCounts = counts[active]
+
+    for k in range(1, activeCounts[0]):
+        sel = active[:np.searchsorted(-activeCounts, -k, side="left")]
+        total[sel] += values[starts[sel] + k]
+
+    return total
+
+## ===================================================================================
+def SegmentScanClamped(values, starts, counts):
+    # Segment sum where the running total is reset to zero whenever it is negative before
+    # the next value is added:  total = max(0, total) + value
+    #
+    # Matches the accumulation used by AggregateHz_DCP_WTA.
+    #
+    if len(starts) == 0:
+        return np.zeros(0, dtype=np.float64)
+
+    total = values[starts].astype(np.float64)
+    active = np.argsort(-counts, kind="mergesort")
+    activeCounts = counts[active]
+
+    for k in range(1, activeCounts[0]):
+        sel = active[:np.searchsorted(-activeCounts, -k, side="left")]
+        total[sel] = np.maximum(0, total[sel]) + values[starts[sel] + k]
+
+    return total
+
+## ===================================================================================
+def UsableThickness(dArrays, top, bot, bTopDefault=False):
+    # Horizon thickness inside the top-bot depth range.
+    # Null depths return NaN. With bTopDefault, a null HZDEPT_R is treated as the top of the range.
+    hzdept = dArrays["hzdept"]
+
+    if bTopDefault:
+        hzdept = np.where(np.isnan(hzdept), top, hzdept)
+
+    return np.minimum(dArrays["hzdepb"], bot) - np.maximum(hzdept, top)
+
+## ===================================================================================
+def ComponentSums(dArrays, rows, thick, weights):
+    # Reduce the selected horizon rows to components.
+    #
+    # Returns the index of the first horizon row for each component (into the full arrays),
+    # total usable thickness and the sequential sum of 'weights' for each component.
+    #
+    coStart = SegmentStarts(dArrays["co"][rows])
+    coCnt = SegmentCounts(coStart, len(rows))
+
+    if len(coStart) > 0:
+        coThick = np.add.reduceat(thick[rows], coStart)
+
+    else:
+        coThick = np.zeros(0, dtype=np.float64)
+
+    coSum = SegmentSum(weights, coStart, coCnt)
+
+    return rows[coStart], coThick, coSum
+
+## ===================================================================================
+def MapunitRows(dArrays, coRows):
+    # Start and count of each map unit within the component arrays
+    muStart = SegmentStarts(dArrays["mu"][coRows])
+    muCnt = SegmentCounts(muStart, len(coRows))
+    return muStart, muCnt
+
+## ===================================================================================
+def Hz_WTA_WTA(dArrays, top, bot, bZero):
+    # Weighted average of horizons, weighted average of components (AggregateHz_WTA_WTA)
+    #
+    # Returns mukey, sum of comppct, rating and areasymbol arrays for each map unit
+    #
+    vals = dArrays["value"]
+
+    if bZero:
+        vals = np.where(np.isnan(vals), 0.0, vals)
+
+    thick = UsableThickness(dArrays, top, bot)
+
+    with np.errstate(invalid="ignore"):
+        bUsed = ~np.isnan(vals) & (thick > 0)
+
+    rows = np.flatnonzero(bUsed)
+    pct = dArrays["comppct"]
+    coRows, coThick, coSum = ComponentSums(dArrays, rows, thick, thick[rows] * vals[rows] * pct[rows])
+    muStart, muCnt = MapunitRows(dArrays, coRows)
+    coPct = pct[coRows]
+
+    if len(muStart) > 0:
+        muPct = np.add.reduceat(coPct, muStart)
+
+    else:
+        muPct = np.zeros(0, dtype=np.float64)
+
+    divisor = np.repeat(muPct, muCnt) * coThick
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        coVal = np.where(divisor > 0, coSum / divisor, 0.0)
+
+    muVal = SegmentSum(coVal, muStart, muCnt)
+    muRows = coRows[muStart]
+
+    return dArrays["mukey"][muRows], muPct, muVal, dArrays["areasymbol"][muRows]
+
+## ===================================================================================
+def Hz_WTA_SUM(dArrays, top, bot, bZero):
+    # Sum of horizons, weighted average of components (AggregateHz_WTA_SUM, used for AWS)
+    #
+    # Returns mukey, sum of comppct, rating and areasymbol arrays for each map unit
+    #
+    vals = dArrays["value"]
+
+    if bZero:
+        vals = np.where(np.isnan(vals), 0.0, vals)
+
+    # The original loop treated a null HZDEPT_R as the top of the range
+    thick = UsableThickness(dArrays, top, bot, True)
+
+    with np.errstate(invalid="ignore"):
+        bUsed = ~np.isnan(vals) & (thick > 0)
+
+    rows = np.flatnonzero(bUsed)
+    pct = dArrays["comppct"]
+    coRows, coThick, coSum = ComponentSums(dArrays, rows, thick, thick[rows] * vals[rows])
+    muStart, muCnt = MapunitRows(dArrays, coRows)
+    coPct = pct[coRows]
+
+    if len(muStart) > 0:
+        muPct = np.add.reduceat(coPct, muStart)
+
+    else:
+        muPct = np.zeros(0, dtype=np.float64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        coVal = (coPct / np.repeat(muPct, muCnt)) * coSum
+
+    muVal = SegmentSum(coVal, muStart, muCnt)
+    muRows = coRows[muStart]
+
+    # Map units where every component is 0 percent are not rated
+    bRated = muPct > 0
+
+    return dArrays["mukey"][muRows][bRated], muPct[bRated], muVal[bRated], dArrays["areasymbol"][muRows][bRated]
+
+## ===================================================================================
+def Hz_MaxMin_WTA(dArrays, top, bot, bZero, bHigh):
+    # Weighted average of horizons, then the highest (bHigh) or lowest component rating
+    # for each map unit. Ties go to the component with the higher comppct. (AggregateHz_MaxMin_WTA)
+    #
+    # Returns mukey, comppct of the selected component, rating and areasymbol arrays
+    #
+    vals = dArrays["value"]
+
+    if bZero:
+        vals = np.where(np.isnan(vals), 0.0, vals)
+
+    thick = UsableThickness(dArrays, top, bot)
+
+    with np.errstate(invalid="ignore"):
+        bUsed = ~np.isnan(vals) & (thick > 0)
+
+    rows = np.flatnonzero(bUsed)
+    coRows, coThick, coSum = ComponentSums(dArrays, rows, thick, thick[rows] * vals[rows])
+    coVal = coSum / coThick
+    coPct = dArrays["comppct"][coRows]
+    coMu = dArrays["mu"][coRows]
+
+    if bHigh:
+        order = np.lexsort((-coPct, -coVal, coMu))
+
+    else:
+        order = np.lexsort((-coPct, coVal, coMu))
+
+    first = order[SegmentStarts(coMu[order])]
+    muRows = coRows[first]
+
+    return dArrays["mukey"][muRows], coPct[first], coVal[first], dArrays["areasymbol"][muRows]
+
+## ===================================================================================
+def Hz_DCP_WTA(dArrays, top, bot, bHigh):
+    # Weighted average of horizons for the dominant component (AggregateHz_DCP_WTA)
+    #
+    # Every component that shares the highest comppct for the map unit is rated and the
+    # tiebreaker picks the highest (bHigh) or lowest rating. Null values are not converted
+    # to zero. Map units without any rated dominant component get a NaN rating.
+    #
+    # Returns mukey, dominant comppct, rating and areasymbol arrays for every map unit
+    #
+    pct = dArrays["comppct"]
+    muStart = SegmentStarts(dArrays["mu"])
+    muCnt = SegmentCounts(muStart, len(pct))
+    muPct = pct[muStart]
+    bDominant = pct >= np.repeat(muPct, muCnt)
+    vals = dArrays["value"]
+    thick = UsableThickness(dArrays, top, bot)
+    rows = np.flatnonzero(bDominant & ~np.isnan(vals) & ~np.isnan(thick))
+
+    coStart = SegmentStarts(dArrays["co"][rows])
+    coCnt = SegmentCounts(coStart, len(rows))
+    coThick = SegmentScanClamped(thick[rows], coStart, coCnt)
+    coSum = SegmentScanClamped(thick[rows] * vals[rows], coStart, coCnt)
+    coRows = rows[coStart]
+    bRated = coThick > 0
+    coVal = coSum[bRated] / coThick[bRated]
+    coMu = dArrays["mu"][coRows][bRated]
+
+    # Pick one component rating for each map unit using the tiebreaker
+    if bHigh:
+        order = np.lexsort((-coVal, coMu))
+
+    else:
+        order = np.lexsort((coVal, coMu))
+
+    first = order[SegmentStarts(coMu[order])]
+    muVal = np.empty(len(muStart), dtype=np.float64)
+    muVal[:] = np.nan
+    muVal[np.searchsorted(dArrays["mu"][muStart], coMu[first])] = coVal[first]
+
+    return dArrays["mukey"][muStart], muPct, muVal, dArrays["areasymbol"][muStart]
+
+## ===================================================================================
+def RangeThickness(dArrays, depthRanges, bTopDefault=False):
+    # Usable thickness of each horizon in every depth range. One column per range.
+    # Null depths return NaN. With bTopDefault, a null HZDEPT_R is treated as the top of each range.
+    tops = np.array([float(rng[0]) for rng in depthRanges])
+    bots = np.array([float(rng[1]) for rng in depthRanges])
+    hzdept = dArrays["hzdept"]
+
+    if bTopDefault:
+        hzdept = np.where(np.isnan(hzdept), -np.inf, hzdept)
+
+    return np.minimum(dArrays["hzdepb"][:, None], bots) - np.maximum(hzdept[:, None], tops)
+
+## ===================================================================================
+def EmptyRanges(dArrays, rangeCnt):
+    # Range kernel results when there are no horizon rows
+    empty = np.zeros((0, rangeCnt), dtype=np.float64)
+    return dArrays["mukey"][0:0], empty, empty.copy(), dArrays["areasymbol"][0:0]
+
+## ===================================================================================
+def RangeSums(dArrays, bUsed, thick, weights):
+    # Reduce horizons to components for all depth ranges at once.
+    #
+    # Every horizon row is kept. Rows that are not used in a range add 0 to that column, which
+    # leaves each sum exactly the same as a sum over the used rows.
+    #
+    # Returns the first horizon row of each component, a flag for components with at least one
+    # used horizon, the usable thickness and the sum of 'weights'.
+    #
+    coStart = SegmentStarts(dArrays["co"])
+    coCnt = SegmentCounts(coStart, len(dArrays["co"]))
+    coUsed = np.add.reduceat(bUsed.astype(np.int64), coStart, axis=0) > 0
+    coThick = np.add.reduceat(np.where(bUsed, thick, 0.0), coStart, axis=0)
+    coSum = SegmentSum(weights, coStart, coCnt)
+
+    return coStart, coUsed, coThick, coSum
+
+## ===================================================================================
+def FirstByRange(keys, muStart):
+    # For each map unit and depth range, the component row that sorts first.
+    # keys are 2-D sort keys (component x range), primary key last, the same as np.lexsort.
+    # The primary key must be the map unit, so each map unit keeps its own run of rows.
+    order = np.lexsort(keys, axis=0)
+    return order[muStart, :]
+
+## ===================================================================================
+def HzRanges_WTA_WTA(dArrays, depthRanges, bZero):
+    # Hz_WTA_WTA for a list of (top, bot) depth ranges in one pass over the horizons
+    #
+    # Returns mukey, sum of comppct, rating and areasymbol arrays. Sum of comppct and rating
+    # have one column per depth range and are NaN where the map unit is not rated in that range.
+    #
+    if len(dArrays["mu"]) == 0:
+        return EmptyRanges(dArrays, len(depthRanges))
+
+    vals = dArrays["value"]
+
+    if bZero:
+        vals = np.where(np.isnan(vals), 0.0, vals)
+
+    thick = RangeThickness(dArrays, depthRanges)
+    pct = dArrays["comppct"]
+
+    with np.errstate(invalid="ignore"):
+        bUsed = ~np.isnan(vals)[:, None] & (thick > 0)
+        weights = np.where(bUsed, thick * vals[:, None] * pct[:, None], 0.0)
+
+    coRows, coUsed, coThick, coSum = RangeSums(dArrays, bUsed, thick, weights)
+    muStart, muCnt = MapunitRows(dArrays, coRows)
+    muUsed = np.add.reduceat(coUsed.astype(np.int64), muStart, axis=0) > 0
+    muPct = np.add.reduceat(np.where(coUsed, pct[coRows][:, None], 0.0), muStart, axis=0)
+    divisor = np.repeat(muPct, muCnt, axis=0) * coThick
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        coVal = np.where(divisor > 0, coSum / divisor, 0.0)
+
+    muVal = SegmentSum(coVal, muStart, muCnt)
+    muRows = coRows[muStart]
+
+    return dArrays["mukey"][muRows], np.where(muUsed, muPct, np.nan), np.where(muUsed, muVal, np.nan), dArrays["areasymbol"][muRows]
+
+## ===================================================================================
+def HzRanges_WTA_SUM(dArrays, depthRanges, bZero):
+    # Hz_WTA_SUM for a list of (top, bot) depth ranges in one pass over the horizons
+    #
+    # Returns the same arrays as HzRanges_WTA_WTA
+    #
+    if len(dArrays["mu"]) == 0:
+        return EmptyRanges(dArrays, len(depthRanges))
+
+    vals = dArrays["value"]
+
+    if bZero:
+        vals = np.where(np.isnan(vals), 0.0, vals)
+
+    thick = RangeThickness(dArrays, depthRanges, True)
+    pct = dArrays["comppct"]
+
+    with np.errstate(invalid="ignore"):
+        bUsed = ~np.isnan(vals)[:, None] & (thick > 0)
+        weights = np.where(bUsed, thick * vals[:, None], 0.0)
+
+    coRows, coUsed, coThick, coSum = RangeSums(dArrays, bUsed, thick, weights)
+    muStart, muCnt = MapunitRows(dArrays, coRows)
+    muPct = np.add.reduceat(np.where(coUsed, pct[coRows][:, None], 0.0), muStart, axis=0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        coVal = np.where(coUsed, (pct[coRows][:, None] / np.repeat(muPct, muCnt, axis=0)) * coSum, 0.0)
+
+    muVal = SegmentSum(coVal, muStart, muCnt)
+    muRows = coRows[muStart]
+
+    # Map units where every component is 0 percent are not rated
+    bRated = muPct > 0
+
+    return dArrays["mukey"][muRows], np.where(bRated, muPct, np.nan), np.where(bRated, muVal, np.nan), dArrays["areasymbol"][muRows]
+
+## ===================================================================================
+def HzRanges_MaxMin_WTA(dArrays, depthRanges, bZero, bHigh):
+    # Hz_MaxMin_WTA for a list of (top, bot) depth ranges in one pass over the horizons
+    #
+    # Returns mukey, comppct of the selected component, rating and areasymbol arrays.
+    # Comppct and rating have one column per depth range.
+    #
+    if len(dArrays["mu"]) == 0:
+        return EmptyRanges(dArrays, len(depthRanges))
+
+    vals = dArrays["value"]
+
+    if bZero:
+        vals = np.where(np.isnan(vals), 0.0, vals)
+
+    thick = RangeThickness(dArrays, depthRanges)
+
+    with np.errstate(invalid="ignore"):
+        bUsed = ~np.isnan(vals)[:, None] & (thick > 0)
+        weights = np.where(bUsed, thick * vals[:, None], 0.0)
+
+    coRows, coUsed, coThick, coSum = RangeSums(dArrays, bUsed, thick, weights)
+    muStart, muCnt = MapunitRows(dArrays, coRows)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        coVal = np.where(coUsed, coSum / coThick, np.nan)
+
+    coPct = np.repeat(dArrays["comppct"][coRows][:, None], len(depthRanges), axis=1)
+    coMu = np.repeat(dArrays["mu"][coRows][:, None], len(depthRanges), axis=1)
+
+    # Components without a rating for a range sort after the rated ones
+    if bHigh:
+        first = FirstByRange((-coPct, np.where(coUsed, -coVal, np.inf), coMu), muStart)
+
+    else:
+        first = FirstByRange((-coPct, np.where(coUsed, coVal, np.inf), coMu), muStart)
+
+    cols = np.arange(len(depthRanges))
+    muUsed = coUsed[first, cols]
+    muRows = coRows[muStart]
+
+    return dArrays["mukey"][muRows], np.where(muUsed, coPct[first, cols], np.nan), np.where(muUsed, coVal[first, cols], np.nan), dArrays["areasymbol"][muRows]
+
+## ===================================================================================
+def HzRanges_DCP_WTA(dArrays, depthRanges, bHigh):
+    # Hz_DCP_WTA for a list of (top, bot) depth ranges in one pass over the horizons
+    #
+    # Every map unit is returned, with the dominant comppct in every column. The rating is NaN
+    # where no dominant component is rated in that range.
+    #
+    if len(dArrays["mu"]) == 0:
+        return EmptyRanges(dArrays, len(depthRanges))
+
+    rangeCnt = len(depthRanges)
+    pct = dArrays["comppct"]
+    muStart = SegmentStarts(dArrays["mu"])
+    muCnt = SegmentCounts(muStart, len(pct))
+    muPct = pct[muStart]
+    bDominant = pct >= np.repeat(muPct, muCnt)
+    vals = dArrays["value"]
+
+    # The selected rows do not depend on the depth range. Only the thickness does.
+    rows = np.flatnonzero(bDominant & ~np.isnan(vals) & ~np.isnan(dArrays["hzdept"]) & ~np.isnan(dArrays["hzdepb"]))
+    muVal = np.empty((len(muStart), rangeCnt), dtype=np.float64)
+    muVal[:] = np.nan
+
+    if len(rows) > 0:
+        thick = RangeThickness(dArrays, depthRanges)[rows]
+        coStart = SegmentStarts(dArrays["co"][rows])
+        coCnt = SegmentCounts(coStart, len(rows))
+        coThick = SegmentScanClamped(thick, coStart, coCnt)
+        coSum = SegmentScanClamped(thick * vals[rows][:, None], coStart, coCnt)
+        bRated = coThick > 0
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            coVal = np.where(bRated, coSum / coThick, np.nan)
+
+        coMu = dArrays["mu"][rows[coStart]]
+        coMuStart = SegmentStarts(coMu)
+        coMu2 = np.repeat(coMu[:, None], rangeCnt, axis=1)
+
+        # Pick one component rating for each map unit using the tiebreaker
+        if bHigh:
+            first = FirstByRange((np.where(bRated, -coVal, np.inf), coMu2), coMuStart)
+
+        else:
+            first = FirstByRange((np.where(bRated, coVal, np.inf), coMu2), coMuStart)
+
+        cols = np.arange(rangeCnt)
+        muVal[np.searchsorted(dArrays["mu"][muStart], coMu[coMuStart]), :] = coVal[first, cols]
+
+    return dArrays["mukey"][muStart], np.repeat(muPct[:, None], rangeCnt, axis=1), muVal, dArrays["areasymbol"][muStart]
+
+## ===================================================================================
+def RefHz_WTA_WTA(rows, top, bot, bZero):
+    # Original AggregateHz_WTA_WTA loop, without the table I/O. Used by the benchmark.
+    dPct = dict()
+    dComp = collections.OrderedDict()
+    dMu = dict()
+
+    for rec in rows:
+        mukey, cokey, comppct, hzdept, hzdepb, val, areasym = rec
+
+        if val is None and bZero:
+            val = 0
+
+        if val is not None and hzdept is not None and hzdepb is not None:
+            hzT = min(hzdepb, bot) - max(hzdept, top)
+
+            if hzT > 0:
+                aws = float(hzT) * val * comppct
+
+                if not cokey in dComp:
+                    dComp[cokey] = [mukey, comppct, hzT, aws, areasym]
+
+                    try:
+                        dPct[mukey] = dPct[mukey] + comppct
+
+                    except:
+                        dPct[mukey] = comppct
+
+                else:
+                    mukey, comppct, dHzT, dAWS, areasym = dComp[cokey]
+                    dComp[cokey] = [mukey, comppct, dHzT + hzT, dAWS + aws, areasym]
+
+    for cokey, vals in dComp.items():
+        mukey, comppct, hzT, cval, areasym = vals
+        sumPct = dPct[mukey]
+        divisor = sumPct * hzT
+
+        if divisor > 0:
+            newval = float(cval) / divisor
+
+        else:
+            newval = 0.0
+
+        if mukey in dMu:
+            pct, mval, areasym = dMu[mukey]
+            newval = newval + mval
+
+        dMu[mukey] = [sumPct, newval, areasym]
+
+    return dMu
+
+## ===================================================================================
+def RefHz_WTA_SUM(rows, top, bot, bZero):
+    # Original AggregateHz_WTA_SUM loop, without the table I/O. Used by the benchmark.
+    dPct = dict()
+    dComp = collections.OrderedDict()
+    dMu = dict()
+
+    for rec in rows:
+        mukey, cokey, comppct, hzdept, hzdepb, val, areasym = rec
+
+        if val is None and bZero:
+            val = 0
+
+        if val is not None:
+            try:
+                hzT = min(hzdepb, bot) - max(hzdept, top)
+
+            except:
+                hzT = 0
+
+            if hzT > 0:
+                aws = float(hzT) * val
+
+                if not cokey in dComp:
+                    dComp[cokey] = [mukey, comppct, hzT, aws, areasym]
+
+                    try:
+                        dPct[mukey] = dPct[mukey] + comppct
+
+                    except:
+                        dPct[mukey] = comppct
+
+                else:
+                    mukey, comppct, dHzT, dAWS, areasym = dComp[cokey]
+                    dComp[cokey] = [mukey, comppct, dHzT + hzT, dAWS + aws, areasym]
+
+    for cokey, dRec in dComp.items():
+        mukey, comppct, hzT, val, areasym = dRec
+        sumCompPct = float(dPct.get(mukey, 0))
+
+        if sumCompPct > 0:
+            aws = (float(comppct) / sumCompPct) * val
+
+            if mukey in dMu:
+                val1, val3, areasym = dMu[mukey]
+                aws = aws + val3
+
+            dMu[mukey] = [sumCompPct, aws, areasym]
+
+    return dMu
+
+## ===================================================================================
+def RefHz_MaxMin_WTA(rows, top, bot, bZero, bHigh):
+    # Original AggregateHz_MaxMin_WTA loop, without the table I/O. Used by the benchmark.
+    dComp = collections.OrderedDict()
+    dMu = dict()
+
+    for rec in rows:
+        mukey, cokey, comppct, hzdept, hzdepb, val, areasym = rec
+
+        if val is None and bZero:
+            val = 0
+
+        if val is not None and hzdept is not None and hzdepb is not None:
+            hzT = min(hzdepb, bot) - max(hzdept, top)
+
+            if hzT > 0:
+                rating = float(hzT) * val
+
+                if not cokey in dComp:
+                    dComp[cokey] = [mukey, comppct, hzT, rating, areasym]
+
+                else:
+                    mukey, comppct, dHzT, dRating, areasym = dComp[cokey]
+                    dComp[cokey] = [mukey, comppct, dHzT + hzT, dRating + rating, areasym]
+
+    for cokey, vals in dComp.items():
+        mukey, comppct, hzT, cval, areasym = vals
+        dMu.setdefault(mukey, list()).append([comppct, cval / hzT, areasym])
+
+    for mukey, muVals in dMu.items():
+        pct, val, areasym = sorted(sorted(muVals, key = lambda x : x[0], reverse=True), key = lambda x : x[1], reverse=bHigh)[0]
+        dMu[mukey] = [pct, val, areasym]
+
+    return dMu
+
+## ===================================================================================
+def RefHz_DCP_WTA(rows, top, bot, bHigh):
+    # Original AggregateHz_DCP_WTA loop, without the table I/O. Used by the benchmark.
+    dPct = dict()
+    dHorizon = dict()
+    dCompList = dict()
+    dMu = dict()
+
+    for rec in rows:
+        mukey, cokey, comppct, hzdept, hzdepb, val, areasym = rec
+
+        if not cokey in dHorizon:
+            if not mukey in dPct:
+                dCompList[mukey] = [cokey]
+                dPct[mukey] = comppct
+
+                if val is not None and hzdept is not None and hzdepb is not None:
+                    hzT = min(hzdepb, bot) - max(hzdept, top)
+                    dHorizon[cokey] = [mukey, comppct, hzT, float(hzT) * val, areasym]
+
+            elif comppct >= dPct[mukey]:
+                dCompList[mukey].append(cokey)
+
+                if val is not None and hzdept is not None and hzdepb is not None:
+                    hzT = min(hzdepb, bot) - max(hzdept, top)
+                    dHorizon[cokey] = [mukey, comppct, hzT, float(hzT) * val, areasym]
+
+                else:
+                    dHorizon[cokey] = [mukey, comppct, None, None, areasym]
+
+        elif val is not None and hzdept is not None and hzdepb is not None:
+            mukey, comppct, dHzT, dAWS, areasym = dHorizon[cokey]
+            hzT = min(hzdepb, bot) - max(hzdept, top)
+            dHorizon[cokey] = [mukey, comppct, max(0, dHzT) + hzT, max(0, dAWS) + float(hzT) * val, areasym]
+
+    for mukey, cokeys in dCompList.items():
+        valList = list()
+
+        for cokey in cokeys:
+            if cokey in dHorizon:
+                hzT, cval = dHorizon[cokey][2:4]
+
+                if not cval is None and hzT > 0:
+                    valList.append(float(cval) / hzT)
+
+        if len(valList):
+            valList.sort(reverse=bHigh)
+            dMu[mukey] = [dPct[mukey], valList[0], None]
+
+        else:
+            dMu[mukey] = [dPct[mukey], None, None]
+
+    return dMu
+
+## ===================================================================================
+def CreateTestRows(muCnt, seed=1):
+    # Synthetic initial query table rows in the cursor order used by the AggregateHz functions:
+    # MUKEY ASC, COMPPCT_R DESC, HZDEPT_R ASC
+    random.seed(seed)
+    rows = list()
+
+    for m in range(muCnt):
+        mukey = str(100000 + m)
+        areasym = "XX" + str(m % 200).zfill(3)
+        pctLeft = 100
+        comps = list()
+
+        for c in range(random.randint(1, 6)):
+            comppct = min(pctLeft, random.choice([5, 10, 15, 20, 25, 30, 40, 50, 60, 85]))
+            pctLeft -= comppct
+            comps.append((comppct, mukey + str(c).zfill(2)))
+
+        comps.sort(key = lambda x : x[0], reverse=True)
+
+        for comppct, cokey in comps:
+            hzdept = 0
+            horizons = list()
+
+            for h in range(random.randint(1, 7)):
+                hzdepb = hzdept + random.choice([5, 10, 15, 20, 28, 35, 50])
+                val = round(random.uniform(0.0, 0.3), 2)
+
+                if random.random() < 0.05:
+                    val = None
+
+                top = hzdept
+                bot = hzdepb
+
+                if random.random() < 0.01:
+                    top = None
+
+                horizons.append([mukey, cokey, comppct, top, bot, val, areasym])
+                hzdept = hzdepb
+
+            # null HZDEPT_R first
+            horizons.sort(key = lambda x : (not x[3] is None, x[3]))
+            rows.extend(horizons)
+
+    return rows
+
+## ===================================================================================
+def CompareResults(title, dRef, muKeys, muPct, muVal, precision, refTime, arrayTime):
+    # Compare the rounded map unit ratings from the original loop and the array kernel
+    dArray = dict()
+
+    for i in range(len(muKeys)):
+        dArray[muKeys[i]] = muVal[i]
+
+    diffCnt = 0
+    maxDiff = 0.0
+
+    for mukey, vals in dRef.items():
+        refVal = vals[1]
+        arrayVal = dArray.get(mukey, None)
+
+        if not arrayVal is None and np.isnan(arrayVal):
+            arrayVal = None
+
+        if refVal is None or arrayVal is None:
+            if not (refVal is None and arrayVal is None):
+                diffCnt += 1
+
+            continue
+
+        maxDiff = max(maxDiff, abs(refVal - arrayVal))
+
+        if round(refVal, precision) != round(float(arrayVal), precision):
+            diffCnt += 1
+
+    diffCnt += len(set(dArray.keys()) - set(dRef.keys()))
+    print "%-16s %9d map units  loops %7.3fs  arrays %7.3fs  %6.1fx  rounded mismatches %d  max diff %.2e" % \
+          (title, len(dRef), refTime, arrayTime, refTime / max(arrayTime, 1e-6), diffCnt, maxDiff)
+
+    return diffCnt
+
+## ===================================================================================
+def Benchmark(muCnt, top=0, bot=100, precision=2):
+    # Run the original loops and the array kernels on the same synthetic rows
+    rows = CreateTestRows(muCnt)
+    print "Synthetic initial table: " + str(len(rows)) + " horizon rows, depth range " + str(top) + " - " + str(bot) + "cm"
+
+    cols = zip(*rows)
+    t0 = time.time()
+    dArrays = HorizonArrays(cols[0], cols[1], cols[2], cols[3], cols[4], cols[5], cols[6])
+    print "Array load and sort: %.3fs" % (time.time() - t0)
+
+    # Rows that pass the "attribute IS NOT NULL" where clause used when bZero is False
+    dataRows = [rec for rec in rows if not rec[5] is None]
+    cols = zip(*dataRows)
+    dDataArrays = HorizonArrays(cols[0], cols[1], cols[2], cols[3], cols[4], cols[5], cols[6])
+    diffCnt = 0
+
+    for title, refFunc, arrayFunc, args, bAll in [ \
+        ("WTA_WTA", RefHz_WTA_WTA, Hz_WTA_WTA, (top, bot, False), False), \
+        ("WTA_WTA zero", RefHz_WTA_WTA, Hz_WTA_WTA, (top, bot, True), True), \
+        ("WTA_SUM", RefHz_WTA_SUM, Hz_WTA_SUM, (top, bot, False), False), \
+        ("WTA_SUM zero", RefHz_WTA_SUM, Hz_WTA_SUM, (top, bot, True), True), \
+        ("MaxMin_WTA high", RefHz_MaxMin_WTA, Hz_MaxMin_WTA, (top, bot, False, True), False), \
+        ("MaxMin_WTA low", RefHz_MaxMin_WTA, Hz_MaxMin_WTA, (top, bot, False, False), False), \
+        ("DCP_WTA high", RefHz_DCP_WTA, Hz_DCP_WTA, (top, bot, True), True), \
+        ("DCP_WTA low", RefHz_DCP_WTA, Hz_DCP_WTA, (top, bot, False), True)]:
+
+        if bAll:
+            inputRows = rows
+            inputArrays = dArrays
+
+        else:
+            inputRows = dataRows
+            inputArrays = dDataArrays
+
+        t0 = time.time()
+        dRef = refFunc(inputRows, *args)
+        refTime = time.time() - t0
+
+        t0 = time.time()
+        muKeys, muPct, muVal, muAreasym = arrayFunc(inputArrays, *args)
+        arrayTime = time.time() - t0
+
+        diffCnt += CompareResults(title, dRef, muKeys.tolist(), muPct, muVal, precision, refTime, arrayTime)
+
+    return diffCnt
+
+## ===================================================================================
+def BenchmarkRanges(muCnt, depthRanges):
+    # Compare the depth range kernels with one run of the single range kernel per range.
+    # Every rating and comppct must match exactly.
+    #
+    # Each single range map loads and sorts the horizon arrays again, so the times include
+    # building the arrays: once per range for the single range kernels, once for the pass.
+    rows = CreateTestRows(muCnt)
+    print " \nDepth ranges: " + ", ".join([str(top) + "-" + str(bot) for top, bot in depthRanges])
+    cols = zip(*rows)
+    diffCnt = 0
+
+    for title, singleFunc, rangeFunc, args in [ \
+        ("WTA_WTA", Hz_WTA_WTA, HzRanges_WTA_WTA, (True,)), \
+        ("WTA_SUM", Hz_WTA_SUM, HzRanges_WTA_SUM, (True,)), \
+        ("MaxMin_WTA high", Hz_MaxMin_WTA, HzRanges_MaxMin_WTA, (True, True)), \
+        ("MaxMin_WTA low", Hz_MaxMin_WTA, HzRanges_MaxMin_WTA, (True, False)), \
+        ("DCP_WTA high", Hz_DCP_WTA, HzRanges_DCP_WTA, (True,)), \
+        ("DCP_WTA low", Hz_DCP_WTA, HzRanges_DCP_WTA, (False,))]:
+
+        t0 = time.time()
+        singleResults = list()
+
+        for top, bot in depthRanges:
+            dArrays = HorizonArrays(cols[0], cols[1], cols[2], cols[3], cols[4], cols[5], cols[6])
+            singleResults.append(singleFunc(dArrays, top, bot, *args))
+
+        singleTime = time.time() - t0
+
+        t0 = time.time()
+        dArrays = HorizonArrays(cols[0], cols[1], cols[2], cols[3], cols[4], cols[5], cols[6])
+        muKeys, muPct, muVal, muAreasym = rangeFunc(dArrays, depthRanges, *args)
+        rangeTime = time.time() - t0
+
+        mismatches = 0
+        dRow = dict()
+
+        for i in range(len(muKeys)):
+            dRow[muKeys[i]] = i
+
+        for j in range(len(depthRanges)):
+            sKeys, sPct, sVal, sAreasym = singleResults[j]
+            bRated = ~np.isnan(muPct[:, j])
+            mismatches += abs(int(bRated.sum()) - len(sKeys))
+
+            for i in range(len(sKeys)):
+                r = dRow.get(sKeys[i], None)
+
+                if r is None or not bRated[r] or muPct[r, j] != sPct[i]:
+                    mismatches += 1
+
+                elif not (muVal[r, j] == sVal[i] or (np.isnan(muVal[r, j]) and np.isnan(sVal[i]))):
+                    mismatches += 1
+
+        print "%-16s %d ranges  one map per range %7.3fs  one pass %7.3fs  %5.1fx  mismatches %d" % \
+              (title, len(depthRanges), singleTime, rangeTime, singleTime / max(rangeTime, 1e-6), mismatches)
+        diffCnt += mismatches
+
+    return diffCnt
+
+## ===================================================================================
+## ===================================================================================
+## MAIN
+## ===================================================================================
+
+# Import system modules
+import sys, os, time, random, traceback, collections
+import numpy as np
+
+try:
+    import arcpy
+    import gSSURGO_JoinStream
+
+except ImportError:
+    # arcpy is only needed to read the initial query table. The benchmark runs without it.
+    arcpy = None
+
+if __name__ == "__main__":
+    # Standalone benchmark
+    muCnt = 50000
+
+    if len(sys.argv) > 1:
+        muCnt = int(sys.argv[1])
+
+    Benchmark(muCnt)
+    BenchmarkRanges(muCnt, [(0, 5), (5, 15), (15, 30), (30, 60), (60, 100), (100, 200)])
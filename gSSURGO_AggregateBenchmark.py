@@ -0,0 +1,450 @@
+# gSSURGO_AggregateBenchmark.py
+#
+# Steve Peaslee, National Soil Survey Center
+#
+# Purpose:  Speed and equivalence check for the gSSURGO_CreateSoilMap aggregation methods
+#
+# gSSURGO_AggregateArrays, gSSURGO_MonthArrays and gSSURGO_DomainCodes each have a small benchmark
+# that compares their kernels with the original python loops on one data set. This script runs all of
+# them the same way, on synthetic map unit / component / horizon / month data at several sizes.
+#
+# Each aggregation method has one or more backends. A backend is three functions:
+#
+#   read        build the backend input from the synthetic rows (the cursor rows for the loops,
+#               the sorted arrays for the kernels)
+#   aggregate   rate the map units
+#   write       put the result into output records [mukey, comppct, rating], the same for every backend
+#
+# The first backend ('loop', the original python code) is the reference. Every other backend must give
+# the same output records. A new implementation of a method is added as another backend in Methods().
+#
+# The records for each method and size can also be checked against golden results saved by an earlier
+# run (an MD5 of the sorted records), so that a change to the loops themselves is caught as well:
+#
+#     python gSSURGO_AggregateBenchmark.py [-save golden.json | -golden golden.json] [mapunit count ...]
+#
+# For each backend the script prints the time for each phase, input rows per second for the aggregate
+# phase and the peak memory of the process (when it can be measured). It exits with the number of
+# mismatches, so it can be run from a batch file.
+#
+# 2017-11-10
+
+## ===================================================================================
+class MyError(Exception):
+    pass
+
+## ===================================================================================
+def PeakMemoryMB():
+    # Peak memory of this process in megabytes, or None if it cannot be measured here
+    try:
+        import psutil
+        meminfo = psutil.Process(os.getpid()).memory_info()
+        return getattr(meminfo, "peak_wset", meminfo.rss) / 1048576.0
+
+    except:
+        pass
+
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        if sys.platform == "darwin":
+            # bytes on OS X, kilobytes on linux
+            return peak / 1048576.0
+
+        return peak / 1024.0
+
+    except:
+        return None
+
+## ===================================================================================
+def Normalize(val, places):
+    # Rating value for comparison. NaN is None, floats are rounded.
+    if val is None:
+        return None
+
+    if isinstance(val, (float, np.floating)):
+        if np.isnan(val):
+            return None
+
+        return round(float(val), places)
+
+    if isinstance(val, np.integer):
+        return int(val)
+
+    return val
+
+## ===================================================================================
+def Records(dResult, places, bPct=True):
+    # Sorted output records from a {mukey:[comppct, rating]} dictionary
+    recs = list()
+
+    for mukey, vals in dResult.items():
+        if bPct:
+            recs.append([str(mukey), Normalize(vals[0], 4), Normalize(vals[1], places)])
+
+        else:
+            recs.append([str(mukey), None, Normalize(vals[1], places)])
+
+    recs.sort()
+    return recs
+
+## ===================================================================================
+def Digest(recs):
+    # MD5 of the output records, for the golden results file
+    return hashlib.md5(json.dumps(recs)).hexdigest()
+
+## ===================================================================================
+def HorizonData(muCnt):
+    # Synthetic horizon rows (gSSURGO_AggregateArrays.CreateTestRows) and the rows that pass the
+    # 'attribute IS NOT NULL' where clause
+    rows = gSSURGO_AggregateArrays.CreateTestRows(muCnt)
+    return {"all":rows, "notnull":[rec for rec in rows if not rec[5] is None]}
+
+## ===================================================================================
+def MonthData(muCnt):
+    # Synthetic component-month rows (gSSURGO_MonthArrays.CreateMonthRows)
+    return {"all":gSSURGO_MonthArrays.CreateMonthRows(muCnt, domainValues)}
+
+## ===================================================================================
+def ComponentData(muCnt):
+    # Synthetic component rows with a class rating (gSSURGO_DomainCodes.CreateRows)
+    return {"all":gSSURGO_DomainCodes.CreateRows(muCnt, [None] + domainValues)}
+
+## ===================================================================================
+def HorizonBackends(name, refFunc, kernel, rowSet, args):
+    # loop and arrays backends for a gSSURGO_AggregateArrays method. The horizon benchmark has
+    # always compared only the rounded rating.
+    def ReadArrays(dData):
+        cols = zip(*dData[rowSet])
+        return gSSURGO_AggregateArrays.HorizonArrays(cols[0], cols[1], cols[2], cols[3], cols[4], cols[5], cols[6])
+
+    def WriteArrays(result):
+        muKeys, muPct, muVal, muAreasym = result
+        return Records(dict(zip(muKeys.tolist(), zip(muPct, muVal))), 2, False)
+
+    return {"name":name, "data":"horizon", "backends":[ \
+        ("loop", lambda dData : dData[rowSet], lambda rows : refFunc(rows, *args), lambda dMu : Records(dMu, 2, False)), \
+        ("arrays", ReadArrays, lambda dArrays : kernel(dArrays, *args), WriteArrays)]}
+
+## ===================================================================================
+def RangeBackends(name, refFunc, kernel, rowSet, args):
+    # loop and arrays backends for a gSSURGO_AggregateArrays depth range method. The loop runs once
+    # for each of the depthRanges, the kernel does all of them in one pass. The records are keyed
+    # on mukey:range number.
+    def RunLoop(rows):
+        dMu = dict()
+
+        for j in range(len(depthRanges)):
+            top, bot = depthRanges[j]
+
+            for mukey, vals in refFunc(rows, top, bot, *args).items():
+                dMu[str(mukey) + ":" + str(j)] = vals
+
+        return dMu
+
+    def ReadArrays(dData):
+        cols = zip(*dData[rowSet])
+        return gSSURGO_AggregateArrays.HorizonArrays(cols[0], cols[1], cols[2], cols[3], cols[4], cols[5], cols[6])
+
+    def WriteArrays(result):
+        muKeys, muPct, muVal, muAreasym = result
+        dMu = dict()
+
+        for j in range(len(depthRanges)):
+            for i in range(len(muKeys)):
+                # A map unit that is not rated in a range has no record for it
+                if not np.isnan(muPct[i, j]):
+                    dMu[str(muKeys[i]) + ":" + str(j)] = [muPct[i, j], muVal[i, j]]
+
+        return Records(dMu, 2, False)
+
+    return {"name":name, "data":"horizon", "backends":[ \
+        ("loop", lambda dData : dData[rowSet], RunLoop, lambda dMu : Records(dMu, 2, False)), \
+        ("arrays", ReadArrays, lambda dArrays : kernel(dArrays, depthRanges, *args), WriteArrays)]}
+
+## ===================================================================================
+def MonthBackends(name, refFunc, kernel, bHigh, bDomain):
+    # loop and arrays backends for a gSSURGO_MonthArrays method, for one month window.
+    # Both backends read the rows the MONTHSEQ query would put in the initial table. As in
+    # CreateSoilMap without month windows, the kernel rates all 12 columns of those rows.
+    windowCols = gSSURGO_MonthArrays.WindowColumns(monthWindow[0], monthWindow[1])
+
+    if bDomain:
+        valIdx = 5
+
+    else:
+        valIdx = 4
+
+    def ReadArrays(dData):
+        cols = zip(*gSSURGO_MonthArrays.WindowRows(dData["all"], windowCols, valIdx, False))
+        comppct = np.array(cols[2], dtype=np.float64)
+        monthseq = np.array(cols[3], dtype=np.float64)
+
+        if bDomain:
+            return gSSURGO_MonthArrays.MonthArrays(cols[0], cols[1], comppct, monthseq, cols[4], cols[5], dMonthCodes)
+
+        return gSSURGO_MonthArrays.MonthArrays(cols[0], cols[1], comppct, monthseq, cols[4], cols[5], None, True)
+
+    def Aggregate(dMonths):
+        return dMonths, kernel(dMonths, [range(12)], bHigh)
+
+    def WriteArrays(result):
+        dMonths, kernelResult = result
+        dMu = dict()
+
+        if name.startswith("Mo_MaxMin"):
+            muKeys, muVal, muValPct, muRatedPct, muAreasym = kernelResult
+
+            for i in range(len(muKeys)):
+                if np.isnan(muVal[i, 0]) or (bHigh and muVal[i, 0] <= 0) or not bHigh:
+                    # The original loop only reports a low rating below nullRating (None)
+                    dMu[muKeys[i]] = [muRatedPct[i, 0], None]
+
+                else:
+                    dMu[muKeys[i]] = [muValPct[i, 0], gSSURGO_MonthArrays.Decode(dMonths, muVal[i, 0])]
+
+            return Records(dMu, 6)
+
+        muKeys, muPct, muVal, muAreasym = kernelResult
+
+        for i in range(len(muKeys)):
+            if np.isnan(muPct[i, 0]):
+                if not bDomain:
+                    dMu[muKeys[i]] = [None, None]
+
+            elif name.startswith("Mo_WTA"):
+                # A weighted average is not decoded to the integer rating
+                dMu[muKeys[i]] = [muPct[i, 0], muVal[i, 0]]
+
+            else:
+                dMu[muKeys[i]] = [muPct[i, 0], gSSURGO_MonthArrays.Decode(dMonths, muVal[i, 0])]
+
+        return Records(dMu, 6)
+
+    return {"name":name, "data":"month", "backends":[ \
+        ("loop", lambda dData : gSSURGO_MonthArrays.WindowRows(dData["all"], windowCols, valIdx, bDomain), refFunc, lambda dMu : Records(dMu, 6)), \
+        ("arrays", ReadArrays, Aggregate, WriteArrays)]}
+
+## ===================================================================================
+def DomainBackends(name, bHigh):
+    # loop and coded domain backends for AggregateCo_DCD_Domain (gSSURGO_DomainCodes)
+    if bHigh:
+        values = [None] + domainValues
+
+    else:
+        values = domainValues + [None]
+
+    dValues = dict()
+
+    for i in range(len(values)):
+        dValues[str(values[i]).upper()] = [i, values[i]]
+
+    def ReadCodes(dData):
+        rows = dData["all"]
+        dDomain = gSSURGO_DomainCodes.DomainCodes(list(values))
+        codes, added, fixed = gSSURGO_DomainCodes.EncodeRatings(dDomain, [rec[3] for rec in rows])
+        return dDomain, [rec[0] for rec in rows], [rec[1] for rec in rows], [rec[2] for rec in rows], codes
+
+    def Aggregate(data):
+        dDomain, mukeys, cokeys, comppct, codes = data
+        return dDomain, gSSURGO_DomainCodes.MapunitRatings(mukeys, cokeys, comppct, codes, dDomain["rank"][bHigh])
+
+    def WriteCodes(result):
+        dDomain, muRatings = result
+        dMu = dict()
+
+        for mukey, compPct, code in muRatings:
+            dMu[mukey] = [compPct, gSSURGO_DomainCodes.DomainKey(dDomain["values"][code])]
+
+        return Records(dMu, 6)
+
+    def WriteLoop(dResult):
+        # The coded domain keeps the case of the component data, the loop the domain case
+        dMu = dict()
+
+        for mukey, vals in dResult.items():
+            dMu[mukey] = [vals[0], gSSURGO_DomainCodes.DomainKey(vals[1])]
+
+        return Records(dMu, 6)
+
+    return {"name":name, "data":"component", "backends":[ \
+        ("loop", lambda dData : dData["all"], lambda rows : gSSURGO_DomainCodes.RefDominantCondition(rows, dValues, list(values), bHigh), WriteLoop), \
+        ("codes", ReadCodes, Aggregate, WriteCodes)]}
+
+## ===================================================================================
+def Methods():
+    # Aggregation methods and their backends. The first backend is the reference.
+    aa = gSSURGO_AggregateArrays
+    ma = gSSURGO_MonthArrays
+    methods = list()
+
+    methods.append(HorizonBackends("Hz_WTA_WTA", aa.RefHz_WTA_WTA, aa.Hz_WTA_WTA, "notnull", (0, 100, False)))
+    methods.append(HorizonBackends("Hz_WTA_WTA zero", aa.RefHz_WTA_WTA, aa.Hz_WTA_WTA, "all", (0, 100, True)))
+    methods.append(HorizonBackends("Hz_WTA_SUM", aa.RefHz_WTA_SUM, aa.Hz_WTA_SUM, "notnull", (0, 100, False)))
+    methods.append(HorizonBackends("Hz_WTA_SUM zero", aa.RefHz_WTA_SUM, aa.Hz_WTA_SUM, "all", (0, 100, True)))
+    methods.append(HorizonBackends("Hz_MaxMin_WTA high", aa.RefHz_MaxMin_WTA, aa.Hz_MaxMin_WTA, "notnull", (0, 100, False, True)))
+    methods.append(HorizonBackends("Hz_MaxMin_WTA low", aa.RefHz_MaxMin_WTA, aa.Hz_MaxMin_WTA, "notnull", (0, 100, False, False)))
+    methods.append(HorizonBackends("Hz_DCP_WTA high", aa.RefHz_DCP_WTA, aa.Hz_DCP_WTA, "all", (0, 100, True)))
+    methods.append(HorizonBackends("Hz_DCP_WTA low", aa.RefHz_DCP_WTA, aa.Hz_DCP_WTA, "all", (0, 100, False)))
+    methods.append(RangeBackends("HzRanges_WTA_WTA", aa.RefHz_WTA_WTA, aa.HzRanges_WTA_WTA, "notnull", (False,)))
+    methods.append(RangeBackends("HzRanges_WTA_SUM zero", aa.RefHz_WTA_SUM, aa.HzRanges_WTA_SUM, "all", (True,)))
+    methods.append(RangeBackends("HzRanges_MaxMin high", aa.RefHz_MaxMin_WTA, aa.HzRanges_MaxMin_WTA, "notnull", (False, True)))
+    methods.append(RangeBackends("HzRanges_DCP_WTA low", aa.RefHz_DCP_WTA, aa.HzRanges_DCP_WTA, "all", (False,)))
+
+    for title, bHigh in [("high", True), ("low", False)]:
+        methods.append(MonthBackends("Mo_MaxMin " + title, lambda r, bHigh=bHigh : ma.RefMo_MaxMin(r, bHigh, None), ma.Mo_MaxMin, bHigh, False))
+        methods.append(MonthBackends("Mo_DCD " + title, lambda r, bHigh=bHigh : ma.RefMo_DCD(r, bHigh), ma.Mo_DCD, bHigh, False))
+        methods.append(MonthBackends("Mo_WTA " + title, lambda r, bHigh=bHigh : ma.RefMo_WTA(r, bHigh), ma.Mo_WTA, bHigh, False))
+        methods.append(MonthBackends("Mo_DCP_Domain " + title, lambda r, bHigh=bHigh : ma.RefMo_Domain(r, bHigh, dMonthCodes, False), ma.Mo_DCP_Domain, bHigh, True))
+        methods.append(MonthBackends("Mo_DCD_Domain " + title, lambda r, bHigh=bHigh : ma.RefMo_Domain(r, bHigh, dMonthCodes, True), ma.Mo_DCD_Domain, bHigh, True))
+
+    methods.append(DomainBackends("DCD_Domain high", True))
+    methods.append(DomainBackends("DCD_Domain low", False))
+
+    return methods
+
+## ===================================================================================
+def RunBackend(backend, dData):
+    # Run the three phases of one backend. Returns the output records and the phase times.
+    name, readFunc, aggFunc, writeFunc = backend
+
+    t0 = time.time()
+    data = readFunc(dData)
+    t1 = time.time()
+    result = aggFunc(data)
+    t2 = time.time()
+    recs = writeFunc(result)
+    t3 = time.time()
+
+    return recs, [t1 - t0, t2 - t1, t3 - t2]
+
+## ===================================================================================
+def CompareRecords(refRecs, recs):
+    # Number of map units whose output records are different or missing
+    dRef = dict([(rec[0], rec) for rec in refRecs])
+    dRecs = dict([(rec[0], rec) for rec in recs])
+    diffCnt = len(set(dRef.keys()) ^ set(dRecs.keys()))
+
+    for mukey, rec in dRef.items():
+        if mukey in dRecs and dRecs[mukey] != rec:
+            diffCnt += 1
+
+    return diffCnt
+
+## ===================================================================================
+def Benchmark(muCounts, dGolden=None, goldenFile=None):
+    # Run every method and backend for each map unit count. Returns the number of mismatches.
+    #
+    # dGolden has the saved digests keyed on "method|mapunit count". When goldenFile is given,
+    # the reference digests from this run are saved to it instead.
+    #
+    dataFuncs = {"horizon":HorizonData, "month":MonthData, "component":ComponentData}
+    methods = Methods()
+    dSaved = dict()
+    diffCnt = 0
+
+    for muCnt in muCounts:
+        print " \n%d map units" % muCnt
+        print "%-22s %-7s %9s %8s %8s %8s %12s %9s %s" % ("method", "backend", "rows", "read", "agg", "write", "agg rows/s", "peak MB", "check")
+
+        for dataName in ["horizon", "month", "component"]:
+            t0 = time.time()
+            dData = dataFuncs[dataName](muCnt)
+            rowCnt = len(dData["all"])
+            print "%-22s %9d rows created in %.2fs" % (dataName, rowCnt, time.time() - t0)
+
+            for method in [m for m in methods if m["data"] == dataName]:
+                refRecs = None
+                key = method["name"] + "|" + str(muCnt)
+
+                for backend in method["backends"]:
+                    recs, times = RunBackend(backend, dData)
+                    peak = PeakMemoryMB()
+
+                    if refRecs is None:
+                        refRecs = recs
+                        digest = Digest(recs)
+                        dSaved[key] = digest
+
+                        if dGolden is None or not key in dGolden:
+                            check = "reference"
+
+                        elif dGolden[key] == digest:
+                            check = "golden ok"
+
+                        else:
+                            check = "GOLDEN MISMATCH"
+                            diffCnt += 1
+
+                    else:
+                        mismatches = CompareRecords(refRecs, recs)
+                        diffCnt += mismatches
+
+                        if mismatches == 0:
+                            check = "ok"
+
+                        else:
+                            check = "%d MISMATCHES" % mismatches
+
+                    if peak is None:
+                        peakStr = "n/a"
+
+                    else:
+                        peakStr = "%.1f" % peak
+
+                    print "%-22s %-7s %9d %8.3f %8.3f %8.3f %12.0f %9s %s" % (method["name"], backend[0], rowCnt, \
+                    times[0], times[1], times[2], rowCnt / max(times[1], 1e-6), peakStr, check)
+
+            del dData
+
+    if not goldenFile is None:
+        with open(goldenFile, "w") as fh:
+            json.dump(dSaved, fh, indent=1, sort_keys=True)
+
+        print " \nSaved golden results to " + goldenFile
+
+    print " \nTotal mismatches: %d" % diffCnt
+    return diffCnt
+
+## ===================================================================================
+## MAIN
+## ===================================================================================
+
+# Import system modules
+import sys, os, time, json, hashlib
+import numpy as np
+import gSSURGO_AggregateArrays, gSSURGO_MonthArrays, gSSURGO_DomainCodes
+
+# Class ratings used for the month and component data
+domainValues = ["None", "Very rare", "Rare", "Occasional", "Frequent", "Very frequent"]
+dMonthCodes = dict([(domainValues[i].upper(), i) for i in range(len(domainValues))])
+
+# Month window (MONTHSEQ) for the month methods
+monthWindow = (4, 9)
+
+# Depth ranges (cm) for the depth range methods
+depthRanges = [(0, 5), (5, 15), (0, 25), (25, 50), (0, 100)]
+
+if __name__ == "__main__":
+    # Standalone benchmark
+    args = sys.argv[1:]
+    dGolden = None
+    goldenFile = None
+
+    if len(args) > 1 and args[0].lower() == "-golden":
+        with open(args[1]) as fh:
+            dGolden = json.load(fh)
+
+        args = args[2:]
+
+    elif len(args) > 1 and args[0].lower() == "-save":
+        goldenFile = args[1]
+        args = args[2:]
+
+    muCounts = [int(arg) for arg in args]
+
+    if len(muCounts) == 0:
+        muCounts = [1000, 10000, 50000]
+
+    sys.exit(Benchmark(muCounts, dGolden, goldenFile))
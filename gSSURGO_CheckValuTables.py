@@ -10,6 +10,10 @@
 # In the 2015 data, there were no valid map units missing from Norm's subset version of the VALU1 table.
 # There are 63 map units (including NOTCOMs) that have NO component data at all.
 #
+# 2017-11-10. CompareTables reads each table into a numeric array and matches the rows on mukey with
+# a dictionary, so the tables can be in any order. A hash of each row, rounded to the field tolerances,
+# picks out the rows that may differ; only those are compared field by field. Added, removed and
+# changed map units are saved to text files and the changes for each field are summarized.
 #
 ## ===================================================================================
 class MyError(Exception):
@@ -65,195 +69,198 @@ def Number_Format(num, places=0, bCommas=True):
         return False
 
 ## ===================================================================================
-def CompareTables(input_1, input_2, diffTbl, aFields):
-
-    try:
-        # All processing involves sorting both tables on mukey to keep them in sync as
-        # much as possible.
-
-        iRec = 0
-
-        if arcpy.Exists(diffTbl):
-            arcpy.Delete_management(diffTbl)
-
-        # End of cleanup
-
-        # Field list for cursors, includes mukey and numeric fields
-        qFields = ["mukey"]
-        qFields.extend(aFields)
-        idx = len(aFields)
-        noneList = len(aFields) * [None]   # use for records with no data
-
-        iCnt1 = int(arcpy.GetCount_management(input_1).getOutput(0))
-        PrintMsg(" \nThe first table contains " + Number_Format(iCnt1, 0, True) + " map unit records", 0)
-
-        QueryTable_2 = "QueryTable_2"
-        arcpy.MakeQueryTable_management(input_2, QueryTable_2, "ADD_VIRTUAL_KEY_FIELD", "", qFields, "OBJECTID = 1")
-        iCnt2 = int(arcpy.GetCount_management(input_2).getOutput(0))
-        PrintMsg(" \nThe second table contains " + Number_Format(iCnt2, 0, True) + " map unit records", 0)
-
-        PrintMsg(" \nReading input tables...", 0)
-        muOrder1 = list()
-        data1 = dict()
-        arcpy.SetProgressor("step", "Reading data from first table (" + os.path.basename(input_1) + ")...", 0, iCnt1, 1)
-
-        with arcpy.da.SearchCursor(input_1, qFields) as mucur:
-            for rec in mucur:
-                newrec = list(rec)
-                mukey = newrec[0]
-                newrec.pop(0)
-                muOrder1.append(int(mukey))
-                data1[mukey] = newrec
-                arcpy.SetProgressorPosition()
+def ReadValues(inputTbl, qFields):
+    # Read a valu table into a list of mukeys and an array of the numeric fields (one row per map unit).
+    # Null values are NaN.
+    #
+    iCnt = int(arcpy.GetCount_management(inputTbl).getOutput(0))
+    arcpy.SetProgressor("step", "Reading data from " + os.path.basename(inputTbl) + "...", 0, iCnt, 1)
+    keys = list()
+    rows = list()
 
-        muOrder2 = list()
-        data2 = dict()
-        arcpy.SetProgressor("step", "Reading data from second table (" + os.path.basename(input_2) + ")...", 0, iCnt2, 1)
-
-        with arcpy.da.SearchCursor(input_2, qFields) as mucur:
-            for rec in mucur:
-                newrec = list(rec)
-                mukey = newrec[0]
-                newrec.pop(0)
-                muOrder2.append(int(mukey))
-                data2[mukey] = newrec
-                arcpy.SetProgressorPosition()
+    with arcpy.da.SearchCursor(inputTbl, qFields) as mucur:
+        for rec in mucur:
+            keys.append(rec[0])
+            rows.append(rec[1:])
+            arcpy.SetProgressorPosition()
 
-        # Get mapunit keys for those common to both tables
-        muCommon = list(set(muOrder1).intersection(muOrder2))
-        muCommon.sort()
-        iCommon = len(muCommon)
+    values = np.array(rows, dtype=np.float64).reshape(len(rows), len(qFields) - 1)
 
-        # Get mapunit keys for those records that are in the second table but not the second
-        muDiff = list(set(muOrder2).difference(muCommon))
+    return keys, values
 
-        if len(muDiff) > 0:
-            muDiff.sort()
-            muDiff2 = list()
-            for mukey in muDiff:
-                muDiff2.append(str(mukey))
+## ===================================================================================
+def FieldTolerances(aFields):
+    # Tolerance for each compared field (dFieldTol, defaultTol)
+    tolList = list()
 
-            PrintMsg(" \nThere are " + Number_Format(len(muDiff), 0, True) + " mapunits in the second table that have no match in the first:", 1)
-            #PrintMsg(" \n(" + str(muDiff2)[1:-1] + ") \n ", 0)
+    for fld in aFields:
+        tol = defaultTol
 
-            # Save data issues to permanent files for later review
-            # output folder will be set to the location of the 'new' table
-            inputDB = os.path.dirname(input_2)
+        for prefix, fldTol in dFieldTol.items():
+            if fld.lower().startswith(prefix):
+                tol = fldTol
 
-            if len(muDiff2) > 0:
-                fileCo = os.path.basename(inputDB)[:-4] + "_MissingMapunits.txt"
-                fileCo = os.path.join(os.path.dirname(inputDB), fileCo)
-                fh = open(fileCo, "w")
-                fh.write(inputDB + "\n")
-                fh.write("Map units in the " + os.path.basename(input_2) + " table with no matching MUKEY in " + os.path.basename(input_2) + " table \n\n")
-                fh.write("MUKEY IN ('" + "', '".join(muDiff2) + "') \n")
-                fh.close()
-                PrintMsg(" \nMap units missing (" + Number_Format(len(muDiff2), 0, True) + ") from the first table saved to:\t" + fileCo, 0)
+        tolList.append(tol)
 
+    return np.array(tolList, dtype=np.float64)
 
-        else:
-            PrintMsg(" \nAll mapunits in the second table will be compared")
+## ===================================================================================
+def RowHashes(values, tols):
+    # 64-bit hash of each row. Each value is rounded to a multiple of its column tolerance and
+    # the column values are combined with fixed odd multipliers. Rows with the same hash are the
+    # same within the tolerances; rows with different hashes are checked column by column.
+    with np.errstate(invalid="ignore"):
+        q = np.floor(values / tols + 0.5)
 
-        if iCommon > 0:
-            arcpy.SetProgressor("step", "Saving differences to " + os.path.basename(diffTbl) + "...",  0, iCommon, 1)
-            arcpy.CreateTable_management(os.path.dirname(diffTbl), os.path.basename(diffTbl), QueryTable_2)
-            arcpy.Delete_management(QueryTable_2)
-            PrintMsg(" \nCalculating differences for " + Number_Format(iCommon, 0, True) + " common mapunits", 0)
+    q[np.isnan(q)] = -2.0 ** 62   # null
+    mult = np.random.RandomState(147).randint(1, 2 ** 62, size=values.shape[1]).astype(np.uint64) | np.uint64(1)
 
-            # initialize list to contain sum of differences
-            sumList = list()
-            for i in range(len(qFields) - 1):
-                sumList.append(0)
+    return (q.astype(np.int64).view(np.uint64) * mult).sum(axis=1, dtype=np.uint64)
 
-            with arcpy.da.InsertCursor(diffTbl, qFields) as dfcur:
-                arcpy.SetProgressor("step", "Saving calculated differences to " + os.path.basename(diffTbl), 0, iCommon, 1)
+## ===================================================================================
+def DiffValues(keys1, values1, keys2, values2, tols):
+    # Match the two tables on mukey (any row order) and find the map units that were removed
+    # (first table only), added (second table only) or changed by more than the column tolerance.
+    # Returns a dictionary with the key lists, the row numbers of the common map units and, for each
+    # column, the number of changed map units and the largest and mean absolute change.
+    #
+    dRow2 = dict(zip(keys2, range(len(keys2))))
+    dRow1 = dict(zip(keys1, range(len(keys1))))
+    common = sorted([mukey for mukey in dRow1 if mukey in dRow2], key=int)
+    removed = sorted([mukey for mukey in dRow1 if not mukey in dRow2], key=int)
+    added = sorted([mukey for mukey in dRow2 if not mukey in dRow1], key=int)
+
+    idx1 = np.array([dRow1[mukey] for mukey in common], dtype=np.int64)
+    idx2 = np.array([dRow2[mukey] for mukey in common], dtype=np.int64)
+    a1 = values1[idx1]
+    a2 = values2[idx2]
+
+    # Only rows with different hashes can have a change larger than the tolerance
+    cand = np.nonzero(RowHashes(a1, tols) != RowHashes(a2, tols))[0]
+    c1 = a1[cand]
+    c2 = a2[cand]
+    absDiff = np.absolute(c1 - c2)
+
+    with np.errstate(invalid="ignore"):
+        colChanged = (absDiff > tols) | (np.isnan(c1) != np.isnan(c2))
+
+    rowChanged = colChanged.any(axis=1)
+    changed = [common[i] for i in cand[rowChanged]]
+
+    absDiff[np.isnan(absDiff)] = 0.0
+    absDiff[~colChanged] = 0.0
+    colCnt = colChanged.sum(axis=0)
+    colMax = absDiff.max(axis=0) if len(cand) > 0 else np.zeros(len(tols))
+    colMean = absDiff.sum(axis=0) / np.maximum(colCnt, 1)
+
+    return {"common":common, "removed":removed, "added":added, "changed":changed, "idx1":idx1, "idx2":idx2, \
+            "colCnt":colCnt, "colMax":colMax, "colMean":colMean}
 
-                for mukey in muCommon:
-                    rec1 = data1[str(mukey)]
-                    rec2 = data2[str(mukey)]
+## ===================================================================================
+def PercentDifference(values1, values2):
+    # Difference as a percentage of the first table, rounded to whole numbers. Nulls are 0
+    # and a difference that cannot be divided by the first value is 0.
+    with np.errstate(invalid="ignore", divide="ignore"):
+        array1 = np.rint(np.nan_to_num(values1))
+        array2 = np.rint(np.nan_to_num(values2))
+        pct = np.rint(np.absolute((array1 - array2) / array1) * 100.0)
 
-                    for i in range(idx):
-                        if rec1[i] is None:
-                            rec1[i] = 0
+    pct[~np.isfinite(pct)] = 0
 
-                        if rec2[i] is None:
-                            rec2[i] = 0
+    return pct
 
-                    # Problem where maxArray values are small and diffArray values are less than one.
-                    # Returns an artificially large percentage due to roundoff differences
+## ===================================================================================
+def SaveKeys(inputTbl, mukeys, suffix, title):
+    # Save a list of map units to a text file next to the geodatabase of inputTbl
+    inputDB = os.path.dirname(inputTbl)
+    fileMu = os.path.basename(inputDB)[:-4] + suffix
+    fileMu = os.path.join(os.path.dirname(inputDB), fileMu)
+    fh = open(fileMu, "w")
+    fh.write(inputDB + "\n")
+    fh.write(title + " \n\n")
+    fh.write("MUKEY IN ('" + "', '".join(mukeys) + "') \n")
+    fh.close()
+
+    return fileMu
 
-                    # Trying to figure out why 3 mapunits in WV come up with a negative difference
-                    # of twice the orinal values instead of zero
+## ===================================================================================
+def CompareTables(input_1, input_2, diffTbl, aFields):
+    # Compare the numeric fields of two valu tables. The tables are matched on mukey, so
+    # they can be in any order. Map units that changed by more than the field tolerance
+    # (FieldTolerances) are reported, and the percent difference for every map unit common to
+    # both tables is saved to diffTbl.
 
-                    array1 = np.rint(np.array(rec1))
-                    array2 = np.rint(np.array(rec2))
+    try:
+        if arcpy.Exists(diffTbl):
+            arcpy.Delete_management(diffTbl)
 
-                    #diffArray = np.rint(array1) - np.rint(array2)  # Difference rounded up to integer
-                    diffArray = array1 - array2
+        # End of cleanup
 
-                    #if mukey == 0:
-                    #    PrintMsg(" \nREC1" + str(mukey) + ": " + str(rec1), 1)
-                    #    PrintMsg(" \nREC2" + str(mukey) + ": " + str(rec2), 1)
-                    #    PrintMsg(" \n" + str(mukey) + ": " + str(array1), 1)
-                    #    PrintMsg(" \n" + str(mukey) + ": " + str(array2), 1)
-                    #    PrintMsg(" \nDIFF:    " + ": " + str(array2), 1)
+        # Field list for cursors, includes mukey and numeric fields
+        qFields = ["mukey"]
+        qFields.extend(aFields)
 
-                    diffArray2 = np.absolute(np.divide(diffArray, array1))               # Divide difference by first table
-                    rec3 = np.rint(np.multiply(diffArray2, 100.0))                   #
-                    newrec = [mukey]
+        QueryTable_2 = "QueryTable_2"
+        arcpy.MakeQueryTable_management(input_2, QueryTable_2, "ADD_VIRTUAL_KEY_FIELD", "", qFields, "OBJECTID = 1")
 
-                    for val in rec3:
-                        # Round off floats and write integer values to final output table table
-                        #newrec.append(round(val, 0))
-                        if str(val) in ['nan', 'inf']:
-                            val = 0
+        PrintMsg(" \nReading input tables...", 0)
+        keys1, values1 = ReadValues(input_1, qFields)
+        PrintMsg(" \nThe first table contains " + Number_Format(len(keys1), 0, True) + " map unit records", 0)
+        keys2, values2 = ReadValues(input_2, qFields)
+        PrintMsg(" \nThe second table contains " + Number_Format(len(keys2), 0, True) + " map unit records", 0)
 
-                        newrec.append(val)
+        tols = FieldTolerances(aFields)
+        dDiff = DiffValues(keys1, values1, keys2, values2, tols)
+        iCommon = len(dDiff["common"])
 
-                    #PrintMsg("Rec: " + str(newrec), 1)
-                    dfcur.insertRow(newrec) # add record to final output table
+        if len(dDiff["added"]) > 0:
+            PrintMsg(" \nThere are " + Number_Format(len(dDiff["added"]), 0, True) + " mapunits in the second table that have no match in the first:", 1)
 
-                    arcpy.SetProgressorPosition()
+            # Save data issues to permanent files for later review
+            # output folder will be set to the location of the 'new' table
+            fileMu = SaveKeys(input_2, dDiff["added"], "_MissingMapunits.txt", "Map units in the " + os.path.basename(input_2) + " table with no matching MUKEY in " + os.path.basename(input_1) + " table")
+            PrintMsg(" \nMap units missing (" + Number_Format(len(dDiff["added"]), 0, True) + ") from the first table saved to:\t" + fileMu, 0)
 
-            PrintMsg(" \nFinished calculating differences...", 0)
-            PrintMsg("Output table: " + diffTbl + " \n ", 0)
+        else:
+            PrintMsg(" \nAll mapunits in the second table will be compared")
 
-            return True
+        if len(dDiff["removed"]) > 0:
+            fileMu = SaveKeys(input_2, dDiff["removed"], "_RemovedMapunits.txt", "Map units in the " + os.path.basename(input_1) + " table with no matching MUKEY in " + os.path.basename(input_2) + " table")
+            PrintMsg(" \nMap units missing (" + Number_Format(len(dDiff["removed"]), 0, True) + ") from the second table saved to:\t" + fileMu, 1)
 
-        else:
+        if iCommon == 0:
             raise MyError, "There are no map units common to both tables"
 
-        # Other statistics....
-        #
-        # numpy.mean(a, axis=None, dtype=None, out=None, keepdims=False)
+        PrintMsg(" \n" + Number_Format(len(dDiff["changed"]), 0, True) + " of " + Number_Format(iCommon, 0, True) + " common mapunits have changed", 0)
 
-        # numpy.std(a, axis=None, dtype=None, out=None, ddof=0, keepdims=False)
+        if len(dDiff["changed"]) > 0:
+            fileMu = SaveKeys(input_2, dDiff["changed"], "_ChangedMapunits.txt", "Map units with different values in the " + os.path.basename(input_1) + " and " + os.path.basename(input_2) + " tables")
+            PrintMsg("Changed map units saved to:\t" + fileMu, 0)
+            PrintMsg(" \n\t" + "Field".ljust(16) + "Tolerance".rjust(10) + "Changed".rjust(10) + "Mean".rjust(12) + "Max".rjust(12), 0)
 
-        # numpy.var(a, axis=None, dtype=None, out=None, ddof=0, keepdims=False)
+            for i, fld in enumerate(aFields):
+                if dDiff["colCnt"][i] > 0:
+                    PrintMsg("\t" + fld.ljust(16) + str(tols[i]).rjust(10) + Number_Format(dDiff["colCnt"][i], 0, True).rjust(10) + \
+                    Number_Format(dDiff["colMean"][i], 3, True).rjust(12) + Number_Format(dDiff["colMax"][i], 3, True).rjust(12), 0)
 
-        # numpy.amin(a, axis=None, out=None, keepdims=False)
+        arcpy.CreateTable_management(os.path.dirname(diffTbl), os.path.basename(diffTbl), QueryTable_2)
+        arcpy.Delete_management(QueryTable_2)
+        PrintMsg(" \nCalculating differences for " + Number_Format(iCommon, 0, True) + " common mapunits", 0)
 
-        # numpy.amax(a, axis=None, out=None, keepdims=False)
+        # Problem where maxArray values are small and diffArray values are less than one.
+        # Returns an artificially large percentage due to roundoff differences
+        pct = PercentDifference(values1[dDiff["idx1"]], values2[dDiff["idx2"]])
+        arcpy.SetProgressor("step", "Saving calculated differences to " + os.path.basename(diffTbl), 0, iCommon, 1)
 
-        # Try creating other types of arrays
-        # Mean
-        #meanArray = np.mean(oldArray, axis=0)
-        #PrintMsg(" \nMean array shape: " + str(meanArray.shape), 1)
-        #PrintMsg(" \nMean: " + str(meanArray), 1)
-
-        # Min
-        #minArray = np.amin(oldArray, axis=0)
-        #PrintMsg(" \nMin array shape: " + str(meanArray.shape), 1)
-        #PrintMsg(" \nMin: " + str(minArray), 1)
+        with arcpy.da.InsertCursor(diffTbl, qFields) as dfcur:
+            for i, mukey in enumerate(dDiff["common"]):
+                dfcur.insertRow([mukey] + pct[i].tolist())
+                arcpy.SetProgressorPosition()
 
-        # Max
-        #maxArray = np.amax(oldArray, axis=0)
-        #PrintMsg(" \nMin array shape: " + str(meanArray.shape), 1)
-        #PrintMsg(" \nMax: " + str(maxArray), 1)
+        PrintMsg(" \nFinished calculating differences...", 0)
+        PrintMsg("Output table: " + diffTbl + " \n ", 0)
 
-        # Range
-        #rngArray = np.subtract(maxArray, minArray)
-        #PrintMsg(" \nRange: " + str(rngArray), 1)
+        return True
 
     except MyError, e:
         # Example: raise MyError("this is an error message")
@@ -271,6 +278,12 @@ import os, sys, string, re, locale, arcpy, traceback, time
 from arcpy import env
 import numpy as np
 
+# Tolerance for each compared field when deciding if a map unit changed, by field name prefix.
+# The NCCPI fields are indexes from 0 to 1. The other fields (AWS, SOC, thickness, percent)
+# use defaultTol, so values that differ by less than a half unit are the same.
+dFieldTol = {"nccpi":0.001}
+defaultTol = 0.5
+
 input_1 = arcpy.GetParameterAsText(0)  # original valu1 table from FY2014
 input_2 = arcpy.GetParameterAsText(1)     # new valu2 table from ArcTool
 diffTbl = arcpy.GetParameterAsText(2)    # output table containing differences
@@ -0,0 +1,338 @@
+# gSSURGO_ComponentIndex.py
+#
+# Steve Peaslee, National Soil Survey Center
+#
+# Purpose:  Dominant component index for a gSSURGO database.
+#
+# The dominant component and dominant condition aggregation methods, GetDominantComponent.py and
+# SSURGO_SurfaceTextureDC.py all sorted the component data on MUKEY, COMPPCT_R DESC every time they
+# ran, just to find the components of each map unit in order of component percent.
+#
+# The SDV_ComponentIndex table holds that order once for the whole database. Each map unit has its
+# components listed from the highest to the lowest COMPPCT_R. Components with the same COMPPCT_R
+# are in COKEY DESC order, which is how GetDominantComponent has always broken ties.
+#
+#   MUKEY, COKEY, COMPPCT_R, MAJCOMPFLAG
+#   CORANK     1 for the first component of the map unit, 2 for the next ...
+#   DCPFLAG    'Yes' for every component that shares the highest COMPPCT_R in the map unit
+#
+# The index is versioned. The version is a hash of the SACATALOG survey areas and their SAVEREST
+# dates plus the number of COMPONENT records, and is saved in the SDV_IndexVersion table. If the
+# soil data has changed since the index was built, LoadIndex builds it again. SSURGO_Convert_to_Geodatabase
+# builds the index after a new database is created.
+#
+# 2017-11-02
+
+## ===================================================================================
+class MyError(Exception):
+    pass
+
+## ===================================================================================
+def PrintMsg(msg, severity=0):
+    # prints message to screen if run as a python script
+    # Adds tool message to the geoprocessor
+    #
+    #Split the message on \n first, so that if it's multiple lines, a GPMessage will be added for each line
+    try:
+        for string in msg.split('\n'):
+            #Add a geoprocessing message (in case this is run as a tool)
+            if severity == 0:
+                arcpy.AddMessage(string)
+
+            elif severity == 1:
+                arcpy.AddWarning(string)
+
+            elif severity == 2:
+                arcpy.AddMessage("    ")
+                arcpy.AddError(string)
+
+    except:
+        pass
+
+## ===================================================================================
+def errorMsg():
+    try:
+        tb = sys.exc_info()[2]
+        tbinfo = traceback.format_tb(tb)[0]
+        theMsg = tbinfo + "\n" + str(sys.exc_type)+ ": " + str(sys.exc_value)
+        PrintMsg(theMsg, 2)
+
+    except:
+        PrintMsg("Unhandled error in unHandledException method", 2)
+
+## ===================================================================================
+def DatabaseVersion(gdb):
+    # Version of the soil data in gdb. Changes when a survey area is added, removed or replaced
+    # (SACATALOG.SAVEREST) or when the number of components changes.
+    try:
+        saList = list()
+
+        with arcpy.da.SearchCursor(os.path.join(gdb, "sacatalog"), ["AREASYMBOL", "SAVEREST"]) as cur:
+            for rec in cur:
+                saList.append((str(rec[0]), str(rec[1])))
+
+        saList.sort()
+        coCnt = int(arcpy.GetCount_management(os.path.join(gdb, "component")).getOutput(0))
+
+        return hashlib.md5(repr((saList, coCnt))).hexdigest()
+
+    except:
+        errorMsg()
+        return ""
+
+## ===================================================================================
+def ReadVersion(gdb, indexName):
+    # Saved version of an index, or an empty string if the index has not been built
+    try:
+        verTbl = os.path.join(gdb, versionTable)
+
+        if not arcpy.Exists(verTbl):
+            return ""
+
+        with arcpy.da.SearchCursor(verTbl, ["INDEXNAME", "VERSION"]) as cur:
+            for rec in cur:
+                if rec[0] == indexName:
+                    return rec[1]
+
+        return ""
+
+    except:
+        errorMsg()
+        return ""
+
+## ===================================================================================
+def WriteVersion(gdb, indexName, version):
+    # Save the version of an index in the SDV_IndexVersion table
+    try:
+        verTbl = os.path.join(gdb, versionTable)
+
+        if not arcpy.Exists(verTbl):
+            arcpy.CreateTable_management(gdb, versionTable)
+            arcpy.AddField_management(verTbl, "INDEXNAME", "TEXT", "", "", 64)
+            arcpy.AddField_management(verTbl, "VERSION", "TEXT", "", "", 64)
+            arcpy.AddField_management(verTbl, "CREATED", "TEXT", "", "", 24)
+
+        created = time.strftime("%Y-%m-%d %H:%M:%S")
+
+        with arcpy.da.UpdateCursor(verTbl, ["INDEXNAME", "VERSION", "CREATED"]) as cur:
+            for rec in cur:
+                if rec[0] == indexName:
+                    cur.deleteRow()
+
+        with arcpy.da.InsertCursor(verTbl, ["INDEXNAME", "VERSION", "CREATED"]) as cur:
+            cur.insertRow([indexName, version, created])
+
+        return True
+
+    except:
+        errorMsg()
+        return False
+
+## ===================================================================================
+def SortComponents(coList):
+    # Order [mukey, cokey, comppct, majcompflag] records by MUKEY, COMPPCT_R DESC, COKEY DESC.
+    # A null COMPPCT_R sorts after every other component in the map unit.
+    coList.sort(key = lambda rec : rec[1], reverse=True)
+    coList.sort(key = lambda rec : (rec[0], rec[2] is None, -(rec[2] or 0)))
+    return coList
+
+## ===================================================================================
+def IndexRecords(dIndex):
+    # Index table records in map unit order:  mukey, cokey, comppct, majcompflag, corank, dcpflag
+    for mukey in sorted(dIndex.keys()):
+        coList = dIndex[mukey]
+        domPct = coList[0][1]
+        rank = 0
+
+        for cokey, comppct, majcompflag in coList:
+            rank += 1
+
+            if comppct == domPct:
+                dcpFlag = "Yes"
+
+            else:
+                dcpFlag = "No"
+
+            yield [mukey, cokey, comppct, majcompflag, rank, dcpFlag]
+
+## ===================================================================================
+def BuildIndex(gdb, version=None):
+    # Read the COMPONENT table, order the components of each map unit and save the
+    # SDV_ComponentIndex table. Returns the index dictionary (see LoadIndex).
+    #
+    try:
+        if version is None:
+            version = DatabaseVersion(gdb)
+
+        arcpy.SetProgressorLabel("Creating dominant component index")
+        coList = list()
+
+        with arcpy.da.SearchCursor(os.path.join(gdb, "component"), ["MUKEY", "COKEY", "COMPPCT_R", "MAJCOMPFLAG"]) as cur:
+            for rec in cur:
+                coList.append(list(rec))
+
+        dIndex = dict()
+
+        for mukey, cokey, comppct, majcompflag in SortComponents(coList):
+            try:
+                dIndex[mukey].append((cokey, comppct, majcompflag))
+
+            except KeyError:
+                dIndex[mukey] = [(cokey, comppct, majcompflag)]
+
+        del coList
+
+        try:
+            # Save the index with the database. If the database cannot be written to, the index
+            # is only kept in memory.
+            idxTbl = os.path.join(gdb, indexTable)
+
+            if arcpy.Exists(idxTbl):
+                arcpy.Delete_management(idxTbl)
+
+            arcpy.CreateTable_management(gdb, indexTable)
+            arcpy.AddField_management(idxTbl, "MUKEY", "TEXT", "", "", 30)
+            arcpy.AddField_management(idxTbl, "COKEY", "TEXT", "", "", 30)
+            arcpy.AddField_management(idxTbl, "COMPPCT_R", "SHORT")
+            arcpy.AddField_management(idxTbl, "MAJCOMPFLAG", "TEXT", "", "", 3)
+            arcpy.AddField_management(idxTbl, "CORANK", "SHORT")
+            arcpy.AddField_management(idxTbl, "DCPFLAG", "TEXT", "", "", 3)
+
+            with arcpy.da.InsertCursor(idxTbl, indexFields) as cur:
+                for rec in IndexRecords(dIndex):
+                    cur.insertRow(rec)
+
+            arcpy.AddIndex_management(idxTbl, "MUKEY", "Indx_CompIdxMukey")
+            WriteVersion(gdb, indexTable, version)
+
+        except:
+            PrintMsg("\tUnable to save " + indexTable + " in " + os.path.basename(gdb), 1)
+
+        dLoaded[gdb] = [version, dIndex]
+
+        return dIndex
+
+    except MyError, e:
+        PrintMsg(str(e), 2)
+        return None
+
+    except:
+        errorMsg()
+        return None
+
+## ===================================================================================
+def LoadIndex(gdb, bBuild=True):
+    # Dominant component index for gdb:  dictionary keyed on mukey with the list of
+    # (cokey, comppct, majcompflag) for each map unit, dominant component first.
+    #
+    # The index is read from SDV_ComponentIndex, or built again if it is missing or out of date
+    # (bBuild). Returns None if there is no current index.
+    #
+    try:
+        version = DatabaseVersion(gdb)
+
+        if version == "":
+            return None
+
+        if gdb in dLoaded and dLoaded[gdb][0] == version:
+            return dLoaded[gdb][1]
+
+        if ReadVersion(gdb, indexTable) != version:
+            if not bBuild:
+                return None
+
+            return BuildIndex(gdb, version)
+
+        dRank = dict()
+
+        with arcpy.da.SearchCursor(os.path.join(gdb, indexTable), ["MUKEY", "COKEY", "COMPPCT_R", "MAJCOMPFLAG", "CORANK"]) as cur:
+            for mukey, cokey, comppct, majcompflag, rank in cur:
+                try:
+                    dRank[mukey].append((rank, (cokey, comppct, majcompflag)))
+
+                except KeyError:
+                    dRank[mukey] = [(rank, (cokey, comppct, majcompflag))]
+
+        dIndex = dict()
+
+        for mukey, coList in dRank.iteritems():
+            # Records are normally read back in the order they were written
+            coList.sort(key = lambda rec : rec[0])
+            dIndex[mukey] = [rec[1] for rec in coList]
+
+        del dRank
+        dLoaded[gdb] = [version, dIndex]
+
+        return dIndex
+
+    except:
+        errorMsg()
+        return None
+
+## ===================================================================================
+def DominantComponent(dIndex, mukey):
+    # (cokey, comppct, majcompflag) for the dominant component of a map unit, or None
+    try:
+        return dIndex[mukey][0]
+
+    except (KeyError, IndexError):
+        return None
+
+## ===================================================================================
+def OrderRows(dIndex, rows, mukeyIdx, cokeyIdx):
+    # Put rows in MUKEY ASC, COMPPCT_R DESC order using the index instead of sorting them.
+    #
+    # Rows for the same component keep the order they were read in. Rows without a COKEY
+    # (map units without components) follow the components of their map unit.
+    #
+    # Returns None if a component is not in the index.
+    #
+    dRows = dict()
+    dNoComp = dict()
+
+    for row in rows:
+        cokey = row[cokeyIdx]
+
+        if cokey is None:
+            dNoComp.setdefault(row[mukeyIdx], list()).append(row)
+
+        else:
+            try:
+                dRows[cokey].append(row)
+
+            except KeyError:
+                dRows[cokey] = [row]
+
+    mukeys = set([row[0][mukeyIdx] for row in dRows.itervalues()])
+    mukeys.update(dNoComp.keys())
+    orderedRows = list()
+    found = 0
+
+    for mukey in sorted(mukeys):
+        for cokey, comppct, majcompflag in dIndex.get(mukey, []):
+            if cokey in dRows:
+                orderedRows.extend(dRows[cokey])
+                found += 1
+
+        if mukey in dNoComp:
+            orderedRows.extend(dNoComp[mukey])
+
+    if found != len(dRows):
+        # The rows have a component that is not in the index
+        return None
+
+    return orderedRows
+
+## ===================================================================================
+## MAIN
+## ===================================================================================
+
+# Import system modules
+import arcpy, sys, os, traceback, time, hashlib
+
+indexTable = "SDV_ComponentIndex"
+versionTable = "SDV_IndexVersion"
+indexFields = ["MUKEY", "COKEY", "COMPPCT_R", "MAJCOMPFLAG", "CORANK", "DCPFLAG"]
+
+# Index dictionaries already loaded in this process, keyed on database: [version, dIndex]
+dLoaded = dict()
@@ -128,33 +128,12 @@ def elapsedTime(start):
         errorMsg()
         return ""
 
-## ===================================================================================
-def get_random_color(pastel_factor = 0.5):
-    return [(x+pastel_factor)/(1.0+pastel_factor) for x in [random.uniform(0,1.0) for i in [1,2,3]]]
-
-## ===================================================================================
-def color_distance(c1,c2):
-    return sum([abs(x[0]-x[1]) for x in zip(c1,c2)])
-
 ## ===================================================================================
 def generate_new_color(existing_colors,pastel_factor = 0.5):
-    max_distance = None
-    best_color = None
-
-    for i in range(0,100):
-        color = get_random_color(pastel_factor = pastel_factor)
-        if not existing_colors:
-            return color
-
-        best_distance = min([color_distance(color,c) for c in existing_colors])
-
-        if not max_distance or best_distance > max_distance:
-            max_distance = best_distance
-            best_color = color
-
-        return best_color
-
-
+    # Next color of the distinct color sequence (gSSURGO_Palette) after existing_colors,
+    # as red, green, blue from 0 to 1
+    rgb = gSSURGO_Palette.DistinctColors(len(existing_colors) + 1, pastel_factor)[-1]
+    return [c / 255.0 for c in rgb[0:3]]
 
 
 def rand_hex_color(num=1):
@@ -190,60 +169,13 @@ def polylinear_gradient(colors, n):
   return gradient_dict
 
 
-def fact(n):
-  ''' Memoized factorial function '''
-  try:
-    return fact_cache[n]
-  except(KeyError):
-    if n == 1 or n == 0:
-      result = 1
-    else:
-      result = n*fact(n-1)
-    fact_cache[n] = result
-    return result
-
-
-def bernstein(t,n,i):
-  ''' Bernstein coefficient '''
-  binom = fact(n)/float(fact(i)*fact(n - i))
-  return binom*((1-t)**(n-i))*(t**i)
-
-
 def bezier_gradient(colors, n_out=100):
   ''' Returns a "bezier gradient" dictionary
       using a given list of colors as control
       points. Dictionary also contains control
-      colors/points. '''
-  # RGB vectors for each color, use as control points
-  RGB_list = [hex_to_RGB(color) for color in colors]
-  n = len(RGB_list) - 1
-
-  def bezier_interp(t):
-    ''' Define an interpolation function
-        for this specific curve'''
-    # List of all summands
-    summands = [
-      map(lambda x: int(bernstein(t,n,i)*x), c)
-      for i, c in enumerate(RGB_list)
-    ]
-    # Output color
-    out = [0,0,0]
-    # Add components of each summand together
-    for vector in summands:
-      for c in range(3):
-        out[c] += vector[c]
-
-    return out
-
-  gradient = [
-    bezier_interp(float(t)/(n_out-1))
-    for t in range(n_out)
-  ]
-  # Return all points requested for gradient
-  return {
-    "gradient": color_dict(gradient),
-    "control": color_dict(RGB_list)
-  }
+      colors/points. The binomial coefficients are
+      computed once for each curve (gSSURGO_Palette). '''
+  return gSSURGO_Palette.BezierGradient(colors, n_out)
 
 
 
@@ -7940,10 +7872,6 @@ def CreateSoilMap(inputLayer, sdvAtt, top, bot, mxd, df, num=1):
         global bVerbose
         bVerbose = False   # hard-coded boolean to print diagnostic messages
 
-        # Value cache is a global variable used for fact function which is called by ColorRamp
-        global fact_caches
-        fact_cache = {}
-
         # Get target gSSURGO database
         global fc, gdb, muDesc, outputTbl, outputValues, dataType
         muDesc = arcpy.Describe(inputLayer)
@@ -9275,6 +9203,7 @@ def UpdateSource(gdbinputLayer, sdvLayers, rusle2Tbl):
 import arcpy, sys, string, os, traceback, locale, time, operator, json
 import xml.etree.cElementTree as ET
 import random
+import gSSURGO_Palette
 
 # Create the environment
 from arcpy import env
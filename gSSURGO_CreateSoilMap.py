@@ -207,69 +207,14 @@ def elapsedTime(start):
         errorMsg()
         return ""
 
-## ===================================================================================
-def get_random_color(pastel_factor=0.5):
-    # Part of generate_random_color
-    try:
-        newColor = [int(255 *(x + pastel_factor)/(1.0 + pastel_factor)) for x in [random.uniform(0,1.0) for i in [1,2,3]]]
-
-        return newColor
-
-    except:
-        errorMsg()
-        return [0,0,0]
-
-## ===================================================================================
-def color_distance(c1,c2):
-    # Part of generate_random_color
-    return sum([abs(x[0] - x[1]) for x in zip(c1,c2)])
-
-## ===================================================================================
-def generate_new_color(existing_colors, pastel_factor=0.5):
-    # Part of generate_random_color
-    try:
-        #PrintMsg(" \nExisting colors: " + str(existing_colors) + "; PF: " + str(pastel_factor), 1)
-
-        max_distance = None
-        best_color = None
-
-        for i in range(0,100):
-            color = get_random_color(pastel_factor)
-
-
-            if not color in existing_colors:
-                color.append(255) # add transparency level
-                return color
-
-            best_distance = min([color_distance(color,c) for c in existing_colors])
-
-            if not max_distance or best_distance > max_distance:
-                max_distance = best_distance
-                best_color = color
-                best_color.append(255)
-
-            return best_color
-
-    except:
-        errorMsg()
-        return None
-
 ## ===================================================================================
 def rand_rgb_colors(num):
-    # Generate a random list of rgb values
-    # 2nd argument in generate_new_colors is the pastel factor. 0 to 1. Higher value -> more pastel.
+    # Generate a list of distinct rgb values (gSSURGO_Palette). The same number of values always
+    # gets the same colors.
+    # 2nd argument in DistinctColors is the pastel factor. 0 to 1. Higher value -> more pastel.
 
     try:
-        colors = []
-        # PrintMsg(" \nGenerating " + str(num - 1) + " new colors", 1)
-
-        for i in range(0, num):
-            newColor = generate_new_color(colors, 0.1)
-            colors.append(newColor)
-
-        # PrintMsg(" \nColors: " + str(colors), 1)
-
-        return colors
+        return gSSURGO_Palette.DistinctColors(num, 0.1)
 
     except:
         errorMsg()
@@ -294,63 +239,14 @@ def polylinear_gradient(colors, n):
 
   return gradient_dict
 
-## ===================================================================================
-def fact(n):
-  ''' Memoized factorial function '''
-  try:
-    return fact_cache[n]
-
-  except(KeyError):
-    if n == 1 or n == 0:
-      result = 1
-    else:
-      result = n*fact(n-1)
-
-    fact_cache[n] = result
-    return result
-
-## ===================================================================================
-def bernstein(t,n,i):
-  ''' Bernstein coefficient '''
-  binom = fact(n) / float(fact(i) * fact(n - i))
-  return binom *( (1-t)**(n-i)) * (t**i)
-
 ## ===================================================================================
 def bezier_gradient(colors, n_out=100):
   ''' Returns a "bezier gradient" dictionary
       using a given list of colors as control
       points. Dictionary also contains control
-      colors/points. '''
-  # RGB vectors for each color, use as control points
-  RGB_list = [hex_to_RGB(color) for color in colors]
-  n = len(RGB_list) - 1
-
-  def bezier_interp(t):
-    ''' Define an interpolation function
-        for this specific curve'''
-    # List of all summands
-    summands = [
-      map(lambda x: int(bernstein(t,n,i)*x), c)
-      for i, c in enumerate(RGB_list)
-    ]
-    # Output color
-    out = [ 0, 0, 0]
-    # Add components of each summand together
-    for vector in summands:
-      for c in range(3):
-        out[c] += vector[c]
-
-    return out
-
-  gradient = [
-    bezier_interp(float(t)/(n_out - 1))
-    for t in range(n_out)
-  ]
-  # Return all points requested for gradient
-  return {
-    "gradient": color_dict(gradient),
-    "control": color_dict(RGB_list)
-  }
+      colors/points. The binomial coefficients are
+      computed once for each curve (gSSURGO_Palette). '''
+  return gSSURGO_Palette.BezierGradient(colors, n_out)
 
 ## ===================================================================================
 def BadTable(tbl):
@@ -1173,10 +1069,11 @@ def CreateNumericLayer(sdvLyrFile, dLegend, outputValues, classBV, classBL):
         return None
 
 ## ===================================================================================
-def GetNumericLegend(outputValues):
+def GetNumericLegend(outputValues, outputTbl=None):
     #
     # For Raster layers only...
     # Create final class break values and labels that can be used to create legend
+    # outputTbl is the rating table, used for Quantile and NaturalBreaks legends (legendMethod).
     #
     # SDVATTRIBUTE Table notes:
     #
@@ -1256,26 +1153,23 @@ def GetNumericLegend(outputValues):
                 #PrintMsg(" \nSetting class break values and labels using outputValues: " + str(outputValues), 1)
                 classBV = list(outputValues)
                 classBL = list(outputValues)
+                minVal, maxVal = gSSURGO_LegendStats.ValueRange(outputValues)
 
-                if dSDV["effectivelogicaldatatype"].lower() == "float":
-                    minVal = min(outputValues)
-                    maxVal = max(outputValues)
-
-                elif dSDV["effectivelogicaldatatype"].lower() == "integer":
+                if dSDV["effectivelogicaldatatype"].lower() == "integer":
                     # Need to handle Null values
                     #PrintMsg(" \noutputValues: " + str(outputValues), 1)
-                    if len(outputValues) == 0:
+                    if minVal is None:
                         minVal = 0
                         maxVal = 0
 
                     else:
-                        minVal = int(max(min(outputValues), 0))
-                        maxVal = int(max(max(outputValues), 0))
+                        minVal = int(max(minVal, 0))
+                        maxVal = int(max(maxVal, 0))
 
-                else:
+                elif dSDV["effectivelogicaldatatype"].lower() != "float" and not minVal is None:
                     # Use this for an unknown range of numeric values
-                    minVal = max(min(outputValues), 0)
-                    maxVal = max(max(outputValues), 0)
+                    minVal = max(minVal, 0)
+                    maxVal = max(maxVal, 0)
 
                 if minVal is None:
                     minVal = 0
@@ -1308,6 +1202,19 @@ def GetNumericLegend(outputValues):
                         classBV = [minVal, minVal]
                         classBL = [str(minVal)]
 
+                    elif legendMethod != "EqualInterval":
+                        # Quantile or natural breaks from the ratings in the table
+                        classBreaks = gSSURGO_LegendStats.LegendBreaks(outputTbl, dSDV["resultcolumnname"], outputValues, legendMethod, int(dSDV["maplegendclasses"]))
+
+                        if dSDV["attributeprecision"] is None:
+                            classBV = [int(round(val, 0)) for val in classBreaks[1:-1]]
+
+                        else:
+                            classBV = [round(val, dSDV["attributeprecision"]) for val in classBreaks[1:-1]]
+
+                        classBV = [minVal] + classBV + [maxVal]
+                        classBL = [str(classBV[i]) + " - " + str(classBV[i + 1]) for i in range(len(classBV) - 1)]
+
                     else:
                         if bVerbose:
                             PrintMsg(" \nCalculating equal interval for " + str(dSDV["maplegendclasses"]) + " classes", 1)
@@ -2101,10 +2008,12 @@ def ClassBreaksJSON(outputTbl, outputValues, ratingField, bFuzzy):
             lastClass = dLegend['labels'][len(dLegend['labels'])]['value']
             # New code using rulekey and distinterpmd table
             distinterpTbl = os.path.join(gdb, "distinterpmd")
-            ruleKey = GetRuleKey(distinterpTbl, dSDV["nasisrulename"])
+            ruleKeys = gSSURGO_InterpIndex.RuleKeys(distinterpTbl, dSDV["nasisrulename"])
+            ruleKey = RuleKeyString(ruleKeys)
 
             # sqlClause = ('TOP 1', None)  # OOPS. 'TOP' is only supported with SQL Server, MS Access databases
             whereClause = "rulekey IN " + ruleKey + " AND interphrc = '" + firstClass + "'"
+            whereClause = gSSURGO_InterpIndex.RangeQuery(gdb, "RULEKEY", ruleKeys, whereClause)
             cointerpTbl = os.path.join(gdb, "cointerp")
 
             #PrintMsg(" \nGetting poor fuzzy value from " + cointerpTbl, 1)
@@ -2164,16 +2073,25 @@ def ClassBreaksJSON(outputTbl, outputValues, ratingField, bFuzzy):
             classNum = 5
 
         #PrintMsg(" \noutputValues: " + str(outputValues), 1)
-        maxValue = round(max(outputValues), 2)
-        minValue = round(min(outputValues), 2)
-        low = round(min(outputValues), 2)
+        classBreaks = gSSURGO_LegendStats.LegendBreaks(os.path.join(gdb, outputTbl), ratingField, outputValues, legendMethod, classNum)
+
+        if legendMethod != "EqualInterval" and len(classBreaks) > 1:
+            classNum = min(classNum, len(classBreaks) - 1)
+
+        maxValue = round(classBreaks[-1], 2)
+        minValue = round(classBreaks[0], 2)
+        low = minValue
         step = round(((maxValue - minValue) / float(classNum)), 2)
         legendList = list()
         #
 
         for i in range(0, classNum, 1):
             # rating, label, rgb
-            high = round(low + step, 2)
+            if legendMethod == "EqualInterval":
+                high = round(low + step, 2)
+
+            else:
+                high = round(classBreaks[i + 1], 2)
 
             if i == 0:
                 if dSDV["attributeuomabbrev"] is None and firstClass != "":
@@ -2196,7 +2114,7 @@ def ClassBreaksJSON(outputTbl, outputValues, ratingField, bFuzzy):
             rec = [low, high, label, dColors[i]]
             legendList.append(rec)
             #PrintMsg("\t" + str(i) + ". " + str(rec), 1)  # this looks good for NCCPI
-            low = round(low + step, 2)
+            low = high
 
 
         # Add new rating field to list of layer fields
@@ -3318,7 +3236,7 @@ def CreateRasterMapLayer(inputLayer, outputTbl, outputLayer, outputLayerFile, ou
             # Get legend values and labels
             #PrintMsg(" \noutputValues before GetNumericLegend function: " + str(outputValues), 1)
 
-            classBV, classBL = GetNumericLegend(outputValues)
+            classBV, classBL = GetNumericLegend(outputValues, outputTbl)
 
             #PrintMsg(" \nOutput values (" + dFieldInfo[dSDV["resultcolumnname"].upper()][0] + ") " + str(classBV), 1)
 
@@ -3514,6 +3432,16 @@ def ReadTable(tbl, flds, wc, level, sql):
             PrintMsg(" \nReading Table: " + tbl + ", Fields: " + str(flds), 1)
             PrintMsg("WhereClause: " + str(wc) + ", SqlClause: " + str(sql) + " \n ", 1)
 
+        # When a batch script has opened a cache session, MAPUNIT, COMPONENT and CHORIZON
+        # are read once and shared by all of the maps.
+        if gSSURGO_SoilCache.IsActive(gdb):
+            dTbl = gSSURGO_SoilCache.ReadTable(tbl, flds, wc, sql)
+
+            if not dTbl is None:
+                return dTbl
+
+            dTbl = dict()
+
         with arcpy.da.SearchCursor(tbl, flds, where_clause=wc, sql_clause=sql) as cur:
             for rec in cur:
                 val = list(rec[1:])
@@ -3554,6 +3482,13 @@ def GetAreasymbols(gdb):
     try:
         dAreasymbols = dict()
 
+        # Areasymbols depend upon the input layer selection
+        cacheKey = (fc, fcCnt, polyCnt, dataType)
+        dCached = gSSURGO_SoilCache.GetItem("areasymbols", cacheKey)
+
+        if not dCached is None and gSSURGO_SoilCache.IsActive(gdb):
+            return dict(dCached)
+
         inputTbl = os.path.join(gdb, "LEGEND")
 
         # Get list of areasymbols from input feature layer
@@ -3597,6 +3532,9 @@ def GetAreasymbols(gdb):
                 for rec in cur:
                     dAreasymbols[rec[0]] = rec[1]
 
+        if gSSURGO_SoilCache.IsActive(gdb):
+            gSSURGO_SoilCache.SetItem("areasymbols", cacheKey, dict(dAreasymbols))
+
         return dAreasymbols
 
     except:
@@ -3617,13 +3555,21 @@ def GetSDVAtts(gdb, sdvAtt, aggMethod, tieBreaker, bFuzzy, sRV):
         if bVerbose:
             PrintMsg(" \nReading sdvattribute table into dSDV dictionary", 1)
 
-        with arcpy.da.SearchCursor(sdvattTable, "*", where_clause=sql1) as cur:
-            rec = cur.next()  # just reading first record
-            i = 0
-            for val in rec:
-                dSDV[flds[i].lower()] = val
-                #PrintMsg(str(i) + ". " + flds[i] + ": " + str(val), 0)
-                i += 1
+        if gSSURGO_SoilCache.IsActive(gdb):
+            # Batch mode. The sdvattribute table is read once for all of the maps.
+            dCached = gSSURGO_SoilCache.GetSDVAttribute(sdvAtt)
+
+            if not dCached is None:
+                dSDV = dCached
+
+        if len(dSDV) == 0:
+            with arcpy.da.SearchCursor(sdvattTable, "*", where_clause=sql1) as cur:
+                rec = cur.next()  # just reading first record
+                i = 0
+                for val in rec:
+                    dSDV[flds[i].lower()] = val
+                    #PrintMsg(str(i) + ". " + flds[i] + ": " + str(val), 0)
+                    i += 1
 
         # Revise some attributes to accomodate fuzzy number mapping code
         #
@@ -3720,48 +3666,15 @@ def GetSDVAtts(gdb, sdvAtt, aggMethod, tieBreaker, bFuzzy, sRV):
         return dSDV
 
 ## ===================================================================================
-def GetRuleKey(distinterpTbl, nasisrulename):
-
-    # distinterpmd: rulekey, rulekey
-    # cointerp: mrulekey, mrulename, ruledepth=0
-    # Need to determine if there is always 1:1 for rulekey and rulename
-
-    try:
-        #bVerbose = True
-        whereClause = "rulename = '" + nasisrulename + "'"
-        ruleKeys = list()
-
-        with arcpy.da.SearchCursor(distinterpTbl, ["rulekey"], where_clause=whereClause) as mCur:
-            for rec in mCur:
-                ruleKey = rec[0].encode('ascii')
-
-                if not ruleKey in ruleKeys:
-                    ruleKeys.append(ruleKey)
-
-        if len(ruleKeys) == 1:
-            keyString = "('" + ruleKeys[0] + "')"
-
-        else:
-            keyString = "('" + "','".join(ruleKeys) + "')"
-
-        #if len(ruleKeys) > 1:
-        #    PrintMsg("\tFound " + str(len(ruleKeys)) + " rulekey values for " + nasisrulename + ": " + str(ruleKeys), 1)
-
-        #elif len(ruleKeys) == 0:
-        #    return None
-
-        if bVerbose:
-            PrintMsg("\tSQL for " + nasisrulename + ": " + keyString, 1)
-
-        return keyString
+def RuleKeyString(ruleKeys):
+    # SQL list of rule keys for a RULEKEY IN query
+    if len(ruleKeys) == 1:
+        keyString = "('" + ruleKeys[0] + "')"
 
-    except MyError, e:
-        PrintMsg(str(e), 2)
-        return None
+    else:
+        keyString = "('" + "','".join(ruleKeys) + "')"
 
-    except:
-        errorMsg()
-        return None
+    return keyString
 
 ## ===================================================================================
 def GetRatingDomain(gdb):
@@ -3782,14 +3695,10 @@ def GetRatingDomain(gdb):
         if dSDV["tiebreakdomainname"] is not None:
             wc = "domainname = '" + dSDV["tiebreakdomainname"] + "' and choiceobsolete = 'No'"
 
-            sc = (None, "ORDER BY choicesequence ASC")
-
-            with arcpy.da.SearchCursor(mdcols, ["choice", "choicesequence"], where_clause=wc, sql_clause=sc) as cur:
-                for rec in cur:
-                    val = rec[0]
-
-                    if not val in domainValues:
-                        domainValues.append(val)
+            # The domain choices are only read from mdstatdomdet once for each process
+            for val in gSSURGO_DomainCodes.ReadDomain(mdcols, wc):
+                if not val in domainValues:
+                    domainValues.append(val)
 
             #if not None in domainValues:
             #    domainValues.append(None)
@@ -3870,6 +3779,9 @@ def CreateInitialTable(gdb, allFields, dFieldInfo):
 
         tblLoc = gdb
 
+        # A join registered for the previous map no longer applies
+        gSSURGO_JoinStream.ClearJoin()
+
         if arcpy.Exists(os.path.join(tblLoc, initialTbl)):
             arcpy.Delete_management(os.path.join(tblLoc, initialTbl))
 
@@ -3905,6 +3817,120 @@ def CreateInitialTable(gdb, allFields, dFieldInfo):
         errorMsg()
         return None
 
+## ===================================================================================
+def RegisterInitialTable(initialTbl, rowFunction, joinOrder):
+    # Stream the joined rows to the Aggregate functions instead of writing them to initialTbl.
+    # rowFunction returns a generator of rows in allFields order. When bSaveInitialTable is set,
+    # the rows are also written to initialTbl for the tabular reports. Batch and table-only
+    # runs (bTableOnly) never write it.
+    #
+    # The join functions (JoinRows3...) are generators, so the timing trace times reading their
+    # rows (gSSURGO_Profile.TimedRows) instead of the call.
+    #
+    try:
+        gSSURGO_JoinStream.RegisterJoin(initialTbl, allFields, lambda : gSSURGO_Profile.TimedRows(rowFunction()), joinOrder)
+
+        if bSaveInitialTable and not bTableOnly:
+            iCnt = gSSURGO_JoinStream.Materialize(initialTbl, True)
+
+            if bVerbose:
+                PrintMsg(" \nSaved " + Number_Format(iCnt, 0, True) + " records to " + initialTbl, 1)
+
+        return True
+
+    except MyError, e:
+        PrintMsg(str(e), 2)
+        return False
+
+    except:
+        errorMsg()
+        return False
+
+## ===================================================================================
+def InitialTableCursor(initialTbl, inFlds, where_clause=None, sql_clause=None):
+    # SearchCursor replacement for the initial table. Reads the streamed join when there is one.
+    # If the join cannot handle this query, the rows are written to initialTbl and read with a cursor.
+    #
+    if gSSURGO_JoinStream.IsStreamed(initialTbl):
+        cur = gSSURGO_JoinStream.ReadRows(initialTbl, inFlds, where_clause, sql_clause)
+
+        if not cur is None:
+            return cur
+
+        if bVerbose:
+            PrintMsg(" \nWriting " + initialTbl + " for query: " + str(where_clause) + "; " + str(sql_clause), 1)
+
+        gSSURGO_JoinStream.Materialize(initialTbl)
+
+    return arcpy.da.SearchCursor(initialTbl, inFlds, where_clause=where_clause, sql_clause=sql_clause)
+
+## ===================================================================================
+def ComponentOrderCursor(initialTbl, inFlds, where_clause=None):
+    # Initial table rows in MUKEY ASC, COMPPCT_R DESC order. inFlds must include MUKEY and COKEY.
+    #
+    # A streamed join is already in this order. A saved initial table is read without an ORDER BY
+    # and the rows are put in order with the dominant component index (gSSURGO_ComponentIndex).
+    # Components with the same COMPPCT_R follow the index order.
+    #
+    sqlClause = (None, "ORDER BY MUKEY ASC, COMPPCT_R DESC")
+
+    if gSSURGO_JoinStream.IsStreamed(initialTbl):
+        return InitialTableCursor(initialTbl, inFlds, where_clause, sqlClause)
+
+    dIndex = gSSURGO_ComponentIndex.LoadIndex(gdb)
+
+    if not dIndex is None:
+        fldNames = [fld.upper() for fld in inFlds]
+
+        with arcpy.da.SearchCursor(initialTbl, inFlds, where_clause=where_clause) as cur:
+            rows = gSSURGO_ComponentIndex.OrderRows(dIndex, cur, fldNames.index("MUKEY"), fldNames.index("COKEY"))
+
+        if not rows is None:
+            return gSSURGO_JoinStream.JoinCursor(lambda : rows)
+
+        if bVerbose:
+            PrintMsg(" \nComponent index does not match " + initialTbl, 1)
+
+    return arcpy.da.SearchCursor(initialTbl, inFlds, where_clause=where_clause, sql_clause=sqlClause)
+
+## ===================================================================================
+def DominantRows(cur, pctIdx, ratingIdx, bLow):
+    # First row of each map unit in MUKEY ASC, COMPPCT_R DESC, rating ASC (bLow) or DESC order.
+    #
+    # cur must be in MUKEY ASC, COMPPCT_R DESC order (ComponentOrderCursor), with MUKEY as the first
+    # field. Only the rows that share the highest COMPPCT_R are compared. A null rating sorts first
+    # in ascending order and last in descending order, the same as a file geodatabase, and ties keep
+    # the row that was read first.
+    #
+    domRows = list()
+
+    for row in cur:
+        if len(domRows) > 0 and row[0] != domRows[0][0]:
+            yield BestRow(domRows, ratingIdx, bLow)
+            domRows = list()
+
+        if len(domRows) == 0 or row[pctIdx] == domRows[0][pctIdx]:
+            domRows.append(row)
+
+    if len(domRows) > 0:
+        yield BestRow(domRows, ratingIdx, bLow)
+
+## ===================================================================================
+def BestRow(rows, ratingIdx, bLow):
+    # Row with the lowest (bLow) or highest rating. None is lower than any value.
+    if bLow:
+        return min(rows, key = lambda row : row[ratingIdx])
+
+    return max(rows, key = lambda row : row[ratingIdx])
+
+## ===================================================================================
+def InitialTableCount(initialTbl):
+    # Record count for the initial table or its streamed join
+    if gSSURGO_JoinStream.IsStreamed(initialTbl):
+        return gSSURGO_JoinStream.RowCount(initialTbl)
+
+    return int(arcpy.GetCount_management(initialTbl).getOutput(0))
+
 ## ===================================================================================
 def GetMapunitSymbols(gdb):
     # Populate dictionary using mukey and musym
@@ -3915,11 +3941,18 @@ def GetMapunitSymbols(gdb):
     env.workspace = gdb
 
     try:
+        dCached = gSSURGO_SoilCache.GetItem("symbols", gdb)
+
+        if not dCached is None and gSSURGO_SoilCache.IsActive(gdb):
+            return dCached
 
         with arcpy.da.SearchCursor("MAPUNIT", ["MUKEY", "MUSYM"]) as mCur:
             for rec in mCur:
                 dSymbols[rec[0]] = rec[1]
 
+        if gSSURGO_SoilCache.IsActive(gdb):
+            gSSURGO_SoilCache.SetItem("symbols", gdb, dSymbols)
+
         return dSymbols
 
     except MyError, e:
@@ -3963,7 +3996,7 @@ def CreateOutputTable(initialTbl, outputTbl, dFieldInfo):
         fldList = arcpy.Describe(outputTbl).fields
 
         for fld in fldList:
-            if fld.name.upper() in ["COKEY", "CHKEY", "HZDEPT_R", "HZDEPB_R", "COMONTHKEY", "LKEY"]:
+            if fld.name.upper() in ["COKEY", "CHKEY", "HZDEPT_R", "HZDEPB_R", "COMONTHKEY", "MONTHSEQ", "LKEY"]:
                 arcpy.DeleteField_management(outputTbl, fld.name)
 
         #fieldName = dSDV[resultcolumn]
@@ -4090,10 +4123,44 @@ def CreateRatingTable1S(tblList, sdvTbl, dTbl, initialTbl, dAreasymbols):
         errorMsg()
         return False
 
+## ===================================================================================
+def JoinRows3(mapunitRecs, dComponent, dHorizon):
+    # Generator of level 3 rows (mapunit, component, chorizon) in allFields order
+    #
+    for mukey, musym, muname, lkey in mapunitRecs:
+        if not lkey in dAreasymbols:
+            # Skip missing mapunits (outside AOI)
+            continue
+
+        if not mukey in dComponent:
+            # No component records, chorizon records
+            newrec = [dAreasymbols[lkey], mukey, musym, muname]
+            newrec.extend(dMissing["COMPONENT"])
+            newrec.extend(dMissing["CHORIZON"])
+            yield newrec
+            continue
+
+        for corec in dComponent[mukey]:
+            if corec[0] in dHorizon:
+                for chrec in dHorizon[corec[0]]:
+                    newrec = [dAreasymbols[lkey], mukey, musym, muname]
+                    newrec.extend(corec)
+                    newrec.extend(chrec)
+                    yield newrec
+
+            else:
+                # No chorizon records
+                newrec = [dAreasymbols[lkey], mukey, musym, muname]
+                newrec.extend(corec)
+                newrec.extend(dMissing["CHORIZON"])
+                yield newrec
+
 ## ===================================================================================
 def CreateRatingTable3(tblList, sdvTbl, dComponent, dHorizon, initialTbl):
     # Populate level 3 table (mapunit, component, chorizon)
     #
+    # The joined rows are streamed to the Aggregate functions (see gSSURGO_JoinStream)
+    #
     try:
         arcpy.SetProgressorLabel("Saving all relevant data to a single query table")
 
@@ -4107,52 +4174,9 @@ def CreateRatingTable3(tblList, sdvTbl, dComponent, dHorizon, initialTbl):
         #PrintMsg(" \nCreateRatingTable3 using SQL: " + str(dSQL["MAPUNIT"]), 1)
 
         with arcpy.da.SearchCursor("MAPUNIT", dFields["MAPUNIT"], sql_clause=dSQL["MAPUNIT"]) as mCur:
-            with arcpy.da.InsertCursor(initialTbl, allFields) as ocur:
-                for rec in mCur:
-                    mukey, musym, muname, lkey = rec
-
-                    #if lkey in dAreasymbols: # new code
-                    try:
-                        newrec = [dAreasymbols[lkey], mukey, musym, muname]
-
-                        try:
-                            corecs = dComponent[mukey]
-
-                            for corec in corecs:
-                                try:
-                                    chrecs = dHorizon[corec[0]]
-
-                                    for chrec in chrecs:
-                                        newrec = [dAreasymbols[lkey], mukey, musym, muname]
-                                        newrec.extend(corec)
-                                        newrec.extend(chrec)
-                                        #PrintMsg("\t" + str(newrec), 1)
-                                        ocur.insertRow(newrec)
-
-                                except:
-                                    # No chorizon records
-                                    newrec = [dAreasymbols[lkey], mukey, musym, muname]
-                                    newrec.extend(corec)
-                                    newrec.extend(dMissing["CHORIZON"])
-                                    #PrintMsg("\t" + str(newrec), 1)
-                                    ocur.insertRow(newrec)
-
-                        except:
-                            try: # new code
-                                # No component records, chorizon records
-                                newrec = [dAreasymbols[lkey], mukey, musym, muname]
-                                newrec.extend(dMissing["COMPONENT"])
-                                newrec.extend(dMissing["CHORIZON"])
-                                #PrintMsg("\t" + str(newrec), 1)
-                                ocur.insertRow(newrec)
+            mapunitRecs = [rec for rec in mCur]
 
-                            except:
-                                pass
-
-                    except:
-                        pass
-
-        return True
+        return RegisterInitialTable(initialTbl, lambda : JoinRows3(mapunitRecs, dComponent, dHorizon), hzOrder)
 
     except MyError, e:
         PrintMsg(str(e), 2)
@@ -4361,6 +4385,51 @@ def CreateRatingInterps(tblList, sdvTbl, dComponent, dTbl, initialTbl):
         errorMsg()
         return False
 
+## ===================================================================================
+def JoinRows3S(mapunitRecs, sdvTbl, dComponent, dHorizon, dTbl):
+    # Generator of level 4 rows (mapunit, component, chorizon, sdvTbl) in allFields order
+    #
+    for mukey, musym, muname, lkey in mapunitRecs:
+        if not lkey in dAreasymbols:
+            # Skip missing mapunits (outside AOI)
+            continue
+
+        if not mukey in dComponent:
+            # No component, horizon or sdv records
+            newrec = [dAreasymbols[lkey], mukey, musym, muname]
+            newrec.extend(dMissing["COMPONENT"])
+            newrec.extend(dMissing["CHORIZON"])
+            newrec.extend(dMissing[sdvTbl])
+            yield newrec
+            continue
+
+        for corec in dComponent[mukey]:
+            if not corec[0] in dHorizon:
+                # missing horizon data
+                newrec = [dAreasymbols[lkey], mukey, musym, muname]
+                newrec.extend(corec)
+                newrec.extend(dMissing["CHORIZON"])
+                newrec.extend(dMissing[sdvTbl])
+                yield newrec
+                continue
+
+            for hzrec in dHorizon[corec[0]]:
+                newrec = [dAreasymbols[lkey], mukey, musym, muname]
+                newrec.extend(corec)
+                newrec.extend(hzrec)
+
+                if hzrec[0] in dTbl and len(dTbl[hzrec[0]]) > 0:
+                    # Important note: only the first sdv record for the horizon is used.
+                    # This would be the rating for the top of the specified depth range.
+                    #
+                    newrec.extend(dTbl[hzrec[0]][0])
+
+                else:
+                    # missing sdv rating value
+                    newrec.extend(dMissing[sdvTbl])
+
+                yield newrec
+
 ## ===================================================================================
 def CreateRatingTable3S(tblList, sdvTbl, dComponent, dHorizon, dTbl, initialTbl, sdvAtt):
     # Create level 4 table (mapunit, component, chorizon, sdvTbl)
@@ -4368,6 +4437,8 @@ def CreateRatingTable3S(tblList, sdvTbl, dComponent, dHorizon, dTbl, initialTbl,
     #
     # At some point may want to look at returning top mineral horizon instead of hzdept_r = 0.
     #
+    # The joined rows are streamed to the Aggregate functions (see gSSURGO_JoinStream)
+    #
     try:
         arcpy.SetProgressorLabel("Saving all relevant data to a single query table")
         # bVerbose = True
@@ -4385,66 +4456,9 @@ def CreateRatingTable3S(tblList, sdvTbl, dComponent, dHorizon, dTbl, initialTbl,
         #    raise MyError, "CreateRatingTable3S cannot handle " + sdvAtt + " option"
 
         with arcpy.da.SearchCursor("MAPUNIT", dFields["MAPUNIT"], sql_clause=dSQL["MAPUNIT"]) as mCur:
-            with arcpy.da.InsertCursor(initialTbl, allFields) as ocur:
-
-                for rec in mCur:
-                    mukey, musym, muname, lkey = rec
-
-                    try:
-                        corecs = dComponent[mukey]
-
-                        for corec in corecs:
-
-                            try:
-                                hzrecs = dHorizon[corec[0]]
-
-                                for hzrec in hzrecs:
-                                    try:
-                                        newrec = [dAreasymbols[lkey], mukey, musym, muname]
-                                        sdvrec = dTbl[hzrec[0]][0]
-                                        newrec.extend(corec)
-                                        newrec.extend(hzrec)
-
-                                        # Important note: in this next line I am only retrieving the first
-                                        # horizon value from a list. This would be the rating for the top of the
-                                        # specified depth range.
-                                        #
-                                        newrec.extend(sdvrec)  # save only rating for first horizon
-                                        #PrintMsg("\t" + str(newrec), 0)
-                                        ocur.insertRow(newrec)
-
-                                    except:
-                                        # missing sdv rating value
-                                        newrec = [dAreasymbols[lkey], mukey, musym, muname]
-                                        newrec.extend(corec)
-                                        newrec.extend(hzrec)
-                                        newrec.extend(dMissing[sdvTbl])
-                                        #PrintMsg("\t" + str(newrec) + "******", 1)
-                                        ocur.insertRow(newrec)
-
-                            except:
-                                # missing horizon data
-                                newrec = [dAreasymbols[lkey], mukey, musym, muname]
-                                newrec.extend(corec)
-                                newrec.extend(dMissing["CHORIZON"])
-                                newrec.extend(dMissing[sdvTbl])
-                                #PrintMsg("\t" + str(newrec), 1)
-                                ocur.insertRow(newrec)
-
-                    except:
-                        # No component, horizon or sdv records
-                        try:
-                            newrec = [dAreasymbols[lkey], mukey, musym, muname]
-                            newrec.extend(dMissing["COMPONENT"])
-                            newrec.extend(dMissing["CHORIZON"])
-                            newrec.extend(dMissing[sdvTbl])
-                            #PrintMsg("\t" + str(newrec), 1)
-                            ocur.insertRow(newrec)
+            mapunitRecs = [rec for rec in mCur]
 
-                        except:
-                            # Skip missing mapunits (outside AOI)
-                            pass
-        return True
+        return RegisterInitialTable(initialTbl, lambda : JoinRows3S(mapunitRecs, sdvTbl, dComponent, dHorizon, dTbl), hzOrder)
 
     except MyError, e:
         PrintMsg(str(e), 2)
@@ -4458,6 +4472,9 @@ def CreateRatingTable3S(tblList, sdvTbl, dComponent, dHorizon, dTbl, initialTbl,
 def CreateRatingTable4S(tblList, sdvTbl, dComponent, dHorizon, dTbl, initialTbl):
     # Create level 3 table (mapunit, component, horizon)
     #
+    # Uses the same join as CreateRatingTable3S. The original version extended each row with
+    # the whole list of sdv records, which the insert cursor rejected.
+    #
     try:
         arcpy.SetProgressorLabel("Saving all relevant data to a single query table")
 
@@ -4469,62 +4486,56 @@ def CreateRatingTable4S(tblList, sdvTbl, dComponent, dHorizon, dTbl, initialTbl)
         allFields.remove("LKEY")
 
         with arcpy.da.SearchCursor("MAPUNIT", dFields["MAPUNIT"], sql_clause=dSQL["MAPUNIT"]) as mCur:
-            with arcpy.da.InsertCursor(initialTbl, allFields) as ocur:
-                for rec in mCur:
-                    mukey, musym, muname, lkey = rec
-
-                    try:
-                        corecs = dComponent[mukey]
+            mapunitRecs = [rec for rec in mCur]
 
-                        for corec in corecs:
+        return RegisterInitialTable(initialTbl, lambda : JoinRows3S(mapunitRecs, sdvTbl, dComponent, dHorizon, dTbl), hzOrder)
 
-                            try:
-                                #sdvrecs = dTbl[corec[0]]
-                                hzrecs = dHorizon[corec[0]]
+    except:
+        errorMsg()
+        return False
 
-                                for hzrec in hzrecs:
-                                    try:
-                                        newrec = [dAreasymbols[lkey], mukey, musym, muname]
-                                        sdvrecs = dTbl[hzrec[0]]
-                                        newrec.extend(corec)
-                                        newrec.extend(hzrec)
-                                        newrec.extend(dTbl[hzrec[0]])
-                                        #PrintMsg("\t" + str(newrec), 1)
-                                        ocur.insertRow(newrec)
+## ===================================================================================
+def JoinRowsSoilMoisture(mapunitRecs, sdvTbl, dComponent, dMonth, dTbl):
+    # Generator of level 4 rows (mapunit, component, cmonth, cosoilmoist) in allFields order
+    #
+    for mukey, musym, muname, lkey in mapunitRecs:
+        if not lkey in dAreasymbols:
+            continue
+
+        if not mukey in dComponent:
+            # No component records or comonth records
+            newrec = [dAreasymbols[lkey], mukey, musym, muname]
+            newrec.extend(dMissing["COMPONENT"])
+            newrec.extend(dMissing["COMONTH"])
+            newrec.extend(dMissing[sdvTbl])
+            yield newrec
+            continue
+
+        for corec in dComponent[mukey]:
+            if not corec[0] in dMonth:
+                # No comonth records
+                newrec = [dAreasymbols[lkey], mukey, musym, muname]
+                newrec.extend(corec)
+                newrec.extend(dMissing["COMONTH"])
+                newrec.extend(dMissing[sdvTbl])
+                yield newrec
+                continue
+
+            for morec in dMonth[corec[0]]:
+                if morec[0] in dTbl:
+                    for sdvrec in dTbl[morec[0]]:
+                        newrec = [dAreasymbols[lkey], mukey, musym, muname]
+                        newrec.extend(corec)
+                        newrec.extend(morec)
+                        newrec.extend(sdvrec)
+                        yield newrec
 
-                                    except:
-                                        newrec = [dAreasymbols[lkey], mukey, musym, muname]
-                                        newrec.extend(corec)
-                                        newrec.extend(hzrec)
-                                        newrec.extend(dMissing[sdvTbl])
-                                        #PrintMsg("\t" + str(newrec), 1)
-                                        ocur.insertRow(newrec)
-
-                            except:
-                                newrec = [dAreasymbols[lkey], mukey, musym, muname]
-                                newrec.extend("COMPONENT")
-                                newrec.extend("CHORIZON")
-                                newrec.extend(dMissing[sdvTbl])
-                                #PrintMsg("\t" + str(newrec), 1)
-                                ocur.insertRow(newrec)
-
-                    except:
-                        # No component records
-                        try:
-                            newrec = [dAreasymbols[lkey], mukey, musym, muname]
-                            newrec.extend(dMissing["COMPONENT"])
-                            newrec.extend(dMissing[sdvTbl])
-                            #PrintMsg("\t" + str(newrec), 1)
-                            ocur.insertRow(newrec)
-
-                        except:
-                            pass
-
-        return True
-
-    except:
-        errorMsg()
-        return False
+                else:
+                    newrec = [dAreasymbols[lkey], mukey, musym, muname]
+                    newrec.extend(corec)
+                    newrec.extend(morec)
+                    newrec.extend(dMissing[sdvTbl])
+                    yield newrec
 
 ## ===================================================================================
 def CreateSoilMoistureTable(tblList, sdvTbl, dComponent, dMonth, dTbl, initialTbl, begMo, endMo):
@@ -4536,75 +4547,23 @@ def CreateSoilMoistureTable(tblList, sdvTbl, dComponent, dMonth, dTbl, initialTb
     # is using that value instead of the other months that are 91cm. Try removing NULLs in query that
     # creates the SDV_Data table.
     #
+    # The joined rows are streamed to the Aggregate functions (see gSSURGO_JoinStream)
+    #
     try:
         arcpy.SetProgressorLabel("Saving all relevant data to a single query table")
 
         if bVerbose:
             PrintMsg(" \nCurrent function : " + sys._getframe().f_code.co_name, 1)
-            PrintMsg
 
         #
-        # Read mapunit table and then populate the initial output table
+        # Read mapunit table and then register the join for the initial table
         allFields.remove("LKEY")
 
         with arcpy.da.SearchCursor("MAPUNIT", dFields["MAPUNIT"], sql_clause=dSQL["MAPUNIT"]) as mCur:
-            with arcpy.da.InsertCursor(initialTbl, allFields) as ocur:
-                for rec in mCur:
-                    mukey, musym, muname, lkey = rec
-
-                    try:
-                        newrec = list()
-                        corecs = dComponent[mukey]
-
-                        for corec in corecs:
-
-                            try:
-                                newrec = list()
-                                morecs = dMonth[corec[0]]
-
-                                for morec in morecs:
-                                    try:
-                                        sdvrecs = dTbl[morec[0]]
-
-                                        for sdvrec in sdvrecs:
-                                            newrec = [dAreasymbols[lkey], mukey, musym, muname]
-                                            newrec.extend(corec)
-                                            newrec.extend(morec)
-                                            newrec.extend(sdvrec)
-                                            #PrintMsg("\t1. " + str(newrec), 1)
-                                            ocur.insertRow(newrec)
-
-                                    except:
-                                        newrec = [dAreasymbols[lkey], mukey, musym, muname]
-                                        newrec.extend(corec)
-                                        newrec.extend(morec)
-                                        newrec.extend(dMissing[sdvTbl])
-                                        #PrintMsg("\t2. " + str(newrec), 1)
-                                        ocur.insertRow(newrec)
-
-                            except:
-                                # No comonth records
-                                newrec = [dAreasymbols[lkey], mukey, musym, muname]
-                                newrec.extend(corec)
-                                newrec.extend(dMissing["COMONTH"])
-                                newrec.extend(dMissing[sdvTbl])
-                                #PrintMsg("\t3. " + str(newrec), 1)
-                                ocur.insertRow(newrec)
-
-                    except:
-                        # No component records or comonth records
-                        try:
-                            newrec = [dAreasymbols[lkey], mukey, musym, muname]
-                            newrec.extend(dMissing["COMPONENT"])
-                            newrec.extend(dMissing["COMONTH"])
-                            newrec.extend(dMissing[sdvTbl])
-                            #PrintMsg("\t4. " + str(newrec), 1)
-                            ocur.insertRow(newrec)
-
-                        except:
-                            pass
+            mapunitRecs = [rec for rec in mCur]
 
-        return True
+        # Month records are not in a guaranteed order, so only the component order is known
+        return RegisterInitialTable(initialTbl, lambda : JoinRowsSoilMoisture(mapunitRecs, sdvTbl, dComponent, dMonth, dTbl), hzOrder[0:2])
 
     except MyError, e:
         PrintMsg(str(e), 2)
@@ -4631,7 +4590,7 @@ def Aggregate1(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker):
         # is redundant. Should fix this later after everything
         # else is working.
         #
-        outputTbl = os.path.join(gdb, tblName)
+        outputTbl = os.path.join(sdvGDB, tblName)
         #attribcolumn = dSDV["attributecolumnname"].upper()
         #resultcolumn = dSDV["resultcolumnname"].upper()
         inFlds = ["MUKEY", "AREASYMBOL", dSDV["attributecolumnname"].upper()]
@@ -4653,7 +4612,7 @@ def Aggregate1(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker):
             iMax = -999999999
             iMin = 999999999
 
-            with arcpy.da.SearchCursor(initialTbl, inFlds) as cur:
+            with InitialTableCursor(initialTbl, inFlds) as cur:
                 with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
                     for rec in cur:
                         mukey, areasym, val = rec
@@ -4680,7 +4639,7 @@ def Aggregate1(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker):
 
         else:
             # populate sdv_initial table and create a list of unique values
-            with arcpy.da.SearchCursor(initialTbl, inFlds) as cur:
+            with InitialTableCursor(initialTbl, inFlds) as cur:
                 with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
                     for rec in cur:
                         mukey, areasym, val = rec
@@ -4717,7 +4676,7 @@ def AggregateCo_DCP(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker,
             PrintMsg(" \nCurrent function : " + sys._getframe().f_code.co_name, 1)
 
         # Create final output table with MUKEY, COMPPCT_R and sdvFld
-        outputTbl = os.path.join(gdb, tblName)
+        outputTbl = os.path.join(sdvGDB, tblName)
         outputValues = list()
 
         inFlds = ["MUKEY", "AREASYMBOL", "COKEY", "COMPPCT_R", dSDV["attributecolumnname"].upper()]
@@ -4727,12 +4686,15 @@ def AggregateCo_DCP(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker,
         #PrintMsg(str(dSDV["tiebreaklowlabel"]) + "; " + str(dSDV["tiebreakhighlabel"]), 1)
 
 
+        # The dominant component rows are the first rows of each map unit in
+        # ORDER BY MUKEY ASC, COMPPCT_R DESC, rating ASC (lower tiebreak) or DESC (higher tiebreak).
+        # ComponentOrderCursor and DominantRows select them without sorting the table.
         if tieBreaker == dSDV["tiebreaklowlabel"]:
-            sqlClause =  (None, " ORDER BY MUKEY ASC, COMPPCT_R DESC, " + dSDV["attributecolumnname"].upper() + " ASC ")
+            bLow = True
             #PrintMsg(" \nAscending sort on " + dSDV["attributecolumnname"], 1)
 
         else:
-            sqlClause =  (None, " ORDER BY MUKEY ASC, COMPPCT_R DESC, " + dSDV["attributecolumnname"].upper() + " DESC ")
+            bLow = False
             #PrintMsg(" \nDescending sort on " + dSDV["attributecolumnname"], 1)
 
 
@@ -4756,10 +4718,10 @@ def AggregateCo_DCP(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker,
             iMin = 999999999.0
             fldPrecision = max(0, dSDV["attributeprecision"])
 
-            with arcpy.da.SearchCursor(initialTbl, inFlds, sql_clause=sqlClause) as cur:
+            with ComponentOrderCursor(initialTbl, inFlds) as cur:
 
                 with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
-                    for rec in cur:
+                    for rec in DominantRows(cur, 3, 4, bLow):
                         mukey, areasym, cokey, comppct, rating = rec
 
                         #if mukey != lastMukey and lastMukey != "xxxx":  # This was dropping first map unit!!!
@@ -4789,13 +4751,13 @@ def AggregateCo_DCP(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker,
             #PrintMsg(" \ndValues: " + str(dValues), 1)
             #PrintMsg(" \noutputValues: " + str(outputValues), 1)
 
-            with arcpy.da.SearchCursor(initialTbl, inFlds, sql_clause=sqlClause) as cur:
+            with ComponentOrderCursor(initialTbl, inFlds) as cur:
 
                 if len(dValues) > 0:
                     # Text, has domain values or values in the maplegendxml
                     #
                     with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
-                        for rec in cur:
+                        for rec in DominantRows(cur, 3, 4, bLow):
 
                             mukey, areasym, cokey, comppct, rating = rec
 
@@ -4829,7 +4791,7 @@ def AggregateCo_DCP(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker,
                     # Text, without domain values
                     #
                     with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
-                        for rec in cur:
+                        for rec in DominantRows(cur, 3, 4, bLow):
                             mukey, areasym, cokey, comppct, rating = rec
 
                             if mukey != lastMukey:
@@ -4906,7 +4868,7 @@ def AggregateCo_Limiting(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBre
             PrintMsg(" \nAttribute type: " + dSDV["attributetype"] + "; bFuzzy " + str(bFuzzy), 1)
 
         # Create final output table with MUKEY, COMPPCT_R and sdvFld
-        outputTbl = os.path.join(gdb, tblName)
+        outputTbl = os.path.join(sdvGDB, tblName)
 
         inFlds = ["MUKEY", "AREASYMBOL", "COKEY", "COMPPCT_R", dSDV["attributecolumnname"].upper()]
         outFlds = ["MUKEY", "AREASYMBOL", "COMPPCT_R", dSDV["resultcolumnname"].upper()]
@@ -4949,7 +4911,7 @@ def AggregateCo_Limiting(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBre
             # Save the rating for each component along with a list of components for each mapunit
             #
             try:
-                with arcpy.da.SearchCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
+                with InitialTableCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
                     # inFlds: 0 mukey, 1 cokey, 2 comppct, 3 rating
 
                     for rec in cur:
@@ -5157,7 +5119,7 @@ def AggregateCo_MaxMin(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreak
             PrintMsg(" \nAttribute type: " + dSDV["attributetype"] + "; bFuzzy " + str(bFuzzy), 1)
 
         # Create final output table with MUKEY, COMPPCT_R and sdvFld
-        outputTbl = os.path.join(gdb, tblName)
+        outputTbl = os.path.join(sdvGDB, tblName)
 
         inFlds = ["MUKEY", "AREASYMBOL", "COKEY", "COMPPCT_R", dSDV["attributecolumnname"].upper()]
         outFlds = ["MUKEY", "AREASYMBOL", "COMPPCT_R", dSDV["resultcolumnname"].upper()]
@@ -5210,7 +5172,7 @@ def AggregateCo_MaxMin(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreak
             # PrintMsg(" \ndomainValues for " + sdvAtt + ": " + str(domainValues), 1)
 
             try:
-                with arcpy.da.SearchCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
+                with InitialTableCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
                     # inFlds: 0 mukey, 1 cokey, 2 comppct, 3 rating
 
                     for rec in cur:
@@ -5239,7 +5201,7 @@ def AggregateCo_MaxMin(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreak
         else:
             # 2. No Domain Values, read data from initial table. Use alpha sort for tiebreaker.
             #
-            with arcpy.da.SearchCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
+            with InitialTableCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
 
                 for rec in cur:
                     mukey, areasym, cokey, comppct, rating = rec
@@ -5475,7 +5437,7 @@ def AggregateCo_DCD(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker,
             PrintMsg(" \nCurrent function : " + sys._getframe().f_code.co_name, 1)
 
         # Create final output table with MUKEY, COMPPCT_R and sdvFld
-        outputTbl = os.path.join(gdb, tblName)
+        outputTbl = os.path.join(sdvGDB, tblName)
 
         inFlds = ["MUKEY", "COKEY", "COMPPCT_R", dSDV["attributecolumnname"].upper(), "AREASYMBOL"]
         outFlds = ["MUKEY", "COMPPCT_R", dSDV["resultcolumnname"].upper(), "AREASYMBOL"]
@@ -5494,7 +5456,8 @@ def AggregateCo_DCD(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker,
         # initialTbl must be in a file geodatabase to support ORDER_BY
         # Do I really need to sort by attribucolumn when it will be replaced by Domain values later?
         #PrintMsg(" \nMap legend key: " + str(dSDV["maplegendkey"]), 1)
-        sqlClause =  (None, " ORDER BY MUKEY ASC, COMPPCT_R DESC")
+        # Rows are read in MUKEY ASC, COMPPCT_R DESC order using the dominant component index
+        # (ComponentOrderCursor) instead of an ORDER BY on the initial table.
 
         if arcpy.Exists(outputTbl):
             arcpy.Delete_management(outputTbl)
@@ -5529,7 +5492,7 @@ def AggregateCo_DCD(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker,
 
             # PrintMsg("dValues: " + str(dValues), 1)
 
-            with arcpy.da.SearchCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
+            with ComponentOrderCursor(initialTbl, inFlds, whereClause) as cur:
                 # Use tiebreak rules and rating index values
 
                 for rec in cur:
@@ -5569,7 +5532,7 @@ def AggregateCo_DCD(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker,
             # 2 Read initial table (no domain values, must use alpha sort for tiebreaker)
             # Issue noted by ?? that without tiebreaking method, inconsistent results may occur
             #
-            with arcpy.da.SearchCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
+            with ComponentOrderCursor(initialTbl, inFlds, whereClause) as cur:
                 #
                 # numeric values
                 if dSDV["effectivelogicaldatatype"].lower() in ['integer', 'float']:
@@ -5770,7 +5733,7 @@ def AggregateCo_DCP_DTWT(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBre
             PrintMsg(" \nCurrent function : " + sys._getframe().f_code.co_name, 1)
 
         # Create final output table with MUKEY, COMPPCT_R and sdvFld
-        outputTbl = os.path.join(gdb, tblName)
+        outputTbl = os.path.join(sdvGDB, tblName)
         #attribcolumn = dSDV["attributecolumnname"].upper()
         #resultcolumn = dSDV["resultcolumnname"].upper()
 
@@ -5790,9 +5753,9 @@ def AggregateCo_DCP_DTWT(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBre
 
         dMapunit = dict()
         dAreasym = dict()
-        dataCnt = int(arcpy.GetCount_management(initialTbl).getOutput(0))
+        dataCnt = InitialTableCount(initialTbl)
 
-        with arcpy.da.SearchCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
+        with InitialTableCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
             #cnt = 0
             #PrintMsg(" \nReading input table " + os.path.basename(initialTbl) + "...", 1)
             arcpy.SetProgressor("step", "Reading input table " + os.path.basename(initialTbl) + "...", 0, dataCnt, 1 )
@@ -5855,7 +5818,7 @@ def AggregateCo_DCD_DTWT(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBre
             PrintMsg(" \nCurrent function : " + sys._getframe().f_code.co_name, 1)
 
         # Create final output table with MUKEY, COMPPCT_R and sdvFld
-        outputTbl = os.path.join(gdb, tblName)
+        outputTbl = os.path.join(sdvGDB, tblName)
         #attribcolumn = dSDV["attributecolumnname"].upper()
         #resultcolumn = dSDV["resultcolumnname"].upper()
 
@@ -5878,7 +5841,7 @@ def AggregateCo_DCD_DTWT(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBre
         dCoRating = dict()
         dAreasym = dict()
 
-        with arcpy.da.SearchCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
+        with InitialTableCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
 
             # MUKEY,COKEY , COMPPCT_R, attribcolumn
             for rec in cur:
@@ -5975,289 +5938,209 @@ def AggregateCo_Mo_MaxMin(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBr
     # is currently set to duplicate this behavior
     # Added areasymbol to output
     #
-    # Seems to be a problem with TitleCase Values in maplegendxml vs. SentenceCase in the original data. Domain values are SentenceCase.
+    # The monthly ratings are read into component x month arrays (gSSURGO_MonthArrays), so that
+    # every month window in monthWindows is rated from a single read. A single window is rated
+    # with the original loop (gSSURGO_MonthArrays.RefMo_*), which is faster for one window.
     #
 
     try:
-        #
-        #bVerbose = True
-
         arcpy.SetProgressorLabel("Aggregating rating information to the map unit level")
 
         if bVerbose:
             PrintMsg(" \nCurrent function : " + sys._getframe().f_code.co_name, 1)
 
-        # Create final output table with MUKEY, COMPPCT_R and sdvFld
-        outputTbl = os.path.join(gdb, tblName)
-        #attribcolumn = dSDV["attributecolumnname"].upper()
-        #resultcolumn = dSDV["resultcolumnname"].upper()
-
-        inFlds = ["MUKEY", "COKEY", "COMPPCT_R", dSDV["attributecolumnname"].upper(), "AREASYMBOL"]
-        outFlds = ["MUKEY", "COMPPCT_R", dSDV["resultcolumnname"].upper(), "AREASYMBOL"]
-        whereClause = "COMPPCT_R >=  " + str(cutOff)  # Leave in NULLs and try later to substitute dSDV["nullratingreplacementvalue"]
-        #whereClause = "COMPPCT_R >=  " + str(cutOff) + " and not " + dSDV["attributecolumnname"].upper() + " is null"
-        sqlClause =  (None, " ORDER BY MUKEY ASC, COMPPCT_R DESC")
-
-        if arcpy.Exists(outputTbl):
-            arcpy.Delete_management(outputTbl)
-
-        outputTbl = CreateOutputTable(initialTbl, outputTbl, dFieldInfo)
+        outputTbl = os.path.join(sdvGDB, tblName)
         outputValues = list()
+        whereClause = "COMPPCT_R >=  " + str(cutOff)  # Leave in NULLs and try later to substitute dSDV["nullratingreplacementvalue"]
+        bHigh = (tieBreaker == dSDV["tiebreakhighlabel"])
 
-        if outputTbl == "":
-            return outputTbl, outputValues
+        if len(monthWindows) == 0:
+            # One month window. The original loop is faster than building the month arrays.
+            rows = ReadMonthRows(initialTbl, whereClause)
+            return WriteMonthTable(initialTbl, LoopMonthRecords(rows, gSSURGO_MonthArrays.RefMo_MaxMin(rows, bHigh, nullRating)))
 
-        dMapunit = dict()
-        dComponent = dict()
-        dCoRating = dict()
-        dAreasym = dict()
+        dMonths = ReadMonthData(initialTbl, whereClause)
+        muKeys, muVal, muValPct, muRatedPct, muAreasyms = gSSURGO_MonthArrays.Mo_MaxMin(dMonths, MonthWindowColumns(), bHigh)
+        monthRecs = list()
 
-        #PrintMsg(" \nSQL: " + whereClause, 1)
-        #PrintMsg("Fields: " + str(inFlds), 1)
+        for i in range(len(muKeys)):
+            ratings = list()
 
-        with arcpy.da.SearchCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
+            for j in range(muVal.shape[1]):
+                rating = gSSURGO_MonthArrays.Decode(dMonths, muVal[i, j])
 
-            # MUKEY,COKEY , COMPPCT_R, attribcolumn
-            for rec in cur:
+                # Same tests as the original rating loop: the highest rating must be above 0 and
+                # the lowest rating must be below nullRating.
+                if rating is None or (bHigh and not rating > 0) or (not bHigh and not rating < nullRating):
+                    ratings.append([int(muRatedPct[i, j]), nullRating])
 
-                mukey, cokey, compPct, rating, areasym = rec
-                dAreasym[mukey] = areasym
-                #PrintMsg("\t" + str(rec), 1)
+                else:
+                    ratings.append([int(muValPct[i, j]), rating])
 
+            monthRecs.append([muKeys[i], muAreasyms[i], ratings])
 
-                # Save list of cokeys for each mapunit-mukey
-                try:
-                    if not cokey in dMapunit[mukey]:
-                        dMapunit[mukey].append(cokey)
+        return WriteMonthTable(initialTbl, monthRecs)
 
-                except:
-                    dMapunit[mukey] = [cokey]
+    except MyError, e:
+        PrintMsg(str(e), 2)
+        return outputTbl, outputValues
 
-                try:
-                    # Save list of rating values along with comppct for each component
-                    if not rating is None:
-                        dComponent[cokey][1].append(rating)
+    except:
+        errorMsg()
+        return outputTbl, outputValues
 
-                except:
-                    #  Save list of rating values along with comppct for each component
-                    if not rating is None:
-                        dComponent[cokey] = [compPct, [rating]]
+## ===================================================================================
+def AggregateCo_Mo_DCD(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker):
+    #
+    # Aggregate mapunit-component data to the map unit level using the dominant condition
+    # based upon the TieBreak rule.
+    # Use this for COMONTH table. Example Depth to Water Table.
+    #
+    # The highest or lowest monthly rating of the first component is used. Null ratings and
+    # months without records count as 201cm.
+    #
+    # The monthly ratings are read into component x month arrays (gSSURGO_MonthArrays), so that
+    # every month window in monthWindows is rated from a single read. A single window is rated
+    # with the original loop (gSSURGO_MonthArrays.RefMo_*), which is faster for one window.
 
-        if tieBreaker == dSDV["tiebreakhighlabel"]:
-            # This is working correctly for DTWT
-            # Backwards for Ponding
+    try:
+        arcpy.SetProgressorLabel("Aggregating rating information to the map unit level")
 
-            # Identify highest value for each component
-            for cokey, coVals in dComponent.items():
-                # Find high value for each component
-                #PrintMsg("Higher values for " + cokey + ": " + str(coVals) + " = " + str(max(coVals[1])), 1)
-                dCoRating[cokey] = max(coVals[1])
+        if bVerbose:
+            PrintMsg(" \nCurrent function : " + sys._getframe().f_code.co_name, 1)
 
-        else:
-            # This is working correctly for DTWT
-            # Backwards for Ponding
+        outputTbl = os.path.join(sdvGDB, tblName)
+        outputValues = list()
+        whereClause = "COMPPCT_R >=  " + str(cutOff)  # Leave in NULLs and try to substitute dSDV["nullratingreplacementvalue"]
+        bHigh = (tieBreaker == dSDV["tiebreakhighlabel"])
 
-            # Identify lowest value for each component
-            for cokey, coVals in dComponent.items():
-                # Find low rating value for each component
-                #PrintMsg("Lower values for " + cokey + ": " + str(coVals) + " = " + str(min(coVals[1])), 1)
-                dCoRating[cokey] = min(coVals[1])
+        if len(monthWindows) == 0:
+            # One month window. The original loop is faster than building the month arrays.
+            rows = ReadMonthRows(initialTbl, whereClause)
+            return WriteMonthTable(initialTbl, LoopMonthRecords(rows, gSSURGO_MonthArrays.RefMo_DCD(rows, bHigh)))
 
+        dMonths = ReadMonthData(initialTbl, whereClause)
+        muKeys, muPct, muVal, muAreasyms = gSSURGO_MonthArrays.Mo_DCD(dMonths, MonthWindowColumns(), bHigh, 201)
+        monthRecs = list()
 
-        dFinalRatings = dict()  # final dominant condition. mukey is key
+        for i in range(len(muKeys)):
+            ratings = list()
 
-        for mukey, cokeys in dMapunit.items():
-            # accumulate ratings for each mapunit by sum of comppct
-            dMuRatings = dict()  # create a dictionary of values for just this map unit
-            domPct = 0
+            for j in range(muVal.shape[1]):
+                if math.isnan(muPct[i, j]):
+                    # The first component has a comppct of 0
+                    ratings.append([None, None])
 
-            for cokey in cokeys:
-                # look at values for each component within the map unit
-                try:
-                    rating = dCoRating[cokey]
-                    compPct = dComponent[cokey][0]
+                else:
+                    ratings.append([int(muPct[i, j]), gSSURGO_MonthArrays.Decode(dMonths, muVal[i, j])])
 
-                    try:
-                        dMuRatings[rating] += compPct
+            monthRecs.append([muKeys[i], muAreasyms[i], ratings])
 
-                    except:
-                        dMuRatings[rating] = compPct
+        return WriteMonthTable(initialTbl, monthRecs)
 
-                except:
-                    pass
+    except MyError, e:
+        PrintMsg(str(e), 2)
+        return outputTbl, outputValues
 
-            if tieBreaker == dSDV["tiebreakhighlabel"]:
-                # This is working correctly for DTWT
-                # Backwards for Ponding
-                highRating = 0
-
-                for rating, compPct in dMuRatings.items():
-                    # Find the highest
-                    if rating > highRating:
-                        highRating = rating
-                        dFinalRatings[mukey] = [compPct, rating]
-            else:
-                # This is working correctly for DTWT
-                # Backwards for Ponding
-                lowRating = nullRating
+    except:
+        errorMsg()
+        return outputTbl, outputValues
 
-                for rating, compPct in dMuRatings.items():
 
-                    if rating < lowRating and rating is not None:
-                        lowRating = rating
-                        dFinalRatings[mukey] = [compPct, rating]
+## ===================================================================================
+def MonthDomainCodes():
+    # Domain index for each uppercase rating value (dValues), used to code the monthly ratings
+    dCodes = dict()
 
-            del dMuRatings
+    for key, vals in dValues.items():
+        dCodes[str(key).upper()] = vals[0]
 
-        with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
-            # Write final ratings to output table
-            for mukey in sorted(dMapunit):
+    return dCodes
 
-                try:
-                    vals = dFinalRatings[mukey]
+## ===================================================================================
+def FixDomainCase(ratingValues):
+    # Use the case of the rating values in the data for the domain values. maplegendxml can
+    # have Title Case values where the data has Sentence case.
+    for rating in ratingValues:
+        if rating.upper() in dValues and not rating in domainValues:
+            dValues[rating.upper()][1] = rating
 
-                except:
-                    sumPct = 0
-                    for cokey in dMapunit[mukey]:
-                        try:
-                            sumPct += dComponent[cokey][0]
+            for i in range(len(domainValues)):
+                if str(domainValues[i]).upper() == rating.upper():
+                    domainValues[i] = rating
 
-                        except:
-                            pass
+## ===================================================================================
+def MonthDomainRecords(dMonths, muKeys, muPct, muIdx, muAreasyms):
+    # Map unit records for WriteMonthTable from the domain index kernels. Map units without
+    # a rated component are not written.
+    monthRecs = list()
 
-                    vals = [sumPct, nullRating]
+    if bVerbose and len(dMonths["missing"]) > 0:
+        PrintMsg(" \nSkipping rating values that are not in the domain: " + ", ".join([str(val) for val in dMonths["missing"]]), 1)
 
-                rec = mukey, vals[0], vals[1], dAreasym[mukey]
-                ocur.insertRow(rec)
+    for i in range(len(muKeys)):
+        ratings = list()
 
-                if not rec[2] is None and not rec[2] in outputValues:
-                    outputValues.append(rec[2])
+        for j in range(muIdx.shape[1]):
+            if math.isnan(muPct[i, j]):
+                ratings.append(None)
 
-        outputValues.sort()
-        return outputTbl, outputValues
+            else:
+                ratings.append([int(muPct[i, j]), domainValues[int(muIdx[i, j])]])
 
-    except MyError, e:
-        PrintMsg(str(e), 2)
-        return outputTbl, outputValues
+        monthRecs.append([muKeys[i], muAreasyms[i], ratings])
 
-    except:
-        errorMsg()
-        return outputTbl, outputValues
+    return monthRecs
 
 ## ===================================================================================
-def AggregateCo_Mo_DCD(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker):
+def AggregateCo_Mo_DCP_Domain(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker):
     #
-    # Aggregate mapunit-component data to the map unit level using the dominant condition
-    # based upon the TieBreak rule.
-    # Use this for COMONTH table. Example Depth to Water Table.
+    # Use this function for Flooding or Ponding Frequency which involves the COMONTH table
     #
-    # It appears that WSS includes 0 percent components in the MinMax. This function
-    # is currently set to duplicate this behavior
+    # Each component is rated by its highest or lowest domain value (tiebreaker) for the months,
+    # then the map unit gets the rating of the component with the highest comppct. Components
+    # with the same comppct are decided by the tiebreaker.
+    #
+    # Ratings are coded with the domain index (dValues) and read into component x month arrays
+    # (gSSURGO_MonthArrays), so that every month window in monthWindows is rated from a single read.
+    # A single window is rated with the original loop (gSSURGO_MonthArrays.RefMo_Domain).
+    # Rating values that are not in the domain are skipped.
     #
-    # Currently there is a problem with the comppct. It ends up being 12X.
 
     try:
-        #
         arcpy.SetProgressorLabel("Aggregating rating information to the map unit level")
 
         if bVerbose:
             PrintMsg(" \nCurrent function : " + sys._getframe().f_code.co_name, 1)
+            PrintMsg(" \ndValues for " + dSDV["attributelogicaldatatype"] + " values: " + str(dValues), 1)
 
-        # Create final output table with MUKEY, COMPPCT_R and sdvFld
-        outputTbl = os.path.join(gdb, tblName)
-        #attribcolumn = dSDV["attributecolumnname"].upper()
-        #resultcolumn = dSDV["resultcolumnname"].upper()
-
-        inFlds = ["MUKEY", "COKEY", "COMPPCT_R", dSDV["attributecolumnname"].upper(), "AREASYMBOL"]
-        outFlds = ["MUKEY", "COMPPCT_R", dSDV["resultcolumnname"].upper(), "AREASYMBOL"]
-        whereClause = "COMPPCT_R >=  " + str(cutOff)  # Leave in NULLs and try to substitute dSDV["nullratingreplacementvalue"]
-        #whereClause = "COMPPCT_R >=  " + str(cutOff) + " and not " + dSDV["attributecolumnname"].upper() + " is null"
-        sqlClause =  (None, " ORDER BY MUKEY ASC, COMPPCT_R DESC")
-
-        if arcpy.Exists(outputTbl):
-            arcpy.Delete_management(outputTbl)
-
-        outputTbl = CreateOutputTable(initialTbl, outputTbl, dFieldInfo)
+        outputTbl = os.path.join(sdvGDB, tblName)
         outputValues = list()
+        whereClause = "COMPPCT_R >=  " + str(cutOff) + " AND " + dSDV["attributecolumnname"].upper() + " IS NOT NULL"
+        bHigh = (tieBreaker == dSDV["tiebreakhighlabel"])
 
-        if outputTbl == "":
-            return outputTbl, outputValues
-
-        dMapunit = dict()
-        dComponent = dict()
-        dCoRating = dict()
-        dAreasym = dict()
-
-        #PrintMsg(" \nSQL: " + whereClause, 1)
-        #PrintMsg("Fields: " + str(inFlds), 1)
-
-        with arcpy.da.SearchCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
-
-            # MUKEY,COKEY , COMPPCT_R, attribcolumn
-            for rec in cur:
-                #mukey = rec[0]; cokey = rec[1]; compPct = rec[2]; rating = rec[3]
-                mukey, cokey, compPct, rating, areasym = rec
-                if rating is None:
-                    rating = 201
-
-                # Save list of cokeys for each mapunit-mukey
-                try:
-                    if not cokey in dMapunit[mukey]:
-                        dMapunit[mukey].append(cokey)
-
-                except:
-                    dMapunit[mukey] = [cokey]
-                    dAreasym[mukey] = areasym
-                    PrintMsg(" \nCheck dAreasymbols setting", 1)
-
-                try:
-                    # if the rating value meets the tiebreak rule, save the rating value along with comppct for each component
-                    #if not rating is None:
-                    if tieBreaker == dSDV["tiebreakhighlabel"]:
-                        if rating > dComponent[cokey][1]:
-                            dComponent[cokey][1] = rating
-
-                    elif rating < dComponent[cokey][1]:
-                        dComponent[cokey][1] = rating
-
-                except:
-                    #  Save rating value along with comppct for each component
-                    if not rating is None:
-                        dComponent[cokey] = [compPct, rating]
-
-        dFinalRatings = dict()  # final dominant condition. mukey is key
-
-        for mukey, cokeys in dMapunit.items():
-            # accumulate ratings for each mapunit by sum of comppct
-            dMuRatings = dict()
-            dMuRatings[mukey] = [None, None]  # create a dictionary of values for just this map unit
-            domPct = 0
+        if not dSDV["attributelogicaldatatype"].lower() in ["string", "float", "integer", "choice"]:
+            raise MyError, "Problem with handling domain values of type '" + dSDV["attributelogicaldatatype"] + "'"
 
-            for cokey in cokeys:
-                # look at values for each component within the map unit
-                if cokey in dComponent:
+        if len(monthWindows) == 0:
+            # One month window. The original loop is faster than building the month arrays.
+            rows = ReadMonthRows(initialTbl, whereClause)
 
-                    compPct, rating = dComponent[cokey]
+            if dSDV["attributelogicaldatatype"].lower() != "string":
+                FixDomainCase(sorted(set([row[4] for row in rows if not row[4] is None])))
 
-                    if compPct > domPct:
-                        domPct = compPct
-                        dMuRatings[mukey] = [compPct, rating]
-                        #PrintMsg("\t" + mukey + ":" + cokey  + ", " + str(compPct) + "%, " + str(rating), 1)
+            dFinal = gSSURGO_MonthArrays.RefMo_Domain(rows, bHigh, MonthDomainCodes(), False)
+            return WriteMonthTable(initialTbl, LoopMonthRecords(rows, dFinal, domainValues))
 
-            dFinalRatings[mukey] = dMuRatings[mukey]
+        dMonths = ReadMonthData(initialTbl, whereClause, MonthDomainCodes())
 
-        with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
-            # Write final ratings to output table
-            for mukey in sorted(dFinalRatings):
-                compPct, rating = dFinalRatings[mukey]
-                rec = mukey, compPct, rating, dAreasym[mukey]
-                ocur.insertRow(rec)
+        if dSDV["attributelogicaldatatype"].lower() != "string":
+            # compare actual rating values to domainValues to make sure case is correct
+            FixDomainCase(dMonths["values"])
 
-                if not rating is None and not rating in outputValues:
-                    outputValues.append(rating)
+        muKeys, muPct, muIdx, muAreasyms = gSSURGO_MonthArrays.Mo_DCP_Domain(dMonths, MonthWindowColumns(), bHigh)
 
-        outputValues.sort()
-        return outputTbl, outputValues
+        return WriteMonthTable(initialTbl, MonthDomainRecords(dMonths, muKeys, muPct, muIdx, muAreasyms))
 
     except MyError, e:
         PrintMsg(str(e), 2)
@@ -6267,236 +6150,60 @@ def AggregateCo_Mo_DCD(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreak
         errorMsg()
         return outputTbl, outputValues
 
-
 ## ===================================================================================
-def AggregateCo_Mo_DCP_Domain(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker):
+def AggregateCo_Mo_DCD_Domain(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker):
     #
-    # Use this function for Flooding or Ponding Frequency which involves the COMONTH table
+    # Flooding or ponding frequency, dominant condition
     #
-    # Need to modify this so that COMPPCT_R is summed using just one value per component, not 12X.
+    # Aggregate mapunit-component data to the map unit level using dominant condition.
+    # Use domain values to determine sort order for tiebreaker
     #
-    # We have a case problem with Flooding Frequency Class: 'Very frequent'
+    # Each component is rated by its highest or lowest domain value (tiebreaker) for the months,
+    # comppct is summed for each rating and the rating with the highest sum is used. Equal sums
+    # are decided by the tiebreaker.
     #
-    # My tests on ND035 appear to return results based upon dominant condition, not dominant component!
+    # Using global dValues[key = uppercase-domain value] value = [sequence, domain value]
     #
+    # Ratings are coded with the domain index and read into component x month arrays
+    # (gSSURGO_MonthArrays), so that every month window in monthWindows is rated from a single read.
+    # A single window is rated with the original loop (gSSURGO_MonthArrays.RefMo_Domain).
+    # Rating values that are not in the domain (example: "Common" is an obsolete Ponding Frequency
+    # Class) are skipped.
 
     try:
-        # bVerbose = True
         arcpy.SetProgressorLabel("Aggregating rating information to the map unit level")
 
-        #
         if bVerbose:
             PrintMsg(" \nCurrent function : " + sys._getframe().f_code.co_name, 1)
+            PrintMsg(" \n**domainValues for " + dSDV["attributelogicaldatatype"] + " values: " + str(domainValues) + " \n ", 1)
 
-        # Create final output table with MUKEY, COMPPCT_R and sdvFld
-        outputTbl = os.path.join(gdb, tblName)
-
-        inFlds = ["MUKEY", "COKEY", "COMPPCT_R", dSDV["attributecolumnname"].upper(), "AREASYMBOL"]
-        outFlds = ["MUKEY", "COMPPCT_R", dSDV["resultcolumnname"].upper(), "AREASYMBOL"]
+        outputTbl = os.path.join(sdvGDB, tblName)
+        outputValues = list()
         whereClause = "COMPPCT_R >=  " + str(cutOff) + " AND " + dSDV["attributecolumnname"].upper() + " IS NOT NULL"
+        bHigh = (tieBreaker == dSDV["tiebreakhighlabel"])
 
-        # initialTbl must be in a file geodatabase to support ORDER_BY
-        # Do I really need to sort by attribucolumn when it will be replaced by Domain values later?
-        sqlClause =  (None, " ORDER BY MUKEY ASC, COMPPCT_R DESC")
+        if not dSDV["attributelogicaldatatype"].lower() in ["string", "vtext", "float", "integer", "choice"]:
+            raise MyError, "Problem with handling domain values of type '" + dSDV["attributelogicaldatatype"]
 
+        if len(monthWindows) == 0:
+            # One month window. The original loop is faster than building the month arrays.
+            rows = ReadMonthRows(initialTbl, whereClause)
 
-        if arcpy.Exists(outputTbl):
-            arcpy.Delete_management(outputTbl)
+            if dSDV["tiebreakdomainname"] is None:
+                FixDomainCase(sorted(set([row[4] for row in rows if not row[4] is None])))
 
-        outputTbl = CreateOutputTable(initialTbl, outputTbl, dFieldInfo)
-        outputValues = list()
-
-        if outputTbl == "":
-            return outputTbl, outputValues
-
-        lastCokey = "xxxx"
-        dComp = dict()
-        dCompPct = dict()
-        dMapunit = dict()
-        missingDomain = list()
-        dCase = dict()
-        dAreasym = dict()
-
-        # Read initial table for non-numeric data types
-        # 02-03-2016 Try adding 'choice' to this method to see if it handles Cons. Tree/Shrub better
-        # than the next method. Nope, did not work. Still have case problems.
-        #
-        if dSDV["attributelogicaldatatype"].lower() == "string":
-            PrintMsg(" \n*dValues for " + dSDV["attributelogicaldatatype"] + " values: " + str(dValues), 1)
-
-            with arcpy.da.SearchCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
-
-                for rec in cur:
-                    dAreasym[rec[0]] = rec[4]
-                    rating = rec[3]
-
-                    try:
-                        # capture component ratings as index numbers instead.
-                        dComp[rec[1]].append(dValues[rating.upper()][0])
-
-                    except:
-                        dComp[rec[1]] = [dValues[rating.upper()][0]]
-                        dCompPct[rec[1]] = rec[2]
-                        dCase[rating.upper()] = rating  # save original value using uppercase key
-
-
-                        # save list of components for each mapunit
-                        try:
-                            dMapunit[rec[0]].append(rec[1])
-
-                        except:
-                            dMapunit[rec[0]] = [rec[1]]
-
-        elif dSDV["attributelogicaldatatype"].lower() in ["float", "integer", "choice"]:
-
-            PrintMsg(" \n**dValues for " + dSDV["attributelogicaldatatype"] + " values: " + str(dValues), 1)
-
-            with arcpy.da.SearchCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
-
-                for rec in cur:
-                    dAreasym[rec[0]] = rec[4]
-                    rating = rec[3]
-
-                    try:
-                        # capture component ratings as index numbers instead
-                        if rating is None:
-                            dComp[rec[1]].append(dValues["<Null>"][0])
-
-                        else:
-                            dComp[rec[1]].append(dValues[rating.upper()][0])
-
-                    except:
-                        #PrintMsg(" \ndomainValues is empty, but legendValues has " + str(legendValues), 1)
-                        dCase[rating.upper()] = rating
-
-                        if rating.upper() in dValues:
-                            dComp[rec[1]] = [dValues[rating.upper()][0]]
-                            dCompPct[rec[1]] = rec[2]
-
-                            # compare actual rating value to domainValues to make sure case is correct
-                            if not rating in domainValues: # this is a case problem
-                                # replace the original dValue item
-                                dValues[rating.upper()][1] = rating
-
-                                # replace the value in domainValues list
-                                for i in range(len(domainValues)):
-                                    if domainValues[i].upper() == rating.upper():
-                                        domainValues[i] = rating
-
-                        else:
-                            # dValues is keyed on uppercase string rating
-                            #
-                            if not rating in missingDomain:
-                                # Try to add missing value to dDomainValues dict and domainValues list
-                                dValues[rating.upper()] = [len(dValues), rating]
-                                #domainValues.append(rating])
-                                #domainValuesUp.append(rating.upper()
-                                #missingDomain.append(rating)
-                                PrintMsg("\tAdding value '" + str(rating) + "' to domainValues", 1)
-
-                        # save list of components for each mapunit
-                        try:
-                            dMapunit[rec[0]].append(rec[1])
-
-                        except:
-                            dMapunit[rec[0]] = [rec[1]]
-
-        else:
-            PrintMsg(" \nProblem with handling domain values of type '" + dSDV["attributelogicaldatatype"] + "'", 1)
-
-
-        # Aggregate monthly index values to a single value for each component
-        # Sort depending upon tiebreak setting
-        # Update dictionary with a single index value for each component
-        #
-        # Testing on 2017-11-07 shows that I'm ending up with lower ratings when tiebreak is set High
-        #PrintMsg(" \nNot sure about this sorting code for tiebreaker", 1)
-
-        if tieBreaker == dSDV["tiebreakhighlabel"]:
-            # "Higher" (default for flooding and ponding frequency)
-            #PrintMsg(" \nTiebreak High: " + dSDV["tiebreakhighlabel"], 1)
-            for cokey, indexes in dComp.items():
-                val = sorted(indexes, reverse=True)[0]  #original that does not work
-                #val = sorted(indexes, reverse=False)[0]  #test 1
-                dComp[cokey] = val
-        else:
-            #PrintMsg(" \nTiebreak low: " + dSDV["tiebreaklowlabel"], 1)
-            for cokey, indexes in dComp.items():
-                val = sorted(indexes)[0]
-                dComp[cokey] = val
-
-        # Save list of component data to each mapunit
-        dRatings = dict()
-
-        with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
-
-            if tieBreaker == dSDV["tiebreakhighlabel"]:
-                # Default for flooding and ponding frequency
-                #
-                #PrintMsg(" \ndomainValues: " + str(domainValues), 1)
-
-                for mukey, cokeys in dMapunit.items():
-                    dRating = dict()   # save sum of comppct for each rating within a mapunit
-                    muVals = list()   # may not need this for DCD
-
-                    for cokey in cokeys:
-                        #PrintMsg("\tB ratingIndx: " + str(dComp[cokey]), 1)
-                        compPct = dCompPct[cokey]
-                        ratingIndx = dComp[cokey]
-                        muVals.append([compPct, ratingIndx])
-
-                        # I think this section of code is in effect doing a dominant condition
-                        # Fixed 2017-11-07
-                        #if ratingIndx in dRating:
-                        #    sumPct = dRating[ratingIndx] + compPct
-                        #    dRating[ratingIndx] = sumPct  # this part could be compacted
-
-                        #else:
-                        #    dRating[ratingIndx] = compPct
-
-                        # End of bad code
-
-                    #for rating, compPct in dRating.items():
-                    #    muVals.append([compPct, rating])
-
-                    #newVals = sorted(muVals, key = lambda x : (-x[0], x[1]))[0]  # Works for maplegendkey=2
-                    #newVals = sorted(sorted(muVals, key = lambda x : x[0], reverse=True), key = lambda x : x[1], reverse=True)[0]
-
-                    muVal = SortData(muVals, 0, 1, True, True)
-                    newrec = [mukey, muVal[0], domainValues[muVal[1]], dAreasym[mukey]]
-                    ocur.insertRow(newrec)
-
-                    if  not newrec[2] is None and not newrec[2] in outputValues:
-                        outputValues.append(newrec[2])
-
-            else:
-                # Lower
-                PrintMsg(" \nFinal lower tiebreaker", 1)
-
-                for mukey, cokeys in dMapunit.items():
-                    dRating = dict()  # save sum of comppct for each rating within a mapunit
-                    muVals = list()   # may not need this for DCD
-
-                    for cokey in cokeys:
-                        try:
-                            #PrintMsg("\tA ratingIndx: " + str(dComp[cokey]), 1)
-                            compPct = dCompPct[cokey]
-                            ratingIndx = dComp[cokey]
-                            muVals.append([compPct, ratingIndx])
+            dFinal = gSSURGO_MonthArrays.RefMo_Domain(rows, bHigh, MonthDomainCodes(), True)
+            return WriteMonthTable(initialTbl, LoopMonthRecords(rows, dFinal, domainValues))
 
-                        except:
-                            pass
-
-                    muVal = SortData(muVals, 0, 1, True, False)
-                    newrec = [mukey, muVal[0], domainValues[muVal[1]], dAreasym[mukey]]
-                    ocur.insertRow(newrec)
+        dMonths = ReadMonthData(initialTbl, whereClause, MonthDomainCodes())
 
-                    if not newrec[2] is None and not newrec[2] in outputValues:
-                        outputValues.append(newrec[2])
+        if dSDV["tiebreakdomainname"] is None:
+            # There are no domain values. Make sure that the legend values are the same as the output values.
+            FixDomainCase(dMonths["values"])
 
+        muKeys, muPct, muIdx, muAreasyms = gSSURGO_MonthArrays.Mo_DCD_Domain(dMonths, MonthWindowColumns(), bHigh)
 
-        outputValues.sort()
-        return outputTbl, outputValues
+        return WriteMonthTable(initialTbl, MonthDomainRecords(dMonths, muKeys, muPct, muIdx, muAreasyms))
 
     except MyError, e:
         PrintMsg(str(e), 2)
@@ -6507,7 +6214,7 @@ def AggregateCo_Mo_DCP_Domain(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, t
         return outputTbl, outputValues
 
 ## ===================================================================================
-def AggregateCo_Mo_DCD_Domain(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker):
+def AggregateCo_Mo_DCD_DomainBak(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker):
     #
     # Flooding or ponding frequency, dominant condition
     #
@@ -6516,8 +6223,6 @@ def AggregateCo_Mo_DCD_Domain(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, t
     #
     # Need to modify this function to correctly sum the comppct_r for the final output table.
 
-    # Using global dValues[key = uppercase-domain value] value = [sequence, domain value]
-
     try:
         arcpy.SetProgressorLabel("Aggregating rating information to the map unit level")
 
@@ -6528,7 +6233,7 @@ def AggregateCo_Mo_DCD_Domain(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, t
             PrintMsg(" \nCurrent function : " + sys._getframe().f_code.co_name, 1)
 
         # Create final output table with MUKEY, COMPPCT_R and sdvFld
-        outputTbl = os.path.join(gdb, tblName)
+        outputTbl = os.path.join(sdvGDB, tblName)
 
         inFlds = ["MUKEY", "COKEY", "COMPPCT_R", dSDV["attributecolumnname"].upper(), "AREASYMBOL"]
         outFlds = ["MUKEY", "COMPPCT_R", dSDV["resultcolumnname"].upper(), "AREASYMBOL"]
@@ -6552,10 +6257,9 @@ def AggregateCo_Mo_DCD_Domain(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, t
         if outputTbl == "":
             return outputTbl, outputValues
 
-        dComp = dict()     # Try replacing this and dCompPct with dCompRating
+        lastCokey = "xxxx"
+        dComp = dict()
         dCompPct = dict()
-        dCompRating = dict()  # Dictionary with cokey as key, tuple(compPct, ratingIndx)
-        
         dMapunit = dict()
         missingDomain = list()
         dAreasym = dict()
@@ -6574,7 +6278,7 @@ def AggregateCo_Mo_DCD_Domain(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, t
                 PrintMsg("domainValues for " + dSDV["attributelogicaldatatype"] + " values: " + str(domainValues), 1)
                 PrintMsg((40 * '*'), 1)
 
-            with arcpy.da.SearchCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
+            with InitialTableCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
 
                 if bVerbose:
                     PrintMsg(" \nReading initial data...", 1)
@@ -6583,9 +6287,8 @@ def AggregateCo_Mo_DCD_Domain(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, t
                     # "MUKEY", "COKEY", "COMPPCT_R", RATING
                     mukey, cokey, compPct, rating, areasym = rec
                     dAreasym[mukey] = areasym
-                    #dComp[cokey] = rating
-                    #dCompPct[cokey] = compPct
-                    dCompRating[cokey] = [compPct, rating]
+                    dComp[cokey] = rating
+                    dCompPct[cokey] = compPct
                     #dCase[str(rating).upper()] = rating  # save original value using uppercase key
 
                     # save list of components for each mapunit
@@ -6597,11 +6300,11 @@ def AggregateCo_Mo_DCD_Domain(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, t
 
         elif dSDV["attributelogicaldatatype"].lower() in ["string", "float", "integer", "choice"]:
             # Interp or numeric soil properties
-            # Flooding and Ponding Frequency would fall in the second section below that has a domain
+            # Flooding and Ponding would fall in this section
 
             if len(domainValues) > 1 and not "None" in domainValues:
                 PrintMsg(" \n******************* Immediately adding 'None' to dValues ****************" , 1)
-                #dValues["<NULL>"] = [len(dValues), None]
+                dValues["<Null>"] = [len(dValues), None]
                 #domainValues.append("None")
 
             if bVerbose:
@@ -6612,10 +6315,10 @@ def AggregateCo_Mo_DCD_Domain(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, t
             if  dSDV["tiebreakdomainname"] is None:
                 # There are no domain values. We must make sure that the legend values are the same as
                 # the output values.
-                # 
+                #
                 PrintMsg(" \nNo domain name for this property", 1)
 
-                with arcpy.da.SearchCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
+                with InitialTableCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
 
                     if bVerbose:
                         PrintMsg(" \nReading initial data...", 1)
@@ -6642,10 +6345,11 @@ def AggregateCo_Mo_DCD_Domain(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, t
                                 if str(rating).upper() in dValues:
                                     #if mukey == '2780145':
                                     #    PrintMsg("\t*Target mapunit rating '" + rating + "' assigning index '" + str(dValues[str(rating).upper()][0]) + "' to dComp", 1)
+
+                                    dComp[cokey] = dValues[str(rating).upper()][0]  # think this is bad
                                     #dComp[cokey] = rating
                                     dValues[str(rating).upper()][1] = rating
-                                    #dCompPct[cokey] = compPct
-                                    dCompRating[cokey] = [compPct, dValues[str(rating).upper()][0]]
+                                    dCompPct[cokey] = compPct
 
                                     # compare actual rating value to domainValues to make sure case is correct
                                     #
@@ -6660,7 +6364,6 @@ def AggregateCo_Mo_DCD_Domain(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, t
                                             if str(domainValues[i]).upper() == str(rating).upper():
                                                 domainValues[i] = rating
 
-
                                 else:
                                     # dValues is keyed on uppercase string rating or is Null
                                     #
@@ -6669,130 +6372,116 @@ def AggregateCo_Mo_DCD_Domain(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, t
                                     #
                                     #PrintMsg("\tdValue not found for: " + str(rec), 1)
                                     if not str(rating) in missingDomain:
+                                        #if mukey == '2780145':
+                                        #    PrintMsg("\t**Target mapunit rating '" + rating + "' assigning index '" + str(dValues[str(rating).upper()][0]) + "' to dComp", 1)
+
                                         # Try to add missing value to dDomainValues dict and domainValues list
-                                        #dComp[cokey] = len(dValues)
+                                        dComp[cokey] = len(dValues)
                                         dValues[str(rating).upper()] = [len(dValues), rating]
                                         domainValues.append(rating)
                                         #domainValuesUp.append(str(rating).upper())
                                         missingDomain.append(str(rating))
-                                        #dCompPct[cokey] = compPct
-                                        dCompRating[cokey] = [compPct, rating]
-                                                          
+                                        dCompPct[cokey] = compPct
 
                                         #PrintMsg("\tAdding value '" + str(rating) + "' to domainValues", 1)
 
                             else:
                                 # Rating is Null
-                                #dComp[cokey] = dValues["<Null>"][0]
+                                dComp[cokey] = dValues["<Null>"][0]
                                 #dComp[cokey] = rating
                                 #dValues[str(rating).upper()][1] = rating
-                                #dCompPct[cokey] = compPct
-                                dCompRating[cokey] = [compPct, None]
+                                dCompPct[cokey] = compPct
 
                                 #if mukey == '2780145':
                                 #    PrintMsg("\t***Target mapunit rating '" + rating + "' assigning index '" + str(dValues["<Null>"][0]) + "' to dComp", 1)
 
 
+            else:
+                # New code
+                PrintMsg(" \nDomain name for this property: '" + dSDV["tiebreakdomainname"] + "'", 1)
 
+                with InitialTableCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
+                    if bVerbose:
+                        PrintMsg(" \nReading initial data from " + initialTbl + "...", 1)
 
-            else:
-                # New code for Ponding Frequency which has a domain
-                #
-                #PrintMsg(" \nDomain name for this property: '" + dSDV["tiebreakdomainname"] + "'", 1)
-                #PrintMsg(" \ndomainValues: " + str(domainValues) + " \n ", 1)
-                #PrintMsg(" \ndValues: " + str(dValues), 1)
+                    for rec in cur:
+                        mukey, cokey, compPct, rating, areasym = rec
+                        dAreasym[mukey] = areasym
+                        # "MUKEY", "COKEY", "COMPPCT_R", RATING
 
-                if tieBreaker == dSDV["tiebreakhighlabel"]:
-                    
-                    with arcpy.da.SearchCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
-                        if bVerbose:
-                            PrintMsg(" \nReading initial data from " + initialTbl + "...", 1)
+                        # save list of components for each mapunit
+                        try:
+                            dMapunit[mukey].append(cokey)
 
-                        for rec in cur:
-                            mukey, cokey, compPct, ratingClass, areasym = rec
-                            mukey = int(mukey)
-                            cokey = int(cokey)
-                            dAreasym[mukey] = areasym
+                        except:
+                            dMapunit[mukey] = [cokey]
 
-                            if not ratingClass is None:
+                        # this is a new component record. create a new dictionary item.
+                        #
+                        if not cokey in dComp:
+
+                            if not rating is None:
 
-                                # Get the rating sequence number from the ordered domain
-                                try:
-                                    ratingIndx = dValues[str(ratingClass).upper()][0]
 
-                                    # this is a new component record. create a new dictionary item.
-                                    #
-                                    if not cokey in dCompRating:
-                                        # save list of components for each mapunit
-                                        dCompRating[cokey] = [compPct, ratingIndx]
-                                        
-                                        try:
-                                            # existing mapunit
-                                            dMapunit[mukey].append(cokey)
-
-                                        except:
-                                            # new mapunit
-                                            dMapunit[mukey] = [cokey]
-
-                                    else:
-                                        # other months for this component
-                                        # if this new index is greater than the old one, keep  it
-                                        oldIndx = dCompRating[cokey][1]
-                                        
-                                        if oldIndx < ratingIndx:
-                                            dCompRating[cokey][1] = ratingIndx
 
-                                except KeyError:
-                                    # encountered value that is not a member of the domain
-                                    # Example: "Common" is obsolete value in the Ponding Frequency Class
-                                    pass
 
+                                if str(rating).upper() in dValues:
+                                    
+                                    ratingIndx = dValues[str(rating).upper()][0]
                                     
-                elif tieBreaker == dSDV["tiebreaklowlabel"]:
+                                    try:
+                                        #PrintMsg("\tNew rating '" + rating + "' assigning index'" + str(dValues[str(rating).upper()][0]) + "' to dComp", 1)
+                                        PrintMsg("\tMapunit " + mukey +  " component " + cokey + " assigned rating of '" + rating + "' using index " + str(dValues[str(rating).upper()][0]) + " for component " + cokey, 0)
+                                        dComp[cokey] = dValues[str(rating).upper()][0]  # CONUS memory error in CONUS: cokey 15106347
+                                        dCompPct[cokey] = compPct
 
-                    with arcpy.da.SearchCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
-                        if bVerbose:
-                            PrintMsg(" \nReading initial data from " + initialTbl + "...", 1)
+                                    except:
+                                        # Here's where I'm running out of memory on CONUS Ponding Frequency
+                                        #
+                                        PrintMsg("\tFailed at Mapunit rating of '" + rating + "' assigned using index '" + str(dValues[str(rating).upper()][0]) + " cokey " + cokey, 1)
+                                        raise MyError, "MemoryError: Cokey for target mapunit: " + cokey
 
-                        for rec in cur:
-                            mukey, cokey, compPct, ratingClass, areasym = rec
-                            mukey = int(mukey)
-                            cokey = int(cokey)
-                            dAreasym[mukey] = areasym
 
-                            if not ratingClass is None:
 
-                                # Get the rating sequence number from the ordered domain
-                                try:
-                                    ratingIndx = dValues[str(ratingClass).upper()][0]
 
-                                    # this is a new component record. create a new dictionary item.
+                                    # compare actual rating value to domainValues to make sure case is correct
+                                    if not rating in domainValues: # this is a case problem
+                                        # replace the original dValue item
+                                        dValues[str(rating).upper()][1] = rating
+
+                                        # replace the value in domainValues list
+                                        for i in range(len(domainValues)):
+                                            if str(domainValues[i]).upper() == str(rating).upper():
+                                                domainValues[i] = rating
+
+
+                                else:
+                                    # dValues is keyed on uppercase string rating or is Null
                                     #
-                                    if not cokey in dCompRating:
-                                        # save list of components for each mapunit
-                                        dCompRating[cokey] = [compPct, ratingIndx]
-                                        
-                                        try:
-                                            # existing mapunit
-                                            dMapunit[mukey].append(cokey)
-
-                                        except:
-                                            # new mapunit
-                                            dMapunit[mukey] = [cokey]
-
-                                    else:
-                                        # other months for this component
-                                        # if this new index is greater than the old one, keep  it
-                                        oldIndx = dCompRating[cokey][1]
-                                        
-                                        if oldIndx > ratingIndx:
-                                            dCompRating[cokey][1] = ratingIndx
+                                    # Conservation Tree Shrub has some values not found in the domain.
+                                    # How can this be? Need to check with George?
+                                    #
+                                    #PrintMsg("\tdValue not found for: " + str(rec), 1)
+                                    if not str(rating) in missingDomain:
+                                        # Try to add missing value to dDomainValues dict and domainValues list
+                                        dComp[cokey] = len(dValues)
+                                        dValues[str(rating).upper()] = [len(dValues), rating]
+                                        domainValues.append(rating)
+                                        #domainValuesUp.append(str(rating).upper())
+                                        missingDomain.append(str(rating))
+                                        dCompPct[cokey] = compPct
+
+                                        #if mukey == '2780145':
+                                        #    PrintMsg("\t*****Target mapunit rating '" + rating + "' assigning index '" + str(dValues[str(rating).upper()][0]) + "' to dComp", 1)
+
+
+                            else:
+                                dComp[cokey] = dValues["<Null>"][0]  #
+                                dCompPct[cokey] = compPct
+
+                                #if mukey == '2780145':
+                                #    PrintMsg("\t******Target mapunit rating " + str(rating) + " assigning index '" + str(dValues["<Null>"][0]) + "' to dComp", 1)
 
-                                except KeyError:
-                                    # encountered value that is not a member of the domain
-                                    # Example: "Common" is obsolete value in the Ponding Frequency Class
-                                    pass
-                    
 
         else:
             raise MyError, "Problem with handling domain values of type '" + dSDV["attributelogicaldatatype"]
@@ -6824,83 +6513,93 @@ def AggregateCo_Mo_DCD_Domain(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, t
                     # Since this is COMONTH data, each cokey could be listed 12X.
                     dRating = dict()  # save sum of comppct for each rating within a mapunit
                     muVals = list()   # may not need this for DCD
+                    #PrintMsg("\t" + mukey + " cokeys: " + str(cokeys), 1)
 
                     for cokey in cokeys:
+                        try:
+                            #PrintMsg("\tA ratingIndx: " + str(dComp[cokey]), 1)
+                            compPct = dCompPct[cokey]
+                            ratingIndx = dComp[cokey]
 
-                        compPct, ratingIndx = dCompRating[cokey]
-                            
-                        if ratingIndx in dRating:
-                            dRating[ratingIndx] += compPct
-
-                        else:
-                            dRating[ratingIndx] = compPct
-                        
-                    for ratingIndx, compPct in dRating.items():
-                        muVals.append([compPct, ratingIndx])
-
-                    if len(muVals) > 0:
-                        #This is the final aggregation from component to map unit rating
-                        muVal = SortData(muVals, 0, 1, True, True)  # high
-                        #muVal = SortData(muVals, 0, 1, True, False) # low
-                        del dRating
+                            if ratingIndx in dRating:
+                                sumPct = dRating[ratingIndx] + compPct
+                                dRating[ratingIndx] = sumPct
 
-                        try:
-                            # Get final rating class value using index
-                            ratingClass = domainValues[muVal[1]]
-                            compPct = muVal[0]
+                            else:
+                                dRating[ratingIndx] = compPct
 
                         except:
-                            raise MyError, "Failed to get rating for muVals: " + str(muVals)
-                        
-                        newrec = [mukey, compPct, ratingClass, dAreasym[mukey]]
-                        ocur.insertRow(newrec)
+                            pass
+
+                    for rating, compPct in dRating.items():
+                        muVals.append([compPct, rating])
+
+                    #This is the final aggregation from component to map unit rating
+                    muVal = SortData(muVals, 0, 1, True, True)
+                    comppct = muVal[0] / 12
+                    newrec = [mukey, comppct, domainValues[muVal[1]], dAreasym[mukey]]
+                    ocur.insertRow(newrec)
 
-                        if not ratingClass is None and not ratingClass in outputValues:
-                            outputValues.append(ratingClass)
+                    if not newrec[2] is None and not newrec[2] in outputValues:
+                        outputValues.append(newrec[2])
+
+        else:
+            # tieBreaker Lower
+            # Overhauling this tiebreaker lower, need to do the rest once it is working properly
+            #
+            #PrintMsg(" \nActually in Lower tiebreaker code", 1)
+            #PrintMsg("dMapunit has " + str(len(dMapunit)) + " records", 1 )
 
-        elif tieBreaker == dSDV["tiebreaklowlabel"]:
             with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
 
+                # Process all mapunits
                 for mukey, cokeys in dMapunit.items():
-                    # Since this is COMONTH data, each cokey could be listed 12X.
                     dRating = dict()  # save sum of comppct for each rating within a mapunit
                     muVals = list()   # may not need this for DCD
+                    #PrintMsg("\t" + mukey + ":" + str(cokeys), 1)
 
                     for cokey in cokeys:
+                        try:
+                            comppct = dCompPct[cokey]
+                            ratingIndx = dComp[cokey]
+                            #PrintMsg("\t" + cokey + " index: " + str(ratingIndx), 1)
 
-                        compPct, ratingIndx = dCompRating[cokey]
-                            
-                        if ratingIndx in dRating:
-                            dRating[ratingIndx] += compPct
+                            if ratingIndx in dRating:
+                                sumPct = dRating[ratingIndx] + comppct
+                                dRating[ratingIndx] = sumPct  # this part could be compacted
 
-                        else:
-                            dRating[ratingIndx] = compPct
-                        
-                    for ratingIndx, compPct in dRating.items():
-                        muVals.append([compPct, ratingIndx])
+                            else:
+                                dRating[ratingIndx] = comppct
+
+                        except:
+                            errorMsg()
+
+                    for ratingIndx, comppct in dRating.items():
+                        muVals.append([comppct, ratingIndx])  # This muVal is not being populated
+
+                    #PrintMsg("\t" + str(dRating), 1)
 
                     if len(muVals) > 0:
-                        #This is the final aggregation from component to map unit rating
-                        muVal = SortData(muVals, 0, 1, True, False) # low
-                        del dRating
+                        muVal = SortData(muVals, 0, 1, True, False)
+                        #PrintMsg("\tMukey: " + mukey + ", " + str(muVal), 1)
+                        comppct = muVal[0] / 12
+                        ratingIndx = muVal[1]
+                        #compPct, ratingIndx = muVal
+                        rating = domainValues[ratingIndx]
 
-                        try:
-                            # Get final rating class value using index
-                            ratingClass = domainValues[muVal[1]]
-                            compPct = muVal[0]
+                    else:
+                        rating = None
+                        comppct = None
 
-                        except:
-                            raise MyError, "Failed to get rating for muVals: " + str(muVals)
-                        
-                        newrec = [mukey, compPct, ratingClass, dAreasym[mukey]]
-                        ocur.insertRow(newrec)
+                    #PrintMsg(" \n" + tieBreaker + ". Checking index values for mukey " + mukey + ": " + str(muVal[0]) + ", " + str(domainValues[muVal[1]]), 1)
+                    #PrintMsg("\tGetting mukey " + mukey + " rating: " + str(rating), 1)
+                    newrec = [mukey, comppct, rating, dAreasym[mukey]]
+
+                    ocur.insertRow(newrec)
 
-                        if not ratingClass is None and not ratingClass in outputValues:
-                            outputValues.append(ratingClass)
+                    if not rating is None and not rating in outputValues:
+                        outputValues.append(rating)
 
-        del dComp
-        del dCompPct
-        del dAreasym
         outputValues.sort()
         return outputTbl, outputValues
 
@@ -6912,39 +6611,83 @@ def AggregateCo_Mo_DCD_Domain(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, t
         errorMsg()
         return outputTbl, outputValues
 
+
 ## ===================================================================================
-def AggregateCo_Mo_DCD_DomainBak(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker):
+def AggregateCo_Mo_WTA(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker):
     #
-    # Flooding or ponding frequency, dominant condition
+    # Aggregate monthly depth to water table to the map unit level using a special type
+    # of Weighted average.
     #
-    # Aggregate mapunit-component data to the map unit level using dominant condition.
-    # Use domain values to determine sort order for tiebreaker
+    # Web Soil Survey takes only the Lowest or Highest of the monthly values from
+    # each component and calculates the weighted average of those.
+    #
+    # The monthly ratings are read into component x month arrays (gSSURGO_MonthArrays), so that
+    # every month window in monthWindows is rated from a single read. A single window is rated
+    # with the original loop (gSSURGO_MonthArrays.RefMo_*), which is faster for one window.
     #
-    # Need to modify this function to correctly sum the comppct_r for the final output table.
 
     try:
         arcpy.SetProgressorLabel("Aggregating rating information to the map unit level")
 
+        if bVerbose:
+            PrintMsg(" \nCurrent function : " + sys._getframe().f_code.co_name, 1)
+
+        outputTbl = os.path.join(sdvGDB, tblName)
+        outputValues = list()
+        whereClause = "COMPPCT_R >=  " + str(cutOff)  # Leave in NULLs and try to substitute dSDV["nullratingreplacementvalue"]
+        bHigh = (tieBreaker == dSDV["tiebreakhighlabel"])
+
+        if len(monthWindows) == 0:
+            # One month window. The original loop is faster than building the month arrays.
+            rows = ReadMonthRows(initialTbl, whereClause)
+            return WriteMonthTable(initialTbl, LoopMonthRecords(rows, gSSURGO_MonthArrays.RefMo_WTA(rows, bHigh)))
+
+        dMonths = ReadMonthData(initialTbl, whereClause)
+        muKeys, muPct, muVal, muAreasyms = gSSURGO_MonthArrays.Mo_WTA(dMonths, MonthWindowColumns(), bHigh)
+        monthRecs = list()
+
+        for i in range(len(muKeys)):
+            ratings = list()
+
+            for j in range(muVal.shape[1]):
+                if math.isnan(muVal[i, j]):
+                    # No rated components
+                    ratings.append([int(muPct[i, j]), None])
+
+                else:
+                    ratings.append([int(muPct[i, j]), muVal[i, j]])
+
+            monthRecs.append([muKeys[i], muAreasyms[i], ratings])
+
+        return WriteMonthTable(initialTbl, monthRecs)
+
+    except MyError, e:
+        PrintMsg(str(e), 2)
+        return outputTbl, outputValues
+
+    except:
+        errorMsg()
+        return outputTbl, outputValues
+
+## ===================================================================================
+def AggregateCo_WTA_DTWT(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker, bZero):
+    #
+    # In the process of converting DCD to WTA
+
+    try:
         #
-        #bVerbose = False
+        arcpy.SetProgressorLabel("Aggregating rating information to the map unit level")
+
+        #PrintMsg(" \nTesting nullRating variable: " + str(nullRating), 1)
 
         if bVerbose:
             PrintMsg(" \nCurrent function : " + sys._getframe().f_code.co_name, 1)
 
         # Create final output table with MUKEY, COMPPCT_R and sdvFld
-        outputTbl = os.path.join(gdb, tblName)
-
+        outputTbl = os.path.join(sdvGDB, tblName)
         inFlds = ["MUKEY", "COKEY", "COMPPCT_R", dSDV["attributecolumnname"].upper(), "AREASYMBOL"]
         outFlds = ["MUKEY", "COMPPCT_R", dSDV["resultcolumnname"].upper(), "AREASYMBOL"]
-
-        if bNulls:
-            whereClause = "COMPPCT_R >=  " + str(cutOff) + " AND " + dSDV["attributecolumnname"].upper() + " IS NOT NULL"
-
-        else:
-            whereClause = "COMPPCT_R >=  " + str(cutOff)
-
-        # initialTbl must be in a file geodatabase to support ORDER_BY
-        # Do I really need to sort by attribucolumn when it will be replaced by Domain values later?
+        whereClause = "COMPPCT_R >=  " + str(cutOff)  # Leave in NULLs and try to substitute 200
         sqlClause =  (None, " ORDER BY MUKEY ASC, COMPPCT_R DESC")
 
         if arcpy.Exists(outputTbl):
@@ -6956,388 +6699,302 @@ def AggregateCo_Mo_DCD_DomainBak(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff
         if outputTbl == "":
             return outputTbl, outputValues
 
-        lastCokey = "xxxx"
-        dComp = dict()
-        dCompPct = dict()
         dMapunit = dict()
-        missingDomain = list()
+        dComponent = dict()
+        dCoRating = dict()
         dAreasym = dict()
-        #dCase = dict()
 
-        # Read initial table for non-numeric soil properties. Capture domain values and all component ratings.
-        #
-        if not dSDV["attributetype"].lower() == "interpretation" and dSDV["attributelogicaldatatype"].lower() in ["string", "vtext"]:  # Changed here 2016-04-28
-            #
-            # No domain values for non-interp string ratings
-            # !!! Probably never using this section of code.
-            #
-            if bVerbose:
-                PrintMsg((40 * '*'), 1)
-                PrintMsg(" \n*dValues for " + dSDV["attributelogicaldatatype"] + " values: " + str(dValues), 1)
-                PrintMsg("domainValues for " + dSDV["attributelogicaldatatype"] + " values: " + str(domainValues), 1)
-                PrintMsg((40 * '*'), 1)
+        with InitialTableCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
 
-            with arcpy.da.SearchCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
+            # MUKEY,COKEY , COMPPCT_R, attribcolumn
+            for rec in cur:
+                #mukey = rec[0]
+                #cokey = rec[1]
+                #compPct = rec[2]
+                #rating = rec[3]
+                mukey, cokey, compPct, rating, areasym = rec
 
-                if bVerbose:
-                    PrintMsg(" \nReading initial data...", 1)
+                dAreasym[mukey] = areasym
 
-                for rec in cur:
-                    # "MUKEY", "COKEY", "COMPPCT_R", RATING
-                    mukey, cokey, compPct, rating, areasym = rec
-                    dAreasym[mukey] = areasym
-                    dComp[cokey] = rating
-                    dCompPct[cokey] = compPct
-                    #dCase[str(rating).upper()] = rating  # save original value using uppercase key
+                if rating is None:
+                    rating = nullRating
 
-                    # save list of components for each mapunit
-                    try:
+                # Save list of cokeys for each mukey
+                try:
+                    if not cokey in dMapunit[mukey]:
                         dMapunit[mukey].append(cokey)
 
-                    except:
-                        dMapunit[mukey] = [cokey]
-
-        elif dSDV["attributelogicaldatatype"].lower() in ["string", "float", "integer", "choice"]:
-            # Interp or numeric soil properties
-            # Flooding and Ponding would fall in this section
+                except:
+                    dMapunit[mukey] = [cokey]
 
-            if len(domainValues) > 1 and not "None" in domainValues:
-                PrintMsg(" \n******************* Immediately adding 'None' to dValues ****************" , 1)
-                dValues["<Null>"] = [len(dValues), None]
-                #domainValues.append("None")
+                try:
+                    # Save list of rating values along with comppct for each component
+                    dComponent[cokey][1].append(rating)
 
-            if bVerbose:
-                PrintMsg(" \n**domainValues for " + dSDV["attributelogicaldatatype"] + " values: " + str(domainValues) + " \n ", 1)
-                PrintMsg(" \n**dValues for " + dSDV["attributelogicaldatatype"] + " values: " + str(dValues), 1)
+                except:
+                    #  Save list of rating values along with comppct for each component
+                    dComponent[cokey] = [compPct, [rating]]
 
 
-            if  dSDV["tiebreakdomainname"] is None:
-                # There are no domain values. We must make sure that the legend values are the same as
-                # the output values.
-                #
-                PrintMsg(" \nNo domain name for this property", 1)
+        if tieBreaker == dSDV["tiebreakhighlabel"]:
+            for cokey, coVals in dComponent.items():
+                # Find high value for each component
+                dCoRating[cokey] = max(coVals[1])
 
-                with arcpy.da.SearchCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
+        else:
+            for cokey, coVals in dComponent.items():
+                # Find low value for each component
+                dCoRating[cokey] = min(coVals[1])
 
-                    if bVerbose:
-                        PrintMsg(" \nReading initial data...", 1)
+        dFinalRatings = dict()  # final dominant condition. mukey is key
 
-                    for rec in cur:
-                        mukey, cokey, compPct, rating, areasym = rec
-                        dAreasym[mukey] = areasym
-                        # "MUKEY", "COKEY", "COMPPCT_R", RATING
-                        #PrintMsg("\t" + str(rec), 1)
-                        # save list of components for each mapunit
-                        try:
-                            dMapunit[mukey].append(cokey)
+        for mukey, cokeys in dMapunit.items():
+            # accumulate ratings for each mapunit by sum of comppct
+            sumPct = 0
+            muProd = 0
 
-                        except:
-                            dMapunit[mukey] = [cokey]
+            for cokey in cokeys:
+                # look at values for each component within the map unit
+                rating = dCoRating[cokey]
+                compPct = dComponent[cokey][0]
 
-                        # this is a new component record. create a new dictionary item.
-                        #
-                        if not cokey in dComp:
+                #if rating != nullRating:
+                if not rating is None:
+                    # Don't include the 201 (originally null) depths in the WTA calculation
+                    sumPct += compPct            # sum comppct for the mapunit
+                    muProd += (rating * compPct)   # calculate product of component percent and component rating
 
-                            if not rating is None:
-                                dCase[str(rating).upper()] = rating
+            if sumPct > 0:
+                dFinalRatings[mukey] = [sumPct, round(float(muProd) / sumPct)]
 
-                                if str(rating).upper() in dValues:
-                                    #if mukey == '2780145':
-                                    #    PrintMsg("\t*Target mapunit rating '" + rating + "' assigning index '" + str(dValues[str(rating).upper()][0]) + "' to dComp", 1)
+            else:
+                # now replace the nulls with 201
+                dFinalRatings[mukey] = [100, nullRating]
 
-                                    dComp[cokey] = dValues[str(rating).upper()][0]  # think this is bad
-                                    #dComp[cokey] = rating
-                                    dValues[str(rating).upper()][1] = rating
-                                    dCompPct[cokey] = compPct
-
-                                    # compare actual rating value to domainValues to make sure case is correct
-                                    #
-                                    # This does not make sense. domainValues must be coming from maplegendxml.
-                                    #
-                                    if not rating in domainValues: # this is a case problem
-                                        # replace the original dValue item
-                                        dValues[str(rating).upper()][1] = rating
-
-                                        # replace the value in domainValues list
-                                        for i in range(len(domainValues)):
-                                            if str(domainValues[i]).upper() == str(rating).upper():
-                                                domainValues[i] = rating
-
-                                else:
-                                    # dValues is keyed on uppercase string rating or is Null
-                                    #
-                                    # Conservation Tree Shrub has some values not found in the domain.
-                                    # How can this be? Need to check with George?
-                                    #
-                                    #PrintMsg("\tdValue not found for: " + str(rec), 1)
-                                    if not str(rating) in missingDomain:
-                                        #if mukey == '2780145':
-                                        #    PrintMsg("\t**Target mapunit rating '" + rating + "' assigning index '" + str(dValues[str(rating).upper()][0]) + "' to dComp", 1)
-
-                                        # Try to add missing value to dDomainValues dict and domainValues list
-                                        dComp[cokey] = len(dValues)
-                                        dValues[str(rating).upper()] = [len(dValues), rating]
-                                        domainValues.append(rating)
-                                        #domainValuesUp.append(str(rating).upper())
-                                        missingDomain.append(str(rating))
-                                        dCompPct[cokey] = compPct
-
-                                        #PrintMsg("\tAdding value '" + str(rating) + "' to domainValues", 1)
-
-                            else:
-                                # Rating is Null
-                                dComp[cokey] = dValues["<Null>"][0]
-                                #dComp[cokey] = rating
-                                #dValues[str(rating).upper()][1] = rating
-                                dCompPct[cokey] = compPct
-
-                                #if mukey == '2780145':
-                                #    PrintMsg("\t***Target mapunit rating '" + rating + "' assigning index '" + str(dValues["<Null>"][0]) + "' to dComp", 1)
-
-
-            else:
-                # New code
-                PrintMsg(" \nDomain name for this property: '" + dSDV["tiebreakdomainname"] + "'", 1)
+        with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
+            # Write final ratings to output table
+            for mukey, vals in dFinalRatings.items():
+                rec = mukey, vals[0], vals[1], dAreasym[mukey]
+                ocur.insertRow(rec)
 
-                with arcpy.da.SearchCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
-                    if bVerbose:
-                        PrintMsg(" \nReading initial data from " + initialTbl + "...", 1)
+                if not vals[1] is None and not vals[1] in outputValues:
+                    outputValues.append(vals[1])
 
-                    for rec in cur:
-                        mukey, cokey, compPct, rating, areasym = rec
-                        dAreasym[mukey] = areasym
-                        # "MUKEY", "COKEY", "COMPPCT_R", RATING
+        outputValues.sort()
+        return outputTbl, outputValues
 
-                        # save list of components for each mapunit
-                        try:
-                            dMapunit[mukey].append(cokey)
+    except MyError, e:
+        PrintMsg(str(e), 2)
+        return outputTbl, outputValues
 
-                        except:
-                            dMapunit[mukey] = [cokey]
+    except:
+        errorMsg()
+        return outputTbl, outputValues
 
-                        # this is a new component record. create a new dictionary item.
-                        #
-                        if not cokey in dComp:
 
-                            if not rating is None:
+## ===================================================================================
+def AggregateCo_DCD_Domain(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker):
+    #
+    # Flooding or ponding frequency, dominant condition
+    #
+    # Aggregate mapunit-component data to the map unit level using dominant condition.
+    # Use domain values to determine sort order for tiebreaker
+    #
+    # Problem with domain values for some indexes which are numeric. Need to accomodate for
+    # domain key values which cannot be 'uppercased'.
+    #
+    # Some domain values are not found in the data and vise versa.
+    #
+    # Bad problem 2016-06-08.
+    # Noticed that my final rating table may contain multiple ratings (tiebreak) for a map unit. This creates
+    # a funky join that may display a different map color than the Identify value shows for the polygon. NIRRCAPCLASS.
+    # Added areasymbol to output
+    #
+    # Conservation Tree and Shrub group are located in the component table
+    # This has domain values and component values which are all lowercase
+    # The maplegendxml is all uppercase
+    #
+    # I think I need to loop through each output value from the table, find the UPPER match and
+    # then alter the legend value and label to match the output value.
+    #
+    # Nov 2017 problem noticed with Irrigated Capability Class where null values are not used
+    # as the dominant condition. Fixed.
+    #
 
+    try:
+        arcpy.SetProgressorLabel("Aggregating rating information to the map unit level")
 
+        #
+        #bVerbose = True
 
+        if bVerbose:
+            PrintMsg(" \nCurrent function : " + sys._getframe().f_code.co_name, 1)
 
-                                if str(rating).upper() in dValues:
-                                    
-                                    ratingIndx = dValues[str(rating).upper()][0]
-                                    
-                                    try:
-                                        #PrintMsg("\tNew rating '" + rating + "' assigning index'" + str(dValues[str(rating).upper()][0]) + "' to dComp", 1)
-                                        PrintMsg("\tMapunit " + mukey +  " component " + cokey + " assigned rating of '" + rating + "' using index " + str(dValues[str(rating).upper()][0]) + " for component " + cokey, 0)
-                                        dComp[cokey] = dValues[str(rating).upper()][0]  # CONUS memory error in CONUS: cokey 15106347
-                                        dCompPct[cokey] = compPct
+        # Create final output table with MUKEY, COMPPCT_R and sdvFld
+        outputTbl = os.path.join(sdvGDB, tblName)
 
-                                    except:
-                                        # Here's where I'm running out of memory on CONUS Ponding Frequency
-                                        #
-                                        PrintMsg("\tFailed at Mapunit rating of '" + rating + "' assigned using index '" + str(dValues[str(rating).upper()][0]) + " cokey " + cokey, 1)
-                                        raise MyError, "MemoryError: Cokey for target mapunit: " + cokey
+        inFlds = ["MUKEY", "COKEY", "COMPPCT_R", dSDV["attributecolumnname"].upper(), "AREASYMBOL"]
+        outFlds = ["MUKEY", "COMPPCT_R", dSDV["resultcolumnname"].upper(), "AREASYMBOL"]
 
+        # Default setting is to include Null values as part of the aggregation process
+        if bNulls:
+            #PrintMsg(" \nIncluding components with null rating values...", 1)
+            whereClause = "COMPPCT_R >=  " + str(cutOff)
 
+        else:
+            #PrintMsg(" \nSkipping components with null rating values...", 1)
+            whereClause = "COMPPCT_R >=  " + str(cutOff) + " AND " + dSDV["attributecolumnname"].upper() + " IS NOT NULL"
 
+        # initialTbl must be in a file geodatabase to support ORDER_BY
+        # Do I really need to sort by attribucolumn when it will be replaced by Domain values later?
+        # Rows are read in MUKEY ASC, COMPPCT_R DESC order using the dominant component index
+        # (ComponentOrderCursor) instead of an ORDER BY on the initial table.
 
-                                    # compare actual rating value to domainValues to make sure case is correct
-                                    if not rating in domainValues: # this is a case problem
-                                        # replace the original dValue item
-                                        dValues[str(rating).upper()][1] = rating
+        if arcpy.Exists(outputTbl):
+            arcpy.Delete_management(outputTbl)
 
-                                        # replace the value in domainValues list
-                                        for i in range(len(domainValues)):
-                                            if str(domainValues[i]).upper() == str(rating).upper():
-                                                domainValues[i] = rating
+        outputTbl = CreateOutputTable(initialTbl, outputTbl, dFieldInfo)
+        outputValues = list()
 
+        if outputTbl == "":
+            #PrintMsg("\nCreateOutputTable returned nothing", 1)
+            return outputTbl, outputValues
 
-                                else:
-                                    # dValues is keyed on uppercase string rating or is Null
-                                    #
-                                    # Conservation Tree Shrub has some values not found in the domain.
-                                    # How can this be? Need to check with George?
-                                    #
-                                    #PrintMsg("\tdValue not found for: " + str(rec), 1)
-                                    if not str(rating) in missingDomain:
-                                        # Try to add missing value to dDomainValues dict and domainValues list
-                                        dComp[cokey] = len(dValues)
-                                        dValues[str(rating).upper()] = [len(dValues), rating]
-                                        domainValues.append(rating)
-                                        #domainValuesUp.append(str(rating).upper())
-                                        missingDomain.append(str(rating))
-                                        dCompPct[cokey] = compPct
+        # Read initial table for non-numeric data types. Capture all component ratings.
+        #
+        if bVerbose:
+            PrintMsg(" \nReading initial data...", 1)
+            PrintMsg(whereClause, 1)
+            initCnt = InitialTableCount(initialTbl)
+            PrintMsg("\nInput table contains " + Number_Format(initCnt, 0, True) + " records", 1)
+            PrintMsg("Data is from " + dSDV["attributecolumnname"].upper() + " column", 1)
+            PrintMsg(dSDV["attributetype"] + " attribute logical data type: " + dSDV["attributelogicaldatatype"].lower(), 1)
 
-                                        #if mukey == '2780145':
-                                        #    PrintMsg("\t*****Target mapunit rating '" + rating + "' assigning index '" + str(dValues[str(rating).upper()][0]) + "' to dComp", 1)
+        mukeys = list()
+        cokeys = list()
+        compPcts = list()
+        ratings = list()
+        dAreasym = dict()
 
+        with ComponentOrderCursor(initialTbl, inFlds, whereClause) as cur:
 
-                            else:
-                                dComp[cokey] = dValues["<Null>"][0]  #
-                                dCompPct[cokey] = compPct
+            for rec in cur:
+                # "MUKEY", "COKEY", "COMPPCT_R", RATING, "AREASYMBOL"
+                mukey, cokey, compPct, rating, areasym = rec
+                mukeys.append(mukey)
+                cokeys.append(cokey)
+                compPcts.append(compPct)
+                ratings.append(rating)
+                dAreasym[mukey] = areasym
 
-                                #if mukey == '2780145':
-                                #    PrintMsg("\t******Target mapunit rating " + str(rating) + " assigning index '" + str(dValues["<Null>"][0]) + "' to dComp", 1)
+        if not dSDV["attributetype"].lower() == "interpretation" and dSDV["attributelogicaldatatype"].lower() in ["string", "vtext"]:  # Changed here 2016-04-28
+            # No domain values for non-interp string ratings. Use the sorted ratings as the domain
+            # so that ties go to the higher or lower value.
+            #
+            dDomain = gSSURGO_DomainCodes.DomainCodes(sorted(set(ratings)))
 
+        elif dSDV["attributelogicaldatatype"].lower() in ["string", "float", "integer", "choice"]:
+            # Domain values from mdstatdomdet or the map legend. CreateSoilMap has already put
+            # None at the beginning (higher tiebreak) or the end (lower tiebreak) of the domain.
+            #
+            dDomain = gSSURGO_DomainCodes.DomainCodes(domainValues)
 
         else:
             raise MyError, "Problem with handling domain values of type '" + dSDV["attributelogicaldatatype"]
 
-        # Aggregate monthly index values to a single value for each component??? Would it not be better to
-        # create a new function for COMONTH-DCD? Then I could simplify this function.
+        if bVerbose:
+            PrintMsg(" \n" + dSDV["attributetype"] + " values for " + dSDV["attributelogicaldatatype"] + " data type: " + str(dValues), 1)
+            PrintMsg(" \ndomainValues for " + dSDV["attributelogicaldatatype"] + " values: " + str(domainValues) + " \n ", 1)
+            PrintMsg("tiebreakdomainname: " + str(dSDV["tiebreakdomainname"]), 1)
+
+        # Each distinct rating is coded once. Ratings that differ from the domain only in case replace the
+        # domain value (Conservation Tree and Shrub group is lowercase, the maplegendxml is uppercase).
+        # Some ratings are not in the domain at all (Conservation Tree Shrub) and are added to the end of it.
         #
-        # Sort depending upon tiebreak setting
-        # Update dictionary with a single index value for each component
-        #if not dSDV["attributelogicaldatatype"].lower() in ["string", "vText"]:
+        codes, addedValues, fixedValues = gSSURGO_DomainCodes.EncodeRatings(dDomain, ratings)
 
-        if bVerbose:
-            PrintMsg(" \nAggregating to a single value per component which would generally only apply to COMONTH properties?", 1)
+        if dDomain["values"] is domainValues:
+            for rating in fixedValues:
+                key = gSSURGO_DomainCodes.DomainKey(rating)
+                dValues[key] = [dDomain["codes"][key], rating]
 
+            for rating in addedValues:
+                PrintMsg("\tdValue not found for: " + str(rating), 1)
+                key = gSSURGO_DomainCodes.DomainKey(rating)
+                dValues[key] = [dDomain["codes"][key], rating]
+                domainValuesUp.append(key)
 
-        # Save list of component rating data to each mapunit, sort and write out
-        # a single map unit rating
+        # Sum comppct for each coded rating within a map unit and pick the highest sum. Equal sums are
+        # decided by the position in the domain, depending upon the tiebreak setting.
         #
-        dRatings = dict()
-
         if bVerbose:
             PrintMsg(" \nWriting map unit rating data to final output table", 1)
             PrintMsg(" \nUsing tiebreaker '" + tieBreaker + "' (where choices are " + dSDV["tiebreaklowlabel"] + " or " + dSDV["tiebreakhighlabel"] + ")", 1)
 
-        if tieBreaker == dSDV["tiebreakhighlabel"]:
-            with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
-
-                for mukey, cokeys in dMapunit.items():
-                    # Since this is COMONTH data, each cokey could be listed 12X.
-                    dRating = dict()  # save sum of comppct for each rating within a mapunit
-                    muVals = list()   # may not need this for DCD
-                    #PrintMsg("\t" + mukey + " cokeys: " + str(cokeys), 1)
-
-                    for cokey in cokeys:
-                        try:
-                            #PrintMsg("\tA ratingIndx: " + str(dComp[cokey]), 1)
-                            compPct = dCompPct[cokey]
-                            ratingIndx = dComp[cokey]
+        bHigh = (tieBreaker == dSDV["tiebreakhighlabel"])
+        muRatings = gSSURGO_DomainCodes.MapunitRatings(mukeys, cokeys, compPcts, codes, dDomain["rank"][bHigh])
+        del mukeys, cokeys, compPcts, ratings, codes
 
-                            if ratingIndx in dRating:
-                                sumPct = dRating[ratingIndx] + compPct
-                                dRating[ratingIndx] = sumPct
+        with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
 
-                            else:
-                                dRating[ratingIndx] = compPct
+            for mukey, compPct, ratingIndx in muRatings:
+                if ratingIndx is None:
+                    rating = None
 
-                        except:
-                            pass
+                else:
+                    rating = dDomain["values"][ratingIndx]
 
-                    for rating, compPct in dRating.items():
-                        muVals.append([compPct, rating])
+                newrec = [mukey, compPct, rating, dAreasym[mukey]]
+                ocur.insertRow(newrec)
 
-                    #This is the final aggregation from component to map unit rating
-                    muVal = SortData(muVals, 0, 1, True, True)
-                    comppct = muVal[0] / 12
-                    newrec = [mukey, comppct, domainValues[muVal[1]], dAreasym[mukey]]
-                    ocur.insertRow(newrec)
+                if not rating is None and not rating in outputValues:
+                    outputValues.append(rating)
 
-                    if not newrec[2] is None and not newrec[2] in outputValues:
-                        outputValues.append(newrec[2])
+        outputValues.sort()
+        return outputTbl, outputValues
 
-        else:
-            # tieBreaker Lower
-            # Overhauling this tiebreaker lower, need to do the rest once it is working properly
-            #
-            #PrintMsg(" \nActually in Lower tiebreaker code", 1)
-            #PrintMsg("dMapunit has " + str(len(dMapunit)) + " records", 1 )
-
-            with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
-
-                # Process all mapunits
-                for mukey, cokeys in dMapunit.items():
-                    dRating = dict()  # save sum of comppct for each rating within a mapunit
-                    muVals = list()   # may not need this for DCD
-                    #PrintMsg("\t" + mukey + ":" + str(cokeys), 1)
-
-                    for cokey in cokeys:
-                        try:
-                            comppct = dCompPct[cokey]
-                            ratingIndx = dComp[cokey]
-                            #PrintMsg("\t" + cokey + " index: " + str(ratingIndx), 1)
-
-                            if ratingIndx in dRating:
-                                sumPct = dRating[ratingIndx] + comppct
-                                dRating[ratingIndx] = sumPct  # this part could be compacted
-
-                            else:
-                                dRating[ratingIndx] = comppct
-
-                        except:
-                            errorMsg()
-
-                    for ratingIndx, comppct in dRating.items():
-                        muVals.append([comppct, ratingIndx])  # This muVal is not being populated
-
-                    #PrintMsg("\t" + str(dRating), 1)
-
-                    if len(muVals) > 0:
-                        muVal = SortData(muVals, 0, 1, True, False)
-                        #PrintMsg("\tMukey: " + mukey + ", " + str(muVal), 1)
-                        comppct = muVal[0] / 12
-                        ratingIndx = muVal[1]
-                        #compPct, ratingIndx = muVal
-                        rating = domainValues[ratingIndx]
-
-                    else:
-                        rating = None
-                        comppct = None
-
-                    #PrintMsg(" \n" + tieBreaker + ". Checking index values for mukey " + mukey + ": " + str(muVal[0]) + ", " + str(domainValues[muVal[1]]), 1)
-                    #PrintMsg("\tGetting mukey " + mukey + " rating: " + str(rating), 1)
-                    newrec = [mukey, comppct, rating, dAreasym[mukey]]
-
-                    ocur.insertRow(newrec)
-
-                    if not rating is None and not rating in outputValues:
-                        outputValues.append(rating)
-
-        outputValues.sort()
-        return outputTbl, outputValues
-
-    except MyError, e:
-        PrintMsg(str(e), 2)
-        return outputTbl, outputValues
-
-    except:
-        errorMsg()
-        return outputTbl, outputValues
+    except MyError, e:
+        PrintMsg(str(e), 2)
+        return outputTbl, outputValues
 
+    except:
+        errorMsg()
+        return outputTbl, outputValues
 
 ## ===================================================================================
-def AggregateCo_Mo_WTA(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker):
+def AggregateCo_DCP_Domain(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker):
+    # Not being use.
     #
-    # Aggregate monthly depth to water table to the map unit level using a special type
-    # of Weighted average.
+    # I may not use this function. Trying to handle ratings with domain values using the
+    # standard AggregateCo_DCP function
     #
-    # Web Soil Survey takes only the Lowest or Highest of the monthly values from
-    # each component and calculates the weighted average of those.
+    # Flooding or ponding frequency, dominant component with domain values
+    #
+    # Use domain values to determine sort order for tiebreaker
     #
+    # Problem with domain values for some indexes which are numeric. Need to accomodate for
+    # domain key values which cannot be 'uppercased'.
+    # Added areasymbol to output
 
     try:
-        #
         arcpy.SetProgressorLabel("Aggregating rating information to the map unit level")
 
+        #
         if bVerbose:
             PrintMsg(" \nCurrent function : " + sys._getframe().f_code.co_name, 1)
 
         # Create final output table with MUKEY, COMPPCT_R and sdvFld
-        outputTbl = os.path.join(gdb, tblName)
-        #attribcolumn = dSDV["attributecolumnname"].upper()
-        #resultcolumn = dSDV["resultcolumnname"].upper()
+        outputTbl = os.path.join(sdvGDB, tblName)
 
         inFlds = ["MUKEY", "COKEY", "COMPPCT_R", dSDV["attributecolumnname"].upper(), "AREASYMBOL"]
         outFlds = ["MUKEY", "COMPPCT_R", dSDV["resultcolumnname"].upper(), "AREASYMBOL"]
-        whereClause = "COMPPCT_R >=  " + str(cutOff)  # Leave in NULLs and try to substitute dSDV["nullratingreplacementvalue"]
+        whereClause = "COMPPCT_R >=  " + str(cutOff) + " AND " + dSDV["attributecolumnname"].upper() + " IS NOT NULL"
+
+        # initialTbl must be in a file geodatabase to support ORDER_BY
+        # Do I really need to sort by attribucolumn when it will be replaced by Domain values later?
         sqlClause =  (None, " ORDER BY MUKEY ASC, COMPPCT_R DESC")
 
+
         if arcpy.Exists(outputTbl):
             arcpy.Delete_management(outputTbl)
 
@@ -7347,221 +7004,180 @@ def AggregateCo_Mo_WTA(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreak
         if outputTbl == "":
             return outputTbl, outputValues
 
+        lastCokey = "xxxx"
+        dComp = dict()
+        dCompPct = dict()
         dMapunit = dict()
-        dComponent = dict()
-        dCoRating = dict()
+        missingDomain = list()
+        dCase = dict()
         dAreasym = dict()
 
-        #PrintMsg(" \nSQL: " + whereClause, 1)
-        #PrintMsg("Fields: " + str(inFlds), 1)
+        # Read initial table for non-numeric data types
+        # 02-03-2016 Try adding 'choice' to this method to see if it handles Cons. Tree/Shrub better
+        # than the next method. Nope, did not work. Still have case problems.
+        #
+        if dSDV["attributelogicaldatatype"].lower() == "string":
+            # PrintMsg(" \ndomainValues for " + dSDV["attributelogicaldatatype"].lower() + "-type values : " + str(domainValues), 1)
 
-        with arcpy.da.SearchCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
+            with InitialTableCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
 
-            # MUKEY,COKEY , COMPPCT_R, attribcolumn
-            for rec in cur:
+                for rec in cur:
+                    dAreasym[rec[0]] = rec[4]
+                    try:
+                        # capture component ratings as index numbers instead.
+                        dComp[rec[1]].append(dValues[str(rec[3]).upper()][0])
 
-                mukey, cokey, compPct, rating, areasym = rec
-                dAreasym[mukey] = areasym
+                    except:
+                        dComp[rec[1]] = [dValues[str(rec[3]).upper()][0]]
+                        dCompPct[rec[1]] = rec[2]
+                        dCase[str(rec[3]).upper()] = rec[3]  # save original value using uppercase key
 
-                # Save list of cokeys for each mapunit
-                try:
-                    if not cokey in dMapunit[mukey]:
-                        dMapunit[mukey].append(cokey)
 
-                except:
-                    dMapunit[mukey] = [cokey]
+                        # save list of components for each mapunit
+                        try:
+                            dMapunit[rec[0]].append(rec[1])
 
-                try:
-                    # Save list of rating values along with comppct for each component
-                    if not rating is None:
-                        dComponent[cokey][1].append(rating)
+                        except:
+                            dMapunit[rec[0]] = [rec[1]]
 
-                except:
-                    #  Save list of rating values along with comppct for each component
-                    if not rating is None:
-                        dComponent[cokey] = [compPct, [rating]]
+        elif dSDV["attributelogicaldatatype"].lower() in ["float", "integer", "choice"]:
+            # PrintMsg(" \ndomainValues for " + dSDV["attributelogicaldatatype"] + " values: " + str(domainValues), 1)
 
-        if tieBreaker == dSDV["tiebreakhighlabel"]:
-            # This is working correctly for DepthToWaterTable
+            with InitialTableCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
 
-            # Identify highest value for each component
-            for cokey, coVals in dComponent.items():
-                # Find highest monthly value for each component
-                #PrintMsg("Higher values for cokey " + cokey + ": " + str(coVals[1]) + " = " + str(max(coVals[1])), 1)
-                dCoRating[cokey] = max(coVals[1])
+                for rec in cur:
+                    dAreasym[rec[0]] = rec[4]
+                    try:
+                        # capture component ratings as index numbers instead
+                        dComp[rec[1]].append(dValues[str(rec[3]).upper()][0])
 
-        else:
-            # This is working correctly for DepthToWaterTable
+                    except:
+                        #PrintMsg(" \ndomainValues is empty, but legendValues has " + str(legendValues), 1)
+                        dCase[str(rec[3]).upper()] = rec[3]
 
-            # Identify lowest monthly value for each component
-            for cokey, coVals in dComponent.items():
-                # Find low rating value for each component
-                #PrintMsg("Lower values for cokey " + cokey + ": " + str(coVals[1]) + " = " + str(min(coVals[1])), 1)
-                dCoRating[cokey] = min(coVals[1])
+                        if str(rec[3]).upper() in dValues:
+                            dComp[rec[1]] = [dValues[str(rec[3]).upper()][0]]
+                            dCompPct[rec[1]] = rec[2]
 
-        dFinalRatings = dict()  # final dominant condition. mukey is key
+                            # compare actual rating value to domainValues to make sure case is correct
+                            if not rec[3] in domainValues: # this is a case problem
+                                # replace the original dValue item
+                                dValues[str(rec[3]).upper()][1] = rec[3]
+                                # replace the value in domainValues list
+                                for i in range(len(domainValues)):
+                                    if domainValues[i].upper() == rec[3].upper():
+                                        domainValues[i] = rec[3]
 
-        for mukey, cokeys in dMapunit.items():
-            # accumulate ratings for each mapunit by sum of comppct
-            #dMuRatings = dict()  # create a dictionary of values for just this map unit
-            muPct = 0
-            muRating = None
+                        else:
+                            # dValues is keyed on uppercase string rating
+                            #
+                            if not str(rec[3]) in missingDomain:
+                                # Try to add missing value to dDomainValues dict and domainValues list
+                                dValues[str(rec[3]).upper()] = [len(dValues), rec[3]]
+                                domainValues.append(rec[3])
+                                domainValuesUp.append(rec[3].upper())
+                                missingDomain.append(str(rec[3]))
+                                #PrintMsg("\tAdding value '" + str(rec[3]) + "' to domainValues", 1)
 
-            for cokey in cokeys:
-                # look at values for each component within the map unit
-                try:
-                    rating = dCoRating[cokey]
-                    compPct = dComponent[cokey][0]
-                    muPct += compPct
+                        # save list of components for each mapunit
+                        try:
+                            dMapunit[rec[0]].append(rec[1])
 
-                    if not rating is None:
-                      # accumulate product of depth and component percent
-                      try:
-                          muRating += (compPct * rating)
+                        except:
+                            dMapunit[rec[0]] = [rec[1]]
 
-                      except:
-                          muRating = compPct * rating
+        else:
+            PrintMsg(" \nProblem with handling domain values of type '" + dSDV["attributelogicaldatatype"] + "'", 1)
 
-                except:
-                    pass
+        # Aggregate monthly index values to a single value for each component
+        # Sort depending upon tiebreak setting
+        # Update dictionary with a single index value for each component
+        PrintMsg(" \nNot sure about this sorting code for tiebreaker", 1)
 
-            # Calculate weighted mapunit value from sum of products
-            if not muRating is None:
-                muRating = muRating / float(muPct)
+        if tieBreaker == dSDV["tiebreakhighlabel"]:
+            # "Higher" (default for flooding and ponding frequency)
+            for cokey, indexes in dComp.items():
+                val = sorted(indexes, reverse=True)[0]
+                dComp[cokey] = val
+        else:
+            for cokey, indexes in dComp.items():
+                val = sorted(indexes)[0]
+                dComp[cokey] = val
 
-            dFinalRatings[mukey] = [muPct, muRating]
+        # Save list of component data to each mapunit
+        dRatings = dict()
 
         with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
-            # Write final ratings to output table
-            for mukey in sorted(dMapunit):
-                compPct, rating = dFinalRatings[mukey]
-                rec = mukey, compPct, rating, dAreasym[mukey]
-                ocur.insertRow(rec)
 
-                if not rating is None and not rating in outputValues:
-                    outputValues.append(rating)
+            if tieBreaker == dSDV["tiebreakhighlabel"]:
+                # Default for flooding and ponding frequency
+                #
+                #PrintMsg(" \ndomainValues: " + str(domainValues), 1)
 
-        outputValues.sort()
-        return outputTbl, outputValues
+                for mukey, cokeys in dMapunit.items():
+                    dRating = dict()   # save sum of comppct for each rating within a mapunit
+                    muVals = list()   # may not need this for DCD
 
-    except MyError, e:
-        PrintMsg(str(e), 2)
-        return outputTbl, outputValues
+                    for cokey in cokeys:
+                        #PrintMsg("\tB ratingIndx: " + str(dComp[cokey]), 1)
+                        compPct = dCompPct[cokey]
+                        ratingIndx = dComp[cokey]
 
-    except:
-        errorMsg()
-        return outputTbl, outputValues
+                        if ratingIndx in dRating:
+                            sumPct = dRating[ratingIndx] + compPct
+                            dRating[ratingIndx] = sumPct  # this part could be compacted
 
-## ===================================================================================
-def AggregateCo_WTA_DTWT(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker, bZero):
-    #
-    # In the process of converting DCD to WTA
+                        else:
+                            dRating[ratingIndx] = compPct
 
-    try:
-        #
-        arcpy.SetProgressorLabel("Aggregating rating information to the map unit level")
+                    for rating, compPct in dRating.items():
+                        muVals.append([compPct, rating])
 
-        #PrintMsg(" \nTesting nullRating variable: " + str(nullRating), 1)
+                    #newVals = sorted(muVals, key = lambda x : (-x[0], x[1]))[0]  # Works for maplegendkey=2
+                    #newVals = sorted(sorted(muVals, key = lambda x : x[0], reverse=True), key = lambda x : x[1], reverse=True)[0]
+                    muVal = SortData(muVals, 0, 1, True, True)
+                    newrec = [mukey, muVal[0], domainValues[muVal[1]], dAreasym[mukey]]
+                    ocur.insertRow(newrec)
 
-        if bVerbose:
-            PrintMsg(" \nCurrent function : " + sys._getframe().f_code.co_name, 1)
+                    if not newrec[2] is None and not newrec[2] in outputValues:
+                        outputValues.append(newrec[2])
 
-        # Create final output table with MUKEY, COMPPCT_R and sdvFld
-        outputTbl = os.path.join(gdb, tblName)
-        inFlds = ["MUKEY", "COKEY", "COMPPCT_R", dSDV["attributecolumnname"].upper(), "AREASYMBOL"]
-        outFlds = ["MUKEY", "COMPPCT_R", dSDV["resultcolumnname"].upper(), "AREASYMBOL"]
-        whereClause = "COMPPCT_R >=  " + str(cutOff)  # Leave in NULLs and try to substitute 200
-        sqlClause =  (None, " ORDER BY MUKEY ASC, COMPPCT_R DESC")
+            else:
+                # Lower
+                PrintMsg(" \nFinal lower tiebreaker", 1)
 
-        if arcpy.Exists(outputTbl):
-            arcpy.Delete_management(outputTbl)
+                for mukey, cokeys in dMapunit.items():
+                    dRating = dict()  # save sum of comppct for each rating within a mapunit
+                    muVals = list()   # may not need this for DCD
 
-        outputTbl = CreateOutputTable(initialTbl, outputTbl, dFieldInfo)
-        outputValues = list()
-
-        if outputTbl == "":
-            return outputTbl, outputValues
-
-        dMapunit = dict()
-        dComponent = dict()
-        dCoRating = dict()
-        dAreasym = dict()
-
-        with arcpy.da.SearchCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
-
-            # MUKEY,COKEY , COMPPCT_R, attribcolumn
-            for rec in cur:
-                #mukey = rec[0]
-                #cokey = rec[1]
-                #compPct = rec[2]
-                #rating = rec[3]
-                mukey, cokey, compPct, rating, areasym = rec
-
-                dAreasym[mukey] = areasym
-
-                if rating is None:
-                    rating = nullRating
-
-                # Save list of cokeys for each mukey
-                try:
-                    if not cokey in dMapunit[mukey]:
-                        dMapunit[mukey].append(cokey)
-
-                except:
-                    dMapunit[mukey] = [cokey]
-
-                try:
-                    # Save list of rating values along with comppct for each component
-                    dComponent[cokey][1].append(rating)
-
-                except:
-                    #  Save list of rating values along with comppct for each component
-                    dComponent[cokey] = [compPct, [rating]]
-
-
-        if tieBreaker == dSDV["tiebreakhighlabel"]:
-            for cokey, coVals in dComponent.items():
-                # Find high value for each component
-                dCoRating[cokey] = max(coVals[1])
-
-        else:
-            for cokey, coVals in dComponent.items():
-                # Find low value for each component
-                dCoRating[cokey] = min(coVals[1])
-
-        dFinalRatings = dict()  # final dominant condition. mukey is key
+                    for cokey in cokeys:
+                        try:
+                            #PrintMsg("\tA ratingIndx: " + str(dComp[cokey]), 1)
+                            compPct = dCompPct[cokey]
+                            ratingIndx = dComp[cokey]
 
-        for mukey, cokeys in dMapunit.items():
-            # accumulate ratings for each mapunit by sum of comppct
-            sumPct = 0
-            muProd = 0
+                            if ratingIndx in dRating:
+                                sumPct = dRating[ratingIndx] + compPct
+                                dRating[ratingIndx] = sumPct  # this part could be compacted
 
-            for cokey in cokeys:
-                # look at values for each component within the map unit
-                rating = dCoRating[cokey]
-                compPct = dComponent[cokey][0]
+                            else:
+                                dRating[ratingIndx] = compPct
 
-                #if rating != nullRating:
-                if not rating is None:
-                    # Don't include the 201 (originally null) depths in the WTA calculation
-                    sumPct += compPct            # sum comppct for the mapunit
-                    muProd += (rating * compPct)   # calculate product of component percent and component rating
+                        except:
+                            pass
 
-            if sumPct > 0:
-                dFinalRatings[mukey] = [sumPct, round(float(muProd) / sumPct)]
+                    for rating, compPct in dRating.items():
+                        muVals.append([compPct, rating])
 
-            else:
-                # now replace the nulls with 201
-                dFinalRatings[mukey] = [100, nullRating]
+                    #newVals = sorted(muVals, key = lambda x : (-x[0], -x[1]))[0] # Works for maplegendkey=2
+                    #newVals = sorted(sorted(muVals, key = lambda x : x[0], reverse=True), key = lambda x : x[1], reverse=False)[0]
+                    muVal = SortData(muVals, 0, 1, True, False)
+                    newrec = [mukey, muVal[0], domainValues[muVal[1]], dAreasym[mukey]]
+                    ocur.insertRow(newrec)
 
-        with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
-            # Write final ratings to output table
-            for mukey, vals in dFinalRatings.items():
-                rec = mukey, vals[0], vals[1], dAreasym[mukey]
-                ocur.insertRow(rec)
+                    if not newrec[2] is None and not newrec[2] in outputValues:
+                        outputValues.append(newrec[2])
 
-                if not vals[1] is None and not vals[1] in outputValues:
-                    outputValues.append(vals[1])
 
         outputValues.sort()
         return outputTbl, outputValues
@@ -7574,1124 +7190,977 @@ def AggregateCo_WTA_DTWT(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBre
         errorMsg()
         return outputTbl, outputValues
 
-
 ## ===================================================================================
-def AggregateCo_DCD_Domain(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker):
-    #
-    # Flooding or ponding frequency, dominant condition
-    #
-    # Aggregate mapunit-component data to the map unit level using dominant condition.
-    # Use domain values to determine sort order for tiebreaker
-    #
-    # Problem with domain values for some indexes which are numeric. Need to accomodate for
-    # domain key values which cannot be 'uppercased'.
-    #
-    # Some domain values are not found in the data and vise versa.
-    #
-    # Bad problem 2016-06-08.
-    # Noticed that my final rating table may contain multiple ratings (tiebreak) for a map unit. This creates
-    # a funky join that may display a different map color than the Identify value shows for the polygon. NIRRCAPCLASS.
-    # Added areasymbol to output
-    #
-    # Conservation Tree and Shrub group are located in the component table
-    # This has domain values and component values which are all lowercase
-    # The maplegendxml is all uppercase
-    #
-    # I think I need to loop through each output value from the table, find the UPPER match and
-    # then alter the legend value and label to match the output value.
-    #
-    # Nov 2017 problem noticed with Irrigated Capability Class where null values are not used
-    # as the dominant condition. Fixed.
+def AggregateCo_WTA(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker, bZero):
+    # Aggregate mapunit-component data to the map unit level using a weighted average
     #
+    # Possible problem with Depth to Restriction and the null replacement values of 201. nullRating
+    # Should be calculating 'BrD' mapunit using [ (66/(66 + 15) X 38cm) + (15/(66 + 15) X 0cm) ]
 
+    # Another question. For depth to any restriction, there could be multiple restrictions per
+    # component. Do I need to sort on depth according to tieBreaker setting?
+    
     try:
-        arcpy.SetProgressorLabel("Aggregating rating information to the map unit level")
-
-        #
         #bVerbose = True
 
+        # TEST CODE FOR nullRating handling
         if bVerbose:
-            PrintMsg(" \nCurrent function : " + sys._getframe().f_code.co_name, 1)
+            PrintMsg(" \nnullRating: " + str(nullRating), 1)
+
+        arcpy.SetProgressorLabel("Aggregating rating information to the map unit level")
 
         # Create final output table with MUKEY, COMPPCT_R and sdvFld
-        outputTbl = os.path.join(gdb, tblName)
+        if bVerbose:
+            PrintMsg(" \nCurrent function : " + sys._getframe().f_code.co_name, 1)
+
+        outputTbl = os.path.join(sdvGDB, tblName)
+        #attribcolumn = dSDV["attributecolumnname"].upper()
+        #resultcolumn = dSDV["resultcolumnname"].upper()
+        fldPrecision = max(0, dSDV["attributeprecision"])
 
         inFlds = ["MUKEY", "COKEY", "COMPPCT_R", dSDV["attributecolumnname"].upper(), "AREASYMBOL"]
         outFlds = ["MUKEY", "COMPPCT_R", dSDV["resultcolumnname"].upper(), "AREASYMBOL"]
 
-        # Default setting is to include Null values as part of the aggregation process
-        if bNulls:
-            #PrintMsg(" \nIncluding components with null rating values...", 1)
-            whereClause = "COMPPCT_R >=  " + str(cutOff)
+        # sort order of value is important
+        if tieBreaker == "Lower":
+            sOrder = " DESC"
 
         else:
-            #PrintMsg(" \nSkipping components with null rating values...", 1)
+            sOrder = " ASC"
+
+        sqlClause =  (None, "ORDER BY MUKEY ASC, COMPPCT_R DESC, " + dSDV["attributecolumnname"].upper() + sOrder)
+
+        if bZero == False and nullRating is None:
+            # ignore any null values
             whereClause = "COMPPCT_R >=  " + str(cutOff) + " AND " + dSDV["attributecolumnname"].upper() + " IS NOT NULL"
 
-        # initialTbl must be in a file geodatabase to support ORDER_BY
-        # Do I really need to sort by attribucolumn when it will be replaced by Domain values later?
-        sqlClause =  (None, " ORDER BY MUKEY ASC, COMPPCT_R DESC")
+        else:
+            # ignore values = null replacement value. Trying to fix Depth to Restriction WTA problem.
+            #
+            if not nullRating is None:
+                #whereClause = "COMPPCT_R >=  " + str(cutOff) + " AND " + dSDV["attributecolumnname"].upper() + " IS NOT NULL AND " + dSDV["attributecolumnname"].upper() + " <> " + str(nullRating)
+                #whereClause = "COMPPCT_R >=  " + str(cutOff) + " AND " + dSDV["attributecolumnname"].upper() + " <> " + str(nullRating)
+                whereClause = "COMPPCT_R >=  " + str(cutOff) + " AND " + dSDV["attributecolumnname"].upper() + " IS NOT NULL"
+
+            else:
+                # retrieve null values and convert to zeros during the iteration process
+                whereClause = "COMPPCT_R >=  " + str(cutOff)
 
         if arcpy.Exists(outputTbl):
             arcpy.Delete_management(outputTbl)
 
+        if bVerbose:
+            PrintMsg(" \nSQL: " + whereClause, 1)
+            PrintMsg("Input table (" + initialTbl + ") has " + str(InitialTableCount(initialTbl)) + " records", 1)
+
         outputTbl = CreateOutputTable(initialTbl, outputTbl, dFieldInfo)
         outputValues = list()
 
         if outputTbl == "":
-            #PrintMsg("\nCreateOutputTable returned nothing", 1)
             return outputTbl, outputValues
 
-        lastCokey = "xxxx"
-        dComp = dict()
-        dCompPct = dict()
+        lastMukey = "xxxx"
+        dRating = dict()
+        # reset variables for cursor
+        sumPct = 0
+        sumProd = 0
+        meanVal = 0
+        #prec = dSDV["attributeprecision"]
+        outputValues = [999999999, -999999999]
+        recCnt = 0
+        areasym = ""
+        dPct = dict()  # sum of comppct_r for each map unit
         dMapunit = dict()
-        missingDomain = list()
-        dAreasym = dict()
-        dCase = dict()
-
-        # PrintMsg(" \ntiebreakdomainname: " + str(dSDV["tiebreakdomainname"]), 1)
-
-        # Read initial table for non-numeric data types. Capture domain values and all component ratings.
-        #
-        if bVerbose:
-            PrintMsg(" \nReading initial data...", 1)
-            PrintMsg(whereClause, 1)
-            initCnt = int(arcpy.GetCount_management(initialTbl).getOutput(0))
-            PrintMsg("\nInput table contains " + Number_Format(initCnt, 0, True) + " records", 1)
-            PrintMsg("Data is from " + dSDV["attributecolumnname"].upper() + " column", 1)
-            PrintMsg(dSDV["attributetype"] + " attribute logical data type: " + dSDV["attributelogicaldatatype"].lower(), 1)
-
-        if not dSDV["attributetype"].lower() == "interpretation" and dSDV["attributelogicaldatatype"].lower() in ["string", "vtext"]:  # Changed here 2016-04-28
-            # No domain values for non-interp string ratings
-            # Probably not using this section of code.
-            #
-            if bVerbose:
-                PrintMsg(" \n" + dSDV["attributetype"] + " values for " + dSDV["attributelogicaldatatype"] + " data type: " + str(dValues), 1)
-                PrintMsg(" \ndomainValues for " + dSDV["attributelogicaldatatype"] + " values: " + str(domainValues), 1)
-
-
-            with arcpy.da.SearchCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
 
+        with InitialTableCursor(initialTbl, inFlds, where_clause=whereClause, sql_clause=sqlClause) as cur:
+            with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
                 for rec in cur:
-                    # "MUKEY", "COKEY", "COMPPCT_R", RATING
-                    # PrintMsg("\t" + str(rec), 1)
-                    mukey, cokey, compPct, rating, areasym = rec
-                    dAreasym[mukey] = areasym
-                    dComp[cokey] = rating
-                    dCompPct[cokey] = compPct
-                    dCase[str(rating).upper()] = rating  # save original value using uppercase key
+                    recCnt += 1
+                    mukey, cokey, comppct, val, areasym = rec
+                    #PrintMsg(str(recCnt) + ". " + str(rec), 1)
 
-                    # save list of components for each mapunit
+                    # Capture component list for each mapunit
                     try:
-                        dMapunit[mukey].append(cokey)
+                        if not cokey in dMapunit[mukey]:
+                            dMapunit[mukey].append(cokey)
+                            
+                            if not val == nullRating:
+                                dPct[mukey] += comppct
 
                     except:
                         dMapunit[mukey] = [cokey]
 
-        elif dSDV["attributelogicaldatatype"].lower() in ["string", "float", "integer", "choice"]:
-            #
-            # if dSDV["tiebreakdomainname"] is not None:  # this is a test to see if there are true domain values
-            # Use this to compare dValues to output values
-            #
-
-            if len(domainValues) > 1 and not None in domainValues:
-
-                if tieBreaker == dSDV["tiebreakhighlabel"]:
-                    # Put the null value at the beginning of the domain
-                    dValues[None] = [0, None]
-                    #domainValues.insert(0, None)
+                        if not val == nullRating:
+                            dPct[mukey] = comppct
 
-                else:
-                    # Put the null value at the end of the domain
-                    dValues[None] = [len(dValues), None]
-                    #domainValues.append(None)
+                    if val is None and bZero:
+                        # convert null values to zero
+                        val = 0.0
 
-            # PrintMsg(" \ntiebreakdomainname: " + str(dSDV["tiebreakdomainname"]), 1)
+                    if val == nullRating:
+                        # 
+                        val = None
+                        
+                        
 
-            if bVerbose:
-                # ********************** GPR Problem here
-                #
-                PrintMsg(" \n" + dSDV["attributetype"] + " values for " + dSDV["attributelogicaldatatype"] + " data type: " + str(dValues), 1)
-                PrintMsg(" \ndomainValues for " + dSDV["attributelogicaldatatype"] + " values: " + str(domainValues) + " \n ", 1)
-                PrintMsg("tiebreakdomainname: " + str(dSDV["tiebreakdomainname"]), 1)
+                    #if bVerbose and mukey in ['374414', '374451']:
+                    #    PrintMsg("\t\tMukey " + mukey + ":" + cokey + ";  " + str(comppct) + "%;  " + str(val), 1)
 
-            if  dSDV["tiebreakdomainname"] is None:
-                # There are no domain values.
-                # We must make sure that the legend values are the same as the output values.
-                #
-                with arcpy.da.SearchCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
+                    if mukey != lastMukey and lastMukey != "xxxx":
+                        # I'm losing an output value when there is only one rated component and bZeros == True
+                        # This is because only the non-Null ratings are being processed for things like Range Production (Normal Year) in Batch Mode.
+                        #
+                        try:
+                            sumPct = dPct[lastMukey]
 
-                    for rec in cur:
-                        mukey, cokey, compPct, rating, areasym = rec
-                        #PrintMsg("\t" + str(rec), 1)
-                        dAreasym[mukey] = areasym
+                        except:
+                            dPct[lastMukey] = 0
+                            sumPct = 0
+                        
+                        if (sumPct > 0 and sumProd is not None):
+                            # write out record for previous mapunit
 
-                        #if bVerbose and mukey == '397784':
-                        #    PrintMsg("\tRECORD:  " + str(rec), 1)
+                            meanVal = round(float(sumProd) / sumPct, fldPrecision)
+                            newrec = [lastMukey, sumPct, meanVal, areasym]
+                            ocur.insertRow(newrec)
 
-                        # save list of components for each mapunit
-                        try:
-                            dMapunit[mukey].append(cokey)
+                            #if bVerbose and lastMukey in ['374414', '374451']:
+                            #    PrintMsg("\tTest mapunit1 " + lastMukey + ": " + str(meanVal) + ";  " + str(sumPct) + "%", 1)
 
-                        except:
-                            dMapunit[mukey] = [cokey]
+                            # reset variables for the next mapunit record
+                            sumPct = 0
+                            sumProd = None
 
-                        # this is a new component record. create a new dictionary item.
+                            # save max-min values
+                            if not meanVal is None:
+                                outputValues[0] = min(meanVal, outputValues[0])
+                                outputValues[1] = max(meanVal, outputValues[1])
+
+                        else:
+                        #    Tried to bring back null rating replacement value (201), but that didn't work because those
+                        #    are being excluded from the entire process by the sql_clause.
                         #
-                        if not cokey in dComp:
-                            dCase[str(rating).upper()] = rating
+                            newrec = [lastMukey, sumPct, nullRating, areasym]
+                            #if bVerbose and lastMukey in ['374414', '374451']:
+                            #    PrintMsg("\tTest mapunit2 " + lastMukey + ": " + str(nullRating) + ";  " + str(sumPct) + "%", 1)
+                                
+                            ocur.insertRow(newrec)
+                            # reset variables for the next mapunit record
+                            sumPct = 0
+                            sumProd = None
+                            dPct[lastMukey] = 0
 
+                    # accumulate data for this mapunit
+                    #PrintMsg("\tFollowup summary", 1)
+                    #sumPct += comppct
 
-                            # I have a Problem here with domain values and 'None' vs None with GPR
-                            # Perhaps I could add a '<Null>' value to the domain at the beginning or end?
-                            #
-                            if str(rating).upper() in dValues or rating is None:
-                                #PrintMsg("\tNew rating '" + rating + "' assigning index '" + str(dValues[str(rating).upper()][0]) + "' to dComp", 1)
-                                if not rating is None:
-                                    # Don't confuse 'None' with None
-                                    # Get the index from dValues for this component rating and save it to dComp by cokey
-                                    dComp[cokey] = dValues[str(rating).upper()][0]  #
+                    if val is not None:
+                        prod = comppct * float(val)
+                        try:
+                            sumProd += prod
 
-                                else:
-                                    # Get the index from dValues for <Null> and save it to dComp by cokey
-                                    #dComp[cokey] = dValues["<Null>"][0]
-                                    dComp[cokey] = dValues["NONE"][0]
+                        except:
+                            sumProd = prod
 
+                    # set new mapunit flag
+                    lastMukey = mukey
 
-                                dCompPct[cokey] = compPct
+                # Add final record
+                try:
+                    sumPct = dPct[lastMukey]
 
-                                # compare actual rating value to domainValues to make sure case is correct
-                                #
-                                # This does not make sense. domainValues must be coming from maplegendxml.
-                                #
-                                if not rating in domainValues: # this is a case problem or perhaps
-                                    # replace the original dValue item
-                                    dValues[str(rating).upper()][1] = rating
+                except:
+                    dPct[lastMukey] = 0
+                
+                if areasym != "" and sumPct != 0:  # 
+                    if sumProd is None:
+                        meanVal = nullRating
 
-                                    # replace the value in domainValues list
-                                    for i in range(len(domainValues)):
-                                        if str(domainValues[i]).upper() == str(rating).upper():
-                                            domainValues[i] = rating
+                    else:
+                        meanVal = round(float(sumProd) / sumPct, fldPrecision)
+                        
+                    newrec = [lastMukey, sumPct, meanVal, areasym]  # if there is no data, this will error
+                    ocur.insertRow(newrec)
 
+                    if dSDV["resultcolumnname"].upper().startswith("NCCPI"):
+                        # For NCCPI, hardcode the range of values from 0.0 to 1.0 for a consistent map legend
+                        outputValues = [0.0, 1.0]
 
-                            else:
-                                # dValues is keyed on uppercase string rating or is Null
-                                #
-                                # Conservation Tree Shrub has some values not found in the domain.
-                                # How can this be? Need to check with George?
-                                #
-                                #PrintMsg("\tdValue not found for: " + str(rec), 1)
-                                if not str(rating) in missingDomain:
-                                    # Try to add missing value to dDomainValues dict and domainValues list
-                                    dComp[cokey] = len(dValues)
-                                    dValues[str(rating).upper()] = [len(dValues), rating]
-                                    domainValues.append(rating)
-                                    domainValuesUp.append(str(rating).upper())
-                                    missingDomain.append(str(rating))
-                                    dCompPct[cokey] = compPct
-                                    #PrintMsg("\t****Adding value '" + str(rating) + "' to domainValues", 1)
+                    elif not meanVal is None:
+                        outputValues[0] = min(meanVal, outputValues[0])
+                        outputValues[1] = max(meanVal, outputValues[1])
 
+        outputValues.sort()
+        del sumPct
+        del sumProd
+        del meanVal
 
-            else:
-                # New code for property or interps with domain values
+        if outputValues[0] == -999999999 or outputValues[1] == 999999999:
+            # Sometimes no data can skip through the max min test
+            outputValues = [0.0, 0.0]
 
-                with arcpy.da.SearchCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
+        return outputTbl, outputValues
 
-                    for rec in cur:
-                        mukey, cokey, compPct, rating, areasym = rec
-                        dAreasym[mukey] = areasym
+    except MyError, e:
+        PrintMsg(str(e), 2)
+        outputTbl, outputValues
 
-                        # save list of components for each mapunit
-                        try:
-                            dMapunit[mukey].append(cokey)
+    except:
+        errorMsg()
+        return outputTbl, outputValues
 
-                        except:
-                            dMapunit[mukey] = [cokey]
+## ===================================================================================
+def AggregateCo_WTA_Old(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker, bZero):
+    # Aggregate mapunit-component data to the map unit level using a weighted average
+    #
+    # Possible problem with Depth to Restriction and the null replacement values of 201. nullRating
+    # Should be calculating 'BrD' mapunit using [ (66/(66 + 15) X 38cm) + (15/(66 + 15) X 0cm) ]
 
-                        # this is a new component record. create a new dictionary item.
-                        #
-                        if not cokey in dComp:
-                            dCase[str(rating).upper()] = rating
+    # Another question. For depth to any restriction, there could be multiple restrictions per
+    # component. Do I need to sort on depth according to tieBreaker setting?
+    
+    try:
+        bVerbose = True
 
-                            if str(rating).upper() in dValues:
+        # TEST CODE FOR nullRating handling
+        if bVerbose:
+            PrintMsg(" \nnullRating: " + str(nullRating), 1)
 
-                                dComp[cokey] = dValues[str(rating).upper()][0]  # think this is bad
-                                dCompPct[cokey] = compPct
+        arcpy.SetProgressorLabel("Aggregating rating information to the map unit level")
 
-                                # compare actual rating value to domainValues to make sure case is correct
-                                if not rating in domainValues: # this is a case problem
-                                    # replace the original dValue item
-                                    dValues[str(rating).upper()][1] = rating
+        # Create final output table with MUKEY, COMPPCT_R and sdvFld
+        if bVerbose:
+            PrintMsg(" \nCurrent function : " + sys._getframe().f_code.co_name, 1)
 
-                                    # replace the value in domainValues list
-                                    for i in range(len(domainValues)):
-                                        if str(domainValues[i]).upper() == str(rating).upper():
-                                            domainValues[i] = rating
+        outputTbl = os.path.join(sdvGDB, tblName)
+        #attribcolumn = dSDV["attributecolumnname"].upper()
+        #resultcolumn = dSDV["resultcolumnname"].upper()
+        fldPrecision = max(0, dSDV["attributeprecision"])
 
+        inFlds = ["MUKEY", "COKEY", "COMPPCT_R", dSDV["attributecolumnname"].upper(), "AREASYMBOL"]
+        outFlds = ["MUKEY", "COMPPCT_R", dSDV["resultcolumnname"].upper(), "AREASYMBOL"]
 
-                            else:
-                                # dValues is keyed on uppercase string rating or is Null
-                                #
-                                # Conservation Tree Shrub has some values not found in the domain.
-                                # How can this be? Need to check with George?
-                                #
-                                PrintMsg("\tdValue not found for: " + str(rec), 1)
-                                if not str(rating) in missingDomain:
-                                    # Try to add missing value to dDomainValues dict and domainValues list
-                                    dComp[cokey] = len(dValues)
-                                    dValues[str(rating).upper()] = [len(dValues), rating]
-                                    domainValues.append(rating)
-                                    domainValuesUp.append(str(rating).upper())
-                                    missingDomain.append(str(rating))
-                                    dCompPct[cokey] = compPct
-                                    #PrintMsg("\tAdding value '" + str(rating) + "' to domainValues", 1)
 
+        sqlClause =  (None, "ORDER BY MUKEY ASC, COMPPCT_R DESC, " + dSDV["attributecolumnname"].upper() + " DESC")
 
+        if bZero == False:
+            # ignore any null values
+            whereClause = "COMPPCT_R >=  " + str(cutOff) + " AND " + dSDV["attributecolumnname"].upper() + " IS NOT NULL"
 
         else:
-            raise MyError, "Problem with handling domain values of type '" + dSDV["attributelogicaldatatype"]
+            # ignore values = null replacement value. Trying to fix Depth to Restriction WTA problem.
+            #
+            if not nullRating is None:
+                whereClause = "COMPPCT_R >=  " + str(cutOff) + " AND " + dSDV["attributecolumnname"].upper() + " != " + str(nullRating)
 
-        # Aggregate monthly index values to a single value for each component??? Would it not be better to
-        # create a new function for COMONTH-DCD? Then I could simplify this function.
-        #
-        # Sort depending upon tiebreak setting
-        # Update dictionary with a single index value for each component
+            else:
+                # retrieve null values and convert to zeros during the iteration process
+                whereClause = "COMPPCT_R >=  " + str(cutOff)
 
-        # Save list of component rating data to each mapunit, sort and write out
-        # a single map unit rating
-        #
-        dRatings = dict()
+        if arcpy.Exists(outputTbl):
+            arcpy.Delete_management(outputTbl)
 
         if bVerbose:
-            PrintMsg(" \nWriting map unit rating data to final output table", 1)
-            PrintMsg(" \nUsing tiebreaker '" + tieBreaker + "' (where choices are " + dSDV["tiebreaklowlabel"] + " or " + dSDV["tiebreakhighlabel"] + ")", 1)
+            PrintMsg(" \nSQL: " + whereClause, 1)
+            PrintMsg("Input table has " + str(InitialTableCount(initialTbl)), 1)
 
-        if tieBreaker == dSDV["tiebreakhighlabel"]:
-            with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
+        outputTbl = CreateOutputTable(initialTbl, outputTbl, dFieldInfo)
+        outputValues = list()
 
-                for mukey, cokeys in dMapunit.items():
-                    dRating = dict()  # save sum of comppct for each rating within a mapunit
-                    muVals = list()   # may not need this for DCD
+        if outputTbl == "":
+            return outputTbl, outputValues
 
-                    for cokey in cokeys:
-                        try:
-                            #PrintMsg("\tA ratingIndx: " + str(dComp[cokey]), 1)
-                            compPct = dCompPct[cokey]
-                            ratingIndx = dComp[cokey]
+        lastMukey = "xxxx"
+        dRating = dict()
+        # reset variables for cursor
+        sumPct = 0
+        sumProd = 0
+        meanVal = 0
+        #prec = dSDV["attributeprecision"]
+        outputValues = [999999999, -999999999]
+        recCnt = 0
+        areasym = ""
+        dPct = dict()  # sum of comppct_r for each map unit
+        #dMapunit = dict()
 
-                            if ratingIndx in dRating:
-                                sumPct = dRating[ratingIndx] + compPct
-                                dRating[ratingIndx] = sumPct  # this part could be compacted
+        with InitialTableCursor(initialTbl, inFlds, where_clause=whereClause, sql_clause=sqlClause) as cur:
+            with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
+                for rec in cur:
+                    recCnt += 1
+                    mukey, cokey, comppct, val, areasym = rec
+                    #PrintMsg(str(recCnt) + ". " + str(rec), 1)
 
-                            else:
-                                dRating[ratingIndx] = compPct
+                    if val is None and bZero:
+                        # convert null values to zero
+                        val = 0.0
 
-                        except:
-                            pass
+                    #if mukey != lastMukey and lastMukey != "xxxx":
+                    if mukey != lastMukey:
+                        # I'm losing an output value when there is only one rated component and bZeros == True
+                        # This is because only the non-Null ratings are being processed for things like Range Production (Normal Year) in Batch Mode.
+                        #
+                        cokeyList = [cokey] # first component
+                        dPct[mukey] = comppct
+                        
+                        if (sumPct > 0 and sumProd is not None):
+                            # write out record for previous mapunit
 
-                    for ratingIndx, compPct in dRating.items():
-                        muVals.append([compPct, ratingIndx])  # This muVal is not being populated
+                            meanVal = round(float(sumProd) / sumPct, fldPrecision)
+                            newrec = [lastMukey, sumPct, meanVal, areasym]
+                            ocur.insertRow(newrec)
 
-                    #This is the final aggregation from component to map unit rating
+                            # reset variables for the next mapunit record
+                            sumPct = 0
+                            sumProd = None
 
-                    if len(muVals) > 0:
-                        muVal = SortData(muVals, 0, 1, True, True)
-                        compPct, ratingIndx = muVal
+                            # save max-min values
+                            if not meanVal is None:
+                                outputValues[0] = min(meanVal, outputValues[0])
+                                outputValues[1] = max(meanVal, outputValues[1])
 
-                        try:
-                            rating = domainValues[ratingIndx]
-                            #PrintMsg("\tRating: " + str(rating) + "(index=" + str(ratingIndx) + ")", 1)
+                    if not cokey in cokeyList:  # other components
+                        cokeyList.append(cokey)
+                        dPct[mukey] += comppct
+                        
+    
 
-                        except:
-                            raise MyError, "domainValues missing value for index (" + str(ratingIndx) + "): " + str(domainValues)
+                    # accumulate data for this mapunit
+                    #PrintMsg("\tFollowup summary", 1)
+                    sumPct += comppct
 
-                        #if bVerbose and mukey == '397784':
-                        #    PrintMsg("\tmuVal for mukey: " + mukey + ", " + str(muVal), 1)
-                        #    PrintMsg("\tRating: " + str(rating), 1)
+                    if val is not None:
+                        prod = comppct * float(val)
+                        try:
+                            sumProd += prod
 
-                    else:
-                        rating = None
-                        compPct = None
+                        except:
+                            sumProd = prod
 
-                    #PrintMsg(" \n" + tieBreaker + ". Checking index values for mukey " + mukey + ": " + str(muVal[0]) + ", " + str(domainValues[muVal[1]]), 1)
-                    #PrintMsg("\tGetting mukey " + mukey + " rating: " + str(rating), 1)
-                    newrec = [mukey, compPct, rating, dAreasym[mukey]]
+                    # set new mapunit flag
+                    lastMukey = mukey
 
+                # Add final record
+                if areasym != "":  # not sure why this is needed
+                    meanVal = round(float(sumProd) / sumPct, fldPrecision)
+                    newrec = [lastMukey, sumPct, meanVal, areasym]  # if there is no data, this will error
                     ocur.insertRow(newrec)
 
-                    if not rating is None and not rating in outputValues:
-                        outputValues.append(rating)
-
-        else:
-            # tieBreaker Lower
-            # Overhauling this tiebreaker lower, need to do the rest once it is working properly
-            #
-            #PrintMsg(" \nActually in Lower tiebreaker code", 1)
-            #PrintMsg("dMapunit has " + str(len(dMapunit)) + " records", 1 )
-
-            with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
-
-                # Process all mapunits
-                for mukey, cokeys in dMapunit.items():
-                    dRating = dict()  # save sum of comppct for each rating within a mapunit
-                    muVals = list()   # may not need this for DCD
-                    #PrintMsg("\t" + mukey + ":" + str(cokeys), 1)
-
-                    for cokey in cokeys:
-                        try:
-                            compPct = dCompPct[cokey]
-                            ratingIndx = dComp[cokey]
-                            #PrintMsg("\t" + cokey + " index: " + str(ratingIndx), 1)
-
-                            if ratingIndx in dRating:
-                                sumPct = dRating[ratingIndx] + compPct
-                                dRating[ratingIndx] = sumPct  # this part could be compacted
-
-                            else:
-                                dRating[ratingIndx] = compPct
-
-                        except:
-                            errorMsg()
-
-                    for ratingIndx, compPct in dRating.items():
-                        muVals.append([compPct, ratingIndx])  # This muVal is not being populated
-
-                    #PrintMsg("\t" + str(dRating), 1)
-                    if len(muVals) > 0:
-                        muVal = SortData(muVals, 0, 1, True, False)
-                        #PrintMsg("\tmuVal for mukey: " + mukey + ", " + str(muVal), 1)
-                        compPct, ratingIndx = muVal
-                        rating = domainValues[ratingIndx]
-
-                    else:
-                        rating = None
-                        compPct = None
+                    if dSDV["resultcolumnname"].upper().startswith("NCCPI"):
+                        # For NCCPI, hardcode the range of values from 0.0 to 1.0 for a consistent map legend
+                        outputValues = [0.0, 1.0]
 
-                    #PrintMsg(" \n" + tieBreaker + ". Checking index values for mukey " + mukey + ": " + str(muVal[0]) + ", " + str(domainValues[muVal[1]]), 1)
-                    #PrintMsg("\tGetting mukey " + mukey + " rating: " + str(rating), 1)
-                    newrec = [mukey, compPct, rating, dAreasym[mukey]]
+                    elif not meanVal is None:
+                        outputValues[0] = min(meanVal, outputValues[0])
+                        outputValues[1] = max(meanVal, outputValues[1])
 
-                    ocur.insertRow(newrec)
+        outputValues.sort()
+        del sumPct
+        del sumProd
+        del meanVal
 
-                    if not rating is None and not rating in outputValues:
-                        outputValues.append(rating)
+        if outputValues[0] == -999999999 or outputValues[1] == 999999999:
+            # Sometimes no data can skip through the max min test
+            outputValues = [0.0, 0.0]
 
-        outputValues.sort()
         return outputTbl, outputValues
 
     except MyError, e:
         PrintMsg(str(e), 2)
-        return outputTbl, outputValues
+        outputTbl, outputValues
 
     except:
         errorMsg()
         return outputTbl, outputValues
 
 ## ===================================================================================
-def AggregateCo_DCP_Domain(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker):
-    # Not being use.
-    #
-    # I may not use this function. Trying to handle ratings with domain values using the
-    # standard AggregateCo_DCP function
+def AggregateCo_PP_SUM(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker):
     #
-    # Flooding or ponding frequency, dominant component with domain values
+    # Aggregate data to the map unit level using a sum (Hydric)
+    # This is Percent Present
+    # Soil Data Viewer reports zero for non-Hydric map units. This function is
+    # currently not creating a record for those because they are not included in the
+    # sdv_initial table.
     #
-    # Use domain values to determine sort order for tiebreaker
+    # Will try removing sql whereclause from cursor and apply it to each record instead.
     #
-    # Problem with domain values for some indexes which are numeric. Need to accomodate for
-    # domain key values which cannot be 'uppercased'.
-    # Added areasymbol to output
+    # Added Areasymbol to output
 
     try:
         arcpy.SetProgressorLabel("Aggregating rating information to the map unit level")
 
-        #
+        # Create final output table with MUKEY, COMPPCT_R and sdvFld
         if bVerbose:
             PrintMsg(" \nCurrent function : " + sys._getframe().f_code.co_name, 1)
 
-        # Create final output table with MUKEY, COMPPCT_R and sdvFld
-        outputTbl = os.path.join(gdb, tblName)
+        outputTbl = os.path.join(sdvGDB, tblName)
+        fldPrecision = max(0, dSDV["attributeprecision"])
+        inFlds = ["MUKEY", "AREASYMBOL", "COMPPCT_R", dSDV["attributecolumnname"].upper(), "AREASYMBOL"]  # not sure why I have AREASYMBOL on the end..
+        outFlds = ["MUKEY", "AREASYMBOL", dSDV["resultcolumnname"].upper(), "AREASYMBOL"]
 
-        inFlds = ["MUKEY", "COKEY", "COMPPCT_R", dSDV["attributecolumnname"].upper(), "AREASYMBOL"]
-        outFlds = ["MUKEY", "COMPPCT_R", dSDV["resultcolumnname"].upper(), "AREASYMBOL"]
-        whereClause = "COMPPCT_R >=  " + str(cutOff) + " AND " + dSDV["attributecolumnname"].upper() + " IS NOT NULL"
+        inFlds = ["MUKEY", "AREASYMBOL", "COMPPCT_R", dSDV["attributecolumnname"].upper()]  # not sure why I have AREASYMBOL on the end..
+        outFlds = ["MUKEY", "AREASYMBOL", dSDV["resultcolumnname"].upper()]
 
-        # initialTbl must be in a file geodatabase to support ORDER_BY
-        # Do I really need to sort by attribucolumn when it will be replaced by Domain values later?
-        sqlClause =  (None, " ORDER BY MUKEY ASC, COMPPCT_R DESC")
+        sqlClause =  (None, "ORDER BY MUKEY ASC")
 
+        # For Percent Present, do not apply the whereclause to the cursor. Wait
+        # and use it against each record so that all map units are rated.
+        #whereClause = dSDV["sqlwhereclause"]
+        whereClause = ""
+        hydric = dSDV["sqlwhereclause"].split("=")[1].encode('ascii').strip().replace("'","")
+        #PrintMsg(" \n" + attribcolumn + " = " + hydric, 1)
 
         if arcpy.Exists(outputTbl):
             arcpy.Delete_management(outputTbl)
 
+        # Create outputTbl based upon initialTbl schema
         outputTbl = CreateOutputTable(initialTbl, outputTbl, dFieldInfo)
-        outputValues = list()
 
         if outputTbl == "":
             return outputTbl, outputValues
 
-        lastCokey = "xxxx"
-        dComp = dict()
-        dCompPct = dict()
-        dMapunit = dict()
-        missingDomain = list()
-        dCase = dict()
-        dAreasym = dict()
-
-        # Read initial table for non-numeric data types
-        # 02-03-2016 Try adding 'choice' to this method to see if it handles Cons. Tree/Shrub better
-        # than the next method. Nope, did not work. Still have case problems.
-        #
-        if dSDV["attributelogicaldatatype"].lower() == "string":
-            # PrintMsg(" \ndomainValues for " + dSDV["attributelogicaldatatype"].lower() + "-type values : " + str(domainValues), 1)
+        lastMukey = "xxxx"
+        dRating = dict()
+        # reset variables for cursor
+        sumPct = 0
+        sumProd = 0
+        meanVal = 0
+        iMax = -999999999
+        iMin = 999999999
 
-            with arcpy.da.SearchCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
+        if bVerbose:
+            PrintMsg(" \nReading " + initialTbl + " and writing to " + outputTbl, 1)
 
+        with InitialTableCursor(initialTbl, inFlds, where_clause=whereClause, sql_clause=sqlClause) as cur:
+            with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
                 for rec in cur:
-                    dAreasym[rec[0]] = rec[4]
-                    try:
-                        # capture component ratings as index numbers instead.
-                        dComp[rec[1]].append(dValues[str(rec[3]).upper()][0])
+                    mukey, areasym, comppct, val= rec
 
-                    except:
-                        dComp[rec[1]] = [dValues[str(rec[3]).upper()][0]]
-                        dCompPct[rec[1]] = rec[2]
-                        dCase[str(rec[3]).upper()] = rec[3]  # save original value using uppercase key
+                    if comppct is None:
+                        comppct = 0
 
+                    if mukey != lastMukey and lastMukey != "xxxx":
+                        #if sumPct > 0:
+                        # write out record for previous mapunit
+                        newrec = [lastMukey, areasym, sumPct]
+                        ocur.insertRow(newrec)
+                        iMax = max(sumPct, iMax)
 
-                        # save list of components for each mapunit
-                        try:
-                            dMapunit[rec[0]].append(rec[1])
+                        if not sumPct is None:
+                            iMin = min(sumPct, iMin)
 
-                        except:
-                            dMapunit[rec[0]] = [rec[1]]
+                        # reset variables for the next mapunit record
+                        sumPct = 0
 
-        elif dSDV["attributelogicaldatatype"].lower() in ["float", "integer", "choice"]:
-            # PrintMsg(" \ndomainValues for " + dSDV["attributelogicaldatatype"] + " values: " + str(domainValues), 1)
+                    # set new mapunit flag
+                    lastMukey = mukey
 
-            with arcpy.da.SearchCursor(initialTbl, inFlds, sql_clause=sqlClause, where_clause=whereClause) as cur:
+                    # accumulate data for this mapunit
+                    if str(val).upper() == hydric.upper():
+                        # using the sqlwhereclause on each record so that
+                        # the 'NULL' hydric map units are assigned zero instead of NULL.
+                        sumPct += comppct
 
-                for rec in cur:
-                    dAreasym[rec[0]] = rec[4]
-                    try:
-                        # capture component ratings as index numbers instead
-                        dComp[rec[1]].append(dValues[str(rec[3]).upper()][0])
+                # Add final record
+                newrec = [lastMukey, areasym, sumPct]
+                ocur.insertRow(newrec)
 
-                    except:
-                        #PrintMsg(" \ndomainValues is empty, but legendValues has " + str(legendValues), 1)
-                        dCase[str(rec[3]).upper()] = rec[3]
+        return outputTbl, [iMin, iMax]
 
-                        if str(rec[3]).upper() in dValues:
-                            dComp[rec[1]] = [dValues[str(rec[3]).upper()][0]]
-                            dCompPct[rec[1]] = rec[2]
+    except MyError, e:
+        PrintMsg(str(e), 2)
+        return outputTbl, []
 
-                            # compare actual rating value to domainValues to make sure case is correct
-                            if not rec[3] in domainValues: # this is a case problem
-                                # replace the original dValue item
-                                dValues[str(rec[3]).upper()][1] = rec[3]
-                                # replace the value in domainValues list
-                                for i in range(len(domainValues)):
-                                    if domainValues[i].upper() == rec[3].upper():
-                                        domainValues[i] = rec[3]
+    except:
+        errorMsg()
+        return outputTbl, []
 
-                        else:
-                            # dValues is keyed on uppercase string rating
-                            #
-                            if not str(rec[3]) in missingDomain:
-                                # Try to add missing value to dDomainValues dict and domainValues list
-                                dValues[str(rec[3]).upper()] = [len(dValues), rec[3]]
-                                domainValues.append(rec[3])
-                                domainValuesUp.append(rec[3].upper())
-                                missingDomain.append(str(rec[3]))
-                                #PrintMsg("\tAdding value '" + str(rec[3]) + "' to domainValues", 1)
+## ===================================================================================
+def AggregateHz_WTA_SUM(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker, top, bot, bZero):
+    # Aggregate mapunit-component-horizon data to the map unit level using a weighted average
+    #
+    # This version uses SUM for horizon data as in AWS
+    # Added areasymbol to output
+    #
+    try:
+        import decimal
 
-                        # save list of components for each mapunit
-                        try:
-                            dMapunit[rec[0]].append(rec[1])
+        arcpy.SetProgressorLabel("Aggregating rating information to the map unit level")
+        #
+        # Create final output table with MUKEY, COMPPCT_R and sdvFld
+        if bVerbose:
+            PrintMsg(" \nCurrent function : " + sys._getframe().f_code.co_name, 1)
 
-                        except:
-                            dMapunit[rec[0]] = [rec[1]]
+        outputTbl = os.path.join(sdvGDB, tblName)
+        #attribcolumn = dSDV["attributecolumnname"].upper()
+        #resultcolumn = dSDV["resultcolumnname"].upper()
+        fldPrecision = max(0, dSDV["attributeprecision"])
 
-        else:
-            PrintMsg(" \nProblem with handling domain values of type '" + dSDV["attributelogicaldatatype"] + "'", 1)
+        inFlds = ["MUKEY", "COKEY", "COMPPCT_R", "HZDEPT_R", "HZDEPB_R", dSDV["attributecolumnname"].upper(), "AREASYMBOL"]
+        outFlds = ["MUKEY", "COMPPCT_R", dSDV["resultcolumnname"].upper(), "AREASYMBOL"]
 
-        # Aggregate monthly index values to a single value for each component
-        # Sort depending upon tiebreak setting
-        # Update dictionary with a single index value for each component
-        PrintMsg(" \nNot sure about this sorting code for tiebreaker", 1)
+        sqlClause =  (None, "ORDER BY MUKEY ASC, COMPPCT_R DESC, HZDEPT_R ASC")
+
+        if bZero == False:
+            # ignore any null values
+            whereClause = "COMPPCT_R >=  " + str(cutOff) + " AND " + dSDV["attributecolumnname"].upper() + " IS NOT NULL"
 
-        if tieBreaker == dSDV["tiebreakhighlabel"]:
-            # "Higher" (default for flooding and ponding frequency)
-            for cokey, indexes in dComp.items():
-                val = sorted(indexes, reverse=True)[0]
-                dComp[cokey] = val
         else:
-            for cokey, indexes in dComp.items():
-                val = sorted(indexes)[0]
-                dComp[cokey] = val
+            # retrieve null values and convert to zeros during the iteration process
+            whereClause = "COMPPCT_R >=  " + str(cutOff)
 
-        # Save list of component data to each mapunit
-        dRatings = dict()
+        if len(depthRanges) > 0:
+            # Rate all of the depth ranges in one pass (CreateDepthRangeTable)
+            return AggregateHz_DepthRanges(initialTbl, inFlds, whereClause, outputTbl, gSSURGO_AggregateArrays.HzRanges_WTA_SUM, (bZero,), True)
 
-        with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
+        if arcpy.Exists(outputTbl):
+            arcpy.Delete_management(outputTbl)
 
-            if tieBreaker == dSDV["tiebreakhighlabel"]:
-                # Default for flooding and ponding frequency
-                #
-                #PrintMsg(" \ndomainValues: " + str(domainValues), 1)
+        outputTbl = CreateOutputTable(initialTbl, outputTbl, dFieldInfo)
 
-                for mukey, cokeys in dMapunit.items():
-                    dRating = dict()   # save sum of comppct for each rating within a mapunit
-                    muVals = list()   # may not need this for DCD
+        if outputTbl == "":
+            return outputTbl, outputValues
 
-                    for cokey in cokeys:
-                        #PrintMsg("\tB ratingIndx: " + str(dComp[cokey]), 1)
-                        compPct = dCompPct[cokey]
-                        ratingIndx = dComp[cokey]
+        # Load the initial table into sorted arrays. Horizons are reduced to components and
+        # components to map units by gSSURGO_AggregateArrays.
+        dArrays = gSSURGO_AggregateArrays.ReadHorizonArrays(initialTbl, inFlds, whereClause)
 
-                        if ratingIndx in dRating:
-                            sumPct = dRating[ratingIndx] + compPct
-                            dRating[ratingIndx] = sumPct  # this part could be compacted
+        if len(dArrays) == 0:
+            raise MyError, "Failed to read " + initialTbl + " into arrays"
 
-                        else:
-                            dRating[ratingIndx] = compPct
+        muKeys, muPct, muVals, muAreasyms = gSSURGO_AggregateArrays.Hz_WTA_SUM(dArrays, top, bot, bZero)
+        del dArrays
+        outputValues= [999999999, -999999999]
 
-                    for rating, compPct in dRating.items():
-                        muVals.append([compPct, rating])
+        # Write out map unit aggregated AWS
+        #
+        with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
+            for mukey, comppct, aws, areasym in zip(muKeys.tolist(), muPct.tolist(), muVals.tolist(), muAreasyms.tolist()):
+                aws = round(aws, fldPrecision)
+                murec = [mukey, int(comppct), aws, areasym]
+                ocur.insertRow(murec)
 
-                    #newVals = sorted(muVals, key = lambda x : (-x[0], x[1]))[0]  # Works for maplegendkey=2
-                    #newVals = sorted(sorted(muVals, key = lambda x : x[0], reverse=True), key = lambda x : x[1], reverse=True)[0]
-                    muVal = SortData(muVals, 0, 1, True, True)
-                    newrec = [mukey, muVal[0], domainValues[muVal[1]], dAreasym[mukey]]
-                    ocur.insertRow(newrec)
+                # save max-min values
+                outputValues[0] = min(aws, outputValues[0])
+                outputValues[1] = max(aws, outputValues[1])
 
-                    if not newrec[2] is None and not newrec[2] in outputValues:
-                        outputValues.append(newrec[2])
+        outputValues.sort()
 
-            else:
-                # Lower
-                PrintMsg(" \nFinal lower tiebreaker", 1)
+        return outputTbl, outputValues
 
-                for mukey, cokeys in dMapunit.items():
-                    dRating = dict()  # save sum of comppct for each rating within a mapunit
-                    muVals = list()   # may not need this for DCD
+    except MyError, e:
+        PrintMsg(str(e), 2)
+        return outputTbl, []
 
-                    for cokey in cokeys:
-                        try:
-                            #PrintMsg("\tA ratingIndx: " + str(dComp[cokey]), 1)
-                            compPct = dCompPct[cokey]
-                            ratingIndx = dComp[cokey]
+    except:
+        errorMsg()
+        return outputTbl, []
 
-                            if ratingIndx in dRating:
-                                sumPct = dRating[ratingIndx] + compPct
-                                dRating[ratingIndx] = sumPct  # this part could be compacted
+## ===================================================================================
+def AggregateHz_WTA_WTA(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker, top, bot, bZero):
+    # Aggregate mapunit-component-horizon data to the map unit level using a weighted average
+    #
+    # This version uses weighted average for horizon data as in AWC and most others
+    # Added areasymbol to output
+    try:
+        arcpy.SetProgressorLabel("Aggregating rating information to the map unit level")
 
-                            else:
-                                dRating[ratingIndx] = compPct
+        #
+        if bVerbose:
+            PrintMsg(" \nCurrent function : " + sys._getframe().f_code.co_name, 1)
 
-                        except:
-                            pass
+        # Create final output table with MUKEY, COMPPCT_R and sdvFld
+        outputTbl = os.path.join(sdvGDB, tblName)
+        fldPrecision = max(0, dSDV["attributeprecision"])
+        inFlds = ["MUKEY", "COKEY", "COMPPCT_R", "HZDEPT_R", "HZDEPB_R", dSDV["attributecolumnname"].upper(), "AREASYMBOL"]
+        outFlds = ["MUKEY", "COMPPCT_R", dSDV["resultcolumnname"].upper(), "AREASYMBOL"]
 
-                    for rating, compPct in dRating.items():
-                        muVals.append([compPct, rating])
+        sqlClause =  (None, "ORDER BY MUKEY ASC, COMPPCT_R DESC, HZDEPT_R ASC")
 
-                    #newVals = sorted(muVals, key = lambda x : (-x[0], -x[1]))[0] # Works for maplegendkey=2
-                    #newVals = sorted(sorted(muVals, key = lambda x : x[0], reverse=True), key = lambda x : x[1], reverse=False)[0]
-                    muVal = SortData(muVals, 0, 1, True, False)
-                    newrec = [mukey, muVal[0], domainValues[muVal[1]], dAreasym[mukey]]
-                    ocur.insertRow(newrec)
+        if bZero == False:
+            # ignore any null values
+            whereClause = "COMPPCT_R >=  " + str(cutOff) + " AND " + dSDV["attributecolumnname"].upper() + " IS NOT NULL"
 
-                    if not newrec[2] is None and not newrec[2] in outputValues:
-                        outputValues.append(newrec[2])
+        else:
+            # retrieve null values and convert to zeros during the iteration process
+            whereClause = "COMPPCT_R >=  " + str(cutOff)
+
+        if len(depthRanges) > 0:
+            # Rate all of the depth ranges in one pass (CreateDepthRangeTable)
+            return AggregateHz_DepthRanges(initialTbl, inFlds, whereClause, outputTbl, gSSURGO_AggregateArrays.HzRanges_WTA_WTA, (bZero,), True)
+
+        if arcpy.Exists(outputTbl):
+            arcpy.Delete_management(outputTbl)
+
+        outputTbl = CreateOutputTable(initialTbl, outputTbl, dFieldInfo)
+
+        if outputTbl == "":
+            return outputTbl,[]
+
+        # Load the initial table into sorted arrays. Horizons are reduced to components and
+        # components to map units by gSSURGO_AggregateArrays.
+        dArrays = gSSURGO_AggregateArrays.ReadHorizonArrays(initialTbl, inFlds, whereClause)
+
+        if len(dArrays) == 0:
+            raise MyError, "Failed to read " + initialTbl + " into arrays"
+
+        muKeys, muPct, muVals, muAreasyms = gSSURGO_AggregateArrays.Hz_WTA_WTA(dArrays, top, bot, bZero)
+        del dArrays
+        outputValues= [999999999, -999999999]
 
+        # Write out map unit aggregated rating
+        #
+        with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
+            for mukey, sumPct, val, areasym in zip(muKeys.tolist(), muPct.tolist(), muVals.tolist(), muAreasyms.tolist()):
+                aws = round(val, fldPrecision)
+                murec = [mukey, int(sumPct), aws, areasym]
+                ocur.insertRow(murec)
+
+                # save max-min values
+                outputValues[0] = min(aws, outputValues[0])
+                outputValues[1] = max(aws, outputValues[1])
 
         outputValues.sort()
+
         return outputTbl, outputValues
 
     except MyError, e:
         PrintMsg(str(e), 2)
-        return outputTbl, outputValues
+        return outputTbl, []
 
     except:
         errorMsg()
-        return outputTbl, outputValues
+        return outputTbl, []
 
 ## ===================================================================================
-def AggregateCo_WTA(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker, bZero):
-    # Aggregate mapunit-component data to the map unit level using a weighted average
+def AggregateHz_DCP_WTA_Old(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker, top, bot, bZero):
     #
-    # Possible problem with Depth to Restriction and the null replacement values of 201. nullRating
-    # Should be calculating 'BrD' mapunit using [ (66/(66 + 15) X 38cm) + (15/(66 + 15) X 0cm) ]
+    # Dominant component for mapunit-component-horizon data to the map unit level
+    #
+    # This version uses weighted average for horizon data
+    # Added areasymbol to output
+    #
+    # Possible problem: what happened to my tiebreak handler for multiple dominant components?
 
-    # Another question. For depth to any restriction, there could be multiple restrictions per
-    # component. Do I need to sort on depth according to tieBreaker setting?
-    
     try:
-        #bVerbose = True
-
-        # TEST CODE FOR nullRating handling
-        if bVerbose:
-            PrintMsg(" \nnullRating: " + str(nullRating), 1)
-
         arcpy.SetProgressorLabel("Aggregating rating information to the map unit level")
 
         # Create final output table with MUKEY, COMPPCT_R and sdvFld
+        bVerbose = True
+
         if bVerbose:
             PrintMsg(" \nCurrent function : " + sys._getframe().f_code.co_name, 1)
 
-        outputTbl = os.path.join(gdb, tblName)
-        #attribcolumn = dSDV["attributecolumnname"].upper()
-        #resultcolumn = dSDV["resultcolumnname"].upper()
+        outputTbl = os.path.join(sdvGDB, tblName)
         fldPrecision = max(0, dSDV["attributeprecision"])
-
-        inFlds = ["MUKEY", "COKEY", "COMPPCT_R", dSDV["attributecolumnname"].upper(), "AREASYMBOL"]
+        inFlds = ["MUKEY", "COKEY", "COMPPCT_R", "HZDEPT_R", "HZDEPB_R", dSDV["attributecolumnname"].upper(), "AREASYMBOL"]
         outFlds = ["MUKEY", "COMPPCT_R", dSDV["resultcolumnname"].upper(), "AREASYMBOL"]
 
-        # sort order of value is important
-        if tieBreaker == "Lower":
-            sOrder = " DESC"
-
-        else:
-            sOrder = " ASC"
-
-        sqlClause =  (None, "ORDER BY MUKEY ASC, COMPPCT_R DESC, " + dSDV["attributecolumnname"].upper() + sOrder)
-
-        if bZero == False and nullRating is None:
-            # ignore any null values
-            whereClause = "COMPPCT_R >=  " + str(cutOff) + " AND " + dSDV["attributecolumnname"].upper() + " IS NOT NULL"
-
-        else:
-            # ignore values = null replacement value. Trying to fix Depth to Restriction WTA problem.
-            #
-            if not nullRating is None:
-                #whereClause = "COMPPCT_R >=  " + str(cutOff) + " AND " + dSDV["attributecolumnname"].upper() + " IS NOT NULL AND " + dSDV["attributecolumnname"].upper() + " <> " + str(nullRating)
-                #whereClause = "COMPPCT_R >=  " + str(cutOff) + " AND " + dSDV["attributecolumnname"].upper() + " <> " + str(nullRating)
-                whereClause = "COMPPCT_R >=  " + str(cutOff) + " AND " + dSDV["attributecolumnname"].upper() + " IS NOT NULL"
+        sqlClause =  (None, "ORDER BY MUKEY ASC, COMPPCT_R DESC, HZDEPT_R ASC")
+        whereClause = "COMPPCT_R >=  " + str(cutOff)
+        # whereClause = "COMPPCT_R >=  " + str(cutOff) + " AND " + dSDV["attributecolumnname"].upper() + " IS NOT NULL"
 
-            else:
-                # retrieve null values and convert to zeros during the iteration process
-                whereClause = "COMPPCT_R >=  " + str(cutOff)
 
         if arcpy.Exists(outputTbl):
             arcpy.Delete_management(outputTbl)
 
-        if bVerbose:
-            PrintMsg(" \nSQL: " + whereClause, 1)
-            PrintMsg("Input table (" + initialTbl + ") has " + str(int(arcpy.GetCount_management(initialTbl).getOutput(0))) + " records", 1)
-
         outputTbl = CreateOutputTable(initialTbl, outputTbl, dFieldInfo)
-        outputValues = list()
+        outputValues= [999999999, -999999999]
 
         if outputTbl == "":
-            return outputTbl, outputValues
+            raise MyError,""
+
+        dPct = dict()  # sum of comppct_r for each map unit
+        dComp = dict() # component level information
+        dMu = dict()
 
-        lastMukey = "xxxx"
-        dRating = dict()
         # reset variables for cursor
         sumPct = 0
         sumProd = 0
         meanVal = 0
-        #prec = dSDV["attributeprecision"]
-        outputValues = [999999999, -999999999]
-        recCnt = 0
-        areasym = ""
-        dPct = dict()  # sum of comppct_r for each map unit
-        dMapunit = dict()
 
-        with arcpy.da.SearchCursor(initialTbl, inFlds, where_clause=whereClause, sql_clause=sqlClause) as cur:
+        with InitialTableCursor(initialTbl, inFlds, where_clause=whereClause, sql_clause=sqlClause) as cur:
             with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
-                for rec in cur:
-                    recCnt += 1
-                    mukey, cokey, comppct, val, areasym = rec
-                    #PrintMsg(str(recCnt) + ". " + str(rec), 1)
+                #arcpy.SetProgressor("step", "Reading initial query table ...",  0, iCnt, 1)
 
-                    # Capture component list for each mapunit
-                    try:
-                        if not cokey in dMapunit[mukey]:
-                            dMapunit[mukey].append(cokey)
-                            
-                            if not val == nullRating:
-                                dPct[mukey] += comppct
+                for rec in cur:
+                    mukey, cokey, comppct, hzdept, hzdepb, val, areasym = rec
+                    # top = hzdept
+                    # bot = hzdepb
+                    # td = top of range
+                    # bd = bottom of range
 
-                    except:
-                        dMapunit[mukey] = [cokey]
+                    if not cokey in dComp and not mukey in dPct:
+                        # Problem:
+                        # This if statement above is only gettting the first component and ignoring any ties based upon component percent
+                        #
 
-                        if not val == nullRating:
-                            dPct[mukey] = comppct
+                        dPct[mukey] = comppct
 
-                    if val is None and bZero:
-                        # convert null values to zero
-                        val = 0.0
+                        if val is not None and hzdept is not None and hzdepb is not None:
+                            # Normal component with horizon data
+                            hzT = min(hzdepb, bot) - max(hzdept, top)
+                            aws = float(hzT) * val
+                            dComp[cokey] = [mukey, comppct, hzT, aws, areasym]
 
-                    if val == nullRating:
-                        # 
-                        val = None
-                        
-                        
+                        else:
+                            # Component with no horizon data
+                            dComp[cokey] = [mukey, comppct, None, None, areasym]
 
-                    #if bVerbose and mukey in ['374414', '374451']:
-                    #    PrintMsg("\t\tMukey " + mukey + ":" + cokey + ";  " + str(comppct) + "%;  " + str(val), 1)
 
-                    if mukey != lastMukey and lastMukey != "xxxx":
-                        # I'm losing an output value when there is only one rated component and bZeros == True
-                        # This is because only the non-Null ratings are being processed for things like Range Production (Normal Year) in Batch Mode.
-                        #
+                    elif cokey in dComp :
                         try:
-                            sumPct = dPct[lastMukey]
+                            # For dominant component:
+                            # accumulate total thickness and total rating value by adding to existing component values  CHK
 
-                        except:
-                            dPct[lastMukey] = 0
-                            sumPct = 0
-                        
-                        if (sumPct > 0 and sumProd is not None):
-                            # write out record for previous mapunit
+                                mukey, comppct, dHzT, dAWS, areasym = dComp[cokey]
 
-                            meanVal = round(float(sumProd) / sumPct, fldPrecision)
-                            newrec = [lastMukey, sumPct, meanVal, areasym]
-                            ocur.insertRow(newrec)
+                                if val is not None and hzdept is not None and hzdepb is not None:
+                                    hzT = min(hzdepb, bot) - max(hzdept, top)
+                                    aws = float(hzT) * val
+                                    dAWS = max(0, dAWS) + aws
+                                    dHzT = max(0, dHzT) + hzT
+                                    dComp[cokey] = [mukey, comppct, dHzT, dAWS, areasym]
 
-                            #if bVerbose and lastMukey in ['374414', '374451']:
-                            #    PrintMsg("\tTest mapunit1 " + lastMukey + ": " + str(meanVal) + ";  " + str(sumPct) + "%", 1)
+                            #if bVerbose and mukey == '296159':
+                            #    PrintMsg("\t" + mukey + "; " + cokey + ";  " + str(comppct) + "%;  " + str(max(hzdept, top)) + "-->" + str(min(hzdepb, bot)) + "cm; " + str(hzT) + "; " + str(round(dAWS, 2)), 1)
 
-                            # reset variables for the next mapunit record
-                            sumPct = 0
-                            sumProd = None
+                        except KeyError:
+                            # Hopefully this is a component other than dominant
+                            pass
 
-                            # save max-min values
-                            if not meanVal is None:
-                                outputValues[0] = min(meanVal, outputValues[0])
-                                outputValues[1] = max(meanVal, outputValues[1])
+                        except:
+                            errorMsg()
 
-                        else:
-                        #    Tried to bring back null rating replacement value (201), but that didn't work because those
-                        #    are being excluded from the entire process by the sql_clause.
-                        #
-                            newrec = [lastMukey, sumPct, nullRating, areasym]
-                            #if bVerbose and lastMukey in ['374414', '374451']:
-                            #    PrintMsg("\tTest mapunit2 " + lastMukey + ": " + str(nullRating) + ";  " + str(sumPct) + "%", 1)
-                                
-                            ocur.insertRow(newrec)
-                            # reset variables for the next mapunit record
-                            sumPct = 0
-                            sumProd = None
-                            dPct[lastMukey] = 0
 
-                    # accumulate data for this mapunit
-                    #PrintMsg("\tFollowup summary", 1)
-                    #sumPct += comppct
 
-                    if val is not None:
-                        prod = comppct * float(val)
-                        try:
-                            sumProd += prod
 
-                        except:
-                            sumProd = prod
+                # get the total number of major components from the dictionary count
+                iComp = len(dComp)
 
-                    # set new mapunit flag
-                    lastMukey = mukey
+                # Read through the component-level data and summarize to the mapunit level
 
-                # Add final record
-                try:
-                    sumPct = dPct[lastMukey]
+                if iComp > 0:
+                    #PrintMsg("\t" + str(top) + " - " + str(bot) + "cm (" + Number_Format(iComp, 0, True) + " components)"  , 0)
 
-                except:
-                    dPct[lastMukey] = 0
-                
-                if areasym != "" and sumPct != 0:  # 
-                    if sumProd is None:
-                        meanVal = nullRating
+                    #arcpy.SetProgressor("step", "Saving map unit and component AWS data...",  0, iComp, 1)
 
-                    else:
-                        meanVal = round(float(sumProd) / sumPct, fldPrecision)
-                        
-                    newrec = [lastMukey, sumPct, meanVal, areasym]  # if there is no data, this will error
-                    ocur.insertRow(newrec)
+                    for cokey, vals in dComp.items():
 
-                    if dSDV["resultcolumnname"].upper().startswith("NCCPI"):
-                        # For NCCPI, hardcode the range of values from 0.0 to 1.0 for a consistent map legend
-                        outputValues = [0.0, 1.0]
+                        # get component level data
+                        mukey, comppct, hzT, cval, areasym = vals
 
-                    elif not meanVal is None:
-                        outputValues[0] = min(meanVal, outputValues[0])
-                        outputValues[1] = max(meanVal, outputValues[1])
+                        if mukey == '1380438':
+                            # This mapunit has 2 components at 50%. Using this as a tiebreaker test
+                            PrintMsg("\tCHorizon data: " + mukey + "; " + cokey + "; " + str(comppct) + "%; " + str(cval), 1)
+
+
+                        # get sum of comppct for mapunit
+                        sumPct = dPct[mukey]
+
+                        # calculate mean value for entire depth range
+                        if not cval is None and hzT > 0:
+                            newval = float(cval) / hzT
+
+                        else:
+                            newval = None
+
+                        if mukey in dMu:
+                            pct, mval = dMu[mukey]
+                            newval = newval + mval
+
+                        dMu[mukey] = [sumPct, newval, areasym]
+
+                # Write out map unit aggregated AWS
+                #
+                murec = list()
+                for mukey, vals in dMu.items():
+                    sumPct, val, areasym = vals
+
+                    if not val is None:
+                        val = round(val, fldPrecision)
+
+                    murec = [mukey, sumPct, val, areasym]
+                    ocur.insertRow(murec)
+                    #PrintMsg("\tMapunit: " + mukey + "; " + str(sumPct) + "%; " + str(val), 1)
+
+                    # save max-min values
+                    if not val is None:
+                        outputValues[0] = min(val, outputValues[0])
+                        outputValues[1] = max(val, outputValues[1])
 
         outputValues.sort()
-        del sumPct
-        del sumProd
-        del meanVal
 
-        if outputValues[0] == -999999999 or outputValues[1] == 999999999:
-            # Sometimes no data can skip through the max min test
-            outputValues = [0.0, 0.0]
+        #if (bZero and outputValues ==  [0.0, 0.0]):
+        #    PrintMsg(" \nNo data for " + sdvAtt, 1)
+            
 
         return outputTbl, outputValues
 
     except MyError, e:
         PrintMsg(str(e), 2)
-        outputTbl, outputValues
+        return outputTbl, outputValues
 
     except:
         errorMsg()
         return outputTbl, outputValues
 
 ## ===================================================================================
-def AggregateCo_WTA_Old(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker, bZero):
-    # Aggregate mapunit-component data to the map unit level using a weighted average
+def AggregateHz_DCP_WTA(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker, top, bot, bZero):
     #
-    # Possible problem with Depth to Restriction and the null replacement values of 201. nullRating
-    # Should be calculating 'BrD' mapunit using [ (66/(66 + 15) X 38cm) + (15/(66 + 15) X 0cm) ]
+    # Dominant component for mapunit-component-horizon data to the map unit level
+    #
+    # This version uses weighted average for horizon data
+    # Added areasymbol to output
+    #
+    # Problem: Need to fix tiebreaker logic
 
-    # Another question. For depth to any restriction, there could be multiple restrictions per
-    # component. Do I need to sort on depth according to tieBreaker setting?
-    
     try:
-        bVerbose = True
-
-        # TEST CODE FOR nullRating handling
-        if bVerbose:
-            PrintMsg(" \nnullRating: " + str(nullRating), 1)
-
         arcpy.SetProgressorLabel("Aggregating rating information to the map unit level")
 
         # Create final output table with MUKEY, COMPPCT_R and sdvFld
+        #bVerbose = True
+
         if bVerbose:
             PrintMsg(" \nCurrent function : " + sys._getframe().f_code.co_name, 1)
 
-        outputTbl = os.path.join(gdb, tblName)
-        #attribcolumn = dSDV["attributecolumnname"].upper()
-        #resultcolumn = dSDV["resultcolumnname"].upper()
+        outputTbl = os.path.join(sdvGDB, tblName)
         fldPrecision = max(0, dSDV["attributeprecision"])
-
-        inFlds = ["MUKEY", "COKEY", "COMPPCT_R", dSDV["attributecolumnname"].upper(), "AREASYMBOL"]
+        inFlds = ["MUKEY", "COKEY", "COMPPCT_R", "HZDEPT_R", "HZDEPB_R", dSDV["attributecolumnname"].upper(), "AREASYMBOL"]
         outFlds = ["MUKEY", "COMPPCT_R", dSDV["resultcolumnname"].upper(), "AREASYMBOL"]
 
+        sqlClause =  (None, "ORDER BY MUKEY ASC, COMPPCT_R DESC, HZDEPT_R ASC")
+        whereClause = "COMPPCT_R >=  " + str(cutOff)
+        # whereClause = "COMPPCT_R >=  " + str(cutOff) + " AND " + dSDV["attributecolumnname"].upper() + " IS NOT NULL"
 
-        sqlClause =  (None, "ORDER BY MUKEY ASC, COMPPCT_R DESC, " + dSDV["attributecolumnname"].upper() + " DESC")
-
-        if bZero == False:
-            # ignore any null values
-            whereClause = "COMPPCT_R >=  " + str(cutOff) + " AND " + dSDV["attributecolumnname"].upper() + " IS NOT NULL"
-
-        else:
-            # ignore values = null replacement value. Trying to fix Depth to Restriction WTA problem.
-            #
-            if not nullRating is None:
-                whereClause = "COMPPCT_R >=  " + str(cutOff) + " AND " + dSDV["attributecolumnname"].upper() + " != " + str(nullRating)
 
-            else:
-                # retrieve null values and convert to zeros during the iteration process
-                whereClause = "COMPPCT_R >=  " + str(cutOff)
+        if len(depthRanges) > 0:
+            # Rate all of the depth ranges in one pass (CreateDepthRangeTable)
+            return AggregateHz_DepthRanges(initialTbl, inFlds, whereClause, outputTbl, gSSURGO_AggregateArrays.HzRanges_DCP_WTA, (tieBreaker == dSDV["tiebreakhighlabel"],), False)
 
         if arcpy.Exists(outputTbl):
             arcpy.Delete_management(outputTbl)
 
-        if bVerbose:
-            PrintMsg(" \nSQL: " + whereClause, 1)
-            PrintMsg("Input table has " + str(int(arcpy.GetCount_management(initialTbl).getOutput(0))), 1)
-
         outputTbl = CreateOutputTable(initialTbl, outputTbl, dFieldInfo)
-        outputValues = list()
+        outputValues= [999999999, -999999999]
 
         if outputTbl == "":
-            return outputTbl, outputValues
-
-        lastMukey = "xxxx"
-        dRating = dict()
-        # reset variables for cursor
-        sumPct = 0
-        sumProd = 0
-        meanVal = 0
-        #prec = dSDV["attributeprecision"]
-        outputValues = [999999999, -999999999]
-        recCnt = 0
-        areasym = ""
-        dPct = dict()  # sum of comppct_r for each map unit
-        #dMapunit = dict()
-
-        with arcpy.da.SearchCursor(initialTbl, inFlds, where_clause=whereClause, sql_clause=sqlClause) as cur:
-            with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
-                for rec in cur:
-                    recCnt += 1
-                    mukey, cokey, comppct, val, areasym = rec
-                    #PrintMsg(str(recCnt) + ". " + str(rec), 1)
-
-                    if val is None and bZero:
-                        # convert null values to zero
-                        val = 0.0
-
-                    #if mukey != lastMukey and lastMukey != "xxxx":
-                    if mukey != lastMukey:
-                        # I'm losing an output value when there is only one rated component and bZeros == True
-                        # This is because only the non-Null ratings are being processed for things like Range Production (Normal Year) in Batch Mode.
-                        #
-                        cokeyList = [cokey] # first component
-                        dPct[mukey] = comppct
-                        
-                        if (sumPct > 0 and sumProd is not None):
-                            # write out record for previous mapunit
-
-                            meanVal = round(float(sumProd) / sumPct, fldPrecision)
-                            newrec = [lastMukey, sumPct, meanVal, areasym]
-                            ocur.insertRow(newrec)
-
-                            # reset variables for the next mapunit record
-                            sumPct = 0
-                            sumProd = None
-
-                            # save max-min values
-                            if not meanVal is None:
-                                outputValues[0] = min(meanVal, outputValues[0])
-                                outputValues[1] = max(meanVal, outputValues[1])
+            raise MyError,""
 
-                    if not cokey in cokeyList:  # other components
-                        cokeyList.append(cokey)
-                        dPct[mukey] += comppct
-                        
-    
+        # Load the initial table into sorted arrays. Horizons are reduced to components and
+        # components to map units by gSSURGO_AggregateArrays.
+        dArrays = gSSURGO_AggregateArrays.ReadHorizonArrays(initialTbl, inFlds, whereClause)
 
-                    # accumulate data for this mapunit
-                    #PrintMsg("\tFollowup summary", 1)
-                    sumPct += comppct
+        if len(dArrays) == 0:
+            raise MyError, "Failed to read " + initialTbl + " into arrays"
 
-                    if val is not None:
-                        prod = comppct * float(val)
-                        try:
-                            sumProd += prod
+        if tieBreaker == dSDV["tiebreakhighlabel"]:
+            bRev = True
 
-                        except:
-                            sumProd = prod
+        else:
+            bRev = False
 
-                    # set new mapunit flag
-                    lastMukey = mukey
+        # Dominant component(s) only. Ties on comppct are settled by the tiebreaker.
+        muKeys, muPct, muVals, muAreasyms = gSSURGO_AggregateArrays.Hz_DCP_WTA(dArrays, top, bot, bRev)
+        del dArrays
 
-                # Add final record
-                if areasym != "":  # not sure why this is needed
-                    meanVal = round(float(sumProd) / sumPct, fldPrecision)
-                    newrec = [lastMukey, sumPct, meanVal, areasym]  # if there is no data, this will error
-                    ocur.insertRow(newrec)
+        with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
+            for mukey, pct, val, areasym in zip(muKeys.tolist(), muPct.tolist(), muVals.tolist(), muAreasyms.tolist()):
+                if math.isnan(val):
+                    # No data for the dominant component
+                    rating = None
 
-                    if dSDV["resultcolumnname"].upper().startswith("NCCPI"):
-                        # For NCCPI, hardcode the range of values from 0.0 to 1.0 for a consistent map legend
-                        outputValues = [0.0, 1.0]
+                else:
+                    rating = round(val, fldPrecision)
+                    outputValues[0] = min(val, outputValues[0])
+                    outputValues[1] = max(val, outputValues[1])
 
-                    elif not meanVal is None:
-                        outputValues[0] = min(meanVal, outputValues[0])
-                        outputValues[1] = max(meanVal, outputValues[1])
+                murec =  mukey, int(pct), rating, areasym
+                ocur.insertRow(murec)
 
         outputValues.sort()
-        del sumPct
-        del sumProd
-        del meanVal
-
-        if outputValues[0] == -999999999 or outputValues[1] == 999999999:
-            # Sometimes no data can skip through the max min test
-            outputValues = [0.0, 0.0]
 
         return outputTbl, outputValues
 
     except MyError, e:
         PrintMsg(str(e), 2)
-        outputTbl, outputValues
+        return outputTbl, outputValues
 
     except:
         errorMsg()
         return outputTbl, outputValues
 
 ## ===================================================================================
-def AggregateCo_PP_SUM(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker):
-    #
-    # Aggregate data to the map unit level using a sum (Hydric)
-    # This is Percent Present
-    # Soil Data Viewer reports zero for non-Hydric map units. This function is
-    # currently not creating a record for those because they are not included in the
-    # sdv_initial table.
-    #
-    # Will try removing sql whereclause from cursor and apply it to each record instead.
-    #
-    # Added Areasymbol to output
-
+def AggregateHz_MaxMin_WTA(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker, top, bot, bZero):
+    # Aggregate mapunit-component-horizon data to the map unit level using weighted average
+    # for horizon data, but the assigns either the minimum or maximum component rating to
+    # the map unit, depending upon the Tiebreaker setting.
+    # Added areasymbol to output
     try:
         arcpy.SetProgressorLabel("Aggregating rating information to the map unit level")
-
-        # Create final output table with MUKEY, COMPPCT_R and sdvFld
+        #
         if bVerbose:
             PrintMsg(" \nCurrent function : " + sys._getframe().f_code.co_name, 1)
 
-        outputTbl = os.path.join(gdb, tblName)
+        # Create final output table with MUKEY, COMPPCT_R and sdvFld
+        outputTbl = os.path.join(sdvGDB, tblName)
         fldPrecision = max(0, dSDV["attributeprecision"])
-        inFlds = ["MUKEY", "AREASYMBOL", "COMPPCT_R", dSDV["attributecolumnname"].upper(), "AREASYMBOL"]  # not sure why I have AREASYMBOL on the end..
-        outFlds = ["MUKEY", "AREASYMBOL", dSDV["resultcolumnname"].upper(), "AREASYMBOL"]
 
-        inFlds = ["MUKEY", "AREASYMBOL", "COMPPCT_R", dSDV["attributecolumnname"].upper()]  # not sure why I have AREASYMBOL on the end..
-        outFlds = ["MUKEY", "AREASYMBOL", dSDV["resultcolumnname"].upper()]
+        inFlds = ["MUKEY", "COKEY", "COMPPCT_R", "HZDEPT_R", "HZDEPB_R", dSDV["attributecolumnname"].upper(), "AREASYMBOL"]
+        outFlds = ["MUKEY", "COMPPCT_R", dSDV["resultcolumnname"].upper(), "AREASYMBOL"]
 
-        sqlClause =  (None, "ORDER BY MUKEY ASC")
+        sqlClause =  (None, "ORDER BY MUKEY ASC, COMPPCT_R DESC, HZDEPT_R ASC")
 
-        # For Percent Present, do not apply the whereclause to the cursor. Wait
-        # and use it against each record so that all map units are rated.
-        #whereClause = dSDV["sqlwhereclause"]
-        whereClause = ""
-        hydric = dSDV["sqlwhereclause"].split("=")[1].encode('ascii').strip().replace("'","")
-        #PrintMsg(" \n" + attribcolumn + " = " + hydric, 1)
+        if bZero == False:
+            # ignore any null values
+            whereClause = "COMPPCT_R >=  " + str(cutOff) + " AND " + dSDV["attributecolumnname"].upper() + " IS NOT NULL"
+
+        else:
+            # retrieve null values and convert to zeros during the iteration process
+            whereClause = "COMPPCT_R >=  " + str(cutOff)
+
+        if len(depthRanges) > 0:
+            # Rate all of the depth ranges in one pass (CreateDepthRangeTable)
+            return AggregateHz_DepthRanges(initialTbl, inFlds, whereClause, outputTbl, gSSURGO_AggregateArrays.HzRanges_MaxMin_WTA, (bZero, tieBreaker == dSDV["tiebreakhighlabel"]), True)
 
         if arcpy.Exists(outputTbl):
             arcpy.Delete_management(outputTbl)
 
-        # Create outputTbl based upon initialTbl schema
         outputTbl = CreateOutputTable(initialTbl, outputTbl, dFieldInfo)
 
         if outputTbl == "":
-            return outputTbl, outputValues
-
-        lastMukey = "xxxx"
-        dRating = dict()
-        # reset variables for cursor
-        sumPct = 0
-        sumProd = 0
-        meanVal = 0
-        iMax = -999999999
-        iMin = 999999999
-
-        if bVerbose:
-            PrintMsg(" \nReading " + initialTbl + " and writing to " + outputTbl, 1)
+            return outputTbl,[]
 
-        with arcpy.da.SearchCursor(initialTbl, inFlds, where_clause=whereClause, sql_clause=sqlClause) as cur:
-            with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
-                for rec in cur:
-                    mukey, areasym, comppct, val= rec
+        # Load the initial table into sorted arrays. Horizons are reduced to components and
+        # components to map units by gSSURGO_AggregateArrays.
+        dArrays = gSSURGO_AggregateArrays.ReadHorizonArrays(initialTbl, inFlds, whereClause)
 
-                    if comppct is None:
-                        comppct = 0
+        if len(dArrays) == 0:
+            raise MyError, "Failed to read " + initialTbl + " into arrays"
 
-                    if mukey != lastMukey and lastMukey != "xxxx":
-                        #if sumPct > 0:
-                        # write out record for previous mapunit
-                        newrec = [lastMukey, areasym, sumPct]
-                        ocur.insertRow(newrec)
-                        iMax = max(sumPct, iMax)
+        if tieBreaker == dSDV["tiebreakhighlabel"]:
+            bHigh = True
 
-                        if not sumPct is None:
-                            iMin = min(sumPct, iMin)
+        else:
+            bHigh = False
 
-                        # reset variables for the next mapunit record
-                        sumPct = 0
+        muKeys, muPct, muVals, muAreasyms = gSSURGO_AggregateArrays.Hz_MaxMin_WTA(dArrays, top, bot, bZero, bHigh)
+        del dArrays
 
-                    # set new mapunit flag
-                    lastMukey = mukey
+        # Write out map unit aggregated rating
+        #
+        outputValues = [999999999, -999999999]
 
-                    # accumulate data for this mapunit
-                    if str(val).upper() == hydric.upper():
-                        # using the sqlwhereclause on each record so that
-                        # the 'NULL' hydric map units are assigned zero instead of NULL.
-                        sumPct += comppct
+        with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
+            for mukey, pct, val, areasym in zip(muKeys.tolist(), muPct.tolist(), muVals.tolist(), muAreasyms.tolist()):
+                rating = round(val, fldPrecision)
+                murec = [mukey, int(pct), rating, areasym]
+                ocur.insertRow(murec)
 
-                # Add final record
-                newrec = [lastMukey, areasym, sumPct]
-                ocur.insertRow(newrec)
+                # save overall max-min values
+                outputValues[0] = min(rating, outputValues[0])
+                outputValues[1] = max(rating, outputValues[1])
 
-        return outputTbl, [iMin, iMax]
+        return outputTbl, outputValues
 
     except MyError, e:
         PrintMsg(str(e), 2)
@@ -8702,24 +8171,18 @@ def AggregateCo_PP_SUM(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreak
         return outputTbl, []
 
 ## ===================================================================================
-def AggregateHz_WTA_SUM(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker, top, bot, bZero):
-    # Aggregate mapunit-component-horizon data to the map unit level using a weighted average
-    #
-    # This version uses SUM for horizon data as in AWS
-    # Added areasymbol to output
-    #
-    try:
-        import decimal
+def AggregateHz_MaxMin_DCD(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker, top, bot, bZero):
+    # Aggregate mapunit-component-horizon data to the map unit level using the highest rating
+    # from all horizons. Currently this would only apply to K Factor and dominant condition.
 
+    try:
         arcpy.SetProgressorLabel("Aggregating rating information to the map unit level")
         #
-        # Create final output table with MUKEY, COMPPCT_R and sdvFld
         if bVerbose:
             PrintMsg(" \nCurrent function : " + sys._getframe().f_code.co_name, 1)
 
-        outputTbl = os.path.join(gdb, tblName)
-        #attribcolumn = dSDV["attributecolumnname"].upper()
-        #resultcolumn = dSDV["resultcolumnname"].upper()
+        # Create final output table with MUKEY, COMPPCT_R and sdvFld
+        outputTbl = os.path.join(sdvGDB, tblName)
         fldPrecision = max(0, dSDV["attributeprecision"])
 
         inFlds = ["MUKEY", "COKEY", "COMPPCT_R", "HZDEPT_R", "HZDEPB_R", dSDV["attributecolumnname"].upper(), "AREASYMBOL"]
@@ -8741,7 +8204,7 @@ def AggregateHz_WTA_SUM(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBrea
         outputTbl = CreateOutputTable(initialTbl, outputTbl, dFieldInfo)
 
         if outputTbl == "":
-            return outputTbl, outputValues
+            return outputTbl,[]
 
         dPct = dict()  # sum of comppct_r for each map unit
         dComp = dict() # component level information
@@ -8751,12 +8214,9 @@ def AggregateHz_WTA_SUM(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBrea
         sumPct = 0
         sumProd = 0
         meanVal = 0
-        #prec = dSDV["attributeprecision"]
-        roundOff = 2
 
-        with arcpy.da.SearchCursor(initialTbl, inFlds, where_clause=whereClause, sql_clause=sqlClause) as cur:
+        with InitialTableCursor(initialTbl, inFlds, where_clause=whereClause, sql_clause=sqlClause) as cur:
             with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
-                #arcpy.SetProgressor("step", "Reading initial query table ...",  0, iCnt, 1)
 
                 for rec in cur:
                     mukey, cokey, comppct, hzdept, hzdepb, val, areasym = rec
@@ -8764,40 +8224,33 @@ def AggregateHz_WTA_SUM(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBrea
                     # bot = hzdepb
                     # td = top of range
                     # bd = bottom of range
-                    if val is None and bZero:
-                        val = 0
 
-                    if val is not None:
+                    if val is not None and hzdept is not None and hzdepb is not None:
 
                         # Calculate sum of horizon thickness and sum of component ratings for all horizons above bottom
                         try:
-                            hzT = min(hzdepb, bot) - max(hzdept, top)   # Getting a None error here.usable thickness from this horizon
+                            hzT = min(hzdepb, bot) - max(hzdept, top)   # usable thickness from this horizon
 
                         except:
                             hzT = 0
 
                         if hzT > 0:
-                            aws = float(hzT) * val
+                            ratingIndx = domainValues.index(val)   # Change KFactor to an index based upon domain order
+
                             #PrintMsg("\t" + str(aws), 1)
 
                             if not cokey in dComp:
                                 # Create initial entry for this component using the first horiozon CHK
-                                dComp[cokey] = [mukey, comppct, hzT, aws, areasym]
-
-                                try:
-                                    dPct[mukey] = dPct[mukey] + comppct
-
-                                except:
-                                    dPct[mukey] = comppct
+                                ratingList = [ratingIndx]
+                                dComp[cokey] = [mukey, comppct, ratingList, areasym]
 
                             else:
                                 # accumulate total thickness and total rating value by adding to existing component values  CHK
-                                mukey, comppct, dHzT, dAWS, areasym = dComp[cokey]
-                                dAWS = dAWS + aws
-                                dHzT = dHzT + hzT
-                                dComp[cokey] = [mukey, comppct, dHzT, dAWS, areasym]
-
-                        #arcpy.SetProgressorPosition()
+                                mukey, comppct, ratingList, areasym = dComp[cokey]
+                                
+                                if not ratingIndx in ratingList:
+                                    ratingList.append(ratingIndx)
+                                    dComp[cokey] = [mukey, comppct, ratingList, areasym]
 
                 # get the total number of major components from the dictionary count
                 iComp = len(dComp)
@@ -8807,67 +8260,53 @@ def AggregateHz_WTA_SUM(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBrea
                 if iComp > 0:
                     #PrintMsg("\t" + str(top) + " - " + str(bot) + "cm (" + Number_Format(iComp, 0, True) + " components)"  , 0)
 
-                    for cokey, dRec in dComp.items():
-                        # get component level data  CHK
-                        mukey, comppct, hzT, val, areasym = dRec
+                    for cokey, vals in dComp.items():
+
+                        # get component level data
+                        mukey, comppct, ratingList, areasym = vals
+                        
+                        ratingIndx = max(ratingList)  # get highest K Factor from all horizons for this component
+                        #PrintMsg("\t" + mukey + ", " + cokey + ", " + str(round(rating, 1)), 1)
 
-                        # get sum of component percent for the mapunit  CHK
                         try:
-                            sumCompPct = float(dPct[mukey])
+                            # append component weighted average rating to the mapunit dictionary
+                            dMu[mukey].append([comppct, ratingIndx, areasym])
 
                         except:
-                            # set the component percent to zero if it is not found in the
-                            # dictionary. This is probably a 'Miscellaneous area' not included in the  CHK
-                            # data or it has no horizon information.
-                            sumCompPct = 0
-
-                        #PrintMsg(areasym + ", " + mukey + ", " + cokey + ", " + str(comppct) + ", " + str(sumCompPct) + ", " + str(hzT) + ", " + str(val), 1)  # These look good
-
-
-                        # calculate component percentage adjustment
-
-                        if sumCompPct > 0:
-                            # If there is no data for any of the component horizons, could end up with 0 for
-                            # sum of comppct_r
-                            adjCompPct = float(comppct) / sumCompPct   # WSS method
-
-                            # adjust the rating value down by the component percentage and by the sum of the
-                            # usable horizon thickness for this component
-                            aws = adjCompPct * val
-                            hzT = hzT * adjCompPct    # Adjust component share of horizon thickness by comppct
-
-                            # Update component values in component dictionary
-                            dComp[cokey] = mukey, comppct, hzT, aws, areasym
-
-                            # Populate dMu dictionary
-                            if mukey in dMu:
-                                val1, val3, areasym = dMu[mukey]
-                                comppct = comppct + val1
-                                aws = aws + val3
-
-                            dMu[mukey] = [comppct, aws, areasym]
+                            # create a new mapunit record in the dictionary
+                            dMu[mukey] = [[comppct, ratingIndx, areasym]]
 
-                # Write out map unit aggregated AWS
+                # Write out map unit aggregated rating
                 #
-                murec = list()
-                outputValues= [999999999, -999999999]
-
-                for mukey, val in dMu.items():
-                    compPct, aws, areasym = val
-                    aws = round(aws, fldPrecision) # Test temporary removal of rounding
-                    #aws = decimal.Decimal(str(aws)).quantize(decimal.Decimal("0.01"), decimal.ROUND_HALF_UP)
-                    murec = [mukey, comppct, aws, areasym]
-                    ocur.insertRow(murec)
+                outputValues = [domainValues[0], domainValues[-1]]
 
-                    # save max-min values
-                    if not aws is None:
-                        outputValues[0] = min(aws, outputValues[0])
-                        outputValues[1] = max(aws, outputValues[1])
+                #if tieBreaker == dSDV["tiebreakhighlabel"]:
+                oid = 0
+                
+                for mukey, muVals in dMu.items():
+                    oid += 1
+                    #muVal = SortData(muVals, 1, 0, True, True)
+                    muVal = SortData(muVals, 0, 0, True, True)
+                    pct, ratingIndx, areasym = muVal
+                    rating = domainValues[ratingIndx]
+                    murec = [mukey, pct, rating, areasym]
 
-        outputValues.sort()
+                    
+                    #if mukey == "1427104":
+                    #if mukey == "1380525":
+                    #    PrintMsg(" \nOutput Table: " + outputTbl, 1)
+                    #    PrintMsg("\t" + str(muVals), 1)
+                    #    PrintMsg("\t" + str(muVal), 1)
+                    #    PrintMsg("\t" + rating, 1)
+                    #    PrintMsg("\t" + str(oid) + ", " + str(murec), 1)
+                        
+                    
+                    ocur.insertRow(murec)
 
-        #if (bZero and outputValues ==  [0.0, 0.0]):
-            #PrintMsg(" \n2. No data for " + sdvAtt, 1)
+                    if not rating is None:
+                    #    # save overall max-min values
+                        outputValues[0] = min(rating, outputValues[0])
+                        outputValues[1] = max(rating, outputValues[1])
 
         return outputTbl, outputValues
 
@@ -8879,22 +8318,22 @@ def AggregateHz_WTA_SUM(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBrea
         errorMsg()
         return outputTbl, []
 
+
 ## ===================================================================================
-def AggregateHz_WTA_WTA(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker, top, bot, bZero):
-    # Aggregate mapunit-component-horizon data to the map unit level using a weighted average
-    #
-    # This version uses weighted average for horizon data as in AWC and most others
-    # Added areasymbol to output
+def AggregateHz_MaxMin_DCP(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker, top, bot, bZero):
+    # Aggregate mapunit-component-horizon data to the map unit level using the highest rating
+    # from all horizons. Currently this would only apply to K Factor and dominant component
+    
     try:
         arcpy.SetProgressorLabel("Aggregating rating information to the map unit level")
-
         #
         if bVerbose:
             PrintMsg(" \nCurrent function : " + sys._getframe().f_code.co_name, 1)
 
         # Create final output table with MUKEY, COMPPCT_R and sdvFld
-        outputTbl = os.path.join(gdb, tblName)
+        outputTbl = os.path.join(sdvGDB, tblName)
         fldPrecision = max(0, dSDV["attributeprecision"])
+
         inFlds = ["MUKEY", "COKEY", "COMPPCT_R", "HZDEPT_R", "HZDEPB_R", dSDV["attributecolumnname"].upper(), "AREASYMBOL"]
         outFlds = ["MUKEY", "COMPPCT_R", dSDV["resultcolumnname"].upper(), "AREASYMBOL"]
 
@@ -8925,9 +8364,8 @@ def AggregateHz_WTA_WTA(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBrea
         sumProd = 0
         meanVal = 0
 
-        with arcpy.da.SearchCursor(initialTbl, inFlds, where_clause=whereClause, sql_clause=sqlClause) as cur:
+        with InitialTableCursor(initialTbl, inFlds, where_clause=whereClause, sql_clause=sqlClause) as cur:
             with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
-                #arcpy.SetProgressor("step", "Reading initial query table ...",  0, iCnt, 1)
 
                 for rec in cur:
                     mukey, cokey, comppct, hzdept, hzdepb, val, areasym = rec
@@ -8935,8 +8373,6 @@ def AggregateHz_WTA_WTA(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBrea
                     # bot = hzdepb
                     # td = top of range
                     # bd = bottom of range
-                    if val is None and bZero:
-                        val = 0
 
                     if val is not None and hzdept is not None and hzdepb is not None:
 
@@ -8948,29 +8384,25 @@ def AggregateHz_WTA_WTA(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBrea
                             hzT = 0
 
                         if hzT > 0:
-                            aws = float(hzT) * val * comppct
+                            ratingIndx = domainValues.index(val)   # Change KFactor to an index based upon domain order
+
+                            #PrintMsg("\t" + str(aws), 1)
 
                             if not cokey in dComp:
-                                # Create initial entry for this component using the first horiozon CHK
-                                dComp[cokey] = [mukey, comppct, hzT, aws, areasym]
-                                try:
-                                    dPct[mukey] = dPct[mukey] + comppct
+                                if not mukey in dMu:
+                                    dMu[mukey] = cokey
 
-                                except:
-                                    dPct[mukey] = comppct
+                                    # Create initial entry for this component using the first horiozon CHK
+                                    ratingList = [ratingIndx]
+                                    dComp[cokey] = [mukey, comppct, ratingList, areasym]
 
-                            else:
+                            elif cokey == dMu[mukey]:
                                 # accumulate total thickness and total rating value by adding to existing component values  CHK
-                                mukey, comppct, dHzT, dAWS, areasym = dComp[cokey]
-                                dAWS = dAWS + aws
-                                dHzT = dHzT + hzT
-                                dComp[cokey] = [mukey, comppct, dHzT, dAWS, areasym]
-
-                        #else:
-                        #    PrintMsg("\tFound horizon for mapunit (" + mukey + ":" + cokey + " with hzthickness of " + str(hzT), 1)
-
-                    #else:
-                    #    PrintMsg("\tFound horizon with no data for mapunit (" + mukey + ":" + cokey + " with hzthickness of " + str(hzT), 1)
+                                mukey, comppct, ratingList, areasym = dComp[cokey]
+                                
+                                if not ratingIndx in ratingList:
+                                    ratingList.append(ratingIndx)
+                                    dComp[cokey] = [mukey, comppct, ratingList, areasym]
 
                 # get the total number of major components from the dictionary count
                 iComp = len(dComp)
@@ -8979,52 +8411,48 @@ def AggregateHz_WTA_WTA(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBrea
 
                 if iComp > 0:
                     #PrintMsg("\t" + str(top) + " - " + str(bot) + "cm (" + Number_Format(iComp, 0, True) + " components)"  , 0)
-                    #arcpy.SetProgressor("step", "Saving map unit and component AWS data...",  0, iComp, 1)
 
                     for cokey, vals in dComp.items():
 
                         # get component level data
-                        mukey, comppct, hzT, cval, areasym = vals
-
-                        # get sum of comppct for mapunit
-                        sumPct = dPct[mukey]
-
-                        # calculate component weighted values
-                        # get weighted layer thickness
-                        divisor = sumPct * hzT
-
-                        if divisor > 0:
-                            newval = float(cval) / divisor
-
-                        else:
-                            newval = 0.0
+                        mukey, comppct, ratingList, areasym = vals
+                        
+                        ratingIndx = max(ratingList)  # get highest K Factor from all horizons for this component
+                        #PrintMsg("\t" + mukey + ", " + cokey + ", " + str(round(rating, 1)), 1)
 
-                        if mukey in dMu:
-                            pct, mval, areasym = dMu[mukey]
-                            newval = newval + mval
+                        try:
+                            # append component weighted average rating to the mapunit dictionary
+                            dMu[mukey].append([comppct, ratingIndx, areasym])
 
-                        dMu[mukey] = [sumPct, newval, areasym]
+                        except:
+                            # create a new mapunit record in the dictionary
+                            dMu[mukey] = [[comppct, ratingIndx, areasym]]
 
-                # Write out map unit aggregated AWS
+                # Write out map unit aggregated rating
                 #
-                murec = list()
-                outputValues= [999999999, -999999999]
+                outputValues = [domainValues[0], domainValues[-1]]
 
-                for mukey, vals in dMu.items():
-                    sumPct, val, areasym = vals
-                    aws = round(val, fldPrecision)
-                    murec = [mukey, sumPct, aws, areasym]
+                #if tieBreaker == dSDV["tiebreakhighlabel"]:
+                oid = 0
+                
+                for mukey, muVals in dMu.items():
+                    oid += 1
+                    muVal = SortData(muVals, 1, 0, True, True)              
+                    pct, ratingIndx, areasym = muVal
+                    rating = domainValues[ratingIndx]
+                    murec = [mukey, pct, rating, areasym]
+                    #if mukey == "1427104":
+                    #    PrintMsg(" \nOutput Table: " + outputTbl, 1)
+                    #    PrintMsg("\t" + str(muVals), 1)
+                    #    PrintMsg("\t" + str(muVal), 1)
+                    #    PrintMsg("\t" + rating, 1)
+                    #    PrintMsg("\t" + str(oid) + ", " + str(murec), 1)
                     ocur.insertRow(murec)
-                    # save max-min values
-                    if not aws is None:
-                        outputValues[0] = min(aws, outputValues[0])
-                        outputValues[1] = max(aws, outputValues[1])
-
-        outputValues.sort()
-
-        #if (bZero and outputValues ==  [0.0, 0.0]):
-        #    PrintMsg(" \nNo data for " + sdvAtt, 1)
 
+                    if not rating is None:
+                    #    # save overall max-min values
+                        outputValues[0] = min(rating, outputValues[0])
+                        outputValues[1] = max(rating, outputValues[1])
 
         return outputTbl, outputValues
 
@@ -9036,364 +8464,373 @@ def AggregateHz_WTA_WTA(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBrea
         errorMsg()
         return outputTbl, []
 
-## ===================================================================================
-def AggregateHz_DCP_WTA_Old(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker, top, bot, bZero):
-    #
-    # Dominant component for mapunit-component-horizon data to the map unit level
-    #
-    # This version uses weighted average for horizon data
-    # Added areasymbol to output
-    #
-    # Possible problem: what happened to my tiebreak handler for multiple dominant components?
 
-    try:
-        arcpy.SetProgressorLabel("Aggregating rating information to the map unit level")
 
-        # Create final output table with MUKEY, COMPPCT_R and sdvFld
-        bVerbose = True
+## ===================================================================================
+def DepthRangeMethod(sdvAtt, aggMethod):
+    # True if the attribute and aggregation method are rated by one of the array based
+    # AggregateHz functions, which can rate a list of depth ranges in one pass.
+    # Follows the horizon level property logic in CreateSDVTable.
+    try:
+        if dSDV["attributetype"] != "Property" or dSDV["mapunitlevelattribflag"] == 1:
+            return False
 
-        if bVerbose:
-            PrintMsg(" \nCurrent function : " + sys._getframe().f_code.co_name, 1)
+        if dSDV["complevelattribflag"] != 1 or dSDV["horzlevelattribflag"] != 1:
+            return False
 
-        outputTbl = os.path.join(gdb, tblName)
-        fldPrecision = max(0, dSDV["attributeprecision"])
-        inFlds = ["MUKEY", "COKEY", "COMPPCT_R", "HZDEPT_R", "HZDEPB_R", dSDV["attributecolumnname"].upper(), "AREASYMBOL"]
-        outFlds = ["MUKEY", "COMPPCT_R", dSDV["resultcolumnname"].upper(), "AREASYMBOL"]
+        if sdvAtt.startswith("K Factor") or sdvAtt.startswith("Surface") or sdvAtt.endswith("(Surface)"):
+            return False
 
-        sqlClause =  (None, "ORDER BY MUKEY ASC, COMPPCT_R DESC, HZDEPT_R ASC")
-        whereClause = "COMPPCT_R >=  " + str(cutOff)
-        # whereClause = "COMPPCT_R >=  " + str(cutOff) + " AND " + dSDV["attributecolumnname"].upper() + " IS NOT NULL"
+        if aggMethod == "Weighted Average":
+            return dSDV["attributelogicaldatatype"].lower() in ["integer", "float"] and dSDV["horzaggmeth"] in ["Weighted Average", "Weighted Sum"]
 
+        if aggMethod == "Dominant Component":
+            return dSDV["effectivelogicaldatatype"].lower() != "choice" and dSDV["horzaggmeth"] == "Weighted Average"
 
-        if arcpy.Exists(outputTbl):
-            arcpy.Delete_management(outputTbl)
+        if aggMethod == "Minimum or Maximum":
+            return dSDV["effectivelogicaldatatype"].lower() != "choice"
 
-        outputTbl = CreateOutputTable(initialTbl, outputTbl, dFieldInfo)
-        outputValues= [999999999, -999999999]
+        return False
 
-        if outputTbl == "":
-            raise MyError,""
+    except:
+        errorMsg()
+        return False
 
-        dPct = dict()  # sum of comppct_r for each map unit
-        dComp = dict() # component level information
-        dMu = dict()
+## ===================================================================================
+def DepthRangeFields(top, bot):
+    # Comppct and rating field names for one depth range in a depth range table
+    suffix = "_" + str(top) + "to" + str(bot)
+    return "COMPPCT" + suffix, dSDV["resultcolumnname"].upper() + suffix
 
-        # reset variables for cursor
-        sumPct = 0
-        sumProd = 0
-        meanVal = 0
+## ===================================================================================
+def AggregateHz_DepthRanges(initialTbl, inFlds, whereClause, outputTbl, rangeKernel, kernelArgs, bRounded):
+    # Rate every depth range in depthRanges with one pass over the horizon data.
+    #
+    # Called by the AggregateHz functions in place of their single range kernel. The output table
+    # has MUKEY and AREASYMBOL plus a comppct and a rating column for each depth range, in order:
+    #   COMPPCT_0to5, AWS_0to5, COMPPCT_5to15, AWS_5to15, ...
+    #
+    # A null comppct means the map unit is not rated for that range. The min-max values for each
+    # range are saved in dBatchResult["ranges"], from the rounded ratings if bRounded is set.
+    #
+    try:
+        arcpy.SetProgressorLabel("Aggregating rating information for " + str(len(depthRanges)) + " depth ranges")
 
-        with arcpy.da.SearchCursor(initialTbl, inFlds, where_clause=whereClause, sql_clause=sqlClause) as cur:
-            with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
-                #arcpy.SetProgressor("step", "Reading initial query table ...",  0, iCnt, 1)
+        if bVerbose:
+            PrintMsg(" \nCurrent function : " + sys._getframe().f_code.co_name, 1)
 
-                for rec in cur:
-                    mukey, cokey, comppct, hzdept, hzdepb, val, areasym = rec
-                    # top = hzdept
-                    # bot = hzdepb
-                    # td = top of range
-                    # bd = bottom of range
+        fldPrecision = max(0, dSDV["attributeprecision"])
+        resultFld = dSDV["resultcolumnname"].upper()
 
-                    if not cokey in dComp and not mukey in dPct:
-                        # Problem:
-                        # This if statement above is only gettting the first component and ignoring any ties based upon component percent
-                        #
+        outputTbl = CreateOutputTable(initialTbl, outputTbl, dFieldInfo)
 
-                        dPct[mukey] = comppct
+        if outputTbl == "":
+            return outputTbl, []
 
-                        if val is not None and hzdept is not None and hzdepb is not None:
-                            # Normal component with horizon data
-                            hzT = min(hzdepb, bot) - max(hzdept, top)
-                            aws = float(hzT) * val
-                            dComp[cokey] = [mukey, comppct, hzT, aws, areasym]
+        # Replace COMPPCT_R and the rating field with a pair of fields for each depth range
+        outFlds = AddRangeFields(outputTbl, [DepthRangeFields(top, bot) for top, bot in depthRanges])
 
-                        else:
-                            # Component with no horizon data
-                            dComp[cokey] = [mukey, comppct, None, None, areasym]
+        dArrays = gSSURGO_AggregateArrays.ReadHorizonArrays(initialTbl, inFlds, whereClause)
 
+        if len(dArrays) == 0:
+            raise MyError, "Failed to read " + initialTbl + " into arrays"
 
-                    elif cokey in dComp :
-                        try:
-                            # For dominant component:
-                            # accumulate total thickness and total rating value by adding to existing component values  CHK
+        muKeys, muPct, muVals, muAreasyms = rangeKernel(dArrays, depthRanges, *kernelArgs)
+        del dArrays
 
-                                mukey, comppct, dHzT, dAWS, areasym = dComp[cokey]
+        rangeValues = [[999999999, -999999999] for rng in depthRanges]
+        rangeCnt = len(depthRanges)
 
-                                if val is not None and hzdept is not None and hzdepb is not None:
-                                    hzT = min(hzdepb, bot) - max(hzdept, top)
-                                    aws = float(hzT) * val
-                                    dAWS = max(0, dAWS) + aws
-                                    dHzT = max(0, dHzT) + hzT
-                                    dComp[cokey] = [mukey, comppct, dHzT, dAWS, areasym]
+        with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
+            for mukey, pctList, valList, areasym in zip(muKeys.tolist(), muPct.tolist(), muVals.tolist(), muAreasyms.tolist()):
+                murec = [mukey, areasym]
 
-                            #if bVerbose and mukey == '296159':
-                            #    PrintMsg("\t" + mukey + "; " + cokey + ";  " + str(comppct) + "%;  " + str(max(hzdept, top)) + "-->" + str(min(hzdepb, bot)) + "cm; " + str(hzT) + "; " + str(round(dAWS, 2)), 1)
+                for j in range(rangeCnt):
+                    pct = pctList[j]
+                    val = valList[j]
 
-                        except KeyError:
-                            # Hopefully this is a component other than dominant
-                            pass
+                    if math.isnan(pct):
+                        # Not rated for this range
+                        murec.extend([None, None])
+                        continue
 
-                        except:
-                            errorMsg()
+                    if math.isnan(val):
+                        rating = None
 
+                    else:
+                        rating = round(val, fldPrecision)
 
+                        if bRounded:
+                            val = rating
 
+                        rangeValues[j][0] = min(val, rangeValues[j][0])
+                        rangeValues[j][1] = max(val, rangeValues[j][1])
 
-                # get the total number of major components from the dictionary count
-                iComp = len(dComp)
+                    murec.extend([int(pct), rating])
 
-                # Read through the component-level data and summarize to the mapunit level
+                ocur.insertRow(murec)
 
-                if iComp > 0:
-                    #PrintMsg("\t" + str(top) + " - " + str(bot) + "cm (" + Number_Format(iComp, 0, True) + " components)"  , 0)
+        dRangeValues = dict()
+        outputValues = list()
 
-                    #arcpy.SetProgressor("step", "Saving map unit and component AWS data...",  0, iComp, 1)
+        for j in range(rangeCnt):
+            minVal, maxVal = rangeValues[j]
 
-                    for cokey, vals in dComp.items():
+            if minVal <= maxVal:
+                # Overall min-max for the ranges that have data
+                if len(outputValues) == 0:
+                    outputValues = [minVal, maxVal]
 
-                        # get component level data
-                        mukey, comppct, hzT, cval, areasym = vals
+                else:
+                    outputValues = [min(minVal, outputValues[0]), max(maxVal, outputValues[1])]
 
-                        if mukey == '1380438':
-                            # This mapunit has 2 components at 50%. Using this as a tiebreaker test
-                            PrintMsg("\tCHorizon data: " + mukey + "; " + cokey + "; " + str(comppct) + "%; " + str(cval), 1)
+            rangeValues[j].sort()
+            dRangeValues[tuple(depthRanges[j])] = rangeValues[j]
 
+        dBatchResult["ranges"] = dRangeValues
 
-                        # get sum of comppct for mapunit
-                        sumPct = dPct[mukey]
+        return outputTbl, outputValues
 
-                        # calculate mean value for entire depth range
-                        if not cval is None and hzT > 0:
-                            newval = float(cval) / hzT
+    except MyError, e:
+        PrintMsg(str(e), 2)
+        return outputTbl, []
 
-                        else:
-                            newval = None
+    except:
+        errorMsg()
+        return outputTbl, []
 
-                        if mukey in dMu:
-                            pct, mval = dMu[mukey]
-                            newval = newval + mval
+## ===================================================================================
+def AddRangeFields(outputTbl, rangeFields):
+    # Replace COMPPCT_R and the rating field of a new output table with a comppct and a rating
+    # field for each depth range or month window. Returns the fields for the insert cursor.
+    resultFld = dSDV["resultcolumnname"].upper()
+    theType, dataLen = dFieldInfo[resultFld][0:2]
+    arcpy.DeleteField_management(outputTbl, "COMPPCT_R")
+    arcpy.DeleteField_management(outputTbl, resultFld)
+    outFlds = ["MUKEY", "AREASYMBOL"]
+
+    for pctFld, ratingFld in rangeFields:
+        arcpy.AddField_management(outputTbl, pctFld, "SHORT")
+        arcpy.AddField_management(outputTbl, ratingFld, theType, "", "", dataLen)
+        outFlds.extend([pctFld, ratingFld])
+
+    return outFlds
 
-                        dMu[mukey] = [sumPct, newval, areasym]
+## ===================================================================================
+def SplitRangeTable(rangeTbl, rangeFields, outputTbl):
+    # Copy one depth range or month window from a range table (AggregateHz_DepthRanges,
+    # WriteMonthTable) into a regular rating table with MUKEY, AREASYMBOL, COMPPCT_R and the
+    # rating field. rangeFields are the comppct and rating fields of the range.
+    #
+    try:
+        resultFld = dSDV["resultcolumnname"].upper()
+        pctFld, ratingFld = rangeFields
+        fldNames = [fld.name.upper() for fld in arcpy.ListFields(rangeTbl)]
 
-                # Write out map unit aggregated AWS
-                #
-                murec = list()
-                for mukey, vals in dMu.items():
-                    sumPct, val, areasym = vals
+        if not ratingFld in fldNames:
+            raise MyError, ratingFld + " is not in " + rangeTbl
 
-                    if not val is None:
-                        val = round(val, fldPrecision)
+        if arcpy.Exists(outputTbl):
+            arcpy.Delete_management(outputTbl)
 
-                    murec = [mukey, sumPct, val, areasym]
-                    ocur.insertRow(murec)
-                    #PrintMsg("\tMapunit: " + mukey + "; " + str(sumPct) + "%; " + str(val), 1)
+        # Use the range table as the template and keep this range
+        arcpy.CreateTable_management(os.path.dirname(outputTbl), os.path.basename(outputTbl), rangeTbl)
+        dropFlds = [fld.name for fld in arcpy.ListFields(outputTbl) if fld.name.upper().startswith("COMPPCT_") or fld.name.upper().startswith(resultFld + "_")]
 
-                    # save max-min values
-                    if not val is None:
-                        outputValues[0] = min(val, outputValues[0])
-                        outputValues[1] = max(val, outputValues[1])
+        for fldName in dropFlds:
+            if not fldName.upper() in [pctFld, ratingFld]:
+                arcpy.DeleteField_management(outputTbl, fldName)
 
-        outputValues.sort()
+        arcpy.AlterField_management(outputTbl, pctFld, "COMPPCT_R", "COMPPCT_R")
+        arcpy.AlterField_management(outputTbl, ratingFld, resultFld, resultFld)
+        arcpy.AddIndex_management(outputTbl, "MUKEY", "Indx" + os.path.basename(outputTbl))
 
-        #if (bZero and outputValues ==  [0.0, 0.0]):
-        #    PrintMsg(" \nNo data for " + sdvAtt, 1)
-            
+        with arcpy.da.SearchCursor(rangeTbl, ["MUKEY", "AREASYMBOL", pctFld, ratingFld], where_clause=pctFld + " IS NOT NULL") as cur:
+            with arcpy.da.InsertCursor(outputTbl, ["MUKEY", "AREASYMBOL", "COMPPCT_R", resultFld]) as ocur:
+                for rec in cur:
+                    ocur.insertRow(rec)
 
-        return outputTbl, outputValues
+        return outputTbl
 
     except MyError, e:
         PrintMsg(str(e), 2)
-        return outputTbl, outputValues
+        return ""
 
     except:
         errorMsg()
-        return outputTbl, outputValues
+        return ""
 
 ## ===================================================================================
-def AggregateHz_DCP_WTA(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker, top, bot, bZero):
-    #
-    # Dominant component for mapunit-component-horizon data to the map unit level
-    #
-    # This version uses weighted average for horizon data
-    # Added areasymbol to output
-    #
-    # Problem: Need to fix tiebreaker logic
-
+def MonthWindowMethod(sdvAtt, aggMethod):
+    # True if the attribute and aggregation method are rated by one of the AggregateCo_Mo
+    # functions, which can rate a list of month windows in one pass (gSSURGO_MonthArrays).
+    # Follows the component-month property logic in CreateSDVTable.
     try:
-        arcpy.SetProgressorLabel("Aggregating rating information to the map unit level")
+        if dSDV["attributetype"] != "Property" or dSDV["mapunitlevelattribflag"] == 1:
+            return False
 
-        # Create final output table with MUKEY, COMPPCT_R and sdvFld
-        #bVerbose = True
+        if dSDV["complevelattribflag"] != 1 or dSDV["horzlevelattribflag"] != 0 or dSDV["cmonthlevelattribflag"] != 1:
+            return False
 
-        if bVerbose:
-            PrintMsg(" \nCurrent function : " + sys._getframe().f_code.co_name, 1)
+        if dSDV["resultcolumnname"].startswith("Dep2WatTbl"):
+            # Dominant component and weighted average use AggregateCo_DCP_DTWT and AggregateCo_WTA_DTWT
+            return not aggMethod in ["Dominant Component", "Weighted Average"]
 
-        outputTbl = os.path.join(gdb, tblName)
-        fldPrecision = max(0, dSDV["attributeprecision"])
-        inFlds = ["MUKEY", "COKEY", "COMPPCT_R", "HZDEPT_R", "HZDEPB_R", dSDV["attributecolumnname"].upper(), "AREASYMBOL"]
-        outFlds = ["MUKEY", "COMPPCT_R", dSDV["resultcolumnname"].upper(), "AREASYMBOL"]
+        return aggMethod in ["Dominant Component", "Dominant Condition", "Minimum or Maximum", "Weighted Average"]
 
-        sqlClause =  (None, "ORDER BY MUKEY ASC, COMPPCT_R DESC, HZDEPT_R ASC")
-        whereClause = "COMPPCT_R >=  " + str(cutOff)
-        # whereClause = "COMPPCT_R >=  " + str(cutOff) + " AND " + dSDV["attributecolumnname"].upper() + " IS NOT NULL"
+    except:
+        errorMsg()
+        return False
 
+## ===================================================================================
+def MonthWindowFields(begMo, endMo):
+    # Comppct and rating field names for one month window in a month window table
+    suffix = "_" + begMo[0:3] + "to" + endMo[0:3]
+    return "COMPPCT" + suffix, dSDV["resultcolumnname"].upper() + suffix
 
-        if arcpy.Exists(outputTbl):
-            arcpy.Delete_management(outputTbl)
+## ===================================================================================
+def MonthQuery(begMo, endMo):
+    # MONTHSEQ query for the COMONTH table. With month windows (CreateMonthWindowTable) the
+    # query covers the months of every window. A window can run past December (November - February).
+    moList = ListMonths()
 
-        outputTbl = CreateOutputTable(initialTbl, outputTbl, dFieldInfo)
-        outputValues= [999999999, -999999999]
+    if len(monthWindows) > 0:
+        windowList = monthWindows
 
-        if outputTbl == "":
-            raise MyError,""
+    else:
+        windowList = [(begMo, endMo)]
 
-        dPct = dict()  # sum of comppct_r for each map unit
-        dHorizon = dict()
-        dComp = dict() # component level information
-        dMu = dict()
-        dCompList = dict()
+    months = set()
 
-        # reset variables for cursor
-        sumPct = 0
-        sumProd = 0
-        meanVal = 0
+    for winBeg, winEnd in windowList:
+        months.update([col + 1 for col in gSSURGO_MonthArrays.WindowColumns(moList.index(winBeg), moList.index(winEnd))])
 
-        with arcpy.da.SearchCursor(initialTbl, inFlds, where_clause=whereClause, sql_clause=sqlClause) as cur:
-            with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
-                #arcpy.SetProgressor("step", "Reading initial query table ...",  0, iCnt, 1)
+    months = sorted(months)
 
-                for rec in cur:
-                    mukey, cokey, comppct, hzdept, hzdepb, val, areasym = rec
-                    # top = hzdept
-                    # bot = hzdepb
-                    # td = top of range
-                    # bd = bottom of range
+    if len(months) == 1:
+        # query for single month
+        return "(MONTHSEQ = " + str(months[0]) + ")"
 
-                    if not cokey in dHorizon:
-                        if not mukey in dPct:
-                            # Problem:
-                            # This if statement above is only getting the first component and ignoring any ties based upon component percent
-                            #
-                            dCompList[mukey] = [cokey]  # initialize list of components for this mapunit
+    return "(MONTHSEQ IN " + str(tuple(months)) + ")"
 
-                            dPct[mukey] = comppct  # cursor is sorted on comppct_r descending, so this should be dominant component percent.
+## ===================================================================================
+def MonthWindowColumns():
+    # Month array columns (gSSURGO_MonthArrays) for each window in monthWindows. Without month
+    # windows the initial table only has the months of the one window, so all 12 columns are used.
+    if len(monthWindows) == 0:
+        return [range(12)]
 
-                            if val is not None and hzdept is not None and hzdepb is not None:
-                                # Normal component with horizon data
-                                hzT = min(hzdepb, bot) - max(hzdept, top)
-                                aws = float(hzT) * val
-                                dHorizon[cokey] = [mukey, comppct, hzT, aws, areasym]
+    moList = ListMonths()
+    return [gSSURGO_MonthArrays.WindowColumns(moList.index(begMo), moList.index(endMo)) for begMo, endMo in monthWindows]
 
-                        elif comppct >= dPct[mukey]:
-                            # This should be a mapunit that has more than one dominant component
-                            dCompList[mukey].append(cokey)
+## ===================================================================================
+def ReadMonthData(initialTbl, whereClause, dCodes=None):
+    # Read the initial table into component x month arrays (gSSURGO_MonthArrays).
+    # dCodes (uppercase value:domain index) codes the ratings with the domain.
+    inFlds = ["MUKEY", "COKEY", "COMPPCT_R", "MONTHSEQ", dSDV["attributecolumnname"].upper(), "AREASYMBOL"]
 
-                            if val is not None and hzdept is not None and hzdepb is not None:
-                                # Normal component with horizon data
-                                hzT = min(hzdepb, bot) - max(hzdept, top)
-                                aws = float(hzT) * val
-                                dHorizon[cokey] = [mukey, comppct, hzT, aws, areasym]
+    with ComponentOrderCursor(initialTbl, inFlds, whereClause) as cur:
+        return gSSURGO_MonthArrays.ReadMonthArrays(cur, dCodes)
 
-                            else:
-                                # Component with no data for this horizon
-                                dHorizon[cokey] = [mukey, comppct, None, None, areasym]
+## ===================================================================================
+def ReadMonthRows(initialTbl, whereClause):
+    # Read the initial table rows for the original month loops (gSSURGO_MonthArrays.RefMo_*).
+    # Without month windows there is only one window, and the loop is faster than building the
+    # component x month arrays.
+    inFlds = ["MUKEY", "COKEY", "COMPPCT_R", "MONTHSEQ", dSDV["attributecolumnname"].upper(), "AREASYMBOL"]
 
+    with ComponentOrderCursor(initialTbl, inFlds, whereClause) as cur:
+        return [row for row in cur]
 
-                    else:
-                        try:
-                            # For dominant component:
-                            # accumulate total thickness and total rating value by adding to existing component values  CHK
+## ===================================================================================
+def LoopMonthRecords(rows, dFinal, values=None):
+    # Map unit records for WriteMonthTable from a month loop result {mukey:[comppct, rating]}.
+    # values converts a domain index rating to the domain value.
+    dAreasym = dict()
+    monthRecs = list()
 
-                            mukey, comppct, dHzT, dAWS, areasym = dHorizon[cokey]
+    for row in rows:
+        dAreasym[row[0]] = row[5]
 
-                            if val is not None and hzdept is not None and hzdepb is not None:
-                                hzT = min(hzdepb, bot) - max(hzdept, top)
-                                aws = float(hzT) * val
-                                dAWS = max(0, dAWS) + aws
-                                dHzT = max(0, dHzT) + hzT
-                                dHorizon[cokey] = [mukey, comppct, dHzT, dAWS, areasym]
+    for mukey, muVals in sorted(dFinal.items()):
+        if not values is None:
+            muVals = [muVals[0], values[muVals[1]]]
 
-                        except KeyError:
-                            # Hopefully this is a component other than dominant
-                            pass
+        monthRecs.append([mukey, dAreasym[mukey], [muVals]])
 
-                        except:
-                            errorMsg()
+    return monthRecs
 
+## ===================================================================================
+def WriteMonthTable(initialTbl, monthRecs):
+    # Write the output table for the AggregateCo_Mo functions.
+    #
+    # monthRecs is a list of [mukey, areasymbol, ratings], where ratings has a [comppct, rating]
+    # (or None if the map unit is not written) for each month window.
+    #
+    # Without month windows this is the usual MUKEY, COMPPCT_R, rating, AREASYMBOL table. With
+    # month windows (CreateMonthWindowTable) the table has a comppct and a rating field for each
+    # window and the values for each window are saved in dBatchResult["ranges"].
+    #
+    outputTbl = os.path.join(sdvGDB, tblName)
+    outputValues = list()
 
-                # get the total number of major components from the dictionary count
-                iComp = len(dHorizon)
+    try:
+        resultFld = dSDV["resultcolumnname"].upper()
 
-                # Read through the component-level data and summarize to the mapunit level
+        if arcpy.Exists(outputTbl):
+            arcpy.Delete_management(outputTbl)
 
-                if iComp > 0:
+        outputTbl = CreateOutputTable(initialTbl, outputTbl, dFieldInfo)
 
-                    for cokey, vals in dHorizon.items():
+        if outputTbl == "":
+            return outputTbl, outputValues
 
-                        # get component level data
-                        mukey, pct, hzT, cval, areasym = vals
+        if len(monthWindows) == 0:
+            with arcpy.da.InsertCursor(outputTbl, ["MUKEY", "COMPPCT_R", resultFld, "AREASYMBOL"]) as ocur:
+                for mukey, areasym, ratings in monthRecs:
+                    if ratings[0] is None:
+                        continue
 
-                        # calculate mean value for entire depth range
-                        if not cval is None and hzT > 0:
-                            newval = float(cval) / hzT
+                    compPct, rating = ratings[0]
+                    ocur.insertRow([mukey, compPct, rating, areasym])
 
-                        else:
-                            newval = None
+                    if not rating is None and not rating in outputValues:
+                        outputValues.append(rating)
 
-                        if cokey in dComp:
-                            pct, mval, areasym = dComp[cokey]
-                            newval = newval + mval
+            outputValues.sort()
+            return outputTbl, outputValues
 
-                        dComp[cokey] = [pct, newval, areasym]
+        outFlds = AddRangeFields(outputTbl, [MonthWindowFields(begMo, endMo) for begMo, endMo in monthWindows])
+        windowValues = [set() for window in monthWindows]
 
-                # Test iteration through dCompList?? and replace dMu
-                if tieBreaker == dSDV["tiebreakhighlabel"]:
-                    bRev = True
+        with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
+            for mukey, areasym, ratings in monthRecs:
+                if ratings.count(None) == len(ratings):
+                    continue
 
-                else:
-                    bRev = False
+                murec = [mukey, areasym]
 
-                for mukey, cokeys in dCompList.items():
-                    if len(cokeys) > 0:
-                        # find component with value according to tiebreaker rule
-                        # assign that set of values to dMu
-                        valList = list()
+                for j in range(len(ratings)):
+                    if ratings[j] is None:
+                        murec.extend([None, None])
 
-                        for cokey in cokeys:
-                            try:
-                                pct, newval, areasym = dComp[cokey]
-
-                                if not newval is None:
-                                    valList.append(newval)
-
-                            except:
-                                #PrintMsg("\tNo data for cokey: " + cokey, 1)
-                                pass
-
-                        if len(valList):
-                            valList.sort(reverse=bRev)
-                            val = valList[0]
-
-                            if not val is None:
-                                val = round(val, fldPrecision)
-
-                            outputValues[0] = min(valList[0], outputValues[0])
-                            outputValues[1] = max(valList[0], outputValues[1])
-
-                        else:
-                            val = None
+                    else:
+                        murec.extend(ratings[j])
 
+                        if not ratings[j][1] is None:
+                            windowValues[j].add(ratings[j][1])
 
-                        murec =  mukey, pct, val, areasym
-                        #dMu[mukey] = newrec
-                        ocur.insertRow(murec)
-                        #PrintMsg("\tMapunit: " + mukey + "; " + str(pct) + "%; " + str(val), 1)
+                ocur.insertRow(murec)
 
+        dRangeValues = dict()
+        allValues = set()
 
-        outputValues.sort()
+        for j in range(len(monthWindows)):
+            dRangeValues[monthWindows[j]] = sorted(windowValues[j])
+            allValues.update(windowValues[j])
 
-        #if (bZero and outputValues ==  [0.0, 0.0]):
-        #    PrintMsg("No data for " + sdvAtt, 1)
+        dBatchResult["ranges"] = dRangeValues
+        outputValues = sorted(allValues)
 
         return outputTbl, outputValues
 
@@ -9406,1913 +8843,1701 @@ def AggregateHz_DCP_WTA(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBrea
         return outputTbl, outputValues
 
 ## ===================================================================================
-def AggregateHz_MaxMin_WTA(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker, top, bot, bZero):
-    # Aggregate mapunit-component-horizon data to the map unit level using weighted average
-    # for horizon data, but the assigns either the minimum or maximum component rating to
-    # the map unit, depending upon the Tiebreaker setting.
-    # Added areasymbol to output
+def UpdateMetadata(outputWS, target, parameterString, creditsString, aggMethod, sdvAtt, toDay):
+    # Update metadata for target object (VALU1 table)
+    #
     try:
-        arcpy.SetProgressorLabel("Aggregating rating information to the map unit level")
-        #
-        if bVerbose:
-            PrintMsg(" \nCurrent function : " + sys._getframe().f_code.co_name, 1)
-
-        # Create final output table with MUKEY, COMPPCT_R and sdvFld
-        outputTbl = os.path.join(gdb, tblName)
-        fldPrecision = max(0, dSDV["attributeprecision"])
 
-        inFlds = ["MUKEY", "COKEY", "COMPPCT_R", "HZDEPT_R", "HZDEPB_R", dSDV["attributecolumnname"].upper(), "AREASYMBOL"]
-        outFlds = ["MUKEY", "COMPPCT_R", dSDV["resultcolumnname"].upper(), "AREASYMBOL"]
-
-        sqlClause =  (None, "ORDER BY MUKEY ASC, COMPPCT_R DESC, HZDEPT_R ASC")
+        # Clear process steps from the VALU1 table. Mostly AddField statements.
+        #
+        # NOTE: The geoprocessing metadata conversion tools to not work in the 64 bit background processing
+        #
+        """
+        Any script or script tools you run while inside Desktop honors the background processing setting.
+        If background processing is turned on, the scripts will execute in the 64-bit space.
 
-        if bZero == False:
-            # ignore any null values
-            whereClause = "COMPPCT_R >=  " + str(cutOff) + " AND " + dSDV["attributecolumnname"].upper() + " IS NOT NULL"
+        When you execute a stand-alone Python script outside the application, you need to ensure
+        you're running against the 64-bit Python installation to make use of 64-bit geoprocessing.
+        Double-clicking a Python file from Windows Explorer will launch the file using whatever
+        association Windows has set for the .py file. Typically, this is the last version of Python installed,
+        which should be 64 bit. If you want to be absolutely sure which version of Python you're
+        running against (32 or 64), it is best to fully qualify the Python executable when running
+        your script at command line. For example, the following command will ensure the script is
+        run as 64 bit:
+                      c:\Python27\ArcGISx6410.2\python.exe c:\gisData\scripts\intersect.py.
 
-        else:
-            # retrieve null values and convert to zeros during the iteration process
-            whereClause = "COMPPCT_R >=  " + str(cutOff)
+        """
+        # Function parameters: bMetadata = UpdateMetadata(gdb, outputTbl, parameterString, creditsString, aggMethod, sdvAtt, toDay)
+        #   outputWS - input gSSURGO database
+        #   target   - SDV rating table that was just created
+        #   parameterString - string containing all user settings from the menu
+        #   creditsString   - user login and name of this script
+        #   aggMethod - method used to summarize the data to the map unit level.
+        #   sdvAtt - short description of this map layer
+        #   toDay - date stamp string
+        #
 
-        if arcpy.Exists(outputTbl):
-            arcpy.Delete_management(outputTbl)
+        # Determine whether this script is running in 32 or 64 bit mode
+        arcpy.SetProgressorLabel("Updating metadata for " + os.path.basename(target))
+        pythonVersion = sys.version
+        fy = "2018"
 
-        outputTbl = CreateOutputTable(initialTbl, outputTbl, dFieldInfo)
+        if pythonVersion.find("32 bit") == -1:
+            # Print a non-fatal warning to the user that the metadata will not be updated in 64 bit mode
+            PrintMsg(" \nWarning! Unable to update metadata when running under 64-bit background-mode", 1)
+            return False
 
-        if outputTbl == "":
-            return outputTbl,[]
+        if not arcpy.Exists(target):
+            target = os.path.join(outputWS, target)
 
-        dPct = dict()  # sum of comppct_r for each map unit
-        dComp = dict() # component level information
-        dMu = dict()
+        # Remove geoprocessing history
+        remove_gp_history_xslt = os.path.join(os.path.dirname(sys.argv[0]), "remove geoprocessing history.xslt")
+        out_xml = os.path.join(env.scratchFolder, "xxClean.xml")
 
-        # reset variables for cursor
-        sumPct = 0
-        sumProd = 0
-        meanVal = 0
+        if not arcpy.Exists(remove_gp_history_xslt):
+            raise MyError, "Missing file: " + remove_gp_history_xslt
 
-        with arcpy.da.SearchCursor(initialTbl, inFlds, where_clause=whereClause, sql_clause=sqlClause) as cur:
-            with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
+        if arcpy.Exists(out_xml):
+            arcpy.Delete_management(out_xml)
 
-                for rec in cur:
-                    mukey, cokey, comppct, hzdept, hzdepb, val, areasym = rec
-                    # top = hzdept
-                    # bot = hzdepb
-                    # td = top of range
-                    # bd = bottom of range
-                    if val is None and bZero:
-                        val = 0
+        # Using the stylesheet, write 'clean' metadata to out_xml file and then import back in
+        # It appears that the metadata tools do not work within 64 bit background processing for 10.4.
+        # The failure does not even generate an error message.
+        try:
+            arcpy.XSLTransform_conversion(target, remove_gp_history_xslt, out_xml, "")
+            arcpy.MetadataImporter_conversion(out_xml, os.path.join(outputWS, target))
 
-                    if val is not None and hzdept is not None and hzdepb is not None:
+        except:
+            PrintMsg(" \nFailed to clean up metadata", 0)
 
-                        # Calculate sum of horizon thickness and sum of component ratings for all horizons above bottom
-                        try:
-                            hzT = min(hzdepb, bot) - max(hzdept, top)   # usable thickness from this horizon
+        # Set metadata translator file
+        dInstall = arcpy.GetInstallInfo()
+        installPath = dInstall["InstallDir"]
+        prod = r"Metadata/Translator/ARCGIS2FGDC.xml"
+        mdTranslator = os.path.join(installPath, prod)
 
-                        except:
-                            hzT = 0
+        if not arcpy.Exists(mdTranslator):
+            raise MyError, "Missing metadata translator: " + mdTranslator
 
-                        if hzT > 0:
-                            rating = float(hzT) * val   # Not working for KFactor WTA
-                            #rating = float(hzT) * float(val)   # Try floating the KFactor to see if that will work. Won't it still have to be rounded to standard KFactor index value?
+        # Define input and output XML files
+        xmlPath = os.path.dirname(sys.argv[0])
 
-                            #PrintMsg("\t" + str(aws), 1)
+        mdExport = os.path.join(xmlPath, "SDV_Metadata2.xml")  # template metadata stored in ArcTool folder
 
-                            if not cokey in dComp:
-                                # Create initial entry for this component using the first horiozon CHK
-                                dComp[cokey] = [mukey, comppct, hzT, rating, areasym]
+        mdImport = os.path.join(env.scratchFolder, "xxImport.xml")  # the metadata xml that will provide the updated info
 
-                            else:
-                                # accumulate total thickness and total rating value by adding to existing component values  CHK
-                                mukey, comppct, dHzT, dRating, areasym = dComp[cokey]
-                                dRating += rating
-                                dHzT += hzT
-                                dComp[cokey] = [mukey, comppct, dHzT, dRating, areasym]
+        # Cleanup XML files from previous runs
+        if os.path.isfile(mdImport):
+            os.remove(mdImport)
 
-                # get the total number of major components from the dictionary count
-                iComp = len(dComp)
+        mdState = ""
+        ratingFld = dSDV["resultcolumnname"]
 
-                # Read through the component-level data and summarize to the mapunit level
+        # Currently in this script, only the metadata title, summary, description, credits and the new rating field description are updated.
+        #
+        dMetadata = dict()  # dictionary key is the search term that exists in the template metadata. Dictionary value is the replacement.
+        dMetadata["SDV_Title"] = dSDV["attributename"] + " - " + aggMethod
+        dMetadata["SDV_Description"] = "Map unit rating table for '" + dSDV["attributename"] +"'" + "\r" + dSDV["attributedescription"] + "\r" + parameterString
+        dMetadata["SDV_Credits"] = "USDA-Natural Resources Conservation Service; " + creditsString
+        dMetadata["SDV_Summary"] = "Map the '" + sdvAtt + "' soil " + dSDV["attributetype"].lower() + " by joining this rating table to the soil layer (polygon or raster) using the mukey field."
 
-                if iComp > 0:
-                    #PrintMsg("\t" + str(top) + " - " + str(bot) + "cm (" + Number_Format(iComp, 0, True) + " components)"  , 0)
+        dFields = dict()
+        dFields["MUKEY"] = "Soil map unit primary key"
+        dFields["AREASYMBOL"] = "Soil Survey ID"
+        dFields["COMPPCT_R"] = "Component percent of the map unit"
+        dFields["OBJECTID"] = "Internal feature number"
+        dFields[ratingFld] = "Map unit rating for " + sdvAtt
 
-                    for cokey, vals in dComp.items():
+        # Convert XML from template metadata to tree format
+        tree = ET.parse(mdExport)
+        root = tree.getroot()
 
-                        # get component level data
-                        mukey, comppct, hzT, cval, areasym = vals
-                        if not cval is None and hzT > 0:
-                            rating = cval / hzT  # final horizon weighted average for this component
+        elemList = tree.getiterator()
 
-                        else:
-                            rating = None
+        for elem in elemList:
+            #print elem.tag
+            for child in elem:
+                if str(child.text) in dMetadata:
+                    child.text = dMetadata[child.text]
 
-                        #PrintMsg("\t" + mukey + ", " + cokey + ", " + str(round(rating, 1)), 1)
+                if child.tag == "attrlabl":
+                    # This is a field name
+                    fldName = child.text
 
-                        try:
-                            # append component weighted average rating to the mapunit dictionary
-                            dMu[mukey].append([comppct, rating, areasym])
+                    if fldName in dFields:
+                        fldDesc = dFields[fldName]
 
-                        except:
-                            # create a new mapunit record in the dictionary
-                            dMu[mukey] = [[comppct, rating, areasym]]
+                    elif fldName == "SDV_RATING":
+                        child.text = ratingFld
+                        fldName = ratingFld
 
-                # Write out map unit aggregated rating
-                #
-                #murec = list()
-                outputValues = [999999999, -999999999]
+                        if fldName in dFields:
+                            fldDesc = dFields[fldName]
 
-                if tieBreaker == dSDV["tiebreakhighlabel"]:
-                    for mukey, muVals in dMu.items():
-                        muVal = SortData(muVals, 1, 0, True, True)
-                        pct, val, areasym = muVal
-                        rating = round(val, fldPrecision)
-                        murec = [mukey, pct, rating, areasym]
-                        ocur.insertRow(murec)
+                elif child.tag == "attrdef":
+                    child.text = fldDesc
 
-                        if not rating is None:
-                            # save overall max-min values
-                            outputValues[0] = min(rating, outputValues[0])
-                            outputValues[1] = max(rating, outputValues[1])
 
-                else:
-                    # Lower
-                    for mukey, muVals in dMu.items():
-                        muVal = SortData(muVals, 1, 0, False, True)
-                        pct, val, areasym = muVal
-                        rating = round(val, fldPrecision)
-                        murec = [mukey, pct, rating, areasym]
-                        ocur.insertRow(murec)
+        #  create new xml file with the updated information
+        tree.write(mdImport, encoding="utf-8", xml_declaration=None, default_namespace=None, method="xml")
 
-                        if not rating is None:
-                            # save overall max-min values
-                            outputValues[0] = min(rating, outputValues[0])
-                            outputValues[1] = max(rating, outputValues[1])
+        # import updated metadata to the geodatabase table
+        arcpy.MetadataImporter_conversion(mdExport, target)
+        arcpy.ImportMetadata_conversion(mdImport, "FROM_FGDC", target, "DISABLED")
 
-        #if (bZero and outputValues ==  [0.0, 0.0]):
-        #    PrintMsg(" \n7. No data for " + sdvAtt, 1)
+        # delete the temporary xml metadata files
+        if os.path.isfile(mdImport):
+            #os.remove(mdImport)
+            pass
 
-        return outputTbl, outputValues
+        #if os.path.isfile(mdExport):
+        #    os.remove(mdExport)
+        arcpy.SetProgressorLabel("Finished updating metadata for " + os.path.basename(target))
+        return True
 
     except MyError, e:
-        PrintMsg(str(e), 2)
-        return outputTbl, []
+        # Example: raise MyError("this is an error message")
+        PrintMsg(str(e) + " \n", 2)
+        return False
 
     except:
         errorMsg()
-        return outputTbl, []
+        return False
 
 ## ===================================================================================
-def AggregateHz_MaxMin_DCD(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker, top, bot, bZero):
-    # Aggregate mapunit-component-horizon data to the map unit level using the highest rating
-    # from all horizons. Currently this would only apply to K Factor and dominant condition.
-
-    try:
-        arcpy.SetProgressorLabel("Aggregating rating information to the map unit level")
-        #
-        if bVerbose:
-            PrintMsg(" \nCurrent function : " + sys._getframe().f_code.co_name, 1)
-
-        # Create final output table with MUKEY, COMPPCT_R and sdvFld
-        outputTbl = os.path.join(gdb, tblName)
-        fldPrecision = max(0, dSDV["attributeprecision"])
+def SDVTableName(tblName):
+    # Valid rating table name for the input database
+    tblName = arcpy.ValidateTableName(tblName, gdb)
 
-        inFlds = ["MUKEY", "COKEY", "COMPPCT_R", "HZDEPT_R", "HZDEPB_R", dSDV["attributecolumnname"].upper(), "AREASYMBOL"]
-        outFlds = ["MUKEY", "COMPPCT_R", dSDV["resultcolumnname"].upper(), "AREASYMBOL"]
-
-        sqlClause =  (None, "ORDER BY MUKEY ASC, COMPPCT_R DESC, HZDEPT_R ASC")
+    # Cleanup any duplicate underscores in the table name
+    newName = ""
+    lastChar = "_"
 
-        if bZero == False:
-            # ignore any null values
-            whereClause = "COMPPCT_R >=  " + str(cutOff) + " AND " + dSDV["attributecolumnname"].upper() + " IS NOT NULL"
+    for c in tblName:
+        if c == lastChar and c == "_":
+            # Don't use this character because it is another underscore
+            lastChar = c
 
         else:
-            # retrieve null values and convert to zeros during the iteration process
-            whereClause = "COMPPCT_R >=  " + str(cutOff)
+            newName += c
+            lastChar = c
 
-        if arcpy.Exists(outputTbl):
-            arcpy.Delete_management(outputTbl)
+    if newName[-1] == "_":
+        newName = newName[:-1]
 
-        outputTbl = CreateOutputTable(initialTbl, outputTbl, dFieldInfo)
+    return newName
 
-        if outputTbl == "":
-            return outputTbl,[]
+## ===================================================================================
+def CreateSDVTable(inputLayer, sdvAtt, aggMethod, primCst, secCst, top, bot, begMo, endMo, tieBreaker, bZero, cutOff, bFuzzy, bNulls, hzQuery, tableViews):
+    # Read the soil data for sdvAtt, aggregate it and write the SDV rating table to sdvGDB.
+    # Returns the output table and the list of output values (outputTbl, outputValues).
+    #
+    # Called by CreateSoilMap after the legend and layer settings are in place. Batch workers
+    # (gSSURGO_SoilMapBatch) only run this part, without ArcMap. tableViews is the list of
+    # ArcMap table views that might conflict with the queries (empty for a batch worker).
+    #
+    try:
+        # 'Big' 3 tables
+        big3Tbls = ["MAPUNIT", "COMPONENT", "CHORIZON"]
 
-        dPct = dict()  # sum of comppct_r for each map unit
-        dComp = dict() # component level information
-        dMu = dict()
+        mdTable = os.path.join(gdb, "mdstatrshipdet")
+        mdFlds = ["LTABPHYNAME", "RTABPHYNAME", "LTABCOLPHYNAME", "RTABCOLPHYNAME"]
+        level = 0  # table depth
+        tblList = list()
+        moList = ListMonths()
 
-        # reset variables for cursor
-        sumPct = 0
-        sumProd = 0
-        meanVal = 0
+        primaryconcolname = dSDV["primaryconcolname"]
+        if primaryconcolname is not None:
+            primaryconcolname = primaryconcolname.upper()
 
-        with arcpy.da.SearchCursor(initialTbl, inFlds, where_clause=whereClause, sql_clause=sqlClause) as cur:
-            with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
+        secondaryconcolname = dSDV["secondaryconcolname"]
+        if secondaryconcolname is not None:
+            secondaryconcolname = secondaryconcolname.upper()
+
+        rtabphyname = "XXXXX"
+        mdSQL = "RTABPHYNAME = '" + dSDV["attributetablename"].lower() + "'"  # initial whereclause for mdstatrshipdet
+
+        # Setup initial queries
+        while rtabphyname != "MAPUNIT":
+            level += 1
+
+            with arcpy.da.SearchCursor(mdTable, mdFlds, where_clause=mdSQL) as cur:
+                # This should only select one record
 
                 for rec in cur:
-                    mukey, cokey, comppct, hzdept, hzdepb, val, areasym = rec
-                    # top = hzdept
-                    # bot = hzdepb
-                    # td = top of range
-                    # bd = bottom of range
+                    ltabphyname = rec[0].upper()
+                    rtabphyname = rec[1].upper()
+                    ltabcolphyname = rec[2].upper()
+                    rtabcolphyname = rec[3].upper()
+                    mdSQL = "RTABPHYNAME = '" + ltabphyname.lower() + "'"
 
-                    if val is not None and hzdept is not None and hzdepb is not None:
+                    if bVerbose:
+                        PrintMsg("\tGetting level " + str(level) + " information for " + rtabphyname.upper(), 1)
 
-                        # Calculate sum of horizon thickness and sum of component ratings for all horizons above bottom
-                        try:
-                            hzT = min(hzdepb, bot) - max(hzdept, top)   # usable thickness from this horizon
+                    if not rtabphyname in tblList:
+                        tblList.append(rtabphyname) # save list of tables involved
 
-                        except:
-                            hzT = 0
+                    for tv in tableViews:
+                        if tv.datasetName.lower() == rtabphyname.lower():
+                            # Remove this table view from ArcMap that might cause a conflict with queries
+                            arcpy.mapping.RemoveTableView(df, tv)
 
-                        if hzT > 0:
-                            ratingIndx = domainValues.index(val)   # Change KFactor to an index based upon domain order
+                    if rtabphyname.upper() == dSDV["attributetablename"].upper():
+                        #
+                        # This is the table that contains the rating values
+                        #
+                        # check for primary and secondary restraints
+                        # and use a query to apply them if found.
 
-                            #PrintMsg("\t" + str(aws), 1)
+                        # Begin setting up SQL statement for initial filter
+                        # This may be changed further down
+                        #
+                        primSQL = None
 
-                            if not cokey in dComp:
-                                # Create initial entry for this component using the first horiozon CHK
-                                ratingList = [ratingIndx]
-                                dComp[cokey] = [mukey, comppct, ratingList, areasym]
+                        if dSDV["attributelogicaldatatype"].lower() in ['integer', 'float']:
+                            #
+                            if not dSDV["sqlwhereclause"] is None:
+                                primSQL = dSDV["sqlwhereclause"]
 
                             else:
-                                # accumulate total thickness and total rating value by adding to existing component values  CHK
-                                mukey, comppct, ratingList, areasym = dComp[cokey]
-                                
-                                if not ratingIndx in ratingList:
-                                    ratingList.append(ratingIndx)
-                                    dComp[cokey] = [mukey, comppct, ratingList, areasym]
-
-                # get the total number of major components from the dictionary count
-                iComp = len(dComp)
+                                primSQL = None
 
-                # Read through the component-level data and summarize to the mapunit level
 
-                if iComp > 0:
-                    #PrintMsg("\t" + str(top) + " - " + str(bot) + "cm (" + Number_Format(iComp, 0, True) + " components)"  , 0)
+                        if not primaryconcolname is None:
+                            # has primary constraint, get primary constraint value
+                            if primSQL is None:
+                                primSQL = primaryconcolname + " = '" + primCst + "'"
 
-                    for cokey, vals in dComp.items():
+                            else:
+                                primSQL = primSQL + " and " + primaryconcolname + " = '" + primCst + "'"
 
-                        # get component level data
-                        mukey, comppct, ratingList, areasym = vals
-                        
-                        ratingIndx = max(ratingList)  # get highest K Factor from all horizons for this component
-                        #PrintMsg("\t" + mukey + ", " + cokey + ", " + str(round(rating, 1)), 1)
+                            if not secondaryconcolname is None:
+                                # has primary constraint, get primary constraint value
+                                secSQL = secondaryconcolname + " = '" + secCst + "'"
+                                primSQL = primSQL + " and " + secSQL
+                                #PrintMsg(" \nprimSQL = " + primSQL, 0)
 
-                        try:
-                            # append component weighted average rating to the mapunit dictionary
-                            dMu[mukey].append([comppct, ratingIndx, areasym])
+                        if dSDV["attributetablename"].upper() == "COINTERP":
 
-                        except:
-                            # create a new mapunit record in the dictionary
-                            dMu[mukey] = [[comppct, ratingIndx, areasym]]
+                            # New code using rulekey and distinterpmd table
+                            distinterpTbl = os.path.join(gdb, "distinterpmd")
+                            ruleKeys = gSSURGO_InterpIndex.RuleKeys(distinterpTbl, dSDV["nasisrulename"])
+                            ruleKey = RuleKeyString(ruleKeys)
 
-                # Write out map unit aggregated rating
-                #
-                outputValues = [domainValues[0], domainValues[-1]]
+                            if len(ruleKeys) == 0:
+                                raise MyError, "Interp query failed to return key values for " + dSDV["nasisrulename"]
 
-                #if tieBreaker == dSDV["tiebreakhighlabel"]:
-                oid = 0
-                
-                for mukey, muVals in dMu.items():
-                    oid += 1
-                    #muVal = SortData(muVals, 1, 0, True, True)
-                    muVal = SortData(muVals, 0, 0, True, True)
-                    pct, ratingIndx, areasym = muVal
-                    rating = domainValues[ratingIndx]
-                    murec = [mukey, pct, rating, areasym]
+                            # Time for CONUS using different indexes and queries
+                            # ruledepth and mrulename 9:53 min
+                            # rulekey 4:09 min
+                            # ruledepth and mrulekey: 4:03 min
+                            #
+                            #interpSQL = "MRULENAME like '%" + dSDV["nasisrulename"] + "' and RULEDEPTH = 0"  # 9:53
+                            #interpSQL = "RULEDEPTH = 0 AND MRULEKEY = '" + ruleKey + "'"                      # 4:09
+                            interpSQL = "RULEKEY IN " + ruleKey                                        # 4:03
 
-                    
-                    #if mukey == "1427104":
-                    #if mukey == "1380525":
-                    #    PrintMsg(" \nOutput Table: " + outputTbl, 1)
-                    #    PrintMsg("\t" + str(muVals), 1)
-                    #    PrintMsg("\t" + str(muVal), 1)
-                    #    PrintMsg("\t" + rating, 1)
-                    #    PrintMsg("\t" + str(oid) + ", " + str(murec), 1)
-                        
-                    
-                    ocur.insertRow(murec)
+                            # Only read the cointerp records between the first and last OBJECTID of
+                            # these rules (gSSURGO_InterpIndex)
+                            interpSQL = gSSURGO_InterpIndex.RangeQuery(gdb, "RULEKEY", ruleKeys, interpSQL)
 
-                    if not rating is None:
-                    #    # save overall max-min values
-                        outputValues[0] = min(rating, outputValues[0])
-                        outputValues[1] = max(rating, outputValues[1])
+                            if primSQL is None:
+                                primSQL = interpSQL
+                                #primSQL = "MRULENAME like '%" + dSDV["nasisrulename"] + "' and RULEDEPTH = 0"
 
-        return outputTbl, outputValues
+                            else:
+                                #primSQL = primSQL + " and MRULENAME like '%" + dSDV["nasisrulename"] + "' and RULEDEPTH = 0"
+                                primSQL = interpSQL + " AND " + primSQL
 
-    except MyError, e:
-        PrintMsg(str(e), 2)
-        return outputTbl, []
+                            # Try populating the cokeyList variable here and use it later in ReadTable
+                            cokeyList = list()
 
-    except:
-        errorMsg()
-        return outputTbl, []
+                        elif dSDV["attributetablename"].upper() == "CHORIZON":
+                            if primSQL is None:
+                                primSQL = hzQuery
 
+                            else:
+                                primSQL = primSQL + " and " + hzQuery
 
-## ===================================================================================
-def AggregateHz_MaxMin_DCP(gdb, sdvAtt, sdvFld, initialTbl, bNulls, cutOff, tieBreaker, top, bot, bZero):
-    # Aggregate mapunit-component-horizon data to the map unit level using the highest rating
-    # from all horizons. Currently this would only apply to K Factor and dominant component
-    
-    try:
-        arcpy.SetProgressorLabel("Aggregating rating information to the map unit level")
-        #
-        if bVerbose:
-            PrintMsg(" \nCurrent function : " + sys._getframe().f_code.co_name, 1)
+                        elif dSDV["attributetablename"].upper() == "CHUNIFIED":
+                            if not primSQL is None:
+                                primSQL = primSQL + " and RVINDICATOR = 'Yes'"
 
-        # Create final output table with MUKEY, COMPPCT_R and sdvFld
-        outputTbl = os.path.join(gdb, tblName)
-        fldPrecision = max(0, dSDV["attributeprecision"])
+                            else:
+                                primSQL = "RVINDICATOR = 'Yes'"
 
-        inFlds = ["MUKEY", "COKEY", "COMPPCT_R", "HZDEPT_R", "HZDEPB_R", dSDV["attributecolumnname"].upper(), "AREASYMBOL"]
-        outFlds = ["MUKEY", "COMPPCT_R", dSDV["resultcolumnname"].upper(), "AREASYMBOL"]
+                        elif dSDV["attributetablename"].upper() == "COMONTH":
+                            if primSQL is None:
+                                primSQL = MonthQuery(begMo, endMo)
 
-        sqlClause =  (None, "ORDER BY MUKEY ASC, COMPPCT_R DESC, HZDEPT_R ASC")
+                            else:
+                                primSQL = primSQL + " AND " + MonthQuery(begMo, endMo)
 
-        if bZero == False:
-            # ignore any null values
-            whereClause = "COMPPCT_R >=  " + str(cutOff) + " AND " + dSDV["attributecolumnname"].upper() + " IS NOT NULL"
+                        elif dSDV["attributetablename"].upper() == "COSOILMOIST":
+                            # Having problems with NULL values for some months. Need to retain NULL values with query,
+                            # but then substitute 201cm in ReadTable
+                            #
+                            primSQL = dSDV["sqlwhereclause"]
 
-        else:
-            # retrieve null values and convert to zeros during the iteration process
-            whereClause = "COMPPCT_R >=  " + str(cutOff)
 
-        if arcpy.Exists(outputTbl):
-            arcpy.Delete_management(outputTbl)
+                        if primSQL is None:
+                            primSQL = ""
 
-        outputTbl = CreateOutputTable(initialTbl, outputTbl, dFieldInfo)
+                        if bVerbose:
+                            PrintMsg("\tRating table (" + rtabphyname.upper() + ") SQL: " + primSQL, 1)
 
-        if outputTbl == "":
-            return outputTbl,[]
+                        # Create list of necessary fields
 
-        dPct = dict()  # sum of comppct_r for each map unit
-        dComp = dict() # component level information
-        dMu = dict()
+                        # Get field list for mapunit or component or chorizon
+                        if rtabphyname in big3Tbls:
+                            flds = dFields[rtabphyname]
+                            if not dSDV["attributecolumnname"].upper() in flds:
+                                flds.append(dSDV["attributecolumnname"].upper())
 
-        # reset variables for cursor
-        sumPct = 0
-        sumProd = 0
-        meanVal = 0
+                            dFields[rtabphyname] = flds
+                            dMissing[rtabphyname] = [None] * (len(dFields[rtabphyname]) - 1)
 
-        with arcpy.da.SearchCursor(initialTbl, inFlds, where_clause=whereClause, sql_clause=sqlClause) as cur:
-            with arcpy.da.InsertCursor(outputTbl, outFlds) as ocur:
+                        elif rtabphyname == "COMONTH":
+                            # Keep the month with each rating for the AggregateCo_Mo functions
+                            flds = [rtabcolphyname, "MONTHSEQ", dSDV["attributecolumnname"].upper()]
+                            dFields[rtabphyname] = flds
+                            dMissing[rtabphyname] = [None] * (len(dFields[rtabphyname]) - 1)
 
-                for rec in cur:
-                    mukey, cokey, comppct, hzdept, hzdepb, val, areasym = rec
-                    # top = hzdept
-                    # bot = hzdepb
-                    # td = top of range
-                    # bd = bottom of range
+                        else:
+                            # Not one of the big 3 tables, just use foreign key and sdvattribute column
+                            flds = [rtabcolphyname, dSDV["attributecolumnname"].upper()]
+                            dFields[rtabphyname] = flds
 
-                    if val is not None and hzdept is not None and hzdepb is not None:
+                            if not rtabphyname in dMissing:
+                                dMissing[rtabphyname] = [None] * (len(dFields[rtabphyname]) - 1)
+                                #PrintMsg("\nSetting missing fields for " + rtabphyname + " to " + str(dMissing[rtabphyname]), 1)
 
-                        # Calculate sum of horizon thickness and sum of component ratings for all horizons above bottom
                         try:
-                            hzT = min(hzdepb, bot) - max(hzdept, top)   # usable thickness from this horizon
+                            sql = dSQL[rtabphyname]
 
                         except:
-                            hzT = 0
-
-                        if hzT > 0:
-                            ratingIndx = domainValues.index(val)   # Change KFactor to an index based upon domain order
+                            # For tables other than the primary ones.
+                            sql = (None, None)
 
-                            #PrintMsg("\t" + str(aws), 1)
+                        if rtabphyname == "MAPUNIT" and aggMethod != "No Aggregation Necessary":
+                            # No aggregation necessary?
+                            PrintMsg(" \n" + sdvAtt + " aggregation method set to: " + aggMethod, 1)
+                            
+                            dMapunit = ReadTable(rtabphyname, flds, primSQL, level, sql)
 
-                            if not cokey in dComp:
-                                if not mukey in dMu:
-                                    dMu[mukey] = cokey
-
-                                    # Create initial entry for this component using the first horiozon CHK
-                                    ratingList = [ratingIndx]
-                                    dComp[cokey] = [mukey, comppct, ratingList, areasym]
-
-                            elif cokey == dMu[mukey]:
-                                # accumulate total thickness and total rating value by adding to existing component values  CHK
-                                mukey, comppct, ratingList, areasym = dComp[cokey]
-                                
-                                if not ratingIndx in ratingList:
-                                    ratingList.append(ratingIndx)
-                                    dComp[cokey] = [mukey, comppct, ratingList, areasym]
-
-                # get the total number of major components from the dictionary count
-                iComp = len(dComp)
-
-                # Read through the component-level data and summarize to the mapunit level
-
-                if iComp > 0:
-                    #PrintMsg("\t" + str(top) + " - " + str(bot) + "cm (" + Number_Format(iComp, 0, True) + " components)"  , 0)
-
-                    for cokey, vals in dComp.items():
-
-                        # get component level data
-                        mukey, comppct, ratingList, areasym = vals
-                        
-                        ratingIndx = max(ratingList)  # get highest K Factor from all horizons for this component
-                        #PrintMsg("\t" + mukey + ", " + cokey + ", " + str(round(rating, 1)), 1)
-
-                        try:
-                            # append component weighted average rating to the mapunit dictionary
-                            dMu[mukey].append([comppct, ratingIndx, areasym])
-
-                        except:
-                            # create a new mapunit record in the dictionary
-                            dMu[mukey] = [[comppct, ratingIndx, areasym]]
-
-                # Write out map unit aggregated rating
-                #
-                outputValues = [domainValues[0], domainValues[-1]]
-
-                #if tieBreaker == dSDV["tiebreakhighlabel"]:
-                oid = 0
-                
-                for mukey, muVals in dMu.items():
-                    oid += 1
-                    muVal = SortData(muVals, 1, 0, True, True)              
-                    pct, ratingIndx, areasym = muVal
-                    rating = domainValues[ratingIndx]
-                    murec = [mukey, pct, rating, areasym]
-                    #if mukey == "1427104":
-                    #    PrintMsg(" \nOutput Table: " + outputTbl, 1)
-                    #    PrintMsg("\t" + str(muVals), 1)
-                    #    PrintMsg("\t" + str(muVal), 1)
-                    #    PrintMsg("\t" + rating, 1)
-                    #    PrintMsg("\t" + str(oid) + ", " + str(murec), 1)
-                    ocur.insertRow(murec)
-
-                    if not rating is None:
-                    #    # save overall max-min values
-                        outputValues[0] = min(rating, outputValues[0])
-                        outputValues[1] = max(rating, outputValues[1])
-
-        return outputTbl, outputValues
-
-    except MyError, e:
-        PrintMsg(str(e), 2)
-        return outputTbl, []
-
-    except:
-        errorMsg()
-        return outputTbl, []
-
-
-
-## ===================================================================================
-def UpdateMetadata(outputWS, target, parameterString, creditsString, aggMethod, sdvAtt, toDay):
-    # Update metadata for target object (VALU1 table)
-    #
-    try:
-
-        # Clear process steps from the VALU1 table. Mostly AddField statements.
-        #
-        # NOTE: The geoprocessing metadata conversion tools to not work in the 64 bit background processing
-        #
-        """
-        Any script or script tools you run while inside Desktop honors the background processing setting.
-        If background processing is turned on, the scripts will execute in the 64-bit space.
-
-        When you execute a stand-alone Python script outside the application, you need to ensure
-        you're running against the 64-bit Python installation to make use of 64-bit geoprocessing.
-        Double-clicking a Python file from Windows Explorer will launch the file using whatever
-        association Windows has set for the .py file. Typically, this is the last version of Python installed,
-        which should be 64 bit. If you want to be absolutely sure which version of Python you're
-        running against (32 or 64), it is best to fully qualify the Python executable when running
-        your script at command line. For example, the following command will ensure the script is
-        run as 64 bit:
-                      c:\Python27\ArcGISx6410.2\python.exe c:\gisData\scripts\intersect.py.
-
-        """
-        # Function parameters: bMetadata = UpdateMetadata(gdb, outputTbl, parameterString, creditsString, aggMethod, sdvAtt, toDay)
-        #   outputWS - input gSSURGO database
-        #   target   - SDV rating table that was just created
-        #   parameterString - string containing all user settings from the menu
-        #   creditsString   - user login and name of this script
-        #   aggMethod - method used to summarize the data to the map unit level.
-        #   sdvAtt - short description of this map layer
-        #   toDay - date stamp string
-        #
-
-        # Determine whether this script is running in 32 or 64 bit mode
-        arcpy.SetProgressorLabel("Updating metadata for " + os.path.basename(target))
-        pythonVersion = sys.version
-        fy = "2018"
-
-        if pythonVersion.find("32 bit") == -1:
-            # Print a non-fatal warning to the user that the metadata will not be updated in 64 bit mode
-            PrintMsg(" \nWarning! Unable to update metadata when running under 64-bit background-mode", 1)
-            return False
-
-        if not arcpy.Exists(target):
-            target = os.path.join(outputWS, target)
-
-        # Remove geoprocessing history
-        remove_gp_history_xslt = os.path.join(os.path.dirname(sys.argv[0]), "remove geoprocessing history.xslt")
-        out_xml = os.path.join(env.scratchFolder, "xxClean.xml")
-
-        if not arcpy.Exists(remove_gp_history_xslt):
-            raise MyError, "Missing file: " + remove_gp_history_xslt
-
-        if arcpy.Exists(out_xml):
-            arcpy.Delete_management(out_xml)
-
-        # Using the stylesheet, write 'clean' metadata to out_xml file and then import back in
-        # It appears that the metadata tools do not work within 64 bit background processing for 10.4.
-        # The failure does not even generate an error message.
-        try:
-            arcpy.XSLTransform_conversion(target, remove_gp_history_xslt, out_xml, "")
-            arcpy.MetadataImporter_conversion(out_xml, os.path.join(outputWS, target))
-
-        except:
-            PrintMsg(" \nFailed to clean up metadata", 0)
-
-        # Set metadata translator file
-        dInstall = arcpy.GetInstallInfo()
-        installPath = dInstall["InstallDir"]
-        prod = r"Metadata/Translator/ARCGIS2FGDC.xml"
-        mdTranslator = os.path.join(installPath, prod)
-
-        if not arcpy.Exists(mdTranslator):
-            raise MyError, "Missing metadata translator: " + mdTranslator
-
-        # Define input and output XML files
-        xmlPath = os.path.dirname(sys.argv[0])
-
-        mdExport = os.path.join(xmlPath, "SDV_Metadata2.xml")  # template metadata stored in ArcTool folder
-
-        mdImport = os.path.join(env.scratchFolder, "xxImport.xml")  # the metadata xml that will provide the updated info
-
-        # Cleanup XML files from previous runs
-        if os.path.isfile(mdImport):
-            os.remove(mdImport)
+                        elif rtabphyname == "MUTEXT" and aggMethod == "No Aggregation Necessary":
+                            # No aggregation necessary?
+                            #dMapunit = ReadTable(rtabphyname, flds, primSQL, level, sql)
+                            primSQL = dSDV["sqlwhereclause"]
+                            dTbl = ReadTable(rtabphyname, flds, primSQL, level, sql)
 
-        mdState = ""
-        ratingFld = dSDV["resultcolumnname"]
+                        elif rtabphyname == "COMPONENT":
+                            #if cutOff is not None:
+                            if dSDV["sqlwhereclause"] is not None:
+                                if cutOff == 0:
+                                    # Having problems with CONUS database. Including COMPPCT_R in the
+                                    # where_clause is returning zero records. Found while testing Hydric map. Is a Bug?
+                                    # Work around is to put COMPPCT_R part of query last in the string
 
-        # Currently in this script, only the metadata title, summary, description, credits and the new rating field description are updated.
-        #
-        dMetadata = dict()  # dictionary key is the search term that exists in the template metadata. Dictionary value is the replacement.
-        dMetadata["SDV_Title"] = dSDV["attributename"] + " - " + aggMethod
-        dMetadata["SDV_Description"] = "Map unit rating table for '" + dSDV["attributename"] +"'" + "\r" + dSDV["attributedescription"] + "\r" + parameterString
-        dMetadata["SDV_Credits"] = "USDA-Natural Resources Conservation Service; " + creditsString
-        dMetadata["SDV_Summary"] = "Map the '" + sdvAtt + "' soil " + dSDV["attributetype"].lower() + " by joining this rating table to the soil layer (polygon or raster) using the mukey field."
+                                    primSQL =  dSDV["sqlwhereclause"] + " AND COMPNAME <> 'NOTCOM'"
 
-        dFields = dict()
-        dFields["MUKEY"] = "Soil map unit primary key"
-        dFields["AREASYMBOL"] = "Soil Survey ID"
-        dFields["COMPPCT_R"] = "Component percent of the map unit"
-        dFields["OBJECTID"] = "Internal feature number"
-        dFields[ratingFld] = "Map unit rating for " + sdvAtt
+                                else:
+                                    primSQL = dSDV["sqlwhereclause"] + ' AND "COMPPCT_R" >= ' + str(cutOff)  + " AND COMPNAME <> 'NOTCOM'"
 
-        # Convert XML from template metadata to tree format
-        tree = ET.parse(mdExport)
-        root = tree.getroot()
+                            else:
+                                primSQL = "COMPPCT_R >= " + str(cutOff)  + " AND COMPNAME <> 'NOTCOM'"
 
-        elemList = tree.getiterator()
 
-        for elem in elemList:
-            #print elem.tag
-            for child in elem:
-                if str(child.text) in dMetadata:
-                    child.text = dMetadata[child.text]
+                            #PrintMsg(" \nPopulating dictionary from component table", 1)
 
-                if child.tag == "attrlabl":
-                    # This is a field name
-                    fldName = child.text
+                            dComponent = ReadTable(rtabphyname, flds, primSQL, level, sql)
 
-                    if fldName in dFields:
-                        fldDesc = dFields[fldName]
+                            if len(dComponent) == 0:
+                                raise MyError, "No component data for " + sdvAtt
 
-                    elif fldName == "SDV_RATING":
-                        child.text = ratingFld
-                        fldName = ratingFld
+                        elif rtabphyname == "CHORIZON":
+                            #primSQL = "(CHORIZON.HZDEPT_R between " + str(top) + " and " + str(bot) + " or CHORIZON.HZDEPB_R between " + str(top) + " and " + str(bot + 1) + ")"
+                            #PrintMsg(" \nCHORIZON hzQuery: " + hzQuery, 1)
+                            dHorizon = ReadTable(rtabphyname, flds, hzQuery, level, sql)
 
-                        if fldName in dFields:
-                            fldDesc = dFields[fldName]
+                            if len(dHorizon) == 0:
+                                raise MyError, "No horizon data for " + sdvAtt
 
-                elif child.tag == "attrdef":
-                    child.text = fldDesc
+                        else:
+                            # This should be the bottom-level table containing the requested data
+                            #
+                            cokeyList = list()  # Try using this to pare down the COINTERP table record count
+                            #cokeyList = dComponent.keys()  # Won't work. dComponent isn't populated yet
 
+                            #PrintMsg(" \nReading " + dSDV["attributetablename"] + " table, using " + ", ".join(flds), 1)
+                            #PrintMsg("Using primSQL: " + str(primSQL) + ";  " + " sql: " + str(sql), 1)
 
-        #  create new xml file with the updated information
-        tree.write(mdImport, encoding="utf-8", xml_declaration=None, default_namespace=None, method="xml")
+                            dTbl = ReadTable(dSDV["attributetablename"].upper(), flds, primSQL, level, sql)
 
-        # import updated metadata to the geodatabase table
-        arcpy.MetadataImporter_conversion(mdExport, target)
-        arcpy.ImportMetadata_conversion(mdImport, "FROM_FGDC", target, "DISABLED")
+                            #if len(dTbl) == 0:
+                            #    raise MyError, "No test2 " + dSDV["attributetablename"] + " data for " + sdvAtt
 
-        # delete the temporary xml metadata files
-        if os.path.isfile(mdImport):
-            #os.remove(mdImport)
-            pass
+                    else:
+                        # Bottom section
+                        #
+                        # This is one of the intermediate tables
+                        # Create list of necessary fields
+                        # Get field list for mapunit or component or chorizon
+                        #
+                        flds = dFields[rtabphyname]
+                        try:
+                            sql = dSQL[rtabphyname]
 
-        #if os.path.isfile(mdExport):
-        #    os.remove(mdExport)
-        arcpy.SetProgressorLabel("Finished updating metadata for " + os.path.basename(target))
-        return True
+                        except:
+                            # This needs to be fixed. I have a whereclause in the try and an sqlclause in the except.
+                            sql = (None, None)
 
-    except MyError, e:
-        # Example: raise MyError("this is an error message")
-        PrintMsg(str(e) + " \n", 2)
-        return False
+                        primSQL = ""
+                        #PrintMsg(" \n\tReading intermediate table: " + rtabphyname + "   sql: " + str(sql), 1)
 
-    except:
-        errorMsg()
-        return False
+                        if rtabphyname == "MAPUNIT":
+                            dMapunit = ReadTable(rtabphyname, flds, primSQL, level, sql)
 
-## ===================================================================================
-def CreateSoilMap(inputLayer, sdvAtt, aggMethod, primCst, secCst, top, bot, begMo, endMo, tieBreaker, bZero, cutOff, bFuzzy, bNulls, sRV):
-    #
-    # function that can be called by other scripts
-    #
-    try:
-         # not sure why this isn't being imported at the beginning
-        global bVerbose
+                        elif rtabphyname == "COMPONENT":
+                            primSQL = "COMPPCT_R >= " + str(cutOff)
 
-        bVerbose = False   # hard-coded boolean to print diagnostic messages
-        #bVerbose = True
+                            #PrintMsg(" \nPopulating dictionary from component table", 1)
 
-        # Value cache is a global variable used for fact function which is called by ColorRamp
-        global fact_cache
-        fact_cache = {}
+                            dComponent = ReadTable(rtabphyname, flds, primSQL, level, sql)
 
-        # Check the ArcGIS Desktop version number
-        installInfo = arcpy.GetInstallInfo()
-        version = installInfo["Version"][0:4]
+                        elif rtabphyname == "CHORIZON":
+                            #primSQL = "(CHORIZON.HZDEPT_R between " + str(top) + " and " + str(bot) + " or CHORIZON.HZDEPB_R between " + str(top) + " and " + str(bot + 1) + ")"
+                            tf = "HZDEPT_R"
+                            bf = "HZDEPB_R"
+                            #primSQL = "( ( " + tf + " between " + str(top) + " and " + str(bot - 1) + " or " + bf + " between " + str(top) + " and " + str(bot) + " ) or " + \
+                            #"( " + tf + " <= " + str(top) + " and " + bf + " >= " + str(bot) + " ) )"
+                            if (bot - top) == 1:
+                                #rng = str(tuple(range(top, (bot + 1))))
+                                hzQuery = "((" + tf + " = " + str(top) + " or " + bf + " = " + str(bot) + ") or ( " + tf + " <= " + str(top) + " and " + bf + " >= " + str(bot) + " ) )"
 
-        import datetime
+                            else:
+                                rng = str(tuple(range(top, bot)))
+                                hzQuery = "((" + tf + " in " + rng + " or " + bf + " in " + rng + ") or ( " + tf + " <= " + str(top) + " and " + bf + " >= " + str(bot) + " ) )"
 
-        if not version[0:4] in ["10.3", "10.4", "10.5", "10.6", "10.7", "10.8"]:
-            PrintMsg(" \nArcGIS Desktop version " + version + " does not support the map symbology functions in this tool", 1)
+                            #PrintMsg(" \nSetting primSQL for when rtabphyname = 'CHORIZON' to: " + hzQuery, 1)
+                            dHorizon = ReadTable(rtabphyname, flds, hzQuery, level, sql)
 
-        # Get target gSSURGO database
-        global fc, gdb, muDesc, dataType
-        muDesc = arcpy.Describe(inputLayer)
-        fc = muDesc.catalogPath                         # full path for input mapunit polygon layer
-        gdb = os.path.dirname(fc)                       # need to expand to handle featuredatasets
-        dataType = muDesc.dataType.lower()
+                        elif rtabphyname == "COMONTH":
 
-        # Set current workspace to the geodatabase
-        env.workspace = gdb
-        env.overwriteOutput = True
+                            # Need to look at the SQL for the other tables as well...
+                            primSQL = MonthQuery(begMo, endMo)
 
-        # get scratchGDB
-        scratchGDB = env.scratchGDB
+                            #PrintMsg(" \nIntermediate SQL: " + primSQL, 1)
+                            dMonth = ReadTable(rtabphyname, flds, primSQL, level, sql)
 
-        # Get dictionary of MUSYM values (optional function for use during development)
-        dSymbols = GetMapunitSymbols(gdb)
+                            if len(dMonth) == 0:
+                                raise MyError, "No comonth data for " + sdvAtt + " \n "
+                            #else:
+                            #    PrintMsg(" \nFound " + str(len(dMonth)) + " records in COMONTH", 1)
 
-        # Create list of months for use in some queries
-        moList = ListMonths()
+                        else:
+                            PrintMsg(" \n\tUnable to read data from: " + rtabphyname, 1)
 
-        # arcpy.mapping setup
-        #
-        # Get map document object
-        global mxd, df
-        mxd = arcpy.mapping.MapDocument("CURRENT")
 
-        # Get active data frame object
-        df = mxd.activeDataFrame
+            if level > 6:
+                raise MyError, "Failed to get table relationships"
 
-        # Create a dictionary based upon domainValues or legendValues.
-        # This dictionary will use an uppercase-string version of the original value as the key
-        #
-        global dValues
-        dValues = dict()  # Try creating a new dictionary. Key is uppercase-string value. Value = [order, original value]
 
-        # Dictionary for aggregation method abbreviations
+        # Create a list of all fields needed for the initial output table. This
+        # one will include primary keys that won't be in the final output table.
         #
-        global dAgg
-        dAgg = dict()
-        dAgg["Dominant Component"] = "DCP"
-        dAgg["Dominant Condition"] = "DCD"
-        dAgg["No Aggregation Necessary"] = ""
-        dAgg["Percent Present"] = "PP"
-        dAgg["Weighted Average"] = "WTA"
-        dAgg["Most Limiting"] = "ML"
-        dAgg["Least Limiting"] = "LL"
-        dAgg[""] = ""
-
-
-        # Open sdvattribute table and query for [attributename] = sdvAtt
-        # if aggMethod is not already set, get the default method from the sdvattribute table
-        global dSDV
-
-        dSDV = GetSDVAtts(gdb, sdvAtt, aggMethod, tieBreaker, bFuzzy, sRV)  # In batch mode, bFuzzy is set to False. This does not work for interps like NCCPI.
-
-        if aggMethod == "":
-            aggMethod = dSDV["algorithmname"]
-
-        #PrintMsg(" \n\txxx Testing aggregation method: " + aggMethod, 1)
-
-        if dSDV["attributetype"].lower() == "interpretation" and dSDV["effectivelogicaldatatype"] == "float":
-            # For batch mode processing, override default bFuzzy setting to true. This applies to NCCPI interps.
-            bFuzzy == True
-
-        if tieBreaker == "":
-            if dSDV["tiebreakrule"] == -1:
-                tieBreaker = dSDV["tiebreaklowlabel"]
-
-                if tieBreaker is None or tieBreaker == "":
-                    tieBreaker = "Lower"
-
-            else:
-                tieBreaker = dSDV["tiebreakhighlabel"]
-
-                if tieBreaker is None:
-                    tieBreaker = "Higher"
-
-
-        # Set null replacement values according to SDV rules
-        global nullRating
-
-        if not dSDV["nullratingreplacementvalue"] is None:
-            if dSDV["attributelogicaldatatype"].lower() == "integer":
-                nullRating = int(dSDV["nullratingreplacementvalue"])
-
-            elif dSDV["attributelogicaldatatype"].lower() == "float":
-                nullRating = float(dSDV["nullratingreplacementvalue"])
+        if len(tblList) == 0:
+            # No Aggregation Necessary, append field to mapunit list
+            tblList = ["MAPUNIT"]
 
-            elif dSDV["attributelogicaldatatype"].lower() in ["string", "choice"]:
-                nullRating = dSDV["nullratingreplacementvalue"]
+            if dSDV["attributecolumnname"].upper() in dFields["MAPUNIT"]:
+                PrintMsg(" \nSkipping addition of field "  + dSDV["attributecolumnname"].upper(), 1)
 
             else:
-                nullRating = None
-
-        else:
-            nullRating = None
-
-        if dSDV["interpnullsaszerooptionflag"]:
-            bZero = True
-
-        # Temporary workaround for NCCPI. Switch from rating class to fuzzy number
-        # if dSDV["attributetype"].lower() == "interpretation" and (dSDV["nasisrulename"][0:5] == "NCCPI" or bFuzzy == True):
-        #    aggMethod = "Weighted Average"
-
-        if len(dSDV) == 0:
-            raise MyError, "dSDV is not populated"
-
-        # 'Big' 3 tables
-        big3Tbls = ["MAPUNIT", "COMPONENT", "CHORIZON"]
-
-        #  Create a dictionary to define minimum field list for the tables being used
-        #
-        global dFields
-        dFields = dict()
-        dFields["MAPUNIT"] = ["MUKEY", "MUSYM", "MUNAME", "LKEY"]
-        dFields["COMPONENT"] = ["MUKEY", "COKEY", "COMPNAME", "COMPPCT_R"]
-        dFields["CHORIZON"] = ["COKEY", "CHKEY", "HZDEPT_R", "HZDEPB_R"]
-        dFields["COMONTH"] = ["COKEY", "COMONTHKEY"]
-        #dFields["COMONTH"] = ["COMONTHKEY", "MONTH"]
-
-        # Create dictionary containing substitute values for missing data
-        global dMissing
-        dMissing = dict()
-        dMissing[dSDV["attributetablename"].upper()] = [nullRating]  
-        dMissing["MAPUNIT"] = [None] * len(dFields["MAPUNIT"])
-        dMissing["COMPONENT"] = [None] * (len(dFields["COMPONENT"]) - 1)  # adjusted number down because of mukey
-        dMissing["CHORIZON"] = [None] * (len(dFields["CHORIZON"]) - 1)
-        dMissing["COMONTH"] = [None] * (len(dFields["COMONTH"]) - 1)
-        #dMissing["COSOILMOIST"] = [nullRating]
-              # This ends up setting NOTCOM to 'None' for Flooding Frequency. What can I do?
-        #PrintMsg(" \ndInitial dMissing values: " + str(dMissing), 0)
-
-        # Dictionary containing sql_clauses for the Big 3
-        #
-        global dSQL
-        dSQL = dict()
-        dSQL["MAPUNIT"] = (None, "ORDER BY MUKEY ASC")
-        dSQL["COMPONENT"] = (None, "ORDER BY MUKEY ASC, COMPPCT_R DESC")
-        dSQL["CHORIZON"] = (None, "ORDER BY COKEY ASC, HZDEPT_R ASC")
-
-        # Get information about the SDV output result field
-        resultcolumn = dSDV["resultcolumnname"].upper()
+                dFields["MAPUNIT"].append(dSDV["attributecolumnname"].upper())
 
-        primaryconcolname = dSDV["primaryconcolname"]
-        if primaryconcolname is not None:
-            primaryconcolname = primaryconcolname.upper()
+        tblList.reverse()  # Set order of the tables so that mapunit is on top
 
-        secondaryconcolname = dSDV["secondaryconcolname"]
-        if secondaryconcolname is not None:
-            secondaryconcolname = secondaryconcolname.upper()
+        if bVerbose:
+            PrintMsg(" \nUsing these tables: " + ", ".join(tblList), 1)
 
-        # Create dictionary to contain key field definitions
-        # AddField_management (in_table, field_name, field_type, {field_precision}, {field_scale}, {field_length}, {field_alias}, {field_is_nullable}, {field_is_required}, {field_domain})
-        # TEXT, FLOAT, DOUBLE, SHORT, LONG, DATE, BLOB, RASTER, GUID
-        # field_type, field_length (text only),
-        #
-        global dFieldInfo
-        dFieldInfo = dict()
+        # Create a list of all fields to be used
+        global allFields
+        allFields = ["AREASYMBOL"]
+        allFields.extend(dFields["MAPUNIT"])  # always include the selected set of fields from mapunit table
+        #PrintMsg(" \nallFields 1: " + ", ".join(allFields), 1)
 
-        # Convert original sdvattribute field settings to ArcGIS data types
-        if dSDV["effectivelogicaldatatype"].lower() in ['choice', 'string']:
-            #
-            dFieldInfo[resultcolumn] = ["TEXT", 254]
+        # Substitute resultcolumname for last field in allFields
+        for tbl in tblList:
+            tFields = dFields[tbl]
+            for fld in tFields:
+                if not fld.upper() in allFields:
+                    #PrintMsg("\tAdding " + tbl + "." + fld.upper(), 1)
+                    allFields.append(fld.upper())
 
-        elif dSDV["effectivelogicaldatatype"].lower() == 'vtext':
-            #
-            dFieldInfo[resultcolumn] = ["TEXT", 1024]  # guess
+        if not dSDV["attributecolumnname"].upper() in allFields:
+            allFields.append(dSDV["attributecolumnname"].upper())
 
-        elif dSDV["effectivelogicaldatatype"].lower() == 'float':
-            #dFieldInfo[resultcolumn] = ["DOUBLE", ""]
-            dFieldInfo[resultcolumn] = ["FLOAT", ""]  # trying to match muaggatt table data type
+        #PrintMsg(" \nallFields 3: " + ", ".join(allFields), 1)
 
-        elif dSDV["effectivelogicaldatatype"].lower() == 'integer':
-            dFieldInfo[resultcolumn] = ["SHORT", ""]
+        # Create initial output table (one-to-many)
+        # Now created with resultcolumnname
+        #
+        initialTbl = CreateInitialTable(sdvGDB, allFields, dFieldInfo)
 
-        elif dSDV["effectivelogicaldatatype"].lower() == 'narrative text':
-            dFieldInfo[resultcolumn] = ["TEXT", 1024]  # need to find out where this new data type came from
+        if initialTbl is None:
+            raise MyError, "Failed to create initial query table"
 
-        else:
-            raise MyError, "Failed to set dFieldInfo for " + resultcolumn + ", " + dSDV["effectivelogicaldatatype"]
+        # Create dictionary for areasymbol
+        #PrintMsg(" \nGetting polygon count...", 1)
+        global polyCnt, fcCnt
+        polyCnt = int(arcpy.GetCount_management(inputLayer).getOutput(0))  # featurelayer polygon count
+        fcCnt = int(arcpy.GetCount_management(fc).getOutput(0))            # featureclass polygon count
+        #PrintMsg(" \nGot polygon count of " + Number_Format(polyCnt, 0, True), 1)
 
-        dFieldInfo["AREASYMBOL"] = ["TEXT", 20]
-        dFieldInfo["LKEY"] = ["TEXT", 30]
-        dFieldInfo["MUKEY"] = ["TEXT", 30]
-        dFieldInfo["MUSYM"] = ["TEXT", 6]
-        dFieldInfo["MUNAME"] = ["TEXT", 175]
-        dFieldInfo["COKEY"] = ["TEXT", 30]
-        dFieldInfo["COMPNAME"] = ["TEXT", 60]
-        dFieldInfo["CHKEY"] = ["TEXT", 30]
-        dFieldInfo["COMPPCT_R"] = ["SHORT", ""]
-        dFieldInfo["HZDEPT_R"] = ["SHORT", ""]
-        dFieldInfo["HZDEPB_R"] = ["SHORT", ""]
-        dFieldInfo["INTERPHR"] = ["FLOAT", ""]  # trying to match muaggatt data type
+        # Getting Areasymbols and legendkeys is a bottleneck (Thursday Aug 18). Any room for improvement?
+        #
+        #PrintMsg(" \nGetting areasymbols...", 1)
+        global dAreasymbols
+        dAreasymbols = GetAreasymbols(gdb)
 
-        # I don't remember why I did this
-        if dSDV["attributetype"].lower() == "interpretation" and (bFuzzy == True or dSDV["effectivelogicaldatatype"].lower() == "float"):
-            # For NCCPI?
-            dFieldInfo["INTERPHRC"] = ["FLOAT", ""]
+        if not incrementalAreas is None:
+            # Incremental update (UpdateSDVTable). Only rate the map units in the changed survey areas.
+            areaSet = set(incrementalAreas)
+            dAreasymbols = dict([(lkey, areasym) for lkey, areasym in dAreasymbols.items() if areasym in areaSet])
 
-        else:
-            dFieldInfo["INTERPHRC"] = ["TEXT", 254]
+            if len(dAreasymbols) == 0:
+                # None of the changed survey areas have map units in the layer. There is nothing to rate.
+                return "", []
 
-        dFieldInfo["MONTH"] = ["TEXT", 10]
-        dFieldInfo["MONTHSEQ"] = ["SHORT", ""]
-        dFieldInfo["COMONTHKEY"] = ["TEXT", 30]
+        if len(dAreasymbols) == 0:
+            raise MyError, "xxx dAreasymbols is not populated"
 
-        # Get possible result domain values from mdstattabcols and mdstatdomdet tables
-        # There is a problem because the XML for the legend does not always match case
-        # Create a dictionary as backup, but uppercase and use that to store the original values
+        # Made changes in the table relates code that creates tblList. List now has MAPUNIT in first position
         #
-        # Assume that data types of string and vtext do not have domains
-
-        #PrintMsg(" \nCreating global variables for domainValues and domainValuesUp", 1)
-        global domainValues, domainValuesUp
 
-        if not dSDV["attributelogicaldatatype"].lower() in ["string", "vtext"]:
-            domainValues = GetRatingDomain(gdb)
-            #PrintMsg( "\ndomainValues: " + str(domainValues), 1)
-            domainValuesUp = [x.upper() for x in domainValues]    # Is this variable being used?
+        if tblList == ['MAPUNIT']:
+            # No aggregation needed
+            if CreateRatingTable1(tblList, dSDV["attributetablename"].upper(), initialTbl, dAreasymbols) == False:
+                raise MyError, "xxx CreateRatingTable failed"
 
-        else:
-            domainValues = list()
-            domainValuesUp = list()
+        elif tblList == ['MAPUNIT', 'COMPONENT']:
+            if CreateRatingTable2(tblList, dSDV["attributetablename"].upper(), dComponent, initialTbl) == False:
+                raise MyError, "xxx CreateRatingTable failed"
+            del dComponent
 
+        elif tblList == ['MAPUNIT', 'COMPONENT', 'CHORIZON']:
+            if CreateRatingTable3(tblList, dSDV["attributetablename"].upper(), dComponent, dHorizon, initialTbl) == False:
+                raise MyError, "xxx CreateRatingTable failed"
+            del dComponent, dHorizon
 
-        # Get map legend information from the maplegendxml string
-        # For some interps, there are case mismatches with the actual rating values. This
-        # problem originates in the Rule Manager. This affects dLegend, legendValues, domainValues, dValues and dLabels.
-        # At some point I need to use outputValues to fix these.
-        #
-        global dLegend
+        elif tblList == ['MAPUNIT', 'COMPONENT', 'CHORIZON', dSDV["attributetablename"].upper()]:
+            # COMPONENT, CHORIZON, CHTEXTUREGRP
+            if CreateRatingTable3S(tblList, dSDV["attributetablename"].upper(), dComponent, dHorizon, dTbl, initialTbl, sdvAtt) == False:
+                raise MyError, "xxx CreateRatingTable failed"
+            del dComponent, dHorizon
 
-        dLegend = GetMapLegend(dSDV, bFuzzy)    # dictionary containing all maplegendxml properties
-        #PrintMsg(" \nChecking dLegend values to see if rgb is text:  " + str(dLegend), 1)
+        elif tblList in [['MAPUNIT', "MUAGGATT"], ['MAPUNIT', "MUCROPYLD"], ['MAPUNIT', 'MUTEXT']]:
+            if CreateRatingTable1S(tblList, dSDV["attributetablename"].upper(), dTbl, initialTbl, dAreasymbols) == False:
+                raise MyError, "xxx CreateRatingTable failed"
 
-        global dLabels
-        dLabels = dict()
+        elif tblList == ['MAPUNIT', 'COMPONENT', dSDV["attributetablename"].upper()]:
+            if dSDV["attributetablename"].upper() == "COINTERP":
+                if CreateRatingInterps(tblList, dSDV["attributetablename"].upper(), dComponent, dTbl, initialTbl) == False:
+                    raise MyError, "xxx CreateRatingTable failed"
+                del dComponent
 
-        #PrintMsg(" \nAttributelogicaldatatype: " + dSDV["attributelogicaldatatype"].lower(), 1)
+            else:
+                if CreateRatingTable2S(tblList, dSDV["attributetablename"].upper(), dComponent, dTbl, initialTbl) == False:
+                    raise MyError, "xxx CreateRatingTable failed"
 
-        if len(dLegend) > 0:
-            if not dSDV["effectivelogicaldatatype"].lower() in ["integer", "float"]:
-                #
-                legendValues = GetValuesFromLegend(dLegend)
-                dLabels = dLegend["labels"] # dictionary containing just the label properties such as value and labeltext
+        elif tblList == ['MAPUNIT', 'COMPONENT', 'COMONTH', 'COSOILMOIST']:
+            if dSDV["attributetablename"].upper() == "COSOILMOIST":
 
-                if len(domainValues) == 0:
-                    for i in range(1, (len(dLabels) + 1)):
-                        domainValues.append(dLabels[i]["value"])
+                #PrintMsg(" \ndMissing values before CreateSoilMoistureTable: " + str(dMissing))
 
-                    #PrintMsg(" \nAdding <Null> to domainValues in CreateSoilMap function", 1)
+                if CreateSoilMoistureTable(tblList, dSDV["attributetablename"].upper(), dComponent, dMonth, dTbl, initialTbl, begMo, endMo) == False:
+                    raise MyError, "xxx CreateRatingTable failed"
+                del dMonth, dComponent # trying to lower memory usage
 
             else:
-                #PrintMsg(" \n", 1)
-                legendValues = GetValuesFromLegend(dLegend)
+                PrintMsg(" \nCannot handle table:" + dSDV["attributetablename"].upper(), 1)
+                raise MyError, "Tables Bad Combo: " + str(tblList)
 
         else:
-            # No map legend information in xml. Must be Progressive or using fuzzy values instead of original classes.
-            #
-            # This causes a problem for NCCPI.
-            legendValues = list()  # empty list, no legend
-            dLegend["type"] = "1"
-
-        # If there are no domain values, try using the legend values instead.
-        # May want to reconsider this move
-        #
-        if len(legendValues) > 0:
-            if len(domainValues) == 0:
-                PrintMsg(" \nUsing map legend values to populate domainValues", 1)
-                domainValues = legendValues
+            # Need to add ['COMPONENT', 'COMONTH', 'COSOILMOIST']
+            raise MyError, "Problem with list of input tables: " + str(tblList)
 
-        # Some problems with the 'Not rated' data value, legend value and sdvattribute setting ("notratedphrase")
-        # No perfect solution.
-        #
-        # Start by cleaning up the not rated value as best possible
-        if dSDV["attributetype"].lower() == "interpretation" and bFuzzy == False:
-            if not dSDV["notratedphrase"] is None:
-                # see if the lowercase value is equivalent to 'not rated'
-                if dSDV["notratedphrase"].upper() == 'NOT RATED':
-                    dSDV["notratedphrase"] = 'Not rated'
+        # **************************************************************************
+        # Look at attribflags and apply the appropriate aggregation function
 
-                else:
-                    dSDV["notratedphrase"] == dSDV["notratedphrase"][0:1].upper() + dSDV["notratedphrase"][1:].lower()
+        if not arcpy.Exists(initialTbl):
+            # Output table was not created. Exit program.
+            raise MyError, "xxx Failed to create output table"
 
-            else:
-                dSDV["notratedphrase"] = 'Not rated' # no way to know if this is correct until all of the data has been processed
+        #PrintMsg(" \ninitialTbl has " + arcpy.GetCount_management(initialTbl).getOutput(0) + " records", 1)
 
+        if InitialTableCount(initialTbl) == 0:
             #
-            # Next see if the not rated value exists in the domain from mdstatdomdet or map legend values
-            bNotRated = False
+            raise MyError, "Failed to populate query table"
 
-            for d in domainValues:
-                if not dSDV["notratedphrase"] is None and not d is None:
-                    if d.upper() == dSDV["notratedphrase"].upper():
-                        bNotRated = True
+        # Proceed with aggregation if the intermediate table has data.
+        # Add result column to fields list
+        iFlds = len(allFields)
+        newField = dSDV["resultcolumnname"].upper()
 
-            if bNotRated == False:
-                domainValues.insert(0, dSDV["notratedphrase"])
+        #PrintMsg(" \nallFields: " + ", ".join(allFields), 1)
+        allFields[len(allFields) - 1] = newField
+        rmFields = ["MUSYM", "COMPNAME", "LKEY"]
 
+        for fld in rmFields:
+            if fld in allFields:
+                allFields.remove(fld)
 
-        if dSDV["ruledesign"] == 2:
-            # Flip legend (including Not rated) for suitability interps
-            domainValues.reverse()
-            
-        if not None in domainValues and len(domainValues) > 0:
-            # Insert None at beginning or end of domainValues
-            #PrintMsg(" \nAdding None to domainValues in CreateSoilMap function", 1)
+        if newField == "MUNAME":
+            allFields.remove("MUNAME")
 
-            if tieBreaker == dSDV["tiebreakhighlabel"]:
-                # Put the null value at the beginning of the domain
-                #dValues["NONE"] = [0, None]
-                domainValues.insert(0, None)
-                #pass
+        #PrintMsg(" \nallFields: " + ", ".join(allFields), 1)
 
-            else:
-                # Put the null value at the end of the domain
-                #dValues["NONE"] = [len(dValues), None]
-                domainValues.append(None)
-                #pass
+        # Create name for final output table that will be saved to the input gSSURGO database
+        #
+        global tblName
+        #PrintMsg("\taggMethod: '" + dAgg[aggMethod] + "'", 1)
 
-            # Update dValues dictionary
-            i = 0
-            
-            for val in domainValues:
-                dValues[str(val).upper()] = [i, val]
-                i += 1
+        if dAgg[aggMethod] == "":
+            # No aggregation method necessary
+            tblName = "SDV_" + dSDV["resultcolumnname"]
 
+        else:
+            if secCst != "":
+                # Problem with primary and secondary constraint values. These can produce
+                # illegal table names
+                #
+                #tblName = "SDV_" + dSDV["resultcolumnname"] + "_" + dAgg[aggMethod] + "_" + primCst.replace(" ", "_") + "_" + secCst.replace(" ", "_")
+                tblName = "SDV_" + dSDV["resultcolumnname"] + "_" + primCst.replace(" ", "_") + "_" + secCst.replace(" ", "_")
 
 
-        #PrintMsg(" \ndValues: " + str(dValues), 1)
+            elif primCst != "":
+                #tblName = "SDV_" + dSDV["resultcolumnname"] + "_" + dAgg[aggMethod] + "_" + primCst.replace(" ", "_")
+                tblName = "SDV_" + dSDV["resultcolumnname"] + "_" + primCst.replace(" ", "_")
 
-        # For the result column we need to translate the sdvattribute value to an ArcGIS field data type
-        #  'Choice' 'Float' 'Integer' 'string' 'String' 'VText'
-        if dSDV["attributelogicaldatatype"].lower() in ['string', 'choice']:
-            dFieldInfo[dSDV["attributecolumnname"].upper()] = ["TEXT", dSDV["attributefieldsize"]]
+            elif dSDV["horzlevelattribflag"] and len(depthRanges) > 0:
+                # One table for all of the depth ranges (CreateDepthRangeTable)
+                tblName = "SDV_" + dSDV["resultcolumnname"] + "_Ranges"
 
-        elif dSDV["attributelogicaldatatype"].lower() == "vtext":
-            # Not sure if 254 is adequate
-            dFieldInfo[dSDV["attributecolumnname"].upper()] = ["TEXT", 254]
+            elif dSDV["cmonthlevelattribflag"] and len(monthWindows) > 0:
+                # One table for all of the month windows (CreateMonthWindowTable)
+                tblName = "SDV_" + dSDV["resultcolumnname"] + "_Months"
 
-        elif dSDV["attributelogicaldatatype"].lower() == "integer":
-            dFieldInfo[dSDV["attributecolumnname"].upper()] = ["SHORT", ""]
+            elif dSDV["horzlevelattribflag"]:
+                #tblName = "SDV_" + dSDV["resultcolumnname"] + "_" + dAgg[aggMethod] + "_" + str(top) + "to" + str(bot)
+                tblName = "SDV_" + dSDV["resultcolumnname"] + "_" + str(top) + "to" + str(bot)
 
-        elif dSDV["attributelogicaldatatype"].lower() == "float":
-            dFieldInfo[dSDV["attributecolumnname"].upper()] = ["FLOAT", dSDV["attributeprecision"]]
 
-        elif dSDV["attributelogicaldatatype"].lower() == "narrative text":
-            dFieldInfo[dSDV["attributecolumnname"].upper()] = ["TEXT", 1024]
-            
-        else:
-            raise MyError, "Failed to set dFieldInfo for " + dSDV["attributecolumnname"].upper()
+            else:
+                #tblName = "SDV_" + dSDV["resultcolumnname"]+ "_" + dAgg[aggMethod]
+                tblName = "SDV_" + dSDV["resultcolumnname"]
 
-        # Identify related tables using mdstatrshipdet and add to tblList
+        tblName = SDVTableName(tblName)
+
+        #PrintMsg(" \nOutput table name = " + tblName, 1)
+
+        # **************************************************************************
+        #
+        # Aggregation Logic to determine which functions will be used to process the
+        # intermediate table and produce the final output table.
+        #
+        # This is where outputValues is set
         #
-        mdTable = os.path.join(gdb, "mdstatrshipdet")
-        mdFlds = ["LTABPHYNAME", "RTABPHYNAME", "LTABCOLPHYNAME", "RTABCOLPHYNAME"]
-        level = 0  # table depth
-        tblList = list()
+        if dSDV["attributetype"] == "Property":
+            # These are all Soil Properties
+            # Added addtional logic for Minnesota Crop Index. It has a problem in that mapunitlevelattribflag is set to zero.
 
-        # Make sure mdstatrshipdet table is populated.
-        if int(arcpy.GetCount_management(mdTable).getOutput(0)) == 0:
-            raise MyError, "Required table (" + mdTable + ") is not populated"
+            if dSDV["mapunitlevelattribflag"] == 1 or \
+               (dSDV["mapunitlevelattribflag"] == 0 and dSDV["complevelattribflag"] == 0 \
+                and dSDV["cmonthlevelattribflag"] == 0 and dSDV["horzlevelattribflag"] == 0 ) :
+                # This is a Map unit Level Soil Property or it is Minnesota Crop Index in the MUTEXT table
+                #PrintMsg("Map unit level, no aggregation neccessary", 1)
+                outputTbl, outputValues = Aggregate1(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)
 
+            elif dSDV["complevelattribflag"] == 1:
 
+                if dSDV["horzlevelattribflag"] == 0:
+                    # These are Component Level-Only Soil Properties
 
-        if (sdvAtt in ["Surface Texture"] or sdvAtt.endswith("(Surface)")) and not (top == 0 and bot == 1):
+                    if dSDV["cmonthlevelattribflag"] == 0:
+                        #
+                        #  These are Component Level Soil Properties
 
-            if __name__ == "__main__":
-                #PrintMsg(" \nRenaming layer...", 1)
+                        if aggMethod == "Dominant Component":
+                            #PrintMsg(" \n1. domainValues: " + ", ".join(domainValues), 1)
+                            outputTbl, outputValues = AggregateCo_DCP(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, bZero)
 
-                if sdvAtt == "Surface Texture":
-                    outputLayer = "Texture"
+                        elif aggMethod == "Minimum or Maximum":
+                            outputTbl, outputValues = AggregateCo_MaxMin(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, bZero)
 
-                elif sdvAtt.endswith("(Surface)"):
-                    outputLayer = sdvAtt.replace("(Surface)", ", ")
+                        elif aggMethod == "Dominant Condition":
+                            if bVerbose:
+                                PrintMsg(" \nDomain Values are now: " + str(domainValues), 1)
 
-            else:
-                #PrintMsg(" \nKeeping this as a surface layer...", 1)
-                outputLayer = sdvAtt
-                top = 0
-                bot = 1
+                            if len(domainValues) > 0 and dSDV["tiebreakdomainname"] is not None :  # Problem with NonIrr CapSubCls
+                            #if len(domainValues) > 0: # Test failing on Parent Material
+                                if bVerbose:
+                                    PrintMsg(" \n1. aggMethod = " + aggMethod + " and domainValues = " + str(domainValues), 1)
 
-        else:
-            #PrintMsg(" \nKeeping this as the original layer...", 1)
-            outputLayer = sdvAtt
+                                outputTbl, outputValues = AggregateCo_DCD_Domain(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)
 
-        if dAgg[aggMethod] != "":
-            outputLayer = outputLayer + " " + dAgg[aggMethod]
+                                if bVerbose:
+                                    PrintMsg(" \nOuputValues: " + str(outputValues), 1)
 
+                            else:
+                                if bVerbose:
+                                    PrintMsg(" \n2. aggMethod = " + aggMethod + " and no domainValues", 1)
 
-        if dSDV["horzlevelattribflag"] == 1:
-            if (sdvAtt in ["Surface Texture"] or sdvAtt.endswith("(Surface)")) and not (top == 0 and bot == 1):
-                outputLayer = outputLayer + " at " + str(top)  + "cm"
+                                outputTbl, outputValues = AggregateCo_DCD(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, bZero)
 
-            else:
-                outputLayer = outputLayer + ", " + str(top) + " to " + str(bot) + "cm"
+                        elif aggMethod == "Minimum or Maximum":
+                            #
+                            outputTbl, outputValues = AggregateCo_MaxMin(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, bZero)
 
-            tf = "HZDEPT_R"
-            bf = "HZDEPB_R"
+                        elif aggMethod == "Weighted Average" and dSDV["attributetype"].lower() == "property":
+                            # Using NCCPI for any numeric component level value?
+                            # This doesn't seem to be working for Range Prod 2016-01-28
+                            #
+                            outputTbl, outputValues = AggregateCo_WTA(gdb, sdvAtt, dSDV["attributecolumnname"].upper(),  initialTbl, bNulls, cutOff, tieBreaker, bZero)
 
-            if (bot - top) == 1:
-                hzQuery = "((" + tf + " = " + str(top) + " or " + bf + " = " + str(bot) + ") or ( " + tf + " <= " + str(top) + " and " + bf + " >= " + str(bot) + " ) )"
+                        elif aggMethod == "Percent Present":
+                            # This is Hydric?
+                            outputTbl, outputValues = AggregateCo_PP_SUM(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)
 
-            else:
-                #rng = str(tuple(range(top, (bot + 1))))
-                rng = str(tuple(range(top, bot)))
-                hzQuery = "((" + tf + " in " + rng + " or " + bf + " in " + rng + ") or ( " + tf + " <= " + str(top) + " and " + bf + " >= " + str(bot) + " ) )"
+                        else:
+                            # Don't know what kind of interp this is
+                            raise MyError, "5. Component aggregation method has not yet been developed ruledesign 3 (" + dSDV["algorithmname"] + ", " + dSDV["horzaggmeth"] + ")"
 
 
-        elif dSDV["cmonthlevelattribflag"] == 1:
-            outputLayer = outputLayer + ", " + str(begMo) + " - " + str(endMo)
+                    elif dSDV["cmonthlevelattribflag"] == 1:
+                        #
+                        # These are Component-Month Level Soil Properties
+                        #
+                        if dSDV["resultcolumnname"].startswith("Dep2WatTbl"):
+                            #PrintMsg(" \nThis is Depth to Water Table (" + dSDV["resultcolumnname"] + ")", 1)
 
+                            if aggMethod == "Dominant Component":
+                                outputTbl, outputValues = AggregateCo_DCP_DTWT(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)
 
-        elif secCst != "":
-            #PrintMsg(" \nAdding primary and secondary constraint to layer name (" + primCst + " " + secCst + ")", 1)
-            outputLayer = outputLayer + ", " + primCst + ", " + secCst
+                            elif aggMethod == "Dominant Condition":
+                                outputTbl, outputValues = AggregateCo_Mo_DCD(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)
+                                #raise MyError, "EARLY OUT"
 
-        elif primCst != "":
-            #PrintMsg(" \nAdding primaryconstraint to layer name (" + primCst + ")", 1)
-            outputLayer = outputLayer + ", " + primCst
+                            elif aggMethod == "Weighted Average":
+                                outputTbl, outputValues = AggregateCo_WTA_DTWT(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, bZero)
 
-        # Remove any forward slashes from outputLayer name
-        outputLayer = outputLayer.replace("/", "-")
+                            else:
+                                # Component-Month such as depth to water table - Minimum or Maximum
+                                outputTbl, outputValues = AggregateCo_Mo_MaxMin(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)
+                                #raise MyError, "5. Component-comonth aggregation method has not yet been developed "
 
+                        else:
+                            # This will be flooding or ponding frequency. In theory these should be the same value
+                            # for each month because these are normally annual ratings
+                            #
+                            # PrintMsg(" \nThis is Flooding or Ponding (" + dSDV["resultcolumnname"] + ")", 1 )
+                            #
+                            if aggMethod == "Dominant Component":
+                                # Problem with this aggregation method (AggregateCo_DCP). The CompPct sum is 12X because of the months.
+                                outputTbl, outputValues = AggregateCo_Mo_DCP_Domain(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)
 
-        # Print status
-        # Need to modify message when type is Interp and bFuzzy is True
-        #
-        if __name__ == "__main__":
-            if aggMethod == "Minimum or Maximum":
-                if tieBreaker == dSDV["tiebreakhighlabel"]:
-                    PrintMsg(" \nCreating map of '" + outputLayer + "' using " + os.path.basename(gdb), 0)
+                            elif aggMethod == "Dominant Condition":
+                                # Problem with this aggregation method (AggregateCo_DCP_Domain). The CompPct sum is 12X because of the months.
+                                outputTbl, outputValues = AggregateCo_Mo_DCD_Domain(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker) # Orig
+                                #PrintMsg(" \noutputValues: " + ", ".join(outputValues), 1)
 
-                else:
-                    PrintMsg(" \nCreating map of '" + outputLayer + "' using " + os.path.basename(gdb), 0)
+                            elif aggMethod == "Minimum or Maximum":
+                                outputTbl, outputValues = AggregateCo_Mo_MaxMin(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)
 
-            elif dSDV["attributetype"].lower() == "interpretation" and bFuzzy == True:
-                PrintMsg(" \nCreating map for '" + outputLayer + "' using " + os.path.basename(gdb), 0)
+                            elif aggMethod == "Weighted Average":
+                              outputTbl, outputValues = AggregateCo_Mo_WTA(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)
 
-            else:
-                PrintMsg(" \nCreating map of '" + outputLayer + "' using " + os.path.basename(gdb), 0)
+                            else:
+                                raise MyError, "Aggregation method: " + aggMethod + "; attibute " + dSDV["attributecolumnname"].upper()
 
-        # Check to see if the layer already exists and delete if necessary
-        layers = arcpy.mapping.ListLayers(mxd, outputLayer, df)
+                    else:
+                        raise MyError, "Attribute level flag problem"
 
-        if len(layers) == 1:
-            arcpy.mapping.RemoveLayer(df, layers[0])
+                elif dSDV["horzlevelattribflag"] == 1:
+                    # These are all Horizon Level Soil Properties
 
-        # Create list of tables in the ArcMap TOC. Later check to see if a table
-        # involved in queries needs to be removed from the TOC.
-        tableViews = arcpy.mapping.ListTableViews(mxd, "*", df)
-        mainTables = ['mapunit', 'component', 'chorizon']
+                    if sdvAtt.startswith("K Factor"):
+                        # Need to figure out aggregation method for horizon level  max-min
+                        if aggMethod == "Dominant Condition":
+                            outputTbl, outputValues = AggregateHz_MaxMin_DCD(gdb, sdvAtt, dSDV["attributecolumnname"].upper(),  initialTbl, bNulls, cutOff, tieBreaker, top, bot, bZero)
 
-        for tv in tableViews:
-            if tv.datasetName.lower() in mainTables:
-                # Remove this table view from ArcMap that might cause a conflict with queries
-                arcpy.mapping.RemoveTableView(df, tv)
+                        elif aggMethod == "Dominant Component":
+                            outputTbl, outputValues = AggregateHz_MaxMin_DCP(gdb, sdvAtt, dSDV["attributecolumnname"].upper(),  initialTbl, bNulls, cutOff, tieBreaker, top, bot, bZero)
 
-        tableViews = arcpy.mapping.ListTableViews(mxd, "*", df)   # any other table views...
-        rtabphyname = "XXXXX"
-        mdSQL = "RTABPHYNAME = '" + dSDV["attributetablename"].lower() + "'"  # initial whereclause for mdstatrshipdet
+                    elif aggMethod == "Weighted Average":
+                        # component aggregation is weighted average
 
-        # Setup initial queries
-        while rtabphyname != "MAPUNIT":
-            level += 1
+                        if dSDV["attributelogicaldatatype"].lower() in ["integer", "float"]:
+                            # Just making sure that these are numeric values, not indexes
+                            if dSDV["horzaggmeth"] == "Weighted Average":
+                                # Use weighted average for horizon data (works for AWC)
+                                outputTbl, outputValues = AggregateHz_WTA_WTA(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, top, bot, bZero)
 
-            with arcpy.da.SearchCursor(mdTable, mdFlds, where_clause=mdSQL) as cur:
-                # This should only select one record
+                            elif dSDV["horzaggmeth"] == "Weighted Sum":
+                                # Calculate sum for horizon data (egs. AWS)
+                                outputTbl, outputValues = AggregateHz_WTA_SUM(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, top, bot, bZero)
 
-                for rec in cur:
-                    ltabphyname = rec[0].upper()
-                    rtabphyname = rec[1].upper()
-                    ltabcolphyname = rec[2].upper()
-                    rtabcolphyname = rec[3].upper()
-                    mdSQL = "RTABPHYNAME = '" + ltabphyname.lower() + "'"
+                        else:
+                            raise MyError, "12. Weighted Average not appropriate for " + dataType
 
-                    if bVerbose:
-                        PrintMsg("\tGetting level " + str(level) + " information for " + rtabphyname.upper(), 1)
+                    elif aggMethod == "Dominant Component":
+                        # Need to find or build this function
 
-                    if not rtabphyname in tblList:
-                        tblList.append(rtabphyname) # save list of tables involved
+                        if sdvAtt.startswith("Surface") or sdvAtt.endswith("(Surface)"):
+                            #
+                            # I just added this on Monday to fix problem with Surface Texture DCP
+                            # Need to test
+                            outputTbl, outputValues = AggregateCo_DCP(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, bZero)
 
-                    for tv in tableViews:
-                        if tv.datasetName.lower() == rtabphyname.lower():
-                            # Remove this table view from ArcMap that might cause a conflict with queries
-                            arcpy.mapping.RemoveTableView(df, tv)
+                        elif dSDV["effectivelogicaldatatype"].lower() == "choice":
+                            # Indexed value such as kFactor, cannot use weighted average
+                            # for horizon properties.
+                            outputTbl, outputValues = AggregateCo_DCP(gdb, sdvAtt,dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, bZero)
 
-                    if rtabphyname.upper() == dSDV["attributetablename"].upper():
-                        #
-                        # This is the table that contains the rating values
-                        #
-                        # check for primary and secondary restraints
-                        # and use a query to apply them if found.
+                        elif dSDV["horzaggmeth"] == "Weighted Average":
+                            #PrintMsg(" \nHorizon aggregation method = WTA and attributelogical datatype = " + dSDV["attributelogicaldatatype"].lower(), 1)
+                            outputTbl, outputValues = AggregateHz_DCP_WTA(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, top, bot, bZero)
 
-                        # Begin setting up SQL statement for initial filter
-                        # This may be changed further down
-                        #
-                        primSQL = None
+                        else:
+                            raise MyError, "9. Aggregation method has not yet been developed (" + dSDV["algorithmname"] + ", " + dSDV["horzaggmeth"] + ")"
 
-                        if dSDV["attributelogicaldatatype"].lower() in ['integer', 'float']:
-                            #
-                            if not dSDV["sqlwhereclause"] is None:
-                                primSQL = dSDV["sqlwhereclause"]
+                    elif aggMethod == "Dominant Condition":
+
+                        if sdvAtt.startswith("Surface") or sdvAtt.endswith("(Surface)"):
+                            if dSDV["effectivelogicaldatatype"].lower() == "choice":
+                                if bVerbose:
+                                    PrintMsg(" \nDominant condition for surface-level attribute", 1)
+                                outputTbl, outputValues = AggregateCo_DCD_Domain(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)
 
                             else:
-                                primSQL = None
+                                outputTbl, outputValues = AggregateCo_DCD(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, bZero)
 
 
-                        if not primaryconcolname is None:
-                            # has primary constraint, get primary constraint value
-                            if primSQL is None:
-                                primSQL = primaryconcolname + " = '" + primCst + "'"
+                        elif dSDV["effectivelogicaldatatype"].lower() in ("float", "integer"):
+                            # Dominant condition for a horizon level numeric value is probably not a good idea
+                            outputTbl, outputValues = AggregateCo_DCD(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, bZero)
 
-                            else:
-                                primSQL = primSQL + " and " + primaryconcolname + " = '" + primCst + "'"
+                        elif dSDV["effectivelogicaldatatype"].lower() == "choice" and dSDV["tiebreakdomainname"] is not None:
+                            # KFactor (Indexed values)
+                            #if bVerbose:
+                            #PrintMsg(" \nDominant condition for choice type", 1)
+                            outputTbl, outputValues = AggregateCo_DCD_Domain(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)
 
-                            if not secondaryconcolname is None:
-                                # has primary constraint, get primary constraint value
-                                secSQL = secondaryconcolname + " = '" + secCst + "'"
-                                primSQL = primSQL + " and " + secSQL
-                                #PrintMsg(" \nprimSQL = " + primSQL, 0)
+                        else:
+                            raise MyError, "No aggregation calculation selected for DCD"
+
+                    elif aggMethod == "Minimum or Maximum":
+                        # Need to figure out aggregation method for horizon level  max-min
+                        if dSDV["effectivelogicaldatatype"].lower() == "choice":
+                            # PrintMsg("\tRunning AggregateCo_MaxMin for " + sdvAtt, 1)
+                            outputTbl, outputValues = AggregateCo_MaxMin(gdb, sdvAtt, dSDV["attributecolumnname"].upper(),  initialTbl, bNulls, cutOff, tieBreaker, bZero)
+
+                        else:  # These should be numeric, probably need to test here.
+                            outputTbl, outputValues = AggregateHz_MaxMin_WTA(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, top, bot, bZero)
 
-                        if dSDV["attributetablename"].upper() == "COINTERP":
+                    else:
+                        raise MyError, "'" + aggMethod + "' aggregation method for " + sdvAtt + " has not been developed"
 
-                            # New code using rulekey and distinterpmd table
-                            distinterpTbl = os.path.join(gdb, "distinterpmd")
-                            ruleKey = GetRuleKey(distinterpTbl, dSDV["nasisrulename"])
+                else:
+                    raise MyError, "Horizon-level '" + aggMethod + "' aggregation method for " + sdvAtt + " has not been developed"
 
-                            if ruleKey == None:
-                                raise MyError, "Interp query failed to return key values for " + dSDV["nasisrulename"]
+            else:
+                # Should never hit this
+                raise MyError, "Unable to handle assigned aggregation method (" + aggMethod + ") for " + sdvAtt
 
-                            # Time for CONUS using different indexes and queries
-                            # ruledepth and mrulename 9:53 min
-                            # rulekey 4:09 min
-                            # ruledepth and mrulekey: 4:03 min
-                            #
-                            #interpSQL = "MRULENAME like '%" + dSDV["nasisrulename"] + "' and RULEDEPTH = 0"  # 9:53
-                            #interpSQL = "RULEDEPTH = 0 AND MRULEKEY = '" + ruleKey + "'"                      # 4:09
-                            interpSQL = "RULEKEY IN " + ruleKey                                        # 4:03
+        elif dSDV["attributetype"].lower() == "interpretation":
 
-                            if primSQL is None:
-                                primSQL = interpSQL
-                                #primSQL = "MRULENAME like '%" + dSDV["nasisrulename"] + "' and RULEDEPTH = 0"
+            #PrintMsg(" \nDo I need to populate interp rating class values here, before aggregation?", 1)
+            #PrintMsg(" \ndomainValues:" + str(domainValues), 1)
 
-                            else:
-                                #primSQL = primSQL + " and MRULENAME like '%" + dSDV["nasisrulename"] + "' and RULEDEPTH = 0"
-                                primSQL = interpSQL + " AND " + primSQL
+            if len(domainValues) == 0 and "label" in dLegend:
+                # create fake domain using map legend labels and hope they are correct
+                labelValues = dLegend["labels"]
 
-                            # Try populating the cokeyList variable here and use it later in ReadTable
-                            cokeyList = list()
+                for i in range(1, (len(labelValues) + 1)):
+                    domainValues.append(labelValues[i])
 
-                        elif dSDV["attributetablename"].upper() == "CHORIZON":
-                            if primSQL is None:
-                                primSQL = hzQuery
 
-                            else:
-                                primSQL = primSQL + " and " + hzQuery
+            if not 'Not rated' in domainValues and len(domainValues) > 0:
+                # These are all Soil Interpretations
+                domainValues.insert(0, "Not rated")
 
-                        elif dSDV["attributetablename"].upper() == "CHUNIFIED":
-                            if not primSQL is None:
-                                primSQL = primSQL + " and RVINDICATOR = 'Yes'"
 
-                            else:
-                                primSQL = "RVINDICATOR = 'Yes'"
+            if dSDV["ruledesign"] == 1:
+                #
+                # This is a Soil Interpretation for Limitations or Risk
 
-                        elif dSDV["attributetablename"].upper() == "COMONTH":
-                            if primSQL is None:
-                                if begMo == endMo:
-                                    # query for single month
-                                    primSQL = "(MONTHSEQ = " + str(moList.index(begMo)) + ")"
+                if aggMethod == "Dominant Component":
+                    outputTbl, outputValues = AggregateCo_DCP(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, bZero)
 
-                                else:
-                                    primSQL = "(MONTHSEQ IN " + str(tuple(range(moList.index(begMo), (moList.index(endMo) + 1 )))) + ")"
+                elif aggMethod == "Dominant Condition":
+                    #PrintMsg(" \nInterpretation; aggMethod = " + aggMethod, 1)
+                    outputTbl, outputValues = AggregateCo_DCD_Domain(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)
 
-                            else:
-                                if begMo == endMo:
-                                    # query for single month
-                                    primSQL = primSQL + " AND (MONTHSEQ = " + str(moList.index(begMo)) + ")"
+                elif aggMethod in ['Least Limiting', 'Most Limiting']:
+                    outputTbl, outputValues = AggregateCo_Limiting(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)
 
-                                else:
-                                    primSQL = primSQL + " AND (MONTHSEQ IN " + str(tuple(range(moList.index(begMo), (moList.index(endMo) + 1 )))) + ")"
+                elif aggMethod == "Weighted Average":
+                    # This is an interp that has been set to use fuzzy values
+                    outputTbl, outputValues = AggregateCo_WTA(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, bZero)
+                    outputValues = [0.0, 1.0]
 
-                        elif dSDV["attributetablename"].upper() == "COSOILMOIST":
-                            # Having problems with NULL values for some months. Need to retain NULL values with query,
-                            # but then substitute 201cm in ReadTable
-                            #
-                            primSQL = dSDV["sqlwhereclause"]
+                else:
+                    # Don't know what kind of interp this is
+                    #PrintMsg(" \nmapunitlevelattribflag: " + str(dSDV["mapunitlevelattribflag"]) + ", complevelattribflag: " + str(dSDV["complevelattribflag"]) + ", cmonthlevelattribflag: " + str(dSDV["cmonthlevelattribflag"]) + ", horzlevelattribflag: " + str(dSDV["horzlevelattribflag"]) + ", effectivelogicaldatatype: " + dSDV["effectivelogicaldatatype"], 1)
+                    #PrintMsg(aggMethod + "; " + dSDV["effectivelogicaldatatype"], 1)
+                    raise MyError, "5. Aggregation method has not yet been developed (" + dSDV["algorithmname"] + ", " + dSDV["horzaggmeth"] + ")"
 
+            elif dSDV["ruledesign"] == 2:
+                # This is a Soil Interpretation for Suitability
 
-                        if primSQL is None:
-                            primSQL = ""
+                if aggMethod == "Dominant Component":
+                    outputTbl, outputValues = AggregateCo_DCP(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, bZero)
 
-                        if bVerbose:
-                            PrintMsg("\tRating table (" + rtabphyname.upper() + ") SQL: " + primSQL, 1)
+                elif aggMethod == "Dominant Condition":
+                    outputTbl, outputValues = AggregateCo_DCD_Domain(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)  # changed this for Sand Suitability
 
-                        # Create list of necessary fields
+                elif bFuzzy or (aggMethod == "Weighted Average" and dSDV["effectivelogicaldatatype"].lower() == 'float'):
+                    # This is NCCPI
+                    #PrintMsg(" \nA Aggregate2_NCCPI", 1)
+                    #outputTbl, outputValues = Aggregate2_NCCPI(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)
+                    # PrintMsg(" \nNCCPI 3", 1)
+                    outputTbl, outputValues = AggregateCo_WTA(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, bZero)
+                    outputValues = [0.0, 1.0]
 
-                        # Get field list for mapunit or component or chorizon
-                        if rtabphyname in big3Tbls:
-                            flds = dFields[rtabphyname]
-                            if not dSDV["attributecolumnname"].upper() in flds:
-                                flds.append(dSDV["attributecolumnname"].upper())
+                elif aggMethod in ['Least Limiting', 'Most Limiting']:
+                    # Least Limiting or Most Limiting Interp
+                    outputTbl, outputValues = AggregateCo_Limiting(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)
 
-                            dFields[rtabphyname] = flds
-                            dMissing[rtabphyname] = [None] * (len(dFields[rtabphyname]) - 1)
+                else:
+                    # Don't know what kind of interp this is
+                    # Friday problem here for NCCPI
+                    #PrintMsg(" \n" + str(dSDV["mapunitlevelattribflag"]) + ", " + str(dSDV["complevelattribflag"]) + ", " + str(dSDV["cmonthlevelattribflag"]) + ", " + str(dSDV["horzlevelattribflag"]) + " -NA2", 1)
+                    #PrintMsg(aggMethod + "; " + dSDV["effectivelogicaldatatype"], 1)
+                    raise MyError, "5. Aggregation method has not yet been developed (" + dSDV["algorithmname"] + ", " + dSDV["horzaggmeth"] + ")"
 
-                        else:
-                            # Not one of the big 3 tables, just use foreign key and sdvattribute column
-                            flds = [rtabcolphyname, dSDV["attributecolumnname"].upper()]
-                            dFields[rtabphyname] = flds
 
-                            if not rtabphyname in dMissing:
-                                dMissing[rtabphyname] = [None] * (len(dFields[rtabphyname]) - 1)
-                                #PrintMsg("\nSetting missing fields for " + rtabphyname + " to " + str(dMissing[rtabphyname]), 1)
+            elif dSDV["ruledesign"] == 3:
+                # This is a Soil Interpretation for Class. Only a very few interps in the nation use this.
+                # Such as MO- Pasture hayland; MT-Conservation Tree Shrub Groups; CA- Revised Storie Index
 
-                        try:
-                            sql = dSQL[rtabphyname]
+                if aggMethod == "Dominant Component":
+                    outputTbl, outputValues = AggregateCo_DCP(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, bZero)
 
-                        except:
-                            # For tables other than the primary ones.
-                            sql = (None, None)
+                elif aggMethod == "Dominant Condition":
+                    outputTbl, outputValues = AggregateCo_DCD(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, bZero)
 
-                        if rtabphyname == "MAPUNIT" and aggMethod != "No Aggregation Necessary":
-                            # No aggregation necessary?
-                            PrintMsg(" \n" + sdvAtt + " aggregation method set to: " + aggMethod, 1)
-                            
-                            dMapunit = ReadTable(rtabphyname, flds, primSQL, level, sql)
+                elif aggMethod in ['Least Limiting', 'Most Limiting']:
+                    #PrintMsg(" \nNot sure about aggregation method for ruledesign = 3", 1)
+                    # Least Limiting or Most Limiting Interp
+                    outputTbl, outputValues = AggregateCo_Limiting(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)
 
-                        elif rtabphyname == "MUTEXT" and aggMethod == "No Aggregation Necessary":
-                            # No aggregation necessary?
-                            #dMapunit = ReadTable(rtabphyname, flds, primSQL, level, sql)
-                            primSQL = dSDV["sqlwhereclause"]
-                            dTbl = ReadTable(rtabphyname, flds, primSQL, level, sql)
+                else:
+                    # Don't know what kind of interp this is
+                    PrintMsg(" \nRuledesign 3: " + str(dSDV["mapunitlevelattribflag"]) + ", " + str(dSDV["complevelattribflag"]) + ", " + str(dSDV["cmonthlevelattribflag"]) + ", " + str(dSDV["horzlevelattribflag"]) + " -NA2", 1)
+                    PrintMsg(aggMethod + "; " + dSDV["effectivelogicaldatatype"], 1)
+                    raise MyError, "5. Interp aggregation method has not yet been developed ruledesign 3 (" + dSDV["algorithmname"] + ", " + dSDV["horzaggmeth"] + ")"
 
-                        elif rtabphyname == "COMPONENT":
-                            #if cutOff is not None:
-                            if dSDV["sqlwhereclause"] is not None:
-                                if cutOff == 0:
-                                    # Having problems with CONUS database. Including COMPPCT_R in the
-                                    # where_clause is returning zero records. Found while testing Hydric map. Is a Bug?
-                                    # Work around is to put COMPPCT_R part of query last in the string
 
-                                    primSQL =  dSDV["sqlwhereclause"] + " AND COMPNAME <> 'NOTCOM'"
+            elif dSDV["ruledesign"] is None:
+                # This is a Soil Interpretation???
+                raise MyError, "Soil Interp with no RuleDesign setting"
 
-                                else:
-                                    primSQL = dSDV["sqlwhereclause"] + ' AND "COMPPCT_R" >= ' + str(cutOff)  + " AND COMPNAME <> 'NOTCOM'"
+            else:
+                raise MyError, "No aggregation calculation selected 10"
 
-                            else:
-                                primSQL = "COMPPCT_R >= " + str(cutOff)  + " AND COMPNAME <> 'NOTCOM'"
+        else:
+            raise MyError, "Invalid SDV AttributeType: " + str(dSDV["attributetype"])
 
+        return outputTbl, outputValues
 
-                            #PrintMsg(" \nPopulating dictionary from component table", 1)
+    except MyError, e:
+        PrintMsg(str(e), 2)
+        return "", []
 
-                            dComponent = ReadTable(rtabphyname, flds, primSQL, level, sql)
+    except:
+        errorMsg()
+        return None, []
 
-                            if len(dComponent) == 0:
-                                raise MyError, "No component data for " + sdvAtt
+## ===================================================================================
+def UpdateSDVTable(cachedTable, inputLayer, sdvAtt, aggMethod, primCst, secCst, top, bot, begMo, endMo, tieBreaker, bZero, cutOff, bFuzzy, bNulls, hzQuery, tableViews):
+    # Bring a cached rating table up to date (gSSURGO_ResultCache.FindChanged). The map units in the
+    # changed survey areas are rated into a table in the scratch geodatabase and replace the records
+    # for those survey areas. Records for survey areas removed from the database are deleted.
+    # Returns [outputTbl, outputValues] or None if the table has to be made again.
+    global incrementalAreas, sdvGDB
 
-                        elif rtabphyname == "CHORIZON":
-                            #primSQL = "(CHORIZON.HZDEPT_R between " + str(top) + " and " + str(bot) + " or CHORIZON.HZDEPB_R between " + str(top) + " and " + str(bot + 1) + ")"
-                            #PrintMsg(" \nCHORIZON hzQuery: " + hzQuery, 1)
-                            dHorizon = ReadTable(rtabphyname, flds, hzQuery, level, sql)
+    outputTbl, cachedValues, changedAreas, removedAreas = cachedTable
+    partTbl = None
 
-                            if len(dHorizon) == 0:
-                                raise MyError, "No horizon data for " + sdvAtt
+    try:
+        if len(changedAreas) > 0:
+            saveGDB = sdvGDB
+            incrementalAreas = changedAreas
+            sdvGDB = env.scratchGDB
 
-                        else:
-                            # This should be the bottom-level table containing the requested data
-                            #
-                            cokeyList = list()  # Try using this to pare down the COINTERP table record count
-                            #cokeyList = dComponent.keys()  # Won't work. dComponent isn't populated yet
+            try:
+                partTbl, partValues = CreateSDVTable(inputLayer, sdvAtt, aggMethod, primCst, secCst, top, bot, begMo, endMo, tieBreaker, bZero, cutOff, bFuzzy, bNulls, hzQuery, tableViews)
 
-                            #PrintMsg(" \nReading " + dSDV["attributetablename"] + " table, using " + ", ".join(flds), 1)
-                            #PrintMsg("Using primSQL: " + str(primSQL) + ";  " + " sql: " + str(sql), 1)
+            finally:
+                incrementalAreas = None
+                sdvGDB = saveGDB
 
-                            dTbl = ReadTable(dSDV["attributetablename"].upper(), flds, primSQL, level, sql)
+            if partTbl is None:
+                # CreateSDVTable failed and has already reported the error
+                return None
 
-                            #if len(dTbl) == 0:
-                            #    raise MyError, "No test2 " + dSDV["attributetablename"] + " data for " + sdvAtt
+        ratingField = dSDV["resultcolumnname"].upper()
+        dFields = dict([(fld.name.upper(), fld) for fld in arcpy.ListFields(outputTbl)])
 
-                    else:
-                        # Bottom section
-                        #
-                        # This is one of the intermediate tables
-                        # Create list of necessary fields
-                        # Get field list for mapunit or component or chorizon
-                        #
-                        flds = dFields[rtabphyname]
-                        try:
-                            sql = dSQL[rtabphyname]
+        if not ratingField in dFields or not "AREASYMBOL" in dFields:
+            return None
 
-                        except:
-                            # This needs to be fixed. I have a whereclause in the try and an sqlclause in the except.
-                            sql = (None, None)
+        bNumeric = dFields[ratingField].type in ["Double", "Single", "Integer", "SmallInteger"]
+        areaSet = set(changedAreas) | set(removedAreas)
+        oldValues = set()
+        newValues = set()
+        delCnt = 0
 
-                        primSQL = ""
-                        #PrintMsg(" \n\tReading intermediate table: " + rtabphyname + "   sql: " + str(sql), 1)
+        with arcpy.da.UpdateCursor(outputTbl, ["AREASYMBOL", ratingField]) as cur:
+            for areasym, rating in cur:
+                if not rating is None:
+                    oldValues.add(rating)
 
-                        if rtabphyname == "MAPUNIT":
-                            dMapunit = ReadTable(rtabphyname, flds, primSQL, level, sql)
+                if areasym in areaSet:
+                    cur.deleteRow()
+                    delCnt += 1
 
-                        elif rtabphyname == "COMPONENT":
-                            primSQL = "COMPPCT_R >= " + str(cutOff)
+                elif not rating is None:
+                    newValues.add(rating)
 
-                            #PrintMsg(" \nPopulating dictionary from component table", 1)
+        addCnt = 0
 
-                            dComponent = ReadTable(rtabphyname, flds, primSQL, level, sql)
+        if partTbl and arcpy.Exists(partTbl):
+            # Copy the new ratings using the fields the two tables have in common
+            partFields = [fld.name.upper() for fld in arcpy.ListFields(partTbl) if fld.type != "OID"]
+            flds = [fld for fld in partFields if fld in dFields and dFields[fld].type != "OID"]
+            iRating = flds.index(ratingField)
 
-                        elif rtabphyname == "CHORIZON":
-                            #primSQL = "(CHORIZON.HZDEPT_R between " + str(top) + " and " + str(bot) + " or CHORIZON.HZDEPB_R between " + str(top) + " and " + str(bot + 1) + ")"
-                            tf = "HZDEPT_R"
-                            bf = "HZDEPB_R"
-                            #primSQL = "( ( " + tf + " between " + str(top) + " and " + str(bot - 1) + " or " + bf + " between " + str(top) + " and " + str(bot) + " ) or " + \
-                            #"( " + tf + " <= " + str(top) + " and " + bf + " >= " + str(bot) + " ) )"
-                            if (bot - top) == 1:
-                                #rng = str(tuple(range(top, (bot + 1))))
-                                hzQuery = "((" + tf + " = " + str(top) + " or " + bf + " = " + str(bot) + ") or ( " + tf + " <= " + str(top) + " and " + bf + " >= " + str(bot) + " ) )"
+            with arcpy.da.SearchCursor(partTbl, flds) as cur:
+                with arcpy.da.InsertCursor(outputTbl, flds) as ocur:
+                    for rec in cur:
+                        ocur.insertRow(rec)
+                        addCnt += 1
 
-                            else:
-                                rng = str(tuple(range(top, bot)))
-                                hzQuery = "((" + tf + " in " + rng + " or " + bf + " in " + rng + ") or ( " + tf + " <= " + str(top) + " and " + bf + " >= " + str(bot) + " ) )"
+                        if not rec[iRating] is None:
+                            newValues.add(rec[iRating])
 
-                            #PrintMsg(" \nSetting primSQL for when rtabphyname = 'CHORIZON' to: " + hzQuery, 1)
-                            dHorizon = ReadTable(rtabphyname, flds, hzQuery, level, sql)
+            arcpy.Delete_management(partTbl)
 
-                        elif rtabphyname == "COMONTH":
+        if bVerbose:
+            PrintMsg("\tRemoved " + Number_Format(delCnt, 0, True) + " and added " + Number_Format(addCnt, 0, True) + " rating records", 1)
 
-                            # Need to look at the SQL for the other tables as well...
-                            if begMo == endMo:
-                                # query for single month
-                                primSQL = "(MONTHSEQ = " + str(moList.index(begMo)) + ")"
+        outputValues = gSSURGO_ResultCache.MergeValues(cachedValues, oldValues, newValues, bNumeric)
 
-                            else:
-                                primSQL = "(MONTHSEQ IN " + str(tuple(range(moList.index(begMo), (moList.index(endMo) + 1 )))) + ")"
+        return [outputTbl, outputValues]
 
-                            #PrintMsg(" \nIntermediate SQL: " + primSQL, 1)
-                            dMonth = ReadTable(rtabphyname, flds, primSQL, level, sql)
+    except MyError, e:
+        PrintMsg(str(e), 2)
+        return None
 
-                            if len(dMonth) == 0:
-                                raise MyError, "No comonth data for " + sdvAtt + " \n "
-                            #else:
-                            #    PrintMsg(" \nFound " + str(len(dMonth)) + " records in COMONTH", 1)
+    except:
+        errorMsg()
+        return None
+
+## ===================================================================================
+def CreateSoilMap(inputLayer, sdvAtt, aggMethod, primCst, secCst, top, bot, begMo, endMo, tieBreaker, bZero, cutOff, bFuzzy, bNulls, sRV):
+    #
+    # function that can be called by other scripts
+    #
+    try:
+         # not sure why this isn't being imported at the beginning
+        global bVerbose
 
-                        else:
-                            PrintMsg(" \n\tUnable to read data from: " + rtabphyname, 1)
+        bVerbose = False   # hard-coded boolean to print diagnostic messages
+        #bVerbose = True
 
+        # Parameters as passed in, before any defaults are applied. Used for the rating table cache.
+        cacheParams = [sdvAtt, aggMethod, primCst, secCst, top, bot, begMo, endMo, tieBreaker, bZero, cutOff, bFuzzy, bNulls, sRV]
 
-            if level > 6:
-                raise MyError, "Failed to get table relationships"
+        # Check the ArcGIS Desktop version number
+        installInfo = arcpy.GetInstallInfo()
+        version = installInfo["Version"][0:4]
 
+        import datetime
 
-        # Create a list of all fields needed for the initial output table. This
-        # one will include primary keys that won't be in the final output table.
-        #
-        if len(tblList) == 0:
-            # No Aggregation Necessary, append field to mapunit list
-            tblList = ["MAPUNIT"]
+        if not version[0:4] in ["10.3", "10.4", "10.5", "10.6", "10.7", "10.8"]:
+            PrintMsg(" \nArcGIS Desktop version " + version + " does not support the map symbology functions in this tool", 1)
 
-            if dSDV["attributecolumnname"].upper() in dFields["MAPUNIT"]:
-                PrintMsg(" \nSkipping addition of field "  + dSDV["attributecolumnname"].upper(), 1)
+        # Get target gSSURGO database
+        global fc, gdb, muDesc, dataType
+        muDesc = arcpy.Describe(inputLayer)
+        fc = muDesc.catalogPath                         # full path for input mapunit polygon layer
+        gdb = os.path.dirname(fc)                       # need to expand to handle featuredatasets
+        dataType = muDesc.dataType.lower()
 
-            else:
-                dFields["MAPUNIT"].append(dSDV["attributecolumnname"].upper())
+        # Set current workspace to the geodatabase
+        env.workspace = gdb
+        env.overwriteOutput = True
 
-        tblList.reverse()  # Set order of the tables so that mapunit is on top
+        # get scratchGDB
+        scratchGDB = env.scratchGDB
 
-        if bVerbose:
-            PrintMsg(" \nUsing these tables: " + ", ".join(tblList), 1)
+        # Get dictionary of MUSYM values (optional function for use during development)
+        dSymbols = GetMapunitSymbols(gdb)
 
-        # Create a list of all fields to be used
-        global allFields
-        allFields = ["AREASYMBOL"]
-        allFields.extend(dFields["MAPUNIT"])  # always include the selected set of fields from mapunit table
-        #PrintMsg(" \nallFields 1: " + ", ".join(allFields), 1)
+        # Create list of months for use in some queries
+        moList = ListMonths()
 
-        # Substitute resultcolumname for last field in allFields
-        for tbl in tblList:
-            tFields = dFields[tbl]
-            for fld in tFields:
-                if not fld.upper() in allFields:
-                    #PrintMsg("\tAdding " + tbl + "." + fld.upper(), 1)
-                    allFields.append(fld.upper())
+        # Rating tables are written to the input database unless a batch worker has set sdvWorkspace
+        global sdvGDB
 
-        if not dSDV["attributecolumnname"].upper() in allFields:
-            allFields.append(dSDV["attributecolumnname"].upper())
+        if sdvWorkspace is None:
+            sdvGDB = gdb
 
-        #PrintMsg(" \nallFields 3: " + ", ".join(allFields), 1)
+        else:
+            sdvGDB = sdvWorkspace
 
-        # Create initial output table (one-to-many)
-        # Now created with resultcolumnname
+        # arcpy.mapping setup
         #
-        initialTbl = CreateInitialTable(gdb, allFields, dFieldInfo)
+        # Get map document object
+        global mxd, df
 
-        if initialTbl is None:
-            raise MyError, "Failed to create initial query table"
+        if not bTableOnly:
+            mxd = arcpy.mapping.MapDocument("CURRENT")
 
-        # Create dictionary for areasymbol
-        #PrintMsg(" \nGetting polygon count...", 1)
-        global polyCnt, fcCnt
-        polyCnt = int(arcpy.GetCount_management(inputLayer).getOutput(0))  # featurelayer polygon count
-        fcCnt = int(arcpy.GetCount_management(fc).getOutput(0))            # featureclass polygon count
-        #PrintMsg(" \nGot polygon count of " + Number_Format(polyCnt, 0, True), 1)
+            # Get active data frame object
+            df = mxd.activeDataFrame
 
-        # Getting Areasymbols and legendkeys is a bottleneck (Thursday Aug 18). Any room for improvement?
+        # Create a dictionary based upon domainValues or legendValues.
+        # This dictionary will use an uppercase-string version of the original value as the key
         #
-        #PrintMsg(" \nGetting areasymbols...", 1)
-        global dAreasymbols
-        dAreasymbols = GetAreasymbols(gdb)
-
-        if len(dAreasymbols) == 0:
-            raise MyError, "xxx dAreasymbols is not populated"
+        global dValues
+        dValues = dict()  # Try creating a new dictionary. Key is uppercase-string value. Value = [order, original value]
 
-        # Made changes in the table relates code that creates tblList. List now has MAPUNIT in first position
+        # Dictionary for aggregation method abbreviations
         #
+        global dAgg
+        dAgg = dict()
+        dAgg["Dominant Component"] = "DCP"
+        dAgg["Dominant Condition"] = "DCD"
+        dAgg["No Aggregation Necessary"] = ""
+        dAgg["Percent Present"] = "PP"
+        dAgg["Weighted Average"] = "WTA"
+        dAgg["Most Limiting"] = "ML"
+        dAgg["Least Limiting"] = "LL"
+        dAgg[""] = ""
 
-        if tblList == ['MAPUNIT']:
-            # No aggregation needed
-            if CreateRatingTable1(tblList, dSDV["attributetablename"].upper(), initialTbl, dAreasymbols) == False:
-                raise MyError, "xxx CreateRatingTable failed"
 
-        elif tblList == ['MAPUNIT', 'COMPONENT']:
-            if CreateRatingTable2(tblList, dSDV["attributetablename"].upper(), dComponent, initialTbl) == False:
-                raise MyError, "xxx CreateRatingTable failed"
-            del dComponent
+        # Open sdvattribute table and query for [attributename] = sdvAtt
+        # if aggMethod is not already set, get the default method from the sdvattribute table
+        global dSDV
 
-        elif tblList == ['MAPUNIT', 'COMPONENT', 'CHORIZON']:
-            if CreateRatingTable3(tblList, dSDV["attributetablename"].upper(), dComponent, dHorizon, initialTbl) == False:
-                raise MyError, "xxx CreateRatingTable failed"
-            del dComponent, dHorizon
+        dSDV = GetSDVAtts(gdb, sdvAtt, aggMethod, tieBreaker, bFuzzy, sRV)  # In batch mode, bFuzzy is set to False. This does not work for interps like NCCPI.
 
-        elif tblList == ['MAPUNIT', 'COMPONENT', 'CHORIZON', dSDV["attributetablename"].upper()]:
-            # COMPONENT, CHORIZON, CHTEXTUREGRP
-            if CreateRatingTable3S(tblList, dSDV["attributetablename"].upper(), dComponent, dHorizon, dTbl, initialTbl, sdvAtt) == False:
-                raise MyError, "xxx CreateRatingTable failed"
-            del dComponent, dHorizon
+        if aggMethod == "":
+            aggMethod = dSDV["algorithmname"]
 
-        elif tblList in [['MAPUNIT', "MUAGGATT"], ['MAPUNIT', "MUCROPYLD"], ['MAPUNIT', 'MUTEXT']]:
-            if CreateRatingTable1S(tblList, dSDV["attributetablename"].upper(), dTbl, initialTbl, dAreasymbols) == False:
-                raise MyError, "xxx CreateRatingTable failed"
+        if len(depthRanges) > 0 and not DepthRangeMethod(sdvAtt, aggMethod):
+            # CreateDepthRangeTable. This attribute needs one map for each depth range.
+            return 3
 
-        elif tblList == ['MAPUNIT', 'COMPONENT', dSDV["attributetablename"].upper()]:
-            if dSDV["attributetablename"].upper() == "COINTERP":
-                if CreateRatingInterps(tblList, dSDV["attributetablename"].upper(), dComponent, dTbl, initialTbl) == False:
-                    raise MyError, "xxx CreateRatingTable failed"
-                del dComponent
+        if len(monthWindows) > 0 and not MonthWindowMethod(sdvAtt, aggMethod):
+            # CreateMonthWindowTable. This attribute needs one map for each month window.
+            return 3
 
-            else:
-                if CreateRatingTable2S(tblList, dSDV["attributetablename"].upper(), dComponent, dTbl, initialTbl) == False:
-                    raise MyError, "xxx CreateRatingTable failed"
+        #PrintMsg(" \n\txxx Testing aggregation method: " + aggMethod, 1)
 
-        elif tblList == ['MAPUNIT', 'COMPONENT', 'COMONTH', 'COSOILMOIST']:
-            if dSDV["attributetablename"].upper() == "COSOILMOIST":
+        if dSDV["attributetype"].lower() == "interpretation" and dSDV["effectivelogicaldatatype"] == "float":
+            # For batch mode processing, override default bFuzzy setting to true. This applies to NCCPI interps.
+            bFuzzy == True
 
-                #PrintMsg(" \ndMissing values before CreateSoilMoistureTable: " + str(dMissing))
+        if tieBreaker == "":
+            if dSDV["tiebreakrule"] == -1:
+                tieBreaker = dSDV["tiebreaklowlabel"]
 
-                if CreateSoilMoistureTable(tblList, dSDV["attributetablename"].upper(), dComponent, dMonth, dTbl, initialTbl, begMo, endMo) == False:
-                    raise MyError, "xxx CreateRatingTable failed"
-                del dMonth, dComponent # trying to lower memory usage
+                if tieBreaker is None or tieBreaker == "":
+                    tieBreaker = "Lower"
 
             else:
-                PrintMsg(" \nCannot handle table:" + dSDV["attributetablename"].upper(), 1)
-                raise MyError, "Tables Bad Combo: " + str(tblList)
+                tieBreaker = dSDV["tiebreakhighlabel"]
 
-        else:
-            # Need to add ['COMPONENT', 'COMONTH', 'COSOILMOIST']
-            raise MyError, "Problem with list of input tables: " + str(tblList)
+                if tieBreaker is None:
+                    tieBreaker = "Higher"
 
-        # **************************************************************************
-        # Look at attribflags and apply the appropriate aggregation function
 
-        if not arcpy.Exists(initialTbl):
-            # Output table was not created. Exit program.
-            raise MyError, "xxx Failed to create output table"
+        # Set null replacement values according to SDV rules
+        global nullRating
 
-        #PrintMsg(" \ninitialTbl has " + arcpy.GetCount_management(initialTbl).getOutput(0) + " records", 1)
+        if not dSDV["nullratingreplacementvalue"] is None:
+            if dSDV["attributelogicaldatatype"].lower() == "integer":
+                nullRating = int(dSDV["nullratingreplacementvalue"])
 
-        if int(arcpy.GetCount_management(initialTbl).getOutput(0)) == 0:
-            #
-            raise MyError, "Failed to populate query table"
+            elif dSDV["attributelogicaldatatype"].lower() == "float":
+                nullRating = float(dSDV["nullratingreplacementvalue"])
 
-        # Proceed with aggregation if the intermediate table has data.
-        # Add result column to fields list
-        iFlds = len(allFields)
-        newField = dSDV["resultcolumnname"].upper()
+            elif dSDV["attributelogicaldatatype"].lower() in ["string", "choice"]:
+                nullRating = dSDV["nullratingreplacementvalue"]
 
-        #PrintMsg(" \nallFields: " + ", ".join(allFields), 1)
-        allFields[len(allFields) - 1] = newField
-        rmFields = ["MUSYM", "COMPNAME", "LKEY"]
+            else:
+                nullRating = None
 
-        for fld in rmFields:
-            if fld in allFields:
-                allFields.remove(fld)
+        else:
+            nullRating = None
 
-        if newField == "MUNAME":
-            allFields.remove("MUNAME")
+        if dSDV["interpnullsaszerooptionflag"]:
+            bZero = True
 
-        #PrintMsg(" \nallFields: " + ", ".join(allFields), 1)
+        # Temporary workaround for NCCPI. Switch from rating class to fuzzy number
+        # if dSDV["attributetype"].lower() == "interpretation" and (dSDV["nasisrulename"][0:5] == "NCCPI" or bFuzzy == True):
+        #    aggMethod = "Weighted Average"
 
-        # Create name for final output table that will be saved to the input gSSURGO database
-        #
-        global tblName
-        #PrintMsg("\taggMethod: '" + dAgg[aggMethod] + "'", 1)
+        if len(dSDV) == 0:
+            raise MyError, "dSDV is not populated"
 
-        if dAgg[aggMethod] == "":
-            # No aggregation method necessary
-            tblName = "SDV_" + dSDV["resultcolumnname"]
+        # 'Big' 3 tables
+        big3Tbls = ["MAPUNIT", "COMPONENT", "CHORIZON"]
 
-        else:
-            if secCst != "":
-                # Problem with primary and secondary constraint values. These can produce
-                # illegal table names
-                #
-                #tblName = "SDV_" + dSDV["resultcolumnname"] + "_" + dAgg[aggMethod] + "_" + primCst.replace(" ", "_") + "_" + secCst.replace(" ", "_")
-                tblName = "SDV_" + dSDV["resultcolumnname"] + "_" + primCst.replace(" ", "_") + "_" + secCst.replace(" ", "_")
+        #  Create a dictionary to define minimum field list for the tables being used
+        #
+        global dFields
+        dFields = dict()
+        dFields["MAPUNIT"] = ["MUKEY", "MUSYM", "MUNAME", "LKEY"]
+        dFields["COMPONENT"] = ["MUKEY", "COKEY", "COMPNAME", "COMPPCT_R"]
+        dFields["CHORIZON"] = ["COKEY", "CHKEY", "HZDEPT_R", "HZDEPB_R"]
+        dFields["COMONTH"] = ["COKEY", "COMONTHKEY", "MONTHSEQ"]
+        #dFields["COMONTH"] = ["COMONTHKEY", "MONTH"]
 
+        # Create dictionary containing substitute values for missing data
+        global dMissing
+        dMissing = dict()
+        dMissing[dSDV["attributetablename"].upper()] = [nullRating]  
+        dMissing["MAPUNIT"] = [None] * len(dFields["MAPUNIT"])
+        dMissing["COMPONENT"] = [None] * (len(dFields["COMPONENT"]) - 1)  # adjusted number down because of mukey
+        dMissing["CHORIZON"] = [None] * (len(dFields["CHORIZON"]) - 1)
+        dMissing["COMONTH"] = [None] * (len(dFields["COMONTH"]) - 1)
+        #dMissing["COSOILMOIST"] = [nullRating]
+              # This ends up setting NOTCOM to 'None' for Flooding Frequency. What can I do?
+        #PrintMsg(" \ndInitial dMissing values: " + str(dMissing), 0)
 
-            elif primCst != "":
-                #tblName = "SDV_" + dSDV["resultcolumnname"] + "_" + dAgg[aggMethod] + "_" + primCst.replace(" ", "_")
-                tblName = "SDV_" + dSDV["resultcolumnname"] + "_" + primCst.replace(" ", "_")
+        # Dictionary containing sql_clauses for the Big 3
+        #
+        global dSQL
+        dSQL = dict()
+        dSQL["MAPUNIT"] = (None, "ORDER BY MUKEY ASC")
+        dSQL["COMPONENT"] = (None, "ORDER BY MUKEY ASC, COMPPCT_R DESC")
+        dSQL["CHORIZON"] = (None, "ORDER BY COKEY ASC, HZDEPT_R ASC")
 
-            elif dSDV["horzlevelattribflag"]:
-                #tblName = "SDV_" + dSDV["resultcolumnname"] + "_" + dAgg[aggMethod] + "_" + str(top) + "to" + str(bot)
-                tblName = "SDV_" + dSDV["resultcolumnname"] + "_" + str(top) + "to" + str(bot)
+        # Get information about the SDV output result field
+        resultcolumn = dSDV["resultcolumnname"].upper()
 
+        primaryconcolname = dSDV["primaryconcolname"]
+        if primaryconcolname is not None:
+            primaryconcolname = primaryconcolname.upper()
 
-            else:
-                #tblName = "SDV_" + dSDV["resultcolumnname"]+ "_" + dAgg[aggMethod]
-                tblName = "SDV_" + dSDV["resultcolumnname"]
+        secondaryconcolname = dSDV["secondaryconcolname"]
+        if secondaryconcolname is not None:
+            secondaryconcolname = secondaryconcolname.upper()
 
-        tblName = arcpy.ValidateTableName(tblName, gdb)
+        # Create dictionary to contain key field definitions
+        # AddField_management (in_table, field_name, field_type, {field_precision}, {field_scale}, {field_length}, {field_alias}, {field_is_nullable}, {field_is_required}, {field_domain})
+        # TEXT, FLOAT, DOUBLE, SHORT, LONG, DATE, BLOB, RASTER, GUID
+        # field_type, field_length (text only),
+        #
+        global dFieldInfo
+        dFieldInfo = dict()
 
-        # Cleanup any duplicate underscores in the table name
-        newName = ""
-        lastChar = "_"
+        # Convert original sdvattribute field settings to ArcGIS data types
+        if dSDV["effectivelogicaldatatype"].lower() in ['choice', 'string']:
+            #
+            dFieldInfo[resultcolumn] = ["TEXT", 254]
 
-        for c in tblName:
-            if c == lastChar and c == "_":
-                # Don't use this character because it is another underscore
-                lastChar = c
+        elif dSDV["effectivelogicaldatatype"].lower() == 'vtext':
+            #
+            dFieldInfo[resultcolumn] = ["TEXT", 1024]  # guess
 
-            else:
-                newName += c
-                lastChar = c
+        elif dSDV["effectivelogicaldatatype"].lower() == 'float':
+            #dFieldInfo[resultcolumn] = ["DOUBLE", ""]
+            dFieldInfo[resultcolumn] = ["FLOAT", ""]  # trying to match muaggatt table data type
 
-        if newName[-1] == "_":
-            newName = newName[:-1]
+        elif dSDV["effectivelogicaldatatype"].lower() == 'integer':
+            dFieldInfo[resultcolumn] = ["SHORT", ""]
 
-        tblName = newName
+        elif dSDV["effectivelogicaldatatype"].lower() == 'narrative text':
+            dFieldInfo[resultcolumn] = ["TEXT", 1024]  # need to find out where this new data type came from
 
-        #PrintMsg(" \nOutput table name = " + tblName, 1)
+        else:
+            raise MyError, "Failed to set dFieldInfo for " + resultcolumn + ", " + dSDV["effectivelogicaldatatype"]
 
-        # **************************************************************************
-        #
-        # Aggregation Logic to determine which functions will be used to process the
-        # intermediate table and produce the final output table.
-        #
-        # This is where outputValues is set
-        #
-        if dSDV["attributetype"] == "Property":
-            # These are all Soil Properties
-            # Added addtional logic for Minnesota Crop Index. It has a problem in that mapunitlevelattribflag is set to zero.
+        dFieldInfo["AREASYMBOL"] = ["TEXT", 20]
+        dFieldInfo["LKEY"] = ["TEXT", 30]
+        dFieldInfo["MUKEY"] = ["TEXT", 30]
+        dFieldInfo["MUSYM"] = ["TEXT", 6]
+        dFieldInfo["MUNAME"] = ["TEXT", 175]
+        dFieldInfo["COKEY"] = ["TEXT", 30]
+        dFieldInfo["COMPNAME"] = ["TEXT", 60]
+        dFieldInfo["CHKEY"] = ["TEXT", 30]
+        dFieldInfo["COMPPCT_R"] = ["SHORT", ""]
+        dFieldInfo["HZDEPT_R"] = ["SHORT", ""]
+        dFieldInfo["HZDEPB_R"] = ["SHORT", ""]
+        dFieldInfo["INTERPHR"] = ["FLOAT", ""]  # trying to match muaggatt data type
 
-            if dSDV["mapunitlevelattribflag"] == 1 or \
-               (dSDV["mapunitlevelattribflag"] == 0 and dSDV["complevelattribflag"] == 0 \
-                and dSDV["cmonthlevelattribflag"] == 0 and dSDV["horzlevelattribflag"] == 0 ) :
-                # This is a Map unit Level Soil Property or it is Minnesota Crop Index in the MUTEXT table
-                #PrintMsg("Map unit level, no aggregation neccessary", 1)
-                outputTbl, outputValues = Aggregate1(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)
+        # I don't remember why I did this
+        if dSDV["attributetype"].lower() == "interpretation" and (bFuzzy == True or dSDV["effectivelogicaldatatype"].lower() == "float"):
+            # For NCCPI?
+            dFieldInfo["INTERPHRC"] = ["FLOAT", ""]
 
-            elif dSDV["complevelattribflag"] == 1:
+        else:
+            dFieldInfo["INTERPHRC"] = ["TEXT", 254]
 
-                if dSDV["horzlevelattribflag"] == 0:
-                    # These are Component Level-Only Soil Properties
+        dFieldInfo["MONTH"] = ["TEXT", 10]
+        dFieldInfo["MONTHSEQ"] = ["SHORT", ""]
+        dFieldInfo["COMONTHKEY"] = ["TEXT", 30]
 
-                    if dSDV["cmonthlevelattribflag"] == 0:
-                        #
-                        #  These are Component Level Soil Properties
+        # Get possible result domain values from mdstattabcols and mdstatdomdet tables
+        # There is a problem because the XML for the legend does not always match case
+        # Create a dictionary as backup, but uppercase and use that to store the original values
+        #
+        # Assume that data types of string and vtext do not have domains
 
-                        if aggMethod == "Dominant Component":
-                            #PrintMsg(" \n1. domainValues: " + ", ".join(domainValues), 1)
-                            outputTbl, outputValues = AggregateCo_DCP(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, bZero)
+        #PrintMsg(" \nCreating global variables for domainValues and domainValuesUp", 1)
+        global domainValues, domainValuesUp
 
-                        elif aggMethod == "Minimum or Maximum":
-                            outputTbl, outputValues = AggregateCo_MaxMin(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, bZero)
+        if not dSDV["attributelogicaldatatype"].lower() in ["string", "vtext"]:
+            domainValues = GetRatingDomain(gdb)
+            #PrintMsg( "\ndomainValues: " + str(domainValues), 1)
+            domainValuesUp = [x.upper() for x in domainValues]    # Is this variable being used?
 
-                        elif aggMethod == "Dominant Condition":
-                            if bVerbose:
-                                PrintMsg(" \nDomain Values are now: " + str(domainValues), 1)
+        else:
+            domainValues = list()
+            domainValuesUp = list()
 
-                            if len(domainValues) > 0 and dSDV["tiebreakdomainname"] is not None :  # Problem with NonIrr CapSubCls
-                            #if len(domainValues) > 0: # Test failing on Parent Material
-                                if bVerbose:
-                                    PrintMsg(" \n1. aggMethod = " + aggMethod + " and domainValues = " + str(domainValues), 1)
 
-                                outputTbl, outputValues = AggregateCo_DCD_Domain(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)
+        # Get map legend information from the maplegendxml string
+        # For some interps, there are case mismatches with the actual rating values. This
+        # problem originates in the Rule Manager. This affects dLegend, legendValues, domainValues, dValues and dLabels.
+        # At some point I need to use outputValues to fix these.
+        #
+        global dLegend
 
-                                if bVerbose:
-                                    PrintMsg(" \nOuputValues: " + str(outputValues), 1)
+        dLegend = GetMapLegend(dSDV, bFuzzy)    # dictionary containing all maplegendxml properties
+        #PrintMsg(" \nChecking dLegend values to see if rgb is text:  " + str(dLegend), 1)
 
-                            else:
-                                if bVerbose:
-                                    PrintMsg(" \n2. aggMethod = " + aggMethod + " and no domainValues", 1)
+        global dLabels
+        dLabels = dict()
 
-                                outputTbl, outputValues = AggregateCo_DCD(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, bZero)
+        #PrintMsg(" \nAttributelogicaldatatype: " + dSDV["attributelogicaldatatype"].lower(), 1)
 
-                        elif aggMethod == "Minimum or Maximum":
-                            #
-                            outputTbl, outputValues = AggregateCo_MaxMin(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, bZero)
+        if len(dLegend) > 0:
+            if not dSDV["effectivelogicaldatatype"].lower() in ["integer", "float"]:
+                #
+                legendValues = GetValuesFromLegend(dLegend)
+                dLabels = dLegend["labels"] # dictionary containing just the label properties such as value and labeltext
 
-                        elif aggMethod == "Weighted Average" and dSDV["attributetype"].lower() == "property":
-                            # Using NCCPI for any numeric component level value?
-                            # This doesn't seem to be working for Range Prod 2016-01-28
-                            #
-                            outputTbl, outputValues = AggregateCo_WTA(gdb, sdvAtt, dSDV["attributecolumnname"].upper(),  initialTbl, bNulls, cutOff, tieBreaker, bZero)
+                if len(domainValues) == 0:
+                    for i in range(1, (len(dLabels) + 1)):
+                        domainValues.append(dLabels[i]["value"])
 
-                        elif aggMethod == "Percent Present":
-                            # This is Hydric?
-                            outputTbl, outputValues = AggregateCo_PP_SUM(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)
+                    #PrintMsg(" \nAdding <Null> to domainValues in CreateSoilMap function", 1)
 
-                        else:
-                            # Don't know what kind of interp this is
-                            raise MyError, "5. Component aggregation method has not yet been developed ruledesign 3 (" + dSDV["algorithmname"] + ", " + dSDV["horzaggmeth"] + ")"
+            else:
+                #PrintMsg(" \n", 1)
+                legendValues = GetValuesFromLegend(dLegend)
 
+        else:
+            # No map legend information in xml. Must be Progressive or using fuzzy values instead of original classes.
+            #
+            # This causes a problem for NCCPI.
+            legendValues = list()  # empty list, no legend
+            dLegend["type"] = "1"
 
-                    elif dSDV["cmonthlevelattribflag"] == 1:
-                        #
-                        # These are Component-Month Level Soil Properties
-                        #
-                        if dSDV["resultcolumnname"].startswith("Dep2WatTbl"):
-                            #PrintMsg(" \nThis is Depth to Water Table (" + dSDV["resultcolumnname"] + ")", 1)
+        # If there are no domain values, try using the legend values instead.
+        # May want to reconsider this move
+        #
+        if len(legendValues) > 0:
+            if len(domainValues) == 0:
+                PrintMsg(" \nUsing map legend values to populate domainValues", 1)
+                domainValues = legendValues
 
-                            if aggMethod == "Dominant Component":
-                                outputTbl, outputValues = AggregateCo_DCP_DTWT(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)
+        # Some problems with the 'Not rated' data value, legend value and sdvattribute setting ("notratedphrase")
+        # No perfect solution.
+        #
+        # Start by cleaning up the not rated value as best possible
+        if dSDV["attributetype"].lower() == "interpretation" and bFuzzy == False:
+            if not dSDV["notratedphrase"] is None:
+                # see if the lowercase value is equivalent to 'not rated'
+                if dSDV["notratedphrase"].upper() == 'NOT RATED':
+                    dSDV["notratedphrase"] = 'Not rated'
 
-                            elif aggMethod == "Dominant Condition":
-                                outputTbl, outputValues = AggregateCo_Mo_DCD(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)
-                                #raise MyError, "EARLY OUT"
+                else:
+                    dSDV["notratedphrase"] == dSDV["notratedphrase"][0:1].upper() + dSDV["notratedphrase"][1:].lower()
 
-                            elif aggMethod == "Weighted Average":
-                                outputTbl, outputValues = AggregateCo_WTA_DTWT(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, bZero)
+            else:
+                dSDV["notratedphrase"] = 'Not rated' # no way to know if this is correct until all of the data has been processed
 
-                            else:
-                                # Component-Month such as depth to water table - Minimum or Maximum
-                                outputTbl, outputValues = AggregateCo_Mo_MaxMin(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)
-                                #raise MyError, "5. Component-comonth aggregation method has not yet been developed "
+            #
+            # Next see if the not rated value exists in the domain from mdstatdomdet or map legend values
+            bNotRated = False
 
-                        else:
-                            # This will be flooding or ponding frequency. In theory these should be the same value
-                            # for each month because these are normally annual ratings
-                            #
-                            # PrintMsg(" \nThis is Flooding or Ponding (" + dSDV["resultcolumnname"] + ")", 1 )
-                            #
-                            if aggMethod == "Dominant Component":
-                                # Problem with this aggregation method (AggregateCo_DCP). The CompPct sum is 12X because of the months.
-                                outputTbl, outputValues = AggregateCo_Mo_DCP_Domain(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)
+            for d in domainValues:
+                if not dSDV["notratedphrase"] is None and not d is None:
+                    if d.upper() == dSDV["notratedphrase"].upper():
+                        bNotRated = True
 
-                            elif aggMethod == "Dominant Condition":
-                                # Problem with this aggregation method (AggregateCo_DCP_Domain). The CompPct sum is 12X because of the months.
-                                outputTbl, outputValues = AggregateCo_Mo_DCD_Domain(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker) # Orig
-                                #PrintMsg(" \noutputValues: " + ", ".join(outputValues), 1)
+            if bNotRated == False:
+                domainValues.insert(0, dSDV["notratedphrase"])
 
-                            elif aggMethod == "Minimum or Maximum":
-                                outputTbl, outputValues = AggregateCo_Mo_MaxMin(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)
 
-                            elif aggMethod == "Weighted Average":
-                              outputTbl, outputValues = AggregateCo_Mo_WTA(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)
+        if dSDV["ruledesign"] == 2:
+            # Flip legend (including Not rated) for suitability interps
+            domainValues.reverse()
+            
+        if not None in domainValues and len(domainValues) > 0:
+            # Insert None at beginning or end of domainValues
+            #PrintMsg(" \nAdding None to domainValues in CreateSoilMap function", 1)
 
-                            else:
-                                raise MyError, "Aggregation method: " + aggMethod + "; attibute " + dSDV["attributecolumnname"].upper()
+            if tieBreaker == dSDV["tiebreakhighlabel"]:
+                # Put the null value at the beginning of the domain
+                #dValues["NONE"] = [0, None]
+                domainValues.insert(0, None)
+                #pass
 
-                    else:
-                        raise MyError, "Attribute level flag problem"
+            else:
+                # Put the null value at the end of the domain
+                #dValues["NONE"] = [len(dValues), None]
+                domainValues.append(None)
+                #pass
 
-                elif dSDV["horzlevelattribflag"] == 1:
-                    # These are all Horizon Level Soil Properties
+            # Update dValues dictionary
+            i = 0
+            
+            for val in domainValues:
+                dValues[str(val).upper()] = [i, val]
+                i += 1
 
-                    if sdvAtt.startswith("K Factor"):
-                        # Need to figure out aggregation method for horizon level  max-min
-                        if aggMethod == "Dominant Condition":
-                            outputTbl, outputValues = AggregateHz_MaxMin_DCD(gdb, sdvAtt, dSDV["attributecolumnname"].upper(),  initialTbl, bNulls, cutOff, tieBreaker, top, bot, bZero)
 
-                        elif aggMethod == "Dominant Component":
-                            outputTbl, outputValues = AggregateHz_MaxMin_DCP(gdb, sdvAtt, dSDV["attributecolumnname"].upper(),  initialTbl, bNulls, cutOff, tieBreaker, top, bot, bZero)
 
-                    elif aggMethod == "Weighted Average":
-                        # component aggregation is weighted average
+        #PrintMsg(" \ndValues: " + str(dValues), 1)
 
-                        if dSDV["attributelogicaldatatype"].lower() in ["integer", "float"]:
-                            # Just making sure that these are numeric values, not indexes
-                            if dSDV["horzaggmeth"] == "Weighted Average":
-                                # Use weighted average for horizon data (works for AWC)
-                                outputTbl, outputValues = AggregateHz_WTA_WTA(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, top, bot, bZero)
+        # For the result column we need to translate the sdvattribute value to an ArcGIS field data type
+        #  'Choice' 'Float' 'Integer' 'string' 'String' 'VText'
+        if dSDV["attributelogicaldatatype"].lower() in ['string', 'choice']:
+            dFieldInfo[dSDV["attributecolumnname"].upper()] = ["TEXT", dSDV["attributefieldsize"]]
 
-                            elif dSDV["horzaggmeth"] == "Weighted Sum":
-                                # Calculate sum for horizon data (egs. AWS)
-                                outputTbl, outputValues = AggregateHz_WTA_SUM(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, top, bot, bZero)
+        elif dSDV["attributelogicaldatatype"].lower() == "vtext":
+            # Not sure if 254 is adequate
+            dFieldInfo[dSDV["attributecolumnname"].upper()] = ["TEXT", 254]
 
-                        else:
-                            raise MyError, "12. Weighted Average not appropriate for " + dataType
+        elif dSDV["attributelogicaldatatype"].lower() == "integer":
+            dFieldInfo[dSDV["attributecolumnname"].upper()] = ["SHORT", ""]
 
-                    elif aggMethod == "Dominant Component":
-                        # Need to find or build this function
+        elif dSDV["attributelogicaldatatype"].lower() == "float":
+            dFieldInfo[dSDV["attributecolumnname"].upper()] = ["FLOAT", dSDV["attributeprecision"]]
 
-                        if sdvAtt.startswith("Surface") or sdvAtt.endswith("(Surface)"):
-                            #
-                            # I just added this on Monday to fix problem with Surface Texture DCP
-                            # Need to test
-                            outputTbl, outputValues = AggregateCo_DCP(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, bZero)
+        elif dSDV["attributelogicaldatatype"].lower() == "narrative text":
+            dFieldInfo[dSDV["attributecolumnname"].upper()] = ["TEXT", 1024]
+            
+        else:
+            raise MyError, "Failed to set dFieldInfo for " + dSDV["attributecolumnname"].upper()
 
-                        elif dSDV["effectivelogicaldatatype"].lower() == "choice":
-                            # Indexed value such as kFactor, cannot use weighted average
-                            # for horizon properties.
-                            outputTbl, outputValues = AggregateCo_DCP(gdb, sdvAtt,dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, bZero)
+        # Identify related tables using mdstatrshipdet and add to tblList
+        #
+        mdTable = os.path.join(gdb, "mdstatrshipdet")
+        mdFlds = ["LTABPHYNAME", "RTABPHYNAME", "LTABCOLPHYNAME", "RTABCOLPHYNAME"]
+        level = 0  # table depth
+        tblList = list()
 
-                        elif dSDV["horzaggmeth"] == "Weighted Average":
-                            #PrintMsg(" \nHorizon aggregation method = WTA and attributelogical datatype = " + dSDV["attributelogicaldatatype"].lower(), 1)
-                            outputTbl, outputValues = AggregateHz_DCP_WTA(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, top, bot, bZero)
+        # Make sure mdstatrshipdet table is populated.
+        if int(arcpy.GetCount_management(mdTable).getOutput(0)) == 0:
+            raise MyError, "Required table (" + mdTable + ") is not populated"
 
-                        else:
-                            raise MyError, "9. Aggregation method has not yet been developed (" + dSDV["algorithmname"] + ", " + dSDV["horzaggmeth"] + ")"
 
-                    elif aggMethod == "Dominant Condition":
 
-                        if sdvAtt.startswith("Surface") or sdvAtt.endswith("(Surface)"):
-                            if dSDV["effectivelogicaldatatype"].lower() == "choice":
-                                if bVerbose:
-                                    PrintMsg(" \nDominant condition for surface-level attribute", 1)
-                                outputTbl, outputValues = AggregateCo_DCD_Domain(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)
+        if (sdvAtt in ["Surface Texture"] or sdvAtt.endswith("(Surface)")) and not (top == 0 and bot == 1):
 
-                            else:
-                                outputTbl, outputValues = AggregateCo_DCD(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, bZero)
+            if __name__ == "__main__":
+                #PrintMsg(" \nRenaming layer...", 1)
 
+                if sdvAtt == "Surface Texture":
+                    outputLayer = "Texture"
 
-                        elif dSDV["effectivelogicaldatatype"].lower() in ("float", "integer"):
-                            # Dominant condition for a horizon level numeric value is probably not a good idea
-                            outputTbl, outputValues = AggregateCo_DCD(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, bZero)
+                elif sdvAtt.endswith("(Surface)"):
+                    outputLayer = sdvAtt.replace("(Surface)", ", ")
 
-                        elif dSDV["effectivelogicaldatatype"].lower() == "choice" and dSDV["tiebreakdomainname"] is not None:
-                            # KFactor (Indexed values)
-                            #if bVerbose:
-                            #PrintMsg(" \nDominant condition for choice type", 1)
-                            outputTbl, outputValues = AggregateCo_DCD_Domain(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)
+            else:
+                #PrintMsg(" \nKeeping this as a surface layer...", 1)
+                outputLayer = sdvAtt
+                top = 0
+                bot = 1
 
-                        else:
-                            raise MyError, "No aggregation calculation selected for DCD"
+        else:
+            #PrintMsg(" \nKeeping this as the original layer...", 1)
+            outputLayer = sdvAtt
 
-                    elif aggMethod == "Minimum or Maximum":
-                        # Need to figure out aggregation method for horizon level  max-min
-                        if dSDV["effectivelogicaldatatype"].lower() == "choice":
-                            # PrintMsg("\tRunning AggregateCo_MaxMin for " + sdvAtt, 1)
-                            outputTbl, outputValues = AggregateCo_MaxMin(gdb, sdvAtt, dSDV["attributecolumnname"].upper(),  initialTbl, bNulls, cutOff, tieBreaker, bZero)
+        if dAgg[aggMethod] != "":
+            outputLayer = outputLayer + " " + dAgg[aggMethod]
 
-                        else:  # These should be numeric, probably need to test here.
-                            outputTbl, outputValues = AggregateHz_MaxMin_WTA(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, top, bot, bZero)
 
-                    else:
-                        raise MyError, "'" + aggMethod + "' aggregation method for " + sdvAtt + " has not been developed"
+        hzQuery = None
 
-                else:
-                    raise MyError, "Horizon-level '" + aggMethod + "' aggregation method for " + sdvAtt + " has not been developed"
+        if dSDV["horzlevelattribflag"] == 1:
+            if (sdvAtt in ["Surface Texture"] or sdvAtt.endswith("(Surface)")) and not (top == 0 and bot == 1):
+                outputLayer = outputLayer + " at " + str(top)  + "cm"
 
             else:
-                # Should never hit this
-                raise MyError, "Unable to handle assigned aggregation method (" + aggMethod + ") for " + sdvAtt
-
-        elif dSDV["attributetype"].lower() == "interpretation":
+                outputLayer = outputLayer + ", " + str(top) + " to " + str(bot) + "cm"
 
-            #PrintMsg(" \nDo I need to populate interp rating class values here, before aggregation?", 1)
-            #PrintMsg(" \ndomainValues:" + str(domainValues), 1)
+            tf = "HZDEPT_R"
+            bf = "HZDEPB_R"
 
-            if len(domainValues) == 0 and "label" in dLegend:
-                # create fake domain using map legend labels and hope they are correct
-                labelValues = dLegend["labels"]
+            if (bot - top) == 1:
+                hzQuery = "((" + tf + " = " + str(top) + " or " + bf + " = " + str(bot) + ") or ( " + tf + " <= " + str(top) + " and " + bf + " >= " + str(bot) + " ) )"
 
-                for i in range(1, (len(labelValues) + 1)):
-                    domainValues.append(labelValues[i])
+            else:
+                #rng = str(tuple(range(top, (bot + 1))))
+                rng = str(tuple(range(top, bot)))
+                hzQuery = "((" + tf + " in " + rng + " or " + bf + " in " + rng + ") or ( " + tf + " <= " + str(top) + " and " + bf + " >= " + str(bot) + " ) )"
 
 
-            if not 'Not rated' in domainValues and len(domainValues) > 0:
-                # These are all Soil Interpretations
-                domainValues.insert(0, "Not rated")
+        elif dSDV["cmonthlevelattribflag"] == 1:
+            outputLayer = outputLayer + ", " + str(begMo) + " - " + str(endMo)
 
 
-            if dSDV["ruledesign"] == 1:
-                #
-                # This is a Soil Interpretation for Limitations or Risk
+        elif secCst != "":
+            #PrintMsg(" \nAdding primary and secondary constraint to layer name (" + primCst + " " + secCst + ")", 1)
+            outputLayer = outputLayer + ", " + primCst + ", " + secCst
 
-                if aggMethod == "Dominant Component":
-                    outputTbl, outputValues = AggregateCo_DCP(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, bZero)
+        elif primCst != "":
+            #PrintMsg(" \nAdding primaryconstraint to layer name (" + primCst + ")", 1)
+            outputLayer = outputLayer + ", " + primCst
 
-                elif aggMethod == "Dominant Condition":
-                    #PrintMsg(" \nInterpretation; aggMethod = " + aggMethod, 1)
-                    outputTbl, outputValues = AggregateCo_DCD_Domain(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)
+        # Remove any forward slashes from outputLayer name
+        outputLayer = outputLayer.replace("/", "-")
+        gSSURGO_Profile.Label(outputLayer)
 
-                elif aggMethod in ['Least Limiting', 'Most Limiting']:
-                    outputTbl, outputValues = AggregateCo_Limiting(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)
 
-                elif aggMethod == "Weighted Average":
-                    # This is an interp that has been set to use fuzzy values
-                    outputTbl, outputValues = AggregateCo_WTA(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, bZero)
-                    outputValues = [0.0, 1.0]
+        # Print status
+        # Need to modify message when type is Interp and bFuzzy is True
+        #
+        if __name__ == "__main__":
+            if aggMethod == "Minimum or Maximum":
+                if tieBreaker == dSDV["tiebreakhighlabel"]:
+                    PrintMsg(" \nCreating map of '" + outputLayer + "' using " + os.path.basename(gdb), 0)
 
                 else:
-                    # Don't know what kind of interp this is
-                    #PrintMsg(" \nmapunitlevelattribflag: " + str(dSDV["mapunitlevelattribflag"]) + ", complevelattribflag: " + str(dSDV["complevelattribflag"]) + ", cmonthlevelattribflag: " + str(dSDV["cmonthlevelattribflag"]) + ", horzlevelattribflag: " + str(dSDV["horzlevelattribflag"]) + ", effectivelogicaldatatype: " + dSDV["effectivelogicaldatatype"], 1)
-                    #PrintMsg(aggMethod + "; " + dSDV["effectivelogicaldatatype"], 1)
-                    raise MyError, "5. Aggregation method has not yet been developed (" + dSDV["algorithmname"] + ", " + dSDV["horzaggmeth"] + ")"
+                    PrintMsg(" \nCreating map of '" + outputLayer + "' using " + os.path.basename(gdb), 0)
 
-            elif dSDV["ruledesign"] == 2:
-                # This is a Soil Interpretation for Suitability
+            elif dSDV["attributetype"].lower() == "interpretation" and bFuzzy == True:
+                PrintMsg(" \nCreating map for '" + outputLayer + "' using " + os.path.basename(gdb), 0)
 
-                if aggMethod == "Dominant Component":
-                    outputTbl, outputValues = AggregateCo_DCP(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, bZero)
+            else:
+                PrintMsg(" \nCreating map of '" + outputLayer + "' using " + os.path.basename(gdb), 0)
 
-                elif aggMethod == "Dominant Condition":
-                    outputTbl, outputValues = AggregateCo_DCD_Domain(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)  # changed this for Sand Suitability
+        if bTableOnly:
+            # Batch worker. There is no map document.
+            tableViews = list()
 
-                elif bFuzzy or (aggMethod == "Weighted Average" and dSDV["effectivelogicaldatatype"].lower() == 'float'):
-                    # This is NCCPI
-                    #PrintMsg(" \nA Aggregate2_NCCPI", 1)
-                    #outputTbl, outputValues = Aggregate2_NCCPI(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)
-                    # PrintMsg(" \nNCCPI 3", 1)
-                    outputTbl, outputValues = AggregateCo_WTA(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, bZero)
-                    outputValues = [0.0, 1.0]
+        else:
+            # Check to see if the layer already exists and delete if necessary
+            layers = arcpy.mapping.ListLayers(mxd, outputLayer, df)
 
-                elif aggMethod in ['Least Limiting', 'Most Limiting']:
-                    # Least Limiting or Most Limiting Interp
-                    outputTbl, outputValues = AggregateCo_Limiting(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)
+            if len(layers) == 1:
+                arcpy.mapping.RemoveLayer(df, layers[0])
 
-                else:
-                    # Don't know what kind of interp this is
-                    # Friday problem here for NCCPI
-                    #PrintMsg(" \n" + str(dSDV["mapunitlevelattribflag"]) + ", " + str(dSDV["complevelattribflag"]) + ", " + str(dSDV["cmonthlevelattribflag"]) + ", " + str(dSDV["horzlevelattribflag"]) + " -NA2", 1)
-                    #PrintMsg(aggMethod + "; " + dSDV["effectivelogicaldatatype"], 1)
-                    raise MyError, "5. Aggregation method has not yet been developed (" + dSDV["algorithmname"] + ", " + dSDV["horzaggmeth"] + ")"
+            # Create list of tables in the ArcMap TOC. Later check to see if a table
+            # involved in queries needs to be removed from the TOC.
+            tableViews = arcpy.mapping.ListTableViews(mxd, "*", df)
+            mainTables = ['mapunit', 'component', 'chorizon']
 
+            for tv in tableViews:
+                if tv.datasetName.lower() in mainTables:
+                    # Remove this table view from ArcMap that might cause a conflict with queries
+                    arcpy.mapping.RemoveTableView(df, tv)
 
-            elif dSDV["ruledesign"] == 3:
-                # This is a Soil Interpretation for Class. Only a very few interps in the nation use this.
-                # Such as MO- Pasture hayland; MT-Conservation Tree Shrub Groups; CA- Revised Storie Index
+            tableViews = arcpy.mapping.ListTableViews(mxd, "*", df)   # any other table views...
 
-                if aggMethod == "Dominant Component":
-                    outputTbl, outputValues = AggregateCo_DCP(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, bZero)
+        # Rating table cache (gSSURGO_ResultCache). Batch workers and depth range tables do not use it.
+        cacheKey = None
+        bCached = False
 
-                elif aggMethod == "Dominant Condition":
-                    outputTbl, outputValues = AggregateCo_DCD(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker, bZero)
+        if not bTableOnly and sdvWorkspace is None and len(depthRanges) == 0 and len(monthWindows) == 0:
+            cacheKey = gSSURGO_ResultCache.CacheKey(inputLayer, fc, cacheParams)
 
-                elif aggMethod in ['Least Limiting', 'Most Limiting']:
-                    #PrintMsg(" \nNot sure about aggregation method for ruledesign = 3", 1)
-                    # Least Limiting or Most Limiting Interp
-                    outputTbl, outputValues = AggregateCo_Limiting(gdb, sdvAtt, dSDV["attributecolumnname"].upper(), initialTbl, bNulls, cutOff, tieBreaker)
+        global tblName
+        if outputLayer in dBatchTables:
+            # The rating table was created by a batch worker (gSSURGO_SoilMapBatch). Copy it
+            # into the database. Only the map layer is needed.
+            batchTbl, outputValues = dBatchTables[outputLayer]
+            tblName = os.path.basename(batchTbl)
+            outputTbl = os.path.join(gdb, tblName)
 
-                else:
-                    # Don't know what kind of interp this is
-                    PrintMsg(" \nRuledesign 3: " + str(dSDV["mapunitlevelattribflag"]) + ", " + str(dSDV["complevelattribflag"]) + ", " + str(dSDV["cmonthlevelattribflag"]) + ", " + str(dSDV["horzlevelattribflag"]) + " -NA2", 1)
-                    PrintMsg(aggMethod + "; " + dSDV["effectivelogicaldatatype"], 1)
-                    raise MyError, "5. Interp aggregation method has not yet been developed ruledesign 3 (" + dSDV["algorithmname"] + ", " + dSDV["horzaggmeth"] + ")"
+            if arcpy.Exists(outputTbl):
+                arcpy.Delete_management(outputTbl)
+
+            arcpy.Copy_management(batchTbl, outputTbl)
+
+        elif sdvAtt in dBatchRanges and dSDV["horzlevelattribflag"] == 1 and (top, bot) in dBatchRanges[sdvAtt][1]:
+            # All of the depth ranges for this attribute were rated in one pass (CreateDepthRangeTable).
+            # Copy this range into its own rating table.
+            rangeTbl, dRangeValues = dBatchRanges[sdvAtt]
+            tblName = SDVTableName("SDV_" + dSDV["resultcolumnname"] + "_" + str(top) + "to" + str(bot))
+            outputTbl = SplitRangeTable(rangeTbl, DepthRangeFields(top, bot), os.path.join(gdb, tblName))
+            outputValues = dRangeValues[(top, bot)]
+
+        elif sdvAtt in dBatchRanges and dSDV["cmonthlevelattribflag"] == 1 and (begMo, endMo) in dBatchRanges[sdvAtt][1]:
+            # All of the month windows for this attribute were rated in one pass (CreateMonthWindowTable).
+            # Copy this window into its own rating table.
+            rangeTbl, dRangeValues = dBatchRanges[sdvAtt]
+            tblName = SDVTableName("SDV_" + dSDV["resultcolumnname"] + "_" + begMo[0:3] + "to" + endMo[0:3])
+            outputTbl = SplitRangeTable(rangeTbl, MonthWindowFields(begMo, endMo), os.path.join(gdb, tblName))
+            outputValues = dRangeValues[(begMo, endMo)]
 
+        else:
+            cachedTable = gSSURGO_ResultCache.FindTable(gdb, cacheKey)
 
-            elif dSDV["ruledesign"] is None:
-                # This is a Soil Interpretation???
-                raise MyError, "Soil Interp with no RuleDesign setting"
+            if not cachedTable is None:
+                # The rating table was made earlier with the same settings and the same soil data
+                outputTbl, outputValues = cachedTable
+                tblName = os.path.basename(outputTbl)
+                bCached = True
+                PrintMsg("\tUsing existing rating table " + tblName, 0)
 
             else:
-                raise MyError, "No aggregation calculation selected 10"
+                updatedTable = None
 
-        else:
-            raise MyError, "Invalid SDV AttributeType: " + str(dSDV["attributetype"])
+                if bIncremental:
+                    # Same settings, but some of the survey areas have changed since the table was made
+                    changedTable = gSSURGO_ResultCache.FindChanged(gdb, cacheKey)
+
+                    if not changedTable is None:
+                        PrintMsg("\tUpdating rating table " + os.path.basename(changedTable[0]) + " for " + str(len(changedTable[2])) + \
+                                 " changed and " + str(len(changedTable[3])) + " removed survey areas", 0)
+                        updatedTable = UpdateSDVTable(changedTable, inputLayer, sdvAtt, aggMethod, primCst, secCst, top, bot, begMo, endMo, tieBreaker, bZero, cutOff, bFuzzy, bNulls, hzQuery, tableViews)
+
+                if not updatedTable is None:
+                    outputTbl, outputValues = updatedTable
+                    tblName = os.path.basename(outputTbl)
+
+                else:
+                    outputTbl, outputValues = CreateSDVTable(inputLayer, sdvAtt, aggMethod, primCst, secCst, top, bot, begMo, endMo, tieBreaker, bZero, cutOff, bFuzzy, bNulls, hzQuery, tableViews)
+
+                if outputTbl is None:
+                    # CreateSDVTable has already reported the error
+                    return 0
+
+        if not bCached:
+            # New rating table. Legend statistics for a table with this name are out of date.
+            gSSURGO_LegendStats.Invalidate(outputTbl)
 
         # quit if no data is available for selected property or interp
         if outputValues == [0.0, 0.0] or len(outputValues) == 0 or (len(outputValues) == 1 and (outputValues[0] == None or outputValues[0] == "")):
@@ -11338,6 +10563,15 @@ def CreateSoilMap(inputLayer, sdvAtt, aggMethod, primCst, secCst, top, bot, begM
                 
             return 2
 
+        if not cacheKey is None and not bCached:
+            gSSURGO_ResultCache.SaveTable(gdb, outputTbl, cacheKey, outputValues)
+
+        if bTableOnly:
+            # Batch worker. The coordinator creates the map layer from this rating table.
+            dBatchResult["layer"] = outputLayer
+            dBatchResult["table"] = outputTbl
+            dBatchResult["values"] = outputValues
+            return 1
 
         #
         # End of Aggregation Logic and Data Processing
@@ -11730,6 +10964,83 @@ def CreateSoilMap(inputLayer, sdvAtt, aggMethod, primCst, secCst, top, bot, begM
         except:
             pass
 
+## ===================================================================================
+def CreateDepthRangeTable(inputLayer, sdvAtt, aggMethod, rangeList, tieBreaker, bZero, cutOff, bNulls, sRV):
+    # Rate a horizon level property for a list of (top, bot) depth ranges with one pass over the
+    # horizon data. Creates one rating table with a column for each range (AggregateHz_DepthRanges).
+    #
+    # Returns [rating table, dictionary of min-max values keyed on (top, bot)], or None when the
+    # attribute and aggregation method must be mapped one depth range at a time.
+    #
+    global depthRanges, bTableOnly
+
+    bTableOnlySaved = bTableOnly
+
+    try:
+        depthRanges = [(int(top), int(bot)) for top, bot in rangeList]
+
+        if len(depthRanges) == 0:
+            return None
+
+        # The horizon query for the full depth covers every range
+        top = min([rng[0] for rng in depthRanges])
+        bot = max([rng[1] for rng in depthRanges])
+
+        bTableOnly = True
+        dBatchResult.clear()
+        bSoilMap = CreateSoilMap(inputLayer, sdvAtt, aggMethod, "", "", top, bot, "January", "December", tieBreaker, bZero, cutOff, False, bNulls, sRV)
+
+        if bSoilMap == 1 and "ranges" in dBatchResult:
+            return [dBatchResult["table"], dBatchResult["ranges"]]
+
+        return None
+
+    except:
+        errorMsg()
+        return None
+
+    finally:
+        depthRanges = list()
+        bTableOnly = bTableOnlySaved
+        dBatchResult.clear()
+
+## ===================================================================================
+def CreateMonthWindowTable(inputLayer, sdvAtt, aggMethod, windowList, tieBreaker, bZero, cutOff, bNulls, sRV):
+    # Rate a component-month property (flooding, ponding, depth to water table) for a list of
+    # (begMo, endMo) windows with one read of the month data. Creates one rating table with a
+    # column for each window (WriteMonthTable).
+    #
+    # Returns [rating table, dictionary of output values keyed on (begMo, endMo)], or None when the
+    # attribute and aggregation method must be mapped one month window at a time.
+    #
+    global monthWindows, bTableOnly
+
+    bTableOnlySaved = bTableOnly
+
+    try:
+        monthWindows = [(str(begMo), str(endMo)) for begMo, endMo in windowList]
+
+        if len(monthWindows) == 0:
+            return None
+
+        bTableOnly = True
+        dBatchResult.clear()
+        bSoilMap = CreateSoilMap(inputLayer, sdvAtt, aggMethod, "", "", 0, 0, monthWindows[0][0], monthWindows[0][1], tieBreaker, bZero, cutOff, False, bNulls, sRV)
+
+        if bSoilMap == 1 and "ranges" in dBatchResult:
+            return [dBatchResult["table"], dBatchResult["ranges"]]
+
+        return None
+
+    except:
+        errorMsg()
+        return None
+
+    finally:
+        monthWindows = list()
+        bTableOnly = bTableOnlySaved
+        dBatchResult.clear()
+
 ## ===================================================================================
 ## MAIN
 ## ===================================================================================
@@ -11742,6 +11053,60 @@ import xml.etree.cElementTree as ET
 # Create the environment
 from arcpy import env
 
+import gSSURGO_AggregateArrays, gSSURGO_SoilCache, gSSURGO_JoinStream, gSSURGO_ComponentIndex, gSSURGO_ResultCache
+import gSSURGO_MonthArrays, gSSURGO_DomainCodes, gSSURGO_InterpIndex, gSSURGO_LegendStats, gSSURGO_Palette
+import gSSURGO_Profile
+
+# Timing trace (gSSURGO_Profile). Set the SDV_PROFILE environment variable or the optional last tool
+# parameter to a .json file or folder. The first group of functions report the number of records
+# they returned.
+gSSURGO_Profile.TimeFunctions(globals(), ["CreateSoilMap", "GetSDVAtts", "ReadTable", "GetAreasymbols", "CreateSDVTable", "UpdateSDVTable"], ["Aggregate"])
+gSSURGO_Profile.TimeFunctions(globals(), ["CreateInitialTable", "CreateOutputTable", "GetMapLegend", "GetNumericLegend", "CreateJSONLegend", \
+                              "ClassBreaksJSON", "UniqueValuesJSON", "UniqueValuesJSONList", "DefinedBreaksJSON", "CreateMapLayer", \
+                              "CreateRasterMapLayer", "UpdateMetadata"], [], None)
+
+# Order of the rows generated by the mapunit - component - horizon join
+hzOrder = [("MUKEY", False), ("COMPPCT_R", True), ("HZDEPT_R", False)]
+
+# The joined soil data are streamed to the aggregation functions. They are also written to the
+# SDV_Data table, which gSSURGO_TabularReport reads after a map is made. Set to False to skip it.
+# SDV_Data is never written in batch or table-only mode (bTableOnly).
+bSaveInitialTable = True
+
+# Class breaks for numeric legends that are not defined in maplegendxml (gSSURGO_LegendStats):
+# 'EqualInterval', 'Quantile' or 'NaturalBreaks'. Set by the optional Legend Method parameter.
+legendMethod = "EqualInterval"
+
+# Batch settings, used by gSSURGO_SoilMapBatch
+#
+# bTableOnly     CreateSoilMap stops after the rating table is written (no ArcMap needed) and
+#                saves the layer name, table and output values in dBatchResult
+# sdvWorkspace   geodatabase for the SDV rating tables. None means the input database.
+# dBatchTables   rating tables created by the batch workers, to be copied into the input database,
+#                keyed on layer name: [worker table, outputValues]
+# depthRanges    list of (top, bot). Set by CreateDepthRangeTable so that the AggregateHz functions
+#                rate every range in one pass.
+# monthWindows   list of (begMo, endMo). Set by CreateMonthWindowTable so that the AggregateCo_Mo
+#                functions rate every window in one pass.
+# dBatchRanges   depth range and month window tables keyed on attribute name:
+#                [table, {(top, bot) or (begMo, endMo):outputValues}].
+#                The rating table for each depth range or month window is copied out of this table.
+#
+# Incremental updates (UpdateSDVTable)
+#
+# bIncremental      when a cached rating table was made with the same settings from an older version
+#                   of the data, only rate the map units in the survey areas that have changed
+# incrementalAreas  survey areas rated by CreateSDVTable during an update. None means all of them.
+bTableOnly = False
+sdvWorkspace = None
+dBatchTables = dict()
+dBatchResult = dict()
+depthRanges = list()
+monthWindows = list()
+dBatchRanges = dict()
+bIncremental = True
+incrementalAreas = None
+
 try:
     if __name__ == "__main__":
         inputLayer = arcpy.GetParameterAsText(0)      # Input mapunit polygon layer
@@ -11761,6 +11126,15 @@ try:
         bNulls = arcpy.GetParameter(14)               # Include NULL values in rating summary or weighting (default=True)
         sRV = arcpy.GetParameter(15)                  # flag to switch from standard RV attributes to low or high
 
+        if arcpy.GetArgumentCount() > 16 and arcpy.GetParameterAsText(16) != "":
+            gSSURGO_Profile.Enable(arcpy.GetParameterAsText(16))   # optional timing trace file or folder
+
+        if arcpy.GetArgumentCount() > 17 and arcpy.GetParameterAsText(17) != "":
+            legendMethod = gSSURGO_LegendStats.LegendMethod(arcpy.GetParameterAsText(17))   # optional class break method for numeric legends
+
+            if legendMethod is None:
+                raise MyError, "Unknown legend method: " + arcpy.GetParameterAsText(17) + ". Use Equal Interval, Quantile or Natural Breaks"
+
         #global bVerbose
         #bVerbose = False   # hard-coded boolean to print diagnostic messages
 
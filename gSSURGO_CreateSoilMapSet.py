@@ -218,6 +218,9 @@ import xml.etree.cElementTree as ET
 # Create the environment
 from arcpy import env
 
+# Memory budget (MB) for the soil data cache shared by the maps in this set
+cacheMB = 1024
+
 try:
     if __name__ == "__main__":
         inputLayer = arcpy.GetParameterAsText(0)      # Input mapunit polygon layer
@@ -243,7 +246,10 @@ try:
         bNulls = True
         sRV = "Representative"
 
-        import gSSURGO_CreateSoilMap
+        import gSSURGO_CreateSoilMap, gSSURGO_SoilCache
+
+        # Every map in the set uses the same horizon table. Read it once for the whole set.
+        gSSURGO_SoilCache.StartSession(os.path.dirname(arcpy.Describe(inputLayer).catalogPath), cacheMB)
         
         rangeList = [int(v) for v in ranges.split(",")] # first item is lowest value, last item is highest value
         rangeList.sort(reverse=True)
@@ -275,3 +281,10 @@ except:
     PrintMsg(" \nFinal error gSSURGO_CreateSoilMap", 0)
     errorMsg()
 
+finally:
+    try:
+        # ArcMap keeps this module loaded between runs. Always release the cached data.
+        gSSURGO_SoilCache.EndSession()
+
+    except:
+        pass
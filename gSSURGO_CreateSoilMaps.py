@@ -132,193 +132,170 @@ import arcpy, sys, string, os, traceback, locale, time, sqlite3
 # Create the environment
 from arcpy import env
 
-try:
-
-    inputLayer = arcpy.GetParameterAsText(0)       # Input mapunit polygon layer
-    sdvAtts = arcpy.GetParameter(1)                # SDV Attribute
-    depthList = arcpy.GetParameterAsText(2)        # space-delimited list of depths
-    
-    #top = arcpy.GetParameter(2)                    # Top Depth, default = 0
-    #bot = arcpy.GetParameter(3)                     # Bottom Depth, default = 1
-
-    num = 0
-    badList = list()
-    PrintMsg(" \n", 0)
-    import gSSURGO_CreateSoilMap
-
-    # Turn off display of the inputLayer to reduce potential screen redraws
-    mxd = arcpy.mapping.MapDocument("CURRENT")
-    df = mxd.activeDataFrame
-    layers = arcpy.mapping.ListLayers(mxd, inputLayer, df)
-    
-    if len(layers) == 1:
-        soilLayer = layers[0]
-        soilLayer.visible = False
-        del soilLayer
-
-    del mxd, df, layers
-
-    # Get gSSURGO DB behind inputLayer
-    desc = arcpy.Describe(inputLayer)
-    
-    if desc.dataType.lower() == "featurelayer":
-        fc = desc.featureclass.catalogPath
-        gdb = os.path.dirname(fc)
-
-    elif desc.dataType.lower() == "rasterlayer":
-        gdb = os.path.dirname(desc.catalogPath)
-
-    aggMethod = ""
-    primCst = ""
-    secCst = ""
-    begMo = "January"
-    endMo = "December"
-    bZero = True
-    cutOff = 0
-    bFuzzy = False
-    bNulls = True
-    tieBreaker = ""
-    sRV = "Representative"
-
-    # Set up depth ranges using space delimited list of break values from parameter string
-    # ex. 0 10 25 ...
-    depthRanges = list()
-    d1 = depthList.split(" ")
-    d2 = [int(x) for x in d1]
-
-    for i in range(len(d2) - 1):
-        depthRanges.append((d2[i], d2[i + 1]))
-
-    depthRanges.reverse()
-    newAtts = list()
-    
-    for sdvAtt in sdvAtts:
-        # Choice list in menu was modified to include folder names and tabbed attributenames. Need
-        # to clean up the list before processing.
-        if not sdvAtt.startswith("* "):
-            newAtts.append(sdvAtt.strip())
-
-    # Create list of soil maps that use horizon-level attributes
-    #
-    flds3 = ["attributename", "depthqualifiermode"]
-    sql2 = "attributetablename = 'chorizon'"
-    #sql2 = "attributetablename = 'chorizon' and not depthqualifiermode = 'Surface Layer'"
-    hzAtts = list()
-    surfaceAtts = list()
-    sdvTbl = os.path.join(gdb, "sdvattribute")
+# Memory budget (MB) for the soil data cache shared by the maps in this batch
+cacheMB = 1024
+
+# The rating tables are created by a pool of worker processes (gSSURGO_SoilMapBatch).
+# 0 means one process per processor, less one for ArcMap. 1 creates the maps one at a time.
+workerCnt = 0
+
+# Worker processes import this script, so the batch only runs when it is the main script
+if __name__ == "__main__":
+    try:
+
+        inputLayer = arcpy.GetParameterAsText(0)       # Input mapunit polygon layer
+        sdvAtts = arcpy.GetParameter(1)                # SDV Attribute
+        depthList = arcpy.GetParameterAsText(2)        # space-delimited list of depths
+        
+        #top = arcpy.GetParameter(2)                    # Top Depth, default = 0
+        #bot = arcpy.GetParameter(3)                     # Bottom Depth, default = 1
+
+        num = 0
+        badList = list()
+        PrintMsg(" \n", 0)
+        import gSSURGO_CreateSoilMap, gSSURGO_SoilCache, gSSURGO_SoilMapBatch
+
+        # Turn off display of the inputLayer to reduce potential screen redraws
+        mxd = arcpy.mapping.MapDocument("CURRENT")
+        df = mxd.activeDataFrame
+        layers = arcpy.mapping.ListLayers(mxd, inputLayer, df)
+        
+        if len(layers) == 1:
+            soilLayer = layers[0]
+            soilLayer.visible = False
+            del soilLayer
 
-    with arcpy.da.SearchCursor(sdvTbl, flds3, where_clause=sql2) as aCur:
-        # populate list of sdv attribute names
+        del mxd, df, layers
 
-        for rec in aCur:
-            att = rec[0]
-            dq = rec[1]
+        # Get gSSURGO DB behind inputLayer
+        desc = arcpy.Describe(inputLayer)
+        
+        if desc.dataType.lower() == "featurelayer":
+            fc = desc.featureclass.catalogPath
+            gdb = os.path.dirname(fc)
+
+        elif desc.dataType.lower() == "rasterlayer":
+            gdb = os.path.dirname(desc.catalogPath)
+
+        # Share the MAPUNIT, COMPONENT and CHORIZON data, sdvattribute records and lookups
+        # across all of the maps in this batch
+        gSSURGO_SoilCache.StartSession(gdb, cacheMB)
+
+        # CreateSoilMap settings shared by all of the maps
+        dSettings = dict()
+        dSettings["aggMethod"] = ""
+        dSettings["primCst"] = ""
+        dSettings["secCst"] = ""
+        dSettings["begMo"] = "January"
+        dSettings["endMo"] = "December"
+        dSettings["bZero"] = True
+        dSettings["cutOff"] = 0
+        dSettings["bFuzzy"] = False
+        dSettings["bNulls"] = True
+        dSettings["tieBreaker"] = ""
+        dSettings["sRV"] = "Representative"
+
+        # Set up depth ranges using space delimited list of break values from parameter string
+        # ex. 0 10 25 ...
+        depthRanges = list()
+        d1 = depthList.split(" ")
+        d2 = [int(x) for x in d1]
+
+        for i in range(len(d2) - 1):
+            depthRanges.append((d2[i], d2[i + 1]))
+
+        depthRanges.reverse()
+        newAtts = list()
+        
+        for sdvAtt in sdvAtts:
+            # Choice list in menu was modified to include folder names and tabbed attributenames. Need
+            # to clean up the list before processing.
+            if not sdvAtt.startswith("* "):
+                newAtts.append(sdvAtt.strip())
 
-            if att in newAtts and not att in hzAtts and dq != 'Surface Layer':
-                hzAtts.append(att) # accumulate sdv attribute names that use horizon data
+        # Create list of soil maps that use horizon-level attributes
+        #
+        flds3 = ["attributename", "depthqualifiermode"]
+        sql2 = "attributetablename = 'chorizon'"
+        #sql2 = "attributetablename = 'chorizon' and not depthqualifiermode = 'Surface Layer'"
+        hzAtts = list()
+        surfaceAtts = list()
+        sdvTbl = os.path.join(gdb, "sdvattribute")
 
-            if att in newAtts and dq == 'Surface Layer':
-                surfaceAtts.append(att)
+        with arcpy.da.SearchCursor(sdvTbl, flds3, where_clause=sql2) as aCur:
+            # populate list of sdv attribute names
 
-    hzAtts.sort()
+            for rec in aCur:
+                att = rec[0]
+                dq = rec[1]
 
-    # Calculate the number of new map layers that will be created:
-    hzMaps = (len(hzAtts) * len(depthRanges) )
-    individualMaps = (len(newAtts) - len(hzAtts))
-    mapCnt = hzMaps + individualMaps
+                if att in newAtts and not att in hzAtts and dq != 'Surface Layer':
+                    hzAtts.append(att) # accumulate sdv attribute names that use horizon data
 
-    if hzMaps > 0:
-        PrintMsg(" \nCreating a series of " + str(mapCnt) + " soil maps (" + str(individualMaps) + " individual maps plus a series of " + str(hzMaps) + " horizon-level property maps)", 0)
+                if att in newAtts and dq == 'Surface Layer':
+                    surfaceAtts.append(att)
 
-    else:
-        PrintMsg(" \nCreating a series of " + str(mapCnt) + " soil maps", 0)
+        hzAtts.sort()
 
-    
-    arcpy.SetProgressor("step", "Creating series of soil maps...", 0, mapCnt, 1)
-    num = 0
-    
-    for sdvAtt in newAtts:
-        
-        if sdvAtt in hzAtts:
-
-            # This will only process data when there is a set of depth ranges specified
-            #
-            # I need to handle this differently when no depths are entered
-            #
-            for depths in depthRanges:
-                top, bot = depths
-                num += 1
-                msg = "Creating map number " + str(num) + ":  " + sdvAtt + " " + str(top) + " to " + str(bot) + "cm"
-                    
-                arcpy.SetProgressorLabel(msg)
-                PrintMsg(" \n" + msg, 0)
-                time.sleep(2)
-
-                # Trying here to enter default values for most parameters and to modify CreateSoilMap.CreateSoilMap to use default aggregation method (aggMethod) when it is passed an empty string
-                bSoilMap = gSSURGO_CreateSoilMap.CreateSoilMap(inputLayer, sdvAtt, aggMethod, primCst, secCst, top, bot, begMo, endMo, tieBreaker, bZero, cutOff, bFuzzy, bNulls, sRV) # external script
-                arcpy.SetProgressorPosition()
-                
-                if bSoilMap == 2:
-                    if bot > 0:
-                        badList.append(sdvAtt + " " + str(top) + " to " + str(bot) + "cm'")
-
-                    else:
-                        badList.append(sdvAtt)
-
-                elif bSoilMap == 0:
-                    #PrintMsg("\tbSoilMap returned 0", 0)
-                    badList.append(sdvAtt)
+        # Calculate the number of new map layers that will be created:
+        hzMaps = (len(hzAtts) * len(depthRanges) )
+        individualMaps = (len(newAtts) - len(hzAtts))
+        mapCnt = hzMaps + individualMaps
+
+        if hzMaps > 0:
+            PrintMsg(" \nCreating a series of " + str(mapCnt) + " soil maps (" + str(individualMaps) + " individual maps plus a series of " + str(hzMaps) + " horizon-level property maps)", 0)
 
         else:
-            top, bot = (0, 1)  # this should cover the surface properties such as Texture
-            num += 1
-
-            if sdvAtt in surfaceAtts:
-                msg = "Creating map number " + str(num) + ":  " + sdvAtt + " (surface)"
-
-            else:     
-                msg = "Creating map number " + str(num) + ":  " + sdvAtt
-      
-            arcpy.SetProgressorLabel(msg)
-            PrintMsg(" \n" + msg, 0)
-            time.sleep(2)
-
-            # Trying here to enter default values for most parameters and to modify CreateSoilMap.CreateSoilMap to use default aggregation method (aggMethod) when it is passed an empty string
-            bSoilMap = gSSURGO_CreateSoilMap.CreateSoilMap(inputLayer, sdvAtt, aggMethod, primCst, secCst, top, bot, begMo, endMo, tieBreaker, bZero, cutOff, bFuzzy, bNulls, sRV) # external script
-            arcpy.SetProgressorPosition()
+            PrintMsg(" \nCreating a series of " + str(mapCnt) + " soil maps", 0)
+
+        # List of map jobs, in the order the maps are added to ArcMap
+        jobList = list()
+        
+        for sdvAtt in newAtts:
             
-            if bSoilMap == 2:
-                if bot > 0:
-                    badList.append(sdvAtt + " " + str(top) + " to " + str(bot) + "cm'")
-
-                else:
-                    badList.append(sdvAtt)
-
-            elif bSoilMap == 0:
-                #PrintMsg("\tbSoilMap returned 0", 0)
-                badList.append(sdvAtt)
-                    
-    arcpy.RefreshActiveView()
-    
-    if len(badList) > 0:
- 
-        if len(badList) == 1:
-            PrintMsg(" \nUnable to create the following soil map layer: '" + badList[0] + "' \n ", 1)
+            if sdvAtt in hzAtts:
 
-        else:
-            PrintMsg(" \nUnable to create the following soil map layers: '" + "', '".join(badList) + "' \n ", 1)
+                # This will only process data when there is a set of depth ranges specified
+                #
+                # I need to handle this differently when no depths are entered
+                #
+                for depths in depthRanges:
+                    top, bot = depths
+                    jobList.append({"sdvAtt":sdvAtt, "top":top, "bot":bot, "bHorizon":True, "bSurface":False})
 
-    else:
-        PrintMsg(" \nCreateSoilMaps finished \n ", 0)
+            else:
+                top, bot = (0, 1)  # this should cover the surface properties such as Texture
+                jobList.append({"sdvAtt":sdvAtt, "top":top, "bot":bot, "bHorizon":False, "bSurface":sdvAtt in surfaceAtts})
 
-    del badList
+        badList = gSSURGO_SoilMapBatch.RunBatch(inputLayer, jobList, dSettings, workerCnt, cacheMB)
+                        
+        arcpy.RefreshActiveView()
+        
+        if len(badList) > 0:
+     
+            if len(badList) == 1:
+                PrintMsg(" \nUnable to create the following soil map layer: '" + badList[0] + "' \n ", 1)
 
-except:
-    errorMsg()
+            else:
+                PrintMsg(" \nUnable to create the following soil map layers: '" + "', '".join(badList) + "' \n ", 1)
 
-finally:
-    try:
-        del mxd, df
+        else:
+            PrintMsg(" \nCreateSoilMaps finished \n ", 0)
+
+        del badList
 
     except:
-        pass
+        errorMsg()
+
+    finally:
+        try:
+            gSSURGO_SoilCache.EndSession()
+
+        except:
+            pass
+
+        try:
+            del mxd, df
+
+        except:
+            pass
@@ -6,6 +6,12 @@
 # VALU1 table and copies them to a new VALU1 table within each geodatabase.
 
 # Original coding 2014-10-03
+#
+# 2017-11-10. The national table is read once (ReadValuTable) and split up by the mukeys in the
+# MAPUNIT table of each geodatabase. Each part is written with one insert cursor (CopyData) by a
+# pool of worker processes, one geodatabase at a time per worker. Optional parameter 5 is the
+# number of workers (0 is one per processor, less one). With fewer than two workers the
+# geodatabases are written here, one at a time.
 
 ## ===================================================================================
 class MyError(Exception):
@@ -289,10 +295,66 @@ def UpdateMetadata(outputWS, target, surveyInfo):
         False
 
 ## ===================================================================================
-def CopyData(inputDB, inValuTbl, bOverwrite):
-    # For the target database, get a list of mukeys from the mapunit table and
-    # use them to query the national VALU1 table and copy those records to a
-    # new VALU1 table in the target database.
+def ReadValuTable(inValuTbl):
+    # Read the source VALU1 table into memory once for all of the target databases.
+    # Returns the field list and a dictionary of records keyed on mukey.
+    #
+    fldList = [fld.name for fld in arcpy.ListFields(inValuTbl) if not fld.type in ["OID", "Geometry"]]
+    mukeyIndx = [fld.upper() for fld in fldList].index("MUKEY")
+    dRows = dict()
+    iCnt = int(arcpy.GetCount_management(inValuTbl).getOutput(0))
+    PrintMsg(" \nReading " + Number_Format(iCnt, 0, True) + " records from " + inValuTbl, 0)
+    arcpy.SetProgressor("step", "Reading " + os.path.basename(inValuTbl) + "...", 0, iCnt, 1)
+
+    with arcpy.da.SearchCursor(inValuTbl, fldList) as cur:
+        for rec in cur:
+            dRows[rec[mukeyIndx]] = rec
+            arcpy.SetProgressorPosition()
+
+    return fldList, dRows
+
+## ===================================================================================
+def TargetInfo(inputDB, inValuTbl, bOverwrite):
+    # Survey list (for the metadata) and list of mukeys from the mapunit table of a target database
+    #
+    newTbl = os.path.join(inputDB, os.path.basename(inValuTbl))
+
+    if arcpy.Exists(newTbl) and not bOverwrite:
+        raise MyError, "A " + os.path.basename(inValuTbl) + " table already exists for " + inputDB
+
+    # Get list of survey areas from inputDB
+    #
+    saTbl = os.path.join(inputDB, "sacatalog")
+    expList = list()
+
+    with arcpy.da.SearchCursor(saTbl, ["AREASYMBOL", "SAVEREST"]) as srcCursor:
+        for rec in srcCursor:
+            expList.append(rec[0] + " (" + str(rec[1]).split()[0] + ")")
+
+    surveyInfo = ", ".join(expList)
+
+    # Get list of mukeys for the partition
+    #
+    muTbl = os.path.join(inputDB, "mapunit")
+    if not arcpy.Exists(muTbl):
+        raise MyError, "Could not find mapunit table for " + inputDB
+
+    muList = list()
+
+    with arcpy.da.SearchCursor(muTbl, ["mukey"]) as cur:
+        for rec in cur:
+            muList.append(rec[0])
+
+    if len(muList) == 0:
+        raise MyError, "Failed to generate list of mukeys from " + muTbl
+
+    return muList, surveyInfo
+
+## ===================================================================================
+def CopyData(inputDB, inValuTbl, fldList, rows, iCnt, surveyInfo, bOverwrite):
+    # Write the VALU1 records for one target database (rows, the partition of the national table
+    # for the mukeys in its mapunit table) to a new VALU1 table with one insert cursor.
+    # iCnt is the number of map units in the target database.
     try:
 
         # First check for pre-existing output tables
@@ -305,110 +367,239 @@ def CopyData(inputDB, inValuTbl, bOverwrite):
             else:
                 raise MyError, "A " + os.path.basename(inValuTbl) + " table already exists for " + inputDB
 
-            PrintMsg(" \nCreating " + os.path.basename(inValuTbl) + " table for " + inputDB, 0)
+        PrintMsg(" \nCreating " + os.path.basename(inValuTbl) + " table for " + inputDB, 0)
 
-        # Get list of survey areas from inputDB
-        #
-        saTbl = os.path.join(inputDB, "sacatalog")
-        expList = list()
-        queryList = list()
+        # New table has the same fields as the national table
+        arcpy.CreateTable_management(inputDB, os.path.basename(inValuTbl), inValuTbl)
 
-        with arcpy.da.SearchCursor(saTbl, ["AREASYMBOL", "SAVEREST"]) as srcCursor:
-            for rec in srcCursor:
-                expList.append(rec[0] + " (" + str(rec[1]).split()[0] + ")")
-                queryList.append("'" + rec[0] + "'")
+        with arcpy.da.InsertCursor(newTbl, fldList) as cur:
+            for rec in rows:
+                cur.insertRow(rec)
 
-        surveyInfo = ", ".join(expList)
+        iNew = len(rows)
 
-        # Get list of mukeys for query
-        #
-        muTbl = os.path.join(inputDB, "mapunit")
-        if not arcpy.Exists(muTbl):
-            raise MyError, "Could not find mapunit table for " + inputDB
+        if iNew != iCnt:
+            raise MyError, "Discrepancy in record count for " + newTbl
 
-        muList = list()
+        else:
+            bUpdated = UpdateMetadata(inputDB, newTbl, surveyInfo)
+            PrintMsg("\tNew table has " + Number_Format(iCnt, 0, True) + " records...", 0)
 
-        with arcpy.da.SearchCursor(muTbl, ["mukey"]) as cur:
-            for rec in cur:
-                muList.append("'" + rec[0] +"'")
+        return True
 
-        iCnt = len(muList)
+    except MyError, e:
+        # Example: raise MyError, "This is an error message"
+        PrintMsg(str(e) + " \n", 2)
+        return False
+
+    except:
+        errorMsg()
+        return False
+
+## ===================================================================================
+def WorkerMsg(msg, severity=0):
+    # PrintMsg for a worker process. The messages are returned with the result (RunCopy).
+    workerMsgs.append([severity, msg])
+
+## ===================================================================================
+def StartWorker(workFolder):
+    # Pool initializer. Runs once in each worker process.
+    global PrintMsg
 
-        if iCnt > 0:
-            # List of mukeys is valid
+    # Scratch folder for this worker's metadata files
+    scratchFolder = os.path.join(workFolder, "Valu_" + str(os.getpid()))
 
-            whereClause = "mukey in (" + ",".join(muList) + ")"
+    if not os.path.isdir(scratchFolder):
+        os.mkdir(scratchFolder)
 
-            # MakeQueryTable_management (in_table, out_table, in_key_field_option, {in_key_field}, {in_field}, {where_clause})
-            tmpTbl = "Valu1_Selection"
-            arcpy.MakeQueryTable_management(inValuTbl, tmpTbl, "NO_KEY_FIELD", "", "", whereClause)
-            arcpy.CopyRows_management(tmpTbl, newTbl)
-            iNew = int(arcpy.GetCount_management(newTbl).getOutput(0))
+    arcpy.env.scratchWorkspace = scratchFolder
+    arcpy.env.overwriteOutput = True
+    PrintMsg = WorkerMsg
 
-            if iNew != iCnt:
-                raise MyError, "Discrepancy in record count for " + newTbl
+## ===================================================================================
+def RunCopy(task):
+    # Copy the VALU1 records for one target database.
+    # Returns [database, status, seconds, record count, list of error messages].
+    #
+    inputDB, inValuTbl, fldList, rows, iCnt, surveyInfo, bOverwrite = task
+    del workerMsgs[:]
+    start = time.time()
+
+    try:
+        bCopied = CopyData(inputDB, inValuTbl, fldList, rows, iCnt, surveyInfo, bOverwrite)
+
+    except:
+        bCopied = False
+        workerMsgs.append([2, traceback.format_exc()])
+
+    errList = [msg.strip() for severity, msg in workerMsgs if severity == 2 and msg.strip() != ""]
+
+    return [inputDB, bCopied, time.time() - start, len(rows), errList]
+
+## ===================================================================================
+def Tasks(inLoc, gdbList, inValuTbl, bOverwrite, fldList, dRows, results):
+    # Partition of the national table for each target database. Targets that cannot be
+    # read are added to results as failures.
+    for gdbName in gdbList:
+        inputDB = os.path.join(inLoc, gdbName)
+        start = time.time()
+
+        try:
+            muList, surveyInfo = TargetInfo(inputDB, inValuTbl, bOverwrite)
+            rows = [dRows[mukey] for mukey in muList if mukey in dRows]
+            yield [inputDB, inValuTbl, fldList, rows, len(muList), surveyInfo, bOverwrite]
+
+        except MyError, e:
+            results.append([inputDB, False, time.time() - start, 0, [str(e)]])
+
+        except:
+            results.append([inputDB, False, time.time() - start, 0, [traceback.format_exc()]])
+
+## ===================================================================================
+def DistributeValuTable(inLoc, gdbList, inValuTbl, bOverwrite, workerCnt=0):
+    # Read the national VALU1 table once and copy each target database's map units to a new
+    # VALU1 table in that database. The targets are written by a pool of worker processes.
+    # Returns the list of [database, status, seconds, record count, error messages].
+    #
+    # workerCnt  number of worker processes. 0 means one per processor, less one for ArcMap.
+    #
+    results = list()
+    workFolder = None
+    pool = None
+    start = time.time()
+
+    try:
+        gdbList = [str(gdbName) for gdbName in gdbList]
+        fldList, dRows = ReadValuTable(inValuTbl)
+        # The target mapunit tables are read here, before any workers start. The partitions
+        # share the records in dRows.
+        tasks = list(Tasks(str(inLoc), gdbList, inValuTbl, bOverwrite, fldList, dRows, results))
+
+        if workerCnt == 0:
+            try:
+                workerCnt = multiprocessing.cpu_count() - 1
+
+            except NotImplementedError:
+                workerCnt = 1
+
+        workerCnt = min(workerCnt, len(gdbList))
+        arcpy.SetProgressor("step", "Copying " + os.path.basename(inValuTbl) + " records...", 0, len(gdbList), 1)
+
+        if workerCnt < 2:
+            # One database at a time in this process
+            for task in tasks:
+                arcpy.SetProgressorLabel("Copying " + os.path.basename(inValuTbl) + " records to " + os.path.basename(task[0]))
+                dbStart = time.time()
+                bCopied = CopyData(*task)
+                results.append([task[0], bCopied, time.time() - dbStart, len(task[3]), []])
+                arcpy.SetProgressorPosition()
+
+            return results
+
+        # ArcMap runs python in-process, so the workers must be started with the python executable
+        pythonExe = os.path.join(sys.exec_prefix, "pythonw.exe")
+
+        if os.path.isfile(pythonExe):
+            multiprocessing.set_executable(pythonExe)
+
+        workFolder = tempfile.mkdtemp(prefix="gSSURGO_Valu_")
+        PrintMsg(" \nCopying to " + str(len(gdbList)) + " geodatabases using " + str(workerCnt) + " processes", 0)
+        pool = multiprocessing.Pool(workerCnt, StartWorker, (workFolder,))
+
+        # Databases are reported as they finish
+        for result in pool.imap_unordered(RunCopy, tasks, 1):
+            results.append(result)
+            inputDB, bCopied, seconds, rowCnt, errList = result
+
+            if bCopied == True:
+                PrintMsg("\t" + os.path.basename(inputDB) + ": " + Number_Format(rowCnt, 0, True) + " records (" + Number_Format(seconds, 1, True) + " seconds)", 0)
 
             else:
-                #bUpdated = UpdateMetadata(inputDB, os.path.basename(inValuTbl), surveyInfo)
-                bUpdated = UpdateMetadata(inputDB, newTbl, surveyInfo)
-                PrintMsg("\tNew table has " + Number_Format(iCnt, 0, True) + " records...", 0)
+                PrintMsg("\tFailed to copy records to " + os.path.basename(inputDB), 1)
 
-        else:
-            raise MyError, "Failed to generate list of mukeys from " + inValuTbl
+            arcpy.SetProgressorPosition()
 
-        return True
+        return results
 
     except MyError, e:
-        # Example: raise MyError, "This is an error message"
-        PrintMsg(str(e) + " \n", 2)
-        return False
+        PrintMsg(str(e), 2)
+        return results
 
     except:
         errorMsg()
-        return False
+        return results
+
+    finally:
+        if not pool is None:
+            pool.close()
+            pool.join()
+
+        if not workFolder is None:
+            shutil.rmtree(workFolder, True)
+
+        if len(results) > 0:
+            PrintSummary(results, start)
+
+## ===================================================================================
+def PrintSummary(results, start):
+    # Records and time for each database and the errors for the ones that failed
+    badList = [result for result in results if result[1] != True]
+
+    PrintMsg(" \n" + (65 * "*"), 0)
+    PrintMsg("Valu table summary", 0)
+    PrintMsg((65 * "*") + " \n ", 0)
+
+    for inputDB, bCopied, seconds, rowCnt, errList in sorted(results):
+        if bCopied == True:
+            PrintMsg("\t" + os.path.basename(inputDB) + ":  " + Number_Format(rowCnt, 0, True) + " records, " + Number_Format(seconds, 1, True) + " seconds", 0)
+
+        else:
+            PrintMsg("\t" + os.path.basename(inputDB) + ":  FAILED", 1)
+
+            for msg in errList:
+                PrintMsg("\t\t" + msg.replace("\n", "\n\t\t"), 1)
+
+    if len(badList) > 0:
+        PrintMsg("The following geodatabases encountered problems: " + ", ".join([os.path.basename(result[0]) for result in badList]) + " \n ", 2)
+
+    PrintMsg(" \nTotal processing time: " + Number_Format(time.time() - start, 1, True) + " seconds \n ", 0)
 
 ## ===================================================================================
 # main
-import string, os, sys, traceback, locale, arcpy, time
+import string, os, sys, traceback, locale, arcpy, time, multiprocessing, tempfile, shutil
 import xml.etree.cElementTree as ET
 from arcpy import env
 
-try:
-
-    # Script arguments...
-    # Skipping parameter 0 because that is only used for the ArcTool menu
-    inLoc = arcpy.GetParameterAsText(1)               # input folder
-    gdbList = arcpy.GetParameter(2)                   # list of geodatabases in the folder
-    inValuTbl = arcpy.GetParameterAsText(3)           # Source VALU1 table (national)
-    bOverwrite = arcpy.GetParameter(4)                # Overwrite existing tables. Default = False
+# Messages from a worker process (WorkerMsg)
+workerMsgs = list()
 
-    arcpy.OverwriteOutput = bOverwrite
-
-    iCnt = len(gdbList)
-    PrintMsg(" \nProcessing " + str(iCnt) + " geodatabases", 0)
+if __name__ == "__main__":
+    try:
 
-    # initialize list of problem geodatabases
-    problemList = list()
+        # Script arguments...
+        # Skipping parameter 0 because that is only used for the ArcTool menu
+        inLoc = arcpy.GetParameterAsText(1)               # input folder
+        gdbList = arcpy.GetParameter(2)                   # list of geodatabases in the folder
+        inValuTbl = arcpy.GetParameterAsText(3)           # Source VALU1 table (national)
+        bOverwrite = arcpy.GetParameter(4)                # Overwrite existing tables. Default = False
+        workerCnt = 0
 
-    for i in range(0, iCnt):
-        gdbName = gdbList[i]
-        inputDB = os.path.join(inLoc, gdbName)
+        if arcpy.GetArgumentCount() > 5 and arcpy.GetParameterAsText(5) != "":
+            workerCnt = int(arcpy.GetParameterAsText(5))  # number of worker processes
 
-        if CopyData(inputDB, inValuTbl, bOverwrite) == False:
-            problemList.append(gdbName)
+        arcpy.OverwriteOutput = bOverwrite
 
-        #else:
-        #    PrintMsg("\t" + gdbName, 0)
+        iCnt = len(gdbList)
+        PrintMsg(" \nProcessing " + str(iCnt) + " geodatabases", 0)
 
-    if len(problemList) > 0:
-        PrintMsg("The following geodatabases encountered problems: " + ", ".join(problemList) + " \n ", 2)
+        # The worker processes need these functions from an importable module, not __main__
+        import gSSURGO_DistributeValuTable
 
-    else:
-        PrintMsg(" ", 0)
+        results = gSSURGO_DistributeValuTable.DistributeValuTable(inLoc, gdbList, inValuTbl, bOverwrite, workerCnt)
 
-except MyError, e:
-    # Example: raise MyError, "This is an error message"
-    PrintMsg(str(e) + " \n", 2)
+    except MyError, e:
+        # Example: raise MyError, "This is an error message"
+        PrintMsg(str(e) + " \n", 2)
 
-except:
-    errorMsg()
+    except:
+        errorMsg()
@@ -0,0 +1,417 @@
+# gSSURGO_DomainCodes.py
+#
+# Steve Peaslee, National Soil Survey Center
+#
+# Purpose:  Integer-coded rating domains for the dominant condition (DCD) aggregation of
+# class ratings in gSSURGO_CreateSoilMap and SDA_Mapping.
+#
+# AggregateCo_DCD_Domain looked up str(rating).upper() in dValues for every component record,
+# compared the rating with the whole domainValues list to check the case, then summed comppct in a
+# dictionary for each map unit and sorted those lists (SortData) to break ties. GetRatingDomain read
+# mdstatdomdet again for every map.
+#
+# Here the domain is coded once:
+#
+#   dDomain["values"]   the domainValues list (the same list object, so added values are shared)
+#   dDomain["codes"]    uppercase key -> code (position in the values list)
+#   dDomain["rank"]     tie-break rank for each code, for the higher and the lower tiebreak
+#
+# Each distinct rating is looked up once, the components get an integer code, and the sums of
+# comppct and the tie breaks are numpy operations on those codes. Ratings are decoded back to
+# the domain value only when the output table is written. A component with more than one rating
+# row is counted once.
+#
+# Run this script by itself (outside of ArcMap) to compare DominantCondition with the original
+# dictionary and SortData loop.
+#
+#     python gSSURGO_DomainCodes.py [mapunit count]
+#
+# 2017-11-08
+
+## ===================================================================================
+class MyError(Exception):
+    pass
+
+## ===================================================================================
+def PrintMsg(msg, severity=0):
+    # prints message to screen if run as a python script
+    # Adds tool message to the geoprocessor
+    #
+    #Split the message on \n first, so that if it's multiple lines, a GPMessage will be added for each line
+    try:
+        for string in msg.split('\n'):
+            #Add a geoprocessing message (in case this is run as a tool)
+            if severity == 0:
+                arcpy.AddMessage(string)
+
+            elif severity == 1:
+                arcpy.AddWarning(string)
+
+            elif severity == 2:
+                arcpy.AddMessage("    ")
+                arcpy.AddError(string)
+
+    except:
+        pass
+
+## ===================================================================================
+def errorMsg():
+    try:
+        tb = sys.exc_info()[2]
+        tbinfo = traceback.format_tb(tb)[0]
+        theMsg = tbinfo + "\n" + str(sys.exc_type)+ ": " + str(sys.exc_value)
+        PrintMsg(theMsg, 2)
+
+    except:
+        PrintMsg("Unhandled error in unHandledException method", 2)
+
+## ===================================================================================
+def ReadDomain(mdTable, whereClause):
+    # Domain choices from mdstatdomdet in choicesequence order. The choices are read once
+    # per table and where clause for each process. Returns a new list each time because
+    # the callers add the null and 'Not rated' values to it.
+    #
+    key = (mdTable, whereClause)
+
+    if not key in dDomainCache:
+        choices = list()
+        sc = (None, "ORDER BY choicesequence ASC")
+
+        with arcpy.da.SearchCursor(mdTable, ["choice", "choicesequence"], where_clause=whereClause, sql_clause=sc) as cur:
+            for rec in cur:
+                choices.append(rec[0])
+
+        dDomainCache[key] = choices
+
+    return list(dDomainCache[key])
+
+## ===================================================================================
+def DomainKey(val):
+    # Uppercase key used by dValues. Unicode ratings are not converted to str.
+    if isinstance(val, unicode):
+        return val.upper()
+
+    return str(val).upper()
+
+## ===================================================================================
+def TieRank(valueCnt):
+    # Rank for each code, lowest rank wins a tie. The higher tiebreak prefers the last domain
+    # value, the lower tiebreak the first.
+    codes = np.arange(valueCnt, dtype=np.int64)
+    return {True: codes[::-1].copy(), False: codes}
+
+## ===================================================================================
+def DomainCodes(domainValues):
+    # Code the domain values. When two values have the same uppercase key, the last one
+    # gets the code (as the dValues dictionary did).
+    dDomain = dict()
+    dDomain["values"] = domainValues
+    dDomain["codes"] = dict()
+
+    for i in range(len(domainValues)):
+        dDomain["codes"][DomainKey(domainValues[i])] = i
+
+    dDomain["rank"] = TieRank(len(domainValues))
+
+    return dDomain
+
+## ===================================================================================
+def MatchCase(dDomain, val):
+    # Replace the domain values that differ from the rating only in case (the maplegendxml
+    # values are uppercase). Returns True if the domain was changed.
+    values = dDomain["values"]
+
+    if val in values:
+        return False
+
+    key = DomainKey(val)
+    bChanged = False
+
+    for i in range(len(values)):
+        if DomainKey(values[i]) == key:
+            values[i] = val
+            bChanged = True
+
+    return bChanged
+
+## ===================================================================================
+def EncodeRatings(dDomain, ratings):
+    # Domain code for each rating. Each distinct rating is looked up once, in the order read.
+    # Ratings that are not in the domain are added to the end of it.
+    #
+    # Returns the code array, the values added to the domain and the values whose case was
+    # corrected in the domain.
+    #
+    values = dDomain["values"]
+    codes = dDomain["codes"]
+    dLookup = dict()
+    added = list()
+    fixed = list()
+    ratingCodes = list()
+
+    for val in ratings:
+        try:
+            ratingCodes.append(dLookup[val])
+
+        except KeyError:
+            key = DomainKey(val)
+
+            if key in codes:
+                if MatchCase(dDomain, val):
+                    fixed.append(val)
+
+            else:
+                codes[key] = len(values)
+                values.append(val)
+                added.append(val)
+
+            dLookup[val] = codes[key]
+            ratingCodes.append(codes[key])
+
+    if len(added) > 0:
+        dDomain["rank"] = TieRank(len(values))
+
+    return np.array(ratingCodes, dtype=np.int64), added, fixed
+
+## ===================================================================================
+def KeyCodes(keys):
+    # Sorted distinct keys and the position of each key in that list
+    keyArray = np.array(keys)
+
+    if len(keyArray) == 0:
+        return keyArray, np.zeros(0, dtype=np.int64)
+
+    return np.unique(keyArray, return_inverse=True)
+
+## ===================================================================================
+def SegmentStarts(keys):
+    # First position of each run of equal keys
+    if len(keys) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    return np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+
+## ===================================================================================
+def ComponentCodes(coIds, codes, method):
+    # One code for each component when a component has several rating rows.
+    #
+    #   first   the first row read
+    #   max     the highest code
+    #   min     the lowest code
+    #
+    # Returns the row of the first record for each component and the component code, in
+    # component id order.
+    #
+    order = np.argsort(coIds, kind="mergesort")
+    starts = SegmentStarts(coIds[order])
+    sortedCodes = codes[order]
+
+    if len(starts) == 0:
+        return starts, sortedCodes
+
+    if method == "max":
+        coCodes = np.maximum.reduceat(sortedCodes, starts)
+
+    elif method == "min":
+        coCodes = np.minimum.reduceat(sortedCodes, starts)
+
+    else:
+        coCodes = sortedCodes[starts]
+
+    return order[starts], coCodes
+
+## ===================================================================================
+def DominantCondition(muIds, pct, codes, rank):
+    # Dominant condition for each map unit: the code with the highest sum of component
+    # percent. Equal sums go to the code with the lowest rank. Components with a null
+    # percent are skipped.
+    #
+    # muIds, pct and codes have one value per component. rank is dDomain["rank"][bHigh].
+    #
+    # Returns the map unit id, the sum of component percent and the code for each map unit
+    # that has a rated component, in map unit id order.
+    #
+    bRated = ~np.isnan(pct)
+    muIds = muIds[bRated]
+    codes = codes[bRated]
+    pct = pct[bRated]
+
+    if len(muIds) == 0:
+        return muIds, pct, codes
+
+    # Sum comppct for each map unit and code
+    codeCnt = max(len(rank), int(codes.max()) + 1)
+    grpKeys, grpInv = np.unique(muIds.astype(np.int64) * codeCnt + codes, return_inverse=True)
+    grpPct = np.bincount(grpInv, weights=pct)
+    grpMu = grpKeys // codeCnt
+    grpCodes = grpKeys % codeCnt
+
+    order = np.lexsort((rank[grpCodes], -grpPct, grpMu))
+    best = order[SegmentStarts(grpMu[order])]
+
+    return grpMu[best], grpPct[best], grpCodes[best]
+
+## ===================================================================================
+def MapunitRatings(mukeys, cokeys, comppct, codes, rank, method="first"):
+    # Dominant condition for component records read in MUKEY ASC, COMPPCT_R DESC order.
+    # mukeys, cokeys and comppct are the cursor columns, codes is from EncodeRatings and
+    # method is the ComponentCodes choice for components with more than one record.
+    #
+    # Returns (mukey, comppct sum, code) for each map unit in MUKEY order. Map units without a
+    # rated component have None for comppct and code.
+    #
+    muList, muIds = KeyCodes(mukeys)
+    coList, coIds = KeyCodes(cokeys)
+    coRows, coCodes = ComponentCodes(coIds, codes, method)
+    pct = np.asarray(comppct, dtype=np.float64)[coRows]
+    muRated, muPct, muCodes = DominantCondition(muIds[coRows], pct, coCodes, rank)
+
+    # Rated map units go to their position in muList, the rest keep None
+    outPct = np.empty(len(muList), dtype=object)
+    outCodes = np.empty(len(muList), dtype=object)
+    outPct[muRated] = muPct.astype(np.int64).tolist()
+    outCodes[muRated] = muCodes.astype(np.int64).tolist()
+
+    return zip(muList.tolist(), outPct.tolist(), outCodes.tolist())
+
+## ===================================================================================
+def RefDominantCondition(rows, dValues, domainValues, bHigh):
+    # The original dictionary loop (AggregateCo_DCD_Domain): first row for each component,
+    # comppct summed for each dValues index and SortData for the tie break.
+    dComp = dict()
+    dCompPct = dict()
+    dMapunit = dict()
+
+    for mukey, cokey, compPct, rating in rows:
+        try:
+            dMapunit[mukey].append(cokey)
+
+        except:
+            dMapunit[mukey] = [cokey]
+
+        if not cokey in dComp:
+            dComp[cokey] = dValues[str(rating).upper()][0]
+            dCompPct[cokey] = compPct
+
+    dResult = dict()
+
+    for mukey, cokeys in dMapunit.items():
+        dRating = dict()
+
+        for cokey in cokeys:
+            ratingIndx = dComp[cokey]
+
+            if ratingIndx in dRating:
+                dRating[ratingIndx] = dRating[ratingIndx] + dCompPct[cokey]
+
+            else:
+                dRating[ratingIndx] = dCompPct[cokey]
+
+        muVals = [[compPct, ratingIndx] for ratingIndx, compPct in dRating.items()]
+        compPct, ratingIndx = sorted(sorted(muVals, key = lambda x : x[1], reverse=bHigh), key = lambda x : x[0], reverse=True)[0]
+        dResult[mukey] = [compPct, domainValues[ratingIndx]]
+
+    return dResult
+
+## ===================================================================================
+def CreateRows(muCnt, domainValues, seed=1):
+    # Synthetic component rows in MUKEY ASC, COMPPCT_R DESC order:
+    # mukey, cokey, comppct, rating. One row per component, because the original loop added
+    # the comppct of a component once for each of its rows.
+    random.seed(seed)
+    rows = list()
+    classes = domainValues + [val.upper() for val in domainValues if not val is None]
+
+    for m in range(muCnt):
+        mukey = str(300000 + m)
+        pctLeft = 100
+        comps = list()
+
+        for c in range(random.randint(1, 6)):
+            comppct = min(pctLeft, random.choice([5, 10, 15, 20, 25, 30, 40, 50]))
+            pctLeft -= comppct
+            comps.append((comppct, mukey + str(c).zfill(2)))
+
+        comps.sort(key = lambda x : x[0], reverse=True)
+
+        for comppct, cokey in comps:
+            rows.append([mukey, cokey, comppct, random.choice(classes)])
+
+    return rows
+
+## ===================================================================================
+def Benchmark(muCnt):
+    # Compare DominantCondition with the original loop for both tie breaks
+    domain = ["None", "Very rare", "Rare", "Occasional", "Frequent", "Very frequent"]
+    diffCnt = 0
+
+    for bHigh in [True, False]:
+        if bHigh:
+            domainValues = [None] + domain
+
+        else:
+            domainValues = domain + [None]
+
+        dValues = dict()
+
+        for i in range(len(domainValues)):
+            dValues[str(domainValues[i]).upper()] = [i, domainValues[i]]
+
+        rows = CreateRows(muCnt, domainValues)
+
+        # Original loop
+        t0 = time.time()
+        dRef = RefDominantCondition(rows, dValues, list(domainValues), bHigh)
+        refTime = time.time() - t0
+
+        # Coded domain
+        t0 = time.time()
+        dDomain = DomainCodes(list(domainValues))
+        codes, added, fixed = EncodeRatings(dDomain, [rec[3] for rec in rows])
+        muRatings = MapunitRatings([rec[0] for rec in rows], [rec[1] for rec in rows], [rec[2] for rec in rows], codes, dDomain["rank"][bHigh])
+        arrayTime = time.time() - t0
+
+        dArray = dict()
+
+        for mukey, compPct, code in muRatings:
+            dArray[mukey] = [compPct, dDomain["values"][code]]
+
+        mismatches = len(set(dArray.keys()) ^ set(dRef.keys()))
+
+        for mukey, refVals in dRef.items():
+            # The coded domain has the case of the component data, the original loop the domain case
+            if mukey in dArray and (refVals[0] != dArray[mukey][0] or DomainKey(refVals[1]) != DomainKey(dArray[mukey][1])):
+                mismatches += 1
+
+        print "DCD_Domain  tiebreak %-5s  %d rows  loop %7.3fs  arrays %7.3fs  %5.1fx  mismatches %d" % \
+              (("high" if bHigh else "low"), len(rows), refTime, arrayTime, refTime / max(arrayTime, 1e-6), mismatches)
+        diffCnt += mismatches
+
+    return diffCnt
+
+## ===================================================================================
+## MAIN
+## ===================================================================================
+
+# Import system modules
+import sys, os, time, random, traceback
+import numpy as np
+
+try:
+    import arcpy
+
+except ImportError:
+    # arcpy is only needed for ReadDomain and messages. The benchmark runs without it.
+    arcpy = None
+
+# mdstatdomdet choices already read in this process, keyed on (table, where clause)
+dDomainCache = dict()
+
+if __name__ == "__main__":
+    # Standalone benchmark
+    muCnt = 50000
+
+    if len(sys.argv) > 1:
+        muCnt = int(sys.argv[1])
+
+    Benchmark(muCnt)
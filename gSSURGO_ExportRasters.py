@@ -61,69 +61,14 @@ def Number_Format(num, places=0, bCommas=True):
         return "???"
 
 
-## ===================================================================================
-def get_random_color(pastel_factor=0.5):
-    # Part of generate_random_color
-    try:
-        newColor = [int(255 *(x + pastel_factor)/(1.0 + pastel_factor)) for x in [random.uniform(0,1.0) for i in [1,2,3]]]
-
-        return newColor
-
-    except:
-        errorMsg()
-        return [0,0,0]
-
-## ===================================================================================
-def color_distance(c1,c2):
-    # Part of generate_random_color
-    return sum([abs(x[0] - x[1]) for x in zip(c1,c2)])
-
-## ===================================================================================
-def generate_new_color(existing_colors, pastel_factor=0.5):
-    # Part of generate_random_color
-    try:
-        #PrintMsg(" \nExisting colors: " + str(existing_colors) + "; PF: " + str(pastel_factor), 1)
-
-        max_distance = None
-        best_color = None
-
-        for i in range(0,100):
-            color = get_random_color(pastel_factor)
-
-
-            if not color in existing_colors:
-                color.append(255) # add transparency level
-                return color
-
-            best_distance = min([color_distance(color,c) for c in existing_colors])
-
-            if not max_distance or best_distance > max_distance:
-                max_distance = best_distance
-                best_color = color
-                best_color.append(255)
-
-            return best_color
-
-    except:
-        errorMsg()
-        return None
-
 ## ===================================================================================
 def rand_rgb_colors(num):
-    # Generate a random list of rgb values
-    # 2nd argument in generate_new_colors is the pastel factor. 0 to 1. Higher value -> more pastel.
+    # Generate a list of distinct rgb values (gSSURGO_Palette). The same number of values always
+    # gets the same colors.
+    # 2nd argument in DistinctColors is the pastel factor. 0 to 1. Higher value -> more pastel.
 
     try:
-        colors = []
-        # PrintMsg(" \nGenerating " + str(num - 1) + " new colors", 1)
-
-        for i in range(0, num):
-            newColor = generate_new_color(colors, 0.1)
-            colors.append(newColor)
-
-        # PrintMsg(" \nColors: " + str(colors), 1)
-
-        return colors
+        return gSSURGO_Palette.DistinctColors(num, 0.1)
 
     except:
         errorMsg()
@@ -597,8 +542,8 @@ def CreateRasterLayers(sdvLayers, inputRaster, outputFolder, bPyramids, cellFact
                     # Get a list of random RGB colors to assign to each legend value
                     sdvCnt = int(arcpy.GetCount_management(os.path.join(gdb, sdvTblName)).getOutput(0))
 
-                    # Get random RGB colors for use in this unique values legend        
-                    rgbColors = rand_rgb_colors(sdvCnt)
+                    # Get RGB colors for use in this unique values legend. row starts at 1.
+                    rgbColors = rand_rgb_colors(sdvCnt + 1)
 
                     with arcpy.da.SearchCursor(os.path.join(gdb, sdvTblName), [bName], sql_clause=sqlClause, where_clause=whereClause) as sdvCur:
                         
@@ -1172,6 +1117,7 @@ def CreateRasterLayers(sdvLayers, inputRaster, outputFolder, bPyramids, cellFact
 ## ====================================== Main Body ==================================
 # Import modules
 import sys, string, os, locale, traceback, arcpy, json, random
+import gSSURGO_Palette
 from arcpy import env
 import xml.etree.cElementTree as ET
 
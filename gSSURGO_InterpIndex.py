@@ -0,0 +1,334 @@
+# gSSURGO_InterpIndex.py
+#
+# Steve Peaslee, National Soil Survey Center
+#
+# Purpose:  Rule key index for the COINTERP table of a gSSURGO database.
+#
+# Every interpretation map (gSSURGO_CreateSoilMap, InterpDataMapping) selects its COINTERP records
+# with a where clause on RULEKEY or MRULENAME. On a national database that is a scan through a
+# multi-gigabyte table to find a small fraction of the records.
+#
+# The SDV_InterpIndex table has the OBJECTID range of the records for each rule:
+#
+#   KEYFIELD    'MRULEKEY' (all records for a main rule, including the reasons) or 'RULEKEY'
+#   KEYVALUE    the rule key
+#   FIRSTOID, LASTOID, ROWCOUNT
+#
+# RangeQuery adds the ranges to the where clause, so the geodatabase only reads the records between
+# FIRSTOID and LASTOID. When the table is clustered (ClusterTable), the records for a main rule are
+# together and the range holds nothing else. SSURGO_Convert_to_Geodatabase clusters the table and
+# builds the index after a new database is created. For an older database BuildIndex can index the
+# table as it is, but the ranges will be wide unless the rules were imported together.
+#
+# The index is versioned the same way as gSSURGO_ComponentIndex (SDV_IndexVersion), with the number of
+# COINTERP records added to the version. If the data has changed, RangeQuery returns the where clause
+# unchanged until the index is built again. The index is only read, so any number of processes (the
+# gSSURGO_SoilMapBatch workers) can each load their own interpretation at the same time.
+#
+# 2017-11-09
+
+## ===================================================================================
+class MyError(Exception):
+    pass
+
+## ===================================================================================
+def PrintMsg(msg, severity=0):
+    # prints message to screen if run as a python script
+    # Adds tool message to the geoprocessor
+    #
+    #Split the message on \n first, so that if it's multiple lines, a GPMessage will be added for each line
+    try:
+        for string in msg.split('\n'):
+            #Add a geoprocessing message (in case this is run as a tool)
+            if severity == 0:
+                arcpy.AddMessage(string)
+
+            elif severity == 1:
+                arcpy.AddWarning(string)
+
+            elif severity == 2:
+                arcpy.AddMessage("    ")
+                arcpy.AddError(string)
+
+    except:
+        pass
+
+## ===================================================================================
+def errorMsg():
+    try:
+        tb = sys.exc_info()[2]
+        tbinfo = traceback.format_tb(tb)[0]
+        theMsg = tbinfo + "\n" + str(sys.exc_type)+ ": " + str(sys.exc_value)
+        PrintMsg(theMsg, 2)
+
+    except:
+        PrintMsg("Unhandled error in unHandledException method", 2)
+
+## ===================================================================================
+def InterpVersion(gdb):
+    # Version of the COINTERP data: the component index version plus the number of records
+    try:
+        dbVersion = gSSURGO_ComponentIndex.DatabaseVersion(gdb)
+
+        if dbVersion == "":
+            return ""
+
+        interpCnt = int(arcpy.GetCount_management(os.path.join(gdb, "cointerp")).getOutput(0))
+
+        return hashlib.md5(repr((dbVersion, interpCnt))).hexdigest()
+
+    except:
+        errorMsg()
+        return ""
+
+## ===================================================================================
+def RuleKeys(distinterpTbl, ruleName):
+    # List of rule keys for an interpretation name, from the distinterpmd table
+    ruleKeys = list()
+    whereClause = "rulename = '" + ruleName + "'"
+
+    with arcpy.da.SearchCursor(distinterpTbl, ["rulekey"], where_clause=whereClause) as cur:
+        for rec in cur:
+            ruleKey = rec[0].encode('ascii')
+
+            if not ruleKey in ruleKeys:
+                ruleKeys.append(ruleKey)
+
+    return ruleKeys
+
+## ===================================================================================
+def ClusterTable(gdb):
+    # Rewrite the COINTERP table in MRULEKEY, RULEKEY, COKEY order so that the records for each
+    # interpretation are together, then build the index. The table keeps its schema and attribute
+    # indexes. Run this before the relationship classes are created.
+    #
+    try:
+        interpTbl = os.path.join(gdb, "cointerp")
+        tmpTbl = os.path.join(gdb, "xxCointerpSorted")
+        flds = [fld.name for fld in arcpy.ListFields(interpTbl) if fld.type != "OID"]
+        sqlClause = (None, "ORDER BY MRULEKEY ASC, RULEKEY ASC, COKEY ASC")
+
+        arcpy.SetProgressorLabel("Sorting cointerp records by rule")
+
+        if arcpy.Exists(tmpTbl):
+            arcpy.Delete_management(tmpTbl)
+
+        arcpy.CreateTable_management(gdb, os.path.basename(tmpTbl), interpTbl)
+
+        with arcpy.da.SearchCursor(interpTbl, flds, sql_clause=sqlClause) as cur:
+            with arcpy.da.InsertCursor(tmpTbl, flds) as ocur:
+                for rec in cur:
+                    ocur.insertRow(rec)
+
+        arcpy.TruncateTable_management(interpTbl)
+
+        with arcpy.da.SearchCursor(tmpTbl, flds) as cur:
+            with arcpy.da.InsertCursor(interpTbl, flds) as ocur:
+                for rec in cur:
+                    ocur.insertRow(rec)
+
+        arcpy.Delete_management(tmpTbl)
+
+        return BuildIndex(gdb)
+
+    except:
+        errorMsg()
+        PrintMsg(" \nUnable to sort the cointerp table by rule", 1)
+
+        try:
+            # Keep the sorted copy unless every record made it back into cointerp
+            if arcpy.Exists(tmpTbl):
+                if int(arcpy.GetCount_management(tmpTbl).getOutput(0)) == int(arcpy.GetCount_management(interpTbl).getOutput(0)):
+                    arcpy.Delete_management(tmpTbl)
+
+                else:
+                    PrintMsg("\tThe sorted cointerp records are in " + tmpTbl, 1)
+
+        except:
+            pass
+
+        return None
+
+## ===================================================================================
+def BuildIndex(gdb, version=None):
+    # Read the OBJECTID, MRULEKEY and RULEKEY of every COINTERP record and save the range for
+    # each rule in the SDV_InterpIndex table. Returns the index (see LoadIndex).
+    #
+    try:
+        if version is None:
+            version = InterpVersion(gdb)
+
+        arcpy.SetProgressorLabel("Creating cointerp rule index")
+        interpTbl = os.path.join(gdb, "cointerp")
+        dIndex = {"MRULEKEY":dict(), "RULEKEY":dict()}
+
+        with arcpy.da.SearchCursor(interpTbl, ["OID@", "MRULEKEY", "RULEKEY"]) as cur:
+            for oid, mrulekey, rulekey in cur:
+                for keyField, keyValue in [("MRULEKEY", mrulekey), ("RULEKEY", rulekey)]:
+                    try:
+                        keyRange = dIndex[keyField][keyValue]
+
+                        if oid < keyRange[0]:
+                            keyRange[0] = oid
+
+                        elif oid > keyRange[1]:
+                            keyRange[1] = oid
+
+                        keyRange[2] += 1
+
+                    except KeyError:
+                        dIndex[keyField][keyValue] = [oid, oid, 1]
+
+        try:
+            # Save the index with the database. If the database cannot be written to, the index
+            # is only kept in memory.
+            idxTbl = os.path.join(gdb, indexTable)
+
+            if arcpy.Exists(idxTbl):
+                arcpy.Delete_management(idxTbl)
+
+            arcpy.CreateTable_management(gdb, indexTable)
+            arcpy.AddField_management(idxTbl, "KEYFIELD", "TEXT", "", "", 8)
+            arcpy.AddField_management(idxTbl, "KEYVALUE", "TEXT", "", "", 30)
+            arcpy.AddField_management(idxTbl, "FIRSTOID", "LONG")
+            arcpy.AddField_management(idxTbl, "LASTOID", "LONG")
+            arcpy.AddField_management(idxTbl, "ROWCOUNT", "LONG")
+
+            with arcpy.da.InsertCursor(idxTbl, indexFields) as cur:
+                for keyField in sorted(dIndex.keys()):
+                    for keyValue, keyRange in sorted(dIndex[keyField].items()):
+                        cur.insertRow([keyField, keyValue] + keyRange)
+
+            gSSURGO_ComponentIndex.WriteVersion(gdb, indexTable, version)
+
+        except:
+            PrintMsg("\tUnable to save " + indexTable + " in " + os.path.basename(gdb), 1)
+
+        dLoaded[gdb] = [version, dIndex, arcpy.Describe(interpTbl).OIDFieldName]
+
+        return dIndex
+
+    except MyError, e:
+        PrintMsg(str(e), 2)
+        return None
+
+    except:
+        errorMsg()
+        return None
+
+## ===================================================================================
+def LoadIndex(gdb):
+    # Rule index for gdb:  {keyfield:{keyvalue:[firstoid, lastoid, rowcount]}}
+    #
+    # The index is read from SDV_InterpIndex. Returns None if there is no index or if it is out of
+    # date. Building the index reads the whole table, so it is left to BuildIndex.
+    #
+    try:
+        version = InterpVersion(gdb)
+
+        if version == "":
+            return None
+
+        if gdb in dLoaded:
+            if dLoaded[gdb][0] == version:
+                return dLoaded[gdb][1]
+
+            del dLoaded[gdb]
+
+        if gSSURGO_ComponentIndex.ReadVersion(gdb, indexTable) != version:
+            return None
+
+        dIndex = {"MRULEKEY":dict(), "RULEKEY":dict()}
+
+        with arcpy.da.SearchCursor(os.path.join(gdb, indexTable), indexFields) as cur:
+            for keyField, keyValue, firstOid, lastOid, rowCnt in cur:
+                dIndex[keyField][keyValue] = [firstOid, lastOid, rowCnt]
+
+        dLoaded[gdb] = [version, dIndex, arcpy.Describe(os.path.join(gdb, "cointerp")).OIDFieldName]
+
+        return dIndex
+
+    except:
+        errorMsg()
+        return None
+
+## ===================================================================================
+def MergeRanges(ranges):
+    # Combine overlapping or adjacent [firstoid, lastoid] ranges
+    merged = list()
+
+    for firstOid, lastOid in sorted(ranges):
+        if len(merged) > 0 and firstOid <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], lastOid)
+
+        else:
+            merged.append([firstOid, lastOid])
+
+    return merged
+
+## ===================================================================================
+def RangeQuery(gdb, keyField, keyValues, whereClause, tblPrefix=""):
+    # Add the OBJECTID ranges of the rules in keyValues to a COINTERP where clause.
+    #
+    # keyField is 'MRULEKEY' or 'RULEKEY'. tblPrefix qualifies the OBJECTID field for a query
+    # table (for example 'COINTERP.'). The original where clause is returned when there is
+    # no current index or none of the rules are in it.
+    #
+    try:
+        dIndex = LoadIndex(gdb)
+
+        if dIndex is None:
+            return whereClause
+
+        ranges = list()
+
+        for keyValue in keyValues:
+            if keyValue in dIndex[keyField]:
+                ranges.append(dIndex[keyField][keyValue][0:2])
+
+        if len(ranges) == 0:
+            return whereClause
+
+        ranges = MergeRanges(ranges)
+
+        if len(ranges) > maxRanges:
+            # Too many pieces to be worth it. Let the where clause do the work.
+            return whereClause
+
+        oidFld = tblPrefix + dLoaded[gdb][2]
+        rangeList = list()
+
+        for firstOid, lastOid in ranges:
+            rangeList.append("(" + oidFld + " >= " + str(firstOid) + " AND " + oidFld + " <= " + str(lastOid) + ")")
+
+        if len(rangeList) == 1:
+            rangeSQL = rangeList[0]
+
+        else:
+            rangeSQL = "(" + " OR ".join(rangeList) + ")"
+
+        if whereClause in [None, ""]:
+            return rangeSQL
+
+        return rangeSQL + " AND " + whereClause
+
+    except:
+        errorMsg()
+        return whereClause
+
+## ===================================================================================
+## MAIN
+## ===================================================================================
+
+# Import system modules
+import arcpy, sys, os, traceback, hashlib
+import gSSURGO_ComponentIndex
+
+indexTable = "SDV_InterpIndex"
+indexFields = ["KEYFIELD", "KEYVALUE", "FIRSTOID", "LASTOID", "ROWCOUNT"]
+
+# Largest number of separate OBJECTID ranges put into one where clause
+maxRanges = 20
+
+# Rule indexes already loaded in this process, keyed on database: [version, dIndex, OID field name]
+dLoaded = dict()
@@ -0,0 +1,363 @@
+# gSSURGO_JoinStream.py
+#
+# Steve Peaslee, National Soil Survey Center
+#
+# Purpose:  Stream the mapunit - component - horizon join into the aggregation functions of
+#           gSSURGO_CreateSoilMap without writing and re-reading the SDV_Data table.
+#
+# CreateRatingTable3, CreateRatingTable3S, CreateRatingTable4S and CreateSoilMoistureTable used to
+# insert every joined row into SDV_Data. The Aggregate functions then read SDV_Data back with a
+# where clause and an ORDER BY, so each map wrote, indexed and sorted the whole join on disk.
+#
+# Those functions now register a row function instead. The row function is a generator that walks
+# the MAPUNIT records and the component, horizon and rating dictionaries that are already in memory
+# and yields rows in the SDV_Data field order. The join is produced in MUKEY ASC, COMPPCT_R DESC,
+# HZDEPT_R ASC order because the dictionaries were read with those sql clauses. The horizons of two
+# components with the same COMPPCT_R stay together instead of being interleaved by depth. Every
+# Aggregate function collects its horizons by COKEY, so that does not change any rating.
+#
+# ReadRows stands in for arcpy.da.SearchCursor on the initial table:
+#
+#   where clause    Evaluated row by row using the parser in gSSURGO_SoilCache. Comparisons with
+#                   null are unknown, as in SQL.
+#
+#   ORDER BY        If the ORDER BY is a leading part of the join order the rows are streamed
+#                   as they are generated. Any other ORDER BY collects the selected rows and sorts
+#                   them in memory. Nulls sort first in ascending order, the same as a file
+#                   geodatabase.
+#
+# Anything that cannot be handled here (DISTINCT, an unknown field, unsupported SQL) returns None.
+# The caller then calls Materialize, which writes the rows into the table, and reads it with a cursor.
+#
+# The SDV_Data table itself is still created, empty, because CreateOutputTable uses it as the schema
+# template. Setting bSaveInitialTable in gSSURGO_CreateSoilMap also fills it, for debugging or for
+# the tabular reports that read SDV_Data after the map is made.
+#
+# 2017-10-30
+
+## ===================================================================================
+class MyError(Exception):
+    pass
+
+## ===================================================================================
+class JoinCursor(object):
+    # Read-only stand-in for arcpy.da.SearchCursor so that the Aggregate functions can keep
+    # their 'with ... as cur:' blocks.
+    def __init__(self, rowFunction):
+        self.rowFunction = rowFunction
+        self.rows = iter(rowFunction())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, tb):
+        return False
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        return self.rows.next()
+
+    def reset(self):
+        self.rows = iter(self.rowFunction())
+
+## ===================================================================================
+def PrintMsg(msg, severity=0):
+    # prints message to screen if run as a python script
+    # Adds tool message to the geoprocessor
+    #
+    #Split the message on \n first, so that if it's multiple lines, a GPMessage will be added for each line
+    try:
+        for string in msg.split('\n'):
+            #Add a geoprocessing message (in case this is run as a tool)
+            if severity == 0:
+                arcpy.AddMessage(string)
+
+            elif severity == 1:
+                arcpy.AddWarning(string)
+
+            elif severity == 2:
+                arcpy.AddMessage("    ")
+                arcpy.AddError(string)
+
+    except:
+        pass
+
+## ===================================================================================
+def errorMsg():
+    try:
+        tb = sys.exc_info()[2]
+        tbinfo = traceback.format_tb(tb)[0]
+        theMsg = tbinfo + "\n" + str(sys.exc_type)+ ": " + str(sys.exc_value)
+        PrintMsg(theMsg, 2)
+
+    except:
+        PrintMsg("Unhandled error in unHandledException method", 2)
+
+## ===================================================================================
+def ClearJoin():
+    # Forget the registered join. Called whenever a new initial table is created.
+    dJoin.clear()
+
+## ===================================================================================
+def RegisterJoin(initialTbl, fields, rowFunction, joinOrder):
+    # Register the row function for an initial table.
+    #
+    # fields       SDV_Data field names, in the order the row function yields them
+    # rowFunction  returns a new generator of joined rows each time it is called
+    # joinOrder    list of (field, bDescending) describing the order of the generated rows
+    #
+    dJoin.clear()
+    dJoin["table"] = os.path.normcase(os.path.normpath(initialTbl))
+    dJoin["fields"] = [fld.upper() for fld in fields]
+    dJoin["rows"] = rowFunction
+    dJoin["order"] = list(joinOrder)
+    dJoin["count"] = None
+    dJoin["saved"] = False
+
+## ===================================================================================
+def IsStreamed(initialTbl):
+    # True if initialTbl has a registered join
+    return len(dJoin) > 0 and dJoin["table"] == os.path.normcase(os.path.normpath(initialTbl))
+
+## ===================================================================================
+def RowCount(initialTbl):
+    # Number of joined rows. Counted once by running the generator.
+    if not IsStreamed(initialTbl):
+        return None
+
+    if dJoin["count"] is None:
+        iCnt = 0
+
+        for row in dJoin["rows"]():
+            iCnt += 1
+
+        dJoin["count"] = iCnt
+
+    return dJoin["count"]
+
+## ===================================================================================
+def CompareValue(val, op, literal):
+    # SQL comparison of one value with a literal. Returns None for a null value, and for a
+    # text value compared with a number or a number compared with text.
+    if val is None:
+        return None
+
+    if isinstance(literal, float) == isinstance(val, basestring):
+        return None
+
+    return dOperators[op](val, literal)
+
+## ===================================================================================
+def RowFilter(tree, dIndex):
+    # Convert a where clause tree from gSSURGO_SoilCache.ParseSQL into a function that returns
+    # True, False or None (unknown) for one row.
+    if tree[0] in ["and", "or"]:
+        left = RowFilter(tree[1], dIndex)
+        right = RowFilter(tree[2], dIndex)
+
+        if tree[0] == "and":
+            def test(row):
+                a = left(row)
+
+                if a == False:
+                    return False
+
+                b = right(row)
+
+                if b == False:
+                    return False
+
+                if a is None or b is None:
+                    return None
+
+                return True
+
+        else:
+            def test(row):
+                a = left(row)
+
+                if a == True:
+                    return True
+
+                b = right(row)
+
+                if b == True:
+                    return True
+
+                if a is None or b is None:
+                    return None
+
+                return False
+
+        return test
+
+    if tree[0] == "not":
+        inner = RowFilter(tree[1], dIndex)
+
+        def test(row):
+            a = inner(row)
+
+            if a is None:
+                return None
+
+            return not a
+
+        return test
+
+    operandType, colName = tree[1]
+
+    if not colName in dIndex:
+        raise MyError, "Where clause field " + colName + " is not in the initial table"
+
+    i = dIndex[colName]
+
+    if operandType == "upper":
+        def value(row):
+            if row[i] is None:
+                return None
+
+            return row[i].upper()
+
+    else:
+        def value(row):
+            return row[i]
+
+    if tree[0] == "null":
+        return lambda row : row[i] is None
+
+    if tree[0] == "in":
+        values = tree[2]
+
+        def test(row):
+            val = value(row)
+
+            if val is None:
+                return None
+
+            for literal in values:
+                if CompareValue(val, "=", literal):
+                    return True
+
+            return False
+
+        return test
+
+    op, literal = tree[2], tree[3]
+    return lambda row : CompareValue(value(row), op, literal)
+
+## ===================================================================================
+def SelectRows(rowFunction, rowFilter, idx):
+    # Generator of projected rows that pass the where clause
+    for row in rowFunction():
+        if rowFilter is None or rowFilter(row) == True:
+            yield tuple([row[i] for i in idx])
+
+## ===================================================================================
+def ReadRows(initialTbl, inFlds, whereClause=None, sqlClause=None):
+    # Cursor on the registered join for initialTbl. Returns None if the request cannot be handled
+    # in memory and the caller should materialize the table and use arcpy.da.SearchCursor.
+    #
+    try:
+        if not IsStreamed(initialTbl):
+            return None
+
+        dIndex = dict()
+
+        for i in range(len(dJoin["fields"])):
+            dIndex[dJoin["fields"][i]] = i
+
+        if isinstance(inFlds, basestring):
+            inFlds = [inFlds]
+
+        fldNames = [fld.strip('"').upper() for fld in inFlds]
+
+        for fld in fldNames:
+            if not fld in dIndex:
+                raise MyError, "Field " + fld + " is not in the initial table"
+
+        rowFilter = None
+
+        if not whereClause in [None, ""]:
+            rowFilter = RowFilter(gSSURGO_SoilCache.ParseSQL(gSSURGO_SoilCache.TokenizeSQL(whereClause)), dIndex)
+
+        orderList = gSSURGO_SoilCache.ParseOrderBy(sqlClause)
+
+        if orderList is None:
+            raise MyError, "Unsupported sql_clause: " + str(sqlClause)
+
+        for fld, bDesc in orderList:
+            if not fld in dIndex:
+                raise MyError, "ORDER BY field " + fld + " is not in the initial table"
+
+        rowFunction = dJoin["rows"]
+        idx = [dIndex[fld] for fld in fldNames]
+
+        if orderList == dJoin["order"][0:len(orderList)]:
+            # Rows are generated in this order already
+            return JoinCursor(lambda : SelectRows(rowFunction, rowFilter, idx))
+
+        # Collect the selected rows and sort them, one stable sort per ORDER BY field starting
+        # with the last one. The join order decides ties.
+        rows = [row for row in rowFunction() if rowFilter is None or rowFilter(row) == True]
+
+        for fld, bDesc in reversed(orderList):
+            i = dIndex[fld]
+            rows.sort(key = lambda row : (not row[i] is None, row[i]), reverse=bDesc)
+
+        selected = [tuple([row[i] for i in idx]) for row in rows]
+        del rows
+        return JoinCursor(lambda : selected)
+
+    except MyError, e:
+        # Not handled here. The caller falls back to the table.
+        return None
+
+    except:
+        errorMsg()
+        return None
+
+## ===================================================================================
+def Materialize(initialTbl, bKeepJoin=False):
+    # Write the registered join into initialTbl. Unless bKeepJoin is set, later reads
+    # use the table instead of the join. Returns the number of rows in the table.
+    try:
+        if not IsStreamed(initialTbl):
+            return 0
+
+        if not dJoin["saved"]:
+            iCnt = 0
+
+            with arcpy.da.InsertCursor(initialTbl, dJoin["fields"]) as ocur:
+                for row in dJoin["rows"]():
+                    ocur.insertRow(row)
+                    iCnt += 1
+
+            dJoin["count"] = iCnt
+            dJoin["saved"] = True
+
+        iCnt = dJoin["count"]
+
+        if not bKeepJoin:
+            ClearJoin()
+
+        return iCnt
+
+    except:
+        errorMsg()
+        ClearJoin()
+        return 0
+
+## ===================================================================================
+## MAIN
+## ===================================================================================
+
+# Import system modules
+import arcpy, sys, os, traceback, operator
+import gSSURGO_SoilCache
+
+# The join registered for the current initial table
+dJoin = dict()
+
+dOperators = {"=":operator.eq, "<>":operator.ne, "!=":operator.ne, "<":operator.lt, "<=":operator.le, ">":operator.gt, ">=":operator.ge}
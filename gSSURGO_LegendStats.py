@@ -0,0 +1,526 @@
+# gSSURGO_LegendStats.py
+#
+# Steve Peaslee, National Soil Survey Center
+#
+# Purpose:  Class breaks for numeric map legends (gSSURGO_CreateSoilMap)
+#
+# GetNumericLegend and ClassBreaksJSON found the range of the ratings with min() and max() on the python list
+# of output values and then stepped through equal intervals. This module does the statistics on NumPy arrays:
+#
+#   EqualInterval    classCnt classes of the same width between the lowest and highest rating
+#   Quantile         about the same number of map units in each class
+#   NaturalBreaks    Jenks natural breaks (Fisher's exact method, the lowest sum of squared deviations)
+#
+# Each method returns a list of class breaks in ascending order: the lowest rating followed by the upper
+# value of each class. When there are fewer distinct ratings than classes, the list is shorter.
+#
+# Quantile and NaturalBreaks need every rating, not just the list of unique output values, so the rating
+# column is read from the rating table with TableToNumPyArray. Natural breaks are computed on the distinct
+# values weighted by their count. For a large table the sorted ratings are first sampled at evenly spaced
+# positions (sampleSize values, always including the lowest and highest), which keeps the work to a few
+# million array operations however many map units there are.
+#
+# The breaks for a rating table are kept in memory and reused while the table has the same number of records
+# and has not been replaced. CreateSoilMap calls Invalidate each time it writes a rating table.
+#
+# The method is the legendMethod setting of CreateSoilMap, which can be set with its optional 'Legend
+# Method' parameter. LegendMethod accepts the names with or without spaces (Natural Breaks).
+#
+# Run this script by itself (outside of ArcMap) to compare the array version of natural breaks with the
+# original Jenks loop and to time the methods on a large set of ratings. The script also checks that
+# Quantile and NaturalBreaks legends are computed from every rating in the table (TableBreaks). With arcpy
+# the check uses an in_memory rating table.
+#
+#     python gSSURGO_LegendStats.py [rating count]
+#
+# 2017-11-10
+
+## ===================================================================================
+class MyError(Exception):
+    pass
+
+## ===================================================================================
+def PrintMsg(msg, severity=0):
+    # prints message to screen if run as a python script
+    # Adds tool message to the geoprocessor
+    #
+    #Split the message on \n first, so that if it's multiple lines, a GPMessage will be added for each line
+    try:
+        for string in msg.split('\n'):
+            #Add a geoprocessing message (in case this is run as a tool)
+            if severity == 0:
+                arcpy.AddMessage(string)
+
+            elif severity == 1:
+                arcpy.AddWarning(string)
+
+            elif severity == 2:
+                arcpy.AddMessage("    ")
+                arcpy.AddError(string)
+
+    except:
+        pass
+
+## ===================================================================================
+def errorMsg():
+    try:
+        tb = sys.exc_info()[2]
+        tbinfo = traceback.format_tb(tb)[0]
+        theMsg = tbinfo + "\n" + str(sys.exc_type)+ ": " + str(sys.exc_value)
+        PrintMsg(theMsg, 2)
+
+    except:
+        PrintMsg("Unhandled error in unHandledException method", 2)
+
+## ===================================================================================
+def ValueArray(values):
+    # Float array of the numeric ratings in a list, without the Nulls
+    if isinstance(values, np.ndarray):
+        values = values.astype(np.float64)
+        return values[~np.isnan(values)]
+
+    return np.fromiter((val for val in values if not val is None), dtype=np.float64)
+
+## ===================================================================================
+def ValueRange(values):
+    # Lowest and highest rating in a list of output values. Returns (None, None) if there are none.
+    values = ValueArray(values)
+
+    if len(values) == 0:
+        return None, None
+
+    return values.min().item(), values.max().item()
+
+## ===================================================================================
+def EqualInterval(values, classCnt):
+    # Breaks for classCnt classes of equal width
+    values = ValueArray(values)
+
+    if len(values) == 0:
+        return []
+
+    minVal = values.min()
+    maxVal = values.max()
+
+    if minVal == maxVal:
+        return [minVal.item(), maxVal.item()]
+
+    breaks = minVal + (maxVal - minVal) * np.arange(classCnt + 1) / float(classCnt)
+    breaks[-1] = maxVal
+
+    return breaks.tolist()
+
+## ===================================================================================
+def Quantile(values, classCnt):
+    # Breaks that put about the same number of ratings in each class. Each break is a rating, so
+    # a value that fills more than one class (many map units with the same rating) merges them.
+    values = np.sort(ValueArray(values))
+    n = len(values)
+
+    if n == 0:
+        return []
+
+    pos = np.ceil(n * np.arange(1, classCnt + 1) / float(classCnt)).astype(np.int64) - 1
+    breaks = np.unique(values[np.maximum(pos, 0)])
+
+    return [values[0].item()] + breaks.tolist()
+
+## ===================================================================================
+def SortedSample(values, sampleSize):
+    # Evenly spaced order statistics of the sorted ratings, including the lowest and highest
+    values = np.sort(ValueArray(values))
+
+    if sampleSize is None or len(values) <= sampleSize:
+        return values
+
+    pos = np.round(np.linspace(0, len(values) - 1, sampleSize)).astype(np.int64)
+
+    return values[pos]
+
+## ===================================================================================
+def NaturalBreaks(values, classCnt, sampleSize=None):
+    # Jenks natural breaks. The distinct ratings and their counts go into Fisher's dynamic program:
+    #
+    #   cost[j][i] = lowest sum of squared deviations for the first i + 1 distinct values in j + 1 classes
+    #
+    # The squared deviation of every run of distinct values comes from cumulative sums, so each class is
+    # one minimum over a (distinct values x distinct values) array.
+    #
+    if sampleSize is None:
+        sampleSize = defaultSample
+
+    uniqueVals, counts = np.unique(SortedSample(values, sampleSize), return_counts=True)
+    u = len(uniqueVals)
+
+    if u == 0:
+        return []
+
+    if u <= classCnt:
+        # Each value is a class
+        return [uniqueVals[0].item()] + uniqueVals.tolist()
+
+    w = np.concatenate(([0.0], np.cumsum(counts, dtype=np.float64)))
+    s1 = np.concatenate(([0.0], np.cumsum(uniqueVals * counts)))
+    s2 = np.concatenate(([0.0], np.cumsum(uniqueVals * uniqueVals * counts)))
+
+    # ssd[m, i]: sum of squared deviations of distinct values m through i as one class
+    first = np.arange(u)[:, None]
+    last = np.arange(u)[None, :]
+    valid = first <= last
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        wt = w[last + 1] - w[first]
+        sm = s1[last + 1] - s1[first]
+        ssd = (s2[last + 1] - s2[first]) - sm * sm / wt
+
+    ssd = np.where(valid, np.maximum(ssd, 0.0), np.inf)
+
+    cost = ssd[0].copy()
+    back = list()
+
+    for j in range(1, classCnt):
+        # A class that starts at m follows the best j classes that end at m - 1
+        prev = np.concatenate(([np.inf], cost[:-1]))
+        total = prev[:, None] + ssd
+        total[:j] = np.inf
+        start = np.argmin(total, axis=0)
+        cost = total[start, np.arange(u)]
+        back.append(start)
+
+    # Work back from the last value to the first value of each class
+    breaks = [uniqueVals[-1].item()]
+    end = u - 1
+
+    for start in reversed(back):
+        m = start[end]
+        breaks.append(uniqueVals[m - 1].item())
+        end = m - 1
+
+    breaks.append(uniqueVals[0].item())
+    breaks.reverse()
+
+    return breaks
+
+## ===================================================================================
+def Breaks(values, method, classCnt, sampleSize=None):
+    # Class breaks for a list or array of ratings
+    if method == "EqualInterval":
+        return EqualInterval(values, classCnt)
+
+    elif method == "Quantile":
+        return Quantile(values, classCnt)
+
+    elif method == "NaturalBreaks":
+        return NaturalBreaks(values, classCnt, sampleSize)
+
+    raise MyError, "Unknown classification method: " + str(method)
+
+## ===================================================================================
+def LegendMethod(name):
+    # Classification method name for Breaks, or None if it is not one of the methods.
+    # Spaces and case are ignored ('Natural Breaks').
+    key = str(name).replace(" ", "").lower()
+
+    for method in ["EqualInterval", "Quantile", "NaturalBreaks"]:
+        if method.lower() == key:
+            return method
+
+    return None
+
+## ===================================================================================
+def TableState(tbl):
+    # Changes when the rating table is replaced or the number of records changes
+    return (dGeneration.get(tbl, 0), int(arcpy.GetCount_management(tbl).getOutput(0)))
+
+## ===================================================================================
+def Invalidate(tbl):
+    # The rating table has been written again. Forget its ratings and breaks.
+    dGeneration[tbl] = dGeneration.get(tbl, 0) + 1
+
+    for key in dBreaks.keys():
+        if key[0] == tbl:
+            del dBreaks[key]
+
+    for key in dRatings.keys():
+        if key[0] == tbl:
+            del dRatings[key]
+
+## ===================================================================================
+def RatingArray(tbl, ratingField, state=None):
+    # All of the non-null ratings in the rating table, read once while the table is unchanged
+    if state is None:
+        state = TableState(tbl)
+
+    key = (tbl, ratingField)
+
+    if key in dRatings and dRatings[key][0] == state:
+        return dRatings[key][1]
+
+    values = ValueArray(arcpy.da.TableToNumPyArray(tbl, [ratingField], skip_nulls=True)[ratingField])
+    dRatings[key] = [state, values]
+
+    return values
+
+## ===================================================================================
+def TableBreaks(tbl, ratingField, method, classCnt):
+    # Class breaks for the rating column of a table, from the cache if the table has not changed
+    state = TableState(tbl)
+    key = (tbl, ratingField, method, classCnt)
+
+    if key in dBreaks and dBreaks[key][0] == state:
+        return list(dBreaks[key][1])
+
+    breaks = Breaks(RatingArray(tbl, ratingField, state), method, classCnt)
+    dBreaks[key] = [state, breaks]
+
+    return list(breaks)
+
+## ===================================================================================
+def LegendBreaks(tbl, ratingField, outputValues, method, classCnt):
+    # Class breaks for a map legend.
+    #
+    # Equal intervals only need the lowest and highest rating, which are in outputValues. The other
+    # methods use every rating in the table. If the table cannot be read, the breaks come from
+    # outputValues.
+    #
+    try:
+        if method != "EqualInterval" and not tbl is None and not arcpy is None:
+            return TableBreaks(tbl, ratingField, method, classCnt)
+
+    except:
+        errorMsg()
+        PrintMsg("\tUsing the list of output values for the map legend", 1)
+
+    return Breaks(outputValues, method, classCnt)
+
+## ===================================================================================
+def SumSquares(values, breaks):
+    # Sum of squared deviations from the class means for a set of breaks
+    values = np.sort(ValueArray(values))
+    idx = np.searchsorted(values, breaks[1:-1], side="right")
+    total = 0.0
+
+    for part in np.split(values, idx):
+        if len(part) > 0:
+            total += ((part - part.mean()) ** 2).sum()
+
+    return total
+
+## ===================================================================================
+def GVF(values, breaks):
+    # Goodness of variance fit: 1.0 for a perfect classification
+    values = ValueArray(values)
+    sdam = ((values - values.mean()) ** 2).sum()
+
+    if sdam == 0:
+        return 1.0
+
+    return 1.0 - SumSquares(values, breaks) / sdam
+
+## ===================================================================================
+def RefNaturalBreaks(values, classCnt):
+    # The usual Jenks loop (one rating at a time, no weights). Only for the benchmark.
+    data = sorted(values)
+    n = len(data)
+    lowerLimits = [[0] * (classCnt + 1) for i in range(n + 1)]
+    variance = [[0.0] * (classCnt + 1) for i in range(n + 1)]
+
+    for j in range(1, classCnt + 1):
+        lowerLimits[1][j] = 1
+
+        for i in range(2, n + 1):
+            variance[i][j] = float("inf")
+
+    for l in range(2, n + 1):
+        s1 = 0.0
+        s2 = 0.0
+        w = 0.0
+
+        for m in range(1, l + 1):
+            i3 = l - m + 1
+            val = data[i3 - 1]
+            s2 += val * val
+            s1 += val
+            w += 1
+            v = s2 - (s1 * s1) / w
+            i4 = i3 - 1
+
+            if i4 != 0:
+                for j in range(2, classCnt + 1):
+                    if variance[l][j] >= v + variance[i4][j - 1]:
+                        lowerLimits[l][j] = i3
+                        variance[l][j] = v + variance[i4][j - 1]
+
+        lowerLimits[l][1] = 1
+        variance[l][1] = v
+
+    breaks = [0.0] * (classCnt + 1)
+    breaks[classCnt] = data[-1]
+    breaks[0] = data[0]
+    k = n
+
+    for j in range(classCnt, 1, -1):
+        idx = lowerLimits[k][j] - 2
+        breaks[j - 1] = data[idx]
+        k = lowerLimits[k][j] - 1
+
+    return breaks
+
+## ===================================================================================
+def CreateRatings(ratingCnt):
+    # Skewed ratings with a few repeated values, something like a soil property map
+    random.seed(ratingCnt)
+    ratings = list()
+
+    for i in range(ratingCnt):
+        if random.random() < 0.1:
+            ratings.append(0.0)
+
+        else:
+            ratings.append(round(random.lognormvariate(2.5, 0.6), 1))
+
+    return ratings
+
+## ===================================================================================
+def CheckLegendBreaks(ratings, classCnt=5):
+    # Check that Quantile and NaturalBreaks legends use every rating in the table, not the list of
+    # unique output values. Returns the number of failed checks.
+    #
+    # Without arcpy LegendBreaks can only fall back to the output values. With arcpy the ratings are
+    # written to an in_memory table, and the breaks must come through TableBreaks (dBreaks).
+    diffCnt = 0
+    values = ValueArray(ratings)
+    outputValues = sorted(set(ratings))
+
+    for name in ["Equal Interval", "Quantile", "Natural Breaks"]:
+        method = LegendMethod(name)
+        fallback = LegendBreaks(None, "RATING", outputValues, method, classCnt)
+
+        if fallback != Breaks(outputValues, method, classCnt):
+            print "%-14s  LegendBreaks without a table did not use the output values" % method
+            diffCnt += 1
+
+    if arcpy is None:
+        print "Legend table check skipped (no arcpy)"
+        return diffCnt
+
+    tbl = os.path.join("in_memory", "LegendStatsCheck")
+
+    try:
+        if arcpy.Exists(tbl):
+            arcpy.Delete_management(tbl)
+
+        arcpy.CreateTable_management("in_memory", "LegendStatsCheck")
+        arcpy.AddField_management(tbl, "RATING", "DOUBLE")
+
+        with arcpy.da.InsertCursor(tbl, ["RATING"]) as cur:
+            for rating in ratings:
+                cur.insertRow([rating])
+
+        Invalidate(tbl)
+
+        for method in ["Quantile", "NaturalBreaks"]:
+            breaks = LegendBreaks(tbl, "RATING", outputValues, method, classCnt)
+
+            if not (tbl, "RATING", method, classCnt) in dBreaks:
+                print "%-14s  LegendBreaks did not use TableBreaks" % method
+                diffCnt += 1
+
+            elif breaks != Breaks(values, method, classCnt):
+                print "%-14s  table breaks %s are not the breaks for all of the ratings" % (method, str(breaks))
+                diffCnt += 1
+
+            else:
+                print "%-14s  table breaks ok  %s" % (method, str([round(b, 2) for b in breaks]))
+
+    finally:
+        if arcpy.Exists(tbl):
+            arcpy.Delete_management(tbl)
+
+    return diffCnt
+
+## ===================================================================================
+def Benchmark(ratingCnt):
+    # Compare NaturalBreaks with the Jenks loop and time each method
+    diffCnt = 0
+
+    # The loop is O(n * n), so it only gets a small set of ratings
+    small = CreateRatings(800)
+    t0 = time.time()
+    refBreaks = RefNaturalBreaks(small, 5)
+    refTime = time.time() - t0
+    t0 = time.time()
+    arrBreaks = NaturalBreaks(small, 5)
+    arrTime = time.time() - t0
+    refSS = SumSquares(small, refBreaks)
+    arrSS = SumSquares(small, arrBreaks)
+
+    if arrSS > refSS * (1.0 + 1e-9) + 1e-9:
+        diffCnt += 1
+
+    print "NaturalBreaks  %7d ratings  loop %7.3fs  arrays %7.3fs  %6.1fx  sum of squares %.3f / %.3f" % \
+          (len(small), refTime, arrTime, refTime / max(arrTime, 1e-6), refSS, arrSS)
+
+    ratings = CreateRatings(ratingCnt)
+
+    t0 = time.time()
+    listMin = min(ratings)
+    listMax = max(ratings)
+    listTime = time.time() - t0
+    values = ValueArray(ratings)
+
+    for method in ["EqualInterval", "Quantile", "NaturalBreaks"]:
+        t0 = time.time()
+        breaks = Breaks(values, method, 5)
+        elapsed = time.time() - t0
+
+        if breaks[0] != listMin or breaks[-1] != listMax:
+            diffCnt += 1
+
+        print "%-14s %7d ratings  %7.3fs  GVF %.4f  breaks %s" % (method, len(ratings), elapsed, GVF(values, breaks), str([round(b, 2) for b in breaks]))
+
+    # Sampled natural breaks against the breaks for the whole set (all of the distinct values)
+    t0 = time.time()
+    fullBreaks = NaturalBreaks(values, 5, len(values))
+    fullTime = time.time() - t0
+    print "NaturalBreaks  %7d ratings  all values %7.3fs  GVF %.4f  (list min/max %.3fs)" % (len(ratings), fullTime, GVF(values, fullBreaks), listTime)
+
+    diffCnt += CheckLegendBreaks(CreateRatings(20000))
+
+    return diffCnt
+
+## ===================================================================================
+## MAIN
+## ===================================================================================
+
+# Import system modules
+import sys, os, time, random, traceback
+import numpy as np
+
+try:
+    import arcpy
+
+except ImportError:
+    # arcpy is only needed to read rating tables. The benchmark runs without it.
+    arcpy = None
+
+# Number of sorted ratings used for natural breaks
+defaultSample = 1000
+
+# Breaks already computed in this process:  {(table, field, method, classes):[table state, breaks]}
+dBreaks = dict()
+
+# Rating columns already read:  {(table, field):[table state, array]}
+dRatings = dict()
+
+# Number of times each rating table has been written in this process (see Invalidate)
+dGeneration = dict()
+
+if __name__ == "__main__":
+    # Standalone benchmark
+    ratingCnt = 1000000
+
+    if len(sys.argv) > 1:
+        ratingCnt = int(sys.argv[1])
+
+    sys.exit(Benchmark(ratingCnt))
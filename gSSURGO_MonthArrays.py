@@ -0,0 +1,868 @@
+# gSSURGO_MonthArrays.py
+#
+# Steve Peaslee, National Soil Survey Center
+#
+# Purpose:  Array-based component-month aggregation for gSSURGO_CreateSoilMap
+#
+# AggregateCo_Mo_MaxMin, AggregateCo_Mo_DCD, AggregateCo_Mo_DCP_Domain, AggregateCo_Mo_DCD_Domain
+# and AggregateCo_Mo_WTA read the monthly records one row at a time for a single begMo - endMo window.
+# A map for another season (flooding in the spring, ponding in the summer) read and aggregated the whole
+# table again.
+#
+# This module reads MUKEY, COKEY, COMPPCT_R, MONTHSEQ and the rating column once and pivots the monthly
+# ratings into a components x 12 array:
+#
+#   max, min    highest and lowest rating of the component for each month (NaN = none)
+#   row         the component has a record for the month
+#   null        the component has a record with a null rating for the month
+#
+# Components are kept in cursor order (MUKEY ASC, COMPPCT_R DESC, then the order read), so the
+# components of a map unit are one contiguous segment. A month window is a list of array columns, and
+# each Mo kernel answers a list of windows by reducing those columns and then the map unit segments:
+#
+#   Mo_MaxMin        highest or lowest component rating and the sum of comppct with that rating
+#   Mo_DCD           rating of the first (dominant) component. Null or missing months count as 201cm.
+#   Mo_WTA           comppct weighted average of the component ratings
+#   Mo_DCP_Domain    domain index of the dominant component
+#   Mo_DCD_Domain    domain index with the highest sum of comppct
+#
+# Text ratings are coded as the position in the sorted list of values, or as the position in the rating
+# domain (dCodes). Codes are decoded only when the output table is written.
+#
+# The arrays pay off when several windows are rated from one read (CreateMonthWindowTable). For a
+# single window, building the arrays costs more than the loop saves, so CreateSoilMap rates one window
+# with the original loops (RefMo_MaxMin, RefMo_DCD, RefMo_WTA and RefMo_Domain).
+#
+# Run this script by itself (outside of ArcMap) to compare the kernels with the original python loops.
+# The loops are run once for each month window, on the rows that the MONTHSEQ query would have selected.
+#
+#     python gSSURGO_MonthArrays.py [mapunit count]
+#
+# 2017-11-06
+
+## ===================================================================================
+class MyError(Exception):
+    pass
+
+## ===================================================================================
+def PrintMsg(msg, severity=0):
+    # prints message to screen if run as a python script
+    # Adds tool message to the geoprocessor
+    #
+    #Split the message on \n first, so that if it's multiple lines, a GPMessage will be added for each line
+    try:
+        for string in msg.split('\n'):
+            #Add a geoprocessing message (in case this is run as a tool)
+            if severity == 0:
+                arcpy.AddMessage(string)
+
+            elif severity == 1:
+                arcpy.AddWarning(string)
+
+            elif severity == 2:
+                arcpy.AddMessage("    ")
+                arcpy.AddError(string)
+
+    except:
+        pass
+
+## ===================================================================================
+def errorMsg():
+    try:
+        tb = sys.exc_info()[2]
+        tbinfo = traceback.format_tb(tb)[0]
+        theMsg = tbinfo + "\n" + str(sys.exc_type)+ ": " + str(sys.exc_value)
+        PrintMsg(theMsg, 2)
+
+    except:
+        PrintMsg("Unhandled error in unHandledException method", 2)
+
+## ===================================================================================
+def WindowColumns(begSeq, endSeq):
+    # Array columns (0 - 11) for months begSeq through endSeq (MONTHSEQ 1 - 12). A window
+    # can wrap around the end of the year (November through February).
+    if begSeq <= endSeq:
+        return range(begSeq - 1, endSeq)
+
+    return range(begSeq - 1, 12) + range(0, endSeq)
+
+## ===================================================================================
+def EncodeRatings(ratings, dCodes=None):
+    # Convert a column of ratings into a float array, NaN for null.
+    #
+    # Numbers are kept as they are. Text is coded as the position in the sorted list of distinct
+    # values, or with dCodes as the domain index of the uppercase value.
+    #
+    # Returns codes, labels (None for numbers and domain codes), the list of values that are
+    # not in the domain and the list of distinct text values.
+    #
+    if dCodes is None:
+        if isinstance(ratings, np.ndarray) and ratings.dtype.kind == "f":
+            return ratings.astype(np.float64), None, [], []
+
+        first = next((val for val in ratings if not val is None), None)
+
+        if first is None:
+            codes = np.empty(len(ratings), dtype=np.float64)
+            codes.fill(np.nan)
+            return codes, None, [], []
+
+        if not isinstance(first, basestring):
+            # Numbers read with a cursor. None converts to NaN.
+            return np.array(ratings, dtype=np.float64), None, [], []
+
+    # Code the distinct values once, then convert the codes
+    rowCodes, uniq = KeyCodes(ratings)
+    uniqCodes = np.empty(len(uniq), dtype=np.float64)
+    uniqCodes.fill(np.nan)
+    values = sorted([val for val in uniq if not val is None])
+    missing = list()
+
+    if dCodes is None:
+        for i in range(len(uniq)):
+            if not uniq[i] is None:
+                uniqCodes[i] = values.index(uniq[i])
+
+        return uniqCodes[rowCodes], values, [], values
+
+    for i in range(len(uniq)):
+        val = uniq[i]
+
+        if val is None:
+            continue
+
+        if not isinstance(val, basestring):
+            val = str(val)
+
+        try:
+            uniqCodes[i] = dCodes[val.upper()]
+
+        except KeyError:
+            # Not a member of the domain (obsolete class)
+            missing.append(uniq[i])
+
+    return uniqCodes[rowCodes], None, sorted(missing), values
+
+## ===================================================================================
+def KeyCodes(keys):
+    # Integer code for each key in the order the keys are first read, and the list of distinct keys.
+    # Keys usually come in runs (all the months of a component), so only the first key of each run
+    # is looked up in a dictionary. This is much faster than np.unique on a column of strings.
+    n = len(keys)
+
+    if n == 0:
+        return np.zeros(0, dtype=np.int64), []
+
+    keys = np.asarray(keys, dtype=object)
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    dCodes = dict()
+    runCodes = [dCodes.setdefault(key, len(dCodes)) for key in keys[starts].tolist()]
+    uniq = [None] * len(dCodes)
+
+    for key, code in dCodes.iteritems():
+        uniq[code] = key
+
+    return np.repeat(np.array(runCodes, dtype=np.int64), np.diff(np.append(starts, n))), uniq
+
+## ===================================================================================
+def MonthArrays(mukeys, cokeys, comppct, monthseq, ratings, areasyms, dCodes=None, bInteger=False):
+    # Pivot the component-month rows into the components x 12 arrays used by the Mo kernels.
+    #
+    # comppct and monthseq are float arrays (NaN = null). A null MONTHSEQ is a component without
+    # month records. Components are put in MUKEY ASC, COMPPCT_R DESC order. Components with the
+    # same comppct keep the order they were first read in.
+    #
+    # The keys are coded once (KeyCodes). The rows are then sorted on component x 12 + month and
+    # each (component, month) segment is reduced with reduceat.
+    #
+    dMonths = dict()
+    codes, labels, missing, values = EncodeRatings(ratings, dCodes)
+    dMonths["labels"] = labels
+    dMonths["missing"] = missing
+    dMonths["values"] = values
+    dMonths["integer"] = bInteger
+
+    comppct = np.asarray(comppct, dtype=np.float64)
+    monthseq = np.asarray(monthseq, dtype=np.float64)
+
+    if len(mukeys) == 0:
+        coCnt = 0
+        firstRow = np.zeros(0, dtype=np.int64)
+        muCodes = np.zeros(0, dtype=np.int64)
+        coRow = np.zeros(0, dtype=np.int64)
+
+    else:
+        # Map unit codes ranked by mukey, so that map units sort in MUKEY ASC order
+        muCodes, muKeys = KeyCodes(mukeys)
+        muRank = np.empty(len(muKeys), dtype=np.int64)
+        muRank[sorted(range(len(muKeys)), key = lambda i : muKeys[i])] = np.arange(len(muKeys))
+        muCodes = muRank[muCodes]
+
+        # Components in the order they are first read, then sorted by map unit and comppct
+        coCodes, coKeys = KeyCodes(cokeys)
+        coCnt = len(coKeys)
+        coFirst = np.unique(coCodes, return_index=True)[1]
+        coOrder = np.lexsort((coFirst, -comppct[coFirst], muCodes[coFirst]))
+        coPos = np.empty(coCnt, dtype=np.int64)
+        coPos[coOrder] = np.arange(coCnt)
+        coRow = coPos[coCodes]
+        firstRow = coFirst[coOrder]
+
+    rows = firstRow.tolist()
+    dMonths["mukey"] = np.array([mukeys[i] for i in rows])
+    dMonths["cokey"] = np.array([cokeys[i] for i in rows])
+    dMonths["areasymbol"] = np.array([areasyms[i] for i in rows])
+    dMonths["comppct"] = comppct[firstRow]
+    dMonths["mu"] = muCodes[firstRow]
+
+    vMax = np.empty(coCnt * 12, dtype=np.float64)
+    vMax.fill(np.nan)
+    vMin = vMax.copy()
+    bRow = np.zeros(coCnt * 12, dtype=bool)
+    bNull = np.zeros(coCnt * 12, dtype=bool)
+
+    sel = np.flatnonzero(~np.isnan(monthseq))
+    cell = coRow[sel] * 12 + (monthseq[sel].astype(np.int64) - 1)
+    v = codes[sel]
+    isNull = np.isnan(v)
+    bRow[cell] = True
+    bNull[cell[isNull]] = True
+
+    # A component can have more than one record for a month (soil moisture layers)
+    cell = cell[~isNull]
+    v = v[~isNull]
+
+    if len(cell) > 0:
+        order = np.argsort(cell, kind="mergesort")
+        cell = cell[order]
+        v = v[order]
+        starts = SegmentStarts(cell)
+        vMax[cell[starts]] = np.maximum.reduceat(v, starts)
+        vMin[cell[starts]] = np.minimum.reduceat(v, starts)
+
+    dMonths["max"] = vMax.reshape(coCnt, 12)
+    dMonths["min"] = vMin.reshape(coCnt, 12)
+    dMonths["row"] = bRow.reshape(coCnt, 12)
+    dMonths["null"] = bNull.reshape(coCnt, 12)
+
+    return dMonths
+
+## ===================================================================================
+def ReadMonthArrays(cur, dCodes=None):
+    # Read the month arrays from a cursor or list of initial table rows:
+    #
+    #   MUKEY, COKEY, COMPPCT_R, MONTHSEQ, attribute column, AREASYMBOL
+    #
+    # Rows should come in MUKEY ASC, COMPPCT_R DESC order (ComponentOrderCursor) so that
+    # components with the same comppct are in the same order as the original functions read them.
+    #
+    cols = [list(), list(), list(), list(), list(), list()]
+
+    for row in cur:
+        for i in range(6):
+            cols[i].append(row[i])
+
+    ratings = cols[4]
+    ratedVals = [val for val in ratings if not val is None]
+    bInteger = len(ratedVals) > 0 and len([val for val in ratedVals if not isinstance(val, (int, long))]) == 0
+
+    return MonthArrays(cols[0], cols[1], np.array(cols[2], dtype=np.float64), np.array(cols[3], dtype=np.float64), \
+    ratings, cols[5], dCodes, bInteger)
+
+## ===================================================================================
+def Decode(dMonths, val):
+    # Rating value from a kernel result. NaN is None.
+    if val is None or math.isnan(val):
+        return None
+
+    if not dMonths["labels"] is None:
+        return dMonths["labels"][int(val)]
+
+    if dMonths["integer"]:
+        return int(val)
+
+    return val
+
+## ===================================================================================
+def SegmentStarts(keys):
+    # Index of the first row of each run of equal values in a sorted key array
+    if len(keys) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    return np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+
+## ===================================================================================
+def SegmentSum(values, starts, counts):
+    # Sum each segment in row order, the same as a python loop would (see gSSURGO_AggregateArrays)
+    if len(starts) == 0:
+        return np.zeros(0, dtype=np.float64)
+
+    total = values[starts].astype(np.float64)
+    active = np.argsort(-counts, kind="mergesort")
+    activeCounts = counts[active]
+
+    for k in range(1, activeCounts[0]):
+        sel = active[:np.searchsorted(-activeCounts, -k, side="left")]
+        total[sel] += values[starts[sel] + k]
+
+    return total
+
+## ===================================================================================
+def ComponentWindow(dMonths, cols, bHigh):
+    # Highest (bHigh) or lowest rating of each component for the months in cols. NaN if none.
+    if bHigh:
+        return np.fmax.reduce(dMonths["max"][:, cols], axis=1)
+
+    return np.fmin.reduce(dMonths["min"][:, cols], axis=1)
+
+## ===================================================================================
+def MapunitStarts(dMonths):
+    # First component of each map unit
+    return SegmentStarts(dMonths["mu"])
+
+## ===================================================================================
+def EmptyWindows(muCnt, windowCnt):
+    # Map unit x window array of NaN
+    a = np.empty((muCnt, windowCnt), dtype=np.float64)
+    a.fill(np.nan)
+    return a
+
+## ===================================================================================
+def Mo_MaxMin(dMonths, windows, bHigh):
+    # Highest (bHigh) or lowest monthly rating of each component, then the highest or lowest
+    # component rating of each map unit (AggregateCo_Mo_MaxMin).
+    #
+    # Returns mukey, rating, comppct sum of the components with that rating, comppct sum of the
+    # rated components and areasymbol. Every map unit is returned. Rating NaN = no rated components.
+    #
+    muStart = MapunitStarts(dMonths)
+    coMu = np.searchsorted(muStart, np.arange(len(dMonths["mu"])), side="right") - 1
+    pct = dMonths["comppct"]
+    muVal = EmptyWindows(len(muStart), len(windows))
+    muValPct = np.zeros((len(muStart), len(windows)), dtype=np.float64)
+    muRatedPct = np.zeros((len(muStart), len(windows)), dtype=np.float64)
+
+    if len(muStart) > 0:
+        for j in range(len(windows)):
+            coVal = ComponentWindow(dMonths, windows[j], bHigh)
+
+            if bHigh:
+                best = np.fmax.reduceat(coVal, muStart)
+
+            else:
+                best = np.fmin.reduceat(coVal, muStart)
+
+            with np.errstate(invalid="ignore"):
+                bBest = coVal == best[coMu]
+
+            muVal[:, j] = best
+            muValPct[:, j] = np.add.reduceat(np.where(bBest, pct, 0), muStart)
+            muRatedPct[:, j] = np.add.reduceat(np.where(np.isnan(coVal), 0, pct), muStart)
+
+    return dMonths["mukey"][muStart], muVal, muValPct, muRatedPct, dMonths["areasymbol"][muStart]
+
+## ===================================================================================
+def Mo_DCD(dMonths, windows, bHigh, nullValue=201):
+    # Highest (bHigh) or lowest monthly rating of the first component of each map unit
+    # (AggregateCo_Mo_DCD, depth to water table). A null rating, or no record in the window,
+    # counts as nullValue. A map unit whose first component has a comppct of 0 is not rated.
+    #
+    # Returns mukey, comppct, rating and areasymbol. NaN comppct = not rated.
+    #
+    muStart = MapunitStarts(dMonths)
+    pct = dMonths["comppct"][muStart]
+    muPct = EmptyWindows(len(muStart), len(windows))
+    muVal = EmptyWindows(len(muStart), len(windows))
+    bDom = pct > 0
+
+    for j in range(len(windows)):
+        cols = windows[j]
+        coVal = ComponentWindow(dMonths, cols, bHigh)[muStart]
+        bNull = dMonths["null"][muStart][:, cols].any(axis=1) | ~dMonths["row"][muStart][:, cols].any(axis=1)
+        fill = np.where(bNull, float(nullValue), np.nan)
+
+        if bHigh:
+            coVal = np.fmax(coVal, fill)
+
+        else:
+            coVal = np.fmin(coVal, fill)
+
+        muPct[bDom, j] = pct[bDom]
+        muVal[bDom, j] = coVal[bDom]
+
+    return dMonths["mukey"][muStart], muPct, muVal, dMonths["areasymbol"][muStart]
+
+## ===================================================================================
+def Mo_WTA(dMonths, windows, bHigh):
+    # Comppct weighted average of the highest (bHigh) or lowest monthly rating of each
+    # component (AggregateCo_Mo_WTA).
+    #
+    # Returns mukey, comppct sum of the rated components, rating and areasymbol. Every map unit
+    # is returned. Rating NaN = no rated components.
+    #
+    muStart = MapunitStarts(dMonths)
+    coMu = np.searchsorted(muStart, np.arange(len(dMonths["mu"])), side="right") - 1
+    pct = dMonths["comppct"]
+    muPct = np.zeros((len(muStart), len(windows)), dtype=np.float64)
+    muVal = EmptyWindows(len(muStart), len(windows))
+
+    if len(muStart) > 0:
+        for j in range(len(windows)):
+            coVal = ComponentWindow(dMonths, windows[j], bHigh)
+            rows = np.flatnonzero(~np.isnan(coVal))
+            muPct[:, j] = np.add.reduceat(np.where(np.isnan(coVal), 0, pct), muStart)
+
+            if len(rows) == 0:
+                continue
+
+            # Products are summed in component order, the same as the original loop
+            starts = SegmentStarts(coMu[rows])
+            counts = np.diff(np.concatenate((starts, [len(rows)]))).astype(np.int64)
+            sums = SegmentSum(pct[rows] * coVal[rows], starts, counts)
+            ratedMu = coMu[rows[starts]]
+            bPct = muPct[ratedMu, j] > 0
+            muVal[ratedMu[bPct], j] = sums[bPct] / muPct[ratedMu[bPct], j]
+
+    return dMonths["mukey"][muStart], muPct, muVal, dMonths["areasymbol"][muStart]
+
+## ===================================================================================
+def FirstPerMapunit(muCodes, pct, idx, bHigh):
+    # Position of the best row for each map unit: highest pct, then the highest (bHigh) or
+    # lowest idx
+    if bHigh:
+        idxKey = -idx
+
+    else:
+        idxKey = idx
+
+    order = np.lexsort((idxKey, -pct, muCodes))
+    return order[SegmentStarts(muCodes[order])]
+
+## ===================================================================================
+def Mo_DCP_Domain(dMonths, windows, bHigh):
+    # Domain index of the dominant component (AggregateCo_Mo_DCP_Domain). Each component has
+    # its highest (bHigh) or lowest index for the window. Components with the same comppct are
+    # decided by the higher or lower index. Components without a rating are skipped.
+    #
+    # Returns mukey, comppct, domain index and areasymbol. NaN comppct = no rated components.
+    #
+    muStart = MapunitStarts(dMonths)
+    coMu = np.searchsorted(muStart, np.arange(len(dMonths["mu"])), side="right") - 1
+    pct = dMonths["comppct"]
+    muPct = EmptyWindows(len(muStart), len(windows))
+    muIdx = EmptyWindows(len(muStart), len(windows))
+
+    for j in range(len(windows)):
+        coIdx = ComponentWindow(dMonths, windows[j], bHigh)
+        rows = np.flatnonzero(~np.isnan(coIdx))
+
+        if len(rows) == 0:
+            continue
+
+        best = rows[FirstPerMapunit(coMu[rows], pct[rows], coIdx[rows], bHigh)]
+        muPct[coMu[best], j] = pct[best]
+        muIdx[coMu[best], j] = coIdx[best]
+
+    return dMonths["mukey"][muStart], muPct, muIdx, dMonths["areasymbol"][muStart]
+
+## ===================================================================================
+def Mo_DCD_Domain(dMonths, windows, bHigh):
+    # Domain index with the highest sum of comppct (AggregateCo_Mo_DCD_Domain). Each component
+    # has its highest (bHigh) or lowest index for the window. Equal sums are decided by the higher
+    # or lower index. Components without a rating are skipped.
+    #
+    # Returns mukey, comppct sum, domain index and areasymbol. NaN comppct = no rated components.
+    #
+    muStart = MapunitStarts(dMonths)
+    coMu = np.searchsorted(muStart, np.arange(len(dMonths["mu"])), side="right") - 1
+    pct = dMonths["comppct"]
+    muPct = EmptyWindows(len(muStart), len(windows))
+    muIdx = EmptyWindows(len(muStart), len(windows))
+
+    for j in range(len(windows)):
+        coIdx = ComponentWindow(dMonths, windows[j], bHigh)
+        rows = np.flatnonzero(~np.isnan(coIdx))
+
+        if len(rows) == 0:
+            continue
+
+        # Sum comppct for each map unit and domain index
+        rows = rows[np.lexsort((coIdx[rows], coMu[rows]))]
+        grpMu = coMu[rows]
+        grpIdx = coIdx[rows]
+        starts = np.flatnonzero(np.concatenate(([True], (grpMu[1:] != grpMu[:-1]) | (grpIdx[1:] != grpIdx[:-1]))))
+        grpPct = np.add.reduceat(pct[rows], starts)
+        grpMu = grpMu[starts]
+        grpIdx = grpIdx[starts]
+
+        best = FirstPerMapunit(grpMu, grpPct, grpIdx, bHigh)
+        muPct[grpMu[best], j] = grpPct[best]
+        muIdx[grpMu[best], j] = grpIdx[best]
+
+    return dMonths["mukey"][muStart], muPct, muIdx, dMonths["areasymbol"][muStart]
+
+## ===================================================================================
+def RefMo_MaxMin(rows, bHigh, nullRating):
+    # Original AggregateCo_Mo_MaxMin loop, without the table I/O. Used for a single month window
+    # and by the benchmark.
+    dMapunit = collections.OrderedDict()
+    dComponent = dict()
+    dCoRating = dict()
+    dFinal = dict()
+
+    for mukey, cokey, compPct, monthseq, rating, areasym in rows:
+        if not cokey in dMapunit.setdefault(mukey, list()):
+            dMapunit[mukey].append(cokey)
+
+        if not rating is None:
+            if cokey in dComponent:
+                dComponent[cokey][1].append(rating)
+
+            else:
+                dComponent[cokey] = [compPct, [rating]]
+
+    for cokey, coVals in dComponent.items():
+        if bHigh:
+            dCoRating[cokey] = max(coVals[1])
+
+        else:
+            dCoRating[cokey] = min(coVals[1])
+
+    for mukey, cokeys in dMapunit.items():
+        dMuRatings = dict()
+
+        for cokey in cokeys:
+            if cokey in dCoRating:
+                dMuRatings[dCoRating[cokey]] = dMuRatings.get(dCoRating[cokey], 0) + dComponent[cokey][0]
+
+        if bHigh:
+            highRating = 0
+
+            for rating, compPct in dMuRatings.items():
+                if rating > highRating:
+                    highRating = rating
+                    dFinal[mukey] = [compPct, rating]
+
+        else:
+            lowRating = nullRating
+
+            for rating, compPct in dMuRatings.items():
+                if rating < lowRating and rating is not None:
+                    lowRating = rating
+                    dFinal[mukey] = [compPct, rating]
+
+        if not mukey in dFinal:
+            dFinal[mukey] = [sum([dComponent[cokey][0] for cokey in cokeys if cokey in dComponent]), nullRating]
+
+    return dFinal
+
+## ===================================================================================
+def RefMo_DCD(rows, bHigh):
+    # Original AggregateCo_Mo_DCD loop, without the table I/O. Used for a single month window
+    # and by the benchmark.
+    dMapunit = collections.OrderedDict()
+    dComponent = dict()
+    dFinal = dict()
+
+    for mukey, cokey, compPct, monthseq, rating, areasym in rows:
+        if rating is None:
+            rating = 201
+
+        if not cokey in dMapunit.setdefault(mukey, list()):
+            dMapunit[mukey].append(cokey)
+
+        if cokey in dComponent:
+            if bHigh:
+                if rating > dComponent[cokey][1]:
+                    dComponent[cokey][1] = rating
+
+            elif rating < dComponent[cokey][1]:
+                dComponent[cokey][1] = rating
+
+        else:
+            dComponent[cokey] = [compPct, rating]
+
+    for mukey, cokeys in dMapunit.items():
+        domPct = 0
+        dFinal[mukey] = [None, None]
+
+        for cokey in cokeys:
+            compPct, rating = dComponent[cokey]
+
+            if compPct > domPct:
+                domPct = compPct
+                dFinal[mukey] = [compPct, rating]
+
+    return dFinal
+
+## ===================================================================================
+def RefMo_WTA(rows, bHigh):
+    # Original AggregateCo_Mo_WTA loop, without the table I/O. Used for a single month window
+    # and by the benchmark.
+    dMapunit = collections.OrderedDict()
+    dComponent = dict()
+    dFinal = dict()
+
+    for mukey, cokey, compPct, monthseq, rating, areasym in rows:
+        if not cokey in dMapunit.setdefault(mukey, list()):
+            dMapunit[mukey].append(cokey)
+
+        if not rating is None:
+            if cokey in dComponent:
+                dComponent[cokey][1].append(rating)
+
+            else:
+                dComponent[cokey] = [compPct, [rating]]
+
+    for mukey, cokeys in dMapunit.items():
+        muPct = 0
+        muRating = None
+
+        for cokey in cokeys:
+            if cokey in dComponent:
+                compPct, ratings = dComponent[cokey]
+
+                if bHigh:
+                    rating = max(ratings)
+
+                else:
+                    rating = min(ratings)
+
+                muPct += compPct
+
+                if muRating is None:
+                    muRating = compPct * rating
+
+                else:
+                    muRating += compPct * rating
+
+        if not muRating is None and muPct > 0:
+            muRating = muRating / float(muPct)
+
+        elif not muRating is None:
+            # The original loop stopped here with a ZeroDivisionError
+            muRating = None
+
+        dFinal[mukey] = [muPct, muRating]
+
+    return dFinal
+
+## ===================================================================================
+def RefMo_Domain(rows, bHigh, dCodes, bCondition):
+    # Original AggregateCo_Mo_DCP_Domain (dominant component) and AggregateCo_Mo_DCD_Domain
+    # (bCondition) loops for ratings in the domain. Used for a single month window and by the benchmark.
+    dMapunit = collections.OrderedDict()
+    dCompRating = dict()
+    dFinal = dict()
+
+    for mukey, cokey, compPct, monthseq, rating, areasym in rows:
+        if rating is None or not str(rating).upper() in dCodes:
+            continue
+
+        ratingIndx = dCodes[str(rating).upper()]
+
+        if not cokey in dCompRating:
+            dCompRating[cokey] = [compPct, ratingIndx]
+            dMapunit.setdefault(mukey, list()).append(cokey)
+
+        elif (bHigh and dCompRating[cokey][1] < ratingIndx) or (not bHigh and dCompRating[cokey][1] > ratingIndx):
+            dCompRating[cokey][1] = ratingIndx
+
+    for mukey, cokeys in dMapunit.items():
+        muVals = list()
+
+        if bCondition:
+            dRating = dict()
+
+            for cokey in cokeys:
+                compPct, ratingIndx = dCompRating[cokey]
+                dRating[ratingIndx] = dRating.get(ratingIndx, 0) + compPct
+
+            for ratingIndx, compPct in dRating.items():
+                muVals.append([compPct, ratingIndx])
+
+        else:
+            muVals = [dCompRating[cokey] for cokey in cokeys]
+
+        dFinal[mukey] = sorted(sorted(muVals, key = lambda x : x[1], reverse=bHigh), key = lambda x : x[0], reverse=True)[0]
+
+    return dFinal
+
+## ===================================================================================
+def CreateMonthRows(muCnt, domainValues, seed=1):
+    # Synthetic rows for all 12 months in the cursor order used by the Mo functions
+    # (MUKEY ASC, COMPPCT_R DESC). Each row has a depth and a class rating:
+    # mukey, cokey, comppct, monthseq, depth, class, areasymbol
+    random.seed(seed)
+    rows = list()
+    classes = domainValues + [val.upper() for val in domainValues] + ["Common"]
+
+    for m in range(muCnt):
+        mukey = str(200000 + m)
+        areasym = "XX" + str(m % 200).zfill(3)
+        pctLeft = 100
+        comps = list()
+
+        for c in range(random.randint(1, 5)):
+            comppct = min(pctLeft, random.choice([0, 5, 10, 15, 25, 30, 40, 50, 85]))
+            pctLeft -= comppct
+            comps.append((comppct, mukey + str(c).zfill(2)))
+
+        comps.sort(key = lambda x : x[0], reverse=True)
+
+        for comppct, cokey in comps:
+            if random.random() < 0.15:
+                # No month records
+                rows.append([mukey, cokey, comppct, None, None, None, areasym])
+                continue
+
+            months = range(1, 13)
+            random.shuffle(months)
+
+            for monthseq in months:
+                if random.random() < 0.1:
+                    continue
+
+                depth = random.choice([None, None, 0, 15, 30, 46, 61, 91, 107, 152, 183, 201])
+                floodClass = random.choice([None] + classes)
+                rows.append([mukey, cokey, comppct, monthseq, depth, floodClass, areasym])
+
+    return rows
+
+## ===================================================================================
+def WindowRows(rows, cols, valIdx, bNotNull):
+    # The rows the MONTHSEQ query for a window would have put in the initial table. A
+    # component without records in the window gets one row with a null rating.
+    months = set([col + 1 for col in cols])
+    selected = list()
+    lastCokey = None
+    bFound = True
+
+    for rec in rows + [[None] * 7]:
+        if rec[1] != lastCokey:
+            if not bFound:
+                selected.append([prevRec[0], prevRec[1], prevRec[2], None, None, prevRec[6]])
+
+            lastCokey = rec[1]
+            bFound = False
+            prevRec = rec
+
+        if rec[3] in months:
+            selected.append([rec[0], rec[1], rec[2], rec[3], rec[valIdx], rec[6]])
+            bFound = True
+
+    if bNotNull:
+        selected = [rec for rec in selected if not rec[4] is None]
+
+    return selected
+
+## ===================================================================================
+def Benchmark(muCnt, windows):
+    # Compare the Mo kernels with the original loops for a list of (begSeq, endSeq) windows.
+    # The loops read the rows for each window. The kernels pivot all 12 months once.
+    domainValues = ["None", "Very rare", "Rare", "Occasional", "Frequent", "Very frequent"]
+    dCodes = dict()
+
+    for i in range(len(domainValues)):
+        dCodes[domainValues[i].upper()] = i
+
+    rows = CreateMonthRows(muCnt, domainValues)
+    colList = [WindowColumns(begSeq, endSeq) for begSeq, endSeq in windows]
+    print "Synthetic month rows: " + str(len(rows)) + ", windows: " + ", ".join([str(b) + "-" + str(e) for b, e in windows])
+
+    cols = zip(*rows)
+    diffCnt = 0
+
+    for title, bHigh in [("high", True), ("low", False)]:
+        for name, kernel, refFunc, valIdx, bNotNull in [ \
+            ("Mo_MaxMin", Mo_MaxMin, lambda r : RefMo_MaxMin(r, bHigh, None), 4, False), \
+            ("Mo_DCD", Mo_DCD, lambda r : RefMo_DCD(r, bHigh), 4, False), \
+            ("Mo_WTA", Mo_WTA, lambda r : RefMo_WTA(r, bHigh), 4, False), \
+            ("Mo_DCP_Domain", Mo_DCP_Domain, lambda r : RefMo_Domain(r, bHigh, dCodes, False), 5, True), \
+            ("Mo_DCD_Domain", Mo_DCD_Domain, lambda r : RefMo_Domain(r, bHigh, dCodes, True), 5, True)]:
+
+            t0 = time.time()
+            refResults = [refFunc(WindowRows(rows, windowCols, valIdx, bNotNull)) for windowCols in colList]
+            refTime = time.time() - t0
+
+            t0 = time.time()
+
+            if valIdx == 5:
+                dMonths = MonthArrays(cols[0], cols[1], np.array(cols[2], dtype=np.float64), np.array(cols[3], dtype=np.float64), cols[5], cols[6], dCodes)
+
+            else:
+                dMonths = MonthArrays(cols[0], cols[1], np.array(cols[2], dtype=np.float64), np.array(cols[3], dtype=np.float64), cols[4], cols[6], None, True)
+
+            result = kernel(dMonths, colList, bHigh)
+            arrayTime = time.time() - t0
+
+            mismatches = 0
+
+            for j in range(len(colList)):
+                dRef = refResults[j]
+                dArray = dict()
+
+                if name == "Mo_MaxMin":
+                    muKeys, muVal, muValPct, muRatedPct, muAreasym = result
+
+                    for i in range(len(muKeys)):
+                        if np.isnan(muVal[i, j]) or (bHigh and muVal[i, j] <= 0) or not bHigh:
+                            # The original loop only reports a low rating below nullRating (None)
+                            dArray[muKeys[i]] = [muRatedPct[i, j], None]
+
+                        else:
+                            dArray[muKeys[i]] = [muValPct[i, j], Decode(dMonths, muVal[i, j])]
+
+                else:
+                    muKeys, muPct, muVal, muAreasym = result
+
+                    for i in range(len(muKeys)):
+                        if name.endswith("Domain") and np.isnan(muPct[i, j]):
+                            continue
+
+                        if name == "Mo_DCD" and np.isnan(muPct[i, j]):
+                            dArray[muKeys[i]] = [None, None]
+
+                        elif name == "Mo_WTA":
+                            # A weighted average is not decoded to the integer rating
+                            dArray[muKeys[i]] = [muPct[i, j], None if np.isnan(muVal[i, j]) else muVal[i, j]]
+
+                        else:
+                            dArray[muKeys[i]] = [muPct[i, j], Decode(dMonths, muVal[i, j])]
+
+                if sorted(dArray.keys()) != sorted(dRef.keys()):
+                    mismatches += len(set(dArray.keys()) ^ set(dRef.keys()))
+
+                for mukey, refVals in dRef.items():
+                    if mukey in dArray and list(refVals) != dArray[mukey]:
+                        mismatches += 1
+
+            print "%-16s %-4s %d windows  loops %7.3fs  arrays %7.3fs  %5.1fx  mismatches %d" % \
+                  (name, title, len(colList), refTime, arrayTime, refTime / max(arrayTime, 1e-6), mismatches)
+            diffCnt += mismatches
+
+    return diffCnt
+
+## ===================================================================================
+## MAIN
+## ===================================================================================
+
+# Import system modules
+import sys, os, time, math, random, traceback, collections
+import numpy as np
+
+try:
+    import arcpy
+
+except ImportError:
+    # arcpy is only needed for messages. The benchmark runs without it.
+    arcpy = None
+
+if __name__ == "__main__":
+    # Standalone benchmark
+    muCnt = 20000
+
+    if len(sys.argv) > 1:
+        muCnt = int(sys.argv[1])
+
+    Benchmark(muCnt, [(1, 12), (3, 5), (6, 8), (11, 2), (4, 4)])
@@ -0,0 +1,349 @@
+# gSSURGO_Palette.py
+#
+# Steve Peaslee, National Soil Survey Center
+#
+# Purpose:  Map legend colors for gSSURGO_CreateSoilMap, gSSURGO_ExportRasters, gSSURGO_CreateRUSLE2Maps and
+# BezierColorRamp
+#
+# rand_rgb_colors picked each color of a unique values legend by drawing a random color and checking it
+# against the list of colors already used. A legend with thousands of values (map unit name, MUKEY) made
+# the same map with different colors each time and slowed down as the list grew. The Bezier color ramps
+# computed a factorial for each Bernstein coefficient, for each color.
+#
+#   DistinctColors   num colors for a unique values legend. The hue, lightness and saturation of color i come
+#                    from a low-discrepancy (R3) sequence, so each new color falls in the largest gap left
+#                    by the colors before it. The colors are always the same, and the first num colors of
+#                    a longer palette are the palette for num.
+#
+#   BezierGradient   Bezier color ramp through a list of control colors. The Bernstein basis for all of the
+#                    output colors is one array built from a row of binomial coefficients (Binomials).
+#
+#   Ramp             legend colors for ColorRamp (BezierColorRamp.Process): a ramp between each pair of
+#                    named colors, thinned to colorNum colors.
+#
+# Palettes and ramps are cached in memory, keyed on (number of colors, pastel factor or list of ramp colors).
+#
+# Run this script by itself (outside of ArcMap) to compare it with the original random colors and the
+# factorial Bezier ramp.
+#
+#     python gSSURGO_Palette.py [color count]
+#
+# 2017-11-10
+
+## ===================================================================================
+class MyError(Exception):
+    pass
+
+## ===================================================================================
+def PrintMsg(msg, severity=0):
+    # prints message to screen if run as a python script
+    # Adds tool message to the geoprocessor
+    #
+    #Split the message on \n first, so that if it's multiple lines, a GPMessage will be added for each line
+    try:
+        for string in msg.split('\n'):
+            #Add a geoprocessing message (in case this is run as a tool)
+            if severity == 0:
+                arcpy.AddMessage(string)
+
+            elif severity == 1:
+                arcpy.AddWarning(string)
+
+            elif severity == 2:
+                arcpy.AddMessage("    ")
+                arcpy.AddError(string)
+
+    except:
+        pass
+
+## ===================================================================================
+def errorMsg():
+    try:
+        tb = sys.exc_info()[2]
+        tbinfo = traceback.format_tb(tb)[0]
+        theMsg = tbinfo + "\n" + str(sys.exc_type)+ ": " + str(sys.exc_value)
+        PrintMsg(theMsg, 2)
+
+    except:
+        PrintMsg("Unhandled error in unHandledException method", 2)
+
+## ===================================================================================
+def hex_to_RGB(hex):
+    ''' "#FFFFFF" -> [255,255,255] '''
+    return [int(hex[i:i+2], 16) for i in range(1,6,2)]
+
+## ===================================================================================
+def RGB_to_hex(RGB):
+    ''' [255,255,255] -> "#FFFFFF" '''
+    RGB = [int(x) for x in RGB]
+    return "#"+"".join(["0{0:x}".format(v) if v < 16 else "{0:x}".format(v) for v in RGB])
+
+## ===================================================================================
+def color_dict(gradient):
+    # List of RGB colors as a dictionary of hex strings and red, green, blue lists
+    return {"hex":[RGB_to_hex(RGB) for RGB in gradient],"r":[RGB[0] for RGB in gradient],"g":[RGB[1] for RGB in gradient],"b":[RGB[2] for RGB in gradient]}
+
+## ===================================================================================
+def color_distance(c1, c2):
+    # Sum of the red, green and blue differences
+    return sum([abs(x[0] - x[1]) for x in zip(c1, c2)])
+
+## ===================================================================================
+def SequenceColor(i, pastel_factor):
+    # Color i of the distinct color sequence as [red, green, blue] (0-255)
+    h = (0.5 + r3[0] * i) % 1.0
+    l = 0.30 + 0.40 * ((0.5 + r3[1] * i) % 1.0)
+    s = 0.55 + 0.45 * ((0.5 + r3[2] * i) % 1.0)
+    rgb = colorsys.hls_to_rgb(h, l, s)
+
+    return [int(255 * (x + pastel_factor) / (1.0 + pastel_factor)) for x in rgb]
+
+## ===================================================================================
+def DistinctColors(num, pastel_factor=0.1):
+    # List of num distinct [red, green, blue, 255] colors for a unique values legend.
+    # pastel_factor is 0 to 1. Higher value -> more pastel.
+    try:
+        key = round(pastel_factor, 6)
+
+        if not key in dPalettes:
+            dPalettes[key] = [list(), set(), 0]
+
+        colors, used, i = dPalettes[key]
+
+        while len(colors) < num:
+            # A color already in the palette (integer rounding) is skipped
+            rgb = SequenceColor(i, pastel_factor)
+            i += 1
+
+            if not tuple(rgb) in used:
+                used.add(tuple(rgb))
+                colors.append(rgb + [255])
+
+        dPalettes[key][2] = i
+
+        return [list(rgb) for rgb in colors[0:num]]
+
+    except:
+        errorMsg()
+        return []
+
+## ===================================================================================
+def Binomials(n):
+    # Row n of Pascal's triangle as an array of floats
+    if not n in dBinomials:
+        row = [1]
+
+        for k in range(n):
+            row.append(row[-1] * (n - k) // (k + 1))
+
+        dBinomials[n] = np.array(row, dtype=np.float64)
+
+    return dBinomials[n]
+
+## ===================================================================================
+def BezierColors(RGB_list, n_out):
+    # n_out colors along the Bezier curve with the RGB control points in RGB_list.
+    # As in the original bezier_gradient, each control point's share is truncated to an
+    # integer before the shares are added.
+    ctrl = np.array(RGB_list, dtype=np.float64)
+    n = len(RGB_list) - 1
+
+    if n_out > 1:
+        t = np.arange(n_out, dtype=np.float64) / (n_out - 1)
+
+    else:
+        t = np.zeros(1)
+
+    i = np.arange(n + 1)
+    basis = Binomials(n)[None, :] * ((1.0 - t)[:, None] ** (n - i)[None, :]) * (t[:, None] ** i[None, :])
+    shares = np.trunc(basis[:, :, None] * ctrl[None, :, :])
+
+    return shares.sum(axis=1).astype(np.int64).tolist()
+
+## ===================================================================================
+def BezierGradient(colors, n_out=100):
+    # Bezier gradient dictionary for a list of hex or RGB control colors, as bezier_gradient
+    RGB_list = [hex_to_RGB(color) if isinstance(color, basestring) else list(color) for color in colors]
+
+    return {"gradient": color_dict(BezierColors(RGB_list, n_out)), "control": color_dict(RGB_list)}
+
+## ===================================================================================
+def Ramp(colorNum, colorList):
+    # Legend colors for a color ramp through a list of color names (Red, Yellow, Green, Cyan, Blue, Magenta).
+    # Each pair of colors gets a ramp of colorNum colors; the joined ramp is thinned to about colorNum colors.
+    try:
+        key = (colorNum, tuple(colorList))
+
+        if key in dRamps:
+            return [list(rgb) for rgb in dRamps[key]]
+
+        processList = [dRGB[color] for color in colorList]
+        masterColors = list()
+        lastRGB = [-1, -1, -1]
+
+        for i in range(len(processList) - 1):
+            for thisRGB in BezierColors([processList[i], processList[i + 1]], colorNum):
+                if thisRGB != lastRGB:
+                    masterColors.append(thisRGB)
+
+                lastRGB = thisRGB
+
+        if colorNum > 1:
+            skipNum = int(round((len(masterColors) - colorNum) / float(colorNum - 1.0), 0))
+
+        else:
+            skipNum = len(masterColors)
+
+        legendColors = masterColors[0::skipNum + 1]
+        dRamps[key] = legendColors
+
+        return [list(rgb) for rgb in legendColors]
+
+    except:
+        errorMsg()
+        return []
+
+## ===================================================================================
+def RefRandomColors(num, pastel_factor=0.1):
+    # The original rand_rgb_colors. Only for the benchmark.
+    colors = list()
+
+    for n in range(num):
+        color = [int(255 *(x + pastel_factor)/(1.0 + pastel_factor)) for x in [random.uniform(0,1.0) for j in [1,2,3]]]
+
+        if not color in colors:
+            # Always true: the saved colors have the opacity on the end
+            color.append(255)
+
+        colors.append(color)
+
+    return colors
+
+## ===================================================================================
+def RefRamp(colorNum, colorList):
+    # The original BezierColorRamp.Process, with factorials. Only for the benchmark.
+    processList = [dRGB[color] for color in colorList]
+    masterColors = list()
+    lastRGB = [-1, -1, -1]
+
+    for i in range(len(processList) - 1):
+        RGB_list = [processList[i], processList[i + 1]]
+        n = len(RGB_list) - 1
+
+        for step in range(colorNum):
+            t = float(step) / (colorNum - 1)
+            out = [0, 0, 0]
+
+            for k, c in enumerate(RGB_list):
+                b = math.factorial(n) / float(math.factorial(k) * math.factorial(n - k)) * ((1 - t) ** (n - k)) * (t ** k)
+
+                for j in range(3):
+                    out[j] += int(b * c[j])
+
+            if out != lastRGB:
+                masterColors.append(out)
+
+            lastRGB = out
+
+    skipNum = int(round((len(masterColors) - colorNum) / float(colorNum - 1.0), 0))
+
+    return masterColors[0::skipNum + 1]
+
+## ===================================================================================
+def NearestDistance(colors):
+    # Smallest and average distance from each color to the nearest other color
+    rgb = np.array([c[0:3] for c in colors], dtype=np.int64)
+    nearest = list()
+
+    for i in range(len(rgb)):
+        d = np.abs(rgb - rgb[i]).sum(axis=1)
+        d[i] = 999
+        nearest.append(d.min())
+
+    return min(nearest), sum(nearest) / float(len(nearest))
+
+## ===================================================================================
+def Benchmark(colorNum):
+    # Time the palettes and compare the ramps with the factorial version
+    diffCnt = 0
+
+    for num in [20, colorNum]:
+        random.seed(num)
+        t0 = time.time()
+        refColors = RefRandomColors(num)
+        refTime = time.time() - t0
+
+        dPalettes.clear()
+        t0 = time.time()
+        newColors = DistinctColors(num)
+        newTime = time.time() - t0
+
+        t0 = time.time()
+        DistinctColors(num)
+        cacheTime = time.time() - t0
+
+        if len(set([tuple(c) for c in newColors])) != num:
+            diffCnt += 1
+
+        refMin, refAvg = NearestDistance(refColors)
+        newMin, newAvg = NearestDistance(newColors)
+        print "Colors  %6d  random %7.3fs (nearest min %3d avg %5.1f)  sequence %7.3fs (nearest min %3d avg %5.1f)  cached %7.4fs" % \
+              (num, refTime, refMin, refAvg, newTime, newMin, newAvg, cacheTime)
+
+    for colorList in [["Red", "Yellow", "Green", "Cyan", "Blue"], ["Red", "Yellow", "Blue"], ["Blue", "Cyan"]]:
+        for num in [5, 12, 40]:
+            t0 = time.time()
+            refRamp = RefRamp(num, colorList)
+            refTime = time.time() - t0
+            dRamps.clear()
+            t0 = time.time()
+            newRamp = Ramp(num, colorList)
+            newTime = time.time() - t0
+
+            if refRamp != newRamp:
+                diffCnt += 1
+
+            print "Ramp  %-30s %3d colors  factorial %7.4fs  binomial %7.4fs  %s" % \
+                  ("-".join(colorList), num, refTime, newTime, ("same" if refRamp == newRamp else "DIFFERENT"))
+
+    return diffCnt
+
+## ===================================================================================
+## MAIN
+## ===================================================================================
+
+# Import system modules
+import sys, os, time, math, random, traceback, colorsys
+import numpy as np
+
+try:
+    import arcpy
+
+except ImportError:
+    # arcpy is only needed for messages. The benchmark runs without it.
+    arcpy = None
+
+# Steps of the R3 low-discrepancy sequence (1 / g, 1 / g**2, 1 / g**3 where g**4 = g + 1)
+g3 = 1.2207440846057596
+r3 = [1.0 / g3, 1.0 / g3 ** 2, 1.0 / g3 ** 3]
+
+# Named colors used by ColorRamp
+dRGB = {"Red":[255, 0, 0], "Yellow":[255, 255, 0], "Green":[0, 255, 0], "Cyan":[0, 255, 255], "Blue":[0, 0, 255], "Magenta":[255, 0, 255]}
+
+# Distinct color palettes keyed on pastel factor: [colors, set of colors, next sequence number]
+dPalettes = dict()
+
+# Bezier ramps keyed on (number of colors, tuple of color names)
+dRamps = dict()
+
+# Binomial coefficients keyed on the degree of the Bezier curve
+dBinomials = dict()
+
+if __name__ == "__main__":
+    # Standalone benchmark
+    colorNum = 3000
+
+    if len(sys.argv) > 1:
+        colorNum = int(sys.argv[1])
+
+    sys.exit(Benchmark(colorNum))
@@ -0,0 +1,333 @@
+# gSSURGO_Profile.py
+#
+# Steve Peaslee, National Soil Survey Center
+#
+# Purpose:  Timing trace for gSSURGO_CreateSoilMap
+#
+# Each timed function (Timed) is a span with its elapsed time, the number of records it returned and the
+# memory used by the process. Spans for functions called by a timed function are nested inside it. When the
+# outermost span (CreateSoilMap) ends, the trace is written to a JSON file:
+#
+#   {"created":..., "process":..., "spans":[{"name", "start", "seconds", "rows", "memMB", "peakMB", "spans"}]}
+#
+#   start    seconds since the beginning of the trace
+#   rows     records returned (dictionary, list or rating table count), if known
+#   memMB    change in the working set (Windows) or resident memory of the process during the span
+#   peakMB   largest working set of the process so far. Neither Windows nor Linux can reset the peak,
+#            so the span that raised it is the first one with the larger number.
+#
+# A generator function does its work while its rows are read, not when it is called, so it is not wrapped
+# with Timed (TimeFunctions skips generator functions). TimedRows wraps the generator instead: the time spent
+# producing the rows is a span that ends when the rows run out or the reader stops.
+#
+# Tracing is off unless Enable is called or the SDV_PROFILE environment variable is set. SDV_PROFILE is a
+# .json file name or a folder. For a folder, each trace is written to its own file (batch workers). When
+# tracing is off, a timed function only costs one extra function call.
+#
+# 2017-11-10
+
+## ===================================================================================
+class MyError(Exception):
+    pass
+
+## ===================================================================================
+def PrintMsg(msg, severity=0):
+    # prints message to screen if run as a python script
+    # Adds tool message to the geoprocessor
+    #
+    #Split the message on \n first, so that if it's multiple lines, a GPMessage will be added for each line
+    try:
+        for string in msg.split('\n'):
+            #Add a geoprocessing message (in case this is run as a tool)
+            if severity == 0:
+                arcpy.AddMessage(string)
+
+            elif severity == 1:
+                arcpy.AddWarning(string)
+
+            elif severity == 2:
+                arcpy.AddMessage("    ")
+                arcpy.AddError(string)
+
+    except:
+        pass
+
+## ===================================================================================
+def errorMsg():
+    try:
+        tb = sys.exc_info()[2]
+        tbinfo = traceback.format_tb(tb)[0]
+        theMsg = tbinfo + "\n" + str(sys.exc_type)+ ": " + str(sys.exc_value)
+        PrintMsg(theMsg, 2)
+
+    except:
+        PrintMsg("Unhandled error in unHandledException method", 2)
+
+## ===================================================================================
+def MemoryUsage():
+    # Current and peak memory used by this process in MB: [current, peak]
+    try:
+        if os.name == "nt":
+            counters = ProcessMemoryCounters()
+            counters.cb = ctypes.sizeof(counters)
+            ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb)
+
+            return [counters.WorkingSetSize / 1048576.0, counters.PeakWorkingSetSize / 1048576.0]
+
+        # Linux. ru_maxrss is in KB.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+        current = peak
+
+        try:
+            with open("/proc/self/statm") as f:
+                current = int(f.read().split()[1]) * resource.getpagesize() / 1048576.0
+
+        except:
+            pass
+
+        return [current, peak]
+
+    except:
+        return [0.0, 0.0]
+
+## ===================================================================================
+def Enable(traceFile):
+    # Turn on tracing. traceFile is a .json file or a folder. An empty string turns tracing off.
+    global tracePath
+    tracePath = traceFile
+
+    if traceFile in [None, ""]:
+        tracePath = None
+
+## ===================================================================================
+def Enabled():
+    return not tracePath is None
+
+## ===================================================================================
+def TraceFile(label):
+    # Output file for a trace. In a folder, the file name is the label, the time and the process id.
+    if tracePath.lower().endswith(".json"):
+        return tracePath
+
+    label = "".join([c if c.isalnum() else "_" for c in str(label)])[0:60]
+
+    return os.path.join(tracePath, "SDV_Profile_" + label + "_" + time.strftime("%Y%m%d_%H%M%S") + "_" + str(os.getpid()) + ".json")
+
+## ===================================================================================
+def Start(name):
+    # Open a span inside the current one
+    global traceStart
+
+    if len(spanStack) == 0:
+        traceStart = time.time()
+        del traceSpans[:]
+
+    mem = MemoryUsage()
+    dSpan = {"name":name, "start":round(time.time() - traceStart, 4), "seconds":None, "rows":None, "memMB":mem[0], "peakMB":None, "spans":list()}
+
+    if len(spanStack) == 0:
+        traceSpans.append(dSpan)
+
+    else:
+        spanStack[-1]["spans"].append(dSpan)
+
+    spanStack.append(dSpan)
+
+## ===================================================================================
+def Stop(rows=None):
+    # Close the current span. Writes the trace when it is the outermost span.
+    if len(spanStack) == 0:
+        return
+
+    dSpan = spanStack.pop()
+    mem = MemoryUsage()
+    dSpan["seconds"] = round(time.time() - traceStart - dSpan["start"], 4)
+    dSpan["rows"] = rows
+    dSpan["memMB"] = round(mem[0] - dSpan["memMB"], 1)
+    dSpan["peakMB"] = round(mem[1], 1)
+
+    if len(spanStack) == 0:
+        WriteTrace(dSpan["name"])
+
+## ===================================================================================
+def Label(label):
+    # Name for the trace file, usually the map layer. Set while the outermost span is open.
+    if len(spanStack) > 0:
+        spanStack[0]["label"] = label
+
+## ===================================================================================
+def WriteTrace(label):
+    # Save the spans to the trace file
+    try:
+        label = traceSpans[0].get("label", label)
+        traceFile = TraceFile(label)
+        dTrace = {"created":time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(traceStart)), "process":os.getpid(), "label":label, "spans":traceSpans}
+
+        with open(traceFile, "w") as f:
+            json.dump(dTrace, f, indent=1)
+
+        PrintMsg("\tProfile written to " + traceFile, 0)
+
+    except:
+        errorMsg()
+
+## ===================================================================================
+def RowCount(result):
+    # Number of records in a function result: a dictionary or list, or [rating table, outputValues]
+    try:
+        if isinstance(result, dict):
+            return len(result)
+
+        if isinstance(result, (list, tuple)) and len(result) == 2 and isinstance(result[0], basestring):
+            if result[0] != "" and arcpy.Exists(result[0]):
+                return int(arcpy.GetCount_management(result[0]).getOutput(0))
+
+            return None
+
+        if isinstance(result, list):
+            return len(result)
+
+        return None
+
+    except:
+        return None
+
+## ===================================================================================
+def Timed(func, name=None, rowFunc=RowCount):
+    # Wrap func so that each call is a span when tracing is on
+    if name is None:
+        name = func.__name__
+
+    def TimedFunc(*args, **kwargs):
+        if tracePath is None:
+            return func(*args, **kwargs)
+
+        Start(name)
+        result = None
+
+        try:
+            result = func(*args, **kwargs)
+            return result
+
+        finally:
+            rows = None
+
+            if not rowFunc is None:
+                rows = rowFunc(result)
+
+            Stop(rows)
+
+    TimedFunc.__name__ = func.__name__
+    TimedFunc.__doc__ = func.__doc__
+    TimedFunc.bTimed = True
+
+    return TimedFunc
+
+## ===================================================================================
+def TimeFunctions(dGlobals, names, prefixes=[], rowFunc=RowCount):
+    # Replace the functions in a module's globals with timed functions. The module calls them by
+    # name, so every call goes through the wrapper. rowFunc None leaves out the record counts.
+    fnNames = list(names)
+
+    for fnName in sorted(dGlobals.keys()):
+        if fnName in fnNames:
+            continue
+
+        for prefix in prefixes:
+            if fnName.startswith(prefix) and callable(dGlobals[fnName]):
+                fnNames.append(fnName)
+                break
+
+    timedNames = list()
+
+    for fnName in fnNames:
+        if fnName in dGlobals and not getattr(dGlobals[fnName], "bTimed", False):
+            if inspect.isgeneratorfunction(dGlobals[fnName]):
+                # The call only creates the generator. Use TimedRows on the rows.
+                continue
+
+            dGlobals[fnName] = Timed(dGlobals[fnName], rowFunc=rowFunc)
+            timedNames.append(fnName)
+
+    return timedNames
+
+## ===================================================================================
+def TimedRows(rows, name=None):
+    # Iterate rows (usually a generator) so that producing them is a span when tracing is on.
+    #
+    # The span only counts the time spent getting the next row, not the time the reader spends on
+    # each row. It is added to the span that is open when the first row is read and is closed when
+    # the rows run out or the reader stops.
+    #
+    if tracePath is None:
+        return rows
+
+    if name is None:
+        name = getattr(rows, "__name__", "rows")
+
+    def RowIterator():
+        rowIter = iter(rows)
+        dSpan = None
+        rowCnt = 0
+
+        try:
+            while True:
+                t0 = time.time()
+
+                if dSpan is None and len(spanStack) > 0:
+                    dSpan = {"name":name, "start":round(t0 - traceStart, 4), "seconds":0.0, "rows":None, "memMB":None, "peakMB":None, "spans":list()}
+                    spanStack[-1]["spans"].append(dSpan)
+
+                try:
+                    row = rowIter.next()
+
+                except StopIteration:
+                    break
+
+                finally:
+                    if not dSpan is None:
+                        dSpan["seconds"] += time.time() - t0
+
+                rowCnt += 1
+                yield row
+
+        finally:
+            if not dSpan is None:
+                dSpan["seconds"] = round(dSpan["seconds"], 4)
+                dSpan["rows"] = rowCnt
+                dSpan["peakMB"] = round(MemoryUsage()[1], 1)
+
+    return RowIterator()
+
+## ===================================================================================
+## MAIN
+## ===================================================================================
+
+# Import system modules
+import sys, os, time, json, traceback, ctypes, inspect
+
+try:
+    import arcpy
+
+except ImportError:
+    # arcpy is only needed for messages and table counts
+    arcpy = None
+
+if os.name == "nt":
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [("cb", ctypes.c_ulong), ("PageFaultCount", ctypes.c_ulong), ("PeakWorkingSetSize", ctypes.c_size_t),
+                    ("WorkingSetSize", ctypes.c_size_t), ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPagedPoolUsage", ctypes.c_size_t), ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaNonPagedPoolUsage", ctypes.c_size_t), ("PagefileUsage", ctypes.c_size_t),
+                    ("PeakPagefileUsage", ctypes.c_size_t)]
+
+else:
+    import resource
+
+# Trace file or folder. None means tracing is off.
+tracePath = os.environ.get("SDV_PROFILE", None) or None
+
+# Spans of the current trace, the open spans and the time the trace began
+traceSpans = list()
+spanStack = list()
+traceStart = 0.0
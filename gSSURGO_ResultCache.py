@@ -0,0 +1,523 @@
+# gSSURGO_ResultCache.py
+#
+# Steve Peaslee, National Soil Survey Center
+#
+# Purpose:  Reuse SDV rating tables that were created with the same settings from the same soil data.
+#
+# Each time a soil map is created, CreateSoilMap reads and aggregates the soil data again, even when the
+# rating table already in the database was made with exactly the same settings.
+#
+# The SDV_ResultCache table in the database keeps one record for each rating table created by
+# gSSURGO_CreateSoilMap:
+#
+#   TABLENAME      rating table (SDV_...)
+#   PARAMHASH      hash of the CreateSoilMap parameters (ParameterHash)
+#   DBVERSION      version of the soil data when the table was made (DataVersion)
+#   ROWCOUNT       number of records in the rating table
+#   OUTPUTVALUES   output values used for the map legend (JSON)
+#   PARAMETERS     the parameters, for ListCache
+#   CREATED        date and time
+#   AREAVERSIONS   version of each survey area when the table was made (AreaVersions, JSON)
+#
+# The data version is a hash of the SACATALOG survey area versions and dates (SAVERSION, SAVEREST,
+# TABULARVERSION, TABULARVEREST) plus the number of MAPUNIT and COMPONENT records. When a map is
+# created again with the same parameters and the soil data has not changed, CreateSoilMap uses the
+# existing rating table and only makes the map layer.
+#
+# A rating table is only reused if it still exists and has the same number of records. Tables made from
+# a layer with a selected set are not cached.
+#
+# When only some of the survey areas have been refreshed, FindChanged returns the cached table along with
+# the survey areas that were added, updated or removed. The version of a survey area is its SACATALOG
+# versions plus the list of its map unit keys, so new tabular data or a map unit added or dropped from the
+# legend marks the area as changed. CreateSoilMap (UpdateSDVTable) rates the map units of the changed areas
+# and replaces their records in the table. When more than incrementalLimit of the survey areas have
+# changed, the whole table is made again.
+#
+# Run as a script, this is the cache manager. It lists the cached rating tables and can delete the ones
+# that are out of date (Validate, Evict stale) or all of them (Evict all).
+#
+# 2017-11-03
+
+## ===================================================================================
+class MyError(Exception):
+    pass
+
+## ===================================================================================
+def PrintMsg(msg, severity=0):
+    # prints message to screen if run as a python script
+    # Adds tool message to the geoprocessor
+    #
+    #Split the message on \n first, so that if it's multiple lines, a GPMessage will be added for each line
+    try:
+        for string in msg.split('\n'):
+            #Add a geoprocessing message (in case this is run as a tool)
+            if severity == 0:
+                arcpy.AddMessage(string)
+
+            elif severity == 1:
+                arcpy.AddWarning(string)
+
+            elif severity == 2:
+                arcpy.AddMessage("    ")
+                arcpy.AddError(string)
+
+    except:
+        pass
+
+## ===================================================================================
+def errorMsg():
+    try:
+        tb = sys.exc_info()[2]
+        tbinfo = traceback.format_tb(tb)[0]
+        theMsg = tbinfo + "\n" + str(sys.exc_type)+ ": " + str(sys.exc_value)
+        PrintMsg(theMsg, 2)
+
+    except:
+        PrintMsg("Unhandled error in unHandledException method", 2)
+
+## ===================================================================================
+def DataVersion(gdb):
+    # Version of the soil data in gdb. Changes when a survey area is added, removed or updated
+    # or when the number of map units or components changes. Returns an empty string on error.
+    try:
+        saTbl = os.path.join(gdb, "sacatalog")
+        saFields = [fld.name.upper() for fld in arcpy.ListFields(saTbl)]
+        verFields = [fld for fld in versionFields if fld in saFields]
+        saList = list()
+
+        with arcpy.da.SearchCursor(saTbl, verFields) as cur:
+            for rec in cur:
+                saList.append(tuple([str(val) for val in rec]))
+
+        saList.sort()
+        muCnt = int(arcpy.GetCount_management(os.path.join(gdb, "mapunit")).getOutput(0))
+        coCnt = int(arcpy.GetCount_management(os.path.join(gdb, "component")).getOutput(0))
+
+        return hashlib.md5(repr((verFields, saList, muCnt, coCnt))).hexdigest()
+
+    except:
+        errorMsg()
+        return ""
+
+## ===================================================================================
+def AreaVersions(gdb):
+    # Version of each survey area:  {areasymbol:hash of the SACATALOG versions and the map unit keys}
+    try:
+        saTbl = os.path.join(gdb, "sacatalog")
+        saFields = [fld.name.upper() for fld in arcpy.ListFields(saTbl)]
+        verFields = [fld for fld in versionFields if fld in saFields]
+        dVersions = dict()
+        dLegends = dict()
+        dMukeys = dict()
+
+        with arcpy.da.SearchCursor(saTbl, verFields) as cur:
+            for rec in cur:
+                dVersions[rec[0]] = [str(val) for val in rec[1:]]
+
+        with arcpy.da.SearchCursor(os.path.join(gdb, "legend"), ["LKEY", "AREASYMBOL"]) as cur:
+            for lkey, areasym in cur:
+                dLegends[lkey] = areasym
+
+        with arcpy.da.SearchCursor(os.path.join(gdb, "mapunit"), ["MUKEY", "LKEY"]) as cur:
+            for mukey, lkey in cur:
+                areasym = dLegends.get(lkey, None)
+
+                try:
+                    dMukeys[areasym].append(mukey)
+
+                except KeyError:
+                    dMukeys[areasym] = [mukey]
+
+        dAreas = dict()
+
+        for areasym in set(dVersions.keys()) | set(dLegends.values()):
+            mukeys = sorted(dMukeys.get(areasym, []))
+            dAreas[str(areasym)] = hashlib.md5(repr((dVersions.get(areasym, None), mukeys))).hexdigest()[0:12]
+
+        return dAreas
+
+    except:
+        errorMsg()
+        return dict()
+
+## ===================================================================================
+def ParameterValue(val):
+    # Parameter value in a form that hashes the same however the tool passed it
+    # (unicode or str, 30 or 30.0)
+    if isinstance(val, unicode):
+        return val.encode("utf-8")
+
+    if isinstance(val, float) and val.is_integer():
+        return int(val)
+
+    if isinstance(val, long):
+        return int(val)
+
+    return val
+
+## ===================================================================================
+def ParameterHash(params):
+    # Hash of the CreateSoilMap parameters following inputLayer:
+    # sdvAtt, aggMethod, primCst, secCst, top, bot, begMo, endMo, tieBreaker, bZero, cutOff, bFuzzy, bNulls, sRV
+    values = [ParameterValue(val) for val in params]
+    return hashlib.md5(repr((cacheFormat, values))).hexdigest()
+
+## ===================================================================================
+def CacheKey(inputLayer, fc, params):
+    # Cache key for a soil map: [parameter hash, data version, parameters], or None if the
+    # rating table should not be cached (selected set in the layer, unknown data version).
+    try:
+        polyCnt = int(arcpy.GetCount_management(inputLayer).getOutput(0))
+        fcCnt = int(arcpy.GetCount_management(fc).getOutput(0))
+
+        if polyCnt != fcCnt:
+            return None
+
+        dbVersion = DataVersion(os.path.dirname(fc))
+
+        if dbVersion == "":
+            return None
+
+        return [ParameterHash(params), dbVersion, [ParameterValue(val) for val in params]]
+
+    except:
+        errorMsg()
+        return None
+
+## ===================================================================================
+def DecodeValues(outputValues):
+    # Output values read back from JSON. Text values are str unless they need unicode.
+    values = list()
+
+    for val in outputValues:
+        if isinstance(val, unicode):
+            try:
+                val = str(val)
+
+            except UnicodeEncodeError:
+                pass
+
+        values.append(val)
+
+    return values
+
+## ===================================================================================
+def ReadCache(gdb):
+    # All of the cache records in gdb as a list of dictionaries
+    try:
+        cacheTbl = os.path.join(gdb, cacheTable)
+        cacheList = list()
+
+        if not arcpy.Exists(cacheTbl):
+            return cacheList
+
+        # AREAVERSIONS was added to the cache table later. Older records cannot be updated.
+        flds = list(cacheFields)
+
+        if areaField in [fld.name.upper() for fld in arcpy.ListFields(cacheTbl)]:
+            flds.append(areaField)
+
+        with arcpy.da.SearchCursor(cacheTbl, flds) as cur:
+            for rec in cur:
+                dCache = dict(zip(flds, rec))
+                dCache["OUTPUTVALUES"] = DecodeValues(json.loads(dCache["OUTPUTVALUES"]))
+
+                if dCache.get(areaField, None) in [None, ""]:
+                    dCache[areaField] = None
+
+                else:
+                    dCache[areaField] = json.loads(dCache[areaField])
+
+                cacheList.append(dCache)
+
+        return cacheList
+
+    except:
+        errorMsg()
+        return []
+
+## ===================================================================================
+def TableCount(tbl):
+    # Number of records in a table, or None if it does not exist
+    if not arcpy.Exists(tbl):
+        return None
+
+    return int(arcpy.GetCount_management(tbl).getOutput(0))
+
+## ===================================================================================
+def FindTable(gdb, cacheKey):
+    # Existing rating table for a cache key. Returns [rating table, outputValues] or None.
+    try:
+        if cacheKey is None:
+            return None
+
+        paramHash, dbVersion = cacheKey[0:2]
+
+        for dCache in ReadCache(gdb):
+            if dCache["PARAMHASH"] == paramHash and dCache["DBVERSION"] == dbVersion:
+                tbl = os.path.join(gdb, dCache["TABLENAME"])
+
+                if TableCount(tbl) == dCache["ROWCOUNT"]:
+                    return [tbl, dCache["OUTPUTVALUES"]]
+
+                # The table was deleted or changed
+                return None
+
+        return None
+
+    except:
+        errorMsg()
+        return None
+
+## ===================================================================================
+def FindChanged(gdb, cacheKey):
+    # Rating table made with the same parameters from an earlier version of the soil data, and the
+    # survey areas that have changed since. Returns [rating table, outputValues, changed areas,
+    # removed areas] or None if the table has to be made again.
+    try:
+        if cacheKey is None:
+            return None
+
+        paramHash = cacheKey[0]
+
+        for dCache in ReadCache(gdb):
+            if dCache["PARAMHASH"] != paramHash or dCache[areaField] is None:
+                continue
+
+            tbl = os.path.join(gdb, dCache["TABLENAME"])
+
+            if TableCount(tbl) != dCache["ROWCOUNT"]:
+                return None
+
+            dOld = dCache[areaField]
+            dNew = AreaVersions(gdb)
+
+            if len(dNew) == 0:
+                return None
+
+            changedAreas = sorted([areasym for areasym in dNew if dOld.get(areasym, None) != dNew[areasym]])
+            removedAreas = sorted([areasym for areasym in dOld if not areasym in dNew])
+
+            if len(changedAreas) + len(removedAreas) > incrementalLimit * len(dNew):
+                return None
+
+            return [tbl, dCache["OUTPUTVALUES"], changedAreas, removedAreas]
+
+        return None
+
+    except:
+        errorMsg()
+        return None
+
+## ===================================================================================
+def MergeValues(cachedValues, oldValues, newValues, bNumeric):
+    # Output values for a rating table after an incremental update. oldValues and newValues are the
+    # sets of ratings in the table before and after the update.
+    if bNumeric and len(cachedValues) == 2 and len(oldValues) > 2:
+        # The output values are the lowest and highest rating, not a list of ratings
+        if len(newValues) == 0:
+            return list(cachedValues)
+
+        if cachedValues == [min(oldValues), max(oldValues)]:
+            return [min(newValues), max(newValues)]
+
+        # A fixed range (NCCPI) only gets wider
+        return [min(cachedValues[0], min(newValues)), max(cachedValues[1], max(newValues))]
+
+    # Drop the ratings that are no longer in the table. Values that never were (Not rated) are kept.
+    values = [val for val in cachedValues if val in newValues or not val in oldValues]
+    bSorted = cachedValues == sorted(cachedValues)
+    valueSet = set(values)
+    values.extend(sorted([val for val in newValues if not val in valueSet]))
+
+    if bSorted:
+        values.sort()
+
+    return values
+
+## ===================================================================================
+def RemoveRecords(gdb, tblNames):
+    # Delete the cache records for a list of rating table names
+    cacheTbl = os.path.join(gdb, cacheTable)
+
+    if not arcpy.Exists(cacheTbl):
+        return 0
+
+    iCnt = 0
+
+    with arcpy.da.UpdateCursor(cacheTbl, ["TABLENAME"]) as cur:
+        for rec in cur:
+            if rec[0] in tblNames:
+                cur.deleteRow()
+                iCnt += 1
+
+    return iCnt
+
+## ===================================================================================
+def SaveTable(gdb, outputTbl, cacheKey, outputValues):
+    # Add a new rating table to the cache. Any earlier record for the same table name is
+    # replaced, since the table has been overwritten.
+    try:
+        if cacheKey is None:
+            return False
+
+        paramHash, dbVersion, params = cacheKey
+        tblName = os.path.basename(outputTbl)
+        jsonValues = json.dumps(list(outputValues))
+
+        if len(jsonValues) > valueLength:
+            # Too many values to save. This table will not be reused.
+            RemoveRecords(gdb, [tblName])
+            return False
+
+        cacheTbl = os.path.join(gdb, cacheTable)
+
+        if not arcpy.Exists(cacheTbl):
+            arcpy.CreateTable_management(gdb, cacheTable)
+            arcpy.AddField_management(cacheTbl, "TABLENAME", "TEXT", "", "", 64)
+            arcpy.AddField_management(cacheTbl, "PARAMHASH", "TEXT", "", "", 32)
+            arcpy.AddField_management(cacheTbl, "DBVERSION", "TEXT", "", "", 32)
+            arcpy.AddField_management(cacheTbl, "ROWCOUNT", "LONG")
+            arcpy.AddField_management(cacheTbl, "OUTPUTVALUES", "TEXT", "", "", valueLength)
+            arcpy.AddField_management(cacheTbl, "PARAMETERS", "TEXT", "", "", 1024)
+            arcpy.AddField_management(cacheTbl, "CREATED", "TEXT", "", "", 24)
+
+        if not areaField in [fld.name.upper() for fld in arcpy.ListFields(cacheTbl)]:
+            arcpy.AddField_management(cacheTbl, areaField, "TEXT", "", "", areaLength)
+
+        jsonAreas = json.dumps(AreaVersions(gdb), sort_keys=True)
+
+        if len(jsonAreas) > areaLength:
+            # The table can be reused but not updated
+            jsonAreas = ""
+
+        RemoveRecords(gdb, [tblName])
+        created = time.strftime("%Y-%m-%d %H:%M:%S")
+
+        with arcpy.da.InsertCursor(cacheTbl, cacheFields + [areaField]) as cur:
+            cur.insertRow([tblName, paramHash, dbVersion, TableCount(outputTbl), jsonValues, repr(params)[0:1024], created, jsonAreas])
+
+        return True
+
+    except:
+        errorMsg()
+        return False
+
+## ===================================================================================
+def ValidateCache(gdb):
+    # Check each cached rating table. Returns [current, stale], two lists of cache records.
+    # A table is stale if it is missing, has a different number of records or was made
+    # from an earlier version of the soil data.
+    try:
+        dbVersion = DataVersion(gdb)
+        current = list()
+        stale = list()
+
+        for dCache in ReadCache(gdb):
+            if dCache["DBVERSION"] == dbVersion and TableCount(os.path.join(gdb, dCache["TABLENAME"])) == dCache["ROWCOUNT"]:
+                current.append(dCache)
+
+            else:
+                stale.append(dCache)
+
+        return [current, stale]
+
+    except:
+        errorMsg()
+        return [[], []]
+
+## ===================================================================================
+def ListCache(gdb):
+    # Print the cached rating tables and whether each can still be used
+    current, stale = ValidateCache(gdb)
+
+    if len(current) + len(stale) == 0:
+        PrintMsg(" \nNo cached rating tables in " + os.path.basename(gdb), 0)
+        return
+
+    PrintMsg(" \nCached rating tables in " + os.path.basename(gdb) + ":", 0)
+
+    for status, cacheList in [("current", current), ("stale", stale)]:
+        for dCache in sorted(cacheList, key = lambda d : d["TABLENAME"]):
+            PrintMsg("\t" + dCache["TABLENAME"] + " (" + status + ", created " + dCache["CREATED"] + ")  " + dCache["PARAMETERS"], 0)
+
+## ===================================================================================
+def Evict(gdb, bAll=False):
+    # Delete the stale rating tables (or all of the cached rating tables) and their cache
+    # records. Returns the number of tables removed from the cache.
+    try:
+        current, stale = ValidateCache(gdb)
+        evictList = list(stale)
+
+        if bAll:
+            evictList.extend(current)
+
+        tblNames = list()
+
+        for dCache in evictList:
+            tbl = os.path.join(gdb, dCache["TABLENAME"])
+
+            if arcpy.Exists(tbl):
+                arcpy.Delete_management(tbl)
+
+            tblNames.append(dCache["TABLENAME"])
+
+        RemoveRecords(gdb, tblNames)
+
+        return len(tblNames)
+
+    except:
+        errorMsg()
+        return 0
+
+## ===================================================================================
+## MAIN
+## ===================================================================================
+
+# Import system modules
+import arcpy, sys, os, traceback, time, hashlib, json
+
+cacheTable = "SDV_ResultCache"
+cacheFields = ["TABLENAME", "PARAMHASH", "DBVERSION", "ROWCOUNT", "OUTPUTVALUES", "PARAMETERS", "CREATED"]
+
+# SACATALOG fields that identify the version of each survey area
+versionFields = ["AREASYMBOL", "SAVERSION", "SAVEREST", "TABULARVERSION", "TABULARVEREST"]
+
+# Maximum length of the saved output values (JSON)
+valueLength = 8000
+
+# Survey area versions for incremental updates (FindChanged) and the longest JSON that will be saved
+areaField = "AREAVERSIONS"
+areaLength = 200000
+
+# Largest fraction of the survey areas that can change before a rating table is made again instead of updated
+incrementalLimit = 0.5
+
+# Change this when the rating tables made by gSSURGO_CreateSoilMap change, so that older tables are not reused
+cacheFormat = 1
+
+try:
+    if __name__ == "__main__":
+        gdb = arcpy.GetParameterAsText(0)           # gSSURGO database
+        action = arcpy.GetParameterAsText(1)        # List, Validate, Evict stale or Evict all
+
+        if action == "":
+            action = "List"
+
+        if action in ["Evict stale", "Evict all"]:
+            iCnt = Evict(gdb, action == "Evict all")
+            PrintMsg(" \nRemoved " + str(iCnt) + " rating tables from the cache", 0)
+
+        elif action == "Validate":
+            current, stale = ValidateCache(gdb)
+            PrintMsg(" \n" + str(len(current)) + " cached rating tables are current and " + str(len(stale)) + " are stale", 0)
+
+        ListCache(gdb)
+
+except MyError, e:
+    # Example: raise MyError, "This is an error message"
+    PrintMsg(str(e), 2)
+
+except:
+    errorMsg()
@@ -0,0 +1,776 @@
+# gSSURGO_SoilCache.py
+#
+# Steve Peaslee, National Soil Survey Center
+#
+# Purpose:  In-process cache of gSSURGO tables shared by all of the soil maps created in one batch.
+#
+# gSSURGO_CreateSoilMaps and gSSURGO_CreateSoilMapSet call gSSURGO_CreateSoilMap.CreateSoilMap once
+# for each map. Each call re-reads the MAPUNIT, COMPONENT and CHORIZON tables, the sdvattribute table,
+# the mapunit symbols and the legend areasymbols. For a CONUS database, CHORIZON alone is millions
+# of records and a batch of maps reads it once per map.
+#
+# A batch script opens a session with StartSession before the first map and closes it with EndSession.
+# While a session is open for the database:
+#
+#   MAPUNIT, COMPONENT, CHORIZON  Each column is read once, the first time a map needs it, and kept
+#                                 as a NumPy array aligned on OBJECTID. Text columns are stored as
+#                                 integer codes into a list of unique values. ReadTable applies the
+#                                 where clause and ORDER BY to the cached columns and returns the same
+#                                 dictionary that gSSURGO_CreateSoilMap.ReadTable builds from a cursor.
+#
+#   small lookups                 mapunit symbols, areasymbols and sdvattribute records are kept as-is.
+#
+# Column memory is limited to the session budget (megabytes). When a new column will not fit, the
+# least used attribute columns are evicted. Key and depth columns are never evicted. If the request
+# still does not fit, or the where clause uses SQL that is not handled here, ReadTable returns None and
+# the caller reads the table with a cursor as before.
+#
+# With no open session every function returns None and CreateSoilMap works exactly as it always has.
+#
+
+## ===================================================================================
+class MyError(Exception):
+    pass
+
+## ===================================================================================
+def PrintMsg(msg, severity=0):
+    # prints message to screen if run as a python script
+    # Adds tool message to the geoprocessor
+    #
+    #Split the message on \n first, so that if it's multiple lines, a GPMessage will be added for each line
+    try:
+        for string in msg.split('\n'):
+            #Add a geoprocessing message (in case this is run as a tool)
+            if severity == 0:
+                arcpy.AddMessage(string)
+
+            elif severity == 1:
+                arcpy.AddWarning(string)
+
+            elif severity == 2:
+                arcpy.AddMessage("    ")
+                arcpy.AddError(string)
+
+    except:
+        pass
+
+## ===================================================================================
+def errorMsg():
+    try:
+        tb = sys.exc_info()[2]
+        tbinfo = traceback.format_tb(tb)[0]
+        theMsg = tbinfo + "\n" + str(sys.exc_type)+ ": " + str(sys.exc_value)
+        PrintMsg(theMsg, 2)
+
+    except:
+        PrintMsg("Unhandled error in unHandledException method", 2)
+
+## ===================================================================================
+def Number_Format(num, places=0, bCommas=True):
+    try:
+    # Format a number according to locality and given places
+        locale.setlocale(locale.LC_ALL, "")
+        if bCommas:
+            theNumber = locale.format("%.*f", (places, num), True)
+
+        else:
+            theNumber = locale.format("%.*f", (places, num), False)
+        return theNumber
+
+    except:
+        errorMsg()
+        return "???"
+
+## ===================================================================================
+def StartSession(gdb, budgetMB=1024):
+    # Open a cache session for the gSSURGO database. Any earlier session is closed.
+    global dSession
+
+    dSession = dict()
+    dSession["gdb"] = os.path.normcase(os.path.abspath(gdb))
+    dSession["budget"] = int(budgetMB) * 1048576
+    dSession["tables"] = dict()     # table name: table cache dictionary
+    dSession["items"] = dict()      # (item name, key): value
+    dSession["tick"] = 0
+    dSession["hits"] = 0
+    dSession["misses"] = 0
+    dSession["fallbacks"] = 0
+    dSession["evicted"] = 0
+
+    return True
+
+## ===================================================================================
+def EndSession(bReport=True):
+    # Close the cache session and release the cached tables
+    global dSession
+
+    if bReport and IsActive():
+        CacheReport()
+
+    dSession = dict()
+    return True
+
+## ===================================================================================
+def IsActive(gdb=None):
+    # True when a cache session is open (for this database, if gdb is specified)
+    if len(dSession) == 0:
+        return False
+
+    if gdb is None:
+        return True
+
+    return os.path.normcase(os.path.abspath(gdb)) == dSession["gdb"]
+
+## ===================================================================================
+def CacheReport():
+    # Print session statistics
+    try:
+        colCnt = 0
+
+        for tblName, dTable in dSession["tables"].items():
+            colCnt += len(dTable["columns"])
+
+        PrintMsg(" \nSoil data cache: " + Number_Format(dSession["hits"], 0, True) + " table reads from cache, " + \
+                 Number_Format(dSession["misses"], 0, True) + " column loads, " + Number_Format(dSession["evicted"], 0, True) + \
+                 " columns evicted, " + Number_Format(dSession["fallbacks"], 0, True) + " cursor reads", 0)
+        PrintMsg("\t" + str(colCnt) + " columns cached, " + Number_Format(CacheBytes() / 1048576.0, 1, True) + \
+                 " of " + Number_Format(dSession["budget"] / 1048576, 0, True) + " MB", 0)
+
+    except:
+        errorMsg()
+
+## ===================================================================================
+def GetItem(itemName, key):
+    # Return a cached lookup object or None
+    if len(dSession) == 0:
+        return None
+
+    return dSession["items"].get((itemName, key), None)
+
+## ===================================================================================
+def SetItem(itemName, key, value):
+    # Save a lookup object for the rest of the session
+    if len(dSession) > 0:
+        dSession["items"][(itemName, key)] = value
+
+    return value
+
+## ===================================================================================
+def GetSDVAttribute(sdvAtt):
+    # Return a copy of the sdvattribute record for sdvAtt as a dictionary with lowercase
+    # column names, or None if there is no session. The whole table is read once.
+    try:
+        if len(dSession) == 0:
+            return None
+
+        dRecords = GetItem("sdvattribute", None)
+
+        if dRecords is None:
+            dRecords = dict()
+            sdvattTable = os.path.join(dSession["gdb"], "sdvattribute")
+            flds = [fld.name.lower() for fld in arcpy.ListFields(sdvattTable)]
+
+            with arcpy.da.SearchCursor(sdvattTable, "*") as cur:
+                for rec in cur:
+                    dRec = dict(zip(flds, rec))
+
+                    if not dRec["attributename"] in dRecords:
+                        # keep the first record, same as the original cursor.next()
+                        dRecords[dRec["attributename"]] = dRec
+
+            SetItem("sdvattribute", None, dRecords)
+
+        if sdvAtt in dRecords:
+            return dict(dRecords[sdvAtt])
+
+        return None
+
+    except:
+        errorMsg()
+        return None
+
+## ===================================================================================
+def CacheBytes():
+    # Total bytes used by cached columns
+    total = 0
+
+    for dTable in dSession["tables"].values():
+        for dCol in dTable["columns"].values():
+            total += dCol["bytes"]
+
+    return total
+
+## ===================================================================================
+def GetTableCache(tblName):
+    # Return the cache dictionary for one table, creating it on first use
+    tblName = tblName.upper()
+
+    if not tblName in dSession["tables"]:
+        dTable = dict()
+        dTable["path"] = os.path.join(dSession["gdb"], tblName)
+        dTable["fields"] = dict()   # uppercase field name: [field name, field type]
+
+        for fld in arcpy.ListFields(dTable["path"]):
+            dTable["fields"][fld.name.upper()] = [fld.name, fld.type]
+
+        dTable["oids"] = None
+        dTable["columns"] = dict()
+        dSession["tables"][tblName] = dTable
+
+    return dSession["tables"][tblName]
+
+## ===================================================================================
+def ColumnFromValues(values, fldType):
+    # Convert a list of cursor values into a column cache entry
+    dCol = dict()
+
+    if fldType in ["SmallInteger", "Integer", "Single", "Double", "OID"]:
+        nulls = np.array([v is None for v in values], dtype=bool)
+
+        if fldType in ["Single", "Double"]:
+            arr = np.array([0.0 if v is None else v for v in values], dtype=np.float64)
+
+        else:
+            arr = np.array([0 if v is None else v for v in values], dtype=np.int64)
+
+        dCol["kind"] = "numeric"
+        dCol["values"] = arr
+        dCol["nulls"] = nulls
+        dCol["bytes"] = arr.nbytes + nulls.nbytes
+
+    else:
+        # Text and everything else is stored as codes into a list of unique values
+        dCodes = dict()
+        codes = np.array([dCodes.setdefault(v, len(dCodes)) for v in values], dtype=np.int32)
+        categories = [None] * len(dCodes)
+
+        for v, i in dCodes.items():
+            categories[i] = v
+
+        dCol["kind"] = "text"
+        dCol["values"] = codes
+        dCol["categories"] = categories
+        dCol["bytes"] = codes.nbytes + sum([sys.getsizeof(v) for v in categories])
+
+    dCol["uses"] = 0
+    dCol["last"] = 0
+
+    return dCol
+
+## ===================================================================================
+def EvictColumns(needBytes, protected):
+    # Drop the least used unpinned columns until needBytes fit in the budget.
+    # Returns False if that is not possible.
+    free = dSession["budget"] - CacheBytes()
+
+    if free >= needBytes:
+        return True
+
+    candidates = list()
+
+    for tblName, dTable in dSession["tables"].items():
+        for fldName, dCol in dTable["columns"].items():
+            if fldName in pinnedFields or (tblName, fldName) in protected:
+                continue
+
+            candidates.append((dCol["uses"], dCol["last"], tblName, fldName, dCol["bytes"]))
+
+    candidates.sort()
+
+    for uses, last, tblName, fldName, colBytes in candidates:
+        if free >= needBytes:
+            break
+
+        del dSession["tables"][tblName]["columns"][fldName]
+        dSession["evicted"] += 1
+        free += colBytes
+
+    return free >= needBytes
+
+## ===================================================================================
+def LoadColumns(tblName, fldNames):
+    # Make sure the listed columns are cached for the table. Returns False if they cannot be loaded
+    # within the memory budget.
+    dTable = GetTableCache(tblName)
+    newFlds = [fld for fld in fldNames if not fld in dTable["columns"]]
+
+    if len(newFlds) == 0:
+        return True
+
+    if dTable["oids"] is None:
+        rowCnt = int(arcpy.GetCount_management(dTable["path"]).getOutput(0))
+
+    else:
+        rowCnt = len(dTable["oids"])
+
+    # Rough size estimate: 8 bytes per value plus the null mask
+    protected = set([(tblName.upper(), fld) for fld in fldNames])
+
+    if not EvictColumns(rowCnt * 9 * len(newFlds), protected):
+        return False
+
+    arcpy.SetProgressorLabel("Caching " + tblName.lower() + " data")
+    flds = ["OID@"] + [dTable["fields"][fld][0] for fld in newFlds]
+    cols = [list() for fld in flds]
+
+    with arcpy.da.SearchCursor(dTable["path"], flds) as cur:
+        for rec in cur:
+            for i in range(len(rec)):
+                cols[i].append(rec[i])
+
+    oids = np.array(cols[0], dtype=np.int64)
+
+    if dTable["oids"] is None:
+        dTable["oids"] = oids
+        order = None
+
+    elif len(oids) == len(dTable["oids"]) and np.array_equal(oids, dTable["oids"]):
+        order = None
+
+    else:
+        # Rows came back in a different order. Line them up with the cached OBJECTIDs.
+        if len(oids) != len(dTable["oids"]):
+            raise MyError, "Record count changed for " + tblName
+
+        order = np.argsort(oids)[np.searchsorted(np.sort(oids), dTable["oids"])]
+
+    for i in range(len(newFlds)):
+        values = cols[i + 1]
+
+        if not order is None:
+            values = [values[j] for j in order]
+
+        dTable["columns"][newFlds[i]] = ColumnFromValues(values, dTable["fields"][newFlds[i]][1])
+        dSession["misses"] += 1
+
+    if not EvictColumns(0, protected):
+        # Text columns can be larger than the estimate. Do not keep columns that do not fit.
+        for fld in newFlds:
+            del dTable["columns"][fld]
+
+        return False
+
+    return True
+
+## ===================================================================================
+def ColumnValues(dCol, idx):
+    # Return python values (None for nulls) for the selected rows of a cached column
+    if dCol["kind"] == "numeric":
+        values = dCol["values"][idx].tolist()
+
+        for i in np.flatnonzero(dCol["nulls"][idx]).tolist():
+            values[i] = None
+
+        return values
+
+    categories = dCol["categories"]
+    return [categories[c] for c in dCol["values"][idx].tolist()]
+
+## ===================================================================================
+def TokenizeSQL(sql):
+    # Split a where clause into (type, value) tokens. Raises MyError for anything unexpected.
+    tokens = list()
+    pos = 0
+
+    while pos < len(sql):
+        m = tokenPattern.match(sql, pos)
+
+        if m is None:
+            raise MyError, "Unsupported SQL: " + sql
+
+        pos = m.end()
+
+        if m.group("space"):
+            continue
+
+        if m.group("number"):
+            tokens.append(("value", float(m.group("number"))))
+
+        elif m.group("string") is not None:
+            tokens.append(("value", m.group("string")[1:-1].replace("''", "'")))
+
+        elif m.group("quoted"):
+            tokens.append(("column", m.group("quoted")[1:-1].strip().upper().split(".")[-1]))
+
+        elif m.group("word"):
+            word = m.group("word").upper()
+
+            if word in ["AND", "OR", "NOT", "IN", "IS", "NULL", "UPPER"]:
+                tokens.append(("keyword", word))
+
+            else:
+                # drop any table name prefix
+                tokens.append(("column", word.split(".")[-1]))
+
+        else:
+            tokens.append(("symbol", m.group("symbol")))
+
+    return tokens
+
+## ===================================================================================
+def ParseSQL(tokens):
+    # Recursive descent parser for the where clauses built by gSSURGO_CreateSoilMap:
+    #
+    #   expr     := andExpr (OR andExpr)*
+    #   andExpr  := notExpr (AND notExpr)*
+    #   notExpr  := NOT notExpr | '(' expr ')' | compare
+    #   compare  := operand (op value | [NOT] IN '(' value, ... ')' | IS [NOT] NULL)
+    #   operand  := column | UPPER '(' column ')'
+    #
+    # Returns a nested tuple tree.
+    pos = [0]
+
+    def peek():
+        if pos[0] < len(tokens):
+            return tokens[pos[0]]
+
+        return (None, None)
+
+    def take(tokenType=None, value=None):
+        token = peek()
+
+        if (tokenType is not None and token[0] != tokenType) or (value is not None and token[1] != value):
+            raise MyError, "Unexpected SQL token: " + str(token[1])
+
+        pos[0] += 1
+        return token
+
+    def parseOr():
+        node = parseAnd()
+
+        while peek() == ("keyword", "OR"):
+            take()
+            node = ("or", node, parseAnd())
+
+        return node
+
+    def parseAnd():
+        node = parseNot()
+
+        while peek() == ("keyword", "AND"):
+            take()
+            node = ("and", node, parseNot())
+
+        return node
+
+    def parseNot():
+        if peek() == ("keyword", "NOT"):
+            take()
+            return ("not", parseNot())
+
+        if peek() == ("symbol", "("):
+            take()
+            node = parseOr()
+            take("symbol", ")")
+            return node
+
+        return parseCompare()
+
+    def parseCompare():
+        if peek() == ("keyword", "UPPER"):
+            take()
+            take("symbol", "(")
+            operand = ("upper", take("column")[1])
+            take("symbol", ")")
+
+        else:
+            operand = ("column", take("column")[1])
+
+        token = peek()
+
+        if token == ("keyword", "IS"):
+            take()
+
+            if peek() == ("keyword", "NOT"):
+                take()
+                take("keyword", "NULL")
+                return ("not", ("null", operand))
+
+            take("keyword", "NULL")
+            return ("null", operand)
+
+        bNot = False
+
+        if token == ("keyword", "NOT"):
+            take()
+            bNot = True
+            token = peek()
+
+        if token == ("keyword", "IN"):
+            take()
+            take("symbol", "(")
+            values = [take("value")[1]]
+
+            while peek() == ("symbol", ","):
+                take()
+
+                if peek() == ("symbol", ")"):
+                    break
+
+                values.append(take("value")[1])
+
+            take("symbol", ")")
+            node = ("in", operand, values)
+
+            if bNot:
+                return ("not", node)
+
+            return node
+
+        if bNot:
+            raise MyError, "Unsupported use of NOT"
+
+        op = take("symbol")[1]
+
+        if not op in ["=", "<>", "!=", "<", "<=", ">", ">="]:
+            raise MyError, "Unsupported SQL operator: " + op
+
+        return ("compare", operand, op, take("value")[1])
+
+    tree = parseOr()
+
+    if pos[0] != len(tokens):
+        raise MyError, "Unexpected SQL token: " + str(tokens[pos[0]][1])
+
+    return tree
+
+## ===================================================================================
+def SQLColumns(tree, colList):
+    # Collect the column names used in a parsed where clause
+    if tree[0] in ["and", "or"]:
+        SQLColumns(tree[1], colList)
+        SQLColumns(tree[2], colList)
+
+    elif tree[0] == "not":
+        SQLColumns(tree[1], colList)
+
+    elif not tree[1][1] in colList:
+        colList.append(tree[1][1])
+
+    return colList
+
+## ===================================================================================
+def EvaluateSQL(tree, dTable):
+    # Evaluate a parsed where clause against the cached columns. Returns a boolean row mask.
+    # Comparisons with a null value are False, as in SQL.
+    if tree[0] == "and":
+        return EvaluateSQL(tree[1], dTable) & EvaluateSQL(tree[2], dTable)
+
+    if tree[0] == "or":
+        return EvaluateSQL(tree[1], dTable) | EvaluateSQL(tree[2], dTable)
+
+    if tree[0] == "not":
+        return ~EvaluateSQL(tree[1], dTable)
+
+    operandType, colName = tree[1]
+    dCol = dTable["columns"][colName]
+
+    if dCol["kind"] == "numeric":
+        if operandType == "upper":
+            raise MyError, "UPPER used with numeric column " + colName
+
+        if tree[0] == "null":
+            return dCol["nulls"].copy()
+
+        if tree[0] == "in":
+            values = [v for v in tree[2] if isinstance(v, float)]
+
+            if len(values) != len(tree[2]):
+                raise MyError, "Text value used with numeric column " + colName
+
+            return np.in1d(dCol["values"], values) & ~dCol["nulls"]
+
+        if not isinstance(tree[3], float):
+            raise MyError, "Text value used with numeric column " + colName
+
+        return dOperators[tree[2]](dCol["values"], tree[3]) & ~dCol["nulls"]
+
+    # Text columns are tested once per unique value and the result is expanded using the codes
+    categories = dCol["categories"]
+
+    if operandType == "upper":
+        categories = [None if v is None else v.upper() for v in categories]
+
+    if tree[0] == "null":
+        catResult = [v is None for v in categories]
+
+    elif tree[0] == "in":
+        if len([v for v in tree[2] if isinstance(v, float)]) > 0:
+            raise MyError, "Numeric value used with text column " + colName
+
+        catResult = [(not v is None) and v in tree[2] for v in categories]
+
+    else:
+        compare = dOperators[tree[2]]
+        value = tree[3]
+
+        if isinstance(value, float):
+            raise MyError, "Numeric value used with text column " + colName
+
+        catResult = [(not v is None) and compare(v, value) for v in categories]
+
+    return np.array(catResult, dtype=bool)[dCol["values"]]
+
+## ===================================================================================
+def ParseOrderBy(sql):
+    # Return a list of (column, bDescending) from a (prefix, postfix) sql_clause, or None
+    # if the clause is not a plain ORDER BY
+    if sql is None:
+        return list()
+
+    prefix, postfix = sql
+
+    if not prefix in [None, ""]:
+        return None
+
+    if postfix in [None, ""]:
+        return list()
+
+    m = re.match(r"^\s*ORDER\s+BY\s+(.+)$", postfix, re.IGNORECASE)
+
+    if m is None:
+        return None
+
+    orderList = list()
+
+    for part in m.group(1).split(","):
+        words = part.split()
+
+        if not len(words) in [1, 2]:
+            return None
+
+        bDesc = len(words) == 2 and words[1].upper() == "DESC"
+
+        if len(words) == 2 and not words[1].upper() in ["ASC", "DESC"]:
+            return None
+
+        orderList.append((words[0].strip('"').upper(), bDesc))
+
+    return orderList
+
+## ===================================================================================
+def SortKey(dCol, idx, bDesc):
+    # Integer or float sort key for the selected rows. Nulls sort first in ascending order.
+    if dCol["kind"] == "numeric":
+        key = dCol["values"][idx].astype(np.float64)
+        key[dCol["nulls"][idx]] = -np.inf
+
+    else:
+        categories = dCol["categories"]
+        rank = np.empty(len(categories), dtype=np.int64)
+        catOrder = sorted(range(len(categories)), key = lambda i : (not categories[i] is None, categories[i]))
+        rank[catOrder] = np.arange(len(categories))
+        key = rank[dCol["values"][idx]]
+
+    if bDesc:
+        return -key
+
+    return key
+
+## ===================================================================================
+def ReadTable(tbl, flds, wc, sql):
+    # Cached version of gSSURGO_CreateSoilMap.ReadTable for MAPUNIT, COMPONENT and CHORIZON.
+    #
+    # Returns a dictionary keyed on the first field with a list of [remaining field values] for each
+    # record, in the same order a cursor with the same where clause and sql_clause would return them.
+    # Returns None when the caller should read the table with a cursor instead.
+    #
+    try:
+        if len(dSession) == 0 or not tbl.upper() in cachedTables:
+            return None
+
+        dTable = GetTableCache(tbl)
+        fldNames = [fld.strip('"').upper() for fld in flds]
+        whereCols = list()
+        tree = None
+
+        if not wc in [None, ""]:
+            tree = ParseSQL(TokenizeSQL(wc))
+            SQLColumns(tree, whereCols)
+
+        orderList = ParseOrderBy(sql)
+
+        if orderList is None:
+            raise MyError, "Unsupported sql_clause: " + str(sql)
+
+        needed = list(fldNames)
+
+        for fld in whereCols + [o[0] for o in orderList]:
+            if not fld in needed:
+                needed.append(fld)
+
+        for fld in needed:
+            if not fld in dTable["fields"]:
+                raise MyError, "Field " + fld + " not found in " + tbl
+
+        if not LoadColumns(tbl, needed):
+            raise MyError, "Memory budget exceeded for " + tbl
+
+        dSession["tick"] += 1
+
+        for fld in needed:
+            dTable["columns"][fld]["uses"] += 1
+            dTable["columns"][fld]["last"] = dSession["tick"]
+
+        # Select rows
+        if tree is None:
+            idx = np.arange(len(dTable["oids"]))
+
+        else:
+            idx = np.flatnonzero(EvaluateSQL(tree, dTable))
+
+        # Sort rows. Ties keep OBJECTID order.
+        if len(orderList) > 0 and len(idx) > 0:
+            keys = [SortKey(dTable["columns"][fld], idx, bDesc) for fld, bDesc in reversed(orderList)]
+            idx = idx[np.lexsort(keys)]
+
+        keyValues = ColumnValues(dTable["columns"][fldNames[0]], idx)
+        cols = [ColumnValues(dTable["columns"][fld], idx) for fld in fldNames[1:]]
+        dTbl = dict()
+
+        for i in range(len(keyValues)):
+            val = [col[i] for col in cols]
+
+            try:
+                dTbl[keyValues[i]].append(val)
+
+            except:
+                dTbl[keyValues[i]] = [val]
+
+        dSession["hits"] += 1
+
+        return dTbl
+
+    except MyError, e:
+        # Fall back to a cursor read. This is not an error for the calling tool.
+        dSession["fallbacks"] += 1
+        return None
+
+    except:
+        errorMsg()
+        dSession["fallbacks"] += 1
+        return None
+
+## ===================================================================================
+## ===================================================================================
+## MAIN
+## ===================================================================================
+
+# Import system modules
+import arcpy, sys, os, re, locale, traceback, operator
+import numpy as np
+
+# Session state. Empty dictionary when there is no open session.
+dSession = dict()
+
+# Tables that are cached column by column
+cachedTables = ["MAPUNIT", "COMPONENT", "CHORIZON"]
+
+# Comparison operators allowed in where clauses
+dOperators = {"=":operator.eq, "<>":operator.ne, "!=":operator.ne, "<":operator.lt, "<=":operator.le, ">":operator.gt, ">=":operator.ge}
+
+# Key and depth columns are never evicted
+pinnedFields = ["MUKEY", "COKEY", "CHKEY", "COMPPCT_R", "HZDEPT_R", "HZDEPB_R"]
+
+# Tokens used in CreateSoilMap where clauses
+tokenPattern = re.compile(r"""(?P<space>\s+)|(?P<number>-?\d+(\.\d*)?)|(?P<string>'([^']|'')*')|(?P<quoted>"[^"]*")|(?P<word>[A-Za-z_][A-Za-z0-9_.]*)|(?P<symbol><>|!=|<=|>=|[=<>(),])""")
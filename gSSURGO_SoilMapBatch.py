@@ -0,0 +1,359 @@
+# gSSURGO_SoilMapBatch.py
+#
+# Steve Peaslee, National Soil Survey Center
+#
+# Purpose:  Create a batch of soil maps using a pool of worker processes.
+#
+# gSSURGO_CreateSoilMaps used to call gSSURGO_CreateSoilMap.CreateSoilMap for one map at a time.
+# Almost all of that time is spent reading the soil data and aggregating it into the SDV rating
+# table, which only uses one processor.
+#
+# Each map is now a job (attribute, aggregation method, depth range, month range, ...):
+#
+#   workers       Run CreateSoilMap with bTableOnly set. Each worker process has its own scratch
+#                 geodatabase for the SDV_Data and SDV rating tables, so no two processes write to
+#                 the same geodatabase. Workers do not need ArcMap.
+#
+#   coordinator   Takes the finished jobs in job order. For each one it runs CreateSoilMap again with
+#                 the worker's rating table in dBatchTables. CreateSoilMap skips the soil data, copies
+#                 the table into the input database and creates the map layer, legend and metadata as
+#                 usual. Anything that touches the map document or the input database is done here,
+#                 one map at a time.
+#
+# Jobs are handed out one at a time and collected with Pool.imap, which returns them in the order
+# they were submitted. The rating tables, layers and the order they are added to the map are the
+# same for any number of workers. With fewer than two workers (or one job) the maps are created
+# directly, exactly as before.
+#
+# Tasks whose rating tables are all current in gSSURGO_ResultCache are not sent to the workers. The
+# coordinator creates those maps from the existing tables.
+#
+# The maps for one horizon level attribute at several depth ranges are one task. When the aggregation
+# method allows it, gSSURGO_CreateSoilMap.CreateDepthRangeTable rates all of the ranges with one read
+# of the soil data and writes a single table with a column for each range (SDV_<column>_Ranges). The
+# rating table for each map is copied out of that table. Otherwise each range is mapped by itself.
+#
+# 2017-11-01
+
+## ===================================================================================
+class MyError(Exception):
+    pass
+
+## ===================================================================================
+def errorMsg():
+    try:
+        tb = sys.exc_info()[2]
+        tbinfo = traceback.format_tb(tb)[0]
+        theMsg = tbinfo + " \n" + str(sys.exc_type)+ ": " + str(sys.exc_value) + " \n"
+        PrintMsg(theMsg, 2)
+
+    except:
+        PrintMsg("Unhandled error in attFld method", 2)
+        pass
+
+## ===================================================================================
+def PrintMsg(msg, severity=0):
+    # Adds tool message to the geoprocessor
+    #
+    #Split the message on \n first, so that if it's multiple lines, a GPMessage will be added for each line
+    try:
+        for string in msg.split('\n'):
+            #Add a geoprocessing message (in case this is run as a tool)
+            if severity == 0:
+                arcpy.AddMessage(string)
+
+            elif severity == 1:
+                arcpy.AddWarning(string)
+
+            elif severity == 2:
+                arcpy.AddError(" \n" + string)
+
+    except:
+        pass
+
+## ===================================================================================
+def JobName(job):
+    # Description of a job for messages and the list of failed maps
+    sdvAtt, top, bot = job["sdvAtt"], job["top"], job["bot"]
+
+    if job["bHorizon"]:
+        return sdvAtt + " " + str(top) + " to " + str(bot) + "cm"
+
+    if job["bSurface"]:
+        return sdvAtt + " (surface)"
+
+    return sdvAtt
+
+## ===================================================================================
+def JobParameters(job, dSettings):
+    # CreateSoilMap parameters following inputLayer
+    return [job["sdvAtt"], dSettings["aggMethod"], dSettings["primCst"], dSettings["secCst"], job["top"], job["bot"], \
+    dSettings["begMo"], dSettings["endMo"], dSettings["tieBreaker"], dSettings["bZero"], dSettings["cutOff"], \
+    dSettings["bFuzzy"], dSettings["bNulls"], dSettings["sRV"]]
+
+## ===================================================================================
+def JobGroups(jobList):
+    # Split the job list into tasks. The horizon jobs for one attribute are one task, with
+    # the list of their depth ranges. Every other job is a task by itself.
+    groups = list()
+
+    for job in jobList:
+        if job["bHorizon"] and len(groups) > 0 and groups[-1][0]["bHorizon"] and groups[-1][0]["sdvAtt"] == job["sdvAtt"]:
+            groups[-1].append(job)
+
+        else:
+            groups.append([job])
+
+    return groups
+
+## ===================================================================================
+def RangeList(group):
+    # Depth ranges for a task that can use CreateDepthRangeTable, otherwise an empty list
+    if len(group) > 1 and group[0]["bHorizon"]:
+        return [(job["top"], job["bot"]) for job in group]
+
+    return []
+
+## ===================================================================================
+def RangeTable(inputLayer, group, dSettings):
+    # Rate all of the depth ranges in a task with one pass. Returns [table, {(top, bot):outputValues}]
+    # or None if the maps must be made one range at a time.
+    import gSSURGO_CreateSoilMap
+
+    rangeList = RangeList(group)
+
+    if len(rangeList) == 0:
+        return None
+
+    return gSSURGO_CreateSoilMap.CreateDepthRangeTable(inputLayer, group[0]["sdvAtt"], dSettings["aggMethod"], rangeList, \
+    dSettings["tieBreaker"], dSettings["bZero"], dSettings["cutOff"], dSettings["bNulls"], dSettings["sRV"])
+
+## ===================================================================================
+def CachedGroup(inputLayer, fc, group, dSettings):
+    # True if every map in a task already has a current rating table (gSSURGO_ResultCache).
+    # These tasks are not sent to the workers.
+    gdb = os.path.dirname(fc)
+
+    for job in group:
+        cacheKey = gSSURGO_ResultCache.CacheKey(inputLayer, fc, JobParameters(job, dSettings))
+
+        if gSSURGO_ResultCache.FindTable(gdb, cacheKey) is None:
+            return False
+
+    return True
+
+## ===================================================================================
+def StartWorker(gdb, fc, workFolder, cacheMB):
+    # Pool initializer. Runs once in each worker process.
+    global workerInput
+
+    import gSSURGO_CreateSoilMap, gSSURGO_SoilCache
+
+    workGDB = os.path.join(workFolder, "SDV_" + str(os.getpid()) + ".gdb")
+
+    if not arcpy.Exists(workGDB):
+        arcpy.CreateFileGDB_management(workFolder, os.path.basename(workGDB))
+
+    gSSURGO_CreateSoilMap.bTableOnly = True
+    gSSURGO_CreateSoilMap.sdvWorkspace = workGDB
+
+    # Each worker keeps its own copy of the soil data for all of its jobs
+    gSSURGO_SoilCache.StartSession(gdb, cacheMB)
+
+    # Workers read the featureclass. A layer only exists in the ArcMap session.
+    workerInput = fc
+
+## ===================================================================================
+def RunJob(args):
+    # Worker. Create the rating table for one job.
+    # Returns [status, layer name, rating table, output values].
+    #
+    try:
+        import gSSURGO_CreateSoilMap
+
+        gSSURGO_CreateSoilMap.dBatchResult.clear()
+        bSoilMap = gSSURGO_CreateSoilMap.CreateSoilMap(workerInput, *args)
+        dResult = gSSURGO_CreateSoilMap.dBatchResult
+
+        if bSoilMap == 1 and len(dResult) > 0:
+            return [1, dResult["layer"], dResult["table"], dResult["values"]]
+
+        return [bSoilMap, None, None, None]
+
+    except:
+        errorMsg()
+        return [0, None, None, None]
+
+## ===================================================================================
+def RunTask(args):
+    # Worker. Create the rating tables for one task (JobGroups).
+    # Returns [depth range table result or None, list of RunJob results].
+    #
+    group, dSettings = args
+
+    try:
+        rangeResult = RangeTable(workerInput, group, dSettings)
+
+        if not rangeResult is None:
+            return [rangeResult, []]
+
+    except:
+        errorMsg()
+
+    return [None, [RunJob(JobParameters(job, dSettings)) for job in group]]
+
+## ===================================================================================
+def RunBatch(inputLayer, jobList, dSettings, workerCnt=0, cacheMB=1024):
+    # Create a soil map for each job in jobList. Returns the list of maps that failed.
+    #
+    # jobList    list of job dictionaries (sdvAtt, top, bot, bHorizon, bSurface)
+    # dSettings  CreateSoilMap parameters shared by all of the jobs
+    # workerCnt  number of worker processes. 0 means one per processor, less one for ArcMap.
+    #
+    import gSSURGO_CreateSoilMap
+
+    badList = list()
+    workFolder = None
+    pool = None
+
+    try:
+        groups = JobGroups(jobList)
+
+        if workerCnt == 0:
+            try:
+                workerCnt = multiprocessing.cpu_count() - 1
+
+            except NotImplementedError:
+                workerCnt = 1
+
+        workerCnt = min(workerCnt, len(groups))
+
+        arcpy.SetProgressor("step", "Creating series of soil maps...", 0, len(jobList), 1)
+        num = 0
+
+        desc = arcpy.Describe(inputLayer)
+        fc = desc.catalogPath
+        gdb = os.path.dirname(fc)
+
+        # Tasks with rating tables in the cache are mapped directly by the coordinator
+        bCached = [CachedGroup(inputLayer, fc, group, dSettings) for group in groups]
+        workerCnt = min(workerCnt, bCached.count(False))
+
+        if workerCnt < 2:
+            # One task at a time in this process
+            for group, bGroupCached in zip(groups, bCached):
+                rangeResult = None
+
+                if not bGroupCached:
+                    rangeResult = RangeTable(inputLayer, group, dSettings)
+
+                if not rangeResult is None:
+                    # The depth range table is already in the input database
+                    gSSURGO_CreateSoilMap.dBatchRanges[group[0]["sdvAtt"]] = rangeResult
+
+                for job in group:
+                    num += 1
+                    msg = "Creating map number " + str(num) + ":  " + JobName(job)
+                    arcpy.SetProgressorLabel(msg)
+                    PrintMsg(" \n" + msg, 0)
+
+                    bSoilMap = gSSURGO_CreateSoilMap.CreateSoilMap(inputLayer, *JobParameters(job, dSettings))
+                    arcpy.SetProgressorPosition()
+
+                    if bSoilMap in [0, 2]:
+                        badList.append(JobName(job))
+
+                gSSURGO_CreateSoilMap.dBatchRanges.clear()
+
+            return badList
+
+        # ArcMap runs python in-process, so the workers must be started with the python executable
+        pythonExe = os.path.join(sys.exec_prefix, "pythonw.exe")
+
+        if os.path.isfile(pythonExe):
+            multiprocessing.set_executable(pythonExe)
+
+        workFolder = tempfile.mkdtemp(prefix="gSSURGO_SoilMaps_")
+        PrintMsg(" \nCreating rating tables for " + str(len(jobList)) + " soil maps using " + str(workerCnt) + " processes", 0)
+
+        pool = multiprocessing.Pool(workerCnt, StartWorker, (gdb, fc, workFolder, cacheMB))
+        results = pool.imap(RunTask, [(group, dSettings) for group, bGroupCached in zip(groups, bCached) if not bGroupCached], 1)
+
+        for group, bGroupCached in zip(groups, bCached):
+            if bGroupCached:
+                # CreateSoilMap finds the rating tables in the cache
+                rangeResult, jobResults = None, [[1, None, None, None] for job in group]
+
+            else:
+                # Results come back in task order
+                rangeResult, jobResults = results.next()
+
+            if not rangeResult is None:
+                # Keep a copy of the depth range table in the input database
+                rangeTbl = os.path.join(gdb, os.path.basename(rangeResult[0]))
+
+                if arcpy.Exists(rangeTbl):
+                    arcpy.Delete_management(rangeTbl)
+
+                arcpy.Copy_management(rangeResult[0], rangeTbl)
+                gSSURGO_CreateSoilMap.dBatchRanges[group[0]["sdvAtt"]] = [rangeTbl, rangeResult[1]]
+                jobResults = [[1, None, None, None] for job in group]
+
+            for job, jobResult in zip(group, jobResults):
+                bSoilMap, outputLayer, batchTbl, outputValues = jobResult
+                num += 1
+                msg = "Creating map number " + str(num) + ":  " + JobName(job)
+                arcpy.SetProgressorLabel(msg)
+                PrintMsg(" \n" + msg, 0)
+
+                if bSoilMap == 1:
+                    # Create the map layer from the worker's rating table, or from the depth range table
+                    gSSURGO_CreateSoilMap.dBatchTables.clear()
+
+                    if not outputLayer is None:
+                        gSSURGO_CreateSoilMap.dBatchTables[outputLayer] = [batchTbl, outputValues]
+
+                    bSoilMap = gSSURGO_CreateSoilMap.CreateSoilMap(inputLayer, *JobParameters(job, dSettings))
+                    gSSURGO_CreateSoilMap.dBatchTables.clear()
+
+                elif bSoilMap == 2:
+                    PrintMsg("\tNo data available for '" + JobName(job) + "'", 1)
+
+                arcpy.SetProgressorPosition()
+
+                if bSoilMap in [0, 2]:
+                    badList.append(JobName(job))
+
+            gSSURGO_CreateSoilMap.dBatchRanges.clear()
+
+        return badList
+
+    except MyError, e:
+        PrintMsg(str(e), 2)
+        return badList
+
+    except:
+        errorMsg()
+        return badList
+
+    finally:
+        if not pool is None:
+            pool.close()
+            pool.join()
+
+        gSSURGO_CreateSoilMap.dBatchTables.clear()
+        gSSURGO_CreateSoilMap.dBatchRanges.clear()
+
+        if not workFolder is None:
+            shutil.rmtree(workFolder, True)
+
+## ===================================================================================
+## MAIN
+## ===================================================================================
+
+# Import system modules
+import arcpy, sys, os, traceback, multiprocessing, tempfile, shutil
+import gSSURGO_ResultCache
+
+# Featureclass used by the worker processes (set by StartWorker)
+workerInput = None
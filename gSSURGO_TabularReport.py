@@ -109,6 +109,11 @@ try:
     inputTbl = os.path.join(gdb, sdvTableName)  # temporary table containing pre-aggregated data in gSSURGO database
     legendTbl = os.path.join(gdb, "legend")    # table containing legend.areaname
 
+    if not arcpy.Exists(inputTbl) or int(arcpy.GetCount_management(inputTbl).getOutput(0)) == 0:
+        # CreateSoilMap does not write SDV_Data in batch or table-only mode, or when
+        # its bSaveInitialTable setting is off
+        raise MyError, "No soil data in " + inputTbl + ". Create the soil map again with the Create Soil Map tool before running this report."
+
     if arcpy.Exists(inputTbl):
 
         # Create relate between rating table and legend table to get areaname
@@ -0,0 +1,1060 @@
+# gSSURGO_ValuArrays.py
+#
+# Steve Peaslee, National Soil Survey Center
+#
+# Purpose:  Array-based horizon calculations for the Valu1 table (gSSURGO_ValuTable, SDA_Valu1Table and
+# SDA_SoilPorosityTable)
+#
+# CalcRZDepth, CalcRZAWS, CalcAWS and CalcSOC each read the whole horizon query table with a sorted
+# SearchCursor and accumulate horizon values into dictionaries keyed on cokey, with a lookup in dPct,
+# dFrags or dRestrictions for every row. For CONUS that is several passes over millions of horizons in
+# python loops.
+#
+# ReadHorizons loads the horizon table once into NumPy arrays, sorted in the same
+# MUKEY, COMPPCT_R DESC, COKEY, HZDEPT_R order as the cursors. Text columns are stored as integer codes
+# with a list of values, so the table is read in OBJECTID chunks without holding millions of strings.
+# The arrays are kept until Release, so the four Calc functions share one read. CreateQueryTables
+# releases them when it replaces the table.
+#
+#   RootZoneDepth   top restriction for each major-earthy component (dense layer, pH, EC or a
+#                   component restriction), the dComp2 dictionary returned by CalcRZDepth
+#   RootZoneAWS     root zone thickness and AWS for each major-earthy component, truncated at the
+#                   restriction depth and skipping organic surface horizons
+#   AWSRanges       thickness and AWS of each component for a list of depth ranges
+#   SOCRanges       thickness and SOC of each component for a list of depth ranges, truncated at the
+#                   bedrock restriction and reduced by the rock fragment volume
+#   InterpSums      comppct-weighted NCCPI ratings summed by map unit and column (CalcInterps)
+#   PWSLComponent   potential wet soil landscape rule for one component (CalcInterps)
+#
+# Each horizon test (organic, dense, restriction) is an array expression and each component sum is a
+# segment sum (gSSURGO_AggregateArrays.SegmentSum), so every component is summed in the same row order
+# as the original loops and the results are identical. Rounding uses python's round() on each value
+# (PyRound) because np.round rounds halves to even.
+#
+# The component and map unit tables are still written by the Calc functions, one cursor pass each,
+# because each script weights and rounds the component values a little differently.
+#
+# Run this script by itself (outside of ArcMap) to compare the arrays with the original loops on
+# synthetic horizons.
+#
+#     python gSSURGO_ValuArrays.py [mapunit count]
+#
+# 2017-11-10
+
+## ===================================================================================
+class MyError(Exception):
+    pass
+
+## ===================================================================================
+def PrintMsg(msg, severity=0):
+    # prints message to screen if run as a python script
+    # Adds tool message to the geoprocessor
+    #
+    #Split the message on \n first, so that if it's multiple lines, a GPMessage will be added for each line
+    try:
+        for string in msg.split('\n'):
+            #Add a geoprocessing message (in case this is run as a tool)
+            if severity == 0:
+                arcpy.AddMessage(string)
+
+            elif severity == 1:
+                arcpy.AddWarning(string)
+
+            elif severity == 2:
+                arcpy.AddMessage("    ")
+                arcpy.AddError(string)
+
+    except:
+        pass
+
+## ===================================================================================
+def errorMsg():
+    try:
+        tb = sys.exc_info()[2]
+        tbinfo = traceback.format_tb(tb)[0]
+        theMsg = tbinfo + "\n" + str(sys.exc_type)+ ": " + str(sys.exc_value)
+        PrintMsg(theMsg, 2)
+
+    except:
+        PrintMsg("Unhandled error in unHandledException method", 2)
+
+## ===================================================================================
+def PyRound(values, places):
+    # python round() of each value. NaN stays NaN.
+    values = np.asarray(values, dtype=np.float64)
+    rounded = values.copy()
+    bValid = ~np.isnan(values)
+
+    if bValid.any():
+        rounded[bValid] = pyRound(values[bValid], places).astype(np.float64)
+
+    return rounded
+
+## ===================================================================================
+def EncodeText(dText, fld, col):
+    # Integer codes for a column of text values. dText[fld] is [{value:code}, [values]] and grows as
+    # new values are found, so a table can be encoded one chunk at a time. nullText is stored as None.
+    if not fld in dText:
+        dText[fld] = [dict(), list()]
+
+    dCodes, values = dText[fld]
+    uniqueValues, inverse = np.unique(np.asarray(col, dtype=object), return_inverse=True)
+    codes = list()
+
+    for val in uniqueValues.tolist():
+        if val == nullText:
+            val = None
+
+        if not val in dCodes:
+            dCodes[val] = len(values)
+            values.append(val)
+
+        codes.append(dCodes[val])
+
+    return np.array(codes, dtype=np.int32)[inverse]
+
+## ===================================================================================
+def HorizonArrays(dCols, dText):
+    # Sorted horizon arrays from a set of columns keyed on upper case field name. Numeric columns are
+    # float with NaN for null, text columns are codes from EncodeText.
+    #
+    # Rows are sorted by MUKEY, COMPPCT_R DESC, COKEY, HZDEPT_R with null HZDEPT_R first, the same as
+    # the ORDER BY clause used by the Calc functions. Each component is one segment:
+    #
+    #   coStart, coCnt   first row and number of rows of each component
+    #   coRow            component number of each row
+    #   coKeys, muKeys   key values of each component
+    #
+    dHz = {"text":dText}
+    n = len(dCols["COKEY"])
+
+    if n == 0:
+        return None
+
+    # Sort on the rank of each key value, not on the codes (the order they were found)
+    sortKeys = dict()
+
+    for fld in ["MUKEY", "COKEY"]:
+        values = dText[fld][1]
+        rank = np.zeros(len(values), dtype=np.int64)
+        rank[sorted(range(len(values)), key = lambda i : values[i])] = np.arange(len(values))
+        sortKeys[fld] = rank[dCols[fld]]
+
+    hzdept = dCols["HZDEPT_R"]
+    order = np.lexsort((np.where(np.isnan(hzdept), -np.inf, hzdept), sortKeys["COKEY"], -dCols["COMPPCT_R"], sortKeys["MUKEY"]))
+
+    for fld, col in dCols.items():
+        dHz[fld] = col[order]
+
+    coStart = gSSURGO_AggregateArrays.SegmentStarts(dHz["COKEY"])
+    coCnt = gSSURGO_AggregateArrays.SegmentCounts(coStart, n)
+    dHz["coStart"] = coStart
+    dHz["coCnt"] = coCnt
+    dHz["coRow"] = np.repeat(np.arange(len(coStart)), coCnt)
+    dHz["coKeys"] = [dText["COKEY"][1][code] for code in dHz["COKEY"][coStart].tolist()]
+    dHz["muKeys"] = [dText["MUKEY"][1][code] for code in dHz["MUKEY"][coStart].tolist()]
+    dHz["comppct"] = dHz["COMPPCT_R"][coStart]
+
+    return dHz
+
+## ===================================================================================
+def ReadHorizons(hzTbl):
+    # Horizon arrays for a query table (HorizonArrays). Reads the fields in hzFields that are in the
+    # table, chunkSize records at a time. The arrays are cached until the table changes or Release.
+    try:
+        hzCnt = int(arcpy.GetCount_management(hzTbl).getOutput(0))
+        key = hzTbl.lower()
+
+        if key in dLoaded and dLoaded[key][0] == hzCnt:
+            return dLoaded[key][1]
+
+        dFields = dict([(fld.name.upper(), fld) for fld in arcpy.ListFields(hzTbl)])
+        flds = [fld for fld in hzFields if fld in dFields]
+        textFlds = [fld for fld in flds if dFields[fld].type == "String" or fld in keyFields]
+        dNull = dict()
+
+        for fld in flds:
+            if dFields[fld].type == "String":
+                dNull[dFields[fld].name] = nullText
+
+            elif dFields[fld].type in ["Double", "Single"]:
+                dNull[dFields[fld].name] = np.nan
+
+            else:
+                dNull[dFields[fld].name] = nullInt
+
+        oidFld = arcpy.Describe(hzTbl).OIDFieldName
+        oids = np.sort(arcpy.da.TableToNumPyArray(hzTbl, [oidFld])[oidFld])
+
+        if len(oids) == 0:
+            raise MyError, "Input table contains no data (" + hzTbl + ")"
+        dCols = dict([(fld, list()) for fld in flds])
+        dText = dict()
+        arcpy.SetProgressor("step", "Reading " + os.path.basename(hzTbl) + "...", 0, max(len(oids), 1), chunkSize)
+
+        for i in range(0, len(oids), chunkSize):
+            wc = oidFld + " >= " + str(oids[i]) + " AND " + oidFld + " <= " + str(oids[min(i + chunkSize, len(oids)) - 1])
+            chunk = arcpy.da.TableToNumPyArray(hzTbl, [dFields[fld].name for fld in flds], wc, False, dNull)
+
+            for fld in flds:
+                col = chunk[dFields[fld].name]
+
+                if fld in textFlds:
+                    dCols[fld].append(EncodeText(dText, fld, col))
+
+                else:
+                    col = col.astype(np.float64)
+
+                    if chunk[dFields[fld].name].dtype.kind in "iu":
+                        col[chunk[dFields[fld].name] == nullInt] = np.nan
+
+                    dCols[fld].append(col)
+
+            arcpy.SetProgressorPosition()
+
+        arcpy.ResetProgressor()
+
+        for fld in flds:
+            dCols[fld] = np.concatenate(dCols[fld])
+
+        for fld in hzFields:
+            # Fields that are not in this table (fragvol is only in the SDA horizon table)
+            if not fld in dCols:
+                dCols[fld] = np.zeros(len(oids), dtype=np.float64) * np.nan
+
+        dHz = HorizonArrays(dCols, dText)
+        dLoaded[key] = [hzCnt, dHz]
+
+        return dHz
+
+    except MyError, e:
+        PrintMsg(str(e), 2)
+        return None
+
+    except:
+        errorMsg()
+        return None
+
+## ===================================================================================
+def Release(hzTbl=None):
+    # Free the arrays for a horizon table, or for all tables
+    if hzTbl is None:
+        dLoaded.clear()
+
+    elif hzTbl.lower() in dLoaded:
+        del dLoaded[hzTbl.lower()]
+
+## ===================================================================================
+def TextMask(dHz, fld, test):
+    # Rows where test(value) is True for a text column. test is called once for each distinct value.
+    values = dHz["text"][fld][1]
+    bMatch = np.array([bool(test(val)) for val in values] + [False], dtype=bool)
+
+    return bMatch[dHz[fld]]
+
+## ===================================================================================
+def ComponentValues(dHz, dValues, index, default):
+    # Value from a dictionary keyed on cokey for each row, as float. index picks one item of
+    # the dictionary value.
+    coVals = np.array([dValues[cokey][index] if cokey in dValues else default for cokey in dHz["coKeys"]], dtype=np.float64)
+
+    return coVals[dHz["coRow"]]
+
+## ===================================================================================
+def ComponentSums(dHz, values, bUse):
+    # Sum of the values in the bUse rows of each component, in row order
+    return gSSURGO_AggregateArrays.SegmentSum(np.where(bUse, values, 0.0), dHz["coStart"], dHz["coCnt"])
+
+## ===================================================================================
+def ComponentAny(dHz, bUse):
+    # Components with at least one bUse row
+    return np.add.reduceat(bUse.astype(np.int64), dHz["coStart"]) > 0
+
+## ===================================================================================
+def FirstRows(dHz, bUse):
+    # First bUse row of each component, or -1
+    first = np.zeros(len(dHz["coStart"]), dtype=np.int64) - 1
+    rows = np.flatnonzero(bUse)
+
+    if len(rows) > 0:
+        comps, idx = np.unique(dHz["coRow"][rows], return_index=True)
+        first[comps] = rows[idx]
+
+    return first
+
+## ===================================================================================
+def PriorCount(dHz, bUse):
+    # Number of bUse rows above each row in the same component
+    used = bUse.astype(np.int64)
+    before = np.cumsum(used) - used
+
+    return before - before[dHz["coStart"]][dHz["coRow"]]
+
+## ===================================================================================
+def MajorEarthy(dHz):
+    # Major components that are not 'Miscellaneous area' and have a compkind
+    return TextMask(dHz, "MAJCOMPFLAG", lambda val : val == "Yes") & \
+           TextMask(dHz, "COMPKIND", lambda val : val != "Miscellaneous area" and not val is None)
+
+## ===================================================================================
+def Histic(dHz):
+    # Histosols and histic subgroups
+    return TextMask(dHz, "TAXORDER", lambda val : val == "Histosols") | \
+           TextMask(dHz, "TAXSUBGRP", lambda val : not val is None and val.lower().find("histic") >= 0)
+
+## ===================================================================================
+def OrganicHorizons(dHz):
+    # CheckTexture for every row:  O or L horizons, or an organic texture or lieutex, except in
+    # Histosols and histic soils
+    bOrganic = TextMask(dHz, "DESGNMASTER", lambda val : val in ["O", "L"]) | \
+               TextMask(dHz, "TEXTURE", lambda val : val in txList) | \
+               TextMask(dHz, "LIEUTEX", lambda val : val in lieuList)
+
+    return bOrganic & ~Histic(dHz)
+
+## ===================================================================================
+def DenseLayers(dHz):
+    # CheckBulkDensity for every row. A single missing sand, silt or clay is calculated from the
+    # other two. Rows with more missing values or a sum other than 100 are not dense.
+    with np.errstate(invalid="ignore"):
+        sand = dHz["SANDTOTAL_R"]
+        silt = dHz["SILTTOTAL_R"]
+        clay = dHz["CLAYTOTAL_R"]
+        bd = dHz["DBTHIRDBAR_R"]
+
+        nullCnt = np.isnan(sand).astype(np.int64) + np.isnan(silt) + np.isnan(clay)
+        bOne = nullCnt == 1
+        sand = np.where(bOne & np.isnan(sand), 100.0 - silt - clay, sand)
+        silt = np.where(bOne & np.isnan(silt), 100.0 - sand - clay, silt)
+        clay = np.where(bOne & np.isnan(clay), 100.0 - sand - silt, clay)
+
+        bValid = ~np.isnan(bd) & (nullCnt <= 1)
+        bValid[bValid] = PyRound(sand[bValid] + silt[bValid] + clay[bValid], 1) == 100.0
+
+        a = bd - (((sand * 1.65) / 100.0) + ((silt * 1.30) / 100.0) + ((clay * 1.25) / 100.0))
+        b = (0.002081 * sand) + (0.003912 * silt) + (0.0024351 * clay)
+
+        return bValid & (a > b)
+
+## ===================================================================================
+def RootZoneDepth(dHz, dCR, maxD):
+    # Top root restriction for each major-earthy component (CalcRZDepth). dCR is the component
+    # restrictions from GetCoRestrictions:  {cokey:(resdept_r, reskind)}
+    #
+    # Returns {cokey:[mukey, compName, localPhase, compPct, resDept, restriction]}. Components without
+    # a restriction get maxD and "". compName and localPhase are not read and are None.
+    #
+    with np.errstate(invalid="ignore"):
+        top = dHz["HZDEPT_R"]
+        bot = dHz["HZDEPB_R"]
+        bMajor = MajorEarthy(dHz)
+        bCandidate = bMajor & (top < maxD)
+        bMineral = bCandidate & ~OrganicHorizons(dHz)
+
+        bDense = bMineral & DenseLayers(dHz)
+        bPH = bMineral & ~Histic(dHz) & (dHz["PH1TO1H2O_R"] <= 3.5)
+        bEC = bMineral & (dHz["EC_R"] >= 16.0)
+
+        crDepth = ComponentValues(dHz, dCR, 0, np.nan)
+        bCR = bCandidate & (top <= crDepth) & (crDepth < bot)
+
+        bHorizon = bDense | bPH | bEC
+        first = FirstRows(dHz, bHorizon | bCR)
+        coMajor = ComponentAny(dHz, bMajor)
+
+        dComp2 = dict()
+
+        for i in np.flatnonzero(coMajor).tolist():
+            cokey = dHz["coKeys"][i]
+            r = first[i]
+
+            if r < 0:
+                dComp2[cokey] = [dHz["muKeys"][i], None, None, dHz["comppct"][i].item(), maxD, ""]
+                continue
+
+            restriction = list()
+
+            for bTest, resKind in [(bDense, "Dense"), (bPH, "pH"), (bEC, "EC")]:
+                if bTest[r]:
+                    restriction.append(resKind)
+
+            if bHorizon[r]:
+                resDept = top[r].item()
+
+            else:
+                resDept = crDepth[r].item()
+
+            if bCR[r]:
+                restriction.append(dCR[cokey][1])
+
+            dComp2[cokey] = [dHz["muKeys"][i], None, None, dHz["comppct"][i].item(), resDept, restriction]
+
+        return dComp2
+
+## ===================================================================================
+def RootZoneAWS(dHz, dRestrictions, maxD, bBuried=True):
+    # Root zone thickness and AWS for each major-earthy component (CalcRZAWS).
+    #
+    # dRestrictions is the RootZoneDepth dictionary. Horizons are truncated at the restriction depth
+    # and maxD. Organic surface horizons are skipped. With bBuried, an organic horizon below the first
+    # mineral horizon is used.
+    #
+    # Returns {cokey:[thickness, aws, restriction]}. Components with no horizon data get 0 and 0.
+    #
+    with np.errstate(invalid="ignore"):
+        top = dHz["HZDEPT_R"]
+        bot = dHz["HZDEPB_R"]
+        bMajor = MajorEarthy(dHz)
+        bOrganic = OrganicHorizons(dHz)
+
+        rDepth = ComponentValues(dHz, dRestrictions, 4, maxD)
+        cBot = np.minimum(np.minimum(rDepth, bot), maxD)
+        awc = dHz["AWC_R"]
+        awc = np.where(np.isnan(awc), 0.0, PyRound(awc, 2))
+
+        if bBuried:
+            bUseHz = ~bOrganic | (PriorCount(dHz, bMajor & ~bOrganic) > 0)
+
+        else:
+            bUseHz = ~bOrganic
+
+        bNull = np.isnan(top) & np.isnan(bot)
+        bZero = bMajor & bUseHz & (cBot == 0)
+        bUse = bMajor & bUseHz & (top < cBot)
+        hzT = cBot - top
+
+        coThick = ComponentSums(dHz, hzT, bUse)
+        coAWS = ComponentSums(dHz, (hzT * awc) * 10.0, bUse)
+        first = FirstRows(dHz, bMajor & (bNull | bZero | bUse))
+
+        dComp = dict()
+
+        for i in np.flatnonzero(first >= 0).tolist():
+            cokey = dHz["coKeys"][i]
+
+            if bNull[first[i]]:
+                # The component was added by a horizon with no depths
+                restriction = ""
+
+            elif cokey in dRestrictions:
+                restriction = dRestrictions[cokey][5]
+
+            else:
+                restriction = []
+
+            dComp[cokey] = [coThick[i].item(), coAWS[i].item(), restriction]
+
+        return dComp
+
+## ===================================================================================
+def AWSRanges(dHz, depthList):
+    # Thickness and AWS of each component for each depth range (CalcAWS). Horizons with a null
+    # HZDEPT_R or AWC_R are skipped.
+    #
+    # Returns thickness, aws and bPresent arrays (components x ranges). bPresent is False where a
+    # component has no horizon data in the range.
+    #
+    with np.errstate(invalid="ignore"):
+        top = dHz["HZDEPT_R"]
+        bot = dHz["HZDEPB_R"]
+        awc = dHz["AWC_R"]
+        bValid = ~np.isnan(top) & ~np.isnan(awc)
+        coCnt = len(dHz["coStart"])
+        thick = np.zeros((coCnt, len(depthList)), dtype=np.float64)
+        aws = np.zeros((coCnt, len(depthList)), dtype=np.float64)
+        bPresent = np.zeros((coCnt, len(depthList)), dtype=bool)
+
+        for i in range(len(depthList)):
+            td, bd = depthList[i]
+            hzT = np.minimum(bot, bd) - np.maximum(top, td)
+            bUse = bValid & (hzT > 0)
+            thick[:, i] = ComponentSums(dHz, hzT, bUse)
+            aws[:, i] = ComponentSums(dHz, (hzT * awc) * 10, bUse)
+            bPresent[:, i] = ComponentAny(dHz, bUse)
+
+        return thick, aws, bPresent
+
+## ===================================================================================
+def SOCRanges(dHz, depthList, dRestrictions, maxD, fragvol, bRoundBD=True):
+    # Thickness and SOC of each component for each depth range (CalcSOC). Horizons with a null
+    # HZDEPT_R, OM_R or DBTHIRDBAR_R are skipped.
+    #
+    # dRestrictions is {cokey:(resdept_r, reskind)}. SOC is not calculated below the restriction.
+    # fragvol is the rock fragment volume of each row (FragmentVolume). bRoundBD rounds
+    # DBTHIRDBAR_R to 2 places (gSSURGO_ValuTable).
+    #
+    # Returns thickness, soc and bPresent arrays (components x ranges)
+    #
+    with np.errstate(invalid="ignore"):
+        top = dHz["HZDEPT_R"]
+        bot = dHz["HZDEPB_R"]
+        om = PyRound(dHz["OM_R"], 3)
+        db3 = dHz["DBTHIRDBAR_R"]
+
+        if bRoundBD:
+            db3 = PyRound(db3, 2)
+
+        bValid = ~np.isnan(top) & ~np.isnan(om) & ~np.isnan(db3)
+        rz = ComponentValues(dHz, dRestrictions, 0, maxD)
+        carbon = (om / 1.724) * db3
+        fragFactor = (100.0 - fragvol) / 100.0
+        pct = dHz["COMPPCT_R"] * 100
+
+        coCnt = len(dHz["coStart"])
+        thick = np.zeros((coCnt, len(depthList)), dtype=np.float64)
+        soc = np.zeros((coCnt, len(depthList)), dtype=np.float64)
+        bPresent = np.zeros((coCnt, len(depthList)), dtype=bool)
+
+        for i in range(len(depthList)):
+            td, bd = depthList[i]
+            hzTop = np.maximum(top, td)
+            cBot = np.minimum(rz, np.minimum(bot, bd))
+            hzT = cBot - hzTop
+            bUse = bValid & (hzT > 0) & (hzTop < cBot)
+            thick[:, i] = ComponentSums(dHz, hzT, bUse)
+            soc[:, i] = ComponentSums(dHz, ((hzT * carbon) / 100.0) * fragFactor * pct, bUse)
+            bPresent[:, i] = ComponentAny(dHz, bUse)
+
+        return thick, soc, bPresent
+
+## ===================================================================================
+def FragmentVolume(dHz, dFrags):
+    # Rock fragment volume of each row from the GetFragVol dictionary (by chkey), or from the
+    # FRAGVOL column of an SDA horizon table. Missing values are 0.
+    if dFrags is None:
+        return np.where(np.isnan(dHz["FRAGVOL"]), 0.0, dHz["FRAGVOL"])
+
+    chkeys = dHz["text"]["CHKEY"][1]
+    frags = np.array([dFrags.get(chkey, 0.0) for chkey in chkeys] + [0.0], dtype=np.float64)
+
+    return frags[dHz["CHKEY"]]
+
+## ===================================================================================
+def RestrictionText(restriction):
+    # Restriction list as saved in Co_VALU.RESTRICTION
+    if restriction is None or len(restriction) == 0:
+        return ""
+
+    return ",".join(restriction)
+
+## ===================================================================================
+def InterpSums(muRows, colRows, weighted, muCnt, colCnt):
+    # Comppct-weighted interp ratings (CalcInterps) summed by map unit row and output column.
+    # muRows, colRows and weighted are one entry per cointerp record, in the order read.
+    # Returns the sums and a mask of the cells that have at least one rating.
+    muIndx = np.array(muRows, dtype=np.int64)
+    colIndx = np.array(colRows, dtype=np.int64)
+    sums = np.zeros((muCnt, colCnt), dtype=np.float64)
+    bValue = np.zeros((muCnt, colCnt), dtype=bool)
+    np.add.at(sums, (muIndx, colIndx), np.array(weighted, dtype=np.float64))
+    bValue[muIndx, colIndx] = True
+
+    return sums, bValue
+
+## ===================================================================================
+def InterpValues(sums, bValue, row, sumPct):
+    # NCCPI values for one map unit: the weighted sums divided by the sum of major-earthy component
+    # percent, rounded to 3 places. Columns with no rating are None. A sumPct of 0 raises ZeroDivisionError.
+    return [round(float(sums[row, j]) / sumPct, 3) if bValue[row, j] else None for j in range(sums.shape[1])]
+
+## ===================================================================================
+def PWSLComponent(dMu, mukey, muname, comppct_r, compname, localphase, otherph, hydricrating, drainagecl):
+    # Add one component to the potential wet soil landscape percent for its map unit (dMu)
+    #
+    # Sharon: I treat all map unit components the same, so if I find 1% water I think
+    # it should show up as 1% PWSL.  If the percentage of water is >= 80% then I class
+    # it into the water body category or 999.
+    #
+    # Defining water components SDP
+    # 1. compkind = 'Miscellaneous area' or is NULL and (
+    # 2. compname = 'Water' or
+    # 3. compname like '% water' or
+    # 4. compname like '% Ocean' or
+    # 5. compname like '% swamp'
+    #
+    # Sharon says that if the hydricrating for a component is 'No', don't
+    # look at it any further. If it is unranked, go ahead and look at
+    # other properties.
+    #
+    drainList = ["Poorly drained", "Very poorly drained"]
+    phaseList = ["drained", "undrained", "channeled", "protected", "ponded", "flooded"]
+
+    if ( muname == "Water" or str(compname) == "Water" or (str(compname).lower().find(" water") >= 0) or (str(compname).lower().find(" ocean") >= 0)  or (str(compname).find(" swamp") >= 0) or str(compname) == "Swamp" ) :
+
+        # Check for water before looking at Hydric rating
+        # Probably won't catch everything. Waiting for Sharon's criteria.
+
+        if comppct_r >= 80:
+            # Flag this mapunit with a '999'
+            # Not necessarily catching map unit with more than one Water component that
+            # might sum to >= 80. Don't think there are any right now.
+            dMu[mukey] = 999
+
+        elif dMu.get(mukey, 0) != 999:
+            dMu[mukey] = dMu.get(mukey, 0) + comppct_r
+
+    elif hydricrating == 'No':
+        # Added this bit so that other properties cannot override hydricrating = 'No'
+        pass
+
+    elif hydricrating == 'Yes':
+        # This is always a Hydric component
+        # Get component percent and add to map unit total PWSL
+        if dMu.get(mukey, 0) != 999:
+            dMu[mukey] = dMu.get(mukey, 0) + comppct_r
+
+    elif hydricrating == 'Unranked':
+        # Unranked hydric from here on down, looking at other properties such as:
+        #   Local phase
+        #   Other phase
+        #   Map unit name strings
+        #   Drainage class
+        if [d for d in phaseList if str(localphase).lower().find(d) >= 0] or \
+        [d for d in phaseList if str(otherph).lower().find(d) >= 0] or \
+        [d for d in phaseList if muname.find(d) >= 0] or \
+        str(drainagecl) in drainList:
+            dMu[mukey] = dMu.get(mukey, 0) + comppct_r
+
+## ===================================================================================
+def RefCheckTexture(desgnmaster, texture, lieutex, taxorder, taxsubgrp):
+    # The original CheckTexture. Only for the benchmark.
+    if str(taxorder) == 'Histosols' or str(taxsubgrp).lower().find('histic') >= 0:
+        return False
+
+    elif desgnmaster in ["O", "L"]:
+        return True
+
+    elif str(texture) in txList:
+        return True
+
+    elif str(lieutex) in lieuList:
+        return True
+
+    return False
+
+## ===================================================================================
+def RefCheckBulkDensity(sand, silt, clay, bd):
+    # The original CheckBulkDensity. Only for the benchmark.
+    txlist = [sand, silt, clay]
+
+    if bd is None:
+        return False
+
+    if txlist.count(None) == 1:
+        if txlist[0] is None:
+            sand = 100.0 - silt - clay
+
+        elif silt is None:
+            silt = 100.0 - sand - clay
+
+        else:
+            clay = 100.0 - sand - silt
+
+        txlist = [sand, silt, clay]
+
+    if txlist.count(None) > 0:
+        return False
+
+    if round(sum(txlist), 1) <> 100.0:
+        return False
+
+    a = bd - ((( sand * 1.65 ) / 100.0 ) + (( silt * 1.30 ) / 100.0 ) + (( clay * 1.25 ) / 100.0))
+    b = ( 0.002081 * sand ) + ( 0.003912 * silt ) + ( 0.0024351 * clay )
+
+    return a > b
+
+## ===================================================================================
+def RefRootZoneDepth(rows, dCR, maxD):
+    # The CalcRZDepth horizon loop. Only for the benchmark.
+    dComp = dict()
+    dComp2 = dict()
+
+    for r in rows:
+        if not (r["MAJCOMPFLAG"] == "Yes" and r["COMPKIND"] != "Miscellaneous area" and not r["COMPKIND"] is None):
+            continue
+
+        cokey = r["COKEY"]
+        hzDept = r["HZDEPT_R"]
+        dComp2[cokey] = [r["MUKEY"], None, None, r["COMPPCT_R"], maxD, ""]
+
+        if hzDept < maxD:
+            restriction = list()
+
+            if not RefCheckTexture(r["DESGNMASTER"], r["TEXTURE"], r["LIEUTEX"], r["TAXORDER"], r["TAXSUBGRP"]):
+                if RefCheckBulkDensity(r["SANDTOTAL_R"], r["SILTTOTAL_R"], r["CLAYTOTAL_R"], r["DBTHIRDBAR_R"]):
+                    restriction.append("Dense")
+                    resDept = hzDept
+
+                if str(r["TAXORDER"]) != 'Histosols' and str(r["TAXSUBGRP"]).lower().find('histic') == -1:
+                    if r["PH1TO1H2O_R"] <= 3.5 and r["PH1TO1H2O_R"] is not None:
+                        restriction.append("pH")
+                        resDept = hzDept
+
+                if r["EC_R"] >= 16.0 and r["EC_R"] is not None:
+                    restriction.append("EC")
+                    resDept = hzDept
+
+            if cokey in dCR:
+                resDepth2, resKind = dCR[cokey]
+
+                if hzDept <= resDepth2 < r["HZDEPB_R"]:
+                    if len(restriction) == 0:
+                        resDept = resDepth2
+
+                    restriction.append(resKind)
+
+            if len(restriction) > 0 and not cokey in dComp:
+                dComp[cokey] = [r["MUKEY"], None, None, r["COMPPCT_R"], resDept, restriction]
+
+    for cokey in dComp2:
+        if cokey in dComp:
+            dComp2[cokey] = dComp[cokey]
+
+    return dComp2
+
+## ===================================================================================
+def RefRootZoneAWS(rows, dRestrictions, maxD, bBuried=True):
+    # The CalcRZAWS horizon loop. Only for the benchmark.
+    dComp = dict()
+    skipList = list()
+
+    for r in rows:
+        cokey = r["COKEY"]
+        top = r["HZDEPT_R"]
+        bot = r["HZDEPB_R"]
+
+        if not (r["MAJCOMPFLAG"] == "Yes" and r["COMPKIND"] != "Miscellaneous area" and not r["COMPKIND"] is None):
+            continue
+
+        if top is None and bot is None:
+            if not cokey in dComp:
+                dComp[cokey] = [0, 0, ""]
+
+        try:
+            rDepth, restriction = dRestrictions[cokey][4:6]
+            cBot = min(rDepth, bot, maxD)
+
+        except:
+            cBot = min(maxD, bot)
+            restriction = []
+
+        bOrganic = RefCheckTexture(r["DESGNMASTER"], r["TEXTURE"], r["LIEUTEX"], r["TAXORDER"], r["TAXSUBGRP"])
+        awc = r["AWC_R"]
+
+        if awc is None:
+            awc = 0.0
+
+        else:
+            awc = round(awc, 2)
+
+        if bOrganic and (not bBuried or not cokey in skipList):
+            useHz = False
+
+        else:
+            useHz = True
+            skipList.append(cokey)
+
+            if not cokey in dComp and cBot == 0:
+                dComp[cokey] = [0, 0, restriction]
+
+        if top < cBot and useHz == True:
+            hzT = cBot - top
+            aws = float(hzT) * float(awc) * 10.0
+
+            if cokey in dComp:
+                dComp[cokey][0] += hzT
+                dComp[cokey][1] += aws
+
+            else:
+                dComp[cokey] = [hzT, aws, restriction]
+
+    return dComp
+
+## ===================================================================================
+def RefRanges(rows, depthList, dRestrictions, maxD, dFrags, bSOC):
+    # The CalcAWS or CalcSOC horizon loop for each range. Only for the benchmark.
+    # Returns {(cokey, range number):[thickness, value]}
+    dComp = dict()
+
+    for i in range(len(depthList)):
+        td, bd = depthList[i]
+
+        for r in rows:
+            cokey = r["COKEY"]
+            top = r["HZDEPT_R"]
+            bot = r["HZDEPB_R"]
+
+            if top is None:
+                continue
+
+            if bSOC:
+                om = r["OM_R"]
+                db3 = r["DBTHIRDBAR_R"]
+
+                if om is None or db3 is None:
+                    continue
+
+                top = max(top, td)
+                bot = min(bot, bd)
+                om = round(om, 3)
+
+                try:
+                    rz, resKind = dRestrictions[cokey]
+
+                except:
+                    rz = maxD
+
+                if top < rz < bot:
+                    cBot = rz
+
+                else:
+                    cBot = min(rz, bot)
+
+                hzT = cBot - top
+
+                if not (hzT > 0 and top < cBot):
+                    continue
+
+                fragvol = dFrags.get(r["CHKEY"], 0.0)
+                db3 = round(db3, 2)
+                val = ( (hzT * ( ( om / 1.724 ) * db3 )) / 100.0 ) * ((100.0 - fragvol) / 100.0) * ( r["COMPPCT_R"] * 100 )
+
+            else:
+                awc = r["AWC_R"]
+
+                if awc is None:
+                    continue
+
+                hzT = min(bot, bd) - max(top, td)
+
+                if not hzT > 0:
+                    continue
+
+                val = float(hzT) * float(awc) * 10
+
+            key = (cokey, i)
+
+            if key in dComp:
+                dComp[key][0] += hzT
+                dComp[key][1] += val
+
+            else:
+                dComp[key] = [hzT, val]
+
+    return dComp
+
+## ===================================================================================
+def CreateTestRows(muCnt, seed=1):
+    # Synthetic QueryTable_HZ rows in MUKEY, COMPPCT_R DESC, COKEY, HZDEPT_R order
+    random.seed(seed)
+    rows = list()
+
+    for m in range(muCnt):
+        mukey = str(100000 + m)
+        pctLeft = 100
+        comps = list()
+
+        for c in range(random.randint(1, 5)):
+            comppct = min(pctLeft, random.choice([2, 5, 10, 15, 20, 25, 30, 40, 50, 60, 85]))
+            pctLeft -= comppct
+            comps.append((comppct, mukey + str(c).zfill(2)))
+
+        comps.sort(key = lambda x : (-x[0], x[1]))
+
+        for comppct, cokey in comps:
+            dCo = {"MUKEY":mukey, "COKEY":cokey, "COMPPCT_R":comppct}
+            dCo["MAJCOMPFLAG"] = random.choice(["Yes", "Yes", "No"])
+            dCo["COMPKIND"] = random.choice(["Series", "Series", "Taxadjunct", "Miscellaneous area", None])
+            dCo["TAXORDER"] = random.choice(["Mollisols", "Alfisols", "Histosols", "Entisols", None])
+            dCo["TAXSUBGRP"] = random.choice(["Typic Argiudolls", "Histic Humaquepts", "Aquic Hapludalfs", None])
+
+            if random.random() < 0.03:
+                # Component with no horizon data
+                row = dict(dCo)
+
+                for fld in numFields[1:] + ["CHKEY", "DESGNMASTER", "TEXTURE", "LIEUTEX", "FRAGVOL"]:
+                    row[fld] = None
+
+                rows.append(row)
+                continue
+
+            hzdept = 0
+
+            for h in range(random.randint(1, 7)):
+                row = dict(dCo)
+                hzdepb = hzdept + random.choice([3, 5, 10, 15, 20, 28, 35, 50, 75])
+                row["CHKEY"] = cokey + str(h)
+                row["HZDEPT_R"] = hzdept
+                row["HZDEPB_R"] = hzdepb
+                row["DESGNMASTER"] = random.choice(["O", "A", "B", "C", "R", "L", None]) if h < 2 else random.choice(["B", "C", "O", "R"])
+                row["TEXTURE"] = random.choice(["L", "SIL", "MUCK", "PEAT", "CL", None])
+                row["LIEUTEX"] = random.choice([None, None, None, "Muck", "Bedrock", "Peat"])
+                sand = round(random.uniform(5, 80), 1)
+                clay = round(random.uniform(2, 100 - sand), 1)
+                row["SANDTOTAL_R"] = random.choice([sand, sand, None])
+                row["CLAYTOTAL_R"] = clay
+                row["SILTTOTAL_R"] = random.choice([round(100.0 - sand - clay, 1), round(100.0 - sand - clay, 1), 20.0, None])
+                row["DBTHIRDBAR_R"] = random.choice([round(random.uniform(1.0, 2.1), 2), round(random.uniform(1.0, 2.1), 3), None])
+                row["PH1TO1H2O_R"] = random.choice([round(random.uniform(3.0, 8.5), 1), None])
+                row["EC_R"] = random.choice([0.0, round(random.uniform(0.0, 30.0), 1), None])
+                row["OM_R"] = random.choice([round(random.uniform(0.0, 60.0), 4), None])
+                row["AWC_R"] = random.choice([round(random.uniform(0.0, 0.3), 3), None])
+                row["FRAGVOL"] = None
+                rows.append(row)
+                hzdept = hzdepb
+
+    return rows
+
+## ===================================================================================
+def TestArrays(rows):
+    # Horizon arrays from synthetic rows, the same way ReadHorizons builds them from a table.
+    # The rows are shuffled first to show that the sort restores the cursor order.
+    shuffled = list(rows)
+    random.shuffle(shuffled)
+    dCols = dict()
+    dText = dict()
+
+    for fld in hzFields:
+        col = [r[fld] for r in shuffled]
+
+        if fld in numFields + ["FRAGVOL"]:
+            dCols[fld] = np.array([np.nan if val is None else val for val in col], dtype=np.float64)
+
+        else:
+            dCols[fld] = EncodeText(dText, fld, [nullText if val is None else val for val in col])
+
+    return HorizonArrays(dCols, dText)
+
+## ===================================================================================
+def Benchmark(muCnt):
+    # Compare the array calculations with the original loops on the same synthetic horizons.
+    # Every component value must match exactly.
+    rows = CreateTestRows(muCnt)
+    print "Synthetic horizon table: " + str(len(rows)) + " rows"
+    diffCnt = 0
+
+    t0 = time.time()
+    dHz = TestArrays(rows)
+    print "Array load and sort: %.3fs" % (time.time() - t0)
+
+    # Component restrictions and fragments
+    random.seed(2)
+    dCR = dict()
+    dFrags = dict()
+
+    for r in rows:
+        if random.random() < 0.1 and not r["COKEY"] in dCR:
+            dCR[r["COKEY"]] = (random.choice([0, 10, 25, 50, 100, 140]), random.choice(["Lithic bedrock", "Fragipan", "Duripan"]))
+
+        if not r["CHKEY"] is None and random.random() < 0.5:
+            dFrags[r["CHKEY"]] = random.choice([0.0, 5.0, 15.0, 40.0, 100.0])
+
+    t0 = time.time()
+    dRef = RefRootZoneDepth(rows, dCR, 150.0)
+    refTime = time.time() - t0
+    t0 = time.time()
+    dNew = RootZoneDepth(dHz, dCR, 150.0)
+    newTime = time.time() - t0
+    cnt = len([cokey for cokey in set(dRef) | set(dNew) if dRef.get(cokey, None) is None or dNew.get(cokey, None) is None or \
+               dRef[cokey][3:6] != dNew[cokey][3:6]])
+    diffCnt += cnt
+    print "%-14s %8d components  loops %7.3fs  arrays %7.3fs  %6.1fx  mismatches %d" % ("RootZoneDepth", len(dRef), refTime, newTime, refTime / max(newTime, 1e-6), cnt)
+
+    for bBuried in [True, False]:
+        t0 = time.time()
+        dRefRZ = RefRootZoneAWS(rows, dRef, 150.0, bBuried)
+        refTime = time.time() - t0
+        t0 = time.time()
+        dNewRZ = RootZoneAWS(dHz, dRef, 150.0, bBuried)
+        newTime = time.time() - t0
+        cnt = len([cokey for cokey in set(dRefRZ) | set(dNewRZ) if dRefRZ.get(cokey, None) is None or dNewRZ.get(cokey, None) is None or \
+                   dRefRZ[cokey][0:2] != dNewRZ[cokey][0:2] or RestrictionText(dRefRZ[cokey][2]) != RestrictionText(dNewRZ[cokey][2])])
+        diffCnt += cnt
+        print "%-14s %8d components  loops %7.3fs  arrays %7.3fs  %6.1fx  mismatches %d" % ("RootZoneAWS" + ("" if bBuried else " (SDA)"), len(dRefRZ), refTime, newTime, refTime / max(newTime, 1e-6), cnt)
+
+    depthList = [(0,5), (5, 20), (20, 50), (50, 100), (100, 150), (150, 999), (0, 20), (0, 30), (0, 100), (0, 150), (0, 999)]
+    dSOCRestrictions = dict([(cokey, val) for cokey, val in dCR.items() if val[1] == "Lithic bedrock"])
+
+    for title, bSOC in [("AWSRanges", False), ("SOCRanges", True)]:
+        t0 = time.time()
+        dRefRng = RefRanges(rows, depthList, dSOCRestrictions, 999.0, dFrags, bSOC)
+        refTime = time.time() - t0
+        t0 = time.time()
+
+        if bSOC:
+            thick, vals, bPresent = SOCRanges(dHz, depthList, dSOCRestrictions, 999.0, FragmentVolume(dHz, dFrags))
+
+        else:
+            thick, vals, bPresent = AWSRanges(dHz, depthList)
+
+        newTime = time.time() - t0
+        cnt = 0
+
+        for c in range(len(dHz["coKeys"])):
+            for i in range(len(depthList)):
+                key = (dHz["coKeys"][c], i)
+
+                if bPresent[c, i] != (key in dRefRng):
+                    cnt += 1
+
+                elif bPresent[c, i] and (thick[c, i] != dRefRng[key][0] or vals[c, i] != dRefRng[key][1]):
+                    cnt += 1
+
+        diffCnt += cnt
+        print "%-14s %8d values      loops %7.3fs  arrays %7.3fs  %6.1fx  mismatches %d" % (title, len(dRefRng), refTime, newTime, refTime / max(newTime, 1e-6), cnt)
+
+    return diffCnt
+
+## ===================================================================================
+## MAIN
+## ===================================================================================
+
+# Import system modules
+import sys, os, time, random, traceback
+import numpy as np
+import gSSURGO_AggregateArrays
+
+try:
+    import arcpy
+
+except ImportError:
+    # arcpy is only needed to read the horizon table. The benchmark runs without it.
+    arcpy = None
+
+# Horizon table fields. Fields that are not in the table are read as null.
+hzFields = ["MUKEY", "COKEY", "COMPPCT_R", "MAJCOMPFLAG", "COMPKIND", "TAXORDER", "TAXSUBGRP", "CHKEY", "DESGNMASTER", \
+            "HZDEPT_R", "HZDEPB_R", "SANDTOTAL_R", "SILTTOTAL_R", "CLAYTOTAL_R", "OM_R", "DBTHIRDBAR_R", "PH1TO1H2O_R", \
+            "EC_R", "AWC_R", "TEXTURE", "LIEUTEX", "FRAGVOL"]
+numFields = ["COMPPCT_R", "HZDEPT_R", "HZDEPB_R", "SANDTOTAL_R", "SILTTOTAL_R", "CLAYTOTAL_R", "OM_R", "DBTHIRDBAR_R", \
+             "PH1TO1H2O_R", "EC_R", "AWC_R"]
+
+# Key fields are always encoded, even when they are stored as numbers
+keyFields = ["MUKEY", "COKEY", "CHKEY"]
+
+# Null values used by TableToNumPyArray
+nullText = u"<Null>"
+nullInt = -2147483647
+
+# Records read from the horizon table at a time
+chunkSize = 250000
+
+# Organic textures and lieutex values (CheckTexture)
+lieuList = ['Slightly decomposed plant material', 'Moderately decomposed plant material', \
+'Highly decomposed plant material', 'Undecomposed plant material', 'Muck', 'Mucky peat', \
+'Peat', 'Coprogenous earth']
+txList = ["CE", "COP-MAT", "HPM", "MPM", "MPT", "MUCK", "PDOM", "PEAT", "SPM", "UDOM"]
+
+# python round() for an array
+pyRound = np.frompyfunc(round, 2, 1)
+
+# Horizon arrays already read, keyed on the lower case table path:  [record count, dHz]
+dLoaded = dict()
+
+if __name__ == "__main__":
+    # Standalone benchmark
+    muCnt = 20000
+
+    if len(sys.argv) > 1:
+        muCnt = int(sys.argv[1])
+
+    sys.exit(Benchmark(muCnt))
@@ -0,0 +1,773 @@
+# gSSURGO_ValuHarness.py
+#
+# Steve Peaslee, National Soil Survey Center
+#
+# Purpose:  Regression and performance check for the Valu1 calculations (gSSURGO_ValuTable, SDA_Valu1Table)
+#
+# Each calculation stage runs on a synthetic dataset with its time and memory, and its output is compared
+# with the expected values. A stage fails when a value differs by more than its tolerance (dTolerance).
+#
+#   small    a few map units built by hand, with the answers worked out by hand (KnownData)
+#   large    synthetic map units from gSSURGO_ValuArrays.CreateTestRows. The expected values come from
+#            the original horizon loops (the Ref functions), so a speedup has to give the same numbers.
+#
+# The stages are the calculations that the Calc functions of both scripts share:
+#
+#   CheckTexture, CheckBulkDensity    organic horizon and dense layer tests for each horizon
+#   RootZoneDepth, RootZoneAWS        CalcRZDepth and CalcRZAWS for each major-earthy component
+#   AWSRanges, SOCRanges              CalcAWS and CalcSOC for each component and depth range
+#   NCCPI, PWSL                       CalcInterps weighted NCCPI and potential wet soil landscapes
+#
+# The stage output can be saved to a golden file (--save) and later runs compared with it (--golden).
+#
+# With arcpy, --valu runs gSSURGO_ValuTable on a gSSURGO database with each Calc, Create and Get function
+# timed by gSSURGO_Profile, and compares the Valu1 table with the golden file.
+#
+#     python gSSURGO_ValuHarness.py [small | large] [mapunit count] [--golden file] [--save file] [--valu gdb]
+#
+# 2017-11-10
+
+## ===================================================================================
+class MyError(Exception):
+    pass
+
+## ===================================================================================
+def PrintMsg(msg, severity=0):
+    # prints message to screen if run as a python script
+    # Adds tool message to the geoprocessor
+    #
+    #Split the message on \n first, so that if it's multiple lines, a GPMessage will be added for each line
+    try:
+        for string in msg.split('\n'):
+            #Add a geoprocessing message (in case this is run as a tool)
+            if severity == 0:
+                arcpy.AddMessage(string)
+
+            elif severity == 1:
+                arcpy.AddWarning(string)
+
+            elif severity == 2:
+                arcpy.AddMessage("    ")
+                arcpy.AddError(string)
+
+    except:
+        pass
+
+## ===================================================================================
+def errorMsg():
+    try:
+        tb = sys.exc_info()[2]
+        tbinfo = traceback.format_tb(tb)[0]
+        theMsg = tbinfo + "\n" + str(sys.exc_type)+ ": " + str(sys.exc_value)
+        PrintMsg(theMsg, 2)
+
+    except:
+        PrintMsg("Unhandled error in unHandledException method", 2)
+
+## ===================================================================================
+def Horizons(mukey, cokey, comppct, major, compkind, taxorder, taxsubgrp, hzList):
+    # QueryTable_HZ rows for one component, as CreateTestRows makes them. Each horizon is
+    # (desgnmaster, top, bottom, texture, lieutex, sand, silt, clay, om, bd, pH, EC, awc).
+    # An empty list is a component with no horizon data.
+    dCo = {"MUKEY":mukey, "COKEY":cokey, "COMPPCT_R":comppct, "MAJCOMPFLAG":major, "COMPKIND":compkind, \
+           "TAXORDER":taxorder, "TAXSUBGRP":taxsubgrp}
+    rows = list()
+
+    if len(hzList) == 0:
+        row = dict(dCo)
+
+        for fld in gSSURGO_ValuArrays.numFields[1:] + ["CHKEY", "DESGNMASTER", "TEXTURE", "LIEUTEX", "FRAGVOL"]:
+            row[fld] = None
+
+        return [row]
+
+    for h, hz in enumerate(hzList):
+        row = dict(dCo)
+        row["CHKEY"] = cokey + str(h)
+        row["FRAGVOL"] = None
+
+        for fld, val in zip(["DESGNMASTER", "HZDEPT_R", "HZDEPB_R", "TEXTURE", "LIEUTEX", "SANDTOTAL_R", "SILTTOTAL_R", \
+                             "CLAYTOTAL_R", "OM_R", "DBTHIRDBAR_R", "PH1TO1H2O_R", "EC_R", "AWC_R"], hz):
+            row[fld] = val
+
+        rows.append(row)
+
+    return rows
+
+## ===================================================================================
+def KnownData():
+    # Hand-built map units and the answer for each stage
+    #
+    # 200001  deep loam, no restriction. 20% fragments in the C horizon.
+    # 200002  lithic bedrock at 50 cm, with a minor component
+    # 200003  organic surface (skipped for the root zone) and pH 3.2 at 40 cm
+    # 200004  dense, saline fragipan at 25 cm, with a miscellaneous area that has no horizons
+    # 200005  Histosol. The muck is not an organic surface layer in a Histosol.
+    #
+    rows = list()
+    loam = [40.0, 40.0, 20.0]
+    clayLoam = [30.0, 40.0, 30.0]
+    noTx = [None, None, None]
+
+    rows.extend(Horizons("200001", "20000101", 100, "Yes", "Series", "Mollisols", "Typic Argiudolls", \
+                [["A", 0, 20, "L", None] + loam + [2.0, 1.30, 6.5, 0.5, 0.20], \
+                 ["B", 20, 60, "CL", None] + clayLoam + [1.0, 1.40, 6.8, 0.5, 0.15], \
+                 ["C", 60, 200, "L", None] + loam + [0.5, 1.50, 7.2, 1.0, 0.10]]))
+    rows.extend(Horizons("200002", "20000201", 85, "Yes", "Series", "Alfisols", "Typic Hapludalfs", \
+                [["A", 0, 30, "L", None] + loam + [3.0, 1.20, 6.0, 0.0, 0.20], \
+                 ["B", 30, 80, "CL", None] + clayLoam + [0.8, 1.45, 6.0, 0.0, 0.15], \
+                 ["R", 80, 200, None, "Bedrock"] + noTx + [None, None, None, None, None]]))
+    rows.extend(Horizons("200002", "20000202", 15, "No", "Series", "Alfisols", "Typic Hapludalfs", \
+                [["A", 0, 100, "L", None] + loam + [1.0, 1.30, 6.0, 0.0, 0.10]]))
+    rows.extend(Horizons("200003", "20000301", 100, "Yes", "Series", "Alfisols", "Typic Hapludalfs", \
+                [["O", 0, 10, "MUCK", None] + noTx + [40.0, 0.30, 5.0, 0.0, 0.40], \
+                 ["A", 10, 40, "L", None] + loam + [2.0, 1.30, 5.5, 0.0, 0.20], \
+                 ["B", 40, 100, "L", None] + loam + [0.5, 1.40, 3.2, 0.0, 0.12]]))
+    rows.extend(Horizons("200004", "20000401", 90, "Yes", "Series", "Inceptisols", "Typic Fragiudepts", \
+                [["A", 0, 25, "L", None] + loam + [1.5, 1.30, 6.0, 0.0, 0.18], \
+                 ["B", 25, 100, "L", None] + loam + [0.3, 1.95, 6.0, 20.0, 0.08]]))
+    rows.extend(Horizons("200004", "20000402", 10, "Yes", "Miscellaneous area", None, None, []))
+    rows.extend(Horizons("200005", "20000501", 100, "Yes", "Series", "Histosols", "Typic Haplosaprists", \
+                [["O", 0, 150, "MUCK", None] + noTx + [60.0, 0.25, 5.0, 0.0, 0.45]]))
+
+    # Root restrictions (GetCoRestrictions) for the root zone and SOC, and fragment volume by chkey
+    dCR = {"20000201":(50, "Lithic bedrock")}
+    dSOCRes = {"20000201":(50, "Lithic bedrock")}
+    dFrags = {"200001012":20.0}
+
+    dExpected = dict()
+    dExpected["CheckTexture"] = dict([(r["CHKEY"], [0]) for r in rows if not r["CHKEY"] is None])
+    dExpected["CheckTexture"]["200003010"] = [1]
+    dExpected["CheckBulkDensity"] = dict([(r["CHKEY"], [0]) for r in rows if not r["CHKEY"] is None])
+    dExpected["CheckBulkDensity"]["200004011"] = [1]
+
+    dExpected["RootZoneDepth"] = {"20000101":[150.0, ""], "20000201":[50, "Lithic bedrock"], "20000301":[40.0, "pH"], \
+                                  "20000401":[25.0, "Dense,EC"], "20000501":[150.0, ""]}
+
+    # thickness, thickness x awc x 10
+    dExpected["RootZoneAWS"] = {"20000101":[150.0, 20 * 2.0 + 40 * 1.5 + 90 * 1.0], "20000201":[50.0, 30 * 2.0 + 20 * 1.5], \
+                                "20000301":[30.0, 30 * 2.0], "20000401":[25.0, 25 * 1.8], "20000501":[150.0, 150 * 4.5]}
+
+    # AWS for each depth range: [(thickness, awc), ...] for each component, None where there are no horizons
+    aws = dict()
+    aws["20000101"] = [[(5, .2)], [(15, .2)], [(30, .15)], [(10, .15), (40, .1)], [(50, .1)], [(50, .1)], \
+                       [(20, .2)], [(20, .2), (10, .15)], [(20, .2), (40, .15), (40, .1)], [(20, .2), (40, .15), (90, .1)], \
+                       [(20, .2), (40, .15), (140, .1)]]
+    aws["20000201"] = [[(5, .2)], [(15, .2)], [(10, .2), (20, .15)], [(30, .15)], None, None, \
+                       [(20, .2)], [(30, .2)], [(30, .2), (50, .15)], [(30, .2), (50, .15)], [(30, .2), (50, .15)]]
+    aws["20000202"] = [[(5, .1)], [(15, .1)], [(30, .1)], [(50, .1)], None, None, \
+                       [(20, .1)], [(30, .1)], [(100, .1)], [(100, .1)], [(100, .1)]]
+    aws["20000301"] = [[(5, .4)], [(5, .4), (10, .2)], [(20, .2), (10, .12)], [(50, .12)], None, None, \
+                       [(10, .4), (10, .2)], [(10, .4), (20, .2)], [(10, .4), (30, .2), (60, .12)], \
+                       [(10, .4), (30, .2), (60, .12)], [(10, .4), (30, .2), (60, .12)]]
+    aws["20000401"] = [[(5, .18)], [(15, .18)], [(5, .18), (25, .08)], [(50, .08)], None, None, \
+                       [(20, .18)], [(25, .18), (5, .08)], [(25, .18), (75, .08)], [(25, .18), (75, .08)], [(25, .18), (75, .08)]]
+    aws["20000501"] = [[(5, .45)], [(15, .45)], [(30, .45)], [(50, .45)], [(50, .45)], None, \
+                       [(20, .45)], [(30, .45)], [(100, .45)], [(150, .45)], [(150, .45)]]
+
+    dExpected["AWSRanges"] = dict()
+
+    for cokey, ranges in aws.items():
+        for i, parts in enumerate(ranges):
+            if not parts is None:
+                dExpected["AWSRanges"][cokey + ":" + str(i)] = [sum([t for t, awc in parts]), sum([t * awc * 10 for t, awc in parts])]
+
+    # SOC for each depth range: [(thickness, om, bd, fragvol), ...] and component percent
+    soc = dict()
+    c1 = (2.0, 1.30, 0)
+    c2 = (1.0, 1.40, 0)
+    c3 = (0.5, 1.50, 20.0)
+    soc["20000101"] = [100, [[(5,) + c1], [(15,) + c1], [(30,) + c2], [(10,) + c2, (40,) + c3], [(50,) + c3], [(50,) + c3], \
+                       [(20,) + c1], [(20,) + c1, (10,) + c2], [(20,) + c1, (40,) + c2, (40,) + c3], \
+                       [(20,) + c1, (40,) + c2, (90,) + c3], [(20,) + c1, (40,) + c2, (140,) + c3]]]
+    d1 = (3.0, 1.20, 0)
+    d2 = (0.8, 1.45, 0)
+    soc["20000201"] = [85, [[(5,) + d1], [(15,) + d1], [(10,) + d1, (20,) + d2], None, None, None, \
+                       [(20,) + d1], [(30,) + d1], [(30,) + d1, (20,) + d2], [(30,) + d1, (20,) + d2], [(30,) + d1, (20,) + d2]]]
+    e1 = (1.0, 1.30, 0)
+    soc["20000202"] = [15, [[(5,) + e1], [(15,) + e1], [(30,) + e1], [(50,) + e1], None, None, \
+                       [(20,) + e1], [(30,) + e1], [(100,) + e1], [(100,) + e1], [(100,) + e1]]]
+    f1 = (40.0, 0.30, 0)
+    f2 = (2.0, 1.30, 0)
+    f3 = (0.5, 1.40, 0)
+    soc["20000301"] = [100, [[(5,) + f1], [(5,) + f1, (10,) + f2], [(20,) + f2, (10,) + f3], [(50,) + f3], None, None, \
+                       [(10,) + f1, (10,) + f2], [(10,) + f1, (20,) + f2], [(10,) + f1, (30,) + f2, (60,) + f3], \
+                       [(10,) + f1, (30,) + f2, (60,) + f3], [(10,) + f1, (30,) + f2, (60,) + f3]]]
+    g1 = (1.5, 1.30, 0)
+    g2 = (0.3, 1.95, 0)
+    soc["20000401"] = [90, [[(5,) + g1], [(15,) + g1], [(5,) + g1, (25,) + g2], [(50,) + g2], None, None, \
+                       [(20,) + g1], [(25,) + g1, (5,) + g2], [(25,) + g1, (75,) + g2], [(25,) + g1, (75,) + g2], [(25,) + g1, (75,) + g2]]]
+    h1 = (60.0, 0.25, 0)
+    soc["20000501"] = [100, [[(5,) + h1], [(15,) + h1], [(30,) + h1], [(50,) + h1], [(50,) + h1], None, \
+                       [(20,) + h1], [(30,) + h1], [(100,) + h1], [(150,) + h1], [(150,) + h1]]]
+
+    dExpected["SOCRanges"] = dict()
+
+    for cokey, (comppct, ranges) in soc.items():
+        for i, parts in enumerate(ranges):
+            if not parts is None:
+                # thickness x organic carbon (om / 1.724 x bulk density) x (1 - fragments) x component percent
+                dExpected["SOCRanges"][cokey + ":" + str(i)] = [sum([t for t, om, bd, frag in parts]), \
+                sum([t * (om / 1.724) * bd * (100.0 - frag) / 100.0 for t, om, bd, frag in parts]) * comppct]
+
+    # NCCPI ratings: mukey, cokey, comppct, majcompflag, rulekey, ruledepth, rulename, interphr
+    interps = [["200001", "20000101", 100, "Yes", "54955", 0, nccpiRules[0], 0.5], \
+               ["200001", "20000101", 100, "Yes", "k2", 1, nccpiRules[2], 0.6], \
+               ["200001", "20000101", 100, "Yes", "k3", 1, nccpiRules[3], 0.4], \
+               ["200001", "20000101", 100, "Yes", "r1", 1, "Rating reason", 0.9], \
+               ["200002", "20000201", 85, "Yes", "54955", 0, nccpiRules[0], 0.8], \
+               ["200002", "20000201", 85, "Yes", "k1", 1, nccpiRules[1], 0.3], \
+               ["200002", "20000202", 15, "No", "54955", 0, nccpiRules[0], 0.1], \
+               ["200004", "20000401", 90, "Yes", "54955", 0, nccpiRules[0], None]]
+
+    # Sum of major-earthy component percent (GetSumPct)
+    dPct = {"200001":[100, 100, 100], "200002":[100, 85, 85], "200003":[100, 100, 100], "200004":[100, 90, 90], "200005":[100, 100, 100]}
+
+    # ALL, COT, CORN, SOY, SG
+    dExpected["NCCPI"] = {"200001":[0.5, None, 0.6, 0.4, None], "200002":[0.8, 0.3, None, None, None], \
+                          "200004":[None, None, None, None, None]}
+
+    # Components for PWSL in comppct order: mukey, muname, comppct, compname, localphase, otherph, hydricrating, drainagecl
+    pwsl = [["300001", "Foo loam", 10, "Wet", None, None, "Unranked", "Poorly drained"], \
+            ["300001", "Foo loam", 30, "Baz", None, None, "Yes", None], \
+            ["300001", "Foo loam", 60, "Foo", None, None, "No", "Well drained"], \
+            ["300002", "Water", 90, "Water", None, None, None, None], \
+            ["300003", "Bar, ponded", 100, "Bar", None, None, "Unranked", None], \
+            ["300004", "Sandy land", 50, "Sand", None, None, "Unranked", "Well drained"], \
+            ["300004", "Sandy land", 50, "Marsh", None, None, "Yes", None], \
+            ["300005", "Lake complex", 40, "Lake water", None, None, None, None], \
+            ["300005", "Lake complex", 60, "Mud", None, None, "Yes", "Very poorly drained"], \
+            ["300006", "Upland", 100, "Dry", "eroded", None, "Unranked", "Well drained"]]
+
+    dExpected["PWSL"] = {"300001":[40], "300002":[999], "300003":[100], "300004":[50], "300005":[100]}
+
+    return {"rows":rows, "dCR":dCR, "dSOCRes":dSOCRes, "dFrags":dFrags, "interps":interps, "dPct":dPct, "pwsl":pwsl, \
+            "expected":dExpected}
+
+## ===================================================================================
+def LargeData(muCnt):
+    # Synthetic map units (CreateTestRows) with restrictions, fragments, NCCPI ratings and PWSL
+    # components. The expected values are from the original loops (RefExpected).
+    rows = gSSURGO_ValuArrays.CreateTestRows(muCnt)
+    random.seed(2)
+    dCR = dict()
+    dFrags = dict()
+
+    for r in rows:
+        if random.random() < 0.1 and not r["COKEY"] in dCR:
+            dCR[r["COKEY"]] = (random.choice([0, 10, 25, 50, 100, 140]), random.choice(["Lithic bedrock", "Fragipan", "Duripan"]))
+
+        if not r["CHKEY"] is None and random.random() < 0.5:
+            dFrags[r["CHKEY"]] = random.choice([0.0, 5.0, 15.0, 40.0, 100.0])
+
+    dSOCRes = dict([(cokey, val) for cokey, val in dCR.items() if val[1] == "Lithic bedrock"])
+
+    # One record for each component, in the row order
+    comps = list()
+    lastCokey = None
+
+    for r in rows:
+        if r["COKEY"] != lastCokey:
+            comps.append(r)
+            lastCokey = r["COKEY"]
+
+    interps = list()
+    dPct = dict()
+    rules = [["54955", 0, nccpiRules[0]], ["k1", 1, nccpiRules[1]], ["k2", 1, nccpiRules[2]], ["k3", 1, nccpiRules[3]], \
+             ["k4", 1, nccpiRules[4]], ["r1", 1, "Rating reason"]]
+
+    for r in comps:
+        mukey = r["MUKEY"]
+
+        if not mukey in dPct:
+            dPct[mukey] = [0, 0, 0]
+
+        dPct[mukey][0] += r["COMPPCT_R"]
+
+        if r["MAJCOMPFLAG"] == "Yes" and r["COMPKIND"] != "Miscellaneous area" and not r["COMPKIND"] is None:
+            dPct[mukey][2] += r["COMPPCT_R"]
+
+        for rulekey, ruleDepth, ruleName in rules:
+            if ruleDepth == 0 or random.random() < 0.8:
+                interps.append([mukey, r["COKEY"], r["COMPPCT_R"], r["MAJCOMPFLAG"], rulekey, ruleDepth, ruleName, \
+                                random.choice([round(random.random(), 3), round(random.random(), 3), None])])
+
+    random.shuffle(interps)
+
+    dMuName = dict()
+    pwsl = list()
+
+    for r in sorted(comps, key = lambda x : (x["MUKEY"], x["COMPPCT_R"])):
+        mukey = r["MUKEY"]
+
+        if not mukey in dMuName:
+            dMuName[mukey] = random.choice(["Foo loam", "Water", "Bar silt loam, ponded", "Baz complex, flooded", "Rock land"])
+
+        if r["COMPPCT_R"] > 0:
+            pwsl.append([mukey, dMuName[mukey], r["COMPPCT_R"], random.choice(["Water", "Lake water", "Swamp", "Foo", "Bar", None]), \
+                         random.choice([None, None, "ponded", "drained", "eroded"]), random.choice([None, None, "flooded", "rocky"]), \
+                         random.choice(["Yes", "No", "Unranked", "Unranked", None]), \
+                         random.choice(["Poorly drained", "Very poorly drained", "Well drained", None])])
+
+    data = {"rows":rows, "dCR":dCR, "dSOCRes":dSOCRes, "dFrags":dFrags, "interps":interps, "dPct":dPct, "pwsl":pwsl}
+    data["expected"] = RefExpected(data)
+
+    return data
+
+## ===================================================================================
+def RefNCCPI(interps, dPct):
+    # The CalcNCCPI3 query table loop. Only for the expected values.
+    dVals = dict()
+
+    for mukey, cokey, comppct, majcompflag, rulekey, ruleDepth, ruleName, fuzzyValue in interps:
+        if majcompflag != "Yes" or comppct is None:
+            continue
+
+        if not mukey in dVals:
+            dVals[mukey] = [None, None, None, None, None]
+
+        if not fuzzyValue is None:
+            if ruleDepth == 0:
+                i = 0
+
+            elif ruleName in nccpiRules[1:]:
+                i = nccpiRules.index(ruleName)
+
+            else:
+                continue
+
+            if dVals[mukey][i] is None:
+                dVals[mukey][i] = fuzzyValue * comppct
+
+            else:
+                dVals[mukey][i] = dVals[mukey][i] + (fuzzyValue * comppct)
+
+    dNCCPI = dict()
+
+    for mukey, vals in dVals.items():
+        try:
+            sumPct = dPct[mukey][2]
+            dNCCPI[mukey] = [None if val is None else round(val / sumPct, 3) for val in vals]
+
+        except:
+            pass
+
+    return dNCCPI
+
+## ===================================================================================
+def RefPWSL(pwsl):
+    # The CalcPWSL query table loop. Only for the expected values.
+    dMu = dict()
+    drainList = ["Poorly drained", "Very poorly drained"]
+    phaseList = ["drained", "undrained", "channeled", "protected", "ponded", "flooded"]
+
+    for mukey, muname, comppct_r, compname, localphase, otherph, hydricrating, drainagecl in pwsl:
+        if ( muname == "Water" or str(compname) == "Water" or (str(compname).lower().find(" water") >= 0) or (str(compname).lower().find(" ocean") >= 0)  or (str(compname).find(" swamp") >= 0) or str(compname) == "Swamp" ) :
+            if comppct_r >= 80:
+                dMu[mukey] = 999
+
+            else:
+                try:
+                    sumPct = dMu[mukey]
+
+                    if sumPct != 999:
+                        dMu[mukey] = sumPct + comppct_r
+
+                except:
+                    dMu[mukey] = comppct_r
+
+        elif hydricrating == 'No':
+            pass
+
+        elif hydricrating == 'Yes':
+            try:
+                sumPct = dMu[mukey]
+
+                if sumPct != 999:
+                    dMu[mukey] = sumPct + comppct_r
+
+            except:
+                dMu[mukey] = comppct_r
+
+        elif hydricrating == 'Unranked':
+            if [d for d in phaseList if str(localphase).lower().find(d) >= 0] or \
+               [d for d in phaseList if str(otherph).lower().find(d) >= 0] or \
+               [d for d in phaseList if muname.find(d) >= 0] or \
+               str(drainagecl) in drainList:
+                try:
+                    sumPct = dMu[mukey]
+                    dMu[mukey] = sumPct + comppct_r
+
+                except:
+                    dMu[mukey] = comppct_r
+
+    return dMu
+
+## ===================================================================================
+def RefExpected(data):
+    # Expected stage values from the original loops
+    rows = data["rows"]
+    dExpected = dict()
+    dExpected["CheckTexture"] = dict()
+    dExpected["CheckBulkDensity"] = dict()
+
+    for r in rows:
+        if not r["CHKEY"] is None:
+            dExpected["CheckTexture"][r["CHKEY"]] = [int(gSSURGO_ValuArrays.RefCheckTexture(r["DESGNMASTER"], r["TEXTURE"], r["LIEUTEX"], r["TAXORDER"], r["TAXSUBGRP"]))]
+            dExpected["CheckBulkDensity"][r["CHKEY"]] = [int(gSSURGO_ValuArrays.RefCheckBulkDensity(r["SANDTOTAL_R"], r["SILTTOTAL_R"], r["CLAYTOTAL_R"], r["DBTHIRDBAR_R"]))]
+
+    dRZ = gSSURGO_ValuArrays.RefRootZoneDepth(rows, data["dCR"], 150.0)
+    dExpected["RootZoneDepth"] = dict([(cokey, [val[4], gSSURGO_ValuArrays.RestrictionText(val[5])]) for cokey, val in dRZ.items()])
+    dRZAWS = gSSURGO_ValuArrays.RefRootZoneAWS(rows, dRZ, 150.0)
+    dExpected["RootZoneAWS"] = dict([(cokey, val[0:2]) for cokey, val in dRZAWS.items()])
+
+    for stage, dRes, dFrags, bSOC in [["AWSRanges", dict(), dict(), False], ["SOCRanges", data["dSOCRes"], data["dFrags"], True]]:
+        dRanges = gSSURGO_ValuArrays.RefRanges(rows, depthList, dRes, 999.0, dFrags, bSOC)
+        dExpected[stage] = dict([(cokey + ":" + str(i), val) for (cokey, i), val in dRanges.items()])
+
+    dExpected["NCCPI"] = RefNCCPI(data["interps"], data["dPct"])
+    dExpected["PWSL"] = dict([(mukey, [val]) for mukey, val in RefPWSL(data["pwsl"]).items()])
+
+    return dExpected
+
+## ===================================================================================
+def RangeValues(dHz, thick, vals, bPresent):
+    # Depth range arrays as {cokey:range number:[thickness, value]}
+    dRanges = dict()
+
+    for c, i in zip(*np.nonzero(bPresent)):
+        dRanges[dHz["coKeys"][c] + ":" + str(i)] = [thick[c, i].item(), vals[c, i].item()]
+
+    return dRanges
+
+## ===================================================================================
+def RowValues(dHz, bRows):
+    # Horizon test for each row as {chkey:[0 or 1]}
+    chkeys = dHz["text"]["CHKEY"][1]
+    codes = dHz["CHKEY"]
+    dRows = dict()
+
+    for r in range(len(codes)):
+        if not chkeys[codes[r]] is None:
+            dRows[chkeys[codes[r]]] = [int(bRows[r])]
+
+    return dRows
+
+## ===================================================================================
+def InterpStage(interps, dPct):
+    # CalcInterps for the NCCPI records: output column for each rule key, weighted sums and values
+    muList = sorted(set(dPct.keys()) | set([rec[0] for rec in interps]))
+    dMuRow = dict([(mukey, i) for i, mukey in enumerate(muList)])
+    dRuleCol = dict()
+    muRows = array.array("l")
+    colRows = array.array("l")
+    weighted = array.array("d")
+    bRated = np.zeros(len(muList), dtype=bool)
+
+    for mukey, cokey, comppct, majcompflag, rulekey, ruleDepth, ruleName, fuzzyValue in interps:
+        if majcompflag != "Yes" or comppct is None:
+            continue
+
+        muRow = dMuRow[mukey]
+        bRated[muRow] = True
+
+        if fuzzyValue is None:
+            continue
+
+        if not rulekey in dRuleCol:
+            if ruleDepth == 0:
+                dRuleCol[rulekey] = 0
+
+            elif ruleName in nccpiRules[1:]:
+                dRuleCol[rulekey] = nccpiRules.index(ruleName)
+
+            else:
+                dRuleCol[rulekey] = -1
+
+        col = dRuleCol[rulekey]
+
+        if col >= 0:
+            muRows.append(muRow)
+            colRows.append(col)
+            weighted.append(fuzzyValue * comppct)
+
+    sums, bValue = gSSURGO_ValuArrays.InterpSums(muRows, colRows, weighted, len(muList), len(nccpiRules))
+    dNCCPI = dict()
+
+    for mukey in muList:
+        i = dMuRow[mukey]
+
+        if bRated[i]:
+            try:
+                dNCCPI[mukey] = gSSURGO_ValuArrays.InterpValues(sums, bValue, i, dPct[mukey][2])
+
+            except:
+                pass
+
+    return dNCCPI
+
+## ===================================================================================
+def RunStages(data):
+    # Run each stage on the dataset. Returns the stage values and [stage, seconds, memMB, peakMB] for each.
+    dResults = dict()
+    timings = list()
+    dHz = [None]
+    dRZ = [None]
+
+    def Stage(name, func):
+        mem = gSSURGO_Profile.MemoryUsage()
+        t0 = time.time()
+        result = func()
+        seconds = time.time() - t0
+        mem2 = gSSURGO_Profile.MemoryUsage()
+        timings.append([name, seconds, mem2[0] - mem[0], mem2[1]])
+
+        if not result is None:
+            dResults[name] = result
+
+    def Arrays():
+        dHz[0] = gSSURGO_ValuArrays.TestArrays(data["rows"])
+
+    def RootZoneDepth():
+        dRZ[0] = gSSURGO_ValuArrays.RootZoneDepth(dHz[0], data["dCR"], 150.0)
+        return dict([(cokey, [val[4], gSSURGO_ValuArrays.RestrictionText(val[5])]) for cokey, val in dRZ[0].items()])
+
+    def RootZoneAWS():
+        dRZAWS = gSSURGO_ValuArrays.RootZoneAWS(dHz[0], dRZ[0], 150.0)
+        return dict([(cokey, val[0:2]) for cokey, val in dRZAWS.items()])
+
+    def AWSRanges():
+        return RangeValues(dHz[0], *gSSURGO_ValuArrays.AWSRanges(dHz[0], depthList))
+
+    def SOCRanges():
+        fragvol = gSSURGO_ValuArrays.FragmentVolume(dHz[0], data["dFrags"])
+        return RangeValues(dHz[0], *gSSURGO_ValuArrays.SOCRanges(dHz[0], depthList, data["dSOCRes"], 999.0, fragvol))
+
+    def PWSL():
+        dPWSL = dict()
+
+        for mukey, muname, comppct, compname, localphase, otherph, hydricrating, drainagecl in data["pwsl"]:
+            gSSURGO_ValuArrays.PWSLComponent(dPWSL, mukey, muname, comppct, compname, localphase, otherph, hydricrating, drainagecl)
+
+        return dict([(mukey, [val]) for mukey, val in dPWSL.items()])
+
+    Stage("HorizonArrays", Arrays)
+    Stage("CheckTexture", lambda : RowValues(dHz[0], gSSURGO_ValuArrays.OrganicHorizons(dHz[0])))
+    Stage("CheckBulkDensity", lambda : RowValues(dHz[0], gSSURGO_ValuArrays.DenseLayers(dHz[0])))
+    Stage("RootZoneDepth", RootZoneDepth)
+    Stage("RootZoneAWS", RootZoneAWS)
+    Stage("AWSRanges", AWSRanges)
+    Stage("SOCRanges", SOCRanges)
+    Stage("NCCPI", lambda : InterpStage(data["interps"], data["dPct"]))
+    Stage("PWSL", PWSL)
+
+    return dResults, timings
+
+## ===================================================================================
+def Compare(stage, dResult, dExpected, tol):
+    # Number of keys that are missing, extra or have a value that differs from the expected one.
+    # Numbers match within tol x the larger of 1 and the expected value. Text and nulls must be the same.
+    # The first few differences are listed.
+    diffList = list()
+
+    for key in sorted(set(dResult) | set(dExpected)):
+        if not key in dExpected:
+            diffList.append(key + " not expected: " + str(dResult[key]))
+            continue
+
+        if not key in dResult:
+            diffList.append(key + " missing, expected " + str(dExpected[key]))
+            continue
+
+        vals = dResult[key]
+        expected = dExpected[key]
+
+        for val, exp in zip(vals, expected):
+            if isinstance(val, (int, long, float)) and isinstance(exp, (int, long, float)):
+                bSame = abs(val - exp) <= tol * max(1.0, abs(exp))
+
+            else:
+                bSame = val == exp
+
+            if not bSame or len(vals) != len(expected):
+                diffList.append(key + ": " + str(vals) + " expected " + str(expected))
+                break
+
+    for diff in diffList[0:5]:
+        print "\t" + stage + "  " + diff
+
+    return len(diffList)
+
+## ===================================================================================
+def RunHarness(size, muCnt, goldenFile=None, saveFile=None):
+    # Run the stages on the small or large dataset and compare them with the expected values
+    # and the golden file. Returns the number of differences.
+    t0 = time.time()
+
+    if size == "small":
+        data = KnownData()
+
+    else:
+        data = LargeData(muCnt)
+
+    print "%s dataset: %d horizon rows, %d NCCPI ratings, %d PWSL components (%.2fs)" % \
+          (size.title(), len(data["rows"]), len(data["interps"]), len(data["pwsl"]), time.time() - t0)
+
+    dResults, timings = RunStages(data)
+    dGolden = dict()
+
+    if not goldenFile is None:
+        with open(goldenFile, "r") as f:
+            dGolden = json.load(f)["stages"]
+
+    diffCnt = 0
+    print "%-18s %10s %10s %10s %10s %12s" % ("Stage", "Seconds", "MemMB", "PeakMB", "Values", "Differences")
+
+    for stage, seconds, memMB, peakMB in timings:
+        cnt = 0
+
+        if stage in dResults:
+            tol = dTolerance.get(stage, 0.0)
+            cnt = Compare(stage, dResults[stage], data["expected"][stage], tol)
+
+            if stage in dGolden:
+                cnt += Compare(stage + " (golden)", dResults[stage], dGolden[stage], tol)
+
+        diffCnt += cnt
+        print "%-18s %10.3f %10.1f %10.1f %10s %12d" % (stage, seconds, memMB, peakMB, (str(len(dResults[stage])) if stage in dResults else ""), cnt)
+
+    if not saveFile is None:
+        with open(saveFile, "w") as f:
+            json.dump({"created":time.strftime("%Y-%m-%d %H:%M:%S"), "dataset":size, "mapunits":muCnt, "stages":dResults}, f)
+
+        print "Stage values saved to " + saveFile
+
+    print ("FAILED: " + str(diffCnt) + " differences") if diffCnt > 0 else "PASSED"
+
+    return diffCnt
+
+## ===================================================================================
+def RunValuTable(inputDB, goldenFile=None, saveFile=None):
+    # Create the Valu1 table for a gSSURGO database with each Calc, Create and Get function of
+    # gSSURGO_ValuTable timed, and compare the table with the golden file. Needs arcpy.
+    # Returns the number of differences.
+    import gSSURGO_ValuTable
+
+    traceFile = os.path.join(tempfile.gettempdir(), "ValuHarness_" + os.path.basename(inputDB)[:-4] + ".json")
+    gSSURGO_Profile.Enable(traceFile)
+    gSSURGO_ValuTable.bIncremental = False
+    gSSURGO_Profile.TimeFunctions(vars(gSSURGO_ValuTable), ["CreateValuTable", "LimitIO"], ["Calc", "Create", "Get"])
+
+    if gSSURGO_ValuTable.CreateValuTable(inputDB) == False:
+        print "FAILED: could not create the Valu1 table for " + inputDB
+        return 1
+
+    # Stage spans from the trace
+    with open(traceFile, "r") as f:
+        dTrace = json.load(f)
+
+    print "%-28s %10s %10s %10s %10s" % ("Stage", "Seconds", "MemMB", "PeakMB", "Rows")
+    spans = [[0, span] for span in dTrace["spans"]]
+
+    while len(spans) > 0:
+        level, span = spans.pop(0)
+        print "%-28s %10.3f %10.1f %10.1f %10s" % ((level * "  ") + span["name"], span["seconds"], span["memMB"], span["peakMB"], \
+              ("" if span["rows"] is None else str(span["rows"])))
+        spans = [[level + 1, child] for child in span["spans"]] + spans
+
+    # Valu1 table values by mukey
+    valuTable = os.path.join(inputDB, "Valu1")
+    fldList = [fld.name for fld in arcpy.ListFields(valuTable) if not fld.type in ["OID", "Geometry"]]
+    mukeyIndx = [fld.upper() for fld in fldList].index("MUKEY")
+    dValu = dict()
+
+    with arcpy.da.SearchCursor(valuTable, fldList) as cur:
+        for rec in cur:
+            dValu[rec[mukeyIndx]] = [val for i, val in enumerate(rec) if i != mukeyIndx]
+
+    diffCnt = 0
+
+    if not goldenFile is None:
+        with open(goldenFile, "r") as f:
+            dGolden = json.load(f)["stages"]
+
+        diffCnt = Compare("Valu1", dValu, dGolden["Valu1"], dTolerance["Valu1"])
+        print "Valu1 %d map units, %d differences" % (len(dValu), diffCnt)
+
+    if not saveFile is None:
+        with open(saveFile, "w") as f:
+            json.dump({"created":time.strftime("%Y-%m-%d %H:%M:%S"), "database":inputDB, "fields":[fld for i, fld in enumerate(fldList) if i != mukeyIndx], \
+                       "stages":{"Valu1":dValu}}, f)
+
+        print "Valu1 values saved to " + saveFile
+
+    print ("FAILED: " + str(diffCnt) + " differences") if diffCnt > 0 else "PASSED"
+
+    return diffCnt
+
+## ===================================================================================
+## MAIN
+## ===================================================================================
+
+# Import system modules
+import sys, os, time, random, traceback, json, array, tempfile
+import numpy as np
+import gSSURGO_ValuArrays, gSSURGO_Profile
+
+try:
+    import arcpy
+
+except ImportError:
+    # arcpy is only needed for --valu. The synthetic datasets run without it.
+    arcpy = None
+
+# Depth ranges of the Valu1 AWS and SOC fields
+depthList = [(0,5), (5, 20), (20, 50), (50, 100), (100, 150), (150, 999), (0, 20), (0, 30), (0, 100), (0, 150), (0, 999)]
+
+# NCCPI version 3 rules in Valu1 column order (ALL, COT, CORN, SOY, SG). The overall index is ruledepth 0.
+nccpiRules = ["NCCPI - National Commodity Crop Productivity Index (Ver 3.0)", "NCCPI - NCCPI Cotton Submodel (II)", \
+              "NCCPI - NCCPI Corn Submodel (I)", "NCCPI - NCCPI Soybeans Submodel (I)", "NCCPI - NCCPI Small Grains Submodel (II)"]
+
+# Tolerance for each stage, relative to the expected value (or absolute below 1). The horizon tests,
+# restriction depths, NCCPI (rounded to 3 places) and PWSL must be the same.
+dTolerance = {"CheckTexture":0.0, "CheckBulkDensity":0.0, "RootZoneDepth":0.0, "RootZoneAWS":1e-9, "AWSRanges":1e-9, \
+              "SOCRanges":1e-9, "NCCPI":0.0, "PWSL":0.0, "Valu1":1e-6}
+
+if __name__ == "__main__":
+    # Standalone harness
+    size = "small"
+    muCnt = 20000
+    goldenFile = None
+    saveFile = None
+    inputDB = None
+    args = sys.argv[1:]
+
+    while len(args) > 0:
+        arg = args.pop(0)
+
+        if arg == "--golden":
+            goldenFile = args.pop(0)
+
+        elif arg == "--save":
+            saveFile = args.pop(0)
+
+        elif arg == "--valu":
+            inputDB = args.pop(0)
+
+        elif arg in ["small", "large"]:
+            size = arg
+
+        else:
+            muCnt = int(arg)
+
+    if not inputDB is None:
+        if arcpy is None:
+            print "--valu needs arcpy"
+            sys.exit(1)
+
+        diffCnt = RunValuTable(inputDB, goldenFile, saveFile)
+
+    else:
+        diffCnt = RunHarness(size, muCnt, goldenFile, saveFile)
+
+    sys.exit(1 if diffCnt > 0 else 0)
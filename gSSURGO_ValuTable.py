@@ -145,6 +145,10 @@ def CreateQueryTables(inputDB, outputDB, maxD):
                 dMu[mukey] = rec
                 muList.append(mukey)
 
+        if not incrementalKeys is None:
+            # Only the map units being updated (FindChangedMapunits)
+            muList = [mukey for mukey in muList if mukey in incrementalKeys]
+
         muList.sort()
 
         del muTbl
@@ -343,6 +347,9 @@ def CreateQueryTables(inputDB, outputDB, maxD):
 
         if arcpy.Exists(os.path.join(outputDB, "QueryTable_HZ")):
             arcpy.Delete_management(os.path.join(outputDB, "QueryTable_HZ"))
+
+        # Horizon arrays read from the previous table
+        gSSURGO_ValuArrays.Release(outputTable)
         
         arcpy.MakeQueryTable_management(['mapunit', 'component', 'chorizon'], queryTemp, "USE_KEY_FIELDS", "#", fldAll, whereClause)
         arcpy.CreateTable_management(outputDB, "QueryTable_HZ", queryTemp)
@@ -553,7 +560,7 @@ def CreateQueryTables(inputDB, outputDB, maxD):
         return False
 
 ## ===================================================================================
-def CreateOutputTableMu(theMuTable, depthList, dPct):
+def CreateOutputTableMu(inputDB, theMuTable, depthList, dPct):
     # Create the mapunit level table
     #
     try:
@@ -660,10 +667,14 @@ def CreateOutputTableMu(theMuTable, depthList, dPct):
 
         # Reading from the original mapunit table, populate the output Valu1 table with mukey and musumpct
         #PrintMsg(" \n\tPopulating " + theMuTable + " with mukey values", 1)
-        with arcpy.da.SearchCursor(os.path.join(outputDB, "mapunit"), ["mukey"]) as incur:
+        with arcpy.da.SearchCursor(os.path.join(inputDB, "mapunit"), ["mukey"]) as incur:
             outcur = arcpy.da.InsertCursor(theMuTable, ["mukey", "musumcpct"])
             for inrec in incur:
                 mukey = inrec[0]
+
+                if not (incrementalKeys is None or mukey in incrementalKeys):
+                    continue
+
                 try:
                     sumPct = dPct[mukey][0]
 
@@ -1012,137 +1023,16 @@ def CalcRZDepth(inputDB, outputDB, theCompTable, theMuTable, maxD, dPct, dCR):
         # Save these new restriction values to dComp dictionary
         #
         # Only process major-earthy components...
-        whereClause = "component.compkind <> 'Miscellaneous area' and component.compkind is not Null and component.majcompflag = 'Yes'"
-
-        sqlClause = (None, "ORDER BY mukey, comppct_r DESC, cokey, hzdept_r ASC")
-        curFlds = ["mukey", "cokey", "compname", "compkind", "localphase", "comppct_r", "taxorder", "taxsubgrp", "hzname", "desgnmaster", "hzdept_r", "hzdepb_r", "sandtotal_r", "silttotal_r", "claytotal_r", "om_r", "dbthirdbar_r", "ph1to1h2o_r", "ec_r", "awc_r", "texture", "lieutex"]
-        resList = ['Lithic bedrock','Paralithic bedrock','Densic bedrock', 'Fragipan', 'Duripan', 'Sulfuric']
-
-        lastCokey = "xxxx"
-        lastMukey = 'xxxx'
-
-        # Display status of processing input table containing horizon data and component restrictions
-        inCnt = int(arcpy.GetCount_management(queryTbl).getOutput(0))
-
-        if inCnt > 0:
-            arcpy.SetProgressor ("step", "Processing input table...", 0, inCnt, 1)
-
-        else:
-            raise MyError, "Input table contains no data"
-
-        with arcpy.da.SearchCursor(queryTbl, curFlds, where_clause=whereClause, sql_clause=sqlClause) as cur:
-            # Reading horizon-level data
-            for rec in cur:
-
-                # ********************************************************
-                #
-                # Read QueryTable_HZ record
-                mukey, cokey, compName, compKind, localPhase, compPct, taxorder, taxsubgrp, hzname, desgnmaster, hzDept, hzDepb, sand, silt, clay, om, bd, pH, ec, awc, texture, lieutex = rec
-
-                # Initialize component restriction depth to maxD
-                dComp2[cokey] = [mukey, compName, localPhase, compPct, maxD, ""]
-
-                if lastCokey != cokey:
-                    # Accumulate a list of components for future use
-                    lastCokey = cokey
-                    coList.append(cokey)
-
-                if hzDept < maxD:
-                    # ********************************************************
-                    # For horizons above the floor level (maxD), look for other restrictive
-                    # layers based on horizon properties such as pH, EC and bulk density.
-                    # Start with the top horizons and work down.
-
-                    # initialize list of restrictions
-                    resKind = ""
-                    restriction = list()
-
-                    bOrganic = CheckTexture(mukey, cokey, desgnmaster, om, texture, lieutex, taxorder, taxsubgrp)
-
-                    if not bOrganic:
-                        # calculate alternate dense layer per Dobos
-                        bDense = CheckBulkDensity(sand, silt, clay, bd, mukey, cokey)
-
-                        if bDense:
-                            # use horizon top depth for the dense layer
-                            restriction.append("Dense")
-                            resDept = hzDept
-
-                        # Not sure whether these horizon property checks should be skipped for Organic
-                        # Bob said to only skip Dense Layer check, but VALU table RZAWS looks like all
-                        # horizon properties were skipped.
-                        #
-                        # If we decide to skip EC and pH horizon checks for histosols/histic, use this query
-                        # Example Pongo muck in North Carolina that have low pH but no other restriction
-                        #
-                        if str(taxorder) != 'Histosols' and str(taxsubgrp).lower().find('histic') == -1:
-                            # Only non histosols/histic soils will be checked for pH or EC restrictive horizons
-                            if pH <= 3.5 and pH is not None:
-                                restriction.append("pH")
-                                resDept = hzDept
-                                #if mukey == tmukey:
-                                #    PrintMsg("\tpH restriction at " + str(resDept) + "cm", 1)
-
-                        if ec >= 16.0 and ec is not None:
-                            # Originally I understood that EC > 12 is a restriction, but Bob says he is
-                            # now using 16.
-                            restriction.append("EC")
-                            resDept = hzDept
-                            #if mukey == tmukey:
-                            #    PrintMsg("\tEC restriction at " + str(resDept) + "cm", 1)
-
-                        #if bd >= 1.8:
-                        #    restriction.append("BD")
-                        #    resDept = hzDept
-
-                        #if awc is None:
-                        #    restriction.append("AWC")
-                        #    resDept = hzDept
-
-                    # ********************************************************
-                    #
-                    # Finally, check for one of the standard component restrictions
-                    #
-                    if cokey in dCR:
-                        resDepth2, resKind = dCR[cokey]
-
-                        if hzDept <= resDepth2 < hzDepb:
-                            # This restriction may not be at the top of the horizon, thus we
-                            # need to override this if one of the other restrictions exists for this
-                            # horizon
-
-                            if len(restriction) == 0:
-                                # If this is the only restriction, set the restriction depth
-                                # to the value from the corestriction table.
-                                resDept = resDepth2
-
-                            # Adding this restriction name to the list even if there are others
-                            # May want to take this out later
-                            restriction.append(resKind)
-
-                    # ********************************************************
-                    #
-                    if len(restriction) > 0:
-                        # Found at least one restriction for this horizon
-
-                        if not cokey in dComp:
-                            # if there are no higher restrictions for this component, save this one
-                            # to the dComp dictionary as the top-most restriction
-                            #
-                            dComp[cokey] = [mukey, compName, localPhase, compPct, resDept, restriction]
-
-                arcpy.SetProgressorPosition()
-
-        arcpy.ResetProgressor()
-
-        # Load restrictions from dComp into dComp2 so that there is complete information for all components
+        #
+        # The horizon checks (CheckTexture, CheckBulkDensity, pH, EC and the component restrictions) are
+        # done on arrays for every horizon at once (gSSURGO_ValuArrays.RootZoneDepth). The top-most
+        # restriction of each component is the same one the sorted horizon cursor found first.
+        dHz = gSSURGO_ValuArrays.ReadHorizons(queryTbl)
 
-        for cokey in dComp2:
-            try:
-                dComp2[cokey] = dComp[cokey]
+        if dHz is None:
+            raise MyError, "Unable to read horizon data from " + queryTbl
 
-            except:
-                pass
+        dComp2 = gSSURGO_ValuArrays.RootZoneDepth(dHz, dCR, maxD)
 
         # Return the dictionary containing restriction depths and the dictionary containing defaults
         return dComp2
@@ -1220,9 +1110,6 @@ def CalcRZAWS(inputDB, outputDB, td, bd, theCompTable, theMuTable, dRestrictions
 
         PrintMsg(" \n\tCalculating Root Zone AWS for " + str(td) + " to " + str(bd) + "cm...", 0)
 
-        # QueryTable_HZ fields
-        qFieldNames = ["mukey", "cokey", "comppct_r",  "compname", "localphase", "majcompflag", "compkind", "taxorder", "taxsubgrp", "desgnmaster", "om_r", "awc_r", "hzdept_r", "hzdepb_r", "texture", "lieutex"]
-
         #arcpy.SetProgressorLabel("Creating output tables using dominant component...")
         #arcpy.SetProgressor("step", "Calculating root zone available water supply..." , 0, numRows, 1)
 
@@ -1241,151 +1128,23 @@ def CalcRZAWS(inputDB, outputDB, td, bd, theCompTable, theMuTable, dRestrictions
             coFieldNames = ["mukey", "cokey", "compname", "localphase", "comppct_r", "pctearthmc", "rootznemc", "rootznaws", "restriction"]
             coCursor = arcpy.da.UpdateCursor(theCompTable, coFieldNames)
 
-            # Process query table using cursor, write out horizon data for each major component
-            sqlClause = [None, "order by mukey, comppct_r DESC, cokey, hzdept_r ASC"]
-            iCnt = int(arcpy.GetCount_management(queryTbl).getOutput(0))
-
             # For root zone calculations, we only want earthy, major components
-            #PrintMsg(" \nFiltering components in Query_HZ for CalcRZAWS1 function", 1)
             #
-            # Major-Earthy Components
-            #hzSQL = "component.compkind <> 'Miscellaneous area' and component.compkind is not NULL and component.majcompflag = 'Yes'"
-            # All Components
-
-            inCur = arcpy.da.SearchCursor(queryTbl, qFieldNames, sql_clause=sqlClause)
-
-            arcpy.SetProgressor("step", "Reading query table...",  0, iCnt, 1)
-
-            # Create dictionaries to handle the mapunit and component summaries
-            dMu = dict()
-            dComp = dict()
-
-            # I may have to pull the sum of component percentages out of this function?
-            # It seems to work OK for the earthy-major components, but will not work for
-            # the standard AWS calculations. Those 'Miscellaneous area' components with no horizon data
+            # Horizon thickness and AWS above the restriction are summed for each component by
+            # gSSURGO_ValuArrays.RootZoneAWS. Organic surface horizons are skipped; an organic horizon
+            # below the first mineral horizon is used (buried).
+            #
+            # Those 'Miscellaneous area' components with no horizon data
             # are excluded from the Query table because it does not support Outer Joins.
             #
-            mCnt = 0
-            #PrintMsg("\tmukey, cokey, comppct, top, bottom, resdepth, thickness, aws", 0)
-
-            # TEST: keep list of cokeys as a way to track the top organic horizons
-            skipList = list()
-
-            for rec in inCur:
-                # read each horizon-level input record from QueryTable_HZ ...
-                #
-                mukey, cokey, compPct, compName, localPhase, mjrFlag, cKind, taxorder, taxsubgrp, desgnmaster, om, awc, top, bot, texture, lieutex = rec
-
-                if mjrFlag == "Yes" and cKind != "Miscellaneous area" and cKind is not None:
-
-                    # For major-earthy components
-                    # Get restriction information from dictionary
-
-                    # For non-Miscellaneous areas with no horizon data, set hzdepth values to zero so that
-                    # PWSL and Droughty will get populated with zeros instead of NULL.
-                    if top is None and bot is None:
-
-                        if not cokey in dComp:
-                            dComp[cokey] = mukey, compName, localPhase, compPct, 0, 0, ""
-
-                    try:
-                        # mukey, compName, localPhase, compPct, resDept, restriction
-                        # rDepth is the component restriction depth or calculated horizon restriction from CalcRZDepth1 function
-
-                        # mukey, compName, localPhase, compPct, resDept, restriction] = dRestrictions
-                        d1, d2, d3, d4, rDepth, restriction = dRestrictions[cokey]
-                        cBot = min(rDepth, bot, maxD)  # 01-05-2015 Added maxD because I found 46 CONUS mapunits with a ROOTZNEMC > 150
-
-                        #if mukey == tmukey and rDepth != 150:
-                        #    PrintMsg("\tRestriction, " + str(mukey) + ", " + str(cokey) + ", " + str(rDepth) + ", " + str(restriction), 1)
-
-                    except:
-                        #errorMsg()
-                        cBot = min(maxD, bot)
-                        restriction = []
-                        rDepth = maxD
-
-                        #if mukey == tmukey:
-                        #    PrintMsg("RestrictionError, " + str(mukey) + ", " + str(cokey) + ", " + str(rDepth) + ", " + str(restriction), 1)
-
-                    bOrganic = CheckTexture(mukey, cokey, desgnmaster, om, texture, lieutex, taxorder, taxsubgrp)
-
-                    #if mukey == tmukey and bOrganic:
-                    #    PrintMsg("Organic: " + str(mukey) + ", " + str(cokey) )
-
-
-                    # fix awc_r to 2 decimal places
-                    if awc is None:
-                        awc = 0.0
-
-                    else:
-                        awc = round(awc, 2)
-
-                    # Reasons for skipping RZ calculations on a horizon:
-                    #   1. Desgnmaster = O, L and Taxorder != Histosol and is at the surface
-                    #   2. Do I need to convert null awc values to zero?
-                    #   3. Below component restriction or horizon restriction level
-
-                    if bOrganic and not cokey in skipList:
-                        # Organic surface horizon - Not using this horizon in the calculations
-                        useHz = False
-
-                        #if mukey == tmukey:
-                        #    PrintMsg("Organic, " + str(mukey) + ", " + str(cokey) + ", " + str(compPct) + ", " + str(desgnmaster) + ", " + taxorder  + ", " + str(top) + ", " + str(bot) + ", " + str(cBot)  + ", " + str(awc) + ", " + str(useHz), 1)
-
-                    else:
-                        # Mineral, Histosol, buried Organic, Bedrock or there is a horizon restriction (EC, pH - Using this horizon in the calculations
-                        useHz = True
-                        skipList.append(cokey)
-
-                        # Looking for problems
-                        #if mukey == tmukey:
-                        #    PrintMsg("Mineral, " + str(mukey) + ", " + str(cokey)  + ", " + str(compPct) + ", " + str(desgnmaster) + ", " + str(taxorder) + ", " + str(top) + ", " + str(bot) + ", " + str(cBot) + ", " + str(awc)  + ", " + str(useHz), 1)
-
-                        # Attempt to fix component with a surface-level restriction that might be in an urban soil
-                        if not cokey in dComp and cBot == 0:
-                            dComp[cokey] = mukey, compName, localPhase, compPct, 0, 0, restriction
-
-                            # Looking for problems
-                            #if mukey == tmukey:
-                            #    PrintMsg("MUKEY2: " + str(mukey) + ", " + str(top) + ", " + str(bot) + ", " + str(cBot) + ", " + str(useHz), 1)
-
-                    if top < cBot and useHz == True:
-                        # If the top depth is less than the bottom depth, proceed with the calculation
-                        # Calculate sum of horizon thickness and sum of component ratings for all horizons above bottom
-                        hzT = cBot - top
-                        aws = float(hzT) * float(awc) * 10.0
-
-                        # Looking for problems
-                        #if mukey == tmukey:
-                        #    PrintMsg("MUKEY3: " + str(mukey) + ", " + str(top) + ", " + str(bot) + ", " + str(cBot) + ", " + str(useHz), 1)
-
-
-                        if cokey in dComp:
-                            # accumulate total thickness and total rating value by adding to existing component values
-                            mukey, compName, localPhase, compPct, dHzT, dAWS, restriction = dComp[cokey]
-                            dAWS = dAWS + aws
-                            dHzT += hzT
-
-                            dComp[cokey] = mukey, compName, localPhase, compPct, dHzT, dAWS, restriction
-
-                        else:
-                            # Create initial entry for this component using the first horizon
-                            dComp[cokey] = mukey, compName, localPhase, compPct, hzT, aws, restriction
-
-                    else:
-                        # Do not include this horizon in the rootzone calculations
-                        pass
-
-                else:
-                    # Not a major-earthy component, so write out everything BUT rzaws-related data (last values)
-                    dComp[cokey] = mukey, compName, localPhase, compPct, None, None, None, None
-
-                arcpy.SetProgressorPosition()
+            dMu = dict()
+            dHz = gSSURGO_ValuArrays.ReadHorizons(queryTbl)
 
-                # end of processing major-earthy components
+            if dHz is None:
+                raise MyError, "Unable to read horizon data from " + queryTbl
 
-            arcpy.ResetProgressor()
+            # dComp[cokey] = [hzT, aws, restriction]
+            dComp = gSSURGO_ValuArrays.RootZoneAWS(dHz, dRestrictions, maxD)
 
             # get the total number of major-earthy components from the dictionary count
             iComp = len(dComp)
@@ -1405,7 +1164,7 @@ def CalcRZAWS(inputDB, outputDB, td, bd, theCompTable, theMuTable, dRestrictions
                         pctearthmc = float(dPct[mukey][1])   # sum of comppct_r for all major components Test 2014-10-07
 
                         # get rootzone data from dComp
-                        mukey1, compName1, localPhase1, compPct1, hzT, awc, restriction = dComp[cokey]
+                        hzT, awc, restriction = dComp[cokey]
 
                     except:
                         pctearthmc = 0
@@ -1539,175 +1298,146 @@ def CalcAWS(inputDB, outputDB, theCompTable, theMuTable, dPct, depthList):
     # add it to the map unit-level table.
     #
     # 12-08 I see that for mukey='2479901' my rating is
+    #
+    # The horizon table is read once for all of the depth ranges. Each component gets a list of
+    # thickness and AWS sums with one item per range, and the component and map unit tables are
+    # each updated in one pass with every AWS and TK column.
 
     try:
         # Using the same component horizon table that has been
         queryTbl = os.path.join(outputDB, "QueryTable_HZ")
-        numRows = int(arcpy.GetCount_management(queryTbl).getOutput(0))
-
-        # mukey, cokey, compPct,val, top, bot
-        qFieldNames = ["mukey", "cokey", "comppct_r", "awc_r", "hzdept_r", "hzdepb_r"]
 
         # Track map units that are missing data
         missingList = list()
-        minusList = list()
 
         PrintMsg(" \n\tCalculating standard available water supply for:", 0)
 
-        for rng in depthList:
-            # Calculating and updating just one AWS column at a time
-            #
-            td = rng[0]
-            bd = rng[1]
-            #outputFields = "AWS" + str(td) + "_" + str(bd), "TK" + str(td) + "_" + str(bd) + "A"
-
-            # Open output table Mu...All in write mode
-            muFieldNames = ["MUKEY", "MUSUMCPCTA", "AWS" + str(td) + "_" + str(bd), "TK" + str(td) + "_" + str(bd) + "A"]
-            coFieldNames = ["COKEY", "AWS" + str(td) + "_" + str(bd), "TK" + str(td) + "_" + str(bd) + "A"]
-
-            # Create dictionaries to handle the mapunit and component summaries
-            dMu = dict()
-            dComp = dict()
-            dSum = dict()     # store sum of comppct_r and total thickness for the component
-            dHz = dict()      # Trying a new dictionary that will s
-
-
-            arcpy.SetProgressorLabel("Creating output tables using dominant component...")
-            arcpy.SetProgressor("step", "Aggregating data for the dominant component..." , 0, numRows, 1)
-
-            # Open edit session on geodatabase to allow multiple insert cursors
-            with arcpy.da.Editor(inputDB) as edit:
-
-                # Open output mapunit-level table in update mode
-                # MUKEY, AWS
-                muCursor = arcpy.da.UpdateCursor(theMuTable, muFieldNames)
-
-                # Open output component-level table in write mode
-                # MUKEY, AWS
-                coCursor = arcpy.da.UpdateCursor(theCompTable, coFieldNames)
+        rngCnt = len(depthList)
+        awsFields = ["AWS" + str(td) + "_" + str(bd) for td, bd in depthList]
+        tkFields = ["TK" + str(td) + "_" + str(bd) + "A" for td, bd in depthList]
 
-                # Process query table using a searchcursor, write out horizon data for each component
-                # At this time, almost all components are being used! There is no filter.
-                sqlClause = (None, "order by mukey, comppct_r DESC, cokey, hzdept_r ASC")
-                #hzSQL = "compkind is not null and hzdept_r is not null"  # prevent divide-by-zero errors
-                hzSQL = "hzdept_r is not null"  # prevent divide-by-zero errors by skipping components with no horizons
+        # MUKEY, MUSUMCPCTA, AWS columns, TK columns
+        muFieldNames = ["MUKEY", "MUSUMCPCTA"] + awsFields + tkFields
+        coFieldNames = ["COKEY"] + awsFields + tkFields
 
-                iCnt = int(arcpy.GetCount_management(queryTbl).getOutput(0))
-                inCur = arcpy.da.SearchCursor(queryTbl, qFieldNames, where_clause=hzSQL, sql_clause=sqlClause)
+        # Component sums for each depth range:  {cokey:[mukey, compPct, [thickness], [aws]]}
+        # None means that the component has no horizon data in that range.
+        dComp = dict()
 
-                arcpy.SetProgressor("step", "Reading QueryTable_HZ ...",  0, iCnt, 1)
-
-                for rec in inCur:
-                    # read each horizon-level input record from the query table ...
+        # Map unit sums for each depth range:  {mukey:[[compPct], [thickness], [aws]]}
+        dMu = dict()
 
-                    mukey, cokey, compPct, awc, top, bot = rec
+        # Sum horizon data for each component and depth range (gSSURGO_ValuArrays.AWSRanges)
+        # At this time, almost all components are being used! There is no filter.
+        # Horizons with a null hzdept_r or awc_r are skipped.
+        dHz = gSSURGO_ValuArrays.ReadHorizons(queryTbl)
 
-                    if awc is not None:
+        if dHz is None:
+            raise MyError, "Unable to read horizon data from " + queryTbl
 
-                        # Calculate sum of horizon thickness and sum of component ratings for all horizons above bottom
-                        hzT = min(bot, bd) - max(top, td)   # usable thickness from this horizon
+        hzThick, hzAWS, bPresent = gSSURGO_ValuArrays.AWSRanges(dHz, depthList)
 
-                        if hzT > 0:
-                            aws = float(hzT) * float(awc) * 10
+        for c in np.flatnonzero(bPresent.any(axis=1)).tolist():
+            hzTList = [hzThick[c, i].item() if bPresent[c, i] else None for i in range(rngCnt)]
+            awsList = [hzAWS[c, i].item() if bPresent[c, i] else None for i in range(rngCnt)]
+            dComp[dHz["coKeys"][c]] = [dHz["muKeys"][c], dHz["comppct"][c].item(), hzTList, awsList]
 
-                            if not cokey in dComp:
-                                # Create initial entry for this component using the first horiozon CHK
-                                dComp[cokey] = (mukey, compPct, hzT, aws)
+        for i in range(rngCnt):
+            iComp = len([cokey for cokey in dComp if not dComp[cokey][2][i] is None])
 
-                            else:
-                                # accumulate total thickness and total rating value by adding to existing component values  CHK
-                                mukey, compName, dHzT, dAWS = dComp[cokey]
-                                dAWS = dAWS + aws
-                                dHzT = dHzT + hzT
-                                dComp[cokey] = (mukey, compPct, dHzT, dAWS)
+            if iComp > 0:
+                PrintMsg("\t\t" + str(depthList[i][0]) + " - " + str(depthList[i][1]) + "cm (" + Number_Format(iComp, 0, True) + " components)"  , 0)
 
-                    arcpy.SetProgressorPosition()
+            else:
+                PrintMsg("\t" + Number_Format(iComp, 0, True) + " components for "  + str(depthList[i][0]) + " - " + str(depthList[i][1]) + "cm", 1)
 
-                # get the total number of major components from the dictionary count
-                iComp = len(dComp)
+        # Open edit session on geodatabase to allow multiple cursors
+        with arcpy.da.Editor(inputDB) as edit:
+            arcpy.SetProgressor("step", "Saving map unit and component AWS data...",  0, len(dComp), 1)
 
-                # Read through the component-level data and summarize to the mapunit level
+            with arcpy.da.UpdateCursor(theCompTable, coFieldNames) as coCursor:
+                for corec in coCursor:
+                    # get component level data
+                    cokey = corec[0]
 
-                if iComp > 0:
-                    PrintMsg("\t\t" + str(td) + " - " + str(bd) + "cm (" + Number_Format(iComp, 0, True) + " components)"  , 0)
-                    arcpy.SetProgressor("step", "Saving map unit and component AWS data...",  0, iComp, 1)
+                    if not cokey in dComp:
+                        continue
 
-                    for corec in coCursor:
-                        # get component level data  CHK
-                        cokey = corec[0]
+                    mukey, compPct, hzTList, awsList = dComp[cokey]
 
-                        if cokey in dComp:
-                            dRec = dComp[cokey]
-                            mukey, compPct, hzT, awc = dRec
+                    # get sum of component percent for the mapunit
+                    try:
+                        # Value[0] is for all components,
+                        # Value[1] is just for major-earthy components,
+                        # Value[2] is all major components
+                        # Value[3] is earthy components
+                        sumCompPct = float(dPct[mukey][0])
 
-                            # get sum of component percent for the mapunit  CHK
-                            try:
-                                # Value[0] is for all components,
-                                # Value[1] is just for major-earthy components,
-                                # Value[2] is all major components
-                                # Value[3] is earthy components
-                                sumCompPct = float(dPct[mukey][0])
-                                #sumCompPct = float(dPct[mukey][1])
+                    except:
+                        # set the component percent to zero if it is not found in the
+                        # dictionary. This is probably a 'Miscellaneous area' not included in the
+                        # data or it has no horizon information.
+                        sumCompPct = 0
 
-                            except:
-                                # set the component percent to zero if it is not found in the
-                                # dictionary. This is probably a 'Miscellaneous area' not included in the  CHK
-                                # data or it has no horizon information.
-                                sumCompPct = 0
-                                #missingList.append("'" + mukey + "'")
+                    if sumCompPct <= 0:
+                        continue
 
-                            # calculate component percentage adjustment
-                            if sumCompPct > 0:
-                                # If there is no data for any of the component horizons, could end up with 0 for
-                                # sum of comppct_r
-                                #PrintMsg(" \nMUKEY " + mukey + " - " + compName + " has zero percent Sum Comppct", 1)
+                    #adjCompPct = float(compPct) / sumCompPct   # WSS method
+                    adjCompPct = compPct / 100.0                # VALU table method
 
+                    try:
+                        muRec = dMu[mukey]
 
-                                #adjCompPct = float(compPct) / sumCompPct   # WSS method
-                                adjCompPct = compPct / 100.0                # VALU table method
+                    except KeyError:
+                        muRec = [[None] * rngCnt, [None] * rngCnt, [None] * rngCnt]
+                        dMu[mukey] = muRec
 
-                                # adjust the rating value down by the component percentage and by the sum of the usable horizon thickness for this component
-                                aws = round((adjCompPct * awc), 2) # component rating
+                    bUpdate = False
 
-                                corec[1] = aws
-                                hzT = hzT * adjCompPct    # Adjust component share of horizon thickness by comppct
-                                corec[2] = hzT             # This is new for the TK0_5A column
-                                coCursor.updateRow(corec)
+                    for i in range(rngCnt):
+                        if hzTList[i] is None:
+                            continue
 
-                                # Update component values in component dictionary   CHK
-                                # Not sure what dComp is being used for ???
-                                dComp[cokey] = mukey, compPct, hzT, aws
+                        # adjust the rating value down by the component percentage and by the sum of the usable horizon thickness for this component
+                        aws = round((adjCompPct * awsList[i]), 2) # component rating
+                        hzT = hzTList[i] * adjCompPct              # Adjust component share of horizon thickness by comppct
+                        corec[1 + i] = aws
+                        corec[1 + rngCnt + i] = hzT
+                        bUpdate = True
+
+                        # Weight the mapunit aggregate with comppct
+                        if muRec[0][i] is None:
+                            muRec[0][i] = compPct
+                            muRec[1][i] = hzT
+                            muRec[2][i] = aws
 
-                                # Try to fix high mapunit aggregate HZ by weighting with comppct
+                        else:
+                            muRec[0][i] += compPct
+                            muRec[1][i] += hzT
+                            muRec[2][i] += aws
 
-                                # Testing new mapunit aggregation 09-08-2014
-                                # Trying to replace dMu dictionary
-                                if mukey in dMu:
-                                    val1, val2, val3 = dMu[mukey]
-                                    #dMu[mukey] = (compPct + val1, hzT + val2, aws + val2)
-                                    compPct = compPct + val1
-                                    hzT = hzT + val2
-                                    aws = aws + val3
+                    if bUpdate:
+                        coCursor.updateRow(corec)
 
-                                #else:
-                                dMu[mukey] = (compPct, hzT, aws)
-                                #PrintMsg("\tAWS for " + mukey + ": " + str(dMu[mukey]), 1)
+            # Write out map unit aggregated AWS
+            #
+            with arcpy.da.UpdateCursor(theMuTable, muFieldNames) as muCursor:
+                for murec in muCursor:
+                    mukey = murec[0]
 
+                    if not mukey in dMu:
+                        continue
 
-                else:
-                    PrintMsg("\t" + Number_Format(iComp, 0, True) + " components for "  + str(td) + " - " + str(bd) + "cm", 1)
+                    pctList, hzTList, awsList = dMu[mukey]
 
-                # Write out map unit aggregated AWS
-                #
-                for murec in muCursor:
-                    mukey = murec[0]
+                    for i in range(rngCnt):
+                        if not pctList[i] is None:
+                            # MUSUMCPCTA is from the last depth range with data
+                            murec[1] = pctList[i]
+                            murec[2 + i] = awsList[i]
+                            murec[2 + rngCnt + i] = round(hzTList[i], 2)  # sometimes this ends up being 2 or 3X what it should
 
-                    if mukey in dMu:
-                        compPct, hzT, aws = dMu[mukey]
-                        murec[1] = compPct
-                        murec[2] = aws
-                        murec[3] = round(hzT, 2)  # sometimes this ends up being 2 or 3X what it should
-                        muCursor.updateRow(murec)
+                    muCursor.updateRow(murec)
 
         if len(missingList) > 0:
             missingList = list(set(missingList))
@@ -1741,11 +1471,6 @@ def CalcSOC(inputDB, outputDB, theCompTable, theMuTable, dPct, dFrags, depthList
         queryTbl = os.path.join(outputDB, "QueryTable_HZ")
         numRows = int(arcpy.GetCount_management(queryTbl).getOutput(0))
 
-        # mukey, cokey, compPct,val, top, bot
-        #qFieldNames = ["mukey", "cokey", "comppct_r", "hzdept_r", "hzdepb_r", "om_r", "dbthirdbar_r"]
-
-        qFieldNames = ["mukey","cokey","comppct_r","compname","localphase","chkey","om_r","dbthirdbar_r", "hzdept_r","hzdepb_r"]
-
         # Track map units that are missing data
         missingList = list()
         minusList = list()
@@ -1754,7 +1479,19 @@ def CalcSOC(inputDB, outputDB, theCompTable, theMuTable, dPct, dFrags, depthList
 
         PrintMsg(" \n\tCalculating soil organic carbon for:", 0)
 
-        for rng in depthList:
+        # Horizon thickness and SOC for every component and depth range (gSSURGO_ValuArrays.SOCRanges).
+        # Horizons with a null hzdept_r, om_r or dbthirdbar_r are skipped. SOC is not calculated
+        # below the component restriction, and is reduced by the horizon fragment volume.
+        dHz = gSSURGO_ValuArrays.ReadHorizons(queryTbl)
+
+        if dHz is None:
+            raise MyError, "Unable to read horizon data from " + queryTbl
+
+        fragvol = gSSURGO_ValuArrays.FragmentVolume(dHz, dFrags)
+        hzThick, hzSOC, bPresent = gSSURGO_ValuArrays.SOCRanges(dHz, depthList, dRestrictions, maxD, fragvol)
+
+        for i in range(len(depthList)):
+            rng = depthList[i]
             # Calculating and updating just one SOC column at a time
             #
             td = rng[0]
@@ -1770,7 +1507,6 @@ def CalcSOC(inputDB, outputDB, theCompTable, theMuTable, dPct, dFrags, depthList
             dComp = dict()
             #dSumPct = dict()  # store the sum of comppct_r for each mapunit to use in the calculations
             dSum = dict()     # store sum of comppct_r and total thickness for the component
-            dHz = dict()      # Trying a new dictionary that will s
             mCnt = 0
             dMinMax = dict()
 
@@ -1789,81 +1525,10 @@ def CalcSOC(inputDB, outputDB, theCompTable, theMuTable, dPct, dFrags, depthList
                 coFieldNames = ["COKEY", "SOC" + str(td) + "_" + str(bd), "TK" + str(td) + "_" + str(bd) + "S"]
                 coCursor = arcpy.da.UpdateCursor(theCompTable, coFieldNames)
 
-                # Process query table using a searchcursor, write out horizon data for each component
-                # At this time, almost all components are being used! There is no filter.
-                hzSQL = "hzdept_r is not null"  # prevent divide-by-zero errors by skipping components with no horizons
-                sqlClause = (None, "order by mukey, comppct_r DESC, cokey, hzdept_r ASC")
-
-                iCnt = int(arcpy.GetCount_management(queryTbl).getOutput(0))
-                inCur = arcpy.da.SearchCursor(queryTbl, qFieldNames, where_clause=hzSQL, sql_clause=sqlClause)
-                arcpy.SetProgressor("step", "Reading QueryTable_HZ ...",  0, iCnt, 1)
-
-                for rec in inCur:
-                    # read each horizon-level input record from the query table ...
-
-                    mukey, cokey, compPct, compName, localPhase, chkey, om, db3, top, bot = rec
-                    sumCompPct = float(dPct[mukey][0])
-
-                    if om is not None and db3 is not None:
-                        # Calculate sum of horizon thickness and sum of component ratings for
-                        # that portion of the horizon that is with in the td-bd range
-                        top = max(top, td)
-                        bot = min(bot, bd)
-                        om = round(om, 3)
-
-                        try:
-                            rz, resKind = dRestrictions[cokey]
-
-                        except:
-                            rz = maxD
-                            resKind = ""
-
-                        # Now check for horizon restrictions within this range. Do not calculate SOC past
-                        # root zone restrictive layers.
-                        #
-                        if top < rz < bot:
-                            # restriction found in this horizon, use it to set a new depth
-                            #PrintMsg("\t\t" + resKind + " restriction for " + mukey + ":" + cokey + " at " + str(rz) + "cm", 1)
-                            cBot = rz
-
-                        else:
-                            cBot = min(rz, bot)
-
-                        # Calculate initial usable horizon thickness
-                        hzT = cBot - top
-
-                        if hzT > 0 and top < cBot:
-                            # get horizon fragment volume
-                            try:
-                                fragvol = dFrags[chkey]
-
-                            except:
-                                fragvol = 0.0
-                                pass
-
-                            # Calculate SOC using horizon thickness, OM, BD, FragVol, CompPct.
-                            # changed the OM to carbon conversion from * 0.58 to / 1.724 after running FY2017 value table
-                            db3 = round(db3, 2)
-                                 
-                            soc =  ( (hzT * ( ( om / 1.724 ) * db3 )) / 100.0 ) * ((100.0 - fragvol) / 100.0) * ( compPct * 100 )
-
-                            #if td == 0 and bd == 5.0:
-                                # Everything here matches the other script
-                            #    test = [mukey, cokey, compPct, compName, localPhase, chkey, om, db3, top, bot, hzT, fragvol, round(soc, 2)]
-                                #PrintMsg(str(test), 1)
-
-                            if not cokey in dComp:
-                                # Create initial entry for this component using the first horizon CHK
-                                dComp[cokey] = (mukey, compPct, hzT, soc)
-
-                            else:
-                                # accumulate total thickness and total rating value by adding to existing component values  CHK
-                                mukey, compName, dHzT, dSOC = dComp[cokey]
-                                dSOC = dSOC + soc
-                                dHzT = dHzT + hzT
-                                dComp[cokey] = (mukey, compPct, dHzT, dSOC)
-
-                    arcpy.SetProgressorPosition()
+                # Component sums for this range from the horizon arrays, in the same
+                # (mukey, compPct, hzT, soc) form used by the original horizon cursor.
+                for c in np.flatnonzero(bPresent[:, i]).tolist():
+                    dComp[dHz["coKeys"][c]] = (dHz["muKeys"][c], dHz["comppct"][c].item(), hzThick[c, i].item(), hzSOC[c, i].item())
 
                 # get the total number of major components from the dictionary count
                 iComp = len(dComp)
@@ -2067,664 +1732,169 @@ def GetSumPct(inputDB):
         return dict()
 
 ## ===================================================================================
-def MakeNCCPIQueryTable(inputDB, qTable):
-    # create query table containing information from component and chorizon tables
-    # return name of querytable. Failure returns an empty string for the table name.
+def CalcInterps(inputDB, theMuTable, dPct):
+    # NCCPI and potential wet soil landscapes (PWSL) for each map unit, from one pass through
+    # the component table and one filtered pass through cointerp. The NCCPI ratings of the major
+    # components are comppct-weighted sums in an array (map unit x NCCPI column), divided by the
+    # sum of major-earthy component percent (dPct). Both are saved with one pass through theMuTable.
     #
     # Bob Dobos wanted the Valu1 table to use only major components for NCCPI
     #
     # Web Soil Survey uses ALL components, not just majors. To switch to the WSS method,
-    # remove the filter for major component. May need to filter out null comppct_r.
-    #
-    # COINTERP.RULENAME CHOICES FOR NCCPI Version 2:
-    #
-    # 'NCCPI - National Commodity Crop Productivity Index (Ver 2.0)'
-    # 'NCCPI - NCCPI Corn and Soybeans Submodel (II)'
-    # 'NCCPI - NCCPI Cotton Submodel (II)'
-    # 'NCCPI - NCCPI Small Grains Submodel (II)'
-    #
+    # remove the filter for major component.
     #
     # FY2018 Big change. NCCPI version 3 will be available. Main rulename will change.
     # Soybeans will be split out from 'Corn and Soybeans', requiring a new column in the
-    # Valu1 table.
+    # Valu1 table. The submodel rule names for each version are in dNCCPIRules.
     #
-    # NCCPI version 3 Information
-    # -------------------------------------
-    # MRULENAME:	NCCPI - National Commodity Crop Productivity Index (Ver 3.0)  (ruledepth=0)
+    # Each cointerp rule key is matched to its output column (by ruledepth and rule name) the
+    # first time it is read, so the rule names are only compared once.
     #
-    # RULENAME:	NCCPI - NCCPI Cotton Submodel (II)		(ruledepth=1)
-    # RULENAME:	NCCPI - NCCPI Small Grains Submodel (II)	(ruledepth=1)
-    # RULENAME:	NCCPI - NCCPI Corn Submodel (I)			(ruledepth=1)
-    # RULENAME:	NCCPI - NCCPI Soybeans Submodel (I)		(ruledepth=1)
-
     try:
+        PrintMsg(" \n\tCalculating NCCPI weighted averages and Potential Wet Soil Landscapes...", 0)
+        ruleCols = dNCCPIRules[mainRuleName]
+        nccpiFlds = [col[0] for col in ruleCols]
 
-        # Join chorizon table with component table
-        inTables = [os.path.join(inputDB, "component"), os.path.join(inputDB, "cointerp")]
-
-        # interphr is the fuzzy value
-        theFields = [["COMPONENT.MUKEY", "MUKEY"], \
-        ["COMPONENT.COKEY", "COKEY"], \
-        ["COMPONENT.COMPPCT_R", "COMPPCT_R"], \
-        ["COINTERP.RULENAME", "RULENAME"], \
-        ["COINTERP.RULEDEPTH", "RULEDEPTH"], \
-        ["COINTERP.INTERPHR", "INTERPHR"]]
-
-        #theSQL = "COMPONENT.COMPPCT_R > 0 AND COMPONENT.MAJCOMPFLAG = 'Yes' AND COMPONENT.COKEY = COINTERP.COKEY  AND COINTERP.MRULENAME = '" + rule + "'"
-        if bRulekey:
-            # Much better performance if COINTER.RULEKEY is indexed and can be used in the query
-            if mainRuleName == 'NCCPI - National Commodity Crop Productivity Index (Ver 2.0)':
-                theSQL = "COMPONENT.MAJCOMPFLAG = 'Yes' AND COMPONENT.COKEY = COINTERP.COKEY  AND COINTERP.MRULEKEY = '34170'"
-
-            else:
-                theSQL = "COMPONENT.MAJCOMPFLAG = 'Yes' AND COMPONENT.COKEY = COINTERP.COKEY  AND COINTERP.MRULEKEY = '54955'"
-                
-        else:
-            theSQL = "COMPONENT.MAJCOMPFLAG = 'Yes' AND COMPONENT.COKEY = COINTERP.COKEY  AND COINTERP.MRULENAME = '" + mainRuleName + "'"
-            
-        PrintMsg(" \n\tCalculating NCCPI weighted averages for all major components...", 0)
-        #PrintMsg("Using SQL: " + theSQL, 1)
-
-        # Things to be aware of with MakeQueryTable:
-        # USE_KEY_FIELDS does not create OBJECTID field. Lack of OBJECTID precludes sorting on Mukey.
-        # ADD_VIRTUAL_KEY_FIELD creates OBJECTID, but qualifies field names using underscore (eg. COMPONENT_COKEY)
-        #
-        arcpy.MakeQueryTable_management(inTables, qTable, "ADD_VIRTUAL_KEY_FIELD","",theFields, theSQL)
-
-        if arcpy.Exists(qTable):
-            iCnt = int(arcpy.GetCount_management(qTable).getOutput(0))
-            if iCnt == 0:
-                PrintMsg("\tFailed to retrieve NCCPI data", 1)
-                return False
-
-        return True
+        # Map units in the output table
+        muList = list()
+        dMuRow = dict()
+        dMuName = dict()
+
+        with arcpy.da.SearchCursor(os.path.join(inputDB, "mapunit"), ["mukey", "muname"]) as cur:
+            for mukey, muname in cur:
+                if incrementalKeys is None or mukey in incrementalKeys:
+                    dMuRow[mukey] = len(muList)
+                    dMuName[mukey] = muname
+                    muList.append(mukey)
+
+        # Components. Major components are rated for NCCPI; all components with a percent are used for PWSL.
+        coFlds = ["mukey", "cokey", "comppct_r", "majcompflag", "compname", "localphase", "otherph", "hydricrating", "drainagecl"]
+        dCoRow = dict()     # cokey: [map unit row, comppct_r] for major components
+        dComps = dict()     # mukey: component records for PWSL
+
+        with arcpy.da.SearchCursor(os.path.join(inputDB, "component"), coFlds, where_clause="comppct_r is not NULL", sql_clause=(None, "ORDER BY cokey")) as cur:
+            for rec in cur:
+                mukey, cokey, comppct = rec[0:3]
 
-    except MyError, e:
-        # Example: raise MyError("this is an error message")
-        PrintMsg(str(e) + " \n", 2)
-        return False
+                if not mukey in dMuRow:
+                    continue
 
-    except:
-        errorMsg()
-        return False
+                if rec[3] == "Yes":
+                    dCoRow[cokey] = [dMuRow[mukey], comppct]
 
-## ===================================================================================
-def CalcNCCPI2(inputDB, theMuTable, qTable, dPct):
-    #
-    #
-    try:
-        # FY2018 Big change. NCCPI version 3 will be available. Main rulename will change.
-        # Soybeans will be split out from 'Corn and Soybeans', requiring a new column in the
-        # Valu1 table.
-        #
-        # NCCPI version 3 Information
-        # -------------------------------------
-        # MRULENAME:	NCCPI - National Commodity Crop Productivity Index (Ver 3.0)  (ruledepth=0)
-        #
-        # RULENAME:	NCCPI - NCCPI Cotton Submodel (II)		(ruledepth=1)
-        # RULENAME:	NCCPI - NCCPI Small Grains Submodel (II)	(ruledepth=1)
-        # RULENAME:	NCCPI - NCCPI Corn Submodel (I)			(ruledepth=1)
-        # RULENAME:	NCCPI - NCCPI Soybeans Submodel (I)		(ruledepth=1)
+                if comppct > 0:
+                    try:
+                        dComps[mukey].append(rec)
+
+                    except KeyError:
+                        dComps[mukey] = [rec]
+
+        # NCCPI ratings, read once for all of the submodels
+        wc = NCCPIWhereClause()
+        dRuleCol = dict()   # rulekey: output column, -1 for other rules
+        muRows = array.array("l")
+        colRows = array.array("l")
+        weighted = array.array("d")
+        bRated = np.zeros(len(muList), dtype=bool)
+        arcpy.SetProgressor("default", "Reading NCCPI ratings...")
+
+        with arcpy.da.SearchCursor(os.path.join(inputDB, "cointerp"), ["cokey", "rulekey", "ruledepth", "rulename", "interphr"], where_clause=wc) as cur:
+            for cokey, rulekey, ruleDepth, ruleName, fuzzyValue in cur:
+                try:
+                    muRow, comppct = dCoRow[cokey]
 
-        # and write to Mu_NCCPI2 table
+                except KeyError:
+                    continue
 
+                bRated[muRow] = True
 
-        #
-        #PrintMsg(" \n\tAggregating data to mapunit level...", 0)
+                if fuzzyValue is None:
+                    continue
 
-        # Alternate component fields for all NCCPI values
-        cFlds = ["MUKEY","COKEY","COMPPCT_R","COMPNAME","LOCALPHASE", "DUMMY"]
-        mFlds = ["MUKEY","COMPPCT_R","COMPNAME","LOCALPHASE", "DUMMY"]
+                try:
+                    col = dRuleCol[rulekey]
 
-        # Create dictionary key as MUKEY:INTERPHRC
-        # Need to look through the component rating class for ruledepth = 0
-        # and sum up COMPPCT_R for each key value
-        #
-        dVals = dict()  # dictionary containing sum of comppct for each MUKEY:RATING combination
+                except KeyError:
+                    col = -1
 
-        # Get sum of component percent for each map unit. There are different options:
-        #     1. Use all major components
-        #     2. Use all components that have an NCCPI rating
-        #     3. Use all major-earthy components. This one is not currently available.
-        #     4. Use all components (that have a component percent)
-        #
+                    for i, ruleCol in enumerate(ruleCols):
+                        if (ruleDepth == 0 and ruleCol[1] is None) or (ruleDepth != 0 and ruleCol[1] == ruleName):
+                            col = i
+                            break
 
-        # Query table fields
-        qFields = ["COMPONENT_MUKEY", "COMPONENT_COKEY", "COMPONENT_COMPPCT_R", "COINTERP_RULEDEPTH", "COINTERP_RULENAME", "COINTERP_INTERPHR"]
+                    dRuleCol[rulekey] = col
 
-        sortFields = "ORDER BY COMPONENT_COKEY ASC, COMPONENT_COMPPCT_R DESC"
-        querytblSQL = "COMPONENT_COMPPCT_R IS NOT NULL"  # all major components were set in the original query table
-        sqlClause = (None, sortFields)
+                if col >= 0:
+                    muRows.append(muRow)
+                    colRows.append(col)
+                    weighted.append(fuzzyValue * comppct)
 
-        iCnt = int(arcpy.GetCount_management(qTable).getOutput(0))
-        noVal = list()  # Get a list of components with no overall index rating
+        del dCoRow
 
-        #PrintMsg(" \n\tReading query table with " + Number_Format(iCnt, 0, True) + " records...", 0)
+        if not bRated.any():
+            PrintMsg("\tFailed to retrieve NCCPI data", 1)
 
-        arcpy.SetProgressor("step", "Reading NCCPI query table...", 0,iCnt, 1)
+        sums, bValue = gSSURGO_ValuArrays.InterpSums(muRows, colRows, weighted, len(muList), len(ruleCols))
+        del muRows, colRows, weighted
 
-        with arcpy.da.SearchCursor(qTable, qFields, where_clause=querytblSQL, sql_clause=sqlClause) as qCursor:
+        # Potential wet soil landscapes. Components are taken in order of comppct_r, as in QueryTable_HZ.
+        dPWSL = dict()
 
-            for qRec in qCursor:
-                # qFields = MUKEY, COKEY, COMPPCT_R, RULEDEPTH, RULENAME, INTERPHR
-                mukey, cokey, comppct, ruleDepth, ruleName, fuzzyValue = qRec
+        for mukey in muList:
+            for rec in sorted(dComps.get(mukey, []), key=lambda x: int(x[2])):
+                mukey, cokey, comppct_r, majcompflag, compname, localphase, otherph, hydricrating, drainagecl = rec
+                gSSURGO_ValuArrays.PWSLComponent(dPWSL, mukey, dMuName[mukey], comppct_r, compname, localphase, otherph, hydricrating, drainagecl)
 
-                # Dictionary order:  All, CS, CT, SG
-                if not mukey in dVals:
-                    # Initialize mukey NCCPI values
-                    dVals[mukey] = [None, None, None, None]
+        del dComps
 
-                if not fuzzyValue is None:
+        # Save NCCPI and PWSL in the map unit table
+        arcpy.SetProgressor("step", "Populating " + os.path.basename(theMuTable) + "...",  0, len(muList), 1)
 
-                    if ruleDepth == 0:
-                        # This is NCCPI Overall Index
-                        oldVal = dVals[mukey][0]
+        with arcpy.da.UpdateCursor(theMuTable, ["mukey"] + nccpiFlds + ["pwsl1pomu"]) as muCur:
+            for rec in muCur:
+                mukey = rec[0]
+                i = dMuRow.get(mukey, None)
+                bUpdate = False
 
-                        if oldVal is None:
-                            dVals[mukey][0] = fuzzyValue * comppct
+                if not i is None and bRated[i]:
+                    try:
+                        sumPct = dPct[mukey][2]  # sum of major-earthy components
+                        rec[1:len(nccpiFlds) + 1] = gSSURGO_ValuArrays.InterpValues(sums, bValue, i, sumPct)
+                        bUpdate = True
 
-                        else:
-                            dVals[mukey][0] = (oldVal + (fuzzyValue * comppct))
+                    except:
+                        # Miscellaneous map unit encountered with no comppct_r?
+                        pass
 
-                    # The rest of these will be ruledepth=1
-                    #
-                    elif ruleName == "NCCPI - NCCPI Corn and Soybeans Submodel (II)":
-                        oldVal = dVals[mukey][1]
+                if mukey in dPWSL:
+                    rec[-1] = dPWSL[mukey]
+                    bUpdate = True
 
-                        if oldVal is None:
-                            dVals[mukey][1] = fuzzyValue * comppct
+                if bUpdate:
+                    muCur.updateRow(rec)
 
-                        else:
-                            dVals[mukey][1] = (oldVal + (fuzzyValue * comppct))
+                arcpy.SetProgressorPosition()
 
-                    elif ruleName == "NCCPI - NCCPI Cotton Submodel (II)":
-                        oldVal = dVals[mukey][2]
+        arcpy.ResetProgressor()
+        return True
 
-                        if oldVal is None:
-                            dVals[mukey][2] =  fuzzyValue * comppct
+    except MyError, e:
+        # Example: raise MyError("this is an error message")
+        PrintMsg(str(e) + " \n", 2)
+        return False
 
-                        else:
-                            dVals[mukey][2] = (oldVal + (fuzzyValue * comppct))
+    except:
+        errorMsg()
+        return False
 
-                    elif ruleName == "NCCPI - NCCPI Small Grains Submodel (II)":
-                        oldVal = dVals[mukey][3]
+## ===================================================================================
+def StateNames():
+    # Create dictionary object containing list of state abbreviations and their names that
+    # will be used to name the file geodatabase.
+    # For some areas such as Puerto Rico, U.S. Virgin Islands, Pacific Islands Area the
+    # abbrevation is
 
-                        if oldVal is None:
-                            dVals[mukey][3] = fuzzyValue * comppct
-
-                        else:
-                            dVals[mukey][3] = (oldVal + (fuzzyValue * comppct))
-
-                elif ruleName == "NCCPI - National Commodity Crop Productivity Index (Ver 2.0)":
-                    # This component does not have an NCCPI rating
-                    #PrintMsg(" \n" + mukey + ":" + cokey + ", " + str(comppct) + "% has no NCCPI rating", 1)
-                    noVal.append("'" + cokey + "'")
-
-                arcpy.SetProgressorPosition()
-                #
-                # End of query table iteration
-                #
-
-
-
-        #if len(noVal) > 0:
-        #    PrintMsg(" \nThe following components had no NCCPI overall index: " + ", ".join(noVal), 1)
-
-        iCnt = len(dVals)
-
-        if iCnt > 0:
-
-            #PrintMsg(" \n\tSaving map unit weighted NCCPI data (" + Number_Format(iCnt, 0, True) + " records) to " + os.path.basename(theMuTable) + "..." , 0)
-            # Write map unit aggregate data to Mu_NCCPI2 table
-            #
-            # theMuTable is a global variable. Need to check this out in the gSSURGO_ValuTable script
-
-            with arcpy.da.UpdateCursor(theMuTable, ["mukey", "NCCPI2CS", "NCCPI2CO","NCCPI2SG", "NCCPI2ALL"]) as muCur:
-
-                arcpy.SetProgressor("step", "Saving map unit weighted NCCPI data to VALU table...", 0, iCnt, 0)
-                for rec in muCur:
-                    mukey = rec[0]
-
-                    try:
-                        # Get output values from dVals and dPct dictionaries
-                        #val = dVals[mukey]
-                        ovrall, cs, co, sg = dVals[mukey]
-                        sumPct = dPct[mukey][2]  # sum of major-earthy components
-                        if not cs is None:
-                            cs = round(cs / sumPct, 3)
-
-                        if not co is None:
-                            co = round(co / sumPct, 3)
-
-                        if not sg is None:
-                            sg = round(sg / sumPct, 3)
-
-                        if not ovrall is None:
-                            ovrall = round(ovrall / sumPct, 3)
-
-                        newrec = mukey, cs, co, sg, ovrall
-                        muCur.updateRow(newrec)
-
-                    except:
-                        # Miscellaneous map unit encountered with no comppct_r?
-                        pass
-
-                    arcpy.SetProgressorPosition()
-
-            arcpy.Delete_management(qTable)
-            return True
-
-        else:
-            raise MyError, "No NCCPI data processed"
-
-    except MyError, e:
-        # Example: raise MyError("this is an error message")
-        PrintMsg(str(e) + " \n", 2)
-        return False
-
-    except:
-        errorMsg()
-        return False
-
-
-## ===================================================================================
-def CalcNCCPI3(inputDB, theMuTable, qTable, dPct):
-    #
-    #
-    try:
-        # FY2018 Big change. NCCPI version 3 will be available. Main rulename will change.
-        # Soybeans will be split out from 'Corn and Soybeans', requiring a new column in the
-        # Valu1 table.
-        #
-        # NCCPI version 3 Information
-        # -------------------------------------
-        # MRULENAME:	NCCPI - National Commodity Crop Productivity Index (Ver 3.0)  (ruledepth=0)
-        #
-        # RULENAME:	NCCPI - NCCPI Cotton Submodel (II)		(ruledepth=1)
-        # RULENAME:	NCCPI - NCCPI Small Grains Submodel (II)	(ruledepth=1)
-        # RULENAME:	NCCPI - NCCPI Corn Submodel (I)			(ruledepth=1)
-        # RULENAME:	NCCPI - NCCPI Soybeans Submodel (I)		(ruledepth=1)
-
-        # and write to Mu_NCCPI2 table
-
-        #
-        #PrintMsg(" \n\tAggregating data to mapunit level...", 0)
-
-        # Alternate component fields for all NCCPI values
-        cFlds = ["MUKEY","COKEY","COMPPCT_R","COMPNAME","LOCALPHASE", "DUMMY"]
-        mFlds = ["MUKEY","COMPPCT_R","COMPNAME","LOCALPHASE", "DUMMY"]
-
-        # Create dictionary key as MUKEY:INTERPHRC
-        # Need to look through the component rating class for ruledepth = 0
-        # and sum up COMPPCT_R for each key value
-        #
-        dVals = dict()  # dictionary containing sum of comppct for each MUKEY:RATING combination
-
-        # Get sum of component percent for each map unit. There are different options:
-        #     1. Use all major components
-        #     2. Use all components that have an NCCPI rating
-        #     3. Use all major-earthy components. This one is not currently available.
-        #     4. Use all components (that have a component percent)
-        #
-
-        # Query table fields
-        qFields = ["COMPONENT_MUKEY", "COMPONENT_COKEY", "COMPONENT_COMPPCT_R", "COINTERP_RULEDEPTH", "COINTERP_RULENAME", "COINTERP_INTERPHR"]
-
-        sortFields = "ORDER BY COMPONENT_COKEY ASC, COMPONENT_COMPPCT_R DESC"
-        querytblSQL = "COMPONENT_COMPPCT_R IS NOT NULL"  # all major components were set in the original query table
-        sqlClause = (None, sortFields)
-
-        iCnt = int(arcpy.GetCount_management(qTable).getOutput(0))
-        noVal = list()  # Get a list of components with no overall index rating
-
-        PrintMsg(" \n\tReading query table with " + Number_Format(iCnt, 0, True) + " records...", 0)
-
-        arcpy.SetProgressor("step", "Reading NCCPI query table...", 0, iCnt, 1)
-
-        with arcpy.da.SearchCursor(qTable, qFields, where_clause=querytblSQL, sql_clause=sqlClause) as qCursor:
-
-            for qRec in qCursor:
-                # qFields = MUKEY, COKEY, COMPPCT_R, RULEDEPTH, RULENAME, INTERPHR
-                mukey, cokey, comppct, ruleDepth, ruleName, fuzzyValue = qRec
-
-                # Dictionary order:  All, CT, CR, SB, SG
-                if not mukey in dVals:
-                    # Initialize mukey NCCPI values
-                    dVals[mukey] = [None, None, None, None, None]
-
-                if not fuzzyValue is None:
-
-                    if ruleDepth == 0:
-                        # This is NCCPI Overall Index
-                        oldVal = dVals[mukey][0]
-
-                        if oldVal is None:
-                            dVals[mukey][0] = fuzzyValue * comppct
-
-                        else:
-                            dVals[mukey][0] = (oldVal + (fuzzyValue * comppct))
-
-                    # The rest of these will be ruledepth=1
-                    #
-                    elif ruleName == "NCCPI - NCCPI Cotton Submodel (II)":
-                        oldVal = dVals[mukey][1]
-
-                        if oldVal is None:
-                            dVals[mukey][1] =  fuzzyValue * comppct
-
-                        else:
-                            dVals[mukey][1] = (oldVal + (fuzzyValue * comppct))
-
-                    elif ruleName == "NCCPI - NCCPI Corn Submodel (I)":
-                        oldVal = dVals[mukey][2]
-
-                        if oldVal is None:
-                            dVals[mukey][2] = fuzzyValue * comppct
-
-                        else:
-                            dVals[mukey][2] = (oldVal + (fuzzyValue * comppct))
-
-                    elif ruleName == "NCCPI - NCCPI Soybeans Submodel (I)":
-                        oldVal = dVals[mukey][3]
-
-                        if oldVal is None:
-                            dVals[mukey][3] = fuzzyValue * comppct
-
-                        else:
-                            dVals[mukey][3] = (oldVal + (fuzzyValue * comppct))
-
-
-                    elif ruleName == "NCCPI - NCCPI Small Grains Submodel (II)":
-                        oldVal = dVals[mukey][4]
-
-                        if oldVal is None:
-                            dVals[mukey][4] = fuzzyValue * comppct
-
-                        else:
-                            dVals[mukey][4] = (oldVal + (fuzzyValue * comppct))
-
-                    #elif ruleName.startswith("NCCPI"):
-                    #    PrintMsg(" \n" + mukey + ":" + cokey + ", " + str(ruleName), 1)
-                    
-                    #else:
-                        # These would be rating reasons or impacted soils
-                    #    PrintMsg(" \n" + mukey + ":" + cokey + ", " + str(ruleName), 1)
-                        
-
-                elif ruleName.startswith("NCCPI - National Commodity Crop Productivity Index"):
-                    # This component does not have an NCCPI rating
-                    #PrintMsg(" \n" + mukey + ":" + cokey + ", " + str(comppct) + "% has no NCCPI rating", 1)
-                    noVal.append("'" + cokey + "'")
-
-                arcpy.SetProgressorPosition()
-                #
-                # End of query table iteration
-                #
-
-
-
-        #if len(noVal) > 0:
-        #    PrintMsg(" \nThe following components had no NCCPI overall index: " + ", ".join(noVal), 1)
-
-        iCnt = len(dVals)
-
-        if iCnt > 0:
-
-            #PrintMsg(" \n\tSaving map unit weighted NCCPI data (" + Number_Format(iCnt, 0, True) + " records) to " + os.path.basename(theMuTable) + "..." , 0)
-            # Write map unit aggregate data to Mu_NCCPI2 table
-            #
-            # theMuTable is a global variable. Need to check this out in the gSSURGO_ValuTable script
-            #                                                 corn&soybeans, cotton, smallgrains, overall
-
-            with arcpy.da.UpdateCursor(theMuTable, ["mukey", "NCCPI3CORN", "NCCPI3SOY", "NCCPI3COT","NCCPI3SG", "NCCPI3ALL"]) as muCur:
-
-                arcpy.SetProgressor("step", "Saving map unit weighted NCCPI data to VALU table...", 0, iCnt, 0)
-                for rec in muCur:
-                    mukey = rec[0]
-
-                    try:
-                        # Get output values from dVals and dPct dictionaries
-                        #val = dVals[mukey]
-                        ovrall, cot, corn, soy, sg = dVals[mukey]
-                        sumPct = dPct[mukey][2]  # sum of major-earthy components
-
-                        if not ovrall is None:
-                            ovrall = round(ovrall / sumPct, 3)
-
-                        if not cot is None:
-                            cot = round(cot / sumPct, 3)
-
-                        if not corn is None:
-                            corn = round(corn / sumPct, 3)
-
-                        if not soy is None:
-                            soy = round(soy / sumPct, 3)
-
-                        if not sg is None:
-                            sg = round(sg / sumPct, 3)
-
-
-
-                        # "mukey", "NCCPI2CORN", "NCCPI2SOY", "NCCPI2COT","NCCPI2SG", "NCCPI2ALL"
-                        newrec = mukey, corn, soy, cot, sg, ovrall
-                        muCur.updateRow(newrec)
-
-                    except:
-                        # Miscellaneous map unit encountered with no comppct_r?
-                        pass
-
-                    arcpy.SetProgressorPosition()
-
-            arcpy.Delete_management(qTable)
-            return True
-
-        else:
-            raise MyError, "No NCCPI data processed"
-
-    except MyError, e:
-        # Example: raise MyError("this is an error message")
-        PrintMsg(str(e) + " \n", 2)
-        return False
-
-    except:
-        errorMsg()
-        return False
-
-## ===================================================================================
-def CalcPWSL(inputDB, outputDB, theMuTable, dPct):
-    # Get potential wet soil landscape rating for each map unit
-    # Assuming that all components (with comppct_r) will be processed
-    #
-    # Sharon: I treat all map unit components the same, so if I find 1% water I think
-    # it should show up as 1% PWSL.  If the percentage of water is >= 80% then I class
-    # it into the water body category or 999.
-    try:
-        env.workspace = outputDB
-
-        # Using the same component horizon table as always
-        queryTbl = os.path.join(outputDB, "QueryTable_Hz")
-        numRows = int(arcpy.GetCount_management(queryTbl).getOutput(0))
-        PrintMsg(" \n\tCalculating Potential Wet Soil Landscapes using...", 0)
-        qFieldNames = ["mukey", "muname", "cokey", "comppct_r",  "compname", "localphase", "otherph", "majcompflag", "compkind", "hydricrating", "drainagecl"]
-        pwSQL = "COMPPCT_R > 0"
-        compList = list()
-        dMu = dict()
-
-        drainList = ["Poorly drained", "Very poorly drained"]
-        phaseList = ["drained", "undrained", "channeled", "protected", "ponded", "flooded"]
-
-        # Defining water components SDP
-        # 1. compkind = 'Miscellaneous area' or is NULL and (
-        # 2. compname = 'Water' or
-        # 3. compname like '% water' or
-        # 4. compname like '% Ocean' or
-        # 5. compname like '% swamp'
-        # nameList = []
-
-        iCnt = int(arcpy.GetCount_management(queryTbl).getOutput(0))
-        lastCokey = 'xxx'
-        arcpy.SetProgressor("step", "Reading query table table for wetland information...",  0, iCnt, 1)
-
-        with arcpy.da.SearchCursor(queryTbl, qFieldNames, where_clause=pwSQL) as pwCur:
-            for rec in pwCur:
-                mukey, muname, cokey, comppct_r,  compname, localphase, otherph, majcompflag, compkind, hydricrating, drainagecl = rec
-
-                if cokey != lastCokey:
-                    # only process first horizon record for each component
-
-                    compList.append(cokey)
-                    # Only check the first horizon record, really only need component level
-                    # Not very efficient, should problably create a new query table
-                    #
-                    # Need to split up these tests so that None types can be handled
-
-                    # Sharon says that if the hydricrating for a component is 'No', don't
-                    # look at it any further. If it is unranked, go ahead and look at
-                    # other properties.
-                    #
-                    pw = False
-
-                    if ( muname == "Water" or str(compname) == "Water" or (str(compname).lower().find(" water") >= 0) or (str(compname).lower().find(" ocean") >= 0)  or (str(compname).find(" swamp") >= 0) or str(compname) == "Swamp" ) :
-
-                        # Check for water before looking at Hydric rating
-                        # Probably won't catch everything. Waiting for Sharon's criteria.
-
-                        if comppct_r >= 80:
-                            # Flag this mapunit with a '999'
-                            # Not necessarily catching map unit with more than one Water component that
-                            # might sum to >= 80. Don't think there are any right now.
-                            #PrintMsg("\tFlagging " + muname + " as Water", 1)
-                            #PrintMsg("\t" + mukey + "; " + muname + "; " + compname + "; " + str(compkind) + "; " + str(comppct_r), 1)
-                            pw = False
-                            dMu[mukey] = 999
-
-                        else:
-                            pw = True
-
-                            try:
-                                sumPct = dMu[mukey]
-
-                                if sumPct != 999:
-                                    dMu[mukey] = sumPct + comppct_r
-
-                            except:
-                                dMu[mukey] = comppct_r
-
-                    elif hydricrating == 'No':
-                        # Added this bit so that other properties cannot override hydricrating = 'No'
-                        pw = False
-
-                    elif hydricrating == 'Yes':
-                        # This is always a Hydric component
-                        # Get component percent and add to map unit total PWSL
-                        pw = True
-                        #if mukey == tmukey:
-                        #    PrintMsg("\tHydric percent = " + str(comppct_r), 1)
-
-                        try:
-                            sumPct = dMu[mukey]
-
-                            if sumPct != 999:
-                                dMu[mukey] = sumPct + comppct_r
-
-                        except:
-                            dMu[mukey] = comppct_r
-
-                    elif hydricrating == 'Unranked':
-                        # Not sure how Sharon is handling NULL hydric
-                        #
-                        # Unranked hydric from here on down, looking at other properties such as:
-                        #   Local phase
-                        #   Other phase
-                        #   Drainage class
-                        #   Map unit name strings
-                        #       drainList = ["Poorly drained", "Very poorly drained"]
-                        #       phaseList = ["drained", "undrained", "channeled", "protected", "ponded", "flooded"]
-
-                        if [d for d in phaseList if str(localphase).lower().find(d) >= 0]:
-                            pw = True
-
-                            try:
-                                sumPct = dMu[mukey]
-                                dMu[mukey] = sumPct + comppct_r
-
-                            except:
-                                dMu[mukey] = comppct_r
-
-                        # otherphase
-                        elif [d for d in phaseList if str(otherph).lower().find(d) >= 0]:
-                            pw = True
-
-                            try:
-                                sumPct = dMu[mukey]
-                                dMu[mukey] = sumPct + comppct_r
-
-                            except:
-                                dMu[mukey] = comppct_r
-
-                        # look for specific strings in the map unit name
-                        elif [d for d in phaseList if muname.find(d) >= 0]:
-                            pw = True
-                            #if mukey == tmukey:
-                            #    PrintMsg("\tMuname = " + muname, 1)
-
-                            try:
-                                sumPct = dMu[mukey]
-                                dMu[mukey] = sumPct + comppct_r
-
-                            except:
-                                dMu[mukey] = comppct_r
-
-                        elif str(drainagecl) in drainList:
-                            pw = True
-
-                            try:
-                                sumPct = dMu[mukey]
-                                dMu[mukey] = sumPct + comppct_r
-
-                            except:
-                                dMu[mukey] = comppct_r
-
-                lastCokey = cokey # use this to skip the rest of the horizons for this component
-                arcpy.SetProgressorPosition()
-
-        if len(dMu) > 0:
-            arcpy.SetProgressor("step", "Populating " + os.path.basename(theMuTable) + "...",  0, len(dMu), 1)
-
-            # Populate the PWSL1POMU column in the map unit level table
-            muFlds = ["mukey", "pwsl1pomu"]
-            with arcpy.da.UpdateCursor(theMuTable, muFlds) as muCur:
-                for rec in muCur:
-                    mukey = rec[0]
-                    try:
-                        rec[1] = dMu[mukey]
-                        muCur.updateRow(rec)
-
-                    except:
-                        pass
-
-                    arcpy.SetProgressorPosition()
-
-        arcpy.ResetProgressor()
-        return True
-
-    except MyError, e:
-        # Example: raise MyError("this is an error message")
-        PrintMsg(str(e) + " \n", 2)
-        return False
-
-    except:
-        errorMsg()
-        return False
-
-## ===================================================================================
-def StateNames():
-    # Create dictionary object containing list of state abbreviations and their names that
-    # will be used to name the file geodatabase.
-    # For some areas such as Puerto Rico, U.S. Virgin Islands, Pacific Islands Area the
-    # abbrevation is
-
-    # NEED TO UPDATE THIS FUNCTION TO USE THE LAOVERLAP TABLE AREANAME. AREASYMBOL IS STATE ABBREV
+    # NEED TO UPDATE THIS FUNCTION TO USE THE LAOVERLAP TABLE AREANAME. AREASYMBOL IS STATE ABBREV
 
     try:
         stDict = dict()
@@ -3040,9 +2210,211 @@ def UpdateMetadata(outputWS, target, surveyInfo):
         errorMsg()
         return False
 
+## ===================================================================================
+def NCCPIWhereClause():
+    # cointerp query for the NCCPI main rule (mainRuleName) and its submodels (ruledepth 1)
+    if bRulekey:
+        # Much better performance if COINTERP.RULEKEY is indexed and can be used in the query
+        return "MRULEKEY = '" + dMainRuleKeys[mainRuleName] + "' AND RULEDEPTH < 2"
+
+    return "MRULENAME = '" + mainRuleName + "' AND RULEDEPTH < 2"
+
+## ===================================================================================
+def MapunitHashes(inputDB):
+    # Data hash for each map unit, from the mapunit, component, chorizon, chtexturegrp, chtexture, corestrictions,
+    # chfrags and cointerp records used by the Valu1 calculations. Each record is hashed with its table name and the
+    # record hashes are added up for the map unit, so the order the cursors return the records does not matter.
+    # Child records are tied to their map unit through the component, horizon and texture group keys. Only the
+    # cointerp records for the NCCPI rules (NCCPIWhereClause) are read.
+    #
+    try:
+        PrintMsg(" \n\tReading map unit data hashes...", 0)
+        dSum = dict()
+        dParent = {"cokey":dict(), "chkey":dict(), "chtgkey":dict()}
+
+        for tblName, fldList, parentFld, childFld in hashTables:
+            tbl = os.path.join(inputDB, tblName)
+
+            if tblName == "cointerp":
+                wc = NCCPIWhereClause()
+
+            else:
+                wc = None
+
+            with arcpy.da.SearchCursor(tbl, fldList, where_clause=wc) as cur:
+                for rec in cur:
+                    if parentFld == "mukey":
+                        mukey = rec[0]
+
+                    else:
+                        mukey = dParent[parentFld].get(rec[0], None)
+
+                        if mukey is None:
+                            # orphan record
+                            continue
+
+                    if not childFld is None:
+                        dParent[childFld][rec[1]] = mukey
+
+                    recHash = long(hashlib.md5(tblName + repr(rec)).hexdigest()[0:16], 16)
+                    dSum[mukey] = (dSum.get(mukey, 0L) + recHash) & 0xFFFFFFFFFFFFFFFFL
+
+        del dParent
+        dHashes = dict()
+
+        for mukey, recSum in dSum.items():
+            dHashes[mukey] = "%016x" % recSum
+
+        return dHashes
+
+    except MyError, e:
+        # Example: raise MyError("this is an error message")
+        PrintMsg(str(e) + " \n", 2)
+        return dict()
+
+    except:
+        errorMsg()
+        return dict()
+
+## ===================================================================================
+def FindChangedMapunits(inputDB, theMuTable):
+    # Compare the map unit data hashes with the ones saved (hashTable) when the Valu1 table was last made.
+    # Returns [dHashes, changed mukeys, removed mukeys]. The mukey lists are None when the whole
+    # table must be rebuilt: no previous Valu1 or hash table, a different NCCPI version or too many changes.
+    #
+    try:
+        dHashes = LimitIO(MapunitHashes, inputDB)
+        hashTbl = os.path.join(inputDB, hashTable)
+
+        if len(dHashes) == 0 or not arcpy.Exists(theMuTable) or not arcpy.Exists(hashTbl):
+            return [dHashes, None, None]
+
+        if mainRuleName == "NCCPI - National Commodity Crop Productivity Index (Ver 3.0)":
+            nccpiFld = "NCCPI3ALL"
+
+        else:
+            nccpiFld = "NCCPI2ALL"
+
+        if not nccpiFld in [fld.name.upper() for fld in arcpy.ListFields(theMuTable)]:
+            PrintMsg(" \n\tExisting Valu1 table does not have " + nccpiFld + ", rebuilding the whole table", 0)
+            return [dHashes, None, None]
+
+        dOld = dict()
+
+        with arcpy.da.SearchCursor(hashTbl, ["MUKEY", "DATAHASH"]) as cur:
+            for rec in cur:
+                dOld[rec[0]] = rec[1]
+
+        changedList = sorted([mukey for mukey, dataHash in dHashes.items() if dOld.get(mukey, None) != dataHash])
+        removedList = sorted([mukey for mukey in dOld if not mukey in dHashes])
+
+        if len(changedList) + len(removedList) > incrementalLimit * len(dHashes):
+            PrintMsg(" \n\t" + Number_Format(len(changedList) + len(removedList), 0, True) + " map units have changed, rebuilding the whole table", 0)
+            return [dHashes, None, None]
+
+        return [dHashes, changedList, removedList]
+
+    except MyError, e:
+        # Example: raise MyError("this is an error message")
+        PrintMsg(str(e) + " \n", 2)
+        return [dict(), None, None]
+
+    except:
+        errorMsg()
+        return [dict(), None, None]
+
+## ===================================================================================
+def SaveHashes(inputDB, dHashes):
+    # Replace the table of map unit data hashes used by FindChangedMapunits for the next run
+    #
+    try:
+        hashTbl = os.path.join(inputDB, hashTable)
+
+        if arcpy.Exists(hashTbl):
+            arcpy.Delete_management(hashTbl)
+
+        arcpy.CreateTable_management(inputDB, hashTable)
+        arcpy.AddField_management(hashTbl, "MUKEY", "TEXT", "", "", "30", "mukey")
+        arcpy.AddField_management(hashTbl, "DATAHASH", "TEXT", "", "", "16", "datahash")
+
+        with arcpy.da.InsertCursor(hashTbl, ["MUKEY", "DATAHASH"]) as cur:
+            for mukey in sorted(dHashes):
+                cur.insertRow([mukey, dHashes[mukey]])
+
+        return True
+
+    except MyError, e:
+        # Example: raise MyError("this is an error message")
+        PrintMsg(str(e) + " \n", 2)
+        return False
+
+    except:
+        errorMsg()
+        return False
+
+## ===================================================================================
+def MergeValuRows(partialTbl, theMuTable, keyList):
+    # Replace the Valu1 rows for the map units in keyList with the rows from partialTbl.
+    # partialTbl None only deletes them (map units removed from the database).
+    #
+    try:
+        keySet = set(keyList)
+        fldList = [fld.name for fld in arcpy.ListFields(theMuTable) if not fld.type in ["OID", "Geometry"]]
+
+        if not partialTbl is None:
+            partialFlds = [fld.name.upper() for fld in arcpy.ListFields(partialTbl) if not fld.type in ["OID", "Geometry"]]
+
+            if sorted(partialFlds) != sorted([fld.upper() for fld in fldList]):
+                raise MyError, "Fields in " + partialTbl + " do not match " + theMuTable
+
+        PrintMsg(" \n\tReplacing " + Number_Format(len(keySet), 0, True) + " map units in " + theMuTable, 0)
+        mukeyIndx = [fld.upper() for fld in fldList].index("MUKEY")
+
+        with arcpy.da.UpdateCursor(theMuTable, ["MUKEY"]) as cur:
+            for rec in cur:
+                if rec[0] in keySet:
+                    cur.deleteRow()
+
+        if not partialTbl is None:
+            with arcpy.da.SearchCursor(partialTbl, fldList) as inCur:
+                with arcpy.da.InsertCursor(theMuTable, fldList) as outCur:
+                    for rec in inCur:
+                        if rec[mukeyIndx] in keySet:
+                            outCur.insertRow(rec)
+
+        return True
+
+    except MyError, e:
+        # Example: raise MyError("this is an error message")
+        PrintMsg(str(e) + " \n", 2)
+        return False
+
+    except:
+        errorMsg()
+        return False
+
+## ===================================================================================
+def LimitIO(func, *args):
+    # Run one of the bulk read/write steps (query tables, fragments). When gSSURGO_ValuTable_Batch
+    # runs several databases at once, ioLimit only lets a few processes do this at the same time.
+    if ioLimit is None:
+        return func(*args)
+
+    ioLimit.acquire()
+
+    try:
+        return func(*args)
+
+    finally:
+        ioLimit.release()
+
 ## ===================================================================================
 def CreateValuTable(inputDB):
     # Run all processes from here
+    #
+    # When bIncremental is set and the Valu1 table has been made before, only the map units whose
+    # data changed since then are calculated (FindChangedMapunits) and their rows are replaced.
+    global incrementalKeys
 
     try:
         arcpy.overwriteOutput = True
@@ -3106,6 +2478,35 @@ def CreateValuTable(inputDB):
         # Name of component level output table (global variable)
         theCompTable = os.path.join(inputDB, "Co_VALU")
 
+        valuTable = theMuTable
+        dHashes = dict()
+        changedList = None
+
+        if bIncremental:
+            dHashes, changedList, removedList = FindChangedMapunits(inputDB, valuTable)
+
+        if not changedList is None:
+            if len(changedList) == 0 and len(removedList) == 0:
+                PrintMsg(" \n\tValu1 table is current for " + inputDB + " \n ", 0)
+                return True
+
+            PrintMsg(" \n\tUpdating Valu1 for " + Number_Format(len(changedList), 0, True) + " changed and " + \
+            Number_Format(len(removedList), 0, True) + " removed map units", 0)
+
+            if len(changedList) == 0:
+                if MergeValuRows(None, valuTable, removedList) == False:
+                    raise MyError, ""
+
+                SaveHashes(inputDB, dHashes)
+                PrintMsg(" \n\tValu1 table complete for " + inputDB + " \n ", 0)
+                return True
+
+            # The changed map units are calculated in a Valu1 table in the scratch geodatabase
+            # and then replace their rows in the input Valu1 table (MergeValuRows)
+            incrementalKeys = set(changedList)
+            theMuTable = os.path.join(outputDB, "Valu1")
+            theCompTable = os.path.join(outputDB, "Co_VALU")
+
         # Set output workspace to same as the input table
         #env.workspace = os.path.dirname(arcpy.Describe(queryTbl).catalogPath)
         env.workspace = inputDB
@@ -3120,13 +2521,13 @@ def CreateValuTable(inputDB):
             raise MyError, ""
 
         # Create initial set of query tables used for RZAWS, AWS and SOC
-        if CreateQueryTables(inputDB, outputDB, 150.0) == False:
+        if LimitIO(CreateQueryTables, inputDB, outputDB, 150.0) == False:
             raise MyError, ""
 
         # Create permanent output tables for the map unit and component levels
         depthList = [(0,5), (5, 20), (20, 50), (50, 100), (100, 150), (150, 999), (0, 20), (0, 30), (0, 100), (0, 150), (0, 999)]
 
-        if CreateOutputTableMu(theMuTable, depthList, dPct) == False:
+        if CreateOutputTableMu(inputDB, theMuTable, depthList, dPct) == False:
             raise MyError, ""
 
         if CreateOutputTableCo(theCompTable, depthList) == False:
@@ -3159,7 +2560,7 @@ def CreateValuTable(inputDB):
 
         # Store all component-horizon fragment volumes (percent) in a dictionary (by chkey)
         # and use in the root zone SOC calculations
-        dFrags = GetFragVol(inputDB)
+        dFrags = LimitIO(GetFragVol, inputDB)
 
         if len(dFrags) == 0:
             raise MyError, "No fragment volume information"
@@ -3171,29 +2572,27 @@ def CreateValuTable(inputDB):
 
         del dSOCRestrictions
 
-        # Calculate NCCPI
-        # Create query table using component and chorizon tables
+        # Free the horizon arrays shared by the root zone, AWS and SOC calculations
+        gSSURGO_ValuArrays.Release()
+
+        # Calculate NCCPI and Potential Wetland Soils
+        #
         arcpy.SetProgressor("default", "Calculating NCCPI data elements...")
-        nccpiTbl = "NCCPI_Table"
 
-        if  MakeNCCPIQueryTable(inputDB, nccpiTbl) == False:
-            pass
+        if LimitIO(CalcInterps, inputDB, theMuTable, dPct) == False:
+            raise MyError, ""
 
-        else:
-            if mainRuleName == "NCCPI - National Commodity Crop Productivity Index (Ver 3.0)":
-                if CalcNCCPI3(inputDB, theMuTable, nccpiTbl, dPct) == False:
-                    raise MyError, ""
+        PrintMsg(" \n\tAll calculations complete", 0)
 
-            elif mainRuleName == "NCCPI - National Commodity Crop Productivity Index (Ver 2.0)":
-                if CalcNCCPI2(inputDB, theMuTable, nccpiTbl, dPct) == False:
-                    raise MyError, ""
+        if not incrementalKeys is None:
+            if MergeValuRows(theMuTable, valuTable, changedList + removedList) == False:
+                raise MyError, ""
 
-        # Calculate Potential Wetland Soils
-        #
-        if CalcPWSL(inputDB, outputDB, theMuTable, dPct) == False:
-            raise MyError, ""
+            arcpy.Delete_management(theMuTable)
+            theMuTable = valuTable
 
-        PrintMsg(" \n\tAll calculations complete", 0)
+        if len(dHashes) > 0:
+            SaveHashes(inputDB, dHashes)
 
         # Create metadata for the VALU table
         # Query the output SACATALOG table to get list of surveys that were exported to the gSSURGO
@@ -3237,10 +2636,15 @@ def CreateValuTable(inputDB):
         errorMsg()
         return False
 
+    finally:
+        incrementalKeys = None
+
 ## ===================================================================================
 ## ====================================== Main Body ==================================
 # Import modules
-import os, sys, string, re, locale, arcpy, traceback, collections
+import os, sys, string, re, locale, arcpy, traceback, collections, hashlib, array
+import numpy as np
+import gSSURGO_ValuArrays
 from operator import itemgetter, attrgetter
 import xml.etree.cElementTree as ET
 from datetime import datetime
@@ -3282,6 +2686,43 @@ from arcpy import env
 #
 # compkind filter for earthy components:  <> 'Miscellaneous area'
 
+# Semaphore shared by the gSSURGO_ValuTable_Batch worker processes (LimitIO). None for a single database.
+ioLimit = None
+
+# NCCPI output columns for each main rule (CalcInterps): [Valu1 field, submodel rule name (ruledepth 1)].
+# The overall index (ruledepth 0) has no submodel name.
+dNCCPIRules = {"NCCPI - National Commodity Crop Productivity Index (Ver 2.0)": [["NCCPI2ALL", None], \
+["NCCPI2CS", "NCCPI - NCCPI Corn and Soybeans Submodel (II)"], ["NCCPI2CO", "NCCPI - NCCPI Cotton Submodel (II)"], \
+["NCCPI2SG", "NCCPI - NCCPI Small Grains Submodel (II)"]], \
+"NCCPI - National Commodity Crop Productivity Index (Ver 3.0)": [["NCCPI3ALL", None], \
+["NCCPI3COT", "NCCPI - NCCPI Cotton Submodel (II)"], ["NCCPI3CORN", "NCCPI - NCCPI Corn Submodel (I)"], \
+["NCCPI3SOY", "NCCPI - NCCPI Soybeans Submodel (I)"], ["NCCPI3SG", "NCCPI - NCCPI Small Grains Submodel (II)"]]}
+
+# cointerp.mrulekey for each NCCPI main rule, used when cointerp has a rulekey index (bRulekey)
+dMainRuleKeys = {"NCCPI - National Commodity Crop Productivity Index (Ver 2.0)":"34170", \
+"NCCPI - National Commodity Crop Productivity Index (Ver 3.0)":"54955"}
+
+# Incremental updates (FindChangedMapunits). The data hash of each map unit is saved in hashTable
+# when the Valu1 table is made. On the next run only the map units with a different hash are
+# calculated, unless more than incrementalLimit of them changed. incrementalKeys is the set of
+# map units being calculated, None for all of them.
+bIncremental = True
+incrementalLimit = 0.5
+incrementalKeys = None
+hashTable = "Valu1_Hashes"
+
+# Tables read for the map unit data hashes: [table, fields, key of the parent record, key for child records]
+hashTables = [["mapunit", ["mukey", "musym", "muname"], "mukey", None], \
+["component", ["mukey", "cokey", "comppct_r", "majcompflag", "compname", "compkind", "taxorder", "taxsubgrp", \
+"localphase", "otherph", "hydricrating", "drainagecl"], "mukey", "cokey"], \
+["chorizon", ["cokey", "chkey", "hzname", "desgnmaster", "hzdept_r", "hzdepb_r", "sandtotal_r", "silttotal_r", \
+"claytotal_r", "om_r", "dbthirdbar_r", "ec_r", "ph1to1h2o_r", "awc_r"], "cokey", "chkey"], \
+["corestrictions", ["cokey", "reskind", "reshard", "resdept_r"], "cokey", None], \
+["chtexturegrp", ["chkey", "chtgkey", "texture", "rvindicator"], "chkey", "chtgkey"], \
+["chtexture", ["chtgkey", "lieutex"], "chtgkey", None], \
+["chfrags", ["chkey", "fragvol_r"], "chkey", None], \
+["cointerp", ["cokey", "rulekey", "ruledepth", "interphr", "interphrc"], "cokey", None]]
+
 
 try:
     if __name__ == "__main__":
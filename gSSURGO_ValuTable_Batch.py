@@ -1,6 +1,20 @@
 # gSSURGO_ValuTable_Batch.py
 #
 # Batch mode creation of Valu table for gSSURGO databases
+#
+# Each database is independent, so the Valu1 tables are created by a pool of worker processes, one
+# database at a time per worker (RunBatch). Each worker has its own scratch workspace for the query
+# tables. The bulk read/write steps in gSSURGO_ValuTable (LimitIO) share a semaphore, so only ioCnt
+# workers are reading a database or writing query tables at once while the others are calculating.
+#
+# Worker messages are not shown in ArcMap. Each database's time and any error messages are returned
+# to this process and listed in a summary at the end. With fewer than two workers the databases are
+# processed here, one at a time, as before.
+#
+# Optional parameters:  3 number of worker processes (0 is one per processor, less one),
+#                       4 number of workers that can read or write at the same time
+#
+# 2017-11-10
 ## ===================================================================================
 class MyError(Exception):
     pass
@@ -221,45 +235,203 @@ def Number_Format(num, places=0, bCommas=True):
         return False
 
 ## ===================================================================================
+def WorkerMsg(msg, severity=0):
+    # PrintMsg for gSSURGO_ValuTable in a worker process. Messages are saved for the summary.
+    workerMsgs.append([severity, msg])
+
+## ===================================================================================
+def StartWorker(workFolder, ioLock):
+    # Pool initializer. Runs once in each worker process.
+    import gSSURGO_ValuTable
+
+    # Scratch workspace for this worker's query tables
+    scratchFolder = os.path.join(workFolder, "Valu_" + str(os.getpid()))
+
+    if not os.path.isdir(scratchFolder):
+        os.mkdir(scratchFolder)
+
+    arcpy.env.scratchWorkspace = scratchFolder
+    setScratchWorkspace()
+    arcpy.env.overwriteOutput = True
+
+    gSSURGO_ValuTable.ioLimit = ioLock
+    gSSURGO_ValuTable.PrintMsg = WorkerMsg
+
+## ===================================================================================
+def RunValuTable(theWS):
+    # Worker. Create the Valu1 table for one database.
+    # Returns [database, status, seconds, list of error messages].
+    #
+    import gSSURGO_ValuTable
+
+    del workerMsgs[:]
+    start = time.time()
+
+    try:
+        bValu = gSSURGO_ValuTable.CreateValuTable(theWS)
+
+    except:
+        bValu = False
+        workerMsgs.append([2, traceback.format_exc()])
+
+    errList = [msg.strip() for severity, msg in workerMsgs if severity == 2 and msg.strip() != ""]
+
+    return [theWS, bValu, time.time() - start, errList]
+
+## ===================================================================================
+def PrintSummary(results, start):
+    # List the time for each database and the errors for the ones that failed
+    badList = [result for result in results if result[1] != True]
+    dbTime = sum([result[2] for result in results])
+
+    PrintMsg(" \n" + (65 * "*"), 0)
+    PrintMsg("Valu table summary", 0)
+    PrintMsg((65 * "*") + " \n ", 0)
+
+    for theWS, bValu, seconds, errList in results:
+        if bValu == True:
+            PrintMsg("\t" + os.path.basename(theWS) + ":  " + elapsedTime(time.time() - seconds), 0)
+
+        else:
+            PrintMsg("\t" + os.path.basename(theWS) + ":  FAILED after " + elapsedTime(time.time() - seconds), 1)
+
+            for msg in errList:
+                PrintMsg("\t\t" + msg.replace("\n", "\n\t\t"), 1)
+
+    if len(badList) > 0:
+        PrintMsg(" \nFailed to create " + str(len(badList)) + " of " + str(len(results)) + " Valu tables: " + ", ".join([os.path.basename(result[0]) for result in badList]), 2)
+
+    PrintMsg(" \nTime for all databases: " + elapsedTime(time.time() - dbTime), 0)
+    PrintMsg("Total processing time for " + str(len(results)) + " Valu tables: " + elapsedTime(start) + " \n ", 0)
+
+## ===================================================================================
+def RunBatch(inputFolder, gdbList, workerCnt=0, ioCnt=2):
+    # Create the Valu1 table for each database in gdbList. Returns the list of [database, status,
+    # seconds, error messages].
+    #
+    # workerCnt  number of worker processes. 0 means one per processor, less one for ArcMap.
+    # ioCnt      number of workers that can run the bulk read/write steps at the same time
+    #
+    import gSSURGO_ValuTable
+
+    results = list()
+    workFolder = None
+    pool = None
+    start = time.time()
+
+    try:
+        wsList = [os.path.join(str(inputFolder), str(db)) for db in gdbList]
+
+        if workerCnt == 0:
+            try:
+                workerCnt = multiprocessing.cpu_count() - 1
+
+            except NotImplementedError:
+                workerCnt = 1
+
+        workerCnt = min(workerCnt, len(wsList))
+        arcpy.SetProgressor("step", "Creating Valu tables...", 0, len(wsList), 1)
+
+        if workerCnt < 2:
+            # One database at a time in this process
+            for theWS in wsList:
+                arcpy.SetProgressorLabel("Creating Valu table for " + os.path.basename(theWS))
+                PrintMsg(" \n" + (65 * "*"), 0)
+                PrintMsg("Processing " + theWS, 0)
+                PrintMsg(" \n" + (65 * "*"), 0)
+                dbStart = time.time()
+                bValu = gSSURGO_ValuTable.CreateValuTable(theWS)
+                results.append([theWS, bValu, time.time() - dbStart, []])
+                arcpy.SetProgressorPosition()
+
+            return results
+
+        # ArcMap runs python in-process, so the workers must be started with the python executable
+        pythonExe = os.path.join(sys.exec_prefix, "pythonw.exe")
+
+        if os.path.isfile(pythonExe):
+            multiprocessing.set_executable(pythonExe)
+
+        workFolder = tempfile.mkdtemp(prefix="gSSURGO_Valu_")
+        PrintMsg(" \nCreating " + str(len(wsList)) + " Valu tables using " + str(workerCnt) + " processes", 0)
+
+        ioLock = multiprocessing.Semaphore(max(ioCnt, 1))
+        pool = multiprocessing.Pool(workerCnt, StartWorker, (workFolder, ioLock))
+
+        # Databases are reported as they finish
+        for result in pool.imap_unordered(RunValuTable, wsList, 1):
+            results.append(result)
+            theWS, bValu, seconds, errList = result
+
+            if bValu == True:
+                PrintMsg("\tValu table complete for " + os.path.basename(theWS) + " (" + elapsedTime(time.time() - seconds).strip() + ")", 0)
+
+            else:
+                PrintMsg("\tFailed to create Valu table for " + os.path.basename(theWS), 1)
+
+            arcpy.SetProgressorPosition()
+
+        # Summary in the same order as the input list
+        results.sort(key = lambda result : wsList.index(result[0]))
+
+        return results
+
+    except MyError, e:
+        PrintMsg(str(e), 2)
+        return results
+
+    except:
+        errorMsg()
+        return results
+
+    finally:
+        if not pool is None:
+            pool.close()
+            pool.join()
+
+        if not workFolder is None:
+            shutil.rmtree(workFolder, True)
+
+        if len(results) > 0:
+            PrintSummary(results, start)
+
 ## ===================================================================================
 ## MAIN
 ## ===================================================================================
 
 # Import system modules
-import sys, string, os, arcpy, locale, traceback, math, time
+import sys, string, os, arcpy, locale, traceback, math, time, multiprocessing, tempfile, shutil
 from arcpy import env
-from arcpy.sa import *
 
-# Create the Geoprocessor object
-try:
-    # get parameters
-    wc = arcpy.GetParameterAsText(0)                      # Wildcard filter used to create geodatabase list
-    inputFolder = arcpy.GetParameter(1)             # Folder containing all geodatabases to be processed
-    gdbList = arcpy.GetParameter(2)                       # list of geodatabase names to be processed
+# Messages from gSSURGO_ValuTable in a worker process (WorkerMsg)
+workerMsgs = list()
 
-    import gSSURGO_ValuTable
+if __name__ == "__main__":
+    try:
+        # get parameters
+        wc = arcpy.GetParameterAsText(0)                      # Wildcard filter used to create geodatabase list
+        inputFolder = arcpy.GetParameter(1)             # Folder containing all geodatabases to be processed
+        gdbList = arcpy.GetParameter(2)                       # list of geodatabase names to be processed
+        workerCnt = 0
+        ioCnt = 2
 
-    env.overwriteOutput = True
+        if arcpy.GetArgumentCount() > 3 and arcpy.GetParameterAsText(3) != "":
+            workerCnt = int(arcpy.GetParameterAsText(3))      # number of worker processes
 
-    start = time.time()
-    arcpy.SetProgressor("default", "Converting soil polygon layers to raster...")
-
-    for db in gdbList:
-        arcpy.SetProgressorLabel("Creating Valu table for " + db)
-        theWS = os.path.join(str(inputFolder), db)
-        PrintMsg(" \n" + (65 * "*"), 0)
-        PrintMsg("Processing " + theWS, 0)
-        PrintMsg(" \n" + (65 * "*"), 0)
-        bValu = gSSURGO_ValuTable.CreateValuTable(theWS)
+        if arcpy.GetArgumentCount() > 4 and arcpy.GetParameterAsText(4) != "":
+            ioCnt = int(arcpy.GetParameterAsText(4))          # workers reading or writing at the same time
 
-    theMsg = " \nTotal processing time for " + str(len(gdbList)) + " Valu tables: " + elapsedTime(start) + " \n "
-    PrintMsg(theMsg, 0)
+        env.overwriteOutput = True
 
-except MyError, e:
-    # Example: raise MyError, "This is an error message"
-    PrintMsg(str(e), 2)
+        # The worker processes need these functions from an importable module, not __main__
+        import gSSURGO_ValuTable_Batch
 
-except:
-    errorMsg()
+        results = gSSURGO_ValuTable_Batch.RunBatch(inputFolder, gdbList, workerCnt, ioCnt)
 
+    except MyError, e:
+        # Example: raise MyError, "This is an error message"
+        PrintMsg(str(e), 2)
+
+    except:
+        errorMsg()
 